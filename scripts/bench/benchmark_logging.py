@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Benchmark: CPU spent on logging per poll cycle at the default INFO level.
+
+Replays the log calls of one poll cycle (``--inverters`` Powdrive inverters
+and one IAMMeter) ``--cycles`` times, two ways, into a log file:
+
+* legacy   - the calls as they were: ``traceback.extract_stack()`` and an
+  INFO line per Powdrive poll, per-inverter connection state in the run
+  loop, eleven INFO register dumps per meter poll, f-strings built even for
+  disabled DEBUG records, and a synchronous file handler
+* pipeline - the current calls (DEBUG-only detail behind ``isEnabledFor``,
+  ``%``-style arguments) through ``log_pipeline.install`` (queued handler,
+  optional per-call-site rate limit with ``--rate-limit``)
+
+Reports the CPU time of the polling thread per cycle (what delays the next
+poll) and of the whole process, plus the log lines written.
+
+Usage:
+    python scripts/bench/benchmark_logging.py [--cycles N] [--inverters N] [--rate-limit N]
+"""
+
+import argparse
+import logging
+import sys
+import tempfile
+import time
+import traceback
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+from solarhub import log_pipeline  # noqa: E402
+from solarhub.config import LoggingConfig  # noqa: E402
+from solarhub.log_pipeline import caller_info  # noqa: E402
+
+FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+REGISTERS = {f"reg_{i}": i * 1.5 for i in range(60)}
+KEY_REGISTERS = ["voltage_phase_a_legacy", "voltage_phase_a", "current_phase_a_legacy", "current_phase_a",
+                 "sum_power_legacy", "total_power", "active_power_phase_a_legacy", "active_power_phase_a",
+                 "frequency_legacy", "frequency"]
+REGISTERS.update({reg_id: 230.1 for reg_id in KEY_REGISTERS})
+
+app_log = logging.getLogger("solarhub.app")
+inv_log = logging.getLogger("solarhub.adapters.powdrive")
+meter_log = logging.getLogger("solarhub.adapters.iammeter")
+
+
+def legacy_cycle(inverters: int):
+    for i in range(inverters):
+        app_log.info(f"RUN LOOP: Before polling - Inverter inv{i} (port=/dev/ttyUSB{i}, client=connected=True)")
+    app_log.info("RUN LOOP: Starting polling cycle for all inverters")
+    for i in range(inverters):
+        stack = traceback.extract_stack()
+        callers = []
+        for j in range(min(5, len(stack) - 1)):
+            frame = stack[-(j + 2)] if len(stack) > j + 1 else None
+            if frame:
+                filename = frame.filename.split('/')[-1]
+                callers.append(f"{filename}:{frame.lineno}({frame.name})")
+        caller = " <- ".join(callers) if callers else "unknown"
+        inv_log.info(f"POWDRIVE POLL: Starting poll for inv{i} (port=/dev/ttyUSB{i}, regs_loaded=True, "
+                     f"client=connected=True) - called from: {caller}")
+        app_log.info(f"Inverter inv{i} telemetry - SOC: 65.0%, Mode: Self used, Source: Solar only, PV: 3000W, "
+                     f"Load: 1200W, Batt: 500W, Grid: -400W")
+    meter_log.info(f"IAMMeter grid: Read {len(REGISTERS)} registers from JSON map")
+    meter_log.debug(f"IAMMeter grid: Successfully read register IDs: {sorted(REGISTERS.keys())}")
+    for reg_id in KEY_REGISTERS:
+        meter_log.info(f"IAMMeter grid: {reg_id} = {REGISTERS[reg_id]} (type: {type(REGISTERS[reg_id]).__name__})")
+    meter_log.info(f"IAMMeter grid: Available current registers: {dict((k, REGISTERS[k]) for k in KEY_REGISTERS[2:4])}")
+    meter_log.info(f"IAMMeter grid: Available power registers: {dict((k, REGISTERS[k]) for k in KEY_REGISTERS[4:8])}")
+    meter_log.info("IAMMeter grid: Power read = -400W")
+
+
+def pipeline_cycle(inverters: int):
+    if app_log.isEnabledFor(logging.DEBUG):
+        for i in range(inverters):
+            app_log.debug("RUN LOOP: Before polling - Inverter %s (port=%s, client=%s)",
+                          f"inv{i}", f"/dev/ttyUSB{i}", "connected=True")
+    app_log.debug("RUN LOOP: Starting polling cycle for all inverters")
+    for i in range(inverters):
+        if inv_log.isEnabledFor(logging.DEBUG):
+            inv_log.debug("POWDRIVE POLL: Starting poll for %s (port=%s, regs_loaded=%s, client=%s) - called from: %s",
+                          f"inv{i}", f"/dev/ttyUSB{i}", True, "connected=True", caller_info())
+        if app_log.isEnabledFor(logging.INFO):
+            app_log.info("Inverter %s telemetry - SOC: %s%%, Mode: %s, Source: %s, PV: %sW, Load: %sW, "
+                         "Batt: %sW, Grid: %sW", f"inv{i}", 65.0, "Self used", "Solar only", 3000, 1200, 500, -400)
+    if meter_log.isEnabledFor(logging.DEBUG):
+        meter_log.debug("IAMMeter %s: Read %d registers from JSON map", "grid", len(REGISTERS))
+    meter_log.debug("IAMMeter %s: Available current registers: %s", "grid",
+                    dict((k, REGISTERS[k]) for k in KEY_REGISTERS[2:4]))
+    meter_log.debug("IAMMeter %s: Available power registers: %s", "grid",
+                    dict((k, REGISTERS[k]) for k in KEY_REGISTERS[4:8]))
+    meter_log.debug("IAMMeter %s: Power read = %sW", "grid", -400)
+
+
+def run(label: str, cycle, cycles: int, inverters: int, path: Path):
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    thread_cpu = time.thread_time()
+    for _ in range(cycles):
+        cycle(inverters)
+    thread_cpu = time.thread_time() - thread_cpu
+    log_pipeline.shutdown()
+    for handler in list(logging.getLogger().handlers):
+        logging.getLogger().removeHandler(handler)
+        handler.close()
+    cpu = time.process_time() - cpu
+    wall = time.perf_counter() - wall
+    lines = sum(1 for _ in path.open()) if path.exists() else 0
+    print(f"{label:<10}{thread_cpu / cycles * 1e6:>16.0f}{cpu / cycles * 1e6:>16.0f}{wall:>9.2f}{lines:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cycles", type=int, default=2000, help="Poll cycles to replay")
+    parser.add_argument("--inverters", type=int, default=3, help="Inverters per cycle")
+    parser.add_argument("--rate-limit", type=int, default=0,
+                        help="Max INFO records per call site per minute for the pipeline (0 = no limit)")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.INFO)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'':<10}{'poll-thread us':>16}{'process us':>16}{'wall s':>9}{'lines':>9}")
+
+        legacy_path = Path(tmp) / "legacy.log"
+        handler = logging.FileHandler(legacy_path)
+        handler.setFormatter(logging.Formatter(FORMAT))
+        logging.getLogger().addHandler(handler)
+        run("legacy", legacy_cycle, args.cycles, args.inverters, legacy_path)
+
+        # The console handler goes to /dev/null; the JSON-lines file is the log on disk
+        pipeline_path = Path(tmp) / "pipeline.jsonl"
+        limits = {"solarhub": args.rate_limit} if args.rate_limit else {}
+        stdout, sys.stdout = sys.stdout, open("/dev/null", "w")
+        try:
+            log_pipeline.install(LoggingConfig(format=FORMAT, json_file=str(pipeline_path), rate_limits=limits))
+        finally:
+            devnull, sys.stdout = sys.stdout, stdout
+        run("pipeline", pipeline_cycle, args.cycles, args.inverters, pipeline_path)
+        devnull.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: register decode cost per poll for each shipped register map.
+
+Compares the old per-poll interpretation of the JSON register dicts with the
+precompiled decoders (solarhub.adapters.register_decoder) decoding whole
+block responses. Only decoding is measured; no device is needed.
+
+Usage:
+    python scripts/bench/benchmark_register_decode.py [--polls N]
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+from solarhub.adapters.read_plan import compile_read_plan  # noqa: E402
+from solarhub.adapters.register_decoder import (  # noqa: E402
+    DIALECT_MIXIN, DIALECT_SENERGY, RegisterDecoder, decode_block
+)
+
+MAPS_DIR = ROOT / "register_maps"
+
+
+def interpreted_decode(r: Dict[str, Any], regs: List[int]) -> Any:
+    """Per-call decode that re-reads the register dict (pre-compilation behaviour)."""
+    t = (r.get("type") or "").lower()
+    size = max(1, int(r.get("size", 1)))
+    scale = r.get("scale")
+    enc = (r.get("encoder") or "").lower()
+    if enc == "ascii":
+        buf = bytearray()
+        for w in regs[:size]:
+            w = int(w) & 0xFFFF
+            buf.append((w >> 8) & 0xFF)
+            buf.append(w & 0xFF)
+        return bytes(buf).split(b"\x00", 1)[0].decode("ascii", errors="ignore").strip()
+    bitmask = r.get("bitmask")
+    if bitmask and regs:
+        regs = [(int(regs[0]) & int(bitmask))]
+        if r.get("higherBits"):
+            regs = [(regs[0] >> 8) & 0xFF]
+    if size == 1 and regs:
+        val = int(regs[0])
+        if "s16" in t and val >= 0x8000:
+            val = val - 0x10000
+    elif size == 2 and regs and len(regs) >= 2:
+        val = (regs[0] << 16) | regs[1]
+        if "s32" in t and val & 0x80000000:
+            val = -((~val & 0xFFFFFFFF) + 1)
+    else:
+        val = 0
+    if scale and isinstance(val, (int, float)):
+        val = val * scale
+    bit_enum = r.get("bit_enum")
+    if isinstance(bit_enum, dict) and isinstance(val, int):
+        msgs = []
+        for k, v in bit_enum.items():
+            if val & (1 << int(k, 10)):
+                msgs.append(str(v))
+        return msgs if msgs else ["OK"]
+    return val
+
+
+def _time_per_poll(fn, polls: int) -> float:
+    fn()  # warm up
+    start = time.perf_counter()
+    for _ in range(polls):
+        fn()
+    return (time.perf_counter() - start) / polls * 1e6
+
+
+def bench_map(path: Path, polls: int) -> Dict[str, Any]:
+    regs = json.loads(path.read_text(encoding="utf-8"))
+    rnd = random.Random(path.name)
+    interpreted_blocks = compile_read_plan(regs)
+    compiled_blocks = {
+        DIALECT_MIXIN: compile_read_plan(regs, decoder_factory=RegisterDecoder),
+        DIALECT_SENERGY: compile_read_plan(regs, decoder_factory=lambda r: RegisterDecoder(r, DIALECT_SENERGY)),
+    }
+    responses = [[rnd.randrange(0x10000) for _ in range(b.count)] for b in interpreted_blocks]
+
+    def interpreted():
+        values = {}
+        for block, words in zip(interpreted_blocks, responses):
+            for m in block.members:
+                values[m.reg_id] = interpreted_decode(m.reg, words[m.offset:m.offset + m.size])
+        return values
+
+    def compiled(dialect):
+        def run():
+            values = {}
+            for block, words in zip(compiled_blocks[dialect], responses):
+                decode_block(block.members, words, values)
+            return values
+        return run
+
+    return {
+        "map": path.stem.replace("_registers", ""),
+        "registers": sum(len(b.members) for b in interpreted_blocks),
+        "blocks": len(interpreted_blocks),
+        "interpreted_us": _time_per_poll(interpreted, polls),
+        "compiled_us": _time_per_poll(compiled(DIALECT_MIXIN), polls),
+        "compiled_senergy_us": _time_per_poll(compiled(DIALECT_SENERGY), polls),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--polls", type=int, default=2000, help="Polls to time per map")
+    args = parser.parse_args()
+
+    print(f"{'map':<12}{'regs':>6}{'blocks':>8}{'interpreted':>14}{'compiled':>11}"
+          f"{'senergy':>10}{'speedup':>9}")
+    for path in sorted(MAPS_DIR.glob("*_registers.json")):
+        r = bench_map(path, args.polls)
+        if not r["registers"]:
+            # Not a Modbus register map (e.g. pytes serial protocol fields)
+            continue
+        speedup = r["interpreted_us"] / r["compiled_us"] if r["compiled_us"] else 0.0
+        print(f"{r['map']:<12}{r['registers']:>6}{r['blocks']:>8}"
+              f"{r['interpreted_us']:>12.1f}us{r['compiled_us']:>9.1f}us"
+              f"{r['compiled_senergy_us']:>8.1f}us{speedup:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
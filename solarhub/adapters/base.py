@@ -1,10 +1,14 @@
-from typing import Dict, Any, List, Optional, Union, Literal
+from typing import Callable, Dict, Any, List, Optional, Tuple, Union, Literal
 from abc import ABC, abstractmethod
 import json
 import asyncio
 import logging
 from solarhub.models import Telemetry
 from solarhub.config import InverterConfig
+from solarhub.adapters.read_plan import RegisterReadPlan, ConnectionLostError
+from solarhub.adapters.register_decoder import RegisterDecoder
+from solarhub.adapters.register_shadow import RegisterShadow
+from solarhub.adapters.write_plan import PlannedWrite, WritePlan, WritePlanStats, WriteResult
 
 log = logging.getLogger(__name__)
 
@@ -160,6 +164,9 @@ class ModbusClientMixin:
     - Optionally define `self._client_migrated: bool = False` to track migration
     - Implement `_get_client_config()` method that returns client configuration dict
     """
+
+    # Existing clients closed and recreated (another event loop, lost connection)
+    client_recreations = 0
     
     async def _get_client_config(self) -> Dict[str, Any]:
         """
@@ -242,6 +249,8 @@ class ModbusClientMixin:
                     return
             
             if needs_recreate:
+                if getattr(self, 'client', None) is not None:
+                    self.client_recreations += 1
                 # Robustly close any previous client and ensure port release
                 await self._force_close_client()
                 
@@ -741,10 +750,20 @@ class JsonRegisterMixin:
     and define:
       - self.regs: List[Dict[str, Any]]
       - self.addr_offset: int (optional, default 0)
+    Optionally implement _read_input_regs(addr, count) for input registers
+    (defaults to _read_holding_regs).
     """
 
     regs: List[Dict[str, Any]] = []
     addr_offset: int = 0
+    _read_plan: Optional[RegisterReadPlan] = None
+    _decoders: Optional[Dict[int, RegisterDecoder]] = None
+    _shadow: Optional[RegisterShadow] = None
+    _shadow_regs: Optional[List[Dict[str, Any]]] = None
+    # Set while handle_commands builds a write plan; writes are staged instead of sent
+    _write_plan: Optional[WritePlan] = None
+    _write_tag: Optional[int] = None
+    _write_plan_stats: Optional[WritePlanStats] = None
 
     def load_register_map(self, file_path: str) -> None:
         try:
@@ -752,7 +771,92 @@ class JsonRegisterMixin:
                 self.regs = json.load(f)
         except Exception as e:
             self.regs = []
+            self._read_plan = None
             raise RuntimeError(f"Could not load register map {file_path}: {e}")
+        self._compile_read_plan()
+
+    def _compile_read_plan(self) -> RegisterReadPlan:
+        """Compile self.regs into contiguous block reads (limits from the adapter config when set)."""
+        adapter_cfg = (getattr(getattr(self, "inv", None), "adapter", None)
+                       or getattr(getattr(self, "meter_cfg", None), "adapter", None))
+        max_block = getattr(adapter_cfg, "read_block_max_regs", None) or 64
+        max_gap = getattr(adapter_cfg, "read_block_max_gap", None)
+        slow_every = getattr(adapter_cfg, "slow_register_every", None) or 1
+        # Decoders of a replaced map are dropped with it
+        self._decoders = {}
+        self._read_plan = RegisterReadPlan(self.regs, max_block_regs=max_block,
+                                           max_gap=8 if max_gap is None else max_gap,
+                                           decoder_factory=self._decoder_for,
+                                           slow_every=slow_every)
+        self._read_plan_regs = self.regs
+        log.debug(f"Register read plan: {self._read_plan.register_count} registers in "
+                  f"{len(self._read_plan.blocks)} blocks (max_block={max_block})")
+        return self._read_plan
+
+    @property
+    def register_shadow(self) -> Optional[RegisterShadow]:
+        """Shadow image of the holding registers (None without a map or with shadow_refresh_s = 0)."""
+        if not self.regs:
+            return None
+        if self._shadow is None or self._shadow_regs is not self.regs:
+            adapter_cfg = getattr(getattr(self, "inv", None), "adapter", None)
+            refresh_s = getattr(adapter_cfg, "shadow_refresh_s", 0)
+            if not isinstance(refresh_s, (int, float)) or refresh_s <= 0:
+                return None
+            max_gap = getattr(adapter_cfg, "read_block_max_gap", None)
+            self._shadow = RegisterShadow(
+                self.regs, decoder_factory=self._decoder_for, refresh_s=refresh_s,
+                blocks_per_poll=getattr(adapter_cfg, "shadow_blocks_per_poll", None) or 2,
+                max_block_regs=getattr(adapter_cfg, "read_block_max_regs", None) or 64,
+                max_gap=8 if max_gap is None else max_gap)
+            self._shadow_regs = self.regs
+        return self._shadow
+
+    async def refresh_shadow(self) -> int:
+        """Advance the shadow refresh by a few block reads; call from the poll loop after a poll."""
+        shadow = self.register_shadow
+        if shadow is None:
+            return 0
+        return await shadow.refresh(self._read_block_regs, getattr(self, "addr_offset", 0))
+
+    def shadow_values(self, idents: List[str]) -> Tuple[Dict[str, Any], Dict[str, Any], List[str]]:
+        """
+        Values of ``idents`` from the shadow image, without bus traffic.
+
+        Returns (values, staleness metadata, idents the shadow does not hold,
+        e.g. input registers or names missing from the map).
+        """
+        shadow = self.register_shadow
+        if shadow is None:
+            return {}, {}, list(idents)
+        ids: Dict[str, str] = {}
+        uncovered: List[str] = []
+        for ident in idents:
+            try:
+                reg_id = self._find_reg_by_id_or_name(ident).get("id")
+            except KeyError:
+                reg_id = None
+            if shadow.covers(reg_id):
+                ids[ident] = reg_id
+            else:
+                uncovered.append(ident)
+        by_id, meta = shadow.get(ids.values())
+        meta["missing"] = [ident for ident, reg_id in ids.items() if reg_id in meta["missing"]]
+        return {ident: by_id[reg_id] for ident, reg_id in ids.items()}, meta, uncovered
+
+    def _shadow_written(self, r: Dict[str, Any], words: List[int]) -> None:
+        """Write-through: record a written value as a read of ``words`` would decode it."""
+        shadow = self._shadow
+        if shadow is not None and shadow.covers(r.get("id")):
+            try:
+                shadow.record(r.get("id"), self._decode_words(r, words), source="write")
+            except Exception as e:
+                log.debug(f"Could not record write of {r.get('id')} in the register shadow: {e}")
+
+    async def _read_block_regs(self, kind: str, addr: int, count: int) -> List[int]:
+        if kind == "input" and hasattr(self, "_read_input_regs"):
+            return await self._read_input_regs(addr, count)
+        return await self._read_holding_regs(addr, count)
 
     @staticmethod
     def _sanitize_key(s: str) -> str:
@@ -917,99 +1021,65 @@ class JsonRegisterMixin:
             return encoded
         raise ValueError(f"Unsupported size {size} for register '{r.get('id') or r.get('name')}'")
 
-    def _decode_words(self, r: Dict[str, Any], regs: List[int]) -> Any:
-        t = (r.get("type") or "").lower()
-        size = max(1, int(r.get("size", 1)))
-        scale = r.get("scale")
-        enc = (r.get("encoder") or "").lower()
-
-        # ASCII decoder for multi-word strings
-        if enc == "ascii":
-            buf = bytearray()
-            for w in regs[:size]:
-                w = int(w) & 0xFFFF
-                buf.append((w >> 8) & 0xFF)
-                buf.append(w & 0xFF)
-            try:
-                return bytes(buf).split(b"\x00", 1)[0].decode("ascii", errors="ignore").strip()
-            except Exception:
-                return ""
+    def _decoder_for(self, r: Dict[str, Any]) -> RegisterDecoder:
+        """Get the compiled decoder of a register map entry (compiled on first use)."""
+        if self._decoders is None:
+            self._decoders = {}
+        dec = self._decoders.get(id(r))
+        if dec is None or dec.reg is not r:
+            dec = RegisterDecoder(r)
+            self._decoders[id(r)] = dec
+        return dec
 
-        # Apply bitmask / higherBits before numeric decode when specified
-        bitmask = r.get("bitmask")
-        if bitmask and regs:
-            regs = [(int(regs[0]) & int(bitmask))]
-            if r.get("higherBits"):
-                regs = [(regs[0] >> 8) & 0xFF]
-
-        if size == 1 and regs:
-            val = int(regs[0])
-            if "s16" in t and val >= 0x8000:
-                val = val - 0x10000
-        elif size == 2 and regs and len(regs) >= 2:
-            hi, lo = regs[0], regs[1]
-            val = (hi << 16) | lo
-            if "s32" in t and val & 0x80000000:
-                val = -((~val & 0xFFFFFFFF) + 1)
-        else:
-            val = 0
-
-        if scale and isinstance(val, (int, float)):
-            val = val * scale
-        # Map bit_enum to list of active labels if configured
-        bit_enum = r.get("bit_enum")
-        if isinstance(bit_enum, dict) and isinstance(val, int):
-            msgs = []
-            for k, v in bit_enum.items():
-                try:
-                    bit = int(k, 10)
-                except Exception:
-                    bit = int(str(k), 16) if str(k).lower().startswith("0x") else int(str(k))
-                if val & (1 << bit):
-                    msgs.append(str(v))
-            return msgs if msgs else ["OK"]
-        return val
+    def _decode_words(self, r: Dict[str, Any], regs: List[int]) -> Any:
+        return self._decoder_for(r).decode(regs)
 
     async def read_by_ident(self, ident: str) -> Any:
         r = self._find_reg_by_id_or_name(ident)
         if (r.get("kind") or "").lower() not in ("holding", "input"):
             raise RuntimeError("unsupported register kind for read")
+        plan = self._write_plan
+        if plan is not None:
+            # Inside a batch: see staged writes, then the fresh shadow, then read once
+            planned = plan.staged(r)
+            if planned is not None:
+                return self._decode_words(r, planned.words)
+            reg_id = r.get("id")
+            if reg_id in plan.reads:
+                return plan.reads[reg_id]
+            if self._shadow is not None and (r.get("kind") or "").lower() == "holding":
+                known, value = self._shadow.fresh(reg_id)
+                if known:
+                    return value
         addr = int(r["addr"]) + getattr(self, "addr_offset", 0)
         size = max(1, int(r.get("size", 1)))
         regs = await self._read_holding_regs(addr, size)
-        return self._decode_words(r, regs)
+        value = self._decode_words(r, regs)
+        if self._shadow is not None:
+            self._shadow.record(r.get("id"), value)
+        if plan is not None:
+            plan.reads[r.get("id")] = value
+        return value
     
     async def read_all_registers(self) -> Dict[str, Any]:
         """
-        Read all registers from the register map.
+        Read all registers from the register map using the compiled block plan.
         
         Returns:
             Dictionary mapping register id to decoded value
         """
-        values: Dict[str, Any] = {}
-        for reg in self.regs:
-            reg_id = reg.get("id")
-            if not reg_id:
-                continue
-            
-            # Skip write-only registers
-            if str(reg.get("rw", "RO")).upper() in ("WO", "Write-Only"):
-                continue
-            
-            # Only read holding/input registers
-            kind = (reg.get("kind") or "").lower()
-            if kind not in ("holding", "input"):
-                continue
-            
-            try:
-                value = await self.read_by_ident(reg_id)
-                values[reg_id] = value
-            except Exception as e:
-                log.debug(f"Failed to read register {reg_id}: {e}")
-                # Continue reading other registers even if one fails
-                continue
+        plan = self._read_plan
+        if plan is None or getattr(self, "_read_plan_regs", None) is not self.regs:
+            # Register map was assigned directly (not via load_register_map)
+            plan = self._compile_read_plan()
         
-        return values
+        try:
+            return await plan.execute(self._read_block_regs, addr_offset=getattr(self, "addr_offset", 0))
+        except ConnectionLostError as e:
+            # Transport is gone - stop instead of failing every remaining block
+            values = getattr(e, "values", {})
+            log.debug(f"Connection lost during register read ({len(values)} registers read): {e}")
+            return values
 
     async def write_by_ident(self, ident: str, value: Any) -> None:
         r = self._find_reg_by_id_or_name(ident)
@@ -1032,9 +1102,116 @@ class JsonRegisterMixin:
         if r.get("enum"):
             log.debug(f"Register '{ident}' has enum mapping: {r.get('enum')}")
         
+        await self._write_words(r, words)
+
+    def _when_applied(self, r: Dict[str, Any], callback: Callable[[], None]) -> None:
+        """
+        Run ``callback`` once the last write of ``r`` has taken effect: right away outside
+        a write plan, after the plan executed (and only if the register took) inside one.
+        """
+        planned = self._write_plan.staged(r) if self._write_plan is not None else None
+        if planned is None:
+            callback()
+        else:
+            planned.on_applied.append(callback)
+
+    async def _write_words(self, r: Dict[str, Any], words: List[int]) -> None:
+        """Write the encoded words of a holding register (staged when a write plan is being built)."""
+        if self._write_plan is not None:
+            self._write_plan.stage(r, words, self._write_tag)
+            return
+        addr = int(r["addr"]) + getattr(self, "addr_offset", 0)
         if len(words) == 1:
             await self._write_holding_u16(addr, words[0])
-            log.debug(f"✓ Wrote register '{ident}' (addr=0x{addr:04X}): {words[0]}")
         else:
             await self._write_holding_u16_list(addr, words)
-            log.debug(f"✓ Wrote register '{ident}' (addr=0x{addr:04X}): {words}")
+        log.debug(f"✓ Wrote register '{r.get('id')}' (addr=0x{addr:04X}): {words}")
+        self._shadow_written(r, words)
+        if self._read_plan is not None:
+            # Configuration registers are read at the slow cadence; pick up the change on the next poll
+            self._read_plan.refresh_slow()
+
+    async def _write_run(self, addr: int, words: List[int]) -> None:
+        if len(words) == 1:
+            await self._write_holding_u16(addr, words[0])
+        else:
+            await self._write_holding_u16_list(addr, words)
+
+    async def handle_commands(self, cmds: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Run a batch of commands as one write plan: their register writes are collected,
+        registers the shadow already holds are dropped, adjacent registers go out as one
+        multi-register write and everything is verified with block read-backs.
+        Writes go out in register address order, after every command has run, not in
+        command order. A command that raises or returns ``ok: False`` has its staged
+        writes dropped, so a half-applied command never reaches the device.
+        Returns one result per command, as handle_command would.
+        """
+        plan = WritePlan()
+        results: List[Dict[str, Any]] = []
+        self._write_plan = plan
+        try:
+            for i, cmd in enumerate(cmds):
+                self._write_tag = i
+                try:
+                    res = await self.handle_command(cmd)
+                except Exception as e:
+                    res = {"ok": False, "reason": str(e)}
+                if isinstance(res, dict) and not res.get("ok", True):
+                    dropped = plan.discard(i)
+                    if dropped:
+                        log.warning(f"Dropped {dropped} staged writes of failed command "
+                                    f"{cmd.get('action', i)}: {res.get('reason')}")
+                results.append(res)
+        finally:
+            self._write_plan = None
+            self._write_tag = None
+        result = await self.apply_write_plan(plan, commands=len(cmds))
+        for tag, reason in result.failed_tags().items():
+            results[tag] = {"ok": False, "reason": reason}
+        return results
+
+    async def apply_write_plan(self, plan: WritePlan, commands: int = 0) -> WriteResult:
+        """Execute a write plan and update the register shadow from its read-back."""
+        shadow = self._shadow
+
+        def is_current(planned: PlannedWrite) -> bool:
+            if shadow is None or not shadow.covers(planned.reg_id):
+                return False
+            known, value = shadow.fresh(planned.reg_id)
+            try:
+                return known and value == self._decode_words(planned.reg, planned.words)
+            except Exception:
+                return False
+
+        result = await plan.execute(self._write_run, self._read_holding_regs,
+                                    addr_offset=getattr(self, "addr_offset", 0), is_current=is_current)
+        for planned in result.written:
+            got = result.read_back.get(planned.reg_id)
+            if got is None:
+                self._shadow_written(planned.reg, planned.words)  # not verified: read back on the next refresh
+            elif shadow is not None and shadow.covers(planned.reg_id):
+                try:
+                    shadow.record(planned.reg_id, self._decode_words(planned.reg, got))
+                except Exception as e:
+                    log.debug(f"Could not record read-back of {planned.reg_id} in the register shadow: {e}")
+        if result.written and self._read_plan is not None:
+            self._read_plan.refresh_slow()
+        for planned in result.applied():
+            for callback in planned.on_applied:
+                try:
+                    callback()
+                except Exception as e:
+                    log.debug(f"Post-write callback for {planned.reg_id} failed: {e}")
+        if self._write_plan_stats is None:
+            self._write_plan_stats = WritePlanStats()
+        self._write_plan_stats.add(plan, result, commands)
+        log.info(f"Write plan: {len(plan)} registers staged, {len(result.skipped)} unchanged, "
+                 f"{result.write_frames} writes, {result.verify_frames} read-backs"
+                 + (f", failed: {result.failed}" if result.failed else "")
+                 + (f", not taken: {result.mismatched}" if result.mismatched else ""))
+        return result
+
+    @property
+    def write_plan_stats(self) -> Optional[WritePlanStats]:
+        return self._write_plan_stats
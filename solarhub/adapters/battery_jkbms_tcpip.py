@@ -37,7 +37,8 @@ import asyncio
 import logging
 import socket
 import time
-from typing import Any, Dict, List, Optional, Tuple, Union
+from collections import deque
+from typing import Any, Dict, List, Optional, Union
 
 try:
     import serial  # type: ignore
@@ -48,309 +49,13 @@ except ImportError:
 from solarhub.adapters.base import BatteryAdapter
 from solarhub.config import BatteryBankConfig
 from solarhub.schedulers.models import BatteryBankTelemetry, BatteryUnit
+from solarhub.adapters.jkbms_rs485 import (
+    CELL_NOMINAL_VOLTAGE, MODBUS_REQUEST, READ_TIMEOUT, RECV_BUFFER_SIZE, ConnectionWrapper, FrameStreamParser
+)
 
 log = logging.getLogger(__name__)
 
-# ---- JK RS485-2 Modbus protocol constants -----------------------------------
-
-MODBUS_PATTERN = bytes([0x10, 0x16])
-DATA_FRAME_START = bytes([0x55, 0xAA, 0xEB, 0x90])
-
-FRAME_TYPE_CONFIG = 0x01
-FRAME_TYPE_STATUS = 0x02
-MODBUS_REQUEST = 0x20
-
-RECV_BUFFER_SIZE = 4096
-READ_TIMEOUT = 1.0
-MAX_MODBUS_FRAME_LENGTH = 512
-
-CELL_NOMINAL_VOLTAGE = 3.2  # V
-
-# (field_name, offset, length, scale, is_numeric)
-CONFIG_FIELDS = [
-    ('smart_sleep_voltage', 6, 4, 1000.0, True),
-    ('cell_undervoltage_protection', 10, 4, 1000.0, True),
-    ('cell_undervoltage_recovery', 14, 4, 1000.0, True),
-    ('cell_overvoltage_protection', 18, 4, 1000.0, True),
-    ('cell_overvoltage_recovery', 22, 4, 1000.0, True),
-    ('balance_trigger_voltage', 26, 4, 1000.0, True),
-    ('cell_soc100_voltage', 30, 4, 1000.0, True),
-    ('cell_soc0_voltage', 34, 4, 1000.0, True),
-    ('cell_request_charge_voltage', 38, 4, 1000.0, True),
-    ('cell_request_float_voltage', 42, 4, 1000.0, True),
-    ('power_off_voltage', 46, 4, 1000.0, True),
-    ('max_charge_current', 50, 4, 1000.0, True),
-    ('charge_overcurrent_delay', 54, 4, 1.0, True),
-    ('charge_overcurrent_recovery', 58, 4, 1.0, True),
-    ('max_discharge_current', 62, 4, 1000.0, True),
-    ('discharge_overcurrent_delay', 66, 4, 1.0, True),
-    ('discharge_overcurrent_recovery', 70, 4, 1.0, True),
-    ('short_circuit_recovery', 74, 4, 1.0, True),
-    ('max_balance_current', 78, 4, 1000.0, True),
-    ('charge_overtemp_protection', 82, 4, 10.0, True),
-    ('charge_overtemp_recovery', 86, 4, 10.0, True),
-    ('discharge_overtemp_protection', 90, 4, 10.0, True),
-    ('discharge_overtemp_recovery', 94, 4, 10.0, True),
-    ('charge_undertemp_protection', 98, 4, 10.0, True),
-    ('charge_undertemp_recovery', 102, 4, 10.0, True),
-    ('power_tube_overtemp_protection', 106, 4, 10.0, True),
-    ('power_tube_overtemp_recovery', 110, 4, 10.0, True),
-    ('cell_count', 114, 4, 1.0, True),
-    ('charging_switch', 118, 1, None, False),
-    ('discharging_switch', 122, 1, None, False),
-    ('balance_switch', 126, 1, None, False),
-    ('total_battery_capacity', 130, 4, 1000.0, True),
-    ('short_circuit_delay', 134, 4, 1.0, True),
-    ('balance_starting_voltage', 138, 4, 1000.0, True),
-    ('wire_resistance_1', 158, 4, 1000.0, True),
-    ('device_address', 270, 4, 1.0, True),
-]
-
-
-# ---- low-level helpers ------------------------------------------------------
-
-def read_int_le(data: bytes, offset: int, length: int,
-                signed: bool = False, scale: float = 1.0) -> Optional[float]:
-    if offset + length > len(data):
-        return None
-    value = int.from_bytes(data[offset:offset + length], "little", signed=signed)
-    return value / scale if scale != 1.0 else float(value)
-
-
-def read_bool(data: bytes, offset: int) -> Optional[bool]:
-    if offset >= len(data):
-        return None
-    return bool(data[offset])
-
-
-def read_bit_flag(data: bytes, offset: int, bit: int) -> Optional[bool]:
-    if offset >= len(data):
-        return None
-    return bool((data[offset] >> bit) & 1)
-
-
-def modbus_crc16(data: bytes) -> int:
-    crc = 0xFFFF
-    for b in data:
-        crc ^= b
-        for _ in range(8):
-            if crc & 0x0001:
-                crc = (crc >> 1) ^ 0xA001
-            else:
-                crc >>= 1
-    return crc
-
-
-def find_pattern(data: bytes, pattern: bytes, start_pos: int = 0) -> int:
-    try:
-        return data.index(pattern, start_pos)
-    except ValueError:
-        return -1
-
-
-# ---- Modbus frame parsing (RS485-2) ----------------------------------------
-
-def parse_modbus_frame(data: bytes) -> Optional[Tuple[int, int, bytes, bool, int]]:
-    """
-    Try to parse a Modbus frame starting at byte 0 of `data`.
-
-    Returns:
-        (battery_id, frame_type, payload, crc_valid, frame_length)
-    or None if no valid frame starting at data[0].
-    """
-    if len(data) < 6:
-        return None
-
-    battery_id = data[0]
-    if data[1:3] != MODBUS_PATTERN:
-        return None
-
-    frame_type = data[3]
-    max_check = min(len(data), MAX_MODBUS_FRAME_LENGTH)
-
-    for end_pos in range(6, max_check + 1):
-        frame_without_crc = data[:end_pos - 2]
-        received_crc = (data[end_pos - 1] << 8) | data[end_pos - 2]
-        calculated_crc = modbus_crc16(frame_without_crc)
-
-        if received_crc == calculated_crc:
-            payload = data[4:end_pos - 2]
-            return battery_id, frame_type, payload, True, end_pos
-
-    return None
-
-
-# ---- JK "data frames" (55 AA EB 90) parsing --------------------------------
-
-def parse_frame_type_01(frame_data: bytes, cells_per_battery: int = 16) -> dict:
-    """Configuration frame."""
-    result = {"type": "configuration"}
-
-    if len(frame_data) < 286:
-        return result
-
-    for field_name, offset, length, scale, is_numeric in CONFIG_FIELDS:
-        if is_numeric:
-            value = read_int_le(frame_data, offset, length, signed=True, scale=scale)
-            if value is not None:
-                result[field_name] = int(value) if scale == 1.0 else value
-        else:
-            value = read_bool(frame_data, offset)
-            if value is not None:
-                result[field_name] = value
-
-    if len(frame_data) >= 284:
-        result["display_always_on"] = read_bit_flag(frame_data, 282, 4)
-        result["smart_sleep_switch"] = read_bit_flag(frame_data, 282, 7)
-        result["disable_pcl_module"] = read_bit_flag(frame_data, 282, 8)
-        result["timed_stored_data"] = read_bit_flag(frame_data, 283, 1)
-
-    # derived: what we *expect* from JK, given your pack
-    result["expected_cells"] = cells_per_battery
-    result["nominal_cell_voltage"] = CELL_NOMINAL_VOLTAGE
-    result["nominal_pack_voltage"] = cells_per_battery * CELL_NOMINAL_VOLTAGE
-    return result
-
-
-def parse_frame_type_02(frame_data: bytes, cells_per_battery: int = 16) -> dict:
-    """Status frame: voltages, temps, SOC, etc."""
-    result = {"type": "status", "cell_voltages": []}
-
-    # Parse cells
-    for cell in range(cells_per_battery):
-        offset = 6 + cell * 2
-        voltage = read_int_le(frame_data, offset, 2, signed=False, scale=1000.0)
-        if voltage is not None:
-            result["cell_voltages"].append(round(voltage, 3))
-        else:
-            result["cell_voltages"].append(None)
-
-    if len(frame_data) < 236:
-        # still return partial result
-        return result
-
-    cell_resistances: List[float] = []
-    for cell in range(cells_per_battery):
-        offset = 80 + cell * 2
-        resistance = read_int_le(frame_data, offset, 2, signed=True, scale=1000.0)
-        if resistance is not None:
-            cell_resistances.append(resistance)
-    result["cell_resistances"] = cell_resistances
-
-    result["mos_temp"] = read_int_le(frame_data, 144, 2, signed=True, scale=10.0)
-    result["power"] = read_int_le(frame_data, 154, 4, signed=False, scale=1000.0)
-    result["current"] = read_int_le(frame_data, 158, 4, signed=True, scale=1000.0)
-    result["temp1"] = read_int_le(frame_data, 162, 2, signed=True, scale=10.0)
-    result["temp2"] = read_int_le(frame_data, 164, 2, signed=True, scale=10.0)
-    result["temp3"] = read_int_le(frame_data, 254, 2, signed=True, scale=10.0)
-    result["temp4"] = read_int_le(frame_data, 258, 2, signed=True, scale=10.0)
-    result["balance_current"] = read_int_le(frame_data, 170, 2, signed=True, scale=1000.0)
-    result["balance_action"] = read_bool(frame_data, 172)
-    if len(frame_data) > 173:
-        result["soc"] = frame_data[173]
-    result["remaining_capacity"] = read_int_le(frame_data, 174, 4, signed=True, scale=1000.0)
-    result["total_capacity"] = read_int_le(frame_data, 178, 4, signed=True, scale=1000.0)
-    result["cycle_count"] = read_int_le(frame_data, 182, 4, signed=True, scale=1.0)
-    result["cycle_capacity"] = read_int_le(frame_data, 186, 4, signed=True, scale=100.0)
-    if len(frame_data) > 190:
-        result["soh"] = frame_data[190]
-    result["total_runtime"] = read_int_le(frame_data, 194, 4, signed=False, scale=1.0)
-    result["charge_switch"] = read_bool(frame_data, 198)
-    result["discharge_switch"] = read_bool(frame_data, 199)
-    result["balance_switch"] = read_bool(frame_data, 200)
-    result["pack_voltage"] = read_int_le(frame_data, 234, 2, signed=False, scale=100.0)
-
-    # Derived stats from your assumptions
-    result["nominal_pack_voltage"] = cells_per_battery * CELL_NOMINAL_VOLTAGE
-    if result["cell_voltages"]:
-        valid_cells = [v for v in result["cell_voltages"] if v is not None]
-        if valid_cells:
-            result["avg_cell_voltage"] = round(sum(valid_cells) / len(valid_cells), 4)
-
-    return result
-
-
-def parse_data_frame(data: bytes, cells_per_battery: int = 16) -> Optional[dict]:
-    """Parse JK data frame that starts with 55 AA EB 90."""
-    if len(data) < 5 or data[:4] != DATA_FRAME_START:
-        return None
-
-    frame_type = data[4]
-    payload = data  # we already start at 0
-
-    if frame_type == FRAME_TYPE_CONFIG:
-        return parse_frame_type_01(payload, cells_per_battery)
-    elif frame_type == FRAME_TYPE_STATUS:
-        return parse_frame_type_02(payload, cells_per_battery)
-    else:
-        return {"type": frame_type, "unknown_type": True}
-
-
-# ---- frame detection & processing --------------------------------------------
-
-def find_next_frame_start(data: bytes, start_pos: int = 0):
-    """
-    Scan buffer for either JK data frame start (55 AA EB 90)
-    or Modbus pattern (xx 10 16 ...) and return earliest one.
-    """
-    data_pos = find_pattern(data, DATA_FRAME_START, start_pos)
-
-    modbus_pos = -1
-    for i in range(start_pos, len(data) - 2):
-        if data[i + 1:i + 3] == MODBUS_PATTERN:
-            modbus_pos = i
-            break
-
-    if data_pos >= 0 and (modbus_pos < 0 or data_pos < modbus_pos):
-        return data_pos, "data"
-    elif modbus_pos >= 0:
-        return modbus_pos, "modbus"
-    else:
-        return -1, None
-
-
-# ---- Connection wrapper for TCP/IP and Serial --------------------------------
-
-class ConnectionWrapper:
-    """Unified wrapper for TCP/IP socket or serial port connections."""
-    
-    def __init__(self, conn: Union[socket.socket, 'serial.Serial']):
-        self.conn = conn
-        self.is_tcp = isinstance(conn, socket.socket)
-        if self.is_tcp:
-            # Set timeout for blocking socket operations
-            self.conn.settimeout(READ_TIMEOUT)
-            # Keep socket in blocking mode - we use thread pool for all operations
-        else:
-            self.conn.timeout = READ_TIMEOUT
-    
-    async def recv(self, size: int) -> bytes:
-        """Receive data from connection (async)."""
-        try:
-            if self.is_tcp:
-                # Use thread pool for TCP socket recv to avoid blocking the event loop
-                # Even with non-blocking sockets, sock_recv can cause issues
-                loop = asyncio.get_event_loop()
-                return await loop.run_in_executor(None, self.conn.recv, size)
-            else:
-                # Serial port - use thread pool for blocking I/O
-                loop = asyncio.get_event_loop()
-                return await loop.run_in_executor(None, self.conn.read, size)
-        except (socket.timeout, serial.SerialTimeoutException):
-            return b''
-        except Exception as e:
-            log.debug(f"Connection recv error: {e}")
-            return b''
-    
-    def close(self) -> None:
-        """Close connection."""
-        try:
-            if self.is_tcp:
-                self.conn.close()
-            else:
-                self.conn.close()
-        except Exception:
-            pass
+OTHER_FRAMES_HISTORY = 8  # unknown data frames kept per battery
 
 
 # ---- Adapter implementation --------------------------------------------------
@@ -447,6 +152,7 @@ class JKBMSTcpipAdapter(BatteryAdapter):
         # Connection and data storage
         self.raw_conn: Optional[Union[socket.socket, 'serial.Serial']] = None
         self.conn: Optional[ConnectionWrapper] = None
+        self.parser = FrameStreamParser(self.cells_per_battery)
         self.batteries: Dict[int, Dict] = {}  # Latest data per battery_id
         self.current_battery_id: Optional[int] = None
         self._listening_task: Optional[asyncio.Task] = None
@@ -458,6 +164,11 @@ class JKBMSTcpipAdapter(BatteryAdapter):
     
     async def connect(self):
         """Connect to RS485 gateway via TCP/IP or serial port."""
+        # A connection closed by the peer cannot be listened on again
+        if self.conn is not None and self.conn.at_eof:
+            log.warning("JK BMS: Connection was closed by the peer, reconnecting...")
+            await self.close()
+
         # Check if we need to restart listening loop
         if self.raw_conn is not None:
             # Connection exists, but check if listening loop is alive
@@ -488,15 +199,8 @@ class JKBMSTcpipAdapter(BatteryAdapter):
         try:
             if self.connection_type == "tcpip":
                 log.info(f"Connecting to RS485 gateway at {self.host}:{self.port}...")
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.settimeout(5.0)  # Connection timeout
-                # Keep socket in blocking mode - we'll use thread pool for all operations
-                
-                loop = asyncio.get_event_loop()
-                # Use thread pool for connect to avoid blocking the event loop
-                await loop.run_in_executor(None, sock.connect, (self.host, self.port))
-                self.raw_conn = sock
-                self.conn = ConnectionWrapper(sock)
+                self.conn = await ConnectionWrapper.open_tcp(self.host, self.port, timeout=5.0)
+                self.raw_conn = self.conn.raw
                 log.info(f"Connected to RS485 gateway at {self.host}:{self.port}")
             else:  # rtu
                 log.info(f"Connecting to RS485 serial port {self.serial_port} at {self.baudrate} baud...")
@@ -515,25 +219,26 @@ class JKBMSTcpipAdapter(BatteryAdapter):
                     )
                 )
                 self.raw_conn = ser
-                self.conn = ConnectionWrapper(ser)
+                self.conn = ConnectionWrapper.from_serial(ser)
                 log.info(f"Connected to RS485 serial port {self.serial_port} at {self.baudrate} baud")
             
             # Start background listening task
+            self.parser = FrameStreamParser(self.cells_per_battery)
             self._stop_listening = False
             self._connect_time = time.time()
             self._listening_task = asyncio.create_task(self._listen_loop())
             log.info(f"Started listening task for JK BMS RS485 adapter ({self.connection_type}) - expecting {self.batteries_expected} battery/batteries")
             
         except Exception as e:
-            if self.raw_conn:
+            if self.conn:
+                self.conn.close()
+                self.conn = None
+            elif self.raw_conn:
                 try:
-                    if self.connection_type == "tcpip":
-                        self.raw_conn.close()
-                    else:
-                        self.raw_conn.close()
+                    self.raw_conn.close()
                 except:
                     pass
-                self.raw_conn = None
+            self.raw_conn = None
             conn_desc = f"{self.host}:{self.port}" if self.connection_type == "tcpip" else self.serial_port
             raise RuntimeError(f"Failed to connect to RS485 device {conn_desc}: {e}")
     
@@ -549,27 +254,16 @@ class JKBMSTcpipAdapter(BatteryAdapter):
                 pass
             self._listening_task = None
         
+        # Closes the stream writer or the serial port behind raw_conn
         if self.conn:
             self.conn.close()
             self.conn = None
-        
-        if self.raw_conn:
-            try:
-                if self.connection_type == "tcpip":
-                    self.raw_conn.close()
-                else:
-                    # Serial port - close in thread pool
-                    loop = asyncio.get_event_loop()
-                    await loop.run_in_executor(None, self.raw_conn.close)
-            except Exception:
-                pass
-            self.raw_conn = None
+        self.raw_conn = None
         
         log.debug(f"Closed JK BMS RS485 connection ({self.connection_type})")
     
     async def _listen_loop(self):
         """Background task that continuously listens and parses frames."""
-        buffer = b""
         last_log_time = 0.0
         last_status_log_time = 0.0
         
@@ -599,148 +293,33 @@ class JKBMSTcpipAdapter(BatteryAdapter):
                 
                 # Log detailed status every 5 minutes
                 if current_time - last_status_log_time >= 300.0:
-                    if self.conn:
-                        log.debug(f"JK BMS status: listening_loop=running, connection=active, batteries={len(self.batteries)}, buffer_size={len(buffer)}")
-                    else:
-                        log.warning(f"JK BMS status: listening_loop=running, connection=None (should not happen)")
+                    log.debug(f"JK BMS status: listening_loop=running, connection=active, batteries={len(self.batteries)}, "
+                              f"parser={self.parser.get_statistics()}")
                     last_status_log_time = current_time
                 
-                # Use a small timeout to avoid blocking for too long
-                # This allows other tasks to run
-                try:
-                    chunk = await asyncio.wait_for(self.conn.recv(RECV_BUFFER_SIZE), timeout=0.1)
-                except asyncio.TimeoutError:
-                    # No data available, yield to other tasks
-                    await asyncio.sleep(0.01)
-                    continue
+                # Waits on the stream without polling; returns b'' after READ_TIMEOUT of silence
+                chunk = await self.conn.recv(RECV_BUFFER_SIZE)
                 
                 if not chunk:
-                    await asyncio.sleep(0.1)
+                    if self.conn.at_eof:
+                        log.warning("JK BMS: Connection closed by the peer, exiting listening loop")
+                        break
+                    self._empty_chunk_count = getattr(self, '_empty_chunk_count', 0) + 1
                     continue
                 
                 # Log when we receive data (throttled - only log first few times)
-                if len(chunk) > 0:
-                    if not hasattr(self, '_data_received_count'):
-                        self._data_received_count = 0
-                    self._data_received_count += 1
-                    if self._data_received_count <= 10:
-                        # Log first 10 chunks with hex dump for debugging
-                        hex_preview = chunk[:32].hex() if len(chunk) >= 32 else chunk.hex()
-                        log.info(f"JK BMS received {len(chunk)} bytes of data (chunk #{self._data_received_count}): {hex_preview}...")
-                    elif self._data_received_count % 100 == 0:
-                        log.debug(f"JK BMS received {len(chunk)} bytes of data (total chunks: {self._data_received_count})")
-                else:
-                    # Log when we get empty chunks (might indicate connection issue)
-                    if not hasattr(self, '_empty_chunk_count'):
-                        self._empty_chunk_count = 0
-                    self._empty_chunk_count += 1
-                    if self._empty_chunk_count <= 5:
-                        log.warning(f"JK BMS received empty chunk (count: {self._empty_chunk_count}) - connection may be idle or broken")
-                
-                buffer += chunk
-                pos = 0
+                self._data_received_count = getattr(self, '_data_received_count', 0) + 1
+                if self._data_received_count <= 10:
+                    # Log first 10 chunks with hex dump for debugging
+                    log.info(f"JK BMS received {len(chunk)} bytes of data (chunk #{self._data_received_count}): {chunk[:32].hex()}...")
+                elif self._data_received_count % 100 == 0:
+                    log.debug(f"JK BMS received {len(chunk)} bytes of data (total chunks: {self._data_received_count})")
                 
-                while pos < len(buffer):
-                    next_pos, kind = find_next_frame_start(buffer, pos)
-                    if next_pos < 0:
-                        # no more full frames; keep tail in buffer
-                        break
-                    
-                    if kind == "modbus":
-                        data_slice = buffer[next_pos:]
-                        parsed = parse_modbus_frame(data_slice)
-                        if parsed:
-                            battery_id, frame_type_byte, payload, crc_valid, frame_len = parsed
-                            
-                            # Normalise battery_id if JK does the 15 -> 0 wrap hack
-                            if battery_id == 15:
-                                battery_id = 0
-                            
-                            # Limit to our expected batteries
-                            if battery_id < self.batteries_expected:
-                                # We use Modbus requests to detect that master is now talking to another BMS.
-                                if frame_type_byte == MODBUS_REQUEST:
-                                    self.current_battery_id = battery_id
-                            
-                            pos = next_pos + frame_len
-                        else:
-                            pos = next_pos + 1
-                    
-                    elif kind == "data":
-                        # JK data frame (55 AA EB 90 ...)
-                        slice_data = buffer[next_pos:]
-                        end_pos = len(slice_data)
-                        next_frame_pos, _ = find_next_frame_start(slice_data, 1)
-                        if next_frame_pos > 0:
-                            end_pos = next_frame_pos
-                        
-                        frame_bytes = slice_data[:end_pos]
-                        parsed = parse_data_frame(frame_bytes, self.cells_per_battery)
-                        if parsed:
-                            frame_type = parsed.get("type", "unknown")
-                            # make sure we know which battery this belongs to
-                            # Fallback: if we don't have current_battery_id yet, treat as 0
-                            b_id = self.current_battery_id if self.current_battery_id is not None else 0
-                            
-                            if b_id < self.batteries_expected:
-                                is_new_battery = b_id not in self.batteries
-                                if is_new_battery:
-                                    self.batteries[b_id] = {
-                                        "battery_id": b_id,
-                                        "battery_index": b_id + 1,
-                                        "cells_per_battery": self.cells_per_battery,
-                                        "nominal_cell_voltage": CELL_NOMINAL_VOLTAGE,
-                                        "nominal_pack_voltage": self.cells_per_battery * CELL_NOMINAL_VOLTAGE,
-                                    }
-                                    log.info(f"JK-BMS: Discovered battery {b_id + 1}/{self.batteries_expected}")
-                                
-                                # merge frame
-                                entry = self.batteries[b_id]
-                                entry["timestamp"] = int(time.time())
-                                
-                                # drop meta keys
-                                frame_copy = {
-                                    k: v
-                                    for k, v in parsed.items()
-                                    if k not in ("type", "battery_id", "timestamp")
-                                }
-                                
-                                if frame_type == "configuration":
-                                    entry.setdefault("configuration", {}).update(frame_copy)
-                                elif frame_type == "status":
-                                    entry.setdefault("status", {}).update(frame_copy)
-                                    # Log telemetry update for status frames (throttled to avoid excessive logging)
-                                    # Only log if we have meaningful data and it's been a while since last log
-                                    status_data = entry.get("status", {})
-                                    # Use pack_voltage (the actual field name) instead of voltage
-                                    voltage = status_data.get("pack_voltage") or frame_copy.get("pack_voltage") or 0
-                                    current = status_data.get("current") or frame_copy.get("current") or 0
-                                    soc = status_data.get("soc") or frame_copy.get("soc") or 0
-                                    # Calculate temperature from temp fields
-                                    temps = []
-                                    for temp_key in ['temp1', 'temp2', 'temp3', 'temp4', 'mos_temp']:
-                                        t = status_data.get(temp_key) or frame_copy.get(temp_key)
-                                        if t is not None:
-                                            temps.append(t)
-                                    temp = round(sum(temps) / len(temps), 1) if temps else 0
-                                    
-                                    # Throttle logging - only log every 5 seconds per battery
-                                    last_log_time = entry.get("_last_log_time", 0)
-                                    current_time = time.time()
-                                    if (voltage or current or soc or temp) and (current_time - last_log_time) >= 5.0:
-                                        log.info(f"JK-BMS Battery {b_id + 1}: V={voltage:.2f}V | I={current:.2f}A | SOC={soc:.0f}% | T={temp:.1f}°C")
-                                        entry["_last_log_time"] = current_time
-                                else:
-                                    entry.setdefault("other_frames", []).append(
-                                        {"frame_type": frame_type, "data": frame_copy}
-                                    )
-                            
-                            pos = next_pos + end_pos
-                        else:
-                            pos = next_pos + end_pos
-                
-                # keep unprocessed tail
-                buffer = buffer[pos:]
+                for frame in self.parser.feed(chunk):
+                    if frame[0] == "modbus":
+                        self._handle_modbus_frame(frame[1], frame[2])
+                    else:
+                        self._handle_data_frame(frame[1])
                 
             except asyncio.CancelledError:
                 log.info("JK BMS listening loop cancelled")
@@ -756,6 +335,73 @@ class JKBMSTcpipAdapter(BatteryAdapter):
         
         log.info("JK BMS listening loop exited")
     
+    def _handle_modbus_frame(self, battery_id: int, frame_type_byte: int) -> None:
+        """Track which BMS the master is talking to."""
+        # Normalise battery_id if JK does the 15 -> 0 wrap hack
+        if battery_id == 15:
+            battery_id = 0
+        
+        # Limit to our expected batteries
+        if battery_id < self.batteries_expected:
+            # We use Modbus requests to detect that master is now talking to another BMS.
+            if frame_type_byte == MODBUS_REQUEST:
+                self.current_battery_id = battery_id
+    
+    def _handle_data_frame(self, parsed: dict) -> None:
+        """Merge a parsed data frame into the entry of the current battery."""
+        frame_type = parsed.get("type", "unknown")
+        # make sure we know which battery this belongs to
+        # Fallback: if we don't have current_battery_id yet, treat as 0
+        b_id = self.current_battery_id if self.current_battery_id is not None else 0
+        if b_id >= self.batteries_expected:
+            return
+        
+        if b_id not in self.batteries:
+            self.batteries[b_id] = {
+                "battery_id": b_id,
+                "battery_index": b_id + 1,
+                "cells_per_battery": self.cells_per_battery,
+                "nominal_cell_voltage": CELL_NOMINAL_VOLTAGE,
+                "nominal_pack_voltage": self.cells_per_battery * CELL_NOMINAL_VOLTAGE,
+            }
+            log.info(f"JK-BMS: Discovered battery {b_id + 1}/{self.batteries_expected}")
+        
+        # merge frame
+        entry = self.batteries[b_id]
+        entry["timestamp"] = int(time.time())
+        
+        # drop meta keys
+        frame_copy = {
+            k: v
+            for k, v in parsed.items()
+            if k not in ("type", "battery_id", "timestamp")
+        }
+        
+        if frame_type == "configuration":
+            entry.setdefault("configuration", {}).update(frame_copy)
+        elif frame_type == "status":
+            entry.setdefault("status", {}).update(frame_copy)
+            # Log telemetry update for status frames (throttled to avoid excessive logging)
+            status_data = entry["status"]
+            voltage = status_data.get("pack_voltage") or 0
+            current = status_data.get("current") or 0
+            soc = status_data.get("soc") or 0
+            # Calculate temperature from temp fields
+            temps = [status_data[k] for k in ('temp1', 'temp2', 'temp3', 'temp4', 'mos_temp')
+                     if status_data.get(k) is not None]
+            temp = round(sum(temps) / len(temps), 1) if temps else 0
+            
+            # Throttle logging - only log every 5 seconds per battery
+            current_time = time.time()
+            if (voltage or current or soc or temp) and (current_time - entry.get("_last_log_time", 0)) >= 5.0:
+                log.info(f"JK-BMS Battery {b_id + 1}: V={voltage:.2f}V | I={current:.2f}A | SOC={soc:.0f}% | T={temp:.1f}°C")
+                entry["_last_log_time"] = current_time
+        else:
+            # Bounded: only the most recent unknown frames are kept
+            entry.setdefault("other_frames", deque(maxlen=OTHER_FRAMES_HISTORY)).append(
+                {"frame_type": frame_type, "data": frame_copy}
+            )
+    
     async def poll(self) -> BatteryBankTelemetry:
         """
         Poll batteries and return aggregated telemetry.
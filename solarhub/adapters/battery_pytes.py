@@ -8,6 +8,7 @@ from typing import Any, Dict, List, Optional
 import serial  # type: ignore
 
 from solarhub.adapters.base import BatteryAdapter
+from solarhub.adapters.pytes_console import PytesConsole
 from solarhub.config import BatteryBankConfig
 from solarhub.schedulers.models import BatteryBankTelemetry, BatteryUnit
 from solarhub.timezone_utils import now_configured_iso
@@ -27,6 +28,7 @@ class PytesBatteryAdapter(BatteryAdapter):
     def __init__(self, bank_cfg: BatteryBankConfig):
         super().__init__(bank_cfg)
         self.client: Optional[serial.Serial] = None
+        self.console: Optional[PytesConsole] = None
         self.last_tel: Optional[BatteryBankTelemetry] = None
         # Optional JSON register map for future HA/config exposure
         self.regs: List[Dict[str, Any]] = []
@@ -62,12 +64,23 @@ class PytesBatteryAdapter(BatteryAdapter):
         self.client = await asyncio.to_thread(_open)
         if not self.client or not self.client.port:
             raise RuntimeError("Failed to open battery serial port")
+        self.console = PytesConsole.attach(self.client)
         log.debug("Connected battery serial on %s", self.client.port)
 
     async def close(self):
-        if self.client and self.client.is_open:
+        if self.console:
+            self.console.close()
+            self.console = None
+        elif self.client and self.client.is_open:
             await asyncio.to_thread(self.client.close)
 
+    async def _exchange(self, cmds: List[str], timeout_s: float) -> List[List[str]]:
+        """Send console commands back to back; one list of response lines per command."""
+        if self.console is None or self.console.at_eof:
+            await self.close()
+            await self.connect()
+        return await self.console.pipeline(cmds, timeout_s)
+
     async def poll(self) -> BatteryBankTelemetry:
         # Lazy connection - connect if not already connected
         if not self.client or not self.client.is_open:
@@ -111,46 +124,27 @@ class PytesBatteryAdapter(BatteryAdapter):
                     }
                     log.debug(f"Using cached stat data: soh={cached_soh}, cycles={cached_cycles}")
 
-        def _write_and_wait(cmd: str, min_buf: int = 400, timeout_s: float = 1.2) -> List[str]:
-            assert self.client
-            ser = self.client
-            ser.reset_input_buffer()
-            ser.reset_output_buffer()
-            ser.write(cmd.encode("latin-1") + b"\n")
-            ser.flush()
-            start = time.time()
-            buf: List[str] = []
-            line = ""
-            while True:
-                if ser.in_waiting > 0:
-                    b = ser.read()
-                    try:
-                        ch = b.decode("latin-1")
-                    except Exception:
-                        ch = ""
-                    line += ch
-                    if b == b"\n":
-                        buf.append(line)
-                        # stop on command completed marker
-                        if "Command completed" in line:
-                            break
-                        line = ""
-                else:
-                    if time.time() - start > timeout_s:
-                        break
-                    # give device a nudge
-                    ser.write(b"\n")
-                    time.sleep(0.05)
-            log.debug(f"Battery command '{cmd}' (pwr/bat inline) returned {len(buf)} lines")
-            return buf
-
         devices: List[BatteryUnit] = []
         cells_data: List[Dict[str, Any]] = []
+        units = list(range(1, cfg.batteries + 1))
+        pwr_responses: Optional[List[List[str]]] = None
+        bat_responses: Optional[List[List[str]]] = None
+        if cfg.console_pipeline:
+            # One write and a few wakeups for all units instead of paced per-unit exchanges
+            pwr_responses = await self._exchange([f"pwr {p}" for p in units], 1.2)
+            try:
+                bat_responses = await self._exchange([f"bat {p}" for p in units], 1.5)
+            except Exception as e:
+                log.debug(f"Cell read failed for battery bank: {e}")
+                bat_responses = [[] for _ in units]
         # iterate batteries 1..N
-        for power in range(1, cfg.batteries + 1):
-            lines = await asyncio.to_thread(_write_and_wait, f"pwr {power}", 400, 1.2)
-            # Add 500ms delay after each command execution to allow master battery to process
-            await asyncio.sleep(0.5)
+        for power in units:
+            if pwr_responses is not None:
+                lines = pwr_responses[power - 1]
+            else:
+                lines = (await self._exchange([f"pwr {power}"], 1.2))[0]
+                # Add 500ms delay after each command execution to allow master battery to process
+                await asyncio.sleep(0.5)
             if not lines:
                 log.warning(f"No response for battery {power}, creating empty unit")
                 # Create empty unit with just power number
@@ -300,9 +294,12 @@ class PytesBatteryAdapter(BatteryAdapter):
 
             # Also read per-cell table for this battery
             try:
-                bat_lines = await asyncio.to_thread(_write_and_wait, f"bat {power}", 800, 1.5)
-                # Add 500ms delay after each command execution to allow master battery to process
-                await asyncio.sleep(0.5)
+                if bat_responses is not None:
+                    bat_lines = bat_responses[power - 1]
+                else:
+                    bat_lines = (await self._exchange([f"bat {power}"], 1.5))[0]
+                    # Add 500ms delay after each command execution to allow master battery to process
+                    await asyncio.sleep(0.5)
                 if bat_lines:
                     log.debug(f"Cell command response for battery {power}: {len(bat_lines)} lines")
                     stats, cells = self._parse_cell_table(power, bat_lines)
@@ -319,7 +316,7 @@ class PytesBatteryAdapter(BatteryAdapter):
             
             # Add delay before starting next battery to ensure master battery is ready
             # This is especially important when all commands go through the master battery
-            if power < cfg.batteries:  # Don't delay after last battery
+            if power < cfg.batteries and not cfg.console_pipeline:  # Don't delay after last battery
                 await asyncio.sleep(0.3)
 
         # aggregate bank-level stats (avg voltage/temp/soc, sum current)
@@ -524,40 +521,8 @@ class PytesBatteryAdapter(BatteryAdapter):
             log.debug(f"Battery serial not connected for '{cmd}' command")
             return []
         
-        def _write_and_wait(cmd: str, min_buf: int = 400, timeout_s: float = 2.0) -> List[str]:
-            assert self.client
-            ser = self.client
-            ser.reset_input_buffer()
-            ser.reset_output_buffer()
-            ser.write(cmd.encode("latin-1") + b"\n")
-            ser.flush()
-            start = time.time()
-            buf: List[str] = []
-            line = ""
-            while True:
-                if ser.in_waiting > 0:
-                    b = ser.read()
-                    try:
-                        ch = b.decode("latin-1")
-                    except Exception:
-                        ch = ""
-                    line += ch
-                    if b == b"\n":
-                        buf.append(line)
-                        # stop on command completed marker
-                        if "Command completed" in line:
-                            break
-                        line = ""
-                else:
-                    if time.time() - start > timeout_s:
-                        break
-                    # give device a nudge
-                    ser.write(b"\n")
-                    time.sleep(0.05)
-            return buf
-        
         try:
-            lines = await asyncio.to_thread(_write_and_wait, cmd, 400, timeout_s)
+            lines = (await self._exchange([cmd], timeout_s))[0]
             log.debug(f"Battery command '{cmd}' returned {len(lines)} lines")
             # Add 500ms delay after command execution to allow master battery to process
             await asyncio.sleep(0.5)
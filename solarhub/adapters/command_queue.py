@@ -4,6 +4,7 @@ Provides a thread-safe queue system for executing inverter commands sequentially
 to avoid locking issues and ensure proper synchronization with telemetry polling.
 """
 import asyncio
+import concurrent.futures
 import logging
 import queue
 import threading
@@ -12,6 +13,8 @@ from typing import Any, Dict, List, Optional, Callable
 from dataclasses import dataclass
 from datetime import datetime, timezone
 
+from solarhub.adapters.device_actor import DeviceActor, Priority
+
 log = logging.getLogger(__name__)
 
 @dataclass
@@ -48,18 +51,26 @@ class CommandQueueManager:
         self.is_running = False
         self.worker_thread = None
         self.adapters: Dict[str, Any] = {}  # Will be populated with actual adapters
+        self.actors: Dict[str, DeviceActor] = {}  # Device actors owning the adapters, when registered
         self.command_timeout = 30.0  # 30 seconds timeout for commands
         
         # Statistics
         self.commands_processed = 0
         self.commands_failed = 0
+        self.commands_via_actor = 0
         self.last_command_time = 0.0
+        self.last_command_latency_s = 0.0
+        self.max_command_latency_s = 0.0
         
         log.info(f"CommandQueueManager initialized with telemetry interval: {telemetry_polling_interval}s")
     
-    def register_adapter(self, inverter_id: str, adapter: Any):
-        """Register an inverter adapter for command execution."""
+    def register_adapter(self, inverter_id: str, adapter: Any, actor: Optional[DeviceActor] = None):
+        """Register an inverter adapter (and the device actor that owns it) for command execution."""
         self.adapters[inverter_id] = adapter
+        if actor is not None:
+            self.actors[inverter_id] = actor
+        else:
+            self.actors.pop(inverter_id, None)
         log.info(f"Registered adapter for inverter: {inverter_id}")
     
     def start(self):
@@ -140,8 +151,11 @@ class CommandQueueManager:
                 if cmd is None:
                     break
                 
-                # Check if we should wait for telemetry polling to complete
-                self._wait_for_telemetry_slot()
+                # Commands for an actor-owned device are ordered ahead of its polls by the
+                # actor; otherwise wait until telemetry polling is out of the way
+                actor = self.actors.get(cmd.inverter_id)
+                if actor is None or not actor.running:
+                    self._wait_for_telemetry_slot()
                 
                 # Execute the command
                 self._execute_command(cmd)
@@ -198,8 +212,11 @@ class CommandQueueManager:
             action = cmd.command.get('action', 'unknown')
             log.info(f"Executing command for {cmd.inverter_id}: {action}")
             
+            actor = self.actors.get(cmd.inverter_id)
+            if actor is not None and actor.running:
+                result = self._execute_on_actor(actor, adapter, cmd)
             # Handle special inverter config commands
-            if action == "inverter_config":
+            elif action == "inverter_config":
                 result = self._execute_inverter_config_command(cmd)
             else:
                 # Run async command in the client's event loop to avoid lock binding issues
@@ -237,6 +254,9 @@ class CommandQueueManager:
             execution_time = time.time() - start_time
             self.commands_processed += 1
             self.last_command_time = time.time()
+            # Enqueue to completion, including time spent waiting in the queue
+            self.last_command_latency_s = self.last_command_time - cmd.timestamp.timestamp()
+            self.max_command_latency_s = max(self.max_command_latency_s, self.last_command_latency_s)
             
             log.info(f"Command executed successfully for {cmd.inverter_id} in {execution_time:.2f}s: {result}")
             
@@ -247,7 +267,7 @@ class CommandQueueManager:
                 except Exception as e:
                     log.warning(f"Callback failed for {cmd.inverter_id}: {e}")
             
-        except asyncio.TimeoutError:
+        except (asyncio.TimeoutError, concurrent.futures.TimeoutError):
             log.error(f"Command timeout for {cmd.inverter_id}: {cmd.command.get('action', 'unknown')}")
             self.commands_failed += 1
             
@@ -280,7 +300,10 @@ class CommandQueueManager:
             "queue_size": self.command_queue.qsize(),
             "commands_processed": self.commands_processed,
             "commands_failed": self.commands_failed,
+            "commands_via_actor": self.commands_via_actor,
             "last_command_time": self.last_command_time,
+            "last_command_latency_ms": round(self.last_command_latency_s * 1000.0, 1),
+            "max_command_latency_ms": round(self.max_command_latency_s * 1000.0, 1),
             "is_running": self.is_running,
             "telemetry_polling_interval": self.telemetry_polling_interval
         }
@@ -298,6 +321,30 @@ class CommandQueueManager:
         log.info(f"Cleared {cleared_count} commands from queue")
         return cleared_count
     
+    def _execute_on_actor(self, actor: DeviceActor, adapter: Any, cmd: InverterCommand):
+        """
+        Run the command on the device actor's loop at control priority and wait for it.
+        The adapter's client is never touched from this thread's loop.
+        """
+        if cmd.command.get('action') == "inverter_config":
+            sensor_id = cmd.command.get('sensor_id')
+            data = cmd.command.get('data')
+            handler = cmd.command.get('handler')
+            if not all([sensor_id, data, handler]):
+                raise ValueError("Missing required fields for inverter config command")
+            future = actor.submit(Priority.CONTROL, handler.handle_command, cmd.inverter_id, sensor_id, data,
+                                  timeout_s=self.command_timeout)
+        else:
+            future = actor.submit(Priority.CONTROL, adapter.handle_command, cmd.command,
+                                  timeout_s=self.command_timeout)
+        try:
+            result = future.result(timeout=self.command_timeout + 1)
+        except concurrent.futures.TimeoutError:
+            future.cancel()  # drops it if it has not started yet
+            raise
+        self.commands_via_actor += 1
+        return result
+
     def _execute_inverter_config_command(self, cmd: InverterCommand):
         """
         Execute an inverter config command through the handler.
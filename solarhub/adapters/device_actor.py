@@ -0,0 +1,293 @@
+"""
+Single-owner device actor: every bus operation of one adapter runs on one loop.
+
+The API server runs uvicorn in its own thread and event loop, and
+``CommandQueueManager`` executes commands from its worker thread. Reads and
+writes used to reach the adapters from those foreign loops, and
+``ModbusClientMixin._ensure_client_in_current_loop`` then closed and recreated
+the pymodbus client in whichever loop had called it. A ``DeviceActor`` owns an
+adapter instead:
+
+* it is started on the polling loop and runs one operation at a time from its
+  inbox; the Modbus client is only ever used from that loop
+* ``submit`` may be called from any thread and returns a
+  ``concurrent.futures.Future``; ``call`` awaits one from any event loop
+* operations are ordered by priority (control > telemetry > settings), FIFO
+  within a priority
+* an operation submitted with a ``key`` while one with the same key is still
+  queued shares that operation's future (duplicate reads are coalesced)
+* queue wait and run time are recorded per priority (``get_statistics``)
+
+Before ``start`` (no polling loop yet) ``call`` runs operations inline, as
+the adapters did before.
+"""
+import asyncio
+import concurrent.futures
+import heapq
+import logging
+import threading
+import time
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+log = logging.getLogger(__name__)
+
+OpFn = Callable[..., Awaitable[Any]]
+
+
+class Priority(IntEnum):
+    CONTROL = 0
+    TELEMETRY = 1
+    SETTINGS = 2
+
+
+class _Job:
+    __slots__ = ("priority", "fn", "args", "key", "timeout_s", "future", "submitted_at", "started")
+
+    def __init__(self, priority: Priority, fn: OpFn, args: tuple, key: Optional[Hashable],
+                 timeout_s: Optional[float]):
+        self.priority = priority
+        self.fn = fn
+        self.args = args
+        self.key = key
+        self.timeout_s = timeout_s
+        self.future: concurrent.futures.Future = concurrent.futures.Future()
+        self.submitted_at = time.monotonic()
+        self.started = False
+
+
+class _PriorityStats:
+    __slots__ = ("submitted", "coalesced", "completed", "failed", "cancelled",
+                 "wait_sum_s", "wait_max_s", "run_sum_s", "run_max_s")
+
+    def __init__(self):
+        self.submitted = 0
+        self.coalesced = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.wait_sum_s = 0.0
+        self.wait_max_s = 0.0
+        self.run_sum_s = 0.0
+        self.run_max_s = 0.0
+
+    def get_statistics(self) -> Dict[str, Any]:
+        n = self.completed + self.failed
+        return {
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "avg_wait_ms": round(self.wait_sum_s / n * 1000.0, 2) if n else 0.0,
+            "max_wait_ms": round(self.wait_max_s * 1000.0, 2),
+            "avg_run_ms": round(self.run_sum_s / n * 1000.0, 2) if n else 0.0,
+            "max_run_ms": round(self.run_max_s * 1000.0, 2),
+        }
+
+
+class DeviceActor:
+    """Runs the operations of one device, one at a time, on the loop it was started on."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._heap: List[tuple] = []
+        self._pending: Dict[Hashable, _Job] = {}
+        self._seq = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._stats = {p: _PriorityStats() for p in Priority}
+        self.started_at: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return (self._worker is not None and not self._worker.done()
+                and self._loop is not None and not self._loop.is_closed())
+
+    @property
+    def loop(self) -> Optional[asyncio.AbstractEventLoop]:
+        return self._loop if self.running else None
+
+    def start(self):
+        """Bind to the running event loop and start the worker (no-op if already running there)."""
+        loop = asyncio.get_running_loop()
+        if self.running:
+            if self._loop is loop:
+                return
+            log.warning(f"Device actor {self.name} moved to another event loop")
+            self._worker.cancel()
+        self._loop = loop
+        self._wake = asyncio.Event()
+        self._worker = loop.create_task(self._run(), name=f"device-actor:{self.name}")
+        self.started_at = time.monotonic()
+        with self._lock:
+            if self._heap:
+                self._wake.set()
+
+    def cancel(self) -> Optional[asyncio.Task]:
+        """Cancel the worker without waiting (for synchronous shutdown paths); queued operations fail."""
+        worker, self._worker = self._worker, None
+        if worker is not None:
+            worker.cancel()
+        with self._lock:
+            jobs = [entry[2] for entry in self._heap]
+            self._heap.clear()
+            self._pending.clear()
+        for job in jobs:
+            if not job.started and not job.future.done():
+                job.started = True
+                job.future.set_exception(RuntimeError(f"Device actor {self.name} stopped"))
+        return worker
+
+    async def stop(self):
+        """Stop the worker and wait for it; the running and queued operations fail with RuntimeError."""
+        worker = self.cancel()
+        if worker is not None:
+            try:
+                await worker
+            except asyncio.CancelledError:
+                pass
+
+    def submit(self, priority: Priority, fn: OpFn, *args: Any, key: Optional[Hashable] = None,
+               timeout_s: Optional[float] = None) -> concurrent.futures.Future:
+        """Queue ``fn(*args)`` from any thread. Cancelling the future before it runs drops it."""
+        with self._lock:
+            stats = self._stats[priority]
+            stats.submitted += 1
+            job = self._pending.get(key) if key is not None else None
+            if job is not None and not job.started and not job.future.done():
+                stats.coalesced += 1
+                if priority < job.priority:
+                    job.priority = priority  # the old heap entry is skipped when popped
+                    self._push(job)
+                return job.future
+            job = _Job(priority, fn, args, key, timeout_s)
+            if key is not None:
+                self._pending[key] = job
+            self._push(job)
+        self._notify()
+        return job.future
+
+    async def call(self, priority: Priority, fn: OpFn, *args: Any, key: Optional[Hashable] = None,
+                   timeout_s: Optional[float] = None) -> Any:
+        """
+        Run ``fn(*args)`` on the actor and await its result from any event loop.
+        Runs inline when the actor is not started or when called from an operation the
+        actor is already running.
+        """
+        if not self.running or self._in_worker():
+            if timeout_s:
+                return await asyncio.wait_for(fn(*args), timeout=timeout_s)
+            return await fn(*args)
+        future = self.submit(priority, fn, *args, key=key, timeout_s=timeout_s)
+        return await asyncio.wrap_future(future)
+
+    def proxy(self, adapter: Any, priority: Priority) -> "DeviceProxy":
+        return DeviceProxy(self, adapter, priority)
+
+    def _in_worker(self) -> bool:
+        try:
+            return asyncio.current_task() is self._worker
+        except RuntimeError:
+            return False
+
+    def _push(self, job: _Job):
+        self._seq += 1
+        heapq.heappush(self._heap, (int(job.priority), self._seq, job))
+
+    def _notify(self):
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(self._wake.set)
+        except RuntimeError:
+            pass  # loop closed between the check and the call
+
+    def _pop(self) -> Optional[_Job]:
+        with self._lock:
+            while self._heap:
+                priority, _, job = heapq.heappop(self._heap)
+                if job.started or priority != job.priority:
+                    continue  # superseded entry of a coalesced, upgraded job
+                job.started = True
+                if job.key is not None and self._pending.get(job.key) is job:
+                    del self._pending[job.key]
+                return job
+        return None
+
+    async def _run(self):
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            while True:
+                job = self._pop()
+                if job is None:
+                    break
+                await self._execute(job)
+
+    async def _execute(self, job: _Job):
+        stats = self._stats[job.priority]
+        if not job.future.set_running_or_notify_cancel():
+            stats.cancelled += 1
+            return
+        started = time.monotonic()
+        wait_s = started - job.submitted_at
+        try:
+            if job.timeout_s:
+                result = await asyncio.wait_for(job.fn(*job.args), timeout=job.timeout_s)
+            else:
+                result = await job.fn(*job.args)
+        except asyncio.CancelledError:
+            # A running future cannot be cancelled: fail it so its callers do not hang
+            job.future.set_exception(RuntimeError(f"Device actor {self.name} stopped"))
+            raise
+        except BaseException as e:
+            stats.failed += 1
+            job.future.set_exception(e)
+        else:
+            stats.completed += 1
+            job.future.set_result(result)
+        run_s = time.monotonic() - started
+        stats.wait_sum_s += wait_s
+        stats.wait_max_s = max(stats.wait_max_s, wait_s)
+        stats.run_sum_s += run_s
+        stats.run_max_s = max(stats.run_max_s, run_s)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        with self._lock:
+            queued = sum(1 for _, _, job in self._heap if not job.started)
+        return {
+            "running": self.running,
+            "queued": queued,
+            "priorities": {p.name.lower(): s.get_statistics() for p, s in self._stats.items()},
+        }
+
+
+class DeviceProxy:
+    """
+    Adapter stand-in for code running outside the actor's loop (API handlers):
+    bus operations go through the actor at one priority, every other attribute
+    is the adapter's own.
+    """
+
+    _READS = {"read_by_ident": "read", "_read_holding_regs": "regs", "_ensure_client_in_current_loop": "ensure"}
+    _WRITES = ("write_by_ident", "handle_command", "poll")
+
+    def __init__(self, actor: DeviceActor, adapter: Any, priority: Priority):
+        self._actor = actor
+        self._adapter = adapter
+        self._priority = priority
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._adapter, name)
+        if name not in self._READS and name not in self._WRITES:
+            return attr
+        kind = self._READS.get(name)
+
+        async def forwarded(*args: Any) -> Any:
+            key = (kind, *args) if kind is not None else None
+            return await self._actor.call(self._priority, attr, *args, key=key)
+        return forwarded
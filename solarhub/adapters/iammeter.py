@@ -310,18 +310,21 @@ class IAMMeterAdapter(MeterAdapter, JsonRegisterMixin):
                 if self.regs:
                     try:
                         all_registers_data = await self.read_all_registers()
-                        log.info(f"IAMMeter {self.meter_cfg.id}: Read {len(all_registers_data)} registers from JSON map")
-                        # Log all register IDs that were successfully read
-                        if all_registers_data:
-                            log.debug(f"IAMMeter {self.meter_cfg.id}: Successfully read register IDs: {sorted(all_registers_data.keys())}")
-                        # Debug: Log key register values for troubleshooting
-                        for reg_id in ["voltage_phase_a_legacy", "voltage_phase_a", "current_phase_a_legacy", "current_phase_a", 
-                                     "sum_power_legacy", "total_power", "active_power_phase_a_legacy", "active_power_phase_a",
-                                     "frequency_legacy", "frequency"]:
-                            if reg_id in all_registers_data:
-                                log.info(f"IAMMeter {self.meter_cfg.id}: {reg_id} = {all_registers_data[reg_id]} (type: {type(all_registers_data[reg_id]).__name__})")
-                            else:
-                                log.debug(f"IAMMeter {self.meter_cfg.id}: {reg_id} NOT found in all_registers_data")
+                        # Debug: Log the registers read and key register values for troubleshooting
+                        # (every poll, so nothing is formatted unless DEBUG is on)
+                        if log.isEnabledFor(logging.DEBUG):
+                            log.debug("IAMMeter %s: Read %d registers from JSON map", self.meter_cfg.id, len(all_registers_data))
+                            if all_registers_data:
+                                log.debug("IAMMeter %s: Successfully read register IDs: %s",
+                                          self.meter_cfg.id, sorted(all_registers_data.keys()))
+                            for reg_id in ["voltage_phase_a_legacy", "voltage_phase_a", "current_phase_a_legacy", "current_phase_a", 
+                                         "sum_power_legacy", "total_power", "active_power_phase_a_legacy", "active_power_phase_a",
+                                         "frequency_legacy", "frequency"]:
+                                if reg_id in all_registers_data:
+                                    log.debug("IAMMeter %s: %s = %s (type: %s)", self.meter_cfg.id, reg_id,
+                                              all_registers_data[reg_id], type(all_registers_data[reg_id]).__name__)
+                                else:
+                                    log.debug("IAMMeter %s: %s NOT found in all_registers_data", self.meter_cfg.id, reg_id)
                     except Exception as e:
                         log.warning(f"IAMMeter {self.meter_cfg.id}: [SECTION 1] Failed to read all registers from JSON map: {e}", exc_info=True)
                         all_registers_data = {}
@@ -386,7 +389,7 @@ class IAMMeterAdapter(MeterAdapter, JsonRegisterMixin):
                 current_reg_ids = ["current_phase_a_legacy", "current_phase_a"]
                 available_current_regs = {reg_id: all_registers_data.get(reg_id) for reg_id in current_reg_ids if reg_id in all_registers_data}
                 if available_current_regs:
-                    log.info(f"IAMMeter {self.meter_cfg.id}: Available current registers: {available_current_regs}")
+                    log.debug("IAMMeter %s: Available current registers: %s", self.meter_cfg.id, available_current_regs)
                 else:
                     log.warning(f"IAMMeter {self.meter_cfg.id}: No current registers found in all_registers_data")
                 
@@ -462,7 +465,7 @@ class IAMMeterAdapter(MeterAdapter, JsonRegisterMixin):
                 power_reg_ids = ["sum_power_legacy", "total_power", "active_power_phase_a_legacy", "active_power_phase_a"]
                 available_power_regs = {reg_id: all_registers_data.get(reg_id) for reg_id in power_reg_ids if reg_id in all_registers_data}
                 if available_power_regs:
-                    log.info(f"IAMMeter {self.meter_cfg.id}: Available power registers: {available_power_regs}")
+                    log.debug("IAMMeter %s: Available power registers: %s", self.meter_cfg.id, available_power_regs)
                 else:
                     log.warning(f"IAMMeter {self.meter_cfg.id}: No power registers found in all_registers_data. Available keys: {list(all_registers_data.keys())[:20]}")
                 
@@ -561,7 +564,7 @@ class IAMMeterAdapter(MeterAdapter, JsonRegisterMixin):
             
             # Log power reading for debugging
             if power_w is not None:
-                log.info(f"IAMMeter {self.meter_cfg.id}: Power read = {power_w}W")
+                log.debug("IAMMeter %s: Power read = %sW", self.meter_cfg.id, power_w)
             else:
                 log.warning(f"IAMMeter {self.meter_cfg.id}: Power could not be read from any register")
             
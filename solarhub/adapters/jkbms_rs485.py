@@ -0,0 +1,488 @@
+"""
+JK BMS RS485-2 bus protocol: frame parsers and the asyncio connection.
+
+The bus carries Modbus RTU frames from the master (``id 10 16 ...``, used to
+tell which BMS is answering) and JK data frames (``55 AA EB 90 ...``) with the
+configuration and status of that BMS. ``FrameStreamParser`` splits the
+received byte stream into both kinds of frames; ``ConnectionWrapper`` reads
+the stream from a TCP/IP gateway or a serial port without polling threads.
+"""
+
+import asyncio
+import logging
+from typing import Any, List, Dict, Optional, Tuple
+
+try:
+    import serial  # type: ignore
+except ImportError:
+    serial = None
+
+from solarhub.adapters.serial_stream import SerialStream
+
+log = logging.getLogger(__name__)
+
+# ---- JK RS485-2 Modbus protocol constants -----------------------------------
+
+MODBUS_PATTERN = bytes([0x10, 0x16])
+DATA_FRAME_START = bytes([0x55, 0xAA, 0xEB, 0x90])
+
+FRAME_TYPE_CONFIG = 0x01
+FRAME_TYPE_STATUS = 0x02
+MODBUS_REQUEST = 0x20
+
+RECV_BUFFER_SIZE = 4096
+READ_TIMEOUT = 1.0
+MAX_MODBUS_FRAME_LENGTH = 512
+MAX_DATA_FRAME_LENGTH = 512
+
+CELL_NOMINAL_VOLTAGE = 3.2  # V
+
+# (field_name, offset, length, scale, is_numeric)
+CONFIG_FIELDS = [
+    ('smart_sleep_voltage', 6, 4, 1000.0, True),
+    ('cell_undervoltage_protection', 10, 4, 1000.0, True),
+    ('cell_undervoltage_recovery', 14, 4, 1000.0, True),
+    ('cell_overvoltage_protection', 18, 4, 1000.0, True),
+    ('cell_overvoltage_recovery', 22, 4, 1000.0, True),
+    ('balance_trigger_voltage', 26, 4, 1000.0, True),
+    ('cell_soc100_voltage', 30, 4, 1000.0, True),
+    ('cell_soc0_voltage', 34, 4, 1000.0, True),
+    ('cell_request_charge_voltage', 38, 4, 1000.0, True),
+    ('cell_request_float_voltage', 42, 4, 1000.0, True),
+    ('power_off_voltage', 46, 4, 1000.0, True),
+    ('max_charge_current', 50, 4, 1000.0, True),
+    ('charge_overcurrent_delay', 54, 4, 1.0, True),
+    ('charge_overcurrent_recovery', 58, 4, 1.0, True),
+    ('max_discharge_current', 62, 4, 1000.0, True),
+    ('discharge_overcurrent_delay', 66, 4, 1.0, True),
+    ('discharge_overcurrent_recovery', 70, 4, 1.0, True),
+    ('short_circuit_recovery', 74, 4, 1.0, True),
+    ('max_balance_current', 78, 4, 1000.0, True),
+    ('charge_overtemp_protection', 82, 4, 10.0, True),
+    ('charge_overtemp_recovery', 86, 4, 10.0, True),
+    ('discharge_overtemp_protection', 90, 4, 10.0, True),
+    ('discharge_overtemp_recovery', 94, 4, 10.0, True),
+    ('charge_undertemp_protection', 98, 4, 10.0, True),
+    ('charge_undertemp_recovery', 102, 4, 10.0, True),
+    ('power_tube_overtemp_protection', 106, 4, 10.0, True),
+    ('power_tube_overtemp_recovery', 110, 4, 10.0, True),
+    ('cell_count', 114, 4, 1.0, True),
+    ('charging_switch', 118, 1, None, False),
+    ('discharging_switch', 122, 1, None, False),
+    ('balance_switch', 126, 1, None, False),
+    ('total_battery_capacity', 130, 4, 1000.0, True),
+    ('short_circuit_delay', 134, 4, 1.0, True),
+    ('balance_starting_voltage', 138, 4, 1000.0, True),
+    ('wire_resistance_1', 158, 4, 1000.0, True),
+    ('device_address', 270, 4, 1.0, True),
+]
+
+
+# ---- low-level helpers ------------------------------------------------------
+
+def read_int_le(data: bytes, offset: int, length: int,
+                signed: bool = False, scale: float = 1.0) -> Optional[float]:
+    if offset + length > len(data):
+        return None
+    value = int.from_bytes(data[offset:offset + length], "little", signed=signed)
+    return value / scale if scale != 1.0 else float(value)
+
+
+def read_bool(data: bytes, offset: int) -> Optional[bool]:
+    if offset >= len(data):
+        return None
+    return bool(data[offset])
+
+
+def read_bit_flag(data: bytes, offset: int, bit: int) -> Optional[bool]:
+    if offset >= len(data):
+        return None
+    return bool((data[offset] >> bit) & 1)
+
+
+def _crc16_table() -> Tuple[int, ...]:
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 0x0001 else crc >> 1
+        table.append(crc)
+    return tuple(table)
+
+
+CRC16_TABLE = _crc16_table()
+
+
+def modbus_crc16(data: bytes) -> int:
+    crc = 0xFFFF
+    for b in data:
+        crc = (crc >> 8) ^ CRC16_TABLE[(crc ^ b) & 0xFF]
+    return crc
+
+
+def find_pattern(data: bytes, pattern: bytes, start_pos: int = 0) -> int:
+    try:
+        return data.index(pattern, start_pos)
+    except ValueError:
+        return -1
+
+
+# ---- Modbus frame parsing (RS485-2) ----------------------------------------
+
+def parse_modbus_frame(data: bytes) -> Optional[Tuple[int, int, bytes, bool, int]]:
+    """
+    Try to parse a Modbus frame starting at byte 0 of `data`.
+
+    Returns:
+        (battery_id, frame_type, payload, crc_valid, frame_length)
+    or None if no valid frame starting at data[0].
+    """
+    if len(data) < 6:
+        return None
+
+    battery_id = data[0]
+    if data[1:3] != MODBUS_PATTERN:
+        return None
+
+    frame_type = data[3]
+    max_check = min(len(data), MAX_MODBUS_FRAME_LENGTH)
+
+    for end_pos in range(6, max_check + 1):
+        frame_without_crc = data[:end_pos - 2]
+        received_crc = (data[end_pos - 1] << 8) | data[end_pos - 2]
+        calculated_crc = modbus_crc16(frame_without_crc)
+
+        if received_crc == calculated_crc:
+            payload = data[4:end_pos - 2]
+            return battery_id, frame_type, payload, True, end_pos
+
+    return None
+
+
+# ---- JK "data frames" (55 AA EB 90) parsing --------------------------------
+
+def parse_frame_type_01(frame_data: bytes, cells_per_battery: int = 16) -> dict:
+    """Configuration frame."""
+    result = {"type": "configuration"}
+
+    if len(frame_data) < 286:
+        return result
+
+    for field_name, offset, length, scale, is_numeric in CONFIG_FIELDS:
+        if is_numeric:
+            value = read_int_le(frame_data, offset, length, signed=True, scale=scale)
+            if value is not None:
+                result[field_name] = int(value) if scale == 1.0 else value
+        else:
+            value = read_bool(frame_data, offset)
+            if value is not None:
+                result[field_name] = value
+
+    if len(frame_data) >= 284:
+        result["display_always_on"] = read_bit_flag(frame_data, 282, 4)
+        result["smart_sleep_switch"] = read_bit_flag(frame_data, 282, 7)
+        result["disable_pcl_module"] = read_bit_flag(frame_data, 282, 8)
+        result["timed_stored_data"] = read_bit_flag(frame_data, 283, 1)
+
+    # derived: what we *expect* from JK, given your pack
+    result["expected_cells"] = cells_per_battery
+    result["nominal_cell_voltage"] = CELL_NOMINAL_VOLTAGE
+    result["nominal_pack_voltage"] = cells_per_battery * CELL_NOMINAL_VOLTAGE
+    return result
+
+
+def parse_frame_type_02(frame_data: bytes, cells_per_battery: int = 16) -> dict:
+    """Status frame: voltages, temps, SOC, etc."""
+    result = {"type": "status", "cell_voltages": []}
+
+    # Parse cells
+    for cell in range(cells_per_battery):
+        offset = 6 + cell * 2
+        voltage = read_int_le(frame_data, offset, 2, signed=False, scale=1000.0)
+        if voltage is not None:
+            result["cell_voltages"].append(round(voltage, 3))
+        else:
+            result["cell_voltages"].append(None)
+
+    if len(frame_data) < 236:
+        # still return partial result
+        return result
+
+    cell_resistances: List[float] = []
+    for cell in range(cells_per_battery):
+        offset = 80 + cell * 2
+        resistance = read_int_le(frame_data, offset, 2, signed=True, scale=1000.0)
+        if resistance is not None:
+            cell_resistances.append(resistance)
+    result["cell_resistances"] = cell_resistances
+
+    result["mos_temp"] = read_int_le(frame_data, 144, 2, signed=True, scale=10.0)
+    result["power"] = read_int_le(frame_data, 154, 4, signed=False, scale=1000.0)
+    result["current"] = read_int_le(frame_data, 158, 4, signed=True, scale=1000.0)
+    result["temp1"] = read_int_le(frame_data, 162, 2, signed=True, scale=10.0)
+    result["temp2"] = read_int_le(frame_data, 164, 2, signed=True, scale=10.0)
+    result["temp3"] = read_int_le(frame_data, 254, 2, signed=True, scale=10.0)
+    result["temp4"] = read_int_le(frame_data, 258, 2, signed=True, scale=10.0)
+    result["balance_current"] = read_int_le(frame_data, 170, 2, signed=True, scale=1000.0)
+    result["balance_action"] = read_bool(frame_data, 172)
+    if len(frame_data) > 173:
+        result["soc"] = frame_data[173]
+    result["remaining_capacity"] = read_int_le(frame_data, 174, 4, signed=True, scale=1000.0)
+    result["total_capacity"] = read_int_le(frame_data, 178, 4, signed=True, scale=1000.0)
+    result["cycle_count"] = read_int_le(frame_data, 182, 4, signed=True, scale=1.0)
+    result["cycle_capacity"] = read_int_le(frame_data, 186, 4, signed=True, scale=100.0)
+    if len(frame_data) > 190:
+        result["soh"] = frame_data[190]
+    result["total_runtime"] = read_int_le(frame_data, 194, 4, signed=False, scale=1.0)
+    result["charge_switch"] = read_bool(frame_data, 198)
+    result["discharge_switch"] = read_bool(frame_data, 199)
+    result["balance_switch"] = read_bool(frame_data, 200)
+    result["pack_voltage"] = read_int_le(frame_data, 234, 2, signed=False, scale=100.0)
+
+    # Derived stats from your assumptions
+    result["nominal_pack_voltage"] = cells_per_battery * CELL_NOMINAL_VOLTAGE
+    if result["cell_voltages"]:
+        valid_cells = [v for v in result["cell_voltages"] if v is not None]
+        if valid_cells:
+            result["avg_cell_voltage"] = round(sum(valid_cells) / len(valid_cells), 4)
+
+    return result
+
+
+def parse_data_frame(data: bytes, cells_per_battery: int = 16) -> Optional[dict]:
+    """Parse JK data frame that starts with 55 AA EB 90."""
+    if len(data) < 5 or data[:4] != DATA_FRAME_START:
+        return None
+
+    frame_type = data[4]
+    payload = data  # we already start at 0
+
+    if frame_type == FRAME_TYPE_CONFIG:
+        return parse_frame_type_01(payload, cells_per_battery)
+    elif frame_type == FRAME_TYPE_STATUS:
+        return parse_frame_type_02(payload, cells_per_battery)
+    else:
+        return {"type": frame_type, "unknown_type": True}
+
+
+# ---- frame detection & processing --------------------------------------------
+
+def find_next_frame_start(data: bytes, start_pos: int = 0):
+    """
+    Scan buffer for either JK data frame start (55 AA EB 90)
+    or Modbus pattern (xx 10 16 ...) and return earliest one.
+    """
+    data_pos = find_pattern(data, DATA_FRAME_START, start_pos)
+
+    modbus_pos = -1
+    for i in range(start_pos, len(data) - 2):
+        if data[i + 1:i + 3] == MODBUS_PATTERN:
+            modbus_pos = i
+            break
+
+    if data_pos >= 0 and (modbus_pos < 0 or data_pos < modbus_pos):
+        return data_pos, "data"
+    elif modbus_pos >= 0:
+        return modbus_pos, "modbus"
+    else:
+        return -1, None
+
+
+_SCAN, _MODBUS, _DATA = range(3)
+
+
+class FrameStreamParser:
+    """
+    Incremental RS485-2 bus parser.
+
+    Bytes are appended to one bytearray and parsed in a single pass; consumed
+    bytes are dropped from the front once per chunk. Frames split across chunks
+    are completed by the next chunk instead of being parsed partially:
+
+    * Modbus frames (``id 10 16 ...``): the CRC is updated one byte at a time and
+      checked at every possible frame end, so a frame is found in O(length)
+      (and the scan resumes where it stopped when more bytes arrive).
+    * Data frames (``55 AA EB 90 ...``): end where the next frame of either kind
+      starts, or after ``MAX_DATA_FRAME_LENGTH`` bytes.
+
+    Between frames only the last three bytes (a possibly incomplete start
+    pattern) are kept, so the buffer never exceeds one chunk plus one frame.
+    """
+
+    def __init__(self, cells_per_battery: int = 16):
+        self.cells_per_battery = cells_per_battery
+        self._buf = bytearray()
+        self._state = _SCAN
+        self._crc = 0xFFFF
+        self._crc_len = 0  # bytes of the candidate Modbus frame already in _crc
+        self._scan_from = 1  # where to look for the end of the current data frame
+        self.bytes_received = 0
+        self.modbus_frames = 0
+        self.data_frames = 0
+        self.rejected = 0  # Modbus candidates without a valid CRC
+
+    def __len__(self) -> int:
+        return len(self._buf)
+
+    def feed(self, chunk: bytes) -> List[Tuple[Any, ...]]:
+        """
+        Add received bytes and return the frames completed by them, in bus order:
+        ``("modbus", battery_id, frame_type)`` or ``("data", parsed_frame)``.
+        """
+        self.bytes_received += len(chunk)
+        self._buf += chunk
+        frames: List[Tuple[Any, ...]] = []
+        with memoryview(self._buf) as view:
+            consumed = self._parse(view, frames)
+        if consumed:
+            del self._buf[:consumed]
+        return frames
+
+    def _parse(self, view: memoryview, frames: List[Tuple[Any, ...]]) -> int:
+        buf, end, pos = self._buf, len(self._buf), 0
+        while True:
+            if self._state == _SCAN:
+                data_pos = buf.find(DATA_FRAME_START, pos)
+                modbus_pos = buf.find(MODBUS_PATTERN, pos + 1)
+                modbus_pos = modbus_pos - 1 if modbus_pos >= 0 else -1
+                if data_pos < 0 and modbus_pos < 0:
+                    # Keep a possibly incomplete start pattern
+                    return max(pos, end - 3)
+                if data_pos >= 0 and (modbus_pos < 0 or data_pos < modbus_pos):
+                    pos, self._state, self._scan_from = data_pos, _DATA, 1
+                else:
+                    pos, self._state, self._crc, self._crc_len = modbus_pos, _MODBUS, 0xFFFF, 0
+            elif self._state == _MODBUS:
+                frame_len = self._modbus_frame_length(view, pos, end)
+                if frame_len is None:
+                    return pos
+                self._state = _SCAN
+                if frame_len:
+                    frames.append(("modbus", view[pos], view[pos + 3]))
+                    self.modbus_frames += 1
+                    pos += frame_len
+                else:
+                    self.rejected += 1
+                    pos += 1
+            else:
+                frame_end = self._data_frame_end(buf, pos, end)
+                if frame_end is None:
+                    return pos
+                with view[pos:frame_end] as frame:
+                    parsed = parse_data_frame(frame, self.cells_per_battery)
+                if parsed:
+                    frames.append(("data", parsed))
+                    self.data_frames += 1
+                self._state = _SCAN
+                pos = frame_end
+
+    def _modbus_frame_length(self, view: memoryview, pos: int, end: int) -> Optional[int]:
+        """Length of the Modbus frame at ``pos``, 0 if there is none, None if more bytes are needed."""
+        crc, n = self._crc, self._crc_len
+        while True:
+            if n >= 4:
+                if pos + n + 2 > end:
+                    break
+                if view[pos + n] == crc & 0xFF and view[pos + n + 1] == crc >> 8:
+                    return n + 2
+                if n + 2 >= MAX_MODBUS_FRAME_LENGTH:
+                    return 0
+            elif pos + n >= end:
+                break
+            crc = (crc >> 8) ^ CRC16_TABLE[(crc ^ view[pos + n]) & 0xFF]
+            n += 1
+        self._crc, self._crc_len = crc, n
+        return None
+
+    def _data_frame_end(self, buf: bytearray, pos: int, end: int) -> Optional[int]:
+        """End of the data frame at ``pos`` (start of the next frame), None if not yet known."""
+        start = pos + self._scan_from
+        data_pos = buf.find(DATA_FRAME_START, start)
+        modbus_pos = buf.find(MODBUS_PATTERN, start + 1)
+        candidates = [p for p in (data_pos, modbus_pos - 1 if modbus_pos >= 0 else -1) if p >= 0]
+        if candidates:
+            return min(min(candidates), pos + MAX_DATA_FRAME_LENGTH)
+        if end - pos >= MAX_DATA_FRAME_LENGTH:
+            return pos + MAX_DATA_FRAME_LENGTH
+        # Resume the search before a possibly incomplete start pattern
+        self._scan_from = max(1, end - pos - 3)
+        return None
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get parser statistics."""
+        return {
+            "bytes_received": self.bytes_received,
+            "buffered_bytes": len(self._buf),
+            "modbus_frames": self.modbus_frames,
+            "data_frames": self.data_frames,
+            "rejected_candidates": self.rejected,
+        }
+
+
+# ---- Connection wrapper for TCP/IP and Serial --------------------------------
+
+class ConnectionWrapper:
+    """
+    Unified asyncio reader for a TCP/IP gateway stream or a serial port.
+
+    TCP uses ``asyncio.open_connection``; serial ports are read through a
+    ``SerialStream`` (``loop.add_reader``, or a worker thread on Windows).
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: Optional[asyncio.StreamWriter] = None,
+                 serial_stream: Optional[SerialStream] = None):
+        self._reader = reader
+        self.writer = writer
+        self.serial_stream = serial_stream
+        self.is_tcp = writer is not None
+
+    @classmethod
+    async def open_tcp(cls, host: str, port: int, timeout: float = 5.0) -> 'ConnectionWrapper':
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        return cls(reader, writer=writer)
+
+    @classmethod
+    def from_serial(cls, ser: 'serial.Serial') -> 'ConnectionWrapper':
+        stream = SerialStream.attach(ser)
+        return cls(stream.reader, serial_stream=stream)
+
+    @property
+    def reader(self) -> asyncio.StreamReader:
+        return self.serial_stream.reader if self.serial_stream else self._reader
+
+    @property
+    def serial_conn(self) -> Optional['serial.Serial']:
+        return self.serial_stream.ser if self.serial_stream else None
+
+    @property
+    def raw(self) -> Any:
+        """The underlying socket or serial port (for connectivity checks)."""
+        return self.writer.get_extra_info("socket") if self.is_tcp else self.serial_conn
+
+    @property
+    def at_eof(self) -> bool:
+        return self.reader.at_eof()
+
+    async def recv(self, size: int, timeout: float = READ_TIMEOUT) -> bytes:
+        """
+        Receive up to ``size`` bytes (async).
+
+        Returns b'' if nothing arrived within ``timeout`` or the connection is at EOF.
+        """
+        try:
+            return await asyncio.wait_for(self.reader.read(size), timeout)
+        except asyncio.TimeoutError:
+            return b''
+        except Exception as e:
+            log.debug(f"Connection recv error: {e}")
+            return b''
+
+    def close(self) -> None:
+        """Close connection."""
+        try:
+            if self.is_tcp:
+                self.writer.close()
+            else:
+                self.serial_stream.close()
+        except Exception:
+            pass
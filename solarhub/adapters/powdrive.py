@@ -1,5 +1,6 @@
 import logging
 import asyncio
+import functools
 from typing import Any, Dict, Optional, List
 
 from pymodbus.client import AsyncModbusSerialClient
@@ -8,6 +9,7 @@ from solarhub.adapters.base import InverterAdapter, JsonRegisterMixin, ModbusCli
 from solarhub.models import Telemetry
 from solarhub.timezone_utils import now_configured_iso
 from solarhub.telemetry_mapper import TelemetryMapper
+from solarhub.log_pipeline import caller_info
 
 
 log = logging.getLogger(__name__)
@@ -194,17 +196,9 @@ class PowdriveAdapter(InverterAdapter, JsonRegisterMixin, ModbusClientMixin):
             self._client_recreate_guard = asyncio.Lock()
         
         async with self._client_recreate_guard:
-            # Log stack trace to see who's calling connect()
-            import traceback
-            stack = traceback.extract_stack()
-            callers = []
-            for i in range(min(5, len(stack) - 1)):
-                frame = stack[-(i+2)] if len(stack) > i+1 else None
-                if frame:
-                    filename = frame.filename.split('/')[-1] if '/' in frame.filename else frame.filename.split('\\')[-1]
-                    callers.append(f"{filename}:{frame.lineno}({frame.name})")
-            caller_info = " <- ".join(callers) if callers else "unknown"
-            log.info(f"Powdrive connect() called from: {caller_info}")
+            # Log who's calling connect()
+            callers = caller_info()
+            log.info(f"Powdrive connect() called from: {callers}")
             
             # FIRST: Check if client is already connected - if so, skip connection attempt
             if hasattr(self, 'client') and self.client is not None:
@@ -215,7 +209,7 @@ class PowdriveAdapter(InverterAdapter, JsonRegisterMixin, ModbusClientMixin):
                         try:
                             import os
                             if os.path.exists(port):
-                                log.debug(f"Powdrive client already connected to {port}, skipping connect() (called from: {caller_info})")
+                                log.debug(f"Powdrive client already connected to {port}, skipping connect() (called from: {callers})")
                                 return
                         except Exception:
                             pass  # If check fails, continue with normal flow
@@ -245,7 +239,7 @@ class PowdriveAdapter(InverterAdapter, JsonRegisterMixin, ModbusClientMixin):
                 try:
                     import os
                     if not os.path.exists(port):
-                        log.warning(f"Powdrive port {port} does not exist - cannot connect. Device may be disconnected. Called from: {caller_info}")
+                        log.warning(f"Powdrive port {port} does not exist - cannot connect. Device may be disconnected. Called from: {callers}")
                         raise RuntimeError(f"Port {port} does not exist")
                 except ImportError:
                     pass
@@ -260,7 +254,7 @@ class PowdriveAdapter(InverterAdapter, JsonRegisterMixin, ModbusClientMixin):
                 self.inv.adapter.stopbits,
                 self.inv.adapter.bytesize,
                 self.unit_id,
-                caller_info,
+                callers,
             )
             self.client = AsyncModbusSerialClient(
                 port=port,
@@ -689,26 +683,17 @@ class PowdriveAdapter(InverterAdapter, JsonRegisterMixin, ModbusClientMixin):
         Read all registers from register map and normalize to Telemetry.
         Uses TelemetryMapper to convert device-specific field names to standardized names.
         """
-        # Log connection state before poll
-        # Log stack trace to see who's calling poll()
-        import traceback
-        stack = traceback.extract_stack()
-        callers = []
-        for i in range(min(5, len(stack) - 1)):
-            frame = stack[-(i+2)] if len(stack) > i+1 else None
-            if frame:
-                filename = frame.filename.split('/')[-1] if '/' in frame.filename else frame.filename.split('\\')[-1]
-                callers.append(f"{filename}:{frame.lineno}({frame.name})")
-        caller_info = " <- ".join(callers) if callers else "unknown"
-        
-        client_state = "None"
         port = getattr(self.inv.adapter, 'serial_port', 'unknown')
-        if hasattr(self, 'client') and self.client is not None:
-            if hasattr(self.client, 'connected'):
-                client_state = f"connected={self.client.connected}"
-            else:
-                client_state = "exists (no connected attr)"
-        log.info(f"POWDRIVE POLL: Starting poll for {self.inv.id} (port={port}, regs_loaded={bool(self.regs)}, client={client_state}) - called from: {caller_info}")
+        # Connection state and caller are only worked out when DEBUG is on (this runs every poll)
+        if log.isEnabledFor(logging.DEBUG):
+            client_state = "None"
+            if hasattr(self, 'client') and self.client is not None:
+                if hasattr(self.client, 'connected'):
+                    client_state = f"connected={self.client.connected}"
+                else:
+                    client_state = "exists (no connected attr)"
+            log.debug("POWDRIVE POLL: Starting poll for %s (port=%s, regs_loaded=%s, client=%s) - called from: %s",
+                      self.inv.id, port, bool(self.regs), client_state, caller_info())
         
         # Ensure client is connected before polling (lazy connection)
         # Note: We don't check port existence here because:
@@ -1143,14 +1128,17 @@ class PowdriveAdapter(InverterAdapter, JsonRegisterMixin, ModbusClientMixin):
                     # Powdrive format: HHMM as decimal (2359 = 23:59)
                     encoded_value = h * 100 + m
                     log.debug(f"Powdrive time encoding override: '{value}' -> {encoded_value} (decimal HHMM)")
-                    # Write directly using address
-                    addr = int(r["addr"]) + getattr(self, "addr_offset", 0)
-                    await self._write_holding_u16(addr, encoded_value)
+                    await self._write_words(r, [encoded_value])
                     return
         
         # For all other registers, use parent class method
         await super().write_by_ident(ident, value)
 
+    def _set_extra(self, key: str, value: Any) -> None:
+        """Reflect a register write in the last telemetry's extra fields."""
+        if self.last_tel and self.last_tel.extra is not None:
+            self.last_tel.extra[key] = value
+
     async def handle_command(self, cmd: Dict[str, Any]):
         """
         Write support:
@@ -1246,8 +1234,10 @@ class PowdriveAdapter(InverterAdapter, JsonRegisterMixin, ModbusClientMixin):
             if ident is not None and self.regs:
                 try:
                     await self.write_by_ident(str(ident), cmd.get("value"))
-                    if self.last_tel and self.last_tel.extra is not None:
-                        self.last_tel.extra[self._sanitize_key(str(ident))] = cmd.get("value")
+                    # Inside a command batch the write is only staged: update telemetry once it took
+                    self._when_applied(self._find_reg_by_id_or_name(str(ident)),
+                                       functools.partial(self._set_extra, self._sanitize_key(str(ident)),
+                                                         cmd.get("value")))
                     return {"ok": True}
                 except Exception as e:
                     return {"ok": False, "reason": str(e)}
@@ -1259,9 +1249,11 @@ class PowdriveAdapter(InverterAdapter, JsonRegisterMixin, ModbusClientMixin):
                 except Exception:
                     return {"ok": False, "reason": "addr (or numeric id) required"}
             try:
-                await self._write_holding_u16(int(addr), int(cmd.get("value")))
-                if self.last_tel and self.last_tel.extra is not None:
-                    self.last_tel.extra[f"reg_{int(addr):04x}"] = int(cmd.get("value"))
+                addr, value = int(addr), int(cmd.get("value"))
+                # Raw addresses are on the wire; go through the plan so batch writes keep their order
+                r = {"id": f"reg_{addr:04x}", "addr": addr - self.addr_offset, "size": 1, "kind": "holding"}
+                await self._write_words(r, [value])
+                self._when_applied(r, functools.partial(self._set_extra, r["id"], value))
                 return {"ok": True}
             except Exception as e:
                 return {"ok": False, "reason": str(e)}
@@ -1311,9 +1303,6 @@ class PowdriveAdapter(InverterAdapter, JsonRegisterMixin, ModbusClientMixin):
                 # Bit 8: Spanish mode (optional)
                 log.info(f"[TOU Window {idx}] Step 0/5: Checking and setting TOU enable register (tou_selling)")
                 try:
-                    # Add extra delay before TOU enable register operation to avoid conflicts with polling
-                    await asyncio.sleep(0.3)
-                    
                     # Read current value with retry logic
                     current_tou_enable = None
                     for retry in range(3):
@@ -1351,11 +1340,9 @@ class PowdriveAdapter(InverterAdapter, JsonRegisterMixin, ModbusClientMixin):
                         write_success = False
                         for retry in range(3):
                             try:
-                                await asyncio.sleep(0.2)  # Extra delay before each write attempt
                                 await self.write_by_ident("tou_selling", desired_tou_enable)
                                 log.info(f"[TOU Window {idx}] Step 0/5: ✓ Successfully set TOU enable register")
                                 write_success = True
-                                await asyncio.sleep(0.2)  # Delay after successful write
                                 break
                             except Exception as write_err:
                                 if retry < 2:
@@ -1372,19 +1359,16 @@ class PowdriveAdapter(InverterAdapter, JsonRegisterMixin, ModbusClientMixin):
                 except Exception as e:
                     log.warning(f"[TOU Window {idx}] Step 0/5: ⚠ Failed to read/write TOU enable register: {e} - continuing anyway", exc_info=True)
                     # Continue even if TOU enable fails - might already be set
-                    await asyncio.sleep(0.2)  # Delay before continuing
                 
                 # Set start time (prog{idx}_time) - register 148-153
                 # Note: In Powdrive, time point N is start of window N and end of window N-1
                 log.info(f"[TOU Window {idx}] Step 1/5: Writing start time '{start_time}' to register prog{idx}_time")
                 try:
-                    await asyncio.sleep(0.2)  # Extra delay before write to avoid Modbus conflicts
                     await self.write_by_ident(f"prog{idx}_time", start_time)
                     log.info(f"[TOU Window {idx}] Step 1/5: ✓ Successfully wrote start time '{start_time}'")
                 except Exception as e:
                     log.error(f"[TOU Window {idx}] Step 1/5: ✗ Failed to write start time '{start_time}': {e}", exc_info=True)
                     raise
-                await asyncio.sleep(0.2)  # Increased delay between writes
                 
                 # If this is not the last window, set the end time for previous window
                 # End time of window N is start time of window N+1
@@ -1394,13 +1378,11 @@ class PowdriveAdapter(InverterAdapter, JsonRegisterMixin, ModbusClientMixin):
                 # Power is always positive, direction determined by target vs current SOC
                 log.info(f"[TOU Window {idx}] Step 2/5: Writing power {power_w}W to register prog{idx}_power_w")
                 try:
-                    await asyncio.sleep(0.2)  # Extra delay before write to avoid Modbus conflicts
                     await self.write_by_ident(f"prog{idx}_power_w", int(power_w))
                     log.info(f"[TOU Window {idx}] Step 2/5: ✓ Successfully wrote power {power_w}W")
                 except Exception as e:
                     log.error(f"[TOU Window {idx}] Step 2/5: ✗ Failed to write power {power_w}W: {e}", exc_info=True)
                     raise
-                await asyncio.sleep(0.2)  # Increased delay between writes
                 
                 # Set target based on battery_mode_source (register 111)
                 # If register 111 = 0 (voltage mode): use registers 160-165 (voltage)
@@ -1419,7 +1401,6 @@ class PowdriveAdapter(InverterAdapter, JsonRegisterMixin, ModbusClientMixin):
                         except Exception as e:
                             log.error(f"[TOU Window {idx}] Step 3/5: ✗ Failed to write target voltage {target_voltage_v}V: {e}", exc_info=True)
                             raise
-                        await asyncio.sleep(0.2)  # Increased delay between writes
                     else:
                         # If no voltage provided, try to calculate from SOC (approximate)
                         # This is a fallback - ideally voltage should be provided
@@ -1428,13 +1409,11 @@ class PowdriveAdapter(InverterAdapter, JsonRegisterMixin, ModbusClientMixin):
                     # Capacity mode: set target SOC (registers 166-171)
                     log.info(f"[TOU Window {idx}] Step 3/5: Writing target SOC {target_soc_pct}% to register prog{idx}_capacity_pct")
                     try:
-                        await asyncio.sleep(0.2)  # Extra delay before write to avoid Modbus conflicts
                         await self.write_by_ident(f"prog{idx}_capacity_pct", int(target_soc_pct))
                         log.info(f"[TOU Window {idx}] Step 3/5: ✓ Successfully wrote target SOC {target_soc_pct}%")
                     except Exception as e:
                         log.error(f"[TOU Window {idx}] Step 3/5: ✗ Failed to write target SOC {target_soc_pct}%: {e}", exc_info=True)
                         raise
-                    await asyncio.sleep(0.2)  # Increased delay between writes
                 
                 # Set charge enable (prog{idx}_charge_mode) - register 172-177
                 # Bit manipulation: Bit0=grid charging, Bit1=gen charging, Bit2=Spanish GM, Bit3=Spanish BU, Bit4=Spanish CH
@@ -1486,13 +1465,11 @@ class PowdriveAdapter(InverterAdapter, JsonRegisterMixin, ModbusClientMixin):
                 log.info(f"[TOU Window {idx}] Step 4/5: Writing charge_mode 0x{charge_mode_value:04X} to register prog{idx}_charge_mode")
                 log.info(f"[TOU Window {idx}] Step 4/5: Charge mode bits - grid={bool(charge_mode_value & 1)}, gen={bool(charge_mode_value & 2)}, GM={bool(charge_mode_value & 4)}, BU={bool(charge_mode_value & 8)}, CH={bool(charge_mode_value & 16)}")
                 try:
-                    await asyncio.sleep(0.2)  # Extra delay before write to avoid Modbus conflicts
                     await self.write_by_ident(f"prog{idx}_charge_mode", charge_mode_value)
                     log.info(f"[TOU Window {idx}] Step 4/5: ✓ Successfully wrote charge_mode 0x{charge_mode_value:04X}")
                 except Exception as e:
                     log.error(f"[TOU Window {idx}] Step 4/5: ✗ Failed to write charge_mode 0x{charge_mode_value:04X}: {e}", exc_info=True)
                     raise
-                await asyncio.sleep(0.2)  # Increased delay after final write
                 
                 log.info(f"[TOU Window {idx}] ✓ All 5 register writes completed successfully")
                 return {"ok": True}
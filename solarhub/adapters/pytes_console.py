@@ -0,0 +1,165 @@
+"""
+Pytes (Pylontech-compatible) console protocol over asyncio.
+
+The battery console answers a text command such as ``pwr 1`` with the echoed
+command, the output lines, ``Command completed successfully``, a ``$$`` line
+and the ``pylon>`` prompt. ``ResponseSplitter`` splits the received bytes into
+lines and the lines into one response per command as they arrive;
+``PytesConsole`` writes commands and waits on a ``SerialStream`` for the
+responses, so an exchange costs a few wakeups instead of a polling loop.
+
+Several commands can be sent back to back (``pipeline``): the console queues
+its input, and responses are matched to commands by their echo.
+"""
+
+import asyncio
+import logging
+import re
+from typing import Any, List, Sequence
+
+from solarhub.adapters.serial_stream import SerialStream
+
+log = logging.getLogger(__name__)
+
+ENCODING = "latin-1"
+COMPLETED_MARKER = "Command completed"
+END_MARKER = "$$"
+PROMPT = re.compile(r"[\w.-]*>")  # "pylon>", "pylon_debug>"
+READ_SIZE = 4096
+NUDGE_INTERVAL = 0.3  # s without any reply before sending a bare newline to wake the console
+
+
+class ResponseSplitter:
+    """Incremental line splitting and response framing of console output."""
+
+    def __init__(self):
+        self._partial = ""
+        self._current: List[str] = []
+
+    def reset(self) -> None:
+        self._partial = ""
+        self._current = []
+
+    @property
+    def pending(self) -> List[str]:
+        """Complete lines of the response still in progress."""
+        return list(self._current)
+
+    def feed(self, data: bytes) -> List[List[str]]:
+        """
+        Add received bytes; return the responses they complete.
+
+        Lines keep their line ending. A response starts at the first line that
+        is not a blank, ``$$`` or bare prompt line and ends with the
+        ``Command completed`` line, a ``$$`` line or a prompt waiting for input.
+        """
+        parts = (self._partial + data.decode(ENCODING)).split("\n")
+        self._partial = parts.pop()
+        done: List[List[str]] = []
+        for part in parts:
+            line = part + "\n"
+            stripped = line.strip()
+            if not self._current and (not stripped or stripped == END_MARKER or PROMPT.fullmatch(stripped)):
+                continue
+            self._current.append(line)
+            if COMPLETED_MARKER in line or stripped == END_MARKER:
+                done.append(self._current)
+                self._current = []
+        if self._current and PROMPT.fullmatch(self._partial.strip()):
+            # The console prompts for the next command: this response has no end marker
+            done.append(self._current)
+            self._current = []
+        return done
+
+
+def match_responses(cmds: Sequence[str], responses: List[List[str]]) -> List[List[str]]:
+    """
+    One response per command, in command order ([] where none arrived).
+
+    A response is assigned to the next command its first line echoes; without
+    an echo it goes to the next command in order.
+    """
+    out: List[List[str]] = [[] for _ in cmds]
+    pos = 0
+    for response in responses:
+        if pos >= len(cmds):
+            break
+        head = response[0].strip()
+        idx = next((i for i in range(pos, len(cmds)) if head.endswith(cmds[i])), pos)
+        out[idx] = response
+        pos = idx + 1
+    return out
+
+
+class PytesConsole:
+    """Command/response exchanges with the battery console over a SerialStream."""
+
+    def __init__(self, stream: SerialStream):
+        self.stream = stream
+        self.splitter = ResponseSplitter()
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def attach(cls, ser: Any) -> 'PytesConsole':
+        """Start reading an open pyserial port on the running event loop."""
+        return cls(SerialStream.attach(ser))
+
+    @property
+    def at_eof(self) -> bool:
+        return self.stream.at_eof
+
+    @property
+    def wakeups(self) -> int:
+        return self.stream.wakeups
+
+    async def command(self, cmd: str, timeout_s: float = 2.0) -> List[str]:
+        """Send one command and return its response lines (partial or [] on timeout)."""
+        return (await self.pipeline([cmd], timeout_s))[0]
+
+    async def pipeline(self, cmds: Sequence[str], timeout_s: float = 2.0) -> List[List[str]]:
+        """
+        Send ``cmds`` back to back and return their responses in command order.
+
+        Each response must complete within ``timeout_s`` of the previous one;
+        after a timeout the lines received so far are returned for the command
+        in progress and [] for the rest.
+        """
+        async with self._lock:
+            stream = self.stream
+            loop = asyncio.get_running_loop()
+            stream.discard_input()
+            self.splitter.reset()
+            stream.write(b"".join(cmd.encode(ENCODING) + b"\n" for cmd in cmds))
+
+            responses: List[List[str]] = []
+            received = False
+            deadline = loop.time() + timeout_s
+            while len(responses) < len(cmds):
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                wait = remaining if received else min(remaining, NUDGE_INTERVAL)
+                try:
+                    data = await asyncio.wait_for(stream.reader.read(READ_SIZE), wait)
+                except asyncio.TimeoutError:
+                    if not received:
+                        stream.write(b"\n")  # give the console a nudge
+                    continue
+                if not data:
+                    log.debug("Battery console closed")
+                    break
+                received = True
+                completed = self.splitter.feed(data)
+                if completed:
+                    responses += completed
+                    deadline = loop.time() + timeout_s
+            if len(responses) < len(cmds) and self.splitter.pending:
+                responses.append(self.splitter.pending)
+
+            out = match_responses(cmds, responses)
+            log.debug(f"Battery console {list(cmds)} returned {[len(r) for r in out]} lines")
+            return out
+
+    def close(self) -> None:
+        """Stop reading and close the serial port."""
+        self.stream.close()
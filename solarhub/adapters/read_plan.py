@@ -0,0 +1,452 @@
+"""
+Contiguous-block read plan for JSON register maps.
+
+A register map is compiled once into a small number of Modbus block reads:
+registers are grouped per kind (holding/input), sorted by address and merged
+into size-limited blocks, tolerating small gaps between them. Each member
+keeps its word offset inside the block so values can be decoded straight from
+the block response. When the plan is given a decoder factory, every member
+carries its precompiled decoder and a block is decoded in one pass.
+
+Devices often reject reads that span unsupported addresses. When a block read
+fails twice in a row (a single timeout or CRC error is retried first), it is
+bisected into smaller blocks until the failing registers are isolated; the
+working split replaces the original block, so the adapter only pays for the
+discovery once. The original block is tried again after
+``remerge_after_cycles`` cycles of the split (backing off while it keeps
+failing), so a split caused by a bad patch on the bus does not last forever.
+
+Slow-changing registers (energy counters, writable configuration, or entries
+marked ``"poll": "slow"``) are compiled into their own blocks. With
+``slow_every > 1`` they are only read every N-th poll and their last values are
+reused in between, so the fast power fields keep the full poll rate.
+"""
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from solarhub.adapters.register_decoder import decode_block
+
+log = logging.getLogger(__name__)
+
+# Modbus limit for FC03/FC04 is 125 registers per request
+MODBUS_MAX_READ_REGS = 125
+
+ReadFn = Callable[[str, int, int], Awaitable[List[int]]]
+DecodeFn = Callable[[Dict[str, Any], List[int]], Any]
+DecoderFactory = Callable[[Dict[str, Any]], Any]
+
+
+class BlockMember:
+    """A register inside a read block."""
+    __slots__ = ("reg_id", "reg", "offset", "size", "decoder")
+
+    def __init__(self, reg_id: str, reg: Dict[str, Any], offset: int, size: int,
+                 decoder: Any = None):
+        self.reg_id = reg_id
+        self.reg = reg
+        self.offset = offset
+        self.size = size
+        self.decoder = decoder
+
+
+class ReadBlock:
+    """One Modbus read covering ``count`` words starting at map address ``start``."""
+    __slots__ = ("kind", "start", "count", "members", "failures", "skip_polls", "slow",
+                 "origin", "split_cycles", "remerge_after")
+
+    def __init__(self, kind: str, start: int, count: int, members: List[BlockMember], slow: bool = False):
+        self.kind = kind
+        self.start = start
+        self.count = count
+        self.members = members
+        self.slow = slow
+        # Consecutive failures of a single-register block and polls left before retrying it
+        self.failures = 0
+        self.skip_polls = 0
+        # Blocks bisected out of a failed block point at it; the original counts the
+        # cycles read split and is read whole again after ``remerge_after`` of them
+        self.origin: Optional["ReadBlock"] = None
+        self.split_cycles = 0
+        self.remerge_after = 0
+
+    def __repr__(self) -> str:
+        cadence = ", slow" if self.slow else ""
+        return f"ReadBlock({self.kind} @{self.start} x{self.count}, {len(self.members)} regs{cadence})"
+
+
+class ConnectionLostError(RuntimeError):
+    """Raised when a block read fails because the transport is gone (no point in bisecting)."""
+
+
+def _is_connection_error(err: Exception) -> bool:
+    msg = str(err).lower()
+    return ("not connected" in msg or "does not exist" in msg or "no such file" in msg
+            or "no such device" in msg or "bad file descriptor" in msg)
+
+
+_Entry = Tuple[int, str, Dict[str, Any], int, Any]
+
+
+def _make_block(kind: str, members: List[_Entry], slow: bool = False) -> ReadBlock:
+    """Build a block from (addr, reg_id, reg, size, decoder) tuples sorted by address."""
+    start = members[0][0]
+    end = max(e[0] + e[3] for e in members)
+    return ReadBlock(kind, start, end - start,
+                     [BlockMember(rid, reg, addr - start, size, dec) for addr, rid, reg, size, dec in members],
+                     slow=slow)
+
+
+SLOW_UNITS = frozenset(("wh", "kwh", "mwh", "varh", "kvarh", "h", "ah", "ascii"))
+
+
+def is_slow_register(reg: Dict[str, Any]) -> bool:
+    """
+    Whether a register changes slowly enough to be read at the slow cadence:
+    an explicit ``"poll": "slow" | "fast"`` wins, otherwise writable configuration
+    and energy/counter/text units are slow.
+    """
+    cadence = str(reg.get("poll") or "").lower()
+    if cadence in ("slow", "fast"):
+        return cadence == "slow"
+    if str(reg.get("rw", "RO")).upper() in ("RW", "R/W"):
+        return True
+    return str(reg.get("unit") or "").strip().lower() in SLOW_UNITS
+
+
+def readable_registers(regs: List[Dict[str, Any]]) -> List[Tuple[str, int, str, Dict[str, Any], int]]:
+    """Select registers that read_all_registers reads: (kind, addr, reg_id, reg, size)."""
+    out = []
+    for reg in regs:
+        reg_id = reg.get("id")
+        if not reg_id or "addr" not in reg:
+            continue
+        # Skip write-only registers
+        if str(reg.get("rw", "RO")).upper() in ("WO", "WRITE-ONLY"):
+            continue
+        kind = (reg.get("kind") or "").lower()
+        if kind not in ("holding", "input"):
+            continue
+        try:
+            addr = int(reg["addr"])
+            size = max(1, int(reg.get("size", 1)))
+        except (TypeError, ValueError):
+            continue
+        out.append((kind, addr, reg_id, reg, size))
+    return out
+
+
+def compile_read_plan(regs: List[Dict[str, Any]], max_block_regs: int = 64,
+                      max_gap: int = 8,
+                      decoder_factory: Optional[DecoderFactory] = None,
+                      split_slow: bool = False) -> List[ReadBlock]:
+    """
+    Compile a register map into contiguous read blocks.
+
+    Args:
+        regs: Register map entries (JSON dicts)
+        max_block_regs: Maximum words per block read (capped at the Modbus limit)
+        max_gap: Maximum unused words tolerated between two registers of one block
+        decoder_factory: Optional reg -> decoder; registers it rejects are left out
+        split_slow: Put slow registers (``is_slow_register``) in separate blocks
+
+    Returns:
+        Blocks sorted by cadence (fast first), kind and address
+    """
+    max_block_regs = max(1, min(int(max_block_regs), MODBUS_MAX_READ_REGS))
+    max_gap = max(0, int(max_gap))
+
+    by_kind: Dict[Tuple[bool, str], List[_Entry]] = {}
+    for kind, addr, reg_id, reg, size in readable_registers(regs):
+        decoder = None
+        if decoder_factory is not None:
+            try:
+                decoder = decoder_factory(reg)
+            except Exception as e:
+                log.warning(f"Register {reg_id} left out of read plan: cannot compile decoder: {e}")
+                continue
+        slow = split_slow and is_slow_register(reg)
+        by_kind.setdefault((slow, kind), []).append((addr, reg_id, reg, size, decoder))
+
+    blocks: List[ReadBlock] = []
+    for slow, kind in sorted(by_kind):
+        entries = sorted(by_kind[(slow, kind)], key=lambda e: (e[0], -e[3]))
+        current: List[_Entry] = []
+        cur_start = cur_end = 0
+        for entry in entries:
+            addr, size = entry[0], entry[3]
+            if current:
+                new_end = max(cur_end, addr + size)
+                if addr - cur_end <= max_gap and new_end - cur_start <= max_block_regs:
+                    current.append(entry)
+                    cur_end = new_end
+                    continue
+                blocks.append(_make_block(kind, current, slow))
+            current = [entry]
+            cur_start, cur_end = addr, addr + size
+        if current:
+            blocks.append(_make_block(kind, current, slow))
+    return blocks
+
+
+class RegisterReadPlan:
+    """
+    Executes a compiled block plan and learns which blocks the device accepts.
+
+    Blocks that fail twice in a row are bisected by member until every readable
+    register is in a working block; the split replaces the original block and
+    the original is tried again every ``remerge_after_cycles`` cycles (doubling
+    while it fails). Registers that fail on their own are backed off for
+    ``retry_after_polls`` polls.
+
+    With a ``decoder_factory`` (e.g. ``register_decoder.RegisterDecoder``)
+    registers are compiled once and ``execute`` needs no ``decode_fn``.
+
+    With ``slow_every > 1`` slow blocks are read on the first poll and then every
+    ``slow_every`` polls; other polls return their last values.
+    """
+
+    def __init__(self, regs: List[Dict[str, Any]], max_block_regs: int = 64,
+                 max_gap: int = 8, retry_after_polls: int = 30,
+                 decoder_factory: Optional[DecoderFactory] = None,
+                 slow_every: int = 1, remerge_after_cycles: int = 100):
+        self.max_block_regs = max_block_regs
+        self.max_gap = max_gap
+        self.retry_after_polls = max(1, int(retry_after_polls))
+        self.remerge_after_cycles = max(1, int(remerge_after_cycles))
+        self.slow_every = max(1, int(slow_every))
+        self.blocks = compile_read_plan(regs, max_block_regs, max_gap, decoder_factory,
+                                        split_slow=self.slow_every > 1)
+        self.register_count = sum(len(b.members) for b in self.blocks)
+        self._slow_values: Dict[str, Any] = {}
+        self._slow_due = True
+        # Statistics
+        self.polls = 0
+        self.last_frames = 0
+        self.bisections = 0
+        self.transient_failures = 0
+        self.remerges = 0
+        self.slow_reads = 0
+        log.debug(f"Compiled read plan: {self.register_count} registers in {len(self.blocks)} blocks")
+
+    async def execute(self, read_fn: ReadFn, decode_fn: Optional[DecodeFn] = None,
+                      addr_offset: int = 0) -> Dict[str, Any]:
+        """
+        Read every block and decode members into a {reg_id: value} dict.
+
+        Args:
+            read_fn: async (kind, addr, count) -> words
+            decode_fn: (reg, words) -> value; None to use the members' compiled decoders
+            addr_offset: Offset added to map addresses on the wire
+
+        Raises:
+            ConnectionLostError: if the transport failed; values read so far are
+                attached as ``err.values``
+        """
+        self.polls += 1
+        read_slow = self._slow_due or (self.polls - 1) % self.slow_every == 0
+        values: Dict[str, Any] = {}
+        slow_values: Dict[str, Any] = {}
+        frames = 0
+        new_blocks: List[ReadBlock] = []
+        idx = 0
+        try:
+            while idx < len(self.blocks):
+                block = self.blocks[idx]
+                if block.slow and not read_slow:
+                    new_blocks.append(block)
+                    idx += 1
+                    continue
+                target = slow_values if block.slow else values
+                merged, used = await self._remerge(idx, len(self.blocks), read_fn, decode_fn, addr_offset, target)
+                frames += used
+                if merged:
+                    new_blocks.append(block.origin)
+                    idx += merged
+                    continue
+                working, used = await self._read_block(block, read_fn, decode_fn, addr_offset, target)
+                frames += used
+                new_blocks.extend(working)
+                idx += 1
+        except ConnectionLostError as e:
+            # Keep the learned splits of the blocks we got through
+            new_blocks.extend(self.blocks[idx:])
+            self.blocks = new_blocks
+            self._slow_values.update(slow_values)
+            e.values = {**self._slow_values, **values}  # type: ignore[attr-defined]
+            raise
+        self.blocks = new_blocks
+        self.last_frames = frames
+        if read_slow:
+            self._slow_due = False
+            self.slow_reads += 1
+            self._slow_values.update(slow_values)
+        return {**self._slow_values, **values} if self._slow_values else values
+
+    async def execute_blocks(self, read_fn: ReadFn, start: int, limit: int, addr_offset: int = 0,
+                             decode_fn: Optional[DecodeFn] = None) -> Tuple[Dict[str, Any], int]:
+        """
+        Read ``limit`` blocks from block index ``start`` (a slice of one full
+        pass), decoding like ``execute``.
+
+        Returns the values and the index to continue from (0 after the last
+        block). Bisected blocks replace the original in place.
+
+        Raises:
+            ConnectionLostError: as ``execute``, with the slice's values attached
+        """
+        start = max(0, min(int(start), len(self.blocks)))
+        end = min(start + max(1, int(limit)), len(self.blocks))
+        values: Dict[str, Any] = {}
+        new_blocks: List[ReadBlock] = []
+        idx = start
+        try:
+            while idx < end:
+                block = self.blocks[idx]
+                merged, _ = await self._remerge(idx, end, read_fn, decode_fn, addr_offset, values)
+                if merged:
+                    new_blocks.append(block.origin)
+                    idx += merged
+                    continue
+                working, _ = await self._read_block(block, read_fn, decode_fn, addr_offset, values)
+                new_blocks.extend(working)
+                idx += 1
+        except ConnectionLostError as e:
+            new_blocks.extend(self.blocks[idx:end])
+            self.blocks[start:end] = new_blocks
+            e.values = values  # type: ignore[attr-defined]
+            raise
+        self.blocks[start:end] = new_blocks
+        following = start + len(new_blocks)
+        return values, (following if following < len(self.blocks) else 0)
+
+    def refresh_slow(self):
+        """Read slow registers on the next poll (e.g. after a configuration write)."""
+        self._slow_due = True
+
+    @staticmethod
+    async def _read_words(block: ReadBlock, read_fn: ReadFn, addr_offset: int) -> List[int]:
+        try:
+            words = await read_fn(block.kind, block.start + addr_offset, block.count)
+            if len(words) < block.count:
+                raise RuntimeError(f"short read: got {len(words)} of {block.count} words")
+        except Exception as e:
+            if _is_connection_error(e):
+                raise ConnectionLostError(str(e)) from e
+            raise
+        return words
+
+    async def _remerge(self, idx: int, end: int, read_fn: ReadFn, decode_fn: Optional[DecodeFn],
+                       addr_offset: int, values: Dict[str, Any]) -> Tuple[int, int]:
+        """
+        If ``blocks[idx]`` starts the split of a failed block and the original is due
+        for another try, read the original whole.
+
+        Returns (split blocks the original replaces, frames used); 0 blocks when the
+        split stays.
+        """
+        origin = self.blocks[idx].origin
+        if origin is None or (idx > 0 and self.blocks[idx - 1].origin is origin):
+            return 0, 0
+        count = 1
+        while idx + count < len(self.blocks) and self.blocks[idx + count].origin is origin:
+            count += 1
+        if idx + count > end:
+            return 0, 0  # split continues past this slice
+        origin.split_cycles += 1
+        if origin.split_cycles < origin.remerge_after:
+            return 0, 0
+        origin.split_cycles = 0
+        try:
+            words = await self._read_words(origin, read_fn, addr_offset)
+        except ConnectionLostError:
+            raise
+        except Exception as e:
+            origin.remerge_after = min(origin.remerge_after * 2, 16 * self.remerge_after_cycles)
+            log.debug(f"{origin!r} still fails whole ({e}); next try in {origin.remerge_after} cycles")
+            return 0, 1
+        self.remerges += 1
+        log.debug(f"{origin!r} reads whole again; dropping its {count}-block split")
+        origin.failures = origin.skip_polls = 0
+        origin.remerge_after = 0
+        self._decode(origin, words, decode_fn, values)
+        return count, 1
+
+    @staticmethod
+    def _decode(block: ReadBlock, words: List[int], decode_fn: Optional[DecodeFn], values: Dict[str, Any]):
+        if decode_fn is None:
+            decode_block(block.members, words, values)
+            return
+        for m in block.members:
+            try:
+                values[m.reg_id] = decode_fn(m.reg, words[m.offset:m.offset + m.size])
+            except Exception as e:
+                log.debug(f"Failed to decode register {m.reg_id}: {e}")
+
+    async def _read_block(self, block: ReadBlock, read_fn: ReadFn, decode_fn: Optional[DecodeFn],
+                          addr_offset: int, values: Dict[str, Any]) -> Tuple[List[ReadBlock], int]:
+        """Read one block, bisecting on repeated failure. Returns (blocks to keep, frames used)."""
+        if block.skip_polls > 0:
+            block.skip_polls -= 1
+            return [block], 0
+
+        frames = 1
+        try:
+            try:
+                words = await self._read_words(block, read_fn, addr_offset)
+            except ConnectionLostError:
+                raise
+            except Exception as e:
+                if len(block.members) == 1:
+                    raise
+                # Check the span again before splitting it for good: timeouts and CRC errors are transient
+                log.debug(f"Block read failed for {block!r}: {e}; retrying once")
+                frames += 1
+                words = await self._read_words(block, read_fn, addr_offset)
+                self.transient_failures += 1
+        except ConnectionLostError:
+            raise
+        except Exception as e:
+            if len(block.members) == 1:
+                block.failures += 1
+                block.skip_polls = self.retry_after_polls
+                if block.failures == 1:
+                    log.debug(f"Register {block.members[0].reg_id} unreadable "
+                              f"(@{block.start + addr_offset}), retrying in {self.retry_after_polls} polls: {e}")
+                return [block], frames
+            self.bisections += 1
+            log.debug(f"Block read failed again for {block!r}: {e}; bisecting")
+            origin = block.origin or block
+            if block is origin:
+                origin.split_cycles = 0
+                origin.remerge_after = origin.remerge_after or self.remerge_after_cycles
+            mid = len(block.members) // 2
+            keep: List[ReadBlock] = []
+            for half in (block.members[:mid], block.members[mid:]):
+                sub = _make_block(block.kind, [(block.start + m.offset, m.reg_id, m.reg, m.size, m.decoder)
+                                               for m in half], block.slow)
+                sub.origin = origin
+                sub_keep, sub_frames = await self._read_block(sub, read_fn, decode_fn, addr_offset, values)
+                keep.extend(sub_keep)
+                frames += sub_frames
+            return keep, frames
+
+        block.failures = 0
+        self._decode(block, words, decode_fn, values)
+        return [block], frames
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get read plan statistics."""
+        return {
+            "registers": self.register_count,
+            "blocks": len(self.blocks),
+            "backed_off_registers": sum(1 for b in self.blocks if b.skip_polls > 0),
+            "last_frames": self.last_frames,
+            "bisections": self.bisections,
+            "transient_failures": self.transient_failures,
+            "split_blocks": sum(1 for b in self.blocks if b.origin is not None),
+            "remerges": self.remerges,
+            "polls": self.polls,
+            "slow_blocks": sum(1 for b in self.blocks if b.slow),
+            "slow_every": self.slow_every,
+            "slow_reads": self.slow_reads,
+        }
@@ -0,0 +1,179 @@
+"""
+Shadow image of an adapter's holding (configuration) registers.
+
+The settings pages and HA config entities used to read registers one at a
+time across the live Modbus link from the API loop, competing with telemetry
+polls and recreating the client in the other event loop. ``RegisterShadow``
+keeps the last known value of every holding register instead:
+
+* the poll loop calls ``refresh`` after each poll. Once every ``refresh_s``
+  it reads the holding registers again in block reads, ``blocks_per_poll``
+  blocks at a time, so a pass never delays one poll by more than that
+* ``read_by_ident`` results and ``write_by_ident`` values (decoded exactly as a
+  read would be) are recorded write-through; written registers, and ones a
+  reader asked for before the first pass reached them, are read (back) first
+  on the next refresh
+* readers get values plus staleness metadata (``meta``): the image version,
+  which increases whenever a value changes, and the age of the oldest value
+"""
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from solarhub.adapters.read_plan import ConnectionLostError, ReadFn, RegisterReadPlan, readable_registers
+from solarhub.adapters.register_decoder import RegisterDecoder
+
+log = logging.getLogger(__name__)
+
+
+class ShadowEntry:
+    __slots__ = ("value", "read_at", "version", "source")
+
+    def __init__(self, value: Any, read_at: float, version: int, source: str):
+        self.value = value
+        self.read_at = read_at
+        self.version = version
+        self.source = source
+
+
+class RegisterShadow:
+    """Last known values of the holding registers of one register map."""
+
+    def __init__(self, regs: List[Dict[str, Any]], decoder_factory: Callable[[Dict[str, Any]], Any] = RegisterDecoder,
+                 refresh_s: float = 600.0, blocks_per_poll: int = 2, max_block_regs: int = 64, max_gap: int = 8,
+                 clock: Callable[[], float] = time.time):
+        holding = [reg for kind, _, _, reg, _ in readable_registers(regs) if kind == "holding"]
+        self.plan = RegisterReadPlan(holding, max_block_regs=max_block_regs, max_gap=max_gap,
+                                     decoder_factory=decoder_factory)
+        self.reg_ids: Set[str] = {m.reg_id for b in self.plan.blocks for m in b.members}
+        self.refresh_s = float(refresh_s)
+        self.stale_after_s = 2 * self.refresh_s
+        self.blocks_per_poll = max(1, int(blocks_per_poll))
+        self.clock = clock
+        self.version = 0
+        self._entries: Dict[str, ShadowEntry] = {}
+        self._wanted: Set[str] = set()
+        self._cursor = 0
+        self._next_pass_at = 0.0  # first pass starts on the first refresh
+        # Statistics
+        self.passes = 0
+        self.block_reads = 0
+        self.refresh_errors = 0
+        self.last_pass_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def covers(self, reg_id: Optional[str]) -> bool:
+        return reg_id in self.reg_ids
+
+    def _update(self, values: Dict[str, Any], source: str):
+        now = self.clock()
+        for reg_id, value in values.items():
+            entry = self._entries.get(reg_id)
+            if entry is None or entry.value != value:
+                self.version += 1
+                self._entries[reg_id] = ShadowEntry(value, now, self.version, source)
+            else:
+                entry.read_at = now
+                entry.source = source
+            self._wanted.discard(reg_id)
+
+    def fresh(self, reg_id: str) -> Tuple[bool, Any]:
+        """(True, value) when the value is known, not stale and not waiting for a read-back."""
+        entry = self._entries.get(reg_id)
+        if entry is None or reg_id in self._wanted or self.clock() - entry.read_at > self.stale_after_s:
+            return False, None
+        return True, entry.value
+
+    def record(self, reg_id: str, value: Any, source: str = "read"):
+        """Record a value read or written outside ``refresh`` (ignored for registers not shadowed)."""
+        if reg_id in self.reg_ids:
+            self._update({reg_id: value}, source)
+            if source == "write":
+                self._wanted.add(reg_id)  # read back: the device may have clamped it
+
+    def request(self, reg_ids: Iterable[str]):
+        """Read these registers first on the next refresh."""
+        self._wanted.update(r for r in reg_ids if r in self.reg_ids)
+
+    def due(self) -> bool:
+        return bool(self._wanted) or self._cursor > 0 or self.clock() >= self._next_pass_at
+
+    async def refresh(self, read_fn: ReadFn, addr_offset: int = 0) -> int:
+        """
+        Read the next blocks if a pass is due (wanted registers first).
+        Returns the number of blocks read.
+        """
+        if not self.due():
+            return 0
+        budget = self.blocks_per_poll
+        read = 0
+        try:
+            if self._wanted:
+                wanted = [i for i, b in enumerate(self.plan.blocks) if any(m.reg_id in self._wanted for m in b.members)]
+                # Highest index first: bisecting a block shifts the ones after it
+                for idx in sorted(wanted, reverse=True)[:budget]:
+                    values, _ = await self.plan.execute_blocks(read_fn, idx, 1, addr_offset)
+                    self._update(values, "read")
+                    read += 1
+                if not wanted:
+                    self._wanted.clear()
+            if read < budget and (self._cursor > 0 or self.clock() >= self._next_pass_at):
+                count = min(budget - read, len(self.plan.blocks) - self._cursor)
+                values, self._cursor = await self.plan.execute_blocks(read_fn, self._cursor, count, addr_offset)
+                self._update(values, "read")
+                read += count
+                if self._cursor == 0:
+                    self.passes += 1
+                    self.last_pass_at = self.clock()
+                    self._next_pass_at = self.last_pass_at + self.refresh_s
+        except ConnectionLostError as e:
+            self._update(getattr(e, "values", {}), "read")
+            self.refresh_errors += 1
+            self.last_error = str(e)
+            log.debug(f"Register shadow refresh stopped, connection lost: {e}")
+        self.block_reads += read
+        return read
+
+    def get(self, reg_ids: Iterable[str]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Values of ``reg_ids`` (None when not read yet) and their staleness metadata."""
+        reg_ids = list(reg_ids)
+        values: Dict[str, Any] = {}
+        oldest: Optional[float] = None
+        missing = []
+        for reg_id in reg_ids:
+            entry = self._entries.get(reg_id)
+            if entry is None:
+                values[reg_id] = None
+                missing.append(reg_id)
+                continue
+            values[reg_id] = entry.value
+            oldest = entry.read_at if oldest is None else min(oldest, entry.read_at)
+        if missing:
+            self.request(missing)
+        return values, self.meta(oldest, missing)
+
+    def meta(self, oldest: Optional[float] = None, missing: Optional[List[str]] = None) -> Dict[str, Any]:
+        if oldest is None and not missing:
+            oldest = min((e.read_at for e in self._entries.values()), default=None)
+        age = None if oldest is None else max(0.0, self.clock() - oldest)
+        return {
+            "version": self.version,
+            "read_at": None if oldest is None else datetime.fromtimestamp(oldest, timezone.utc).isoformat(),
+            "age_s": None if age is None else round(age, 1),
+            "stale": bool(missing) or age is None or age > self.stale_after_s,
+            "missing": list(missing or []),
+        }
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            "registers": len(self.reg_ids),
+            "known": len(self._entries),
+            "blocks": len(self.plan.blocks),
+            "version": self.version,
+            "passes": self.passes,
+            "block_reads": self.block_reads,
+            "refresh_errors": self.refresh_errors,
+            "last_pass_age_s": None if self.last_pass_at is None else round(self.clock() - self.last_pass_at, 1),
+            "last_error": self.last_error,
+        }
@@ -4,6 +4,9 @@ from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime, timezone
 from pymodbus.client import AsyncModbusSerialClient, AsyncModbusTcpClient
 from solarhub.adapters.base import InverterAdapter, JsonRegisterMixin, ModbusClientMixin
+from solarhub.adapters.register_decoder import (
+    DIALECT_SENERGY, RegisterDecoder, compile_decoders, pack_words
+)
 from solarhub.models import Telemetry
 from solarhub.telemetry_mapper import TelemetryMapper
 from typing import Any, Dict, List, Optional
@@ -102,6 +105,8 @@ class SenergyAdapter(InverterAdapter, JsonRegisterMixin, ModbusClientMixin):
         self.regs: List[Dict[str, Any]] = []
         self.addr_offset: int = getattr(inv.adapter, "addr_offset", 0) or 0
         self._kind_cache: Dict[int, str] = {}  # discovered kind fixes
+        self._poll_decoders: List[RegisterDecoder] = []
+        self._poll_decoders_regs: Optional[List[Dict[str, Any]]] = None
         self.last_tel: Dict[str, Any] = {}  # store latest telemetry data
         # No internal locking - command queue handles serialization
         self._client_loop: Optional[asyncio.AbstractEventLoop] = None  # Event loop where client was created
@@ -280,7 +285,7 @@ class SenergyAdapter(InverterAdapter, JsonRegisterMixin, ModbusClientMixin):
                 raise RuntimeError("client not connected")
         log.debug(f"Modbus write multiple: addr=0x{address:04X} (dec={address}), values={values}, count={len(values)}, unit_id={self.inv.adapter.unit_id}")
         try:
-            rq = await self.client.write_registers(address, values, unit=self.inv.adapter.unit_id)
+            rq = await self.client.write_registers(address=address, values=values, device_id=self.inv.adapter.unit_id)
             if rq.isError():
                 log.error(f"Modbus write multiple failed: addr=0x{address:04X}, values={values}, error={rq}")
                 raise RuntimeError(f"Modbus write error at 0x{address:04X}: {rq}")
@@ -296,7 +301,7 @@ class SenergyAdapter(InverterAdapter, JsonRegisterMixin, ModbusClientMixin):
                 self.client = None
                 await self._ensure_client_in_current_loop()
                 # Retry the operation
-                rq = await self.client.write_registers(address, values, unit=self.inv.adapter.unit_id)
+                rq = await self.client.write_registers(address=address, values=values, device_id=self.inv.adapter.unit_id)
                 if rq.isError():
                     log.error(f"Modbus write multiple failed: addr=0x{address:04X}, values={values}, error={rq}")
                     raise RuntimeError(f"Modbus write error at 0x{address:04X}: {rq}")
@@ -504,113 +509,29 @@ class SenergyAdapter(InverterAdapter, JsonRegisterMixin, ModbusClientMixin):
 
     # --------------- Poll (read) ---------------
 
+    def _get_poll_decoders(self) -> List[RegisterDecoder]:
+        """Register map compiled into decoders; recompiled only when self.regs is replaced."""
+        if self._poll_decoders_regs is not self.regs:
+            self._poll_decoders = compile_decoders(self.regs, DIALECT_SENERGY)
+            self._poll_decoders_regs = self.regs
+        return self._poll_decoders
+
     async def poll(self) -> Telemetry:
         # Ensure client is connected before polling (lazy connection)
         await self._ensure_client_in_current_loop()
         # group by (effective) kind with cache corrections
-        by_kind: Dict[str, List[Dict[str, Any]]] = {"input": [], "holding": []}
-        for r in self.regs:
-            addr = int(r["addr"])
-            k = self._kind_cache.get(addr, (r.get("kind") or "input"))
-            rr = dict(r)
-            rr["kind"] = k if k in ("input", "holding") else "input"
-            by_kind[rr["kind"]].append(rr)
+        by_kind: Dict[str, List[RegisterDecoder]] = {"input": [], "holding": []}
+        for dec in self._get_poll_decoders():
+            k = self._kind_cache.get(dec.addr, dec.kind or "input")
+            by_kind[k if k in ("input", "holding") else "input"].append(dec)
 
         values: Dict[str, Any] = {}
 
-        async def decode_into(items: List[Dict[str, Any]], regs: List[int], window_start: int):
-            for r in items:
-                off = r["addr"] - window_start
-                size = max(1, r.get("size", 1))
-                raw = regs[off:off+size] if off >= 0 else []
-                t = (r.get("type") or "").lower()
-                u = (r.get("unit") or "").lower()
-                enc = (r.get("encoder") or "").lower()
-
-                # ASCII / string fields
-                is_ascii = ("ascii" in u) or ("ascii" in t) or ("string" in t)
-                if is_ascii:
-                    val: Any = _regs_to_ascii(raw, byteorder="big")
-                    # Debug logging for ASCII fields
-                    reg_id = r.get("id", "unknown")
-                    if reg_id in ["device_model", "device_serial_number"]:
-                        log.debug(f"ASCII field {reg_id}: raw={raw}, decoded='{val}'")
-                else:
-                    # --- special single-word encoders (decode) ---
-                    if size == 1 and raw:
-                        w = int(raw[0]) & 0xFFFF
-                        if enc == "hhmm":
-                            hh = (w >> 8) & 0xFF
-                            mm = w & 0xFF
-                            # clamp to sensible ranges just in case
-                            if 0 <= hh <= 23 and 0 <= mm <= 59:
-                                val = f"{hh:02d}:{mm:02d}"
-                            else:
-                                val = {"hour": (hh & 0xFF), "minute": (mm & 0xFF)}
-                        elif enc == "month_day":
-                            m = (w >> 8) & 0xFF
-                            d = w & 0xFF
-                            if 1 <= m <= 12 and 1 <= d <= 31:
-                                val = f"{m:02d}-{d:02d}"
-                            else:
-                                val = {"month": (m & 0xFF), "day": (d & 0xFF)}
-                        elif enc == "second":
-                            sec = (w >> 8) & 0xFF
-                            # low byte is spec'd as 0; ignore it on decode
-                            if 0 <= sec <= 59:
-                                val = sec
-                            else:
-                                val = {"second": (sec & 0xFF)}
-                        else:
-                            val = None  # fall through to numeric decode below
-                    else:
-                        val = None
-
-                    # --- numeric (default) decode if not handled above ---
-                    if val is None:
-                        if size == 1:
-                            val = int(raw[0]) if raw else None
-                            if "s16" in t and val is not None and val >= 0x8000:
-                                val = val - 0x10000
-                        elif size == 2:
-                            if raw and len(raw) >= 2:
-                                hi, lo = raw[0], raw[1]
-                                v = (hi << 16) | lo
-                                if "s32" in t and v & 0x80000000:
-                                    v = -((~v & 0xFFFFFFFF) + 1)
-                                val = v
-                            else:
-                                val = None
-                        else:
-                            # keep list for non-ascii multiword numeric/opaque fields
-                            val = raw
-
-                    # --- apply bit_enum / enum / scale ---
-                    if isinstance(val, int):
-                        bit_msgs = _coerce_bit_enum(r, val)
-                        if bit_msgs is not None:
-                            val = bit_msgs
-                        else:
-                            enum_map = _coerce_enum_map(r)
-                            if enum_map is not None:
-                                val = enum_map.get(val, f"UNKNOWN({val})")
-                            else:
-                                sc = r.get("scale")
-                                if sc and isinstance(val, (int, float)):
-                                    val = round(val * sc, 3)
-
-
-
-                key = r.get("ha_key") or self._sanitize_key(r.get("name") or r.get("id") or f"reg_{r['addr']:04X}")
-                values[key] = val
-                # Debug logging for key device fields
-                reg_id = r.get("id", "unknown")
-                if reg_id in ["device_model", "device_serial_number"]:
-                    log.debug(f"Stored {reg_id} with key '{key}' = '{val}'")
-                
-                # Debug logging for energy registers
-                if reg_id in ["battery_daily_charge_energy", "battery_daily_discharge_energy", "daily_energy_to_eps"]:
-                    log.debug(f"Energy register {reg_id}: raw={raw}, decoded={val}, key='{key}'")
+        def decode_into(items: List[RegisterDecoder], regs: List[int], window_start: int):
+            buf = pack_words(regs)
+            for dec in items:
+                # ha_key is assigned lazily by _find_reg_by_id_or_name
+                values[dec.reg.get("ha_key") or dec.key] = dec.decode(regs, dec.addr - window_start, buf)
 
         # Ensure client is in current event loop before polling
         await self._ensure_client_in_current_loop()
@@ -619,15 +540,15 @@ class SenergyAdapter(InverterAdapter, JsonRegisterMixin, ModbusClientMixin):
         MAX_CHUNK = 20
         MAX_GAP = 4
         for kind, items in by_kind.items():
-            items = sorted(items, key=lambda x: x["addr"])
+            items = sorted(items, key=lambda d: d.addr)
             i = 0
             while i < len(items):
-                start = items[i]["addr"]
-                end = start + max(1, items[i].get("size", 1))
+                start = items[i].addr
+                end = start + items[i].size
                 j = i + 1
                 while j < len(items):
-                    a = items[j]["addr"]
-                    sz = max(1, items[j].get("size", 1))
+                    a = items[j].addr
+                    sz = items[j].size
                     if a - end > MAX_GAP or (a + sz - start) > MAX_CHUNK:
                         break
                     end = max(end, a + sz)
@@ -637,27 +558,27 @@ class SenergyAdapter(InverterAdapter, JsonRegisterMixin, ModbusClientMixin):
 
                 try:
                     regs = await self._read_range_kind(kind, start, count)
-                    await decode_into(window, regs, start)
+                    decode_into(window, regs, start)
                 except Exception:
                     log.debug("Chunk read failed (%s @0x%04X len=%d), falling back per-register",
                               kind, start, count)
                     other = "holding" if kind == "input" else "input"
-                    for r in window:
-                        addr = r["addr"]
-                        size = max(1, r.get("size", 1))
+                    for dec in window:
+                        addr = dec.addr
+                        size = dec.size
                         ok = False
                         # Check cache first
                         cached_kind = self._kind_cache.get(addr)
                         if cached_kind:
                             try_kinds = [cached_kind]
                         else:
-                            try_kinds = [r["kind"], other]
+                            try_kinds = [kind, other]
                         
                         for try_kind in try_kinds:
                             try:
                                 regs = await self._read_range_kind(try_kind, addr, size)
-                                await decode_into([r], regs, addr)
-                                if try_kind != r["kind"]:
+                                decode_into([dec], regs, addr)
+                                if try_kind != kind:
                                     # Only log if not already cached (first discovery)
                                     if addr not in self._kind_cache:
                                         log.info("Adjusted kind for 0x%04X -> %s (cached for future use)", addr, try_kind)
@@ -669,7 +590,7 @@ class SenergyAdapter(InverterAdapter, JsonRegisterMixin, ModbusClientMixin):
                             except Exception:
                                 continue
                         if not ok:
-                            reg_id = r.get("id", "unknown")
+                            reg_id = dec.reg_id or "unknown"
                             if reg_id in ["battery_daily_charge_energy", "battery_daily_discharge_energy", "daily_energy_to_eps"]:
                                 log.error("Failed to read energy register %s at 0x%04X (size=%d)", reg_id, addr, size)
                             else:
@@ -1022,12 +943,8 @@ class SenergyAdapter(InverterAdapter, JsonRegisterMixin, ModbusClientMixin):
                 # normalize back to 'value' so scaling/encoding below uses the validated user value
                 value = v_user
             words = self._encode_value(r, value)
-            addr = int(r["addr"]) + self.addr_offset
             try:
-                if len(words) == 1:
-                    await self._write_holding_u16(addr, words[0])
-                else:
-                    await self._write_holding_u16_list(addr, words)
+                await self._write_words(r, words)
                 return {"ok": True}
             except Exception as e:
                 return {"ok": False, "reason": str(e)}
@@ -1083,11 +1000,7 @@ class SenergyAdapter(InverterAdapter, JsonRegisterMixin, ModbusClientMixin):
                         # normalize back to 'value' so scaling/encoding below uses the validated user value
                         value = v_user
                     words = self._encode_value(r, value)
-                    addr = int(r["addr"]) + self.addr_offset
-                    if len(words) == 1:
-                        await self._write_holding_u16(addr, words[0])
-                    else:
-                        await self._write_holding_u16_list(addr, words)
+                    await self._write_words(r, words)
                 except Exception as e:
                     errors.append((ident, str(e)))
             return {"ok": len(errors)==0, "errors": errors}
@@ -0,0 +1,108 @@
+"""
+asyncio reading of pyserial ports.
+
+``SerialStream`` feeds everything a serial port receives into an
+``asyncio.StreamReader``. On POSIX the port's file descriptor is watched with
+``loop.add_reader`` and each wakeup reads all waiting bytes at once; where the
+event loop cannot watch serial handles (Windows) a worker thread blocks on the
+port instead. Either way nothing polls ``in_waiting`` in a loop.
+"""
+
+import asyncio
+import logging
+from typing import Any, Optional
+
+log = logging.getLogger(__name__)
+
+THREAD_READ_TIMEOUT = 0.2  # s, lets the worker thread notice close()
+
+
+class SerialStream:
+    """Bulk, event-driven reads of an open pyserial port."""
+
+    def __init__(self, ser: Any):
+        self.ser = ser
+        self.reader = asyncio.StreamReader()
+        self.wakeups = 0  # read callbacks / thread reads that returned data
+        self._fd: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def attach(cls, ser: Any) -> 'SerialStream':
+        """Start reading ``ser`` on the running event loop."""
+        stream = cls(ser)
+        loop = asyncio.get_running_loop()
+        try:
+            fd = ser.fileno()
+            ser.timeout = 0  # non-blocking reads when the loop reports data
+            loop.add_reader(fd, stream._on_readable)
+            stream._fd = fd
+        except (AttributeError, NotImplementedError, OSError, ValueError):
+            ser.timeout = THREAD_READ_TIMEOUT
+            stream._task = loop.create_task(stream._read_in_thread())
+        return stream
+
+    @property
+    def at_eof(self) -> bool:
+        return self.reader.at_eof()
+
+    def _feed(self, data: bytes) -> None:
+        self.wakeups += 1
+        self.reader.feed_data(data)
+
+    def _on_readable(self) -> None:
+        try:
+            data = self.ser.read(self.ser.in_waiting or 1)
+        except Exception as e:
+            log.debug(f"Serial read error: {e}")
+            self._stop()
+            self.reader.feed_eof()
+            return
+        if data:
+            self._feed(data)
+
+    def _read_blocking(self) -> bytes:
+        # Wait (up to the port timeout) for the first byte, then take whatever else is waiting
+        data = self.ser.read(1)
+        waiting = self.ser.in_waiting if data else 0
+        return data + self.ser.read(waiting) if waiting else data
+
+    async def _read_in_thread(self) -> None:
+        while True:
+            try:
+                data = await asyncio.to_thread(self._read_blocking)
+            except Exception as e:
+                log.debug(f"Serial read error: {e}")
+                self.reader.feed_eof()
+                return
+            if data:
+                self._feed(data)
+
+    def write(self, data: bytes) -> None:
+        self.ser.write(data)
+
+    def discard_input(self) -> None:
+        """Drop buffered input (stale replies) before sending a new request."""
+        self.ser.reset_input_buffer()
+        if not self.reader.at_eof():
+            # Drop what was already moved into the StreamReader
+            self.reader = asyncio.StreamReader()
+
+    def _stop(self) -> None:
+        if self._fd is not None:
+            try:
+                asyncio.get_running_loop().remove_reader(self._fd)
+            except Exception:
+                pass
+            self._fd = None
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def close(self) -> None:
+        """Stop reading and close the port."""
+        self._stop()
+        try:
+            self.ser.close()
+        except Exception:
+            pass
@@ -0,0 +1,246 @@
+"""
+Coalesced multi-register write plan for JSON register maps.
+
+The smart scheduler used to run its commands one at a time with a sleep in
+between, and every field of a command (a TOU window is start time, power,
+target SOC and charge mode) was its own Modbus write. A ``WritePlan`` collects
+the encoded words of every register written while a batch of commands runs
+instead, then:
+
+* drops registers whose value the register shadow already holds (fresh)
+* merges registers at adjacent addresses into one write of up to
+  ``max_run_regs`` words (FC16; a single word stays a single-register write)
+* verifies all runs with as few block reads as possible (runs closer than
+  ``max_gap`` words share one read) and reports registers the device did not
+  take
+
+A later write of the same register in one plan replaces the earlier one, and
+runs are written in address order, not in the order the commands staged them.
+``discard`` drops the writes of one command (e.g. one that failed halfway),
+bringing back what earlier commands staged at those registers.
+"""
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+# Modbus limit for FC16 is 123 registers per request; stay well below it
+DEFAULT_MAX_RUN_REGS = 32
+DEFAULT_MAX_VERIFY_REGS = 64
+DEFAULT_MAX_GAP = 8
+
+WriteFn = Callable[[int, List[int]], Awaitable[None]]
+ReadFn = Callable[[int, int], Awaitable[List[int]]]
+
+
+class PlannedWrite:
+    """Encoded words for one register, and the command (tag) that asked for them."""
+    __slots__ = ("reg_id", "reg", "addr", "words", "tag", "on_applied", "replaced")
+
+    def __init__(self, reg_id: str, reg: Dict[str, Any], words: List[int], tag: Optional[Hashable]):
+        self.reg_id = reg_id
+        self.reg = reg
+        self.addr = int(reg["addr"])
+        self.words = [int(w) & 0xFFFF for w in words]
+        self.tag = tag
+        # Called once the device holds the words (written and not refused, or already current)
+        self.on_applied: List[Callable[[], None]] = []
+        # The write of the same register this one replaced in the plan, if any
+        self.replaced: Optional["PlannedWrite"] = None
+
+
+class WriteRun:
+    """One Modbus write of consecutive registers starting at map address ``start``."""
+    __slots__ = ("start", "words", "members")
+
+    def __init__(self, first: PlannedWrite):
+        self.start = first.addr
+        self.words = list(first.words)
+        self.members = [first]
+
+    @property
+    def end(self) -> int:
+        return self.start + len(self.words)
+
+
+class WriteResult:
+    """Outcome of ``WritePlan.execute``."""
+
+    def __init__(self):
+        self.written: List[PlannedWrite] = []
+        self.skipped: List[PlannedWrite] = []
+        self.failed: Dict[str, str] = {}
+        self.mismatched: Dict[str, Tuple[List[int], List[int]]] = {}
+        self.read_back: Dict[str, List[int]] = {}
+        self.unverified: List[str] = []
+        self.write_frames = 0
+        self.verify_frames = 0
+        self._tags: Dict[str, Optional[Hashable]] = {}
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed and not self.mismatched
+
+    def failed_tags(self) -> Dict[Hashable, str]:
+        """Reason per command tag that had a register fail or not verify."""
+        out: Dict[Hashable, str] = {}
+        for reg_id, reason in self.failed.items():
+            out.setdefault(self._tags.get(reg_id), f"{reg_id}: {reason}")
+        for reg_id, (want, got) in self.mismatched.items():
+            out.setdefault(self._tags.get(reg_id), f"{reg_id}: wrote {want}, device holds {got}")
+        out.pop(None, None)
+        return out
+
+    def applied(self) -> List[PlannedWrite]:
+        """Registers the device holds the planned words for: skipped, or written and not refused."""
+        return self.skipped + [p for p in self.written if p.reg_id not in self.mismatched]
+
+
+class WritePlan:
+    """Register writes staged while a batch of commands runs."""
+
+    def __init__(self, max_run_regs: int = DEFAULT_MAX_RUN_REGS, max_verify_regs: int = DEFAULT_MAX_VERIFY_REGS,
+                 max_gap: int = DEFAULT_MAX_GAP):
+        self.max_run_regs = max(1, int(max_run_regs))
+        self.max_verify_regs = max(1, int(max_verify_regs))
+        self.max_gap = max(0, int(max_gap))
+        self._writes: Dict[int, PlannedWrite] = {}
+        # Values read while the plan was being built, so a batch reads each register once
+        self.reads: Dict[str, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self._writes)
+
+    def stage(self, reg: Dict[str, Any], words: List[int], tag: Optional[Hashable] = None) -> PlannedWrite:
+        reg_id = reg.get("id") or reg.get("name") or f"reg_{int(reg['addr']):04x}"
+        planned = PlannedWrite(reg_id, reg, words, tag)
+        planned.replaced = self._writes.get(planned.addr)
+        self._writes[planned.addr] = planned
+        self.reads.pop(reg_id, None)
+        return planned
+
+    def discard(self, tag: Optional[Hashable]) -> int:
+        """Drop the writes staged with ``tag``, restoring the ones they replaced. Returns the count dropped."""
+        dropped = 0
+        for addr, planned in list(self._writes.items()):
+            if planned.tag != tag:
+                continue
+            dropped += 1
+            while planned is not None and planned.tag == tag:
+                planned = planned.replaced
+            if planned is None:
+                del self._writes[addr]
+            else:
+                self._writes[addr] = planned
+        return dropped
+
+    def staged(self, reg: Dict[str, Any]) -> Optional[PlannedWrite]:
+        planned = self._writes.get(int(reg["addr"]))
+        return planned if planned is not None and planned.reg is reg else None
+
+    def runs(self, writes: Optional[List[PlannedWrite]] = None) -> List[WriteRun]:
+        """Merge registers at adjacent addresses into writes of at most ``max_run_regs`` words."""
+        ordered = sorted(self._writes.values() if writes is None else writes, key=lambda w: w.addr)
+        runs: List[WriteRun] = []
+        for planned in ordered:
+            run = runs[-1] if runs else None
+            if (run is not None and planned.addr == run.end
+                    and len(run.words) + len(planned.words) <= self.max_run_regs):
+                run.words.extend(planned.words)
+                run.members.append(planned)
+            else:
+                runs.append(WriteRun(planned))
+        return runs
+
+    def verify_spans(self, runs: List[WriteRun]) -> List[Tuple[int, int, List[WriteRun]]]:
+        """(start, count, runs) block reads covering ``runs``, sharing a read across small gaps."""
+        spans: List[Tuple[int, int, List[WriteRun]]] = []
+        for run in runs:
+            if spans:
+                start, count, members = spans[-1]
+                if run.start - (start + count) <= self.max_gap and run.end - start <= self.max_verify_regs:
+                    spans[-1] = (start, run.end - start, members + [run])
+                    continue
+            spans.append((run.start, len(run.words), [run]))
+        return spans
+
+    async def execute(self, write_fn: WriteFn, read_fn: ReadFn, addr_offset: int = 0,
+                      is_current: Optional[Callable[[PlannedWrite], bool]] = None) -> WriteResult:
+        """
+        Write the plan and read it back. ``is_current`` says whether the device already
+        holds a planned value (e.g. from the register shadow); those registers are skipped.
+        """
+        result = WriteResult()
+        pending: List[PlannedWrite] = []
+        for planned in self._writes.values():
+            result._tags[planned.reg_id] = planned.tag
+            if is_current is not None and is_current(planned):
+                result.skipped.append(planned)
+            else:
+                pending.append(planned)
+
+        written: List[WriteRun] = []
+        for run in self.runs(pending):
+            result.write_frames += 1
+            try:
+                await write_fn(run.start + addr_offset, run.words)
+            except Exception as e:
+                log.warning(f"Write of {len(run.words)} registers @{run.start} failed: {e}")
+                for planned in run.members:
+                    result.failed[planned.reg_id] = str(e)
+                continue
+            result.written.extend(run.members)
+            written.append(run)
+
+        for start, count, runs in self.verify_spans(written):
+            result.verify_frames += 1
+            try:
+                words = await read_fn(start + addr_offset, count)
+            except Exception as e:
+                log.debug(f"Read-back of {count} registers @{start} failed: {e}")
+                result.unverified.extend(p.reg_id for run in runs for p in run.members)
+                continue
+            for run in runs:
+                for planned in run.members:
+                    offset = planned.addr - start
+                    got = [int(w) & 0xFFFF for w in words[offset:offset + len(planned.words)]]
+                    result.read_back[planned.reg_id] = got
+                    if got != planned.words:
+                        result.mismatched[planned.reg_id] = (planned.words, got)
+        return result
+
+
+class WritePlanStats:
+    """Totals over the plans an adapter has executed."""
+
+    def __init__(self):
+        self.plans = 0
+        self.commands = 0
+        self.staged = 0
+        self.skipped = 0
+        self.write_frames = 0
+        self.verify_frames = 0
+        self.failed = 0
+        self.mismatched = 0
+
+    def add(self, plan: WritePlan, result: WriteResult, commands: int):
+        self.plans += 1
+        self.commands += commands
+        self.staged += len(plan)
+        self.skipped += len(result.skipped)
+        self.write_frames += result.write_frames
+        self.verify_frames += result.verify_frames
+        self.failed += len(result.failed)
+        self.mismatched += len(result.mismatched)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            "plans": self.plans,
+            "commands": self.commands,
+            "registers_staged": self.staged,
+            "registers_skipped": self.skipped,
+            "write_frames": self.write_frames,
+            "verify_frames": self.verify_frames,
+            "failed": self.failed,
+            "mismatched": self.mismatched,
+        }
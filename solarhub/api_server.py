@@ -2,13 +2,26 @@ import threading
 import logging
 import json
 import asyncio
+import bisect
+import functools
+import inspect
 from datetime import datetime, timezone, timedelta
 from typing import Any, Dict, Optional, List
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 from solarhub.energy_calculator import EnergyCalculator
+from solarhub.history_query import HistoryQuery
+from solarhub.json_codec import to_jsonable
+from solarhub.logging.cell_store import read_cell_frames
+from solarhub.logging.read_pool import get_read_pool_statistics, read_connection
+from solarhub.log_pipeline import get_logging_statistics
+from solarhub.forecast.clearsky import get_clearsky_cache
+from solarhub.adapters.device_actor import Priority
+from solarhub.snapshot_cache import etag_matches
+from solarhub.live_stream import parse_topics
 from solarhub.billing_engine import (
     simulate_billing_year,
     estimate_capacity_status,
@@ -19,52 +32,6 @@ from solarhub.billing_engine import (
 log = logging.getLogger(__name__)
 
 
-def _make_json_serializable(obj: Any, visited: Optional[set] = None) -> Any:
-    """
-    Recursively convert object to JSON-serializable format.
-    Handles circular references and non-serializable types.
-    
-    Args:
-        obj: Object to make JSON-serializable
-        visited: Set of object IDs already visited (to detect circular references)
-    """
-    if visited is None:
-        visited = set()
-    
-    # Handle circular references by tracking visited objects
-    # Use object ID for mutable types (dict, list), value for immutable types
-    if isinstance(obj, (dict, list)):
-        obj_id = id(obj)
-        if obj_id in visited:
-            return "<circular reference>"
-        visited.add(obj_id)
-    
-    try:
-        if isinstance(obj, dict):
-            result = {}
-            for k, v in obj.items():
-                # Ensure key is string
-                key = str(k) if not isinstance(k, str) else k
-                result[key] = _make_json_serializable(v, visited.copy())
-            return result
-        elif isinstance(obj, (list, tuple)):
-            return [_make_json_serializable(item, visited.copy()) for item in obj]
-        elif isinstance(obj, (str, int, float, bool, type(None))):
-            return obj
-        else:
-            # Try to serialize, fallback to string representation
-            try:
-                json.dumps(obj)
-                return obj
-            except (TypeError, ValueError):
-                # Non-serializable type - convert to string
-                return str(obj)
-    finally:
-        # Clean up visited set for mutable types
-        if isinstance(obj, (dict, list)):
-            visited.discard(id(obj))
-
-
 def _now_iso() -> str:
     from solarhub.timezone_utils import now_configured_iso
     return now_configured_iso()
@@ -84,6 +51,7 @@ def create_api(solar_app) -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["ETag"],
     )
     
     # Add request logging middleware
@@ -103,6 +71,238 @@ def create_api(solar_app) -> FastAPI:
         """Health check endpoint to test if API server is working."""
         return {"status": "ok", "message": "API server is running", "timestamp": _now_iso()}
     
+    def _snapshot_cacheable(content: Any) -> bool:
+        """Error responses are rebuilt on the next request instead of being cached."""
+        return not (isinstance(content, dict) and (content.get("status") == "error" or "error" in content))
+
+    def _now_snapshot(fn):
+        """
+        Serve a "now" endpoint from the app's per-poll-cycle snapshot cache.
+
+        The handler runs at most once per polling cycle for each query; every other
+        request gets the pre-serialized body, or 304 when If-None-Match matches its ETag.
+        """
+        params = [p.replace(kind=inspect.Parameter.KEYWORD_ONLY)
+                  for p in inspect.signature(fn).parameters.values()]
+
+        @functools.wraps(fn)
+        def endpoint(request: Request, **kwargs):
+            cache = getattr(solar_app, 'snapshot_cache', None)
+            if cache is None:
+                return fn(**kwargs)
+            key = (fn.__name__, tuple(sorted(kwargs.items())))
+            snap = cache.get(key, lambda: fn(**kwargs), _snapshot_cacheable)
+            headers = {"ETag": snap.etag, "Cache-Control": "no-cache"}
+            if etag_matches(request.headers.get("if-none-match"), snap.etag):
+                cache.not_modified += 1
+                return Response(status_code=304, headers=headers)
+            return Response(content=snap.body, media_type="application/json", headers=headers)
+
+        endpoint.__signature__ = inspect.Signature(
+            [inspect.Parameter("request", inspect.Parameter.KEYWORD_ONLY, annotation=Request)] + params)
+        return endpoint
+
+    history_queries: Dict[str, HistoryQuery] = {}
+
+    def _history() -> HistoryQuery:
+        """Shared history query layer for the current database."""
+        path = solar_app.logger.path
+        hq = history_queries.get(path)
+        if hq is None:
+            hq = history_queries[path] = HistoryQuery(path)
+        return hq
+
+    # (response field, history metric, decimals) for hourly energy rows
+    hourly_energy_fields = (
+        ("solar", "pv_energy_kwh", 3),
+        ("load", "load_energy_kwh", 3),
+        ("battery_charge", "batt_charge_kwh", 3),
+        ("battery_discharge", "batt_discharge_kwh", 3),
+        ("grid_import", "grid_import_kwh", 3),
+        ("grid_export", "grid_export_kwh", 3),
+        ("avg_solar_power_w", "pv_power_w", 0),
+        ("avg_load_power_w", "load_power_w", 0),
+        ("avg_battery_power_w", "batt_power_w", 0),
+        ("avg_grid_power_w", "grid_power_w", 0),
+    )
+
+    def _hourly_energy_rows(inverter_id: Optional[str], start_time: datetime,
+                            end_time: datetime) -> Dict[str, Dict[str, Any]]:
+        """Hourly energy/average power keyed by 'HH:00' (inverter_id None/'all' sums all inverters)."""
+        entity_ids = None if inverter_id in (None, "", "all", "ALL") else [inverter_id]
+        res = _history().query("inverter", entity_ids, [f[1] for f in hourly_energy_fields],
+                               start_time, end_time, bucket=3600)
+        series = res["series"]
+        rows: Dict[str, Dict[str, Any]] = {}
+        for i, ts in enumerate(res["ts"]):
+            if all(series[m][i] is None for _, m, _ in hourly_energy_fields):
+                continue
+            row = _hourly_energy_row(datetime.fromtimestamp(ts, tz=start_time.tzinfo),
+                                     {m: series[m][i] for _, m, _ in hourly_energy_fields}, res["count"][i])
+            rows[row["time"]] = row
+        return rows
+
+    def _hourly_energy_row(local: datetime, values: Optional[Dict[str, Any]] = None,
+                           sample_count: int = 0) -> Dict[str, Any]:
+        """One hourly energy row; without values it is the zero row of an hour without data."""
+        row = {
+            "time": local.strftime('%H:00'),
+            "date_hour": local.strftime('%Y-%m-%d %H:00'),
+            "date": local.strftime('%Y-%m-%d'),
+            "hour": local.hour,
+        }
+        for field_name, metric, ndigits in hourly_energy_fields:
+            value = (values or {}).get(metric) or 0
+            row[field_name] = round(value, ndigits) if ndigits else round(value)
+        row["sample_count"] = sample_count
+        return row
+
+    def _hourly_energy_day(inverter_id: Optional[str], day_start: datetime) -> List[Dict[str, Any]]:
+        """All 24 hours of a local day, as ensure_24_hour_data returned them (missing hours are zero)."""
+        by_hour = _hourly_energy_rows(inverter_id, day_start, day_start + timedelta(days=1))
+        return [by_hour.get(f"{hour:02d}:00") or _hourly_energy_row(day_start.replace(hour=hour))
+                for hour in range(24)]
+
+    @app.get("/api/diagnostics")
+    def api_diagnostics() -> Dict[str, Any]:
+        """Runtime performance metrics (database write pipeline, queues)."""
+        try:
+            result: Dict[str, Any] = {"timestamp": _now_iso()}
+            logger = getattr(solar_app, 'logger', None)
+            if logger is not None and hasattr(logger, 'get_write_statistics'):
+                result["db_writer"] = logger.get_write_statistics()
+            if logger is not None and hasattr(logger, 'get_rollup_statistics'):
+                result["rollups"] = logger.get_rollup_statistics()
+            if logger is not None and hasattr(logger, 'get_migration_statistics'):
+                result["migrations"] = logger.get_migration_statistics()
+            if logger is not None and hasattr(logger, 'get_retention_statistics'):
+                result["retention"] = logger.get_retention_statistics()
+            if hasattr(solar_app, 'command_queue'):
+                result["command_queue"] = solar_app.command_queue.get_statistics()
+            if getattr(solar_app, 'mqtt', None) is not None and hasattr(solar_app.mqtt, 'gate'):
+                result["mqtt_publish"] = solar_app.mqtt.gate.get_statistics()
+            if getattr(solar_app, 'ha', None) is not None and hasattr(solar_app.ha, 'outbox'):
+                result["ha_discovery"] = solar_app.ha.outbox.get_statistics()
+            if history_queries:
+                result["history_query"] = {path: hq.get_statistics() for path, hq in history_queries.items()}
+            if getattr(solar_app, 'snapshot_cache', None) is not None:
+                result["snapshot_cache"] = solar_app.snapshot_cache.get_statistics()
+            if getattr(solar_app, 'live_stream', None) is not None:
+                result["live_stream"] = solar_app.live_stream.get_statistics()
+            if getattr(solar_app, 'poll_scheduler', None) is not None:
+                result["polling"] = solar_app.poll_scheduler.get_statistics()
+            shadows = {rt.cfg.id: rt.adapter.register_shadow.get_statistics()
+                       for rt in getattr(solar_app, 'inverters', None) or []
+                       if getattr(rt.adapter, 'register_shadow', None) is not None}
+            if shadows:
+                result["register_shadow"] = shadows
+            actors = {rt.cfg.id: {**rt.actor.get_statistics(),
+                                  "client_recreations": getattr(rt.adapter, 'client_recreations', 0)}
+                      for rt in getattr(solar_app, 'inverters', None) or [] if getattr(rt, 'actor', None) is not None}
+            if actors:
+                result["device_actors"] = actors
+            write_plans = {rt.cfg.id: rt.adapter.write_plan_stats.get_statistics()
+                           for rt in getattr(solar_app, 'inverters', None) or []
+                           if getattr(rt.adapter, 'write_plan_stats', None) is not None}
+            if write_plans:
+                result["write_plans"] = write_plans
+            result["clearsky_cache"] = get_clearsky_cache().get_statistics()
+            read_pools = get_read_pool_statistics()
+            if read_pools:
+                result["read_pools"] = read_pools
+            logging_stats = get_logging_statistics()
+            if logging_stats:
+                result["logging"] = logging_stats
+            return result
+        except Exception as e:
+            log.error(f"Error in diagnostics endpoint: {e}", exc_info=True)
+            return {"status": "error", "error": str(e)}
+    
+    @app.get("/api/stream")
+    async def api_stream(topics: Optional[str] = None):
+        """
+        Server-sent events: one delta frame per poll cycle after an initial snapshot.
+
+        ``topics`` is a comma-separated filter of inverter, array, battery, meter and
+        home, optionally narrowed to one entity (``inverter:inv1``).
+        """
+        hub = getattr(solar_app, 'live_stream', None)
+        if hub is None:
+            return JSONResponse({"status": "error", "error": "Live stream not available"}, status_code=503)
+        try:
+            topic_filter = parse_topics(topics)
+        except ValueError as e:
+            return JSONResponse({"status": "error", "error": str(e)}, status_code=400)
+
+        async def events():
+            sub = hub.subscribe(topic_filter)
+            try:
+                yield "retry: 3000\n\n"
+                while True:
+                    try:
+                        message = await asyncio.wait_for(sub.get(), timeout=15.0)
+                    except asyncio.TimeoutError:
+                        yield ": keepalive\n\n"
+                        continue
+                    if message is None:
+                        break
+                    seq, kind, body = message
+                    yield f"id: {seq}\nevent: {kind}\ndata: {body}\n\n"
+            finally:
+                hub.unsubscribe(sub)
+
+        return StreamingResponse(events(), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    @app.websocket("/api/ws")
+    async def api_ws(websocket: WebSocket, topics: Optional[str] = None):
+        """
+        WebSocket live telemetry: the same frames as /api/stream. The client may send
+        ``{"topics": [...]}`` at any time to change its filter (answered with a snapshot).
+        """
+        hub = getattr(solar_app, 'live_stream', None)
+        try:
+            topic_filter = parse_topics(topics)
+        except ValueError as e:
+            await websocket.close(code=1008, reason=str(e))
+            return
+        if hub is None:
+            await websocket.close(code=1013, reason="Live stream not available")
+            return
+        await websocket.accept()
+        sub = hub.subscribe(topic_filter)
+
+        async def receive_filters():
+            while True:
+                msg = await websocket.receive_json()
+                try:
+                    sub.set_topics(parse_topics(msg.get("topics") if isinstance(msg, dict) else None))
+                except ValueError as e:
+                    await websocket.send_json({"type": "error", "error": str(e)})
+
+        receiver = asyncio.create_task(receive_filters())
+        try:
+            while not receiver.done():
+                getter = asyncio.ensure_future(sub.get())
+                await asyncio.wait({getter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    break
+                message = getter.result()
+                if message is None:
+                    await websocket.close(code=1013, reason="Client too slow")
+                    break
+                await websocket.send_text(message[2])
+        except WebSocketDisconnect:
+            pass
+        except Exception as e:
+            log.debug(f"Live stream websocket closed: {e}")
+        finally:
+            receiver.cancel()
+            if receiver.done() and not receiver.cancelled():
+                receiver.exception()  # disconnect seen by the reader; nothing to report
+            hub.unsubscribe(sub)
+
     @app.get("/api/test")
     def api_test() -> Dict[str, Any]:
         """Test endpoint to verify API server functionality."""
@@ -118,6 +318,7 @@ def create_api(solar_app) -> FastAPI:
             return {"status": "error", "error": str(e)}
     
     @app.get("/api/battery/now")
+    @_now_snapshot
     def api_battery_now(bank_id: str = None) -> Dict[str, Any]:
         """Return latest battery bank telemetry.
         
@@ -302,6 +503,29 @@ def create_api(solar_app) -> FastAPI:
             log.error(f"Error in /api/battery/configured_banks: {e}", exc_info=True)
             return {"status": "error", "error": str(e), "configured_banks": []}
     
+    @app.get("/api/battery/cells/history")
+    def api_battery_cells_history(bank_id: str, hours: int = 24, power: Optional[int] = None) -> Dict[str, Any]:
+        """Cell voltage/temperature/SoC history of a battery bank, one columnar block per unit."""
+        try:
+            from solarhub.timezone_utils import now_configured
+            end_time = now_configured()
+            start_time = end_time - timedelta(hours=hours)
+            with read_connection(solar_app.logger.path) as conn:
+                frames = read_cell_frames(conn.cursor(), bank_id, start_time, end_time, power=power)
+            units = []
+            for unit_power in sorted(set(frames.power.tolist())):
+                units.append({"power": unit_power, **frames.unit(unit_power).to_columns()})
+            return {
+                "status": "ok",
+                "bank_id": bank_id,
+                "start": start_time.isoformat(),
+                "end": end_time.isoformat(),
+                "units": units,
+            }
+        except Exception as e:
+            log.error(f"Error in /api/battery/cells/history: {e}", exc_info=True)
+            return {"status": "error", "error": str(e), "units": []}
+    
     @app.get("/api/meters")
     def api_meters() -> Dict[str, Any]:
         """Return list of configured meters."""
@@ -316,6 +540,7 @@ def create_api(solar_app) -> FastAPI:
             return {"status": "error", "error": str(e), "meters": []}
     
     @app.get("/api/meter/now")
+    @_now_snapshot
     def api_meter_now(meter_id: str = "all") -> Dict[str, Any]:
         """Return latest meter telemetry.
         If meter_id is 'all' or not provided, returns the first available meter.
@@ -346,11 +571,60 @@ def create_api(solar_app) -> FastAPI:
             except Exception:
                 data = tel.dict()  # pydantic v1 fallback
             
-            return {"status": "ok", "meter": _make_json_serializable(data)}
+            return {"status": "ok", "meter": to_jsonable(data)}
         except Exception as e:
             log.error(f"Error in /api/meter/now: {e}", exc_info=True)
             return {"status": "error", "error": str(e), "meter": None}
     
+    def _meter_period_summary(meter_id: str, start_date_str: str, end_date_str: str,
+                              group_by: str) -> List[Dict[str, Any]]:
+        """Meter import/export per calendar week/month/year from the daily table, in one query."""
+        from solarhub.timezone_utils import get_configured_timezone
+        tz = get_configured_timezone()
+        
+        def local_midnight(day: str) -> datetime:
+            dt = datetime.strptime(day, '%Y-%m-%d')
+            return tz.localize(dt) if hasattr(tz, 'localize') else dt.replace(tzinfo=tz)
+        
+        start_dt = local_midnight(start_date_str)
+        end_dt = local_midnight(end_date_str) + timedelta(days=1)
+        hq = _history()
+        metrics = ["grid_import_kwh", "grid_export_kwh", "grid_import_power_w", "grid_export_power_w"]
+        grouped = hq.query("meter", [meter_id], metrics, start_dt, end_dt, bucket=group_by, agg="max")
+        daily = hq.query("meter", [meter_id], metrics[:1], start_dt, end_dt, bucket="day")
+        
+        # Days with data, assigned to their period
+        days: Dict[int, List[str]] = {}
+        for ts, value in zip(daily["ts"], daily["series"]["grid_import_kwh"]):
+            if value is not None:
+                idx = bisect.bisect_right(grouped["ts"], ts) - 1
+                days.setdefault(idx, []).append(datetime.fromtimestamp(ts, tz=tz).strftime('%Y-%m-%d'))
+        
+        series = grouped["series"]
+        result = []
+        for idx, ts in enumerate(grouped["ts"]):
+            if idx not in days:
+                continue
+            period_start = datetime.fromtimestamp(ts, tz=tz)
+            import_kwh = series["grid_import_kwh"][idx] or 0.0
+            export_kwh = series["grid_export_kwh"][idx] or 0.0
+            entry: Dict[str, Any] = {}
+            if group_by == "week":
+                entry["period_start"] = period_start.strftime('%Y-%m-%d')
+                entry["period_end"] = (period_start + timedelta(days=6)).strftime('%Y-%m-%d')
+            else:
+                entry["period"] = period_start.strftime('%Y-%m' if group_by == "month" else '%Y')
+            entry.update({
+                "import_energy_kwh": import_kwh,
+                "export_energy_kwh": export_kwh,
+                "net_energy_kwh": import_kwh - export_kwh,
+                "max_import_power_w": series["grid_import_power_w"][idx] or None,
+                "max_export_power_w": series["grid_export_power_w"][idx] or None,
+                "days": days[idx],
+            })
+            result.append(entry)
+        return result
+
     @app.get("/api/meter/{meter_id}/summary")
     def api_meter_summary(
         meter_id: str,
@@ -421,121 +695,11 @@ def create_api(solar_app) -> FastAPI:
             else:
                 return {"status": "error", "error": f"Invalid period: {period}"}
             
-            # Get daily summaries from database
-            daily_data = solar_app.logger.get_meter_daily_summary(meter_id, start_date_str, end_date_str)
-            
-            # Group by requested period if needed
-            if group_by == "day":
-                grouped_data = daily_data
-            elif group_by == "week":
-                # Group by week
-                grouped_data = {}
-                for entry in daily_data:
-                    date_obj = datetime.strptime(entry["day"], "%Y-%m-%d").date()
-                    week_start = date_obj - timedelta(days=date_obj.weekday())
-                    week_key = week_start.strftime('%Y-%m-%d')
-                    if week_key not in grouped_data:
-                        grouped_data[week_key] = {
-                            "period_start": week_key,
-                            "period_end": (week_start + timedelta(days=6)).strftime('%Y-%m-%d'),
-                            "import_energy_kwh": 0.0,
-                            "export_energy_kwh": 0.0,
-                            "net_energy_kwh": 0.0,
-                            "max_import_power_w": None,
-                            "max_export_power_w": None,
-                            "days": []
-                        }
-                    grouped_data[week_key]["import_energy_kwh"] += entry["import_energy_kwh"]
-                    grouped_data[week_key]["export_energy_kwh"] += entry["export_energy_kwh"]
-                    grouped_data[week_key]["net_energy_kwh"] += entry["net_energy_kwh"]
-                    if entry["max_import_power_w"]:
-                        if grouped_data[week_key]["max_import_power_w"] is None:
-                            grouped_data[week_key]["max_import_power_w"] = entry["max_import_power_w"]
-                        else:
-                            grouped_data[week_key]["max_import_power_w"] = max(
-                                grouped_data[week_key]["max_import_power_w"], entry["max_import_power_w"]
-                            )
-                    if entry["max_export_power_w"]:
-                        if grouped_data[week_key]["max_export_power_w"] is None:
-                            grouped_data[week_key]["max_export_power_w"] = entry["max_export_power_w"]
-                        else:
-                            grouped_data[week_key]["max_export_power_w"] = max(
-                                grouped_data[week_key]["max_export_power_w"], entry["max_export_power_w"]
-                            )
-                    grouped_data[week_key]["days"].append(entry["day"])
-                grouped_data = list(grouped_data.values())
-            elif group_by == "month":
-                # Group by month
-                grouped_data = {}
-                for entry in daily_data:
-                    date_obj = datetime.strptime(entry["day"], "%Y-%m-%d").date()
-                    month_key = date_obj.strftime('%Y-%m')
-                    if month_key not in grouped_data:
-                        grouped_data[month_key] = {
-                            "period": month_key,
-                            "import_energy_kwh": 0.0,
-                            "export_energy_kwh": 0.0,
-                            "net_energy_kwh": 0.0,
-                            "max_import_power_w": None,
-                            "max_export_power_w": None,
-                            "days": []
-                        }
-                    grouped_data[month_key]["import_energy_kwh"] += entry["import_energy_kwh"]
-                    grouped_data[month_key]["export_energy_kwh"] += entry["export_energy_kwh"]
-                    grouped_data[month_key]["net_energy_kwh"] += entry["net_energy_kwh"]
-                    if entry["max_import_power_w"]:
-                        if grouped_data[month_key]["max_import_power_w"] is None:
-                            grouped_data[month_key]["max_import_power_w"] = entry["max_import_power_w"]
-                        else:
-                            grouped_data[month_key]["max_import_power_w"] = max(
-                                grouped_data[month_key]["max_import_power_w"], entry["max_import_power_w"]
-                            )
-                    if entry["max_export_power_w"]:
-                        if grouped_data[month_key]["max_export_power_w"] is None:
-                            grouped_data[month_key]["max_export_power_w"] = entry["max_export_power_w"]
-                        else:
-                            grouped_data[month_key]["max_export_power_w"] = max(
-                                grouped_data[month_key]["max_export_power_w"], entry["max_export_power_w"]
-                            )
-                    grouped_data[month_key]["days"].append(entry["day"])
-                grouped_data = list(grouped_data.values())
-            elif group_by == "year":
-                # Group by year
-                grouped_data = {}
-                for entry in daily_data:
-                    date_obj = datetime.strptime(entry["day"], "%Y-%m-%d").date()
-                    year_key = str(date_obj.year)
-                    if year_key not in grouped_data:
-                        grouped_data[year_key] = {
-                            "period": year_key,
-                            "import_energy_kwh": 0.0,
-                            "export_energy_kwh": 0.0,
-                            "net_energy_kwh": 0.0,
-                            "max_import_power_w": None,
-                            "max_export_power_w": None,
-                            "days": []
-                        }
-                    grouped_data[year_key]["import_energy_kwh"] += entry["import_energy_kwh"]
-                    grouped_data[year_key]["export_energy_kwh"] += entry["export_energy_kwh"]
-                    grouped_data[year_key]["net_energy_kwh"] += entry["net_energy_kwh"]
-                    if entry["max_import_power_w"]:
-                        if grouped_data[year_key]["max_import_power_w"] is None:
-                            grouped_data[year_key]["max_import_power_w"] = entry["max_import_power_w"]
-                        else:
-                            grouped_data[year_key]["max_import_power_w"] = max(
-                                grouped_data[year_key]["max_import_power_w"], entry["max_import_power_w"]
-                            )
-                    if entry["max_export_power_w"]:
-                        if grouped_data[year_key]["max_export_power_w"] is None:
-                            grouped_data[year_key]["max_export_power_w"] = entry["max_export_power_w"]
-                        else:
-                            grouped_data[year_key]["max_export_power_w"] = max(
-                                grouped_data[year_key]["max_export_power_w"], entry["max_export_power_w"]
-                            )
-                    grouped_data[year_key]["days"].append(entry["day"])
-                grouped_data = list(grouped_data.values())
+            # Daily rows as stored; longer periods are bucketed by the history query layer
+            if group_by in ("week", "month", "year"):
+                grouped_data = _meter_period_summary(meter_id, start_date_str, end_date_str, group_by)
             else:
-                grouped_data = daily_data
+                grouped_data = solar_app.logger.get_meter_daily_summary(meter_id, start_date_str, end_date_str)
             
             # Calculate totals
             total_import = sum(d.get("import_energy_kwh", 0) for d in grouped_data)
@@ -569,7 +733,7 @@ def create_api(solar_app) -> FastAPI:
         Returns this month vs same month last year for each of the last N months.
         """
         try:
-            from datetime import datetime, timedelta
+            from datetime import timedelta
             from solarhub.timezone_utils import now_configured
             
             if not solar_app or not hasattr(solar_app, 'logger'):
@@ -681,6 +845,7 @@ def create_api(solar_app) -> FastAPI:
             return {"status": "error", "error": str(e)}
     
     @app.get("/api/arrays/{array_id}/now")
+    @_now_snapshot
     def api_array_now(array_id: str, system_id: Optional[str] = None) -> Dict[str, Any]:
         """Get consolidated 'now' telemetry for an array with hierarchy structure."""
         try:
@@ -920,7 +1085,7 @@ def create_api(solar_app) -> FastAPI:
             if not plan:
                 return {"status": "ok", "plan": None, "message": "No split plan available yet"}
             
-            return {"status": "ok", "plan": _make_json_serializable(plan)}
+            return {"status": "ok", "plan": to_jsonable(plan)}
         except Exception as e:
             log.error(f"Error in /api/arrays/{array_id}/scheduler/plan: {e}", exc_info=True)
             return {"status": "error", "error": str(e)}
@@ -931,6 +1096,7 @@ def create_api(solar_app) -> FastAPI:
         return api_forecast(inverter_id="all", array_id=array_id)
     
     @app.get("/api/system/now")
+    @_now_snapshot
     def api_system_now(
         period: str = "today",
         start_date: Optional[str] = None,
@@ -1328,7 +1494,6 @@ def create_api(solar_app) -> FastAPI:
                     from solarhub.billing_scheduler import _compute_daily_snapshot, _get_current_billing_month
                     from solarhub.timezone_utils import now_configured, get_configured_timezone
                     from solarhub.billing_engine import _aggregate_hourly_for_billing_month
-                    import sqlite3
                     
                     now = now_configured()
                     today = now.date()
@@ -1338,20 +1503,19 @@ def create_api(solar_app) -> FastAPI:
                     snapshot = None
                     if billing_cfg:
                         try:
-                            conn = sqlite3.connect(solar_app.logger.path)
-                            cur = conn.cursor()
-                            # Query by home_id if available, otherwise fallback to site_id
-                            home_id = solar_app.cfg.home.id if solar_app.cfg.home else "home"
-                            cur.execute("""
-                                SELECT bill_final_rs_to_date, import_off_kwh, export_off_kwh, 
-                                       import_peak_kwh, export_peak_kwh, billing_month_id
-                                FROM billing_daily
-                                WHERE (home_id = ? OR (home_id IS NULL AND site_id = ?)) AND date = ?
-                                ORDER BY generated_at_ts DESC
-                                LIMIT 1
-                            """, (home_id, "default", today_str))
-                            row = cur.fetchone()
-                            conn.close()
+                            with read_connection(solar_app.logger.path) as conn:
+                                cur = conn.cursor()
+                                # Query by home_id if available, otherwise fallback to site_id
+                                home_id = solar_app.cfg.home.id if solar_app.cfg.home else "home"
+                                cur.execute("""
+                                    SELECT bill_final_rs_to_date, import_off_kwh, export_off_kwh, 
+                                           import_peak_kwh, export_peak_kwh, billing_month_id
+                                    FROM billing_daily
+                                    WHERE (home_id = ? OR (home_id IS NULL AND site_id = ?)) AND date = ?
+                                    ORDER BY generated_at_ts DESC
+                                    LIMIT 1
+                                """, (home_id, "default", today_str))
+                                row = cur.fetchone()
                             
                             if row:
                                 # Use data from database (scheduler already calculated today)
@@ -1584,8 +1748,7 @@ def create_api(solar_app) -> FastAPI:
                                 elif isinstance(inv_tel_dict, dict):
                                     tel_dict = inv_tel_dict
                                 else:
-                                    import json
-                                    tel_dict = json.loads(json.dumps(inv_tel_dict, default=str))
+                                    tel_dict = to_jsonable(inv_tel_dict)
                                 
                                 # Extract only safe primitive fields
                                 inverter_data["telemetry"] = {
@@ -1728,12 +1891,10 @@ def create_api(solar_app) -> FastAPI:
                         if "array_id" in array_data:
                             array_data["system_id"] = target_system_id
             
-            # Final serialization check - ensure everything is JSON-serializable
-            # This will catch any circular references before FastAPI tries to serialize
+            # Final conversion - plain JSON types, circular references replaced by a marker,
+            # so FastAPI never has to walk the original objects
             try:
-                import json
-                # Test serialization to catch any circular references
-                json.dumps(home_dict, default=str)
+                home_dict = to_jsonable(home_dict)
             except (TypeError, ValueError) as e:
                 log.error(f"Response contains non-serializable data: {e}")
                 # Fallback: return minimal response without hierarchy data
@@ -1764,6 +1925,7 @@ def create_api(solar_app) -> FastAPI:
             return {"status": "error", "error": str(e)}
     
     @app.get("/api/now")
+    @_now_snapshot
     def api_now(inverter_id: str = None, array_id: Optional[str] = None) -> Dict[str, Any]:
         """Get current telemetry data. 
         If inverter_id is None, empty string, or 'all', returns consolidated sums across all inverters.
@@ -1802,18 +1964,11 @@ def create_api(solar_app) -> FastAPI:
                         inverter_ids = [inv.id for inv in solar_app.cfg.inverters if getattr(inv, 'id', None)]
                 # Fallback to DB if needed
                 if not inverter_ids and solar_app and getattr(solar_app, 'logger', None) and getattr(solar_app.logger, 'path', None):
-                    import sqlite3
-                    try:
-                        conn = sqlite3.connect(solar_app.logger.path)
+                    with read_connection(solar_app.logger.path) as conn:
                         cur = conn.cursor()
                         cur.execute("SELECT DISTINCT inverter_id FROM energy_samples ORDER BY inverter_id")
                         rows = cur.fetchall()
                         inverter_ids = [r[0] for r in rows if r and r[0]]
-                    finally:
-                        try:
-                            conn.close()
-                        except Exception:
-                            pass
 
                 totals: Dict[str, Any] = {
                     "pv_power_w": 0.0,
@@ -2109,7 +2264,7 @@ def create_api(solar_app) -> FastAPI:
                 "discharge_end_soc_1": extra.get("discharge_end_soc_1"),
                 
                 # Include extra dict for any additional fields - make it JSON-serializable
-                "extra": _make_json_serializable(extra),
+                "extra": to_jsonable(extra),
             }
             
             # If mapper is available, ensure all standardized fields are present
@@ -2173,7 +2328,7 @@ def create_api(solar_app) -> FastAPI:
                     normalized["production_type"] = "Hybrid"
             
             # Make the entire normalized dict JSON-serializable to prevent circular references
-            normalized = _make_json_serializable(normalized)
+            normalized = to_jsonable(normalized)
             
             # Add hierarchy information to response
             if hasattr(solar_app, 'hierarchy_systems') and solar_app.hierarchy_systems:
@@ -2204,7 +2359,7 @@ def create_api(solar_app) -> FastAPI:
             }
 
     @app.get("/api/forecast")
-    def api_forecast(inverter_id: str = "senergy1", array_id: Optional[str] = None) -> Dict[str, Any]:
+    async def api_forecast(inverter_id: str = "senergy1", array_id: Optional[str] = None) -> Dict[str, Any]:
         """Get PV forecast data for today. If inverter_id is 'all', sum forecasts across inverters.
         If array_id is provided, returns forecast for that array."""
         try:
@@ -2224,7 +2379,6 @@ def create_api(solar_app) -> FastAPI:
             
             # Try to get real forecast data from smart scheduler
             if scheduler and hasattr(scheduler, 'weather'):
-                import asyncio
                 import pandas as pd
                 
                 # Get current time in the scheduler's timezone
@@ -2232,19 +2386,13 @@ def create_api(solar_app) -> FastAPI:
                 
                 # Get weather factors and enhanced forecast
                 try:
-                    # Run async function in sync context
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    
                     # Get weather factors
-                    factors = loop.run_until_complete(scheduler.weather.day_factors())
+                    factors = await scheduler.weather.day_factors()
                     
                     # Get enhanced forecast if available
                     enhanced_forecast = None
                     if hasattr(scheduler.weather, 'get_enhanced_forecast'):
-                        enhanced_forecast = loop.run_until_complete(scheduler.weather.get_enhanced_forecast(days=1))
-                    
-                    loop.close()
+                        enhanced_forecast = await scheduler.weather.get_enhanced_forecast(days=1)
                     
                     # Generate hourly forecast data
                     data = []
@@ -2417,7 +2565,6 @@ def create_api(solar_app) -> FastAPI:
         try:
             log.info(f"API /api/overview called for inverter_id: {inverter_id}, hours: {hours}")
             if solar_app.logger and hasattr(solar_app.logger, 'path'):
-                import sqlite3
                 from datetime import datetime, timedelta
                 
                 # Calculate time range
@@ -2433,61 +2580,54 @@ def create_api(solar_app) -> FastAPI:
                         inverter_ids = [inv.id for inv in solar_app.cfg.inverters if getattr(inv, 'id', None)]
                     # Fallback to DB
                     if not inverter_ids:
-                        try:
-                            conn = sqlite3.connect(solar_app.logger.path)
+                        with read_connection(solar_app.logger.path) as conn:
                             cur = conn.cursor()
                             cur.execute("SELECT DISTINCT inverter_id FROM energy_samples ORDER BY inverter_id")
                             rows = cur.fetchall()
                             inverter_ids = [r[0] for r in rows if r and r[0]]
-                        finally:
-                            try:
-                                conn.close()
-                            except Exception:
-                                pass
                 else:
                     inverter_ids = [inverter_id]
                 
                 # Query database for historical data
-                conn = sqlite3.connect(solar_app.logger.path)
-                cursor = conn.cursor()
+                with read_connection(solar_app.logger.path) as conn:
+                    cursor = conn.cursor()
                 
-                if inverter_id in (None, "", "all", "ALL"):
-                    # Aggregate across all inverters
-                    query = """
-                    SELECT 
-                        ts,
-                        pv_power_w,
-                        load_power_w,
-                        soc,
-                        batt_voltage_v,
-                        batt_current_a,
-                        grid_power_w
-                    FROM energy_samples 
-                    WHERE ts >= ? AND ts <= ?
-                    AND (pv_power_w IS NOT NULL OR load_power_w IS NOT NULL OR grid_power_w IS NOT NULL)
-                    ORDER BY ts
-                    """
-                    cursor.execute(query, (start_time.isoformat(), end_time.isoformat()))
-                else:
-                    # Single inverter
-                    query = """
-                    SELECT 
-                        ts,
-                        pv_power_w,
-                        load_power_w,
-                        soc,
-                        batt_voltage_v,
-                        batt_current_a,
-                        grid_power_w
-                    FROM energy_samples 
-                    WHERE inverter_id = ? AND ts >= ? AND ts <= ?
-                    AND (pv_power_w IS NOT NULL OR load_power_w IS NOT NULL OR grid_power_w IS NOT NULL)
-                    ORDER BY ts
-                    """
-                    cursor.execute(query, (inverter_id, start_time.isoformat(), end_time.isoformat()))
+                    if inverter_id in (None, "", "all", "ALL"):
+                        # Aggregate across all inverters
+                        query = """
+                        SELECT 
+                            ts,
+                            pv_power_w,
+                            load_power_w,
+                            soc,
+                            batt_voltage_v,
+                            batt_current_a,
+                            grid_power_w
+                        FROM energy_samples 
+                        WHERE ts >= ? AND ts <= ?
+                        AND (pv_power_w IS NOT NULL OR load_power_w IS NOT NULL OR grid_power_w IS NOT NULL)
+                        ORDER BY ts
+                        """
+                        cursor.execute(query, (start_time.isoformat(), end_time.isoformat()))
+                    else:
+                        # Single inverter
+                        query = """
+                        SELECT 
+                            ts,
+                            pv_power_w,
+                            load_power_w,
+                            soc,
+                            batt_voltage_v,
+                            batt_current_a,
+                            grid_power_w
+                        FROM energy_samples 
+                        WHERE inverter_id = ? AND ts >= ? AND ts <= ?
+                        AND (pv_power_w IS NOT NULL OR load_power_w IS NOT NULL OR grid_power_w IS NOT NULL)
+                        ORDER BY ts
+                        """
+                        cursor.execute(query, (inverter_id, start_time.isoformat(), end_time.isoformat()))
                 
-                rows = cursor.fetchall()
-                conn.close()
+                    rows = cursor.fetchall()
                 
                 # Process data into hourly buckets
                 hourly_data = {}
@@ -2603,13 +2743,41 @@ def create_api(solar_app) -> FastAPI:
         
         return {"inverter_id": inverter_id, "overview": data, "source": "mock"}
 
+    @app.get("/api/history/series")
+    def api_history_series(metrics: str, scope: str = "inverter", entity_id: Optional[str] = None,
+                           start: Optional[str] = None, end: Optional[str] = None,
+                           bucket: str = "3600", agg: str = "avg", combine: str = "sum") -> Dict[str, Any]:
+        """Bucketed multi-metric history in one columnar response.
+        
+        metrics and entity_id are comma-separated (no entity_id = all entities of the scope);
+        start/end are ISO timestamps (default: last 24 hours); bucket is a width in seconds
+        or day/week/month/year. The coarsest table that can answer is used.
+        """
+        try:
+            if not solar_app.logger or not hasattr(solar_app.logger, 'path'):
+                return {"status": "error", "error": "No database available"}
+            from solarhub.timezone_utils import now_configured, parse_iso_to_configured
+            end_time = parse_iso_to_configured(end) if end else now_configured()
+            start_time = parse_iso_to_configured(start) if start else end_time - timedelta(hours=24)
+            entity_ids = [e for e in (entity_id or "").split(",") if e and e.lower() != "all"] or None
+            metric_list = [m.strip() for m in metrics.split(",") if m.strip()]
+            bucket_spec = int(bucket) if bucket.isdigit() else bucket
+            result = _history().query(scope, entity_ids, metric_list, start_time, end_time,
+                                      bucket=bucket_spec, agg=agg, combine=combine)
+            result["status"] = "ok"
+            return result
+        except ValueError as e:
+            return {"status": "error", "error": str(e)}
+        except Exception as e:
+            log.error(f"Error in /api/history/series: {e}", exc_info=True)
+            return {"status": "error", "error": str(e)}
+
     @app.get("/api/solar-history")
     def api_solar_history(inverter_id: str = "senergy1", hours: int = 24) -> Dict[str, Any]:
         """Get historical solar generation data from database."""
         try:
             log.info(f"API /api/solar-history called for inverter_id: {inverter_id}, hours: {hours}")
             if solar_app.logger and hasattr(solar_app.logger, 'path'):
-                import sqlite3
                 from datetime import datetime, timedelta
                 
                 # Calculate time range
@@ -2617,53 +2785,30 @@ def create_api(solar_app) -> FastAPI:
                 end_time = now_configured()
                 start_time = end_time - timedelta(hours=hours)
                 
-                # Query database for solar generation data
-                conn = sqlite3.connect(solar_app.logger.path)
-                cursor = conn.cursor()
+                # Hourly PV averages across all inverters (sample-weighted), from the
+                # coarsest table that covers the range
+                res = _history().query("inverter", None, ["pv_power_w"], start_time, end_time,
+                                       bucket=3600, combine="mean")
                 
-                query = """
-                SELECT 
-                    ts,
-                    pv_power_w
-                FROM energy_samples 
-                WHERE ts >= ? AND ts <= ?
-                AND pv_power_w IS NOT NULL
-                ORDER BY ts
-                """
-                
-                cursor.execute(query, (start_time.isoformat(), end_time.isoformat()))
-                rows = cursor.fetchall()
-                conn.close()
-                
-                # Process data into hourly buckets
-                hourly_data = {}
-                for row in rows:
-                    ts_str, pv_power_w = row
-                    ts = datetime.fromisoformat(ts_str.replace('Z', '+00:00'))
-                    hour_key = ts.strftime('%H:00')
-                    
-                    # Convert pv_power_w to kW
-                    power_kw = pv_power_w / 1000.0 if pv_power_w else 0
-                    
-                    if hour_key not in hourly_data:
-                        hourly_data[hour_key] = []
-                    hourly_data[hour_key].append(power_kw)
+                # Fold buckets onto the hour of day (ranges over 24h cover some hours twice)
+                sums: Dict[str, List[float]] = {}
+                for ts, count, power in zip(res["ts"], res["count"], res["series"]["pv_power_w"]):
+                    if power is None:
+                        continue
+                    hour_key = datetime.fromtimestamp(ts, tz=end_time.tzinfo).strftime('%H:00')
+                    acc = sums.setdefault(hour_key, [0.0, 0])
+                    weight = count or 1
+                    acc[0] += power * weight
+                    acc[1] += weight
                 
-                # Calculate average power for each hour
                 data = []
                 for hour in range(24):
                     hour_str = f"{hour:02d}:00"
-                    if hour_str in hourly_data:
-                        avg_power = sum(hourly_data[hour_str]) / len(hourly_data[hour_str])
-                        data.append({
-                            "time": hour_str,
-                            "power": round(avg_power * 1000, 0)  # Convert back to watts
-                        })
-                    else:
-                        data.append({
-                            "time": hour_str,
-                            "power": 0
-                        })
+                    acc = sums.get(hour_str)
+                    data.append({
+                        "time": hour_str,
+                        "power": round(acc[0] / acc[1], 0) if acc else 0
+                    })
                 
                 return {
                     "inverter_id": inverter_id,
@@ -2722,17 +2867,14 @@ def create_api(solar_app) -> FastAPI:
             end_time = now_configured()
             start_time = end_time - timedelta(hours=hours)
             
-            # Use energy calculator to get hourly energy data
-            energy_calc = EnergyCalculator(solar_app.logger.path)
-            data = energy_calc.get_hourly_energy_data(inverter_id, start_time, end_time)
-            
+            # Hourly energy from the stored hourly table, with the current hour from rollups
+            by_hour = _hourly_energy_rows(inverter_id, start_time, end_time)
             
             # Format data for API response
             formatted_data = []
             for hour in range(24):
                 hour_str = f"{hour:02d}:00"
-                # Find data for this hour
-                hour_data = next((d for d in data if d['time'] == hour_str), None)
+                hour_data = by_hour.get(hour_str)
                 
                 if hour_data:
                     formatted_data.append({
@@ -2767,7 +2909,7 @@ def create_api(solar_app) -> FastAPI:
             return {
                 "inverter_id": inverter_id,
                 "overview": formatted_data,
-                "source": "energy_calculator"
+                "source": "history_query"
             }
             
         except Exception as e:
@@ -2815,18 +2957,11 @@ def create_api(solar_app) -> FastAPI:
                     inverter_ids = [inv.id for inv in solar_app.cfg.inverters if getattr(inv, 'id', None)]
                 # Fallback to DB if needed
                 if not inverter_ids:
-                    import sqlite3
-                    try:
-                        conn = sqlite3.connect(solar_app.logger.path)
+                    with read_connection(solar_app.logger.path) as conn:
                         cur = conn.cursor()
                         cur.execute("SELECT DISTINCT inverter_id FROM hourly_energy ORDER BY inverter_id")
                         rows = cur.fetchall()
                         inverter_ids = [r[0] for r in rows if r and r[0]]
-                    finally:
-                        try:
-                            conn.close()
-                        except Exception:
-                            pass
                 
                 # Aggregate data from all inverters
                 aggregated_data = {
@@ -2894,17 +3029,11 @@ def create_api(solar_app) -> FastAPI:
 
             # Fallback to database distinct inverter_id
             if (not inverters) and solar_app and getattr(solar_app, 'logger', None) and getattr(solar_app.logger, 'path', None):
-                try:
-                    conn = sqlite3.connect(solar_app.logger.path)
+                with read_connection(solar_app.logger.path) as conn:
                     cur = conn.cursor()
                     cur.execute("SELECT DISTINCT inverter_id FROM energy_samples ORDER BY inverter_id")
                     rows = cur.fetchall()
                     inverters = [{"id": r[0], "name": r[0]} for r in rows if r and r[0]]
-                finally:
-                    try:
-                        conn.close()
-                    except Exception:
-                        pass
 
             return {
                 "inverters": inverters,
@@ -3370,15 +3499,15 @@ def create_api(solar_app) -> FastAPI:
                 # This avoids event loop mismatch issues where client is created in API server's
                 # event loop but used in polling loop's event loop
                 # The client will be created lazily on first poll via _ensure_client_in_current_loop()
+                # Create and add inverter runtime; its device actor starts with the polling scheduler
+                rt_new = InverterRuntime(rt_cfg, adapter)
+                solar_app.inverters.append(rt_new)
+                
                 # Register with command queue so commands work immediately
                 if hasattr(solar_app, 'command_queue'):
-                    solar_app.command_queue.register_adapter(rt_cfg.id, adapter)
+                    solar_app.command_queue.register_adapter(rt_cfg.id, adapter, rt_new.actor)
                     solar_app.command_queue.start()
                 
-                # Create and add inverter runtime
-                rt_new = InverterRuntime(rt_cfg, adapter)
-                solar_app.inverters.append(rt_new)
-                
                 # Subscribe to MQTT command topics for this inverter
                 solar_app._subscribe_command_topics(rt_new)
                 
@@ -3663,88 +3792,15 @@ def create_api(solar_app) -> FastAPI:
             else:
                 target_date = get_configured_start_of_day()
             
-            # Get hourly energy data for the day with timezone handling
-            energy_calc = EnergyCalculator(solar_app.logger.path)
-            start_time = target_date
-            end_time = target_date + timedelta(days=1)
-            
-            # Helper to fetch per-inverter hourly list (24 entries)
-            def fetch_hourly(inv_id: str) -> List[Dict[str, Any]]:
-                return energy_calc.ensure_24_hour_data(inv_id, target_date)
-
-            # Aggregate if requested
-            if inverter_id in (None, "", "all", "ALL"):
-                # Determine inverter list
-                inverter_ids: List[str] = []
-                # Prefer configured list
-                if solar_app and getattr(solar_app, 'cfg', None) and getattr(solar_app.cfg, 'inverters', None):
-                    inverter_ids = [inv.id for inv in solar_app.cfg.inverters if getattr(inv, 'id', None)]
-                # Fallback to DB
-                if not inverter_ids:
-                    try:
-                        conn = sqlite3.connect(solar_app.logger.path)
-                        cur = conn.cursor()
-                        cur.execute("SELECT DISTINCT inverter_id FROM energy_samples ORDER BY inverter_id")
-                        rows = cur.fetchall()
-                        inverter_ids = [r[0] for r in rows if r and r[0]]
-                    finally:
-                        try:
-                            conn.close()
-                        except Exception:
-                            pass
-
-                per_inverter = [fetch_hourly(inv) for inv in inverter_ids] if inverter_ids else []
-
-                # Initialize aggregate structure with 24 empty hours
-                hourly_data: List[Dict[str, Any]] = []
-                if per_inverter:
-                    template = per_inverter[0]
-                    for idx in range(len(template)):
-                        hour_entry = {
-                            "time": template[idx].get("time"),
-                            "solar": 0.0,
-                            "load": 0.0,
-                            # keep split fields for compatibility with UI normalizer
-                            "battery_charge": 0.0,
-                            "battery_discharge": 0.0,
-                            "grid_import": 0.0,
-                            "grid_export": 0.0,
-                        }
-                        # Sum across inverters for this index
-                        for inv_list in per_inverter:
-                            if idx < len(inv_list):
-                                ent = inv_list[idx] or {}
-                                hour_entry["solar"] += float(ent.get("solar", 0) or 0)
-                                hour_entry["load"] += float(ent.get("load", 0) or 0)
-                                hour_entry["battery_charge"] += float(ent.get("battery_charge", 0) or 0)
-                                hour_entry["battery_discharge"] += float(ent.get("battery_discharge", 0) or 0)
-                                hour_entry["grid_import"] += float(ent.get("grid_import", 0) or 0)
-                                hour_entry["grid_export"] += float(ent.get("grid_export", 0) or 0)
-                                # If backend provided net fields, incorporate them by distributing into splits
-                                if "battery" in ent and (ent.get("battery") is not None):
-                                    b = float(ent.get("battery") or 0)
-                                    if b >= 0:
-                                        hour_entry["battery_charge"] += b
-                                    else:
-                                        hour_entry["battery_discharge"] += (-b)
-                                if "grid" in ent and (ent.get("grid") is not None):
-                                    g = float(ent.get("grid") or 0)
-                                    if g >= 0:
-                                        hour_entry["grid_import"] += g
-                                    else:
-                                        hour_entry["grid_export"] += (-g)
-                        hourly_data.append(hour_entry)
-                else:
-                    hourly_data = []
-            else:
-                # Ensure we have complete 24-hour data for a specific inverter
-                hourly_data = energy_calc.ensure_24_hour_data(inverter_id, target_date)
+            # One bucketed query for the day (summed over all inverters for 'all'), always 24 entries
+            start_time = target_date.replace(hour=0, minute=0, second=0, microsecond=0)
+            hourly_data = _hourly_energy_day(inverter_id, start_time)
             
             return {
                 "inverter_id": inverter_id,
                 "date": target_date.strftime('%Y-%m-%d'),
                 "hourly_data": hourly_data,
-                "source": "energy_calculator"
+                "source": "history_query"
             }
             
         except Exception as e:
@@ -4259,17 +4315,16 @@ def create_api(solar_app) -> FastAPI:
             
             # Try to get today's snapshot from billing_daily table first (if scheduler already ran)
             try:
-                conn = sqlite3.connect(solar_app.logger.path)
-                conn.row_factory = sqlite3.Row
-                cur = conn.cursor()
-                cur.execute("""
-                    SELECT * FROM billing_daily
-                    WHERE site_id = 'default' AND date = ?
-                    ORDER BY generated_at_ts DESC
-                    LIMIT 1
-                """, (target_date_str,))
-                row = cur.fetchone()
-                conn.close()
+                with read_connection(solar_app.logger.path) as conn:
+                    conn.row_factory = sqlite3.Row
+                    cur = conn.cursor()
+                    cur.execute("""
+                        SELECT * FROM billing_daily
+                        WHERE site_id = 'default' AND date = ?
+                        ORDER BY generated_at_ts DESC
+                        LIMIT 1
+                    """, (target_date_str,))
+                    row = cur.fetchone()
                 
                 if row:
                     # Use data from database (scheduler already calculated today)
@@ -4356,11 +4411,9 @@ def create_api(solar_app) -> FastAPI:
             if not to_date:
                 to_date = now_configured().date().isoformat()
             
-            conn = sqlite3.connect(solar_app.logger.path)
-            conn.row_factory = sqlite3.Row
-            cur = conn.cursor()
-            
-            try:
+            with read_connection(solar_app.logger.path) as conn:
+                conn.row_factory = sqlite3.Row
+                cur = conn.cursor()
                 cur.execute("""
                     SELECT * FROM billing_daily
                     WHERE site_id = 'default' AND date >= ? AND date <= ?
@@ -4378,8 +4431,6 @@ def create_api(solar_app) -> FastAPI:
                     "inverter_id": inverter_id,
                     "data": data
                 }
-            finally:
-                conn.close()
         except Exception as e:
             log.error(f"Error getting daily billing data: {e}", exc_info=True)
             return {"error": str(e)}
@@ -4662,11 +4713,9 @@ def create_api(solar_app) -> FastAPI:
             
             import sqlite3
             
-            conn = sqlite3.connect(solar_app.logger.path)
-            conn.row_factory = sqlite3.Row
-            cur = conn.cursor()
-            
-            try:
+            with read_connection(solar_app.logger.path) as conn:
+                conn.row_factory = sqlite3.Row
+                cur = conn.cursor()
                 cur.execute("""
                     SELECT * FROM billing_months
                     WHERE id = ?
@@ -4677,8 +4726,6 @@ def create_api(solar_app) -> FastAPI:
                     return {"error": "Month not found"}
                 
                 return dict(row)
-            finally:
-                conn.close()
         except Exception as e:
             log.error(f"Error getting billing month: {e}", exc_info=True)
             return {"error": str(e)}
@@ -4888,7 +4935,7 @@ def create_api(solar_app) -> FastAPI:
                     "message": f"Inverter {inverter_id} not found or not connected"
                 }
             
-            adapter = rt.adapter
+            adapter = _device(rt, Priority.CONTROL)
             
             # Map sensor IDs to action commands or register IDs
             # Some sensors use action commands, others use direct register writes
@@ -5000,7 +5047,7 @@ def create_api(solar_app) -> FastAPI:
                     "message": f"Inverter {inverter_id} not found"
                 }
             
-            adapter = rt.adapter
+            adapter = _device(rt, Priority.CONTROL)
             if not hasattr(adapter, 'regs') or not adapter.regs:
                 return {
                     "status": "error",
@@ -5160,7 +5207,35 @@ def create_api(solar_app) -> FastAPI:
 
     # ==================== Settings Endpoints ====================
     
+    def _device(rt, priority: Priority):
+        """The inverter's adapter with bus operations run on its device actor (the polling loop)."""
+        return rt.actor.proxy(rt.adapter, priority)
+
     async def _read_settings_registers(adapter, register_ids: List[str]) -> Dict[str, Any]:
+        """Read multiple settings registers, from the adapter's register shadow when it has one (no bus traffic)."""
+        if getattr(adapter, 'register_shadow', None) is not None:
+            settings, _, uncovered = adapter.shadow_values(register_ids)
+            if uncovered:
+                # Not holding registers (or not in the map): only these go to the device
+                settings.update(await _read_registers_live(adapter, uncovered))
+            return settings
+        return await _read_registers_live(adapter, register_ids)
+
+    async def _read_setting(adapter, register_id: str) -> Any:
+        """One settings register, from the register shadow when it holds it, else read_by_ident."""
+        if getattr(adapter, 'register_shadow', None) is not None:
+            values, _, uncovered = adapter.shadow_values([register_id])
+            if not uncovered:
+                return values[register_id]
+        return await adapter.read_by_ident(register_id)
+
+    def _shadow_meta(adapter, register_ids: List[str]) -> Optional[Dict[str, Any]]:
+        """Staleness of the shadow values behind a settings response (None without a shadow)."""
+        if getattr(adapter, 'register_shadow', None) is None:
+            return None
+        return adapter.shadow_values(register_ids)[1]
+
+    async def _read_registers_live(adapter, register_ids: List[str]) -> Dict[str, Any]:
         """Read multiple settings registers from inverter."""
         settings = {}
         
@@ -5285,7 +5360,7 @@ def create_api(solar_app) -> FastAPI:
             if not rt:
                 return {"inverter_id": inverter_id, "specification": None, "error": "Inverter not found"}
             
-            adapter = rt.adapter
+            adapter = _device(rt, Priority.SETTINGS)
             spec = {
                 "driver": rt.cfg.adapter.type,
                 "serial_number": None,
@@ -5312,17 +5387,17 @@ def create_api(solar_app) -> FastAPI:
                 if hasattr(adapter, 'read_by_ident'):
                     if not spec["serial_number"]:
                         try:
-                            spec["serial_number"] = await adapter.read_by_ident("device_serial_number")
+                            spec["serial_number"] = await _read_setting(adapter, "device_serial_number")
                         except Exception:
                             pass
                     if not spec["protocol_version"]:
                         try:
-                            spec["protocol_version"] = await adapter.read_by_ident("protocol_version_raw")
+                            spec["protocol_version"] = await _read_setting(adapter, "protocol_version_raw")
                         except Exception:
                             pass
                     if not spec["max_ac_output_power_kw"]:
                         try:
-                            rated_power = await adapter.read_by_ident("rated_power_w")
+                            rated_power = await _read_setting(adapter, "rated_power_w")
                             if rated_power:
                                 spec["max_ac_output_power_kw"] = round(float(rated_power) / 1000.0, 1)
                         except Exception:
@@ -5330,7 +5405,7 @@ def create_api(solar_app) -> FastAPI:
                     if not spec["mppt_connections"]:
                         try:
                             # Try mppt_number_and_phases first (Powdrive register 22)
-                            mppt_phases = await adapter.read_by_ident("mppt_number_and_phases")
+                            mppt_phases = await _read_setting(adapter, "mppt_number_and_phases")
                             if mppt_phases is not None:
                                 # Low byte is MPPT number
                                 spec["mppt_connections"] = mppt_phases & 0xFF
@@ -5348,10 +5423,10 @@ def create_api(solar_app) -> FastAPI:
                             except Exception as e2:
                                 log.debug(f"Failed to read register 22 directly: {e2}")
                                 try:
-                                    spec["mppt_connections"] = await adapter.read_by_ident("mppt_number")
+                                    spec["mppt_connections"] = await _read_setting(adapter, "mppt_number")
                                 except Exception:
                                     try:
-                                        spec["mppt_connections"] = await adapter.read_by_ident("mppt_count")
+                                        spec["mppt_connections"] = await _read_setting(adapter, "mppt_count")
                                     except Exception:
                                         pass
                         except Exception as e:
@@ -5359,7 +5434,7 @@ def create_api(solar_app) -> FastAPI:
                     if not spec["parallel"]:
                         try:
                             # Read parallel register (Powdrive register 336)
-                            parallel_reg = await adapter.read_by_ident("parallel_1")
+                            parallel_reg = await _read_setting(adapter, "parallel_1")
                             if parallel_reg is not None:
                                 # Bit0: 1=Parallel Enable, 0=Parallel Disable
                                 spec["parallel"] = "Enabled" if (parallel_reg & 0x01) else "Disabled"
@@ -5384,7 +5459,10 @@ def create_api(solar_app) -> FastAPI:
             # Cache the result
             solar_app.set_settings_cache(inverter_id, "specification", spec)
             
-            return {"inverter_id": inverter_id, "specification": spec}
+            spec_registers = ["device_serial_number", "protocol_version_raw", "rated_power_w",
+                              "mppt_number_and_phases", "parallel_1"]
+            return {"inverter_id": inverter_id, "specification": spec,
+                    "shadow": _shadow_meta(adapter, spec_registers)}
         except Exception as e:
             log.error(f"Error getting specification: {e}", exc_info=True)
             return {"inverter_id": inverter_id, "specification": None, "error": str(e)}
@@ -5408,7 +5486,7 @@ def create_api(solar_app) -> FastAPI:
             if not rt:
                 return {"inverter_id": inverter_id, "grid_settings": None, "error": "Inverter not found"}
             
-            adapter = rt.adapter
+            adapter = _device(rt, Priority.SETTINGS)
             
             # Try to get grid frequency from telemetry first (already polled)
             grid_frequency_hz = None
@@ -5428,7 +5506,7 @@ def create_api(solar_app) -> FastAPI:
             # Use telemetry value if available, otherwise try to read from register
             if not grid_frequency_hz:
                 try:
-                    grid_frequency_hz = await adapter.read_by_ident("grid_frequency_hz")
+                    grid_frequency_hz = await _read_setting(adapter, "grid_frequency_hz")
                 except Exception:
                     pass
             
@@ -5454,7 +5532,8 @@ def create_api(solar_app) -> FastAPI:
             # Cache the result
             solar_app.set_settings_cache(inverter_id, "grid_settings", grid_settings)
             
-            return {"inverter_id": inverter_id, "grid_settings": grid_settings}
+            return {"inverter_id": inverter_id, "grid_settings": grid_settings,
+                    "shadow": _shadow_meta(adapter, grid_registers)}
         except Exception as e:
             log.error(f"Error getting grid settings: {e}", exc_info=True)
             return {"inverter_id": inverter_id, "grid_settings": None, "error": str(e)}
@@ -5473,7 +5552,7 @@ def create_api(solar_app) -> FastAPI:
             if not rt:
                 return {"status": "error", "message": "Inverter not found"}
             
-            adapter = rt.adapter
+            adapter = _device(rt, Priority.CONTROL)
             
             # Map frontend fields to register IDs
             updates = {}
@@ -5565,7 +5644,7 @@ def create_api(solar_app) -> FastAPI:
             if not rt:
                 return {"inverter_id": inverter_id, "battery_type": None, "error": "Inverter not found"}
             
-            adapter = rt.adapter
+            adapter = _device(rt, Priority.SETTINGS)
             battery_registers = ["battery_type", "battery_capacity_ah", "battery_mode_source"]
             settings = await _read_settings_registers(adapter, battery_registers)
             
@@ -5576,7 +5655,8 @@ def create_api(solar_app) -> FastAPI:
             }
             
             solar_app.set_settings_cache(inverter_id, "battery_type", battery_type_settings)
-            return {"inverter_id": inverter_id, "battery_type": battery_type_settings}
+            return {"inverter_id": inverter_id, "battery_type": battery_type_settings,
+                    "shadow": _shadow_meta(adapter, battery_registers)}
         except Exception as e:
             log.error(f"Error getting battery type: {e}", exc_info=True)
             return {"inverter_id": inverter_id, "battery_type": None, "error": str(e)}
@@ -5594,7 +5674,7 @@ def create_api(solar_app) -> FastAPI:
             if not rt:
                 return {"status": "error", "message": "Inverter not found"}
             
-            adapter = rt.adapter
+            adapter = _device(rt, Priority.CONTROL)
             updates = {}
             
             if "battery_type" in settings_data:
@@ -5642,7 +5722,7 @@ def create_api(solar_app) -> FastAPI:
             if not rt:
                 return {"inverter_id": inverter_id, "battery_charging": None, "error": "Inverter not found"}
             
-            adapter = rt.adapter
+            adapter = _device(rt, Priority.SETTINGS)
             adapter_type = rt.cfg.adapter.type if hasattr(rt.cfg, 'adapter') else None
             
             # Get battery voltage for current-to-power conversion (Powdrive)
@@ -5717,7 +5797,8 @@ def create_api(solar_app) -> FastAPI:
             }
             
             solar_app.set_settings_cache(inverter_id, "battery_charging", battery_charging)
-            return {"inverter_id": inverter_id, "battery_charging": battery_charging}
+            return {"inverter_id": inverter_id, "battery_charging": battery_charging,
+                    "shadow": _shadow_meta(adapter, charging_registers)}
         except Exception as e:
             log.error(f"Error getting battery charging: {e}", exc_info=True)
             return {"inverter_id": inverter_id, "battery_charging": None, "error": str(e)}
@@ -5735,7 +5816,7 @@ def create_api(solar_app) -> FastAPI:
             if not rt:
                 return {"status": "error", "message": "Inverter not found"}
             
-            adapter = rt.adapter
+            adapter = _device(rt, Priority.CONTROL)
             adapter_type = rt.cfg.adapter.type if hasattr(rt.cfg, 'adapter') else None
             updates = {}
             
@@ -5865,7 +5946,7 @@ def create_api(solar_app) -> FastAPI:
             if not rt:
                 return {"inverter_id": inverter_id, "work_mode": None, "error": "Inverter not found"}
             
-            adapter = rt.adapter
+            adapter = _device(rt, Priority.SETTINGS)
             # Filter registers based on adapter type - some registers don't exist for Powdrive
             adapter_type = rt.cfg.adapter.type if hasattr(rt.cfg, 'adapter') else None
             if adapter_type == "powdrive":
@@ -5928,7 +6009,8 @@ def create_api(solar_app) -> FastAPI:
             }
             
             solar_app.set_settings_cache(inverter_id, "work_mode", work_mode)
-            return {"inverter_id": inverter_id, "work_mode": work_mode}
+            return {"inverter_id": inverter_id, "work_mode": work_mode,
+                    "shadow": _shadow_meta(adapter, work_mode_registers)}
         except Exception as e:
             log.error(f"Error getting work mode: {e}", exc_info=True)
             return {"inverter_id": inverter_id, "work_mode": None, "error": str(e)}
@@ -5946,7 +6028,7 @@ def create_api(solar_app) -> FastAPI:
             if not rt:
                 return {"status": "error", "message": "Inverter not found"}
             
-            adapter = rt.adapter
+            adapter = _device(rt, Priority.CONTROL)
             updates = {}
             
             # Handle grid_charge - map to correct register based on adapter type
@@ -6051,7 +6133,7 @@ def create_api(solar_app) -> FastAPI:
             if not rt:
                 return {"inverter_id": inverter_id, "work_mode_detail": None, "error": "Inverter not found"}
             
-            adapter = rt.adapter
+            adapter = _device(rt, Priority.SETTINGS)
             adapter_type = rt.cfg.adapter.type if hasattr(rt.cfg, 'adapter') else None
             
             # Read work mode detail registers
@@ -6149,7 +6231,8 @@ def create_api(solar_app) -> FastAPI:
                 log.warning(f"Failed to read work mode detail registers: {e}", exc_info=True)
             
             solar_app.set_settings_cache(inverter_id, "work_mode_detail", work_mode_detail)
-            return {"inverter_id": inverter_id, "work_mode_detail": work_mode_detail}
+            return {"inverter_id": inverter_id, "work_mode_detail": work_mode_detail,
+                    "shadow": _shadow_meta(adapter, work_mode_detail_registers)}
         except Exception as e:
             log.error(f"Error getting work mode detail: {e}", exc_info=True)
             return {"inverter_id": inverter_id, "work_mode_detail": None, "error": str(e)}
@@ -6171,7 +6254,7 @@ def create_api(solar_app) -> FastAPI:
             if not rt:
                 return {"inverter_id": inverter_id, "auxiliary": None, "error": "Inverter not found"}
             
-            adapter = rt.adapter
+            adapter = _device(rt, Priority.SETTINGS)
             # Filter registers based on adapter type - some registers don't exist for Powdrive
             adapter_type = rt.cfg.adapter.type if hasattr(rt.cfg, 'adapter') else None
             if adapter_type == "powdrive":
@@ -6231,7 +6314,8 @@ def create_api(solar_app) -> FastAPI:
                 }
             
             solar_app.set_settings_cache(inverter_id, "auxiliary", auxiliary)
-            return {"inverter_id": inverter_id, "auxiliary": auxiliary}
+            return {"inverter_id": inverter_id, "auxiliary": auxiliary,
+                    "shadow": _shadow_meta(adapter, auxiliary_registers)}
         except Exception as e:
             log.error(f"Error getting auxiliary settings: {e}", exc_info=True)
             return {"inverter_id": inverter_id, "auxiliary": None, "error": str(e)}
@@ -6249,7 +6333,7 @@ def create_api(solar_app) -> FastAPI:
             if not rt:
                 return {"status": "error", "message": "Inverter not found"}
             
-            adapter = rt.adapter
+            adapter = _device(rt, Priority.CONTROL)
             adapter_type = rt.cfg.adapter.type if hasattr(rt.cfg, 'adapter') else None
             updates = {}
             
@@ -6386,7 +6470,7 @@ def create_api(solar_app) -> FastAPI:
             if not rt:
                 return {"status": "error", "message": "Inverter not found"}
             
-            adapter = rt.adapter
+            adapter = _device(rt, Priority.CONTROL)
             adapter_type = rt.cfg.adapter.type if hasattr(rt.cfg, 'adapter') else None
             updates = {}
             
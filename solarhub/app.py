@@ -1,8 +1,10 @@
-import asyncio, logging, json, sys, time
+import asyncio, functools, logging, json, time
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 from solarhub.config import HubConfig, InverterConfig
 from solarhub.mqtt import Mqtt
+from solarhub.json_codec import to_jsonable
+from solarhub import log_pipeline
 from solarhub.adapters.senergy import SenergyAdapter
 from solarhub.adapters.powdrive import PowdriveAdapter
 from solarhub.adapters.iammeter import IAMMeterAdapter
@@ -14,7 +16,11 @@ from solarhub.adapters.battery_jkbms_ble import JKBMSBleAdapter
 from solarhub.adapters.battery_jkbms_tcpip import JKBMSTcpipAdapter
 from solarhub.adapters.battery_failover import FailoverBatteryAdapter
 from solarhub.adapters.command_queue import CommandQueueManager
+from solarhub.adapters.device_actor import DeviceActor, Priority
 from solarhub.logging.logger import DataLogger
+from solarhub.snapshot_cache import SnapshotCache
+from solarhub.live_stream import LiveStreamHub
+from solarhub.polling_scheduler import PollingScheduler, PollTask, bus_key
 from solarhub.schedulers.smart import SmartScheduler
 from solarhub.ha.discovery import HADiscoveryPublisher
 from solarhub.api_server import create_api, start_api_in_background
@@ -43,6 +49,8 @@ class InverterRuntime:
     def __init__(self, cfg: InverterConfig, adapter: InverterAdapter):
         self.cfg = cfg
         self.adapter = adapter
+        # Owns the adapter's bus operations once started on the polling loop
+        self.actor = DeviceActor(f"inverter:{cfg.id}")
 
 class MeterRuntime:
     def __init__(self, cfg, adapter: MeterAdapter):
@@ -74,9 +82,22 @@ class SolarApp:
         self.smart: Optional[SmartScheduler] = None  # Legacy: single scheduler (deprecated, use smart_schedulers)
         self.smart_schedulers: Dict[str, SmartScheduler] = {}  # Per-array schedulers: array_id -> SmartScheduler
         self.logger = DataLogger()
+        self.snapshot_cache = SnapshotCache(max_age_s=max(2.0 * cfg.polling.interval_secs, 5.0))
+        self.live_stream = LiveStreamHub()
+        # Per-bus device polling (polling.mode == "bus"); built on the polling loop
+        self.poll_scheduler: Optional[PollingScheduler] = None
+        self._poll_signature = None
+        self._start_read_pool(cfg)
+        self._start_write_pipeline(cfg)
+        self._start_rollups(cfg)
+        self._start_retention(cfg)
+        # Legacy-row backfills run in chunks after startup instead of before the first poll
+        self.logger.start_background_migrations()
         self._energy_acc: Dict[str, Dict[str, Any]] = {}
-        self.ha = HADiscoveryPublisher(self.mqtt, cfg.mqtt.base_topic, db_path=self.logger.path)
+        self.ha = HADiscoveryPublisher(self.mqtt, cfg.mqtt.base_topic, db_path=self.logger.path,
+                                       policy=cfg.mqtt.discovery)
         self.array_last: Dict[str, Any] = {}  # Store array telemetry for home aggregation
+        self.home_last: Dict[str, Any] = {}  # system_id -> latest aggregated system/home telemetry
         
         # Track polling loop task for background execution
         self._polling_loop_task: Optional[asyncio.Task] = None
@@ -106,6 +127,69 @@ class SolarApp:
         self.system_aggregator = SystemAggregator()
         self.battery_array_aggregator = BatteryArrayAggregator()
     
+    def _start_write_pipeline(self, cfg: HubConfig):
+        """Route telemetry inserts through the batched writer thread (one commit per poll cycle)."""
+        wp = cfg.database.write_pipeline
+        if not wp.enabled:
+            log.info("Database write pipeline disabled - telemetry inserts are written synchronously")
+            return
+        try:
+            self.logger.start_write_pipeline(
+                flush_interval_ms=wp.flush_interval_ms,
+                max_queue_size=wp.max_queue_size,
+                max_batch_size=wp.max_batch_size,
+                overflow_policy=wp.overflow_policy,
+                put_timeout_s=wp.put_timeout_s,
+                busy_timeout_ms=wp.busy_timeout_ms,
+            )
+        except Exception as e:
+            log.error(f"Failed to start database write pipeline, falling back to synchronous writes: {e}")
+
+    def _start_rollups(self, cfg: HubConfig):
+        """Maintain minute/hour rollups on ingest so history reads don't scan raw samples."""
+        rc = cfg.database.rollups
+        if not rc.enabled:
+            log.info("Telemetry rollups disabled - energy and history are computed from raw samples")
+            return
+        try:
+            self.logger.start_rollups(max_gap_s=rc.max_gap_s)
+        except Exception as e:
+            log.error(f"Failed to start telemetry rollups: {e}")
+
+    def _start_retention(self, cfg: HubConfig):
+        """Downsample old raw samples into 1-minute / 15-minute tiers and reclaim the space."""
+        rc = cfg.database.retention
+        if not rc.enabled:
+            log.info("Telemetry retention disabled - raw samples are kept at full resolution")
+            return
+        try:
+            self.logger.start_retention(
+                raw_days=rc.raw_days,
+                minute_days=rc.minute_days,
+                overrides={table: t.model_dump() for table, t in rc.tables.items()},
+                interval_s=rc.interval_hours * 3600.0,
+                chunk_rows=rc.chunk_rows,
+                pause_s=rc.pause_ms / 1000.0,
+                vacuum_pages_per_step=rc.vacuum_pages_per_step,
+                convert_auto_vacuum=rc.convert_auto_vacuum,
+            )
+        except Exception as e:
+            log.error(f"Failed to start telemetry retention: {e}")
+
+    def _start_read_pool(self, cfg: HubConfig):
+        """Configure the shared read-only connection pools before any reader opens one."""
+        from solarhub.logging.read_pool import configure_read_pools
+        rp = cfg.database.read_pool
+        configure_read_pools(
+            enabled=rp.enabled,
+            size=rp.size,
+            acquire_timeout_s=rp.acquire_timeout_s,
+            mmap_size_mb=rp.mmap_size_mb,
+            cache_size_kb=rp.cache_size_kb,
+            busy_timeout_ms=rp.busy_timeout_ms,
+            cached_statements=rp.cached_statements,
+        )
+
     def _build_runtime_objects(self, cfg: HubConfig):
         """Build runtime objects from hierarchy (database-first, config.yaml fallback)."""
         # Initialize configuration manager
@@ -453,16 +537,10 @@ class SolarApp:
         root_logger.setLevel(log_level)
         print(f"Set root logger level to: {log_config.level.upper()}")
         
-        # Configure console handler if not already configured
-        if not root_logger.handlers:
-            console_handler = logging.StreamHandler(sys.stdout)
-            console_handler.setLevel(log_level)
-            formatter = logging.Formatter(log_config.format)
-            console_handler.setFormatter(formatter)
-            root_logger.addHandler(console_handler)
-            print("Added console handler")
-        else:
-            print(f"Console handler already exists: {root_logger.handlers}")
+        # Console (and optional JSON-lines file) written off-thread, with per-call-site rate limits
+        log_pipeline.install(log_config, root_logger)
+        print(f"Installed log pipeline (queue={log_config.queue}, json_file={log_config.json_file}, "
+              f"rate_limits={log_config.rate_limits})")
         
         # Set specific loggers
         logging.getLogger("solarhub").setLevel(log_level)
@@ -493,6 +571,10 @@ class SolarApp:
         """Get cached settings for a section, return None if expired or missing."""
         if inverter_id not in self.settings_cache:
             return None
+        # Adapters with a register shadow serve settings from it (current, with staleness metadata)
+        rt = next((inv_rt for inv_rt in self.inverters if inv_rt.cfg.id == inverter_id), None)
+        if rt is not None and getattr(rt.adapter, 'register_shadow', None) is not None:
+            return None
         if section not in self.settings_cache[inverter_id]:
             return None
         
@@ -538,6 +620,12 @@ class SolarApp:
         # Wait a moment for MQTT to connect (if using async connection)
         import asyncio
         await asyncio.sleep(0.5)  # Give MQTT time to establish connection
+        if self.cfg.mqtt.ha_discovery and self.cfg.mqtt.discovery.broker_diff:
+            # Re-send only discovery configs the broker lost or holds in another version
+            try:
+                await asyncio.to_thread(self.ha.sync_with_broker, self.cfg.mqtt.discovery.broker_diff_timeout_s)
+            except Exception as e:
+                log.warning(f"HA discovery broker diff failed, using the stored config hashes: {e}")
         
         # Power cycle Bluetooth on startup if any jkbms_ble adapters are configured
         has_ble_batteries = False
@@ -731,12 +819,12 @@ class SolarApp:
                 self.inverters.append(rt)
                 
                 # Register adapter with command queue manager
-                self.command_queue.register_adapter(inv.id, adapter)
+                self.command_queue.register_adapter(inv.id, adapter, rt.actor)
                 
                 self._subscribe_command_topics(rt)
                 # Availability: mark online (retain)
                 try:
-                    self.mqtt.pub(f"{self.cfg.mqtt.base_topic}/{rt.cfg.id}/availability", "online", retain=True)
+                    self.mqtt.pub_state(f"{self.cfg.mqtt.base_topic}/{rt.cfg.id}/availability", "online", retain=True)
                 except Exception as e:
                     log.warning(f"Failed to publish availability for {rt.cfg.id}: {e}")
                 # Publish discovery now (device model/SN may be generic for the first few seconds)
@@ -942,7 +1030,7 @@ class SolarApp:
                     self.meters.append(rt)
                     # Publish availability
                     try:
-                        self.mqtt.pub(f"{self.cfg.mqtt.base_topic}/meter/{meter_cfg.id}/availability", "online", retain=True)
+                        self.mqtt.pub_state(f"{self.cfg.mqtt.base_topic}/meter/{meter_cfg.id}/availability", "online", retain=True)
                     except Exception as e:
                         log.warning(f"Failed to publish availability for meter {meter_cfg.id}: {e}")
                     
@@ -1293,7 +1381,7 @@ class SolarApp:
 
     async def _do_adapter_cmd(self, rt: InverterRuntime, cmd: Dict[str, Any]):
         try:
-            res = await rt.adapter.handle_command(cmd)
+            res = await rt.actor.call(Priority.CONTROL, rt.adapter.handle_command, cmd)
             ack = {"ok": bool(res.get("ok")), **{k:v for k,v in res.items() if k != "ok"}}
         except Exception as e:
             ack = {"ok": False, "reason": str(e)}
@@ -1390,11 +1478,13 @@ class SolarApp:
                     # Handle disconnect/reconnect outside the lock (they might take time)
                     if should_disconnect:
                         log.info("Disconnect requested, handling disconnect in polling loop")
+                        await self._stop_poll_scheduler()
                         await self._handle_disconnect_in_loop()
                         continue
                     
                     if should_reconnect:
                         log.info("Reconnect requested, handling reconnect in polling loop")
+                        await self._stop_poll_scheduler()
                         await self._handle_reconnect_in_loop()
                         continue
                 except Exception as e:
@@ -1403,36 +1493,55 @@ class SolarApp:
                 # Check if polling is suspended
                 if self._polling_suspended:
                     log.debug("Polling loop suspended, skipping cycle")
+                    await self._stop_poll_scheduler()
                     await asyncio.sleep(interval)
                     continue
                 
-                # Log connection state before polling
-                for rt in self.inverters:
-                    port = rt.cfg.adapter.serial_port
-                    client = getattr(rt.adapter, 'client', None)
-                    client_state = "None"
-                    if client:
-                        if hasattr(client, 'connected'):
-                            client_state = f"connected={client.connected}"
-                        else:
-                            client_state = "exists (no connected attr)"
-                    log.info(f"RUN LOOP: Before polling - Inverter {rt.cfg.id} (port={port}, client={client_state})")
-                
-                log.info("RUN LOOP: Starting polling cycle for all inverters")
-                tasks = [self._poll_one(rt) for rt in self.inverters]
-                # Poll all battery banks
-                tasks.extend([self._poll_battery(bank_id) for bank_id in self.battery_adapters.keys()])
-                # Legacy: also poll single battery_adapter if it exists and not in battery_adapters
-                if self.battery_adapter and not any(adapter == self.battery_adapter for adapter in self.battery_adapters.values()):
-                    tasks.append(self._poll_battery(None))  # None means use self.battery_adapter
-                # Add meter polling tasks
-                tasks.extend([self._poll_meter(rt) for rt in self.meters])
-                await asyncio.gather(*tasks, return_exceptions=True)
-                log.debug("RUN LOOP: Polling cycle completed")
+                if self.cfg.polling.mode == "bus":
+                    # Devices are polled by per-bus workers at their own cadence;
+                    # this loop only aggregates, commits and publishes
+                    await self._ensure_poll_scheduler()
+                else:
+                    # Log connection state before polling (every cycle, so DEBUG only)
+                    if log.isEnabledFor(logging.DEBUG):
+                        for rt in self.inverters:
+                            port = rt.cfg.adapter.serial_port
+                            client = getattr(rt.adapter, 'client', None)
+                            client_state = "None"
+                            if client:
+                                if hasattr(client, 'connected'):
+                                    client_state = f"connected={client.connected}"
+                                else:
+                                    client_state = "exists (no connected attr)"
+                            log.debug("RUN LOOP: Before polling - Inverter %s (port=%s, client=%s)",
+                                      rt.cfg.id, port, client_state)
+                
+                    log.debug("RUN LOOP: Starting polling cycle for all inverters")
+                    tasks = [self._poll_one(rt) for rt in self.inverters]
+                    # Poll all battery banks
+                    tasks.extend([self._poll_battery(bank_id) for bank_id in self.battery_adapters.keys()])
+                    # Legacy: also poll single battery_adapter if it exists and not in battery_adapters
+                    if self.battery_adapter and not any(adapter == self.battery_adapter for adapter in self.battery_adapters.values()):
+                        tasks.append(self._poll_battery(None))  # None means use self.battery_adapter
+                    # Add meter polling tasks
+                    tasks.extend([self._poll_meter(rt) for rt in self.meters])
+                    await asyncio.gather(*tasks, return_exceptions=True)
+                    log.debug("RUN LOOP: Polling cycle completed")
                 
                 # Aggregate and publish home telemetry after all arrays are processed
                 self._aggregate_and_publish_home_telemetry()
                 
+                # Commit everything logged during this cycle in one transaction
+                committed = self.logger.flush_cycle()
+                if committed is not None and not committed.is_set():
+                    # Wait (off the loop) for the commit, so DB-derived "now" fields match the cycle
+                    if not await asyncio.get_running_loop().run_in_executor(None, committed.wait, 2.0):
+                        log.debug("Cycle commit still pending after 2s; starting a new snapshot generation anyway")
+                # New poll-cycle generation: "now" API responses are rebuilt on next request
+                self.snapshot_cache.bump()
+                # Push this cycle's telemetry to live-stream (SSE/WebSocket) clients
+                self._publish_live_state()
+                
                 smart_tick += interval
                 log.debug(f"Smart tick counter: {smart_tick}/{smart_interval}")
                 
@@ -1467,6 +1576,61 @@ class SolarApp:
             log.error(f"Fatal error in main loop: {e}", exc_info=True)
             raise
     
+    def _poll_task_specs(self) -> List[tuple]:
+        """(name, bus, interval, poll fn, owner) for every device the scheduler should poll."""
+        default = self.cfg.polling.interval_secs
+        specs = []
+        for rt in self.inverters:
+            specs.append((f"inverter:{rt.cfg.id}", bus_key(rt.cfg.adapter, rt.cfg.id),
+                          rt.cfg.poll_interval_secs or default,
+                          functools.partial(self._poll_one, rt), rt))
+        for bank_id, adapter in self.battery_adapters.items():
+            bank_cfg = getattr(adapter, "bank_cfg", None)
+            adapter_cfg = getattr(bank_cfg, "adapter", None)
+            if adapter_cfg is None and getattr(bank_cfg, "adapters", None):
+                adapter_cfg = bank_cfg.adapters[0].adapter
+            specs.append((f"battery:{bank_id}", bus_key(adapter_cfg, bank_id),
+                          getattr(bank_cfg, "poll_interval_secs", None) or default,
+                          functools.partial(self._poll_battery, bank_id), adapter))
+        if self.battery_adapter and not any(adapter == self.battery_adapter for adapter in self.battery_adapters.values()):
+            bank_cfg = getattr(self.battery_adapter, "bank_cfg", None)
+            specs.append(("battery:legacy", bus_key(getattr(bank_cfg, "adapter", None), "battery"),
+                          getattr(bank_cfg, "poll_interval_secs", None) or default,
+                          functools.partial(self._poll_battery, None), self.battery_adapter))
+        for rt in self.meters:
+            specs.append((f"meter:{rt.cfg.id}", bus_key(rt.cfg.adapter, rt.cfg.id),
+                          rt.cfg.poll_interval_secs or default,
+                          functools.partial(self._poll_meter, rt), rt))
+        return specs
+
+    async def _ensure_poll_scheduler(self):
+        """Start the per-bus polling scheduler, rebuilding it if the set of devices changed."""
+        specs = self._poll_task_specs()
+        signature = (self.cfg.polling.timeout_ms,) + tuple(
+            (name, bus, interval, id(owner)) for name, bus, interval, _, owner in specs)
+        if self.poll_scheduler is not None and self.poll_scheduler.running and signature == self._poll_signature:
+            return
+        await self._stop_poll_scheduler()
+        # Device actors live on the same loop as the polls
+        for rt in self.inverters:
+            rt.actor.start()
+        scheduler = PollingScheduler()
+        timeout_s = self.cfg.polling.timeout_ms / 1000.0
+        for name, bus, interval, poll, _ in specs:
+            # A hung device must not hold its bus; a multi-block poll may legitimately
+            # take longer than one request timeout, though never longer than its interval
+            scheduler.add(PollTask(name, bus, interval, poll,
+                                   timeout_s=max(timeout_s, interval) if timeout_s > 0 else None))
+        self.poll_scheduler = scheduler
+        self._poll_signature = signature
+        if scheduler.tasks:
+            scheduler.start()
+
+    async def _stop_poll_scheduler(self):
+        if self.poll_scheduler is not None and self.poll_scheduler.running:
+            await self.poll_scheduler.stop()
+            log.info("Polling scheduler stopped")
+
     async def _billing_scheduler_loop(self):
         """Background task that runs daily billing job at 00:30 local time."""
         from solarhub.billing_scheduler import run_daily_billing_job
@@ -1615,7 +1779,7 @@ class SolarApp:
             for rt in list(self.inverters):
                 try:
                     # Publish offline availability
-                    self.mqtt.pub(f"{self.cfg.mqtt.base_topic}/{rt.cfg.id}/availability", "offline", retain=True)
+                    self.mqtt.pub_state(f"{self.cfg.mqtt.base_topic}/{rt.cfg.id}/availability", "offline", retain=True)
                     # Close connection but keep client object
                     if hasattr(rt.adapter, 'disconnect_connection'):
                         await rt.adapter.disconnect_connection()
@@ -1717,7 +1881,7 @@ class SolarApp:
                             if hasattr(rt.adapter.client, 'connect'):
                                 await rt.adapter.client.connect()
                     # Publish online availability
-                    self.mqtt.pub(f"{self.cfg.mqtt.base_topic}/{rt.cfg.id}/availability", "online", retain=True)
+                    self.mqtt.pub_state(f"{self.cfg.mqtt.base_topic}/{rt.cfg.id}/availability", "online", retain=True)
                     log.info(f"Reconnected inverter: {rt.cfg.id} (same client object)")
                 except Exception as e:
                     log.error(f"Error reconnecting inverter {rt.cfg.id}: {e}")
@@ -1788,18 +1952,9 @@ class SolarApp:
             log.info("Reconnection already in progress, skipping _reconnect_devices()")
             return
         
-        # Log stack trace to see who's calling _reconnect_devices
-        import traceback
-        stack = traceback.extract_stack()
-        callers = []
-        for i in range(min(5, len(stack) - 1)):
-            frame = stack[-(i+2)] if len(stack) > i+1 else None
-            if frame:
-                filename = frame.filename.split('/')[-1] if '/' in frame.filename else frame.filename.split('\\')[-1]
-                callers.append(f"{filename}:{frame.lineno}({frame.name})")
-        caller_info = " <- ".join(callers) if callers else "unknown"
-        
-        log.info(f"RECONNECT: _reconnect_devices() starting - checking all device connections (called from: {caller_info})")
+        if log.isEnabledFor(logging.INFO):
+            log.info("RECONNECT: _reconnect_devices() starting - checking all device connections (called from: %s)",
+                     log_pipeline.caller_info(5))
         self._reconnecting = True
         try:
             # Check inverter connections - only reconnect if actually disconnected
@@ -1842,7 +1997,7 @@ class SolarApp:
                             client = getattr(rt.adapter, 'client', None)
                             if client and hasattr(client, 'connected') and client.connected:
                                 log.info(f"Successfully reconnected inverter: {rt.cfg.id}")
-                                self.mqtt.pub(f"{self.cfg.mqtt.base_topic}/{rt.cfg.id}/availability", "online", retain=True)
+                                self.mqtt.pub_state(f"{self.cfg.mqtt.base_topic}/{rt.cfg.id}/availability", "online", retain=True)
                                 # Mark device as recovered if it was in recovery state
                                 if self.device_registry and rt.cfg.adapter.serial_port:
                                     devices = self.device_registry.get_all_devices()
@@ -1855,7 +2010,7 @@ class SolarApp:
                             # Fallback: try to connect directly
                             await rt.adapter.connect()
                             log.info(f"Successfully reconnected inverter: {rt.cfg.id}")
-                            self.mqtt.pub(f"{self.cfg.mqtt.base_topic}/{rt.cfg.id}/availability", "online", retain=True)
+                            self.mqtt.pub_state(f"{self.cfg.mqtt.base_topic}/{rt.cfg.id}/availability", "online", retain=True)
                             # Mark device as recovered if it was in recovery state
                             if self.device_registry and rt.cfg.adapter.serial_port:
                                 devices = self.device_registry.get_all_devices()
@@ -1892,7 +2047,7 @@ class SolarApp:
                         client = getattr(rt.adapter, 'client', None)
                         if client and hasattr(client, 'connected') and client.connected:
                             log.info(f"Successfully reconnected inverter: {rt.cfg.id}")
-                            self.mqtt.pub(f"{self.cfg.mqtt.base_topic}/{rt.cfg.id}/availability", "online", retain=True)
+                            self.mqtt.pub_state(f"{self.cfg.mqtt.base_topic}/{rt.cfg.id}/availability", "online", retain=True)
                             # Mark device as recovered if it was in recovery state
                             if self.device_registry and rt.cfg.adapter.serial_port:
                                 devices = self.device_registry.get_all_devices()
@@ -2122,6 +2277,13 @@ class SolarApp:
                     log.error(f"Failed to calculate energy for array {array_id}: {e}", exc_info=True)
                     continue
 
+        # The hour is closed: its rollup buckets are final
+        try:
+            marked = energy_calc.finalize_rollup_hour(hour_start)
+            log.debug(f"Finalized {marked} rollup buckets for hour {hour_start.strftime('%Y-%m-%d %H:00')}")
+        except Exception as e:
+            log.warning(f"Failed to finalize rollup buckets for {hour_start}: {e}")
+
     async def _backfill_today_hourly_energy(self):
         """Backfill today's hourly_energy rows up to the last completed hour for all inverters."""
         from datetime import timedelta
@@ -2152,6 +2314,13 @@ class SolarApp:
     def shutdown(self):
         """Shutdown the application and clean up resources."""
         log.info("Shutting down solar monitoring application")
+        self.live_stream.close()
+        
+        # Cancel the per-bus polling workers
+        if self.poll_scheduler is not None:
+            self.poll_scheduler.cancel()
+        for rt in self.inverters:
+            rt.actor.cancel()
         
         # Stop all battery adapter background listening tasks if they exist
         # Note: shutdown() is synchronous, so we can't await stop_listening()
@@ -2186,12 +2355,25 @@ class SolarApp:
             self.command_queue.stop()
             log.info("Command queue manager stopped")
         
+        # Flush queued telemetry writes and close the writer connection
+        if hasattr(self, 'logger'):
+            try:
+                self.logger.close()
+            except Exception as e:
+                log.warning(f"Error flushing database write pipeline: {e}")
+        
+        # Stop the HA discovery sender; configs still queued are not recorded and go out on the next start
+        if getattr(self, 'ha', None) is not None:
+            self.ha.outbox.stop()
+
         # Disconnect from MQTT
         if hasattr(self, 'mqtt'):
             self.mqtt.disconnect()
             log.info("MQTT disconnected")
         
         log.info("Application shutdown complete")
+        # Write out records still queued for the log thread
+        log_pipeline.shutdown()
 
     async def _poll_one(self, rt: InverterRuntime):
         try:
@@ -2211,7 +2393,7 @@ class SolarApp:
             # Notify command queue that telemetry polling is starting
             self.command_queue.notify_telemetry_polling()
             
-            tel = await rt.adapter.poll()
+            tel = await rt.actor.call(Priority.TELEMETRY, rt.adapter.poll, key="poll")
             
             # Reset failure count on successful poll (device is working)
             if hasattr(self, 'recovery_manager') and self.recovery_manager and rt.cfg.adapter.serial_port and hasattr(self, 'device_registry') and self.device_registry:
@@ -2225,27 +2407,28 @@ class SolarApp:
                         break
             
             # Log key telemetry values with inverter mode correlation
-            from solarhub.schedulers.helpers import InverterManager
-            mode_str = InverterManager.get_current_work_mode(tel.extra or {})
-            
-            # Determine power source
-            power_source = "Unknown"
-            if tel.batt_power_w > 50:
-                power_source = "Battery charging"
-            elif tel.batt_power_w < -50:
-                power_source = "Battery discharging"
-            elif tel.grid_power_w > 50:
-                power_source = "Grid supplying"
-            elif tel.grid_power_w < -50:
-                power_source = "Grid charging"
-            elif tel.pv_power_w > 50:
-                power_source = "Solar only"
-            else:
-                power_source = "Idle"
-            
-            log.info(f"Inverter {rt.cfg.id} telemetry - SOC: {tel.batt_soc_pct}%, Mode: {mode_str}, "
-                    f"Source: {power_source}, PV: {tel.pv_power_w}W, Load: {tel.load_power_w}W, "
-                    f"Batt: {tel.batt_power_w}W, Grid: {tel.grid_power_w}W")
+            if log.isEnabledFor(logging.INFO):
+                from solarhub.schedulers.helpers import InverterManager
+                mode_str = InverterManager.get_current_work_mode(tel.extra or {})
+                
+                # Determine power source
+                power_source = "Unknown"
+                if tel.batt_power_w > 50:
+                    power_source = "Battery charging"
+                elif tel.batt_power_w < -50:
+                    power_source = "Battery discharging"
+                elif tel.grid_power_w > 50:
+                    power_source = "Grid supplying"
+                elif tel.grid_power_w < -50:
+                    power_source = "Grid charging"
+                elif tel.pv_power_w > 50:
+                    power_source = "Solar only"
+                else:
+                    power_source = "Idle"
+                
+                log.info("Inverter %s telemetry - SOC: %s%%, Mode: %s, Source: %s, PV: %sW, Load: %sW, "
+                         "Batt: %sW, Grid: %sW", rt.cfg.id, tel.batt_soc_pct, mode_str, power_source,
+                         tel.pv_power_w, tel.load_power_w, tel.batt_power_w, tel.grid_power_w)
             
             # Optionally override battery metrics from external battery adapter
             try:
@@ -2278,50 +2461,10 @@ class SolarApp:
             tel_dict = tel.model_dump(exclude={'extra'}, mode='python')
             payload = {"id": rt.cfg.id, **tel_dict}
             
-            # Add all standardized data from extra (already mapped by TelemetryMapper)
-            # Ensure extra is JSON-serializable by converting to plain dict
+            # Add all standardized data from extra (already mapped by TelemetryMapper),
+            # converted to plain JSON types in one pass (circular references become a marker)
             if tel.extra:
-                # Convert extra to plain dict, filtering out any non-serializable objects
-                # Use a helper to recursively make values JSON-serializable
-                extra_dict = {}
-                visited = set()  # Track visited objects to detect circular references
-                
-                def make_serializable(value: Any, visited_set: set) -> Any:
-                    """Recursively make value JSON-serializable, handling circular references."""
-                    # Check for circular references
-                    if isinstance(value, (dict, list)):
-                        obj_id = id(value)
-                        if obj_id in visited_set:
-                            return "<circular reference>"
-                        visited_set.add(obj_id)
-                    
-                    try:
-                        if isinstance(value, dict):
-                            return {k: make_serializable(v, visited_set.copy()) for k, v in value.items()}
-                        elif isinstance(value, (list, tuple)):
-                            return [make_serializable(item, visited_set.copy()) for item in value]
-                        elif isinstance(value, (str, int, float, bool, type(None))):
-                            return value
-                        else:
-                            # Try to serialize, fallback to string
-                            try:
-                                json.dumps(value)
-                                return value
-                            except (TypeError, ValueError):
-                                return str(value)
-                    finally:
-                        if isinstance(value, (dict, list)):
-                            visited_set.discard(id(value))
-                
-                for key, value in tel.extra.items():
-                    try:
-                        serialized_value = make_serializable(value, visited.copy())
-                        extra_dict[key] = serialized_value
-                    except Exception as e:
-                        log.debug(f"Skipping non-serializable key in extra: {key}, error: {e}")
-                        continue
-                
-                payload.update(extra_dict)
+                payload.update(to_jsonable(tel.extra))
             
             # If adapter has a mapper and register map, ensure all registers are included
             if hasattr(rt.adapter, 'mapper') and rt.adapter.mapper and hasattr(rt.adapter, 'regs') and rt.adapter.regs:
@@ -2344,12 +2487,6 @@ class SolarApp:
                         elif standard_id in tel.extra:
                             payload[standard_id] = tel.extra[standard_id]
             
-            # Ensure backward compatibility - keep device-specific keys too
-            # Note: extra_dict already contains all keys from tel.extra, so this is redundant
-            # But we keep it for safety in case extra_dict was filtered
-            # Values are already serialized in extra_dict above, so we can safely add them
-            # (This section is now mostly redundant but kept for clarity)
-            
             # Add inverter metadata (phase type, inverter count)
             from solarhub.inverter_metadata import get_inverter_metadata, get_publishable_fields
             
@@ -2388,12 +2525,12 @@ class SolarApp:
             
             # publish availability (retain)
             log.debug(f"Publishing availability for {rt.cfg.id}")
-            self.mqtt.pub(f"{self.cfg.mqtt.base_topic}/{rt.cfg.id}/availability", "online", retain=True)
+            self.mqtt.pub_state(f"{self.cfg.mqtt.base_topic}/{rt.cfg.id}/availability", "online", retain=True)
             
             # publish flat data to the ONLY state topic we'll use for HA entities
             log.debug(f"Publishing telemetry data for {rt.cfg.id} to MQTT")
             try:
-                self.mqtt.pub(f"{self.cfg.mqtt.base_topic}/{rt.cfg.id}/regs", payload, retain=False)
+                self.mqtt.pub_state(f"{self.cfg.mqtt.base_topic}/{rt.cfg.id}/regs", payload, retain=False)
             except Exception as e:
                 log.error(f"Failed to publish telemetry to MQTT for {rt.cfg.id}: {e}", exc_info=True)
                 # Don't raise - continue with other operations
@@ -2419,6 +2556,13 @@ class SolarApp:
             log.debug(f"Storing telemetry for {rt.cfg.id} in database")
             self.logger.insert_sample(rt.cfg.id, tel)
             
+            # Advance the settings shadow refresh on this loop, after the telemetry went out
+            if hasattr(rt.adapter, 'refresh_shadow'):
+                try:
+                    await rt.actor.call(Priority.SETTINGS, rt.adapter.refresh_shadow, key="refresh_shadow")
+                except Exception as e:
+                    log.debug(f"Register shadow refresh failed for {rt.cfg.id}: {e}")
+            
             # Aggregate and store array telemetry from hierarchy
             array = None
             array_inverter_ids = []
@@ -2553,7 +2697,7 @@ class SolarApp:
                     self.array_last[tel.array_id] = array_tel
                     # Publish array telemetry to MQTT
                     array_topic = f"{self.cfg.mqtt.base_topic}/arrays/{tel.array_id}/state"
-                    self.mqtt.pub(array_topic, array_tel.model_dump(), retain=False)
+                    self.mqtt.pub_state(array_topic, array_tel.model_dump(), retain=False)
             
             acc = self._energy_acc.setdefault(rt.cfg.id, {"last_ts": None, "wh": 0.0})
             if tel.pv_power_w is not None:
@@ -2577,7 +2721,8 @@ class SolarApp:
                 "max_charge_a": rt.cfg.safety.max_charge_a,
                 "max_discharge_a": rt.cfg.safety.max_discharge_a,
             }
-            self.mqtt.pub(f"{self.cfg.mqtt.base_topic}/{rt.cfg.id}/cfg_state", cfg_state)
+            # Retained: only sent again when the limits change
+            self.mqtt.pub_state(f"{self.cfg.mqtt.base_topic}/{rt.cfg.id}/cfg_state", cfg_state, retain=True)
         except Exception as e:
             log.warning("Poll failed for %s: %s", rt.cfg.id, e)
             # Only count as failure if it's a real error (not just disconnected client)
@@ -2662,19 +2807,43 @@ class SolarApp:
                     system_id, system_arrays, meter_telemetry, battery_bank_telemetry,
                     meter_configs=meter_configs if meter_configs else None
                 )
+                self.home_last[system_id] = system_tel
                 
                 # Publish system telemetry to MQTT
                 system_topic = f"{self.cfg.mqtt.base_topic}/systems/{system_id}/state"
-                self.mqtt.pub(system_topic, system_tel.model_dump(), retain=False)
+                self.mqtt.pub_state(system_topic, system_tel.model_dump(), retain=False)
                 log.debug(f"Published system telemetry to {system_topic}")
                 
                 # Also publish to legacy home topic for backward compatibility
                 home_topic = f"{self.cfg.mqtt.base_topic}/home/{system_id}/state"
-                self.mqtt.pub(home_topic, system_tel.model_dump(), retain=False)
+                self.mqtt.pub_state(home_topic, system_tel.model_dump(), retain=False)
                 log.debug(f"Published home telemetry (legacy) to {home_topic}")
         except Exception as e:
             log.warning(f"Failed to aggregate and publish system/home telemetry: {e}", exc_info=True)
 
+    def _publish_live_state(self):
+        """Hand the latest telemetry of every device to the live-stream hub (one frame per cycle)."""
+        def as_dict(tel):
+            if isinstance(tel, dict):
+                return tel
+            if hasattr(tel, 'model_dump'):
+                return tel.model_dump(mode="json")
+            return tel.dict()
+
+        try:
+            batteries = self.battery_last if isinstance(self.battery_last, dict) else {"legacy": self.battery_last}
+            state = {
+                "inverter": {rt.cfg.id: as_dict(rt.adapter.last_tel) for rt in self.inverters
+                             if getattr(rt.adapter, 'last_tel', None)},
+                "array": {aid: as_dict(t) for aid, t in self.array_last.items() if t},
+                "battery": {bid: as_dict(t) for bid, t in batteries.items() if t},
+                "meter": {mid: as_dict(t) for mid, t in self.meter_last.items() if t},
+                "home": {sid: as_dict(t) for sid, t in self.home_last.items() if t},
+            }
+            self.live_stream.publish(state)
+        except Exception as e:
+            log.warning(f"Failed to publish live telemetry frame: {e}", exc_info=True)
+
     # --- Live telemetry access for API ---
     def get_now(self, inverter_id: str) -> Dict[str, Any] | None:
         try:
@@ -2890,7 +3059,7 @@ class SolarApp:
             base = f"{self.cfg.mqtt.base_topic}/battery/{actual_bank_id}"
             
             # Bank-level
-            self.mqtt.pub(f"{base}/availability", "online", retain=True)
+            self.mqtt.pub_state(f"{base}/availability", "online", retain=True)
             payload = tel.model_dump()
             payload.update(tel.extra or {})
             # Ensure bank_id in payload matches what we're using
@@ -2904,7 +3073,7 @@ class SolarApp:
                     pass
             # Log what we're publishing for debugging
             log.info(f"Publishing battery bank data: bank_id={actual_bank_id}, topic={base}/regs, has_soc={payload.get('soc') is not None}, has_voltage={payload.get('voltage') is not None}, has_power={payload.get('power') is not None}")
-            self.mqtt.pub(f"{base}/regs", payload, retain=False)
+            self.mqtt.pub_state(f"{base}/regs", payload, retain=False)
             log.debug(f"Published battery bank data to {base}/regs with payload keys: {list(payload.keys())}")
 
             # Battery-level (each unit) - publish discovery if not already done
@@ -2918,7 +3087,7 @@ class SolarApp:
                             dev_payload["power"] = round(power, 1)
                         except (ValueError, TypeError):
                             pass
-                    self.mqtt.pub(f"{base}/{dev.power}/regs", dev_payload, retain=False)
+                    self.mqtt.pub_state(f"{base}/{dev.power}/regs", dev_payload, retain=False)
                     log.debug(f"Published battery unit {dev.power} data to {base}/{dev.power}/regs")
                     
                     # Publish discovery for this unit if not already done (check on first poll)
@@ -2947,6 +3116,7 @@ class SolarApp:
                 # Track discovered cells to avoid republishing discovery
                 if not hasattr(self, '_battery_cells_discovered'):
                     self._battery_cells_discovered = set()
+                packed_cells = self.cfg.mqtt.publish.packed_cells
                 
                 for entry in tel.cells_data:
                     p = entry.get("power")
@@ -2957,7 +3127,9 @@ class SolarApp:
                     # publish stats except the 'cells' list
                     stats = {k: v for k, v in entry.items() if k not in ("cells", "power")}
                     if stats:
-                        self.mqtt.pub(f"{base}/{p}/cells_stats", stats, retain=False)
+                        self.mqtt.pub_state(f"{base}/{p}/cells_stats", stats, retain=False)
+                    # Packed mode: every cell of the unit in one payload, keyed cell_<n>_<field>
+                    unit_cells_payload = {}
                     for cell in cells:
                         cidx = cell.get("cell")
                         if not cidx:
@@ -2971,8 +3143,12 @@ class SolarApp:
                             except (ValueError, TypeError):
                                 pass
                         # Publish cell data
-                        self.mqtt.pub(f"{base}/{p}/cells/{cidx}/regs", cell_payload, retain=False)
-                        log.debug(f"Published cell {cidx} data for battery {p} to {base}/{p}/cells/{cidx}/regs")
+                        if packed_cells:
+                            unit_cells_payload.update(
+                                {f"cell_{cidx}_{k}": v for k, v in cell_payload.items() if k != "cell"})
+                        else:
+                            self.mqtt.pub_state(f"{base}/{p}/cells/{cidx}/regs", cell_payload, retain=False)
+                            log.debug(f"Published cell {cidx} data for battery {p} to {base}/{p}/cells/{cidx}/regs")
                         
                         # Publish discovery for this cell if not already done
                         cell_key = f"{actual_bank_id}:{p}:{cidx}"
@@ -2983,12 +3159,15 @@ class SolarApp:
                                     bank_id=actual_bank_id,
                                     unit_power=p,
                                     cell_index=cidx,
-                                    bank_name=bank_name
+                                    bank_name=bank_name,
+                                    packed=packed_cells
                                 )
                                 self._battery_cells_discovered.add(cell_key)
                                 log.debug(f"Published HA discovery for cell {cidx} in battery unit {p} of bank {actual_bank_id}")
                             except Exception as e:
                                 log.error(f"Failed to publish discovery for cell {cidx} in battery {p}: {e}", exc_info=True)
+                    if unit_cells_payload:
+                        self.mqtt.pub_state(f"{base}/{p}/cells/regs", unit_cells_payload, retain=False)
             else:
                 log.warning("No cells_data available in battery telemetry")
             
@@ -3056,14 +3235,14 @@ class SolarApp:
                     f"Frequency: {tel.grid_frequency_hz}Hz, Energy: {tel.energy_kwh}kWh")
             
             # Publish availability
-            self.mqtt.pub(f"{self.cfg.mqtt.base_topic}/meter/{rt.cfg.id}/availability", "online", retain=True)
+            self.mqtt.pub_state(f"{self.cfg.mqtt.base_topic}/meter/{rt.cfg.id}/availability", "online", retain=True)
             
             # Publish telemetry
             payload = tel.model_dump()
             if tel.extra:
                 payload.update(tel.extra)
             
-            self.mqtt.pub(f"{self.cfg.mqtt.base_topic}/meter/{rt.cfg.id}/regs", payload, retain=False)
+            self.mqtt.pub_state(f"{self.cfg.mqtt.base_topic}/meter/{rt.cfg.id}/regs", payload, retain=False)
             log.debug(f"Published meter {rt.cfg.id} telemetry to MQTT")
             
             # Store in database
@@ -13,14 +13,30 @@ Notes / Limitations (v1):
 - Battery flows are intentionally ignored.
 - Capacity and forecasting calculations are simple approximations and can be
   refined later without changing the public API shape.
+
+The year simulation loads the year's hourly_energy rows once into NumPy
+arrays and splits them into billing months and peak/off-peak with an
+hour-of-day mask. Loaded arrays and results are cached by database
+high-water mark (row count and max rowid of the year), results also by
+billing config hash, so repeated API calls and tariff what-if sweeps reuse
+the same load.
 """
 
+import copy
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass, asdict
 from datetime import datetime, date, timedelta, time as dtime
 from typing import List, Dict, Any, Optional, Tuple
 
+import numpy as np
+
 from .config import BillingConfig
 from .energy_calculator import EnergyCalculator
+from .logging.read_pool import read_connection
 from .meter_energy_calculator import MeterEnergyCalculator
 from .timezone_utils import get_configured_timezone, to_configured
 import logging
@@ -55,6 +71,32 @@ class BillingMonthBill:
     credit_balance_after: float
 
 
+@dataclass
+class HourlyEnergyArrays:
+    """hourly_energy rows of a date span as parallel arrays (one element per date and hour)."""
+    day: np.ndarray  # datetime64[D], local date
+    hour: np.ndarray  # local hour of day
+    grid_import: np.ndarray
+    grid_export: np.ndarray
+    solar: np.ndarray
+    load: np.ndarray
+
+
+def _compute_config_hash(billing_cfg: BillingConfig) -> str:
+    """Compute hash of billing config for auditability."""
+    cfg_dict = {
+        "anchor_day": billing_cfg.anchor_day,
+        "price_offpeak_import": billing_cfg.price_offpeak_import,
+        "price_peak_import": billing_cfg.price_peak_import,
+        "price_offpeak_settlement": billing_cfg.price_offpeak_settlement,
+        "price_peak_settlement": billing_cfg.price_peak_settlement,
+        "fixed_charge": billing_cfg.fixed_charge_per_billing_month,
+        "peak_windows": [{"start": w.start, "end": w.end} for w in (billing_cfg.peak_windows or [])],
+    }
+    cfg_json = json.dumps(cfg_dict, sort_keys=True)
+    return hashlib.sha256(cfg_json.encode()).hexdigest()[:16]
+
+
 def _parse_hhmm(value: str) -> dtime:
     """Parse HH:MM into datetime.time."""
     hour, minute = value.split(":")
@@ -79,6 +121,22 @@ def _is_peak_time(time_str: str, billing_cfg: BillingConfig) -> bool:
     return False
 
 
+def _peak_hour_mask(billing_cfg: BillingConfig) -> np.ndarray:
+    """24 booleans: whether hour HH:00 is within a peak window (same rule as _is_peak_time)."""
+    mask = np.zeros(24, dtype=bool)
+    for win in billing_cfg.peak_windows or []:
+        start = _parse_hhmm(win.start)
+        end = _parse_hhmm(win.end)
+        for hour in range(24):
+            if start <= dtime(hour=hour) < end:
+                mask[hour] = True
+    return mask
+
+
+def _hour_of(time_str: str) -> int:
+    return int(time_str.split(":")[0])
+
+
 def _billing_month_boundaries(year: int, anchor_day: int, tz) -> List[Tuple[datetime, datetime, str]]:
     """
     Compute billing month boundaries for a given calendar year.
@@ -131,6 +189,7 @@ def _aggregate_hourly_for_billing_month(
         start=start_local,
         end=end_local,
     )
+    peak_hours = _peak_hour_mask(billing_cfg)
 
     for row in data:
         # row: {'time': 'HH:00', 'solar': kwh, 'load': kwh, 'battery_charge': kwh, 'battery_discharge': kwh,
@@ -144,7 +203,7 @@ def _aggregate_hourly_for_billing_month(
         energy.solar_kwh += solar
         energy.load_kwh += load
 
-        if _is_peak_time(time_str, billing_cfg):
+        if peak_hours[_hour_of(time_str)]:
             energy.import_peak_kwh += grid_import
             energy.export_peak_kwh += grid_export
         else:
@@ -250,6 +309,8 @@ def _aggregate_meter_hourly_for_billing_month(
         end=end_local,
     )
 
+    peak_hours = _peak_hour_mask(billing_cfg)
+
     # Aggregate all hours (meter data + fallback data)
     for date_hour_key, row in sorted(meter_data_map.items()):
         # Extract time string for peak/off-peak determination
@@ -265,7 +326,7 @@ def _aggregate_meter_hourly_for_billing_month(
         grid_export = float(row.get("export", 0.0) or 0.0)
 
         # Solar and load remain 0.0 (meters don't provide this data)
-        if _is_peak_time(time_str, billing_cfg):
+        if peak_hours[_hour_of(time_str)]:
             energy.import_peak_kwh += grid_import
             energy.export_peak_kwh += grid_export
         else:
@@ -275,6 +336,155 @@ def _aggregate_meter_hourly_for_billing_month(
     return energy
 
 
+_ARRAY_CACHE_SIZE = 8
+_RESULT_CACHE_SIZE = 128
+_array_cache: "OrderedDict[tuple, HourlyEnergyArrays]" = OrderedDict()
+_result_cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cache_get(cache: OrderedDict, key: tuple) -> Any:
+    with _cache_lock:
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+
+def _cache_put(cache: OrderedDict, key: tuple, value: Any, size: int) -> None:
+    with _cache_lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > size:
+            cache.popitem(last=False)
+
+
+def clear_billing_cache() -> None:
+    """Forget cached hourly arrays and simulation results (tests, data rebuilds)."""
+    with _cache_lock:
+        _array_cache.clear()
+        _result_cache.clear()
+
+
+def _hourly_energy_high_water_mark(conn, inverter_id: str, start_date: str,
+                                   end_date: str) -> Optional[Tuple[int, int]]:
+    """
+    (row count, max rowid) of the span: changes whenever a row is written or
+    removed (INSERT OR REPLACE gives the new row a new rowid). None without
+    an hourly_energy table.
+    """
+    try:
+        return _count_and_max_rowid(conn, inverter_id, start_date, end_date)
+    except sqlite3.OperationalError as e:
+        log.debug(f"hourly_energy not readable: {e}")
+        return None
+
+
+def _count_and_max_rowid(conn, inverter_id: str, start_date: str, end_date: str) -> Tuple[int, int]:
+    if inverter_id == "all":
+        row = conn.execute(
+            "SELECT COUNT(*), MAX(rowid) FROM hourly_energy WHERE date >= ? AND date <= ?",
+            (start_date, end_date),
+        ).fetchone()
+    else:
+        row = conn.execute(
+            "SELECT COUNT(*), MAX(rowid) FROM hourly_energy WHERE inverter_id = ? AND date >= ? AND date <= ?",
+            (inverter_id, start_date, end_date),
+        ).fetchone()
+    return int(row[0] or 0), int(row[1] or 0)
+
+
+def _empty_arrays() -> HourlyEnergyArrays:
+    empty = np.zeros(0)
+    return HourlyEnergyArrays(np.zeros(0, dtype="datetime64[D]"), np.zeros(0, dtype=np.int64),
+                              empty, empty, empty, empty)
+
+
+def _load_hourly_arrays(conn, inverter_id: str, start_date: str, end_date: str) -> HourlyEnergyArrays:
+    """
+    hourly_energy rows between two local dates (inclusive) as arrays.
+
+    Same rows and rounding as EnergyCalculator.get_hourly_energy_data ("all"
+    sums every inverter per date and hour).
+    """
+    if inverter_id == "all":
+        rows = conn.execute("""
+            SELECT date, hour_start, SUM(grid_import_energy_kwh), SUM(grid_export_energy_kwh),
+                   SUM(solar_energy_kwh), SUM(load_energy_kwh)
+            FROM hourly_energy
+            WHERE date >= ? AND date <= ?
+            GROUP BY date, hour_start
+            ORDER BY date, hour_start
+        """, (start_date, end_date)).fetchall()
+    else:
+        rows = conn.execute("""
+            SELECT date, hour_start, grid_import_energy_kwh, grid_export_energy_kwh,
+                   solar_energy_kwh, load_energy_kwh
+            FROM hourly_energy
+            WHERE inverter_id = ? AND date >= ? AND date <= ?
+            ORDER BY date, hour_start
+        """, (inverter_id, start_date, end_date)).fetchall()
+
+    if not rows:
+        return _empty_arrays()
+    days, hours, *values = zip(*rows)
+    # round() as get_hourly_energy_data does (np.round can differ by 0.001 on decimal ties)
+    kwh = np.array([[round(v or 0, 3) for v in column] for column in values], dtype=float)
+    return HourlyEnergyArrays(
+        day=np.array(days, dtype="datetime64[D]"),
+        hour=np.array(hours, dtype=np.int64),
+        grid_import=kwh[0],
+        grid_export=kwh[1],
+        solar=kwh[2],
+        load=kwh[3],
+    )
+
+
+def _aggregate_billing_months(
+    arrays: HourlyEnergyArrays,
+    months_def: List[Tuple[datetime, datetime, str]],
+    billing_cfg: BillingConfig,
+) -> List[BillingMonthEnergy]:
+    """Split hourly arrays into billing months and peak/off-peak in one pass per metric."""
+    n = len(months_def)
+    edges = np.array([to_configured(start).date() for start, _, _ in months_def]
+                     + [to_configured(months_def[-1][1]).date()], dtype="datetime64[D]")
+    month = np.searchsorted(edges, arrays.day, side="right") - 1
+    inside = (month >= 0) & (month < n)
+    month = month[inside]
+    peak = _peak_hour_mask(billing_cfg)[arrays.hour[inside]]
+
+    def per_month(values: np.ndarray, where: Optional[np.ndarray] = None) -> np.ndarray:
+        values = values[inside]
+        if where is not None:
+            values = np.where(where, values, 0.0)
+        return np.bincount(month, weights=values, minlength=n)
+
+    import_peak = per_month(arrays.grid_import, peak)
+    import_off = per_month(arrays.grid_import, ~peak)
+    export_peak = per_month(arrays.grid_export, peak)
+    export_off = per_month(arrays.grid_export, ~peak)
+    solar = per_month(arrays.solar)
+    load = per_month(arrays.load)
+
+    energies = []
+    for i, (start, end, _label) in enumerate(months_def):
+        start_local = to_configured(start)
+        end_local = to_configured(end - timedelta(seconds=1))
+        energies.append(BillingMonthEnergy(
+            label=f"{start_local.strftime('%Y-%m-%d')}:{end_local.strftime('%Y-%m-%d')}",
+            start=start_local,
+            end=end_local,
+            import_off_kwh=float(import_off[i]),
+            import_peak_kwh=float(import_peak[i]),
+            export_off_kwh=float(export_off[i]),
+            export_peak_kwh=float(export_peak[i]),
+            solar_kwh=float(solar[i]),
+            load_kwh=float(load[i]),
+        ))
+    return energies
+
+
 def simulate_billing_year(
     db_path: str,
     billing_cfg: BillingConfig,
@@ -290,11 +500,42 @@ def simulate_billing_year(
       - 'summary': annual totals & final credit balance
     """
     tz = get_configured_timezone()
-    energy_calc = EnergyCalculator(db_path)
 
     # Determine billing months
     months_def = _billing_month_boundaries(year, billing_cfg.anchor_day, tz)
+    start_date = to_configured(months_def[0][0]).strftime("%Y-%m-%d")
+    end_date = to_configured(months_def[-1][1] - timedelta(seconds=1)).strftime("%Y-%m-%d")
+
+    with read_connection(db_path) as conn:
+        high_water = _hourly_energy_high_water_mark(conn, inverter_id, start_date, end_date)
+        data_key = (db_path, inverter_id, start_date, end_date, high_water)
+        result_key = data_key + (str(tz), year, _compute_config_hash(billing_cfg))
+        cached = _cache_get(_result_cache, result_key)
+        if cached is not None:
+            return copy.deepcopy(cached)
+        arrays = _cache_get(_array_cache, data_key)
+        if arrays is None:
+            if high_water is None:
+                arrays = _empty_arrays()
+            else:
+                arrays = _load_hourly_arrays(conn, inverter_id, start_date, end_date)
+            _cache_put(_array_cache, data_key, arrays, _ARRAY_CACHE_SIZE)
+
+    log.debug(f"simulate_billing_year: inverter_id={inverter_id}, {start_date}..{end_date}, "
+              f"rows={len(arrays.day)}")
+    energies = _aggregate_billing_months(arrays, months_def, billing_cfg)
+    result = _bill_months(months_def, energies, billing_cfg, year)
+    _cache_put(_result_cache, result_key, result, _RESULT_CACHE_SIZE)
+    return copy.deepcopy(result)
 
+
+def _bill_months(
+    months_def: List[Tuple[datetime, datetime, str]],
+    energies: List[BillingMonthEnergy],
+    billing_cfg: BillingConfig,
+    year: int,
+) -> Dict[str, Any]:
+    """Apply cycle netting, charges and credit carry-forward to the monthly energy of a year."""
     # 3‑month cycle credit pools (kWh)
     credits_off_cycle = 0.0
     credits_peak_cycle = 0.0
@@ -311,14 +552,7 @@ def simulate_billing_year(
     total_export_off = 0.0
     total_export_peak = 0.0
 
-    for idx, (start, end, label) in enumerate(months_def):
-        energy = _aggregate_hourly_for_billing_month(
-            energy_calc=energy_calc,
-            inverter_id=inverter_id,
-            start=start,
-            end=end,
-            billing_cfg=billing_cfg,
-        )
+    for idx, ((start, end, label), energy) in enumerate(zip(months_def, energies)):
 
         total_solar += energy.solar_kwh
         total_load += energy.load_kwh
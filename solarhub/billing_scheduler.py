@@ -10,8 +10,6 @@ Runs daily at 00:30 local time to:
 
 import sqlite3
 import logging
-import hashlib
-import json
 from datetime import datetime, date, timedelta
 from typing import Dict, Any, Optional, Tuple
 from dataclasses import dataclass
@@ -22,6 +20,7 @@ from .billing_engine import (
     _billing_month_boundaries,
     _aggregate_hourly_for_billing_month,
     _aggregate_meter_hourly_for_billing_month,
+    _compute_config_hash,
 )
 from .energy_calculator import EnergyCalculator
 from .meter_energy_calculator import MeterEnergyCalculator
@@ -55,21 +54,6 @@ class DailySnapshot:
     surplus_deficit_flag: str
 
 
-def _compute_config_hash(billing_cfg: BillingConfig) -> str:
-    """Compute hash of billing config for auditability."""
-    cfg_dict = {
-        "anchor_day": billing_cfg.anchor_day,
-        "price_offpeak_import": billing_cfg.price_offpeak_import,
-        "price_peak_import": billing_cfg.price_peak_import,
-        "price_offpeak_settlement": billing_cfg.price_offpeak_settlement,
-        "price_peak_settlement": billing_cfg.price_peak_settlement,
-        "fixed_charge": billing_cfg.fixed_charge_per_billing_month,
-        "peak_windows": [{"start": w.start, "end": w.end} for w in (billing_cfg.peak_windows or [])],
-    }
-    cfg_json = json.dumps(cfg_dict, sort_keys=True)
-    return hashlib.sha256(cfg_json.encode()).hexdigest()[:16]
-
-
 def _get_current_billing_month(today: date, anchor_day: int, tz) -> Tuple[datetime, datetime, str]:
     """Get current billing month boundaries for a given date."""
     # Find the billing month that contains today
@@ -2,6 +2,33 @@ from typing import Optional, List, Dict, Any
 from pydantic import BaseModel, Field, model_validator
 from datetime import time
 
+class MqttDeadband(BaseModel):
+    """A field is 'changed' when it moved by more than abs OR more than rel x |last published value|."""
+    abs: float = Field(default=0.0, ge=0.0)
+    rel: float = Field(default=0.0, ge=0.0)
+
+class MqttPublishConfig(BaseModel):
+    """Change-only publishing of telemetry state topics (regs, availability, cfg_state)."""
+    enabled: bool = True
+    min_interval_s: float = Field(default=0.0, ge=0.0, description="Never publish one topic more often than this")
+    max_interval_s: float = Field(default=300.0, ge=0.0, description="Republish an unchanged non-retained topic after this (0 = never)")
+    # Deadbands by field name; fnmatch patterns allowed (e.g. "*_voltage"), first match wins
+    deadbands: Dict[str, MqttDeadband] = Field(default_factory=dict)
+    default_deadband: MqttDeadband = MqttDeadband()
+    # Fields ignored when deciding whether a payload changed (still published); fnmatch patterns
+    ignore_fields: List[str] = Field(default_factory=lambda: ["ts", "timestamp", "last_update*"])
+    # One <bank>/<unit>/cells/regs payload (cell_<n>_<field> keys) instead of a topic per cell
+    packed_cells: bool = False
+
+class MqttDiscoveryConfig(BaseModel):
+    """Home Assistant discovery: retained configs sent only when their content hash changed, in paced batches."""
+    enabled: bool = Field(default=True, description="Skip configs whose hash matches the last published (false = always send)")
+    batch_size: int = Field(default=50, ge=1, description="Configs per batch after the startup budget")
+    batch_interval_s: float = Field(default=0.5, ge=0.0, le=60.0, description="Time between batches")
+    startup_budget: int = Field(default=200, ge=0, description="Configs sent in the first batch")
+    broker_diff: bool = Field(default=False, description="At startup, diff against the configs retained on the broker")
+    broker_diff_timeout_s: float = Field(default=2.0, ge=0.1, le=60.0, description="Quiet time that ends retained collection")
+
 class MqttConfig(BaseModel):
     host: str
     port: int = 1883
@@ -10,11 +37,17 @@ class MqttConfig(BaseModel):
     base_topic: str = "solar/fleet"
     client_id: str = "solar-hub"
     ha_discovery: bool = False
+    publish: MqttPublishConfig = MqttPublishConfig()
+    discovery: MqttDiscoveryConfig = MqttDiscoveryConfig()
 
 class PollingConfig(BaseModel):
     interval_secs: float = Field(ge=0.5, default=2.0)
+    # Bus mode: bound on one device poll (at least the device's poll interval); 0 disables
     timeout_ms: int = 1500
     concurrent: int = 5
+    # "bus": per-bus workers, devices on one bus serialized, each at its own cadence
+    # "cycle": legacy single gather of every device per interval
+    mode: str = "bus"
 
 class SafetyLimits(BaseModel):
     max_batt_voltage_v: float = 60.0
@@ -35,6 +68,15 @@ class InverterAdapterConfig(BaseModel):
     stopbits: int = 1
     bytesize: int = 8
     register_map_file: Optional[str] = None
+    # Block reads of the register map: max words per read and max unused words bridged between registers
+    read_block_max_regs: int = Field(default=64, ge=1, le=125)
+    read_block_max_gap: int = Field(default=8, ge=0, le=64)
+    # Read slow registers (energy counters, writable settings, "poll": "slow") only every N polls
+    slow_register_every: int = Field(default=1, ge=1, le=3600)
+    # Shadow image of the holding registers served to the settings pages: re-read every N seconds
+    # (0 disables it), at most shadow_blocks_per_poll block reads after each poll
+    shadow_refresh_s: int = Field(default=600, ge=0, le=86400)
+    shadow_blocks_per_poll: int = Field(default=2, ge=1, le=32)
     # IAMMeter-specific register addresses (optional, defaults provided)
     voltage_register: Optional[int] = None
     voltage_scale: Optional[int] = None
@@ -90,6 +132,8 @@ class BatteryAdapterConfig(BaseModel):
     # Connection type for jkbms_tcpip: "tcpip" (TCP/IP gateway) or "rtu" (Modbus RTU serial)
     connection_type: Optional[str] = None  # "tcpip" | "rtu" | None (auto-detect: tcpip if host/port set, rtu if serial_port set)
     poll_timeout: Optional[float] = None  # How long to listen per poll in seconds (default: 2.0)
+    # Pytes console: send the per-unit 'pwr N' / 'bat N' commands back to back instead of one paced exchange each
+    console_pipeline: bool = False
 
 class BatteryAdapterConfigWithPriority(BaseModel):
     """Battery adapter configuration with priority for failover support."""
@@ -102,6 +146,7 @@ class BatteryBankConfig(BaseModel):
     name: Optional[str] = None
     adapter: Optional[BatteryAdapterConfig] = None  # Single adapter (backward compatibility)
     adapters: Optional[List[BatteryAdapterConfigWithPriority]] = None  # Multiple adapters with failover support
+    poll_interval_secs: Optional[float] = Field(default=None, ge=0.5)  # Defaults to polling.interval_secs
     
     @model_validator(mode='after')
     def validate_adapters(self):
@@ -125,6 +170,11 @@ class MeterAdapterConfig(BaseModel):
     stopbits: int = 1
     bytesize: int = 8
     register_map_file: Optional[str] = None
+    # Block reads of the register map: max words per read and max unused words bridged between registers
+    read_block_max_regs: int = Field(default=64, ge=1, le=125)
+    read_block_max_gap: int = Field(default=8, ge=0, le=64)
+    # Read slow registers (energy counters, writable settings, "poll": "slow") only every N polls
+    slow_register_every: int = Field(default=1, ge=1, le=3600)
     # IAMMeter-specific register addresses (optional, defaults provided)
     voltage_register: Optional[int] = None
     voltage_scale: Optional[int] = None
@@ -148,6 +198,7 @@ class MeterConfig(BaseModel):
     attachment_target: Optional[str] = None  # "home" or array_id - where this meter is attached
     adapter: MeterAdapterConfig
     system_id: Optional[str] = None  # System this meter belongs to (for HA discovery via_device relationships)
+    poll_interval_secs: Optional[float] = Field(default=None, ge=0.5)  # Defaults to polling.interval_secs
     
     @model_validator(mode='after')
     def set_attachment_target(self):
@@ -172,6 +223,7 @@ class InverterConfig(BaseModel):
     solar: List[SolarArrayParams] = [SolarArrayParams()]
     # Inverter type metadata
     phase_type: Optional[str] = None  # "single" | "three" | None (auto-detect from register)
+    poll_interval_secs: Optional[float] = Field(default=None, ge=0.5)  # Defaults to polling.interval_secs
     # If None, will be auto-detected from inverter_type register or phase data
     
     @model_validator(mode='before')
@@ -199,6 +251,7 @@ class ForecastConfig(BaseModel):
     albedo: float = 0.2
     batt_capacity_kwh: float = 20.0
     load_history_days: int = 14
+    clearsky_cache_dir: Optional[str] = None  # persist clear-sky POA profiles here across restarts
 
 class TariffConfig(BaseModel):
     """Configuration for a single tariff window."""
@@ -333,6 +386,73 @@ class LoggingConfig(BaseModel):
     level: str = "INFO"  # DEBUG, INFO, WARNING, ERROR, CRITICAL
     format: str = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
     ha_debug: bool = False  # Enable debug logging for Home Assistant messages
+    queue: bool = True  # Write log records from a background thread (QueueHandler/QueueListener)
+    queue_size: int = Field(default=10000, ge=1)  # Records buffered for that thread; overflow is dropped and counted
+    json_file: Optional[str] = None  # Rotating JSON-lines log file, e.g. "logs/solarhub.jsonl" (None = console only)
+    json_file_max_mb: float = Field(default=10.0, gt=0)
+    json_file_backups: int = Field(default=5, ge=0)
+    # Logger prefix -> max INFO/DEBUG records per call site every rate_window_s
+    # (e.g. {"solarhub.adapters": 6}); WARNING and above are never limited
+    rate_limits: Dict[str, int] = {}
+    rate_window_s: float = Field(default=60.0, gt=0)
+
+
+class WritePipelineConfig(BaseModel):
+    """Batched telemetry writer: one WAL connection on a dedicated thread, one commit per poll cycle."""
+    enabled: bool = True
+    flush_interval_ms: int = Field(default=1000, ge=10, le=60000, description="Max time a queued write waits before commit")
+    max_queue_size: int = Field(default=10000, ge=100, description="Queued writes before the overflow policy applies")
+    max_batch_size: int = Field(default=5000, ge=1, description="Max writes per transaction")
+    overflow_policy: str = Field(default="drop_oldest", description="Queue full policy: 'block' | 'drop_oldest' | 'drop_newest'")
+    put_timeout_s: float = Field(default=0.5, ge=0.0, le=10.0, description="Max producer wait with the 'block' policy")
+    busy_timeout_ms: int = Field(default=5000, ge=0, description="SQLite busy timeout for the writer connection")
+
+
+class RollupConfig(BaseModel):
+    """Minute/hour rollups (count/sum/min/max and trapezoidal energy) maintained on ingest."""
+    enabled: bool = True
+    max_gap_s: float = Field(default=300.0, ge=1.0, le=3600.0, description="Longest sample gap integrated into energy")
+
+
+class ReadPoolConfig(BaseModel):
+    """Shared read-only connection pool used by API handlers, schedulers and calculators."""
+    enabled: bool = True
+    size: int = Field(default=4, ge=1, le=64, description="Max open read connections per database")
+    acquire_timeout_s: float = Field(default=10.0, ge=0.1, le=120.0, description="Max wait for a free connection")
+    mmap_size_mb: int = Field(default=64, ge=0, le=4096, description="PRAGMA mmap_size per connection")
+    cache_size_kb: int = Field(default=8192, ge=0, description="PRAGMA cache_size per connection")
+    busy_timeout_ms: int = Field(default=5000, ge=0, description="SQLite busy timeout for read connections")
+    cached_statements: int = Field(default=256, ge=0, description="Prepared statements kept per connection")
+
+
+class RetentionTableConfig(BaseModel):
+    """Per-table override of the retention tiers."""
+    enabled: bool = True
+    raw_days: Optional[float] = Field(default=None, gt=0, description="Days of raw rows (default: retention.raw_days)")
+    minute_days: Optional[float] = Field(default=None, gt=0, description="Days of 1-minute aggregates (default: retention.minute_days)")
+
+
+class RetentionConfig(BaseModel):
+    """Tiered retention: raw samples -> 1-minute -> 15-minute aggregates, compacted in small background transactions."""
+    # Array and meter history (HistoryQuery) reads the tiers together with the raw rows;
+    # the battery bank/unit tiers are kept for analysis only (no API history reads them)
+    enabled: bool = False
+    raw_days: float = Field(default=14, gt=0, description="Days raw samples are kept before 1-minute downsampling")
+    minute_days: Optional[float] = Field(default=183, gt=0, description="Days 1-minute aggregates are kept before 15-minute downsampling (null = forever)")
+    tables: Dict[str, RetentionTableConfig] = Field(default_factory=dict, description="Overrides by table name")
+    interval_hours: float = Field(default=6.0, ge=0.1, le=168.0, description="Time between retention passes")
+    chunk_rows: int = Field(default=5000, ge=100, description="Rowids compacted per transaction")
+    pause_ms: int = Field(default=50, ge=0, le=10000, description="Pause between transactions")
+    vacuum_pages_per_step: int = Field(default=2048, ge=1, description="Pages freed per PRAGMA incremental_vacuum step")
+    convert_auto_vacuum: bool = Field(default=False, description="Run one full VACUUM to switch an existing database to auto_vacuum=INCREMENTAL")
+
+
+class DatabaseConfig(BaseModel):
+    """Database access tuning."""
+    write_pipeline: WritePipelineConfig = WritePipelineConfig()
+    rollups: RollupConfig = RollupConfig()
+    read_pool: ReadPoolConfig = ReadPoolConfig()
+    retention: RetentionConfig = RetentionConfig()
 
 
 class BillingPeakWindow(BaseModel):
@@ -443,6 +563,8 @@ class HubConfig(BaseModel):
     meters: Optional[List[MeterConfig]] = None
     smart: SmartConfig = SmartConfig()
     logging: LoggingConfig = LoggingConfig()
+    # Database write/read tuning
+    database: DatabaseConfig = DatabaseConfig()
     # Device discovery configuration
     discovery: DiscoveryConfig = DiscoveryConfig()
     # Billing & capacity analysis configuration
@@ -12,6 +12,7 @@ from typing import Any, Dict, Optional
 from pathlib import Path
 from solarhub.logging.logger import DataLogger
 from solarhub.config import HubConfig
+from solarhub.json_codec import dumps
 from solarhub.timezone_utils import initialize_timezones
 
 log = logging.getLogger(__name__)
@@ -205,7 +206,7 @@ class ConfigurationManager:
             for key, value in flat_configs.items():
                 # Convert value to string for database storage
                 if isinstance(value, (dict, list)):
-                    value_str = json.dumps(value)
+                    value_str = dumps(value)
                 else:
                     value_str = str(value)
                 
@@ -253,7 +254,7 @@ class ConfigurationManager:
         
         # Persist to database
         if self.db_logger:
-            value_str = json.dumps(value) if isinstance(value, (dict, list)) else str(value)
+            value_str = dumps(value) if isinstance(value, (dict, list)) else str(value)
             self.db_logger.set_config(key, value_str, source)
         
         log.info(f"Configuration updated successfully: {key} = {value}")
@@ -281,7 +282,7 @@ class ConfigurationManager:
                         
                         # Persist to database
                         if self.db_logger:
-                            value_str = json.dumps(value) if isinstance(value, (dict, list)) else str(value)
+                            value_str = dumps(value) if isinstance(value, (dict, list)) else str(value)
                             self.db_logger.set_config(key, value_str, source)
                     else:
                         log.debug(f"Configuration value {key} unchanged, skipping update")
@@ -293,7 +294,7 @@ class ConfigurationManager:
                     
                     # Persist to database
                     if self.db_logger:
-                        value_str = json.dumps(value) if isinstance(value, (dict, list)) else str(value)
+                        value_str = dumps(value) if isinstance(value, (dict, list)) else str(value)
                         self.db_logger.set_config(key, value_str, source)
             
             log.info(f"Bulk configuration update completed successfully: {len(changed_values)} values changed out of {len(config_updates)} provided")
@@ -352,7 +353,7 @@ class ConfigurationManager:
             
             # Persist to database
             if self.db_logger:
-                value_str = json.dumps(value) if isinstance(value, (dict, list)) else str(value)
+                value_str = dumps(value) if isinstance(value, (dict, list)) else str(value)
                 self.db_logger.set_config(key, value_str, source)
             
             log.info(f"Single configuration update completed successfully: {key} = {value}")
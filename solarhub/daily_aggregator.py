@@ -11,6 +11,8 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional
 import numpy as np
 
+from solarhub.logging.epoch import day_bounds_ms, epoch_ready
+
 log = logging.getLogger(__name__)
 
 class DailyAggregator:
@@ -100,33 +102,14 @@ class DailyAggregator:
         con = sqlite3.connect(self.db_path)
         
         try:
-            # Get all data for the specific date and inverter
-            query = """
-                SELECT ts, pv_power_w, load_power_w, battery_soc, 
-                       grid_power_w, battery_voltage_v, battery_current_a
-                FROM energy_samples 
-                WHERE DATE(ts) = ? AND inverter_id = ?
-                ORDER BY ts
-            """
-            
-            df = pd.read_sql_query(query, con, params=[date, inverter_id])
+            if epoch_ready(con):
+                df = self._day_samples_epoch(con, date, inverter_id)
+            else:
+                df = self._day_samples_text(con, date, inverter_id)
             
             if df.empty:
                 return None
             
-            # Convert timestamps stored as ISO strings (configured timezone, e.g., +05:00)
-            # Prefer robust ISO8601 parsing and preserve original tz offsets
-            df['ts'] = pd.to_datetime(df['ts'], format='ISO8601', errors='coerce')
-            # Fallback parsing if any failed
-            if df['ts'].isna().any():
-                df.loc[df['ts'].isna(), 'ts'] = pd.to_datetime(df.loc[df['ts'].isna(), 'ts'], errors='coerce')
-            # If any entries are still naive, assume configured timezone
-            if df['ts'].dt.tz is None:
-                try:
-                    from solarhub.timezone_utils import get_configured_timezone
-                    df['ts'] = df['ts'].dt.tz_localize(get_configured_timezone())
-                except Exception:
-                    df['ts'] = df['ts'].dt.tz_localize(None)
             df['hour'] = df['ts'].dt.hour
             
             # Calculate daily aggregations
@@ -191,6 +174,51 @@ class DailyAggregator:
         finally:
             con.close()
     
+    def _day_samples_epoch(self, con: sqlite3.Connection, date: str, inverter_id: str) -> pd.DataFrame:
+        """One day of samples by ts_ms range on the (inverter_id, ts_ms, ...) index, timestamps from integers."""
+        from solarhub.timezone_utils import get_configured_timezone
+        tz = get_configured_timezone()
+        start_ms, end_ms = day_bounds_ms(date, tz)
+        # batt_* carry the same values as battery_* and are part of the covering index
+        query = """
+            SELECT ts_ms, pv_power_w, load_power_w, battery_soc,
+                   grid_power_w, batt_voltage_v AS battery_voltage_v, batt_current_a AS battery_current_a
+            FROM energy_samples
+            WHERE inverter_id = ? AND ts_ms >= ? AND ts_ms < ?
+            ORDER BY ts_ms
+        """
+        df = pd.read_sql_query(query, con, params=[inverter_id, start_ms, end_ms])
+        df.insert(0, 'ts', pd.to_datetime(df.pop('ts_ms'), unit='ms', utc=True).dt.tz_convert(tz))
+        return df
+    
+    def _day_samples_text(self, con: sqlite3.Connection, date: str, inverter_id: str) -> pd.DataFrame:
+        """One day of samples by the text ts (until the ts_ms backfill has finished)."""
+        query = """
+            SELECT ts, pv_power_w, load_power_w, battery_soc, 
+                   grid_power_w, battery_voltage_v, battery_current_a
+            FROM energy_samples 
+            WHERE DATE(ts) = ? AND inverter_id = ?
+            ORDER BY ts
+        """
+        df = pd.read_sql_query(query, con, params=[date, inverter_id])
+        if df.empty:
+            return df
+        
+        # Convert timestamps stored as ISO strings (configured timezone, e.g., +05:00)
+        # Prefer robust ISO8601 parsing and preserve original tz offsets
+        df['ts'] = pd.to_datetime(df['ts'], format='ISO8601', errors='coerce')
+        # Fallback parsing if any failed
+        if df['ts'].isna().any():
+            df.loc[df['ts'].isna(), 'ts'] = pd.to_datetime(df.loc[df['ts'].isna(), 'ts'], errors='coerce')
+        # If any entries are still naive, assume configured timezone
+        if df['ts'].dt.tz is None:
+            try:
+                from solarhub.timezone_utils import get_configured_timezone
+                df['ts'] = df['ts'].dt.tz_localize(get_configured_timezone())
+            except Exception:
+                df['ts'] = df['ts'].dt.tz_localize(None)
+        return df
+    
     def store_daily_summary(self, summary: Dict) -> bool:
         """Store daily summary in database."""
         con = sqlite3.connect(self.db_path)
@@ -1757,4 +1757,61 @@ def migrate_production_data(db_path: str, system_id: str = "system") -> None:
         log.error(f"Production data migration failed: {e}", exc_info=True)
         raise
     finally:
-        con.close()
\ No newline at end of file
+        con.close()
+
+# Sample tables that get an integer ts_ms column (unix milliseconds) next to ts,
+# with composite indexes led by the entity key. SQLite has no INCLUDE clause:
+# trailing columns make an index covering for the queries that read them.
+EPOCH_TS_INDEXES: Dict[str, List[tuple]] = {
+    "energy_samples": [
+        ("idx_energy_samples_inverter_ts_ms",
+         "inverter_id, ts_ms, pv_power_w, load_power_w, grid_power_w, batt_voltage_v, batt_current_a, battery_soc"),
+        ("idx_energy_samples_ts_ms", "ts_ms"),
+    ],
+    "array_samples": [
+        ("idx_array_samples_array_ts_ms",
+         "array_id, ts_ms, pv_power_w, load_power_w, grid_power_w, batt_power_w, batt_soc_pct"),
+    ],
+    "meter_samples": [
+        ("idx_meter_samples_meter_ts_ms", "meter_id, ts_ms, grid_power_w, grid_import_wh, grid_export_wh"),
+    ],
+    "battery_bank_samples": [
+        ("idx_battery_bank_samples_bank_ts_ms", "bank_id, ts_ms, voltage, current, soc"),
+    ],
+    "battery_unit_samples": [
+        ("idx_battery_unit_samples_bank_ts_ms", "bank_id, ts_ms, power"),
+    ],
+}
+
+
+def migrate_to_epoch_timestamps(db_path: str) -> None:
+    """
+    Add an integer ``ts_ms`` column (unix milliseconds) to the sample tables
+    and create the ``(entity, ts_ms, ...)`` indexes.
+
+    New rows get ts_ms from the logger; existing rows are filled by the
+    ``EpochBackfill`` background job, so this step only changes the schema.
+    """
+    con = sqlite3.connect(db_path)
+    cur = con.cursor()
+    
+    try:
+        for table, indexes in EPOCH_TS_INDEXES.items():
+            columns = [row[1] for row in cur.execute(f"PRAGMA table_info({table})")]
+            if not columns:
+                log.info(f"{table} does not exist, skipping ts_ms column")
+                continue
+            if "ts_ms" not in columns:
+                cur.execute(f"ALTER TABLE {table} ADD COLUMN ts_ms INTEGER")
+                log.info(f"Added ts_ms column to {table}")
+            for name, index_columns in indexes:
+                if all(c.strip() in columns + ["ts_ms"] for c in index_columns.split(",")):
+                    cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table}({index_columns})")
+        con.commit()
+        log.info("Epoch timestamp migration completed successfully")
+    except Exception as e:
+        con.rollback()
+        log.error(f"Epoch timestamp migration failed: {e}", exc_info=True)
+        raise
+    finally:
+        con.close()
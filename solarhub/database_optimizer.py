@@ -9,6 +9,8 @@ import logging
 from datetime import datetime, timedelta
 from typing import Optional
 
+from solarhub.logging.retention import auto_vacuum_mode, last_run_summary, reclaim_free_pages
+
 log = logging.getLogger(__name__)
 
 class DatabaseOptimizer:
@@ -78,10 +80,15 @@ class DatabaseOptimizer:
                 con.commit()
                 log.info(f"Cleaned up {count_to_delete} old records (older than {days_to_keep} days)")
                 
-                # Vacuum database to reclaim space
-                cursor.execute("VACUUM")
-                con.commit()
-                log.info("Database vacuumed to reclaim space")
+                # Reclaim space: freed pages in small incremental_vacuum steps, or one full VACUUM
+                # on databases created before auto_vacuum=INCREMENTAL
+                if auto_vacuum_mode(con) == "incremental":
+                    reclaimed = reclaim_free_pages(con)
+                    log.info(f"Database incrementally vacuumed ({reclaimed / (1024 * 1024):.1f} MB reclaimed)")
+                else:
+                    cursor.execute("VACUUM")
+                    con.commit()
+                    log.info("Database vacuumed to reclaim space")
             
             return count_to_delete
             
@@ -109,13 +116,29 @@ class DatabaseOptimizer:
             # Database size
             cursor.execute("SELECT page_count * page_size as size FROM pragma_page_count(), pragma_page_size()")
             db_size_bytes = cursor.fetchone()[0]
+            page_size = cursor.execute("PRAGMA page_size").fetchone()[0]
+            free_pages = cursor.execute("PRAGMA freelist_count").fetchone()[0]
             
-            return {
+            stats = {
                 "total_records": total_records,
                 "oldest_record": min_ts,
                 "newest_record": max_ts,
-                "database_size_mb": round(db_size_bytes / (1024 * 1024), 2)
+                "database_size_mb": round(db_size_bytes / (1024 * 1024), 2),
+                "free_mb": round(free_pages * page_size / (1024 * 1024), 2),
+                "auto_vacuum": auto_vacuum_mode(con),
+                "tables": self._table_sizes(cursor),
             }
+            # Last retention pass (rows compacted, space returned by incremental_vacuum)
+            last_run = last_run_summary(cursor)
+            if last_run:
+                stats["retention"] = {
+                    "last_run_at": last_run.get("at"),
+                    "rows_deleted": last_run.get("rows_deleted", 0),
+                    "rows_aggregated": last_run.get("rows_aggregated", 0),
+                    "space_reclaimed_mb": round(last_run.get("bytes_reclaimed", 0) / (1024 * 1024), 2),
+                    "total_space_reclaimed_mb": round(last_run.get("total_bytes_reclaimed", 0) / (1024 * 1024), 2),
+                }
+            return stats
             
         except Exception as e:
             log.error(f"Failed to get database stats: {e}")
@@ -123,6 +146,26 @@ class DatabaseOptimizer:
         finally:
             con.close()
     
+    @staticmethod
+    def _table_sizes(cursor: sqlite3.Cursor) -> dict:
+        """
+        On-disk size of each table including its indexes (dbstat), or row
+        counts where SQLite is built without the dbstat table.
+        """
+        try:
+            rows = cursor.execute("""
+                SELECT COALESCE(m.tbl_name, d.name), SUM(d.pgsize)
+                FROM dbstat AS d LEFT JOIN sqlite_master AS m ON m.name = d.name
+                WHERE d.aggregate = TRUE
+                GROUP BY 1 ORDER BY 2 DESC
+            """).fetchall()
+            return {name: {"size_mb": round(size / (1024 * 1024), 2)} for name, size in rows}
+        except sqlite3.OperationalError:
+            pass
+        tables = [row[0] for row in cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+        return {name: {"rows": cursor.execute(f'SELECT COUNT(*) FROM "{name}"').fetchone()[0]} for name in tables}
+
     def optimize_database(self) -> None:
         """Run full database optimization."""
         log.info("Starting database optimization...")
@@ -11,6 +11,8 @@ from typing import Optional, Dict, List, Any
 from datetime import datetime
 from dataclasses import dataclass, asdict
 from solarhub.timezone_utils import now_configured_iso
+from solarhub.json_codec import dumps
+from solarhub.logging.read_pool import read_connection
 
 log = logging.getLogger(__name__)
 
@@ -64,8 +66,7 @@ class DeviceRegistry:
     def find_device_by_serial(self, serial_number: str, device_type: str) -> Optional[DeviceEntry]:
         """Find device by serial number and type."""
         normalized_serial = self.normalize_serial(serial_number)
-        con = self._get_connection()
-        try:
+        with read_connection(self.db_path) as con:
             cur = con.cursor()
             cur.execute("""
                 SELECT device_id, device_type, serial_number, port, last_known_port,
@@ -80,13 +81,10 @@ class DeviceRegistry:
             if row:
                 return self._row_to_device_entry(row)
             return None
-        finally:
-            con.close()
     
     def get_device(self, device_id: str) -> Optional[DeviceEntry]:
         """Get device by device_id."""
-        con = self._get_connection()
-        try:
+        with read_connection(self.db_path) as con:
             cur = con.cursor()
             cur.execute("""
                 SELECT device_id, device_type, serial_number, port, last_known_port,
@@ -101,13 +99,10 @@ class DeviceRegistry:
             if row:
                 return self._row_to_device_entry(row)
             return None
-        finally:
-            con.close()
     
     def get_all_devices(self, status_filter: Optional[str] = None) -> List[DeviceEntry]:
         """Get all devices, optionally filtered by status."""
-        con = self._get_connection()
-        try:
+        with read_connection(self.db_path) as con:
             cur = con.cursor()
             if status_filter:
                 cur.execute("""
@@ -131,13 +126,10 @@ class DeviceRegistry:
             
             rows = cur.fetchall()
             return [self._row_to_device_entry(row) for row in rows]
-        finally:
-            con.close()
     
     def get_devices_by_type(self, device_type: str, status_filter: Optional[str] = None) -> List[DeviceEntry]:
         """Get all devices of a specific type."""
-        con = self._get_connection()
-        try:
+        with read_connection(self.db_path) as con:
             cur = con.cursor()
             if status_filter:
                 cur.execute("""
@@ -162,8 +154,6 @@ class DeviceRegistry:
             
             rows = cur.fetchall()
             return [self._row_to_device_entry(row) for row in rows]
-        finally:
-            con.close()
     
     def register_device(self, device: DeviceEntry) -> None:
         """Register a new device or update existing."""
@@ -184,8 +174,8 @@ class DeviceRegistry:
                 """, (
                     device.port,
                     device.port,  # Update last_known_port when port changes
-                    json.dumps(device.port_history),
-                    json.dumps(device.adapter_config),
+                    dumps(device.port_history),
+                    dumps(device.adapter_config),
                     device.status,
                     device.last_seen or now_configured_iso(),
                     device.discovery_timestamp,
@@ -207,8 +197,8 @@ class DeviceRegistry:
                     self.normalize_serial(device.serial_number),
                     device.port,
                     device.port,
-                    json.dumps(device.port_history),
-                    json.dumps(device.adapter_config),
+                    dumps(device.port_history),
+                    dumps(device.adapter_config),
                     device.status,
                     device.failure_count,
                     device.next_retry_time,
@@ -247,7 +237,7 @@ class DeviceRegistry:
             """, (
                 new_port,
                 new_port,
-                json.dumps(port_history),
+                dumps(port_history),
                 now_configured_iso(),
                 device_id
             ))
@@ -339,8 +329,7 @@ class DeviceRegistry:
     def get_devices_ready_for_retry(self) -> List[DeviceEntry]:
         """Get devices that are ready for retry (status=recovering, next_retry_time <= now)."""
         now = now_configured_iso()
-        con = self._get_connection()
-        try:
+        with read_connection(self.db_path) as con:
             cur = con.cursor()
             cur.execute("""
                 SELECT device_id, device_type, serial_number, port, last_known_port,
@@ -356,13 +345,10 @@ class DeviceRegistry:
             
             rows = cur.fetchall()
             return [self._row_to_device_entry(row) for row in rows]
-        finally:
-            con.close()
     
     def get_used_ports(self) -> List[str]:
         """Get list of ports currently in use by active devices."""
-        con = self._get_connection()
-        try:
+        with read_connection(self.db_path) as con:
             cur = con.cursor()
             cur.execute("""
                 SELECT DISTINCT port
@@ -371,8 +357,6 @@ class DeviceRegistry:
             """)
             rows = cur.fetchall()
             return [row[0] for row in rows if row[0]]
-        finally:
-            con.close()
     
     def _row_to_device_entry(self, row: tuple) -> DeviceEntry:
         """Convert database row to DeviceEntry."""
@@ -12,6 +12,9 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional
 import pandas as pd
 from solarhub.timezone_utils import get_configured_timezone, to_configured
+from solarhub.logging import rollups
+from solarhub.logging.read_pool import read_connection
+from solarhub.logging.epoch import epoch_ready, to_ms
 
 log = logging.getLogger(__name__)
 
@@ -164,88 +167,163 @@ class EnergyCalculator:
         start_time_configured = to_configured(start_time)
         end_time_configured = to_configured(end_time)
         
-        conn = self._get_db_connection()
-        cursor = conn.cursor()
+        # Pre-aggregated buckets maintained on ingest (O(buckets) instead of O(samples))
+        energy_data = self.calculate_energy_from_rollups(
+            rollups.SCOPE_INVERTER, inverter_id, start_time_configured, end_time_configured
+        )
+        if energy_data is not None:
+            return energy_data
         
-        try:
-            # Get power data for the time period
-            query = """
-                SELECT 
-                    ts,
-                    pv_power_w,
-                    load_power_w,
-                    batt_voltage_v,
-                    batt_current_a,
-                    grid_power_w
-                FROM energy_samples 
-                WHERE ts >= ? AND ts <= ?
-                AND inverter_id = ?
-                ORDER BY ts
-            """
-            
-            # Use ISO format with space separator to match SQLite TEXT timestamps stored (e.g., 'YYYY-MM-DD HH:MM:SS+05:00')
-            start_str = start_time_configured.isoformat(sep=' ')
-            end_str = end_time_configured.isoformat(sep=' ')
-            cursor.execute(query, (start_str, end_str, inverter_id))
-            rows = cursor.fetchall()
-            
-            if not rows:
-                log.warning(f"No power data found for {inverter_id} between {start_time} and {end_time}")
-                return self._empty_energy_dict()
+        with read_connection(self.db_path) as conn:
+            cursor = conn.cursor()
+            try:
+                # Get power data for the time period
+                query = """
+                    SELECT 
+                        {ts},
+                        pv_power_w,
+                        load_power_w,
+                        batt_voltage_v,
+                        batt_current_a,
+                        grid_power_w
+                    FROM energy_samples 
+                    WHERE {ts} >= ? AND {ts} <= ?
+                    AND inverter_id = ?
+                    ORDER BY {ts}
+                """
+                configured_tz = get_configured_timezone()
+                epoch = epoch_ready(cursor)
+                if epoch:
+                    # Integer range on the covering (inverter_id, ts_ms, ...) index
+                    cursor.execute(query.format(ts="ts_ms"),
+                                   (to_ms(start_time_configured), to_ms(end_time_configured), inverter_id))
+                else:
+                    # Use ISO format with space separator to match SQLite TEXT timestamps stored (e.g., 'YYYY-MM-DD HH:MM:SS+05:00')
+                    start_str = start_time_configured.isoformat(sep=' ')
+                    end_str = end_time_configured.isoformat(sep=' ')
+                    cursor.execute(query.format(ts="ts"), (start_str, end_str, inverter_id))
+                rows = cursor.fetchall()
             
-            # Convert to DataFrame for easier processing
-            df = pd.DataFrame(rows, columns=['ts', 'pv_power_w', 'load_power_w', 'batt_voltage_v', 'batt_current_a', 'grid_power_w'])
-            df['ts'] = pd.to_datetime(df['ts'])
+                if not rows:
+                    log.warning(f"No power data found for {inverter_id} between {start_time} and {end_time}")
+                    return self._empty_energy_dict()
             
-            # Convert timestamps to configured timezone
-            configured_tz = get_configured_timezone()
-            df['ts'] = df['ts'].dt.tz_convert(configured_tz) if df['ts'].dt.tz is not None else df['ts'].dt.tz_localize('UTC').dt.tz_convert(configured_tz)
-            df = df.sort_values('ts')
+                # Convert to DataFrame for easier processing
+                df = pd.DataFrame(rows, columns=['ts', 'pv_power_w', 'load_power_w', 'batt_voltage_v', 'batt_current_a', 'grid_power_w'])
+                if epoch:
+                    df['ts'] = pd.to_datetime(df['ts'], unit='ms', utc=True).dt.tz_convert(configured_tz)
+                else:
+                    df['ts'] = pd.to_datetime(df['ts'])
+                    # Convert timestamps to configured timezone
+                    df['ts'] = df['ts'].dt.tz_convert(configured_tz) if df['ts'].dt.tz is not None else df['ts'].dt.tz_localize('UTC').dt.tz_convert(configured_tz)
+                df = df.sort_values('ts')
             
-            # Calculate battery power from voltage and current
-            df['battery_power_w'] = df['batt_voltage_v'] * df['batt_current_a']
+                # Calculate battery power from voltage and current
+                df['battery_power_w'] = df['batt_voltage_v'] * df['batt_current_a']
             
-            # Calculate time differences for Riemann sum
-            df['time_diff_hours'] = df['ts'].diff().dt.total_seconds() / 3600.0
-            df['time_diff_hours'] = df['time_diff_hours'].fillna(0)
+                # Calculate time differences for Riemann sum
+                df['time_diff_hours'] = df['ts'].diff().dt.total_seconds() / 3600.0
+                df['time_diff_hours'] = df['time_diff_hours'].fillna(0)
             
-            # Calculate energy using Riemann sum (power * time)
-            df['solar_energy_kwh'] = (df['pv_power_w'] * df['time_diff_hours']) / 1000.0
-            df['load_energy_kwh'] = (df['load_power_w'] * df['time_diff_hours']) / 1000.0
-            df['battery_energy_kwh'] = (df['battery_power_w'] * df['time_diff_hours']) / 1000.0
-            df['grid_energy_kwh'] = (df['grid_power_w'] * df['time_diff_hours']) / 1000.0
+                # Calculate energy using Riemann sum (power * time)
+                df['solar_energy_kwh'] = (df['pv_power_w'] * df['time_diff_hours']) / 1000.0
+                df['load_energy_kwh'] = (df['load_power_w'] * df['time_diff_hours']) / 1000.0
+                df['battery_energy_kwh'] = (df['battery_power_w'] * df['time_diff_hours']) / 1000.0
+                df['grid_energy_kwh'] = (df['grid_power_w'] * df['time_diff_hours']) / 1000.0
             
-            # Separate battery charge and discharge
-            df['battery_charge_energy_kwh'] = df['battery_energy_kwh'].where(df['battery_energy_kwh'] > 0, 0)
-            df['battery_discharge_energy_kwh'] = df['battery_energy_kwh'].where(df['battery_energy_kwh'] < 0, 0).abs()
+                # Separate battery charge and discharge
+                df['battery_charge_energy_kwh'] = df['battery_energy_kwh'].where(df['battery_energy_kwh'] > 0, 0)
+                df['battery_discharge_energy_kwh'] = df['battery_energy_kwh'].where(df['battery_energy_kwh'] < 0, 0).abs()
             
-            # Separate grid import and export
-            df['grid_import_energy_kwh'] = df['grid_energy_kwh'].where(df['grid_energy_kwh'] > 0, 0)
-            df['grid_export_energy_kwh'] = df['grid_energy_kwh'].where(df['grid_energy_kwh'] < 0, 0).abs()
+                # Separate grid import and export
+                df['grid_import_energy_kwh'] = df['grid_energy_kwh'].where(df['grid_energy_kwh'] > 0, 0)
+                df['grid_export_energy_kwh'] = df['grid_energy_kwh'].where(df['grid_energy_kwh'] < 0, 0).abs()
             
-            # Sum up the energy for the period
-            energy_data = {
-                'solar_energy_kwh': df['solar_energy_kwh'].sum(),
-                'load_energy_kwh': df['load_energy_kwh'].sum(),
-                'battery_charge_energy_kwh': df['battery_charge_energy_kwh'].sum(),
-                'battery_discharge_energy_kwh': df['battery_discharge_energy_kwh'].sum(),
-                'grid_import_energy_kwh': df['grid_import_energy_kwh'].sum(),
-                'grid_export_energy_kwh': df['grid_export_energy_kwh'].sum(),
-                'avg_solar_power_w': df['pv_power_w'].mean(),
-                'avg_load_power_w': df['load_power_w'].mean(),
-                'avg_battery_power_w': df['battery_power_w'].mean(),
-                'avg_grid_power_w': df['grid_power_w'].mean(),
-                'sample_count': len(df)
-            }
+                # Sum up the energy for the period
+                energy_data = {
+                    'solar_energy_kwh': df['solar_energy_kwh'].sum(),
+                    'load_energy_kwh': df['load_energy_kwh'].sum(),
+                    'battery_charge_energy_kwh': df['battery_charge_energy_kwh'].sum(),
+                    'battery_discharge_energy_kwh': df['battery_discharge_energy_kwh'].sum(),
+                    'grid_import_energy_kwh': df['grid_import_energy_kwh'].sum(),
+                    'grid_export_energy_kwh': df['grid_export_energy_kwh'].sum(),
+                    'avg_solar_power_w': df['pv_power_w'].mean(),
+                    'avg_load_power_w': df['load_power_w'].mean(),
+                    'avg_battery_power_w': df['battery_power_w'].mean(),
+                    'avg_grid_power_w': df['grid_power_w'].mean(),
+                    'sample_count': len(df)
+                }
             
-            log.info(f"Calculated energy for {inverter_id}: {energy_data}")
-            return energy_data
+                log.info(f"Calculated energy for {inverter_id}: {energy_data}")
+                return energy_data
             
-        except Exception as e:
-            log.error(f"Failed to calculate hourly energy: {e}", exc_info=True)
-            return self._empty_energy_dict()
-        finally:
-            conn.close()
+            except Exception as e:
+                log.error(f"Failed to calculate hourly energy: {e}", exc_info=True)
+                return self._empty_energy_dict()
+    
+    def calculate_energy_from_rollups(self, scope: str, entity_id: str,
+                                      start_time: datetime, end_time: datetime) -> Optional[Dict[str, float]]:
+        """
+        Energy for a period from the minute/hour rollup tables.
+        
+        Returns:
+            Same dictionary as calculate_hourly_energy, or None when the period is
+            not covered by rollups (older data, rollups disabled) so callers fall
+            back to the raw samples.
+        """
+        with read_connection(self.db_path) as conn:
+            try:
+                cursor = conn.cursor()
+                if not rollups.covers(cursor, start_time):
+                    return None
+                metrics = ('pv_power_w', 'load_power_w', 'batt_power_w', 'grid_power_w')
+                buckets = rollups.read_hourly(cursor, scope, metrics, start_time, end_time, [entity_id])
+            except sqlite3.OperationalError as e:
+                log.debug(f"Rollups unavailable for {scope} {entity_id}: {e}")
+                return None
+        
+        if not buckets:
+            return None
+        
+        totals = {m: {'count': 0, 'sum': 0.0, 'in': 0.0, 'out': 0.0} for m in metrics}
+        for (_, metric), b in buckets.items():
+            t = totals[metric]
+            t['count'] += b['sample_count']
+            t['sum'] += b['value_sum']
+            t['in'] += b['energy_in_kwh']
+            t['out'] += b['energy_out_kwh']
+        
+        def avg(metric):
+            t = totals[metric]
+            return t['sum'] / t['count'] if t['count'] else 0.0
+        
+        return {
+            'solar_energy_kwh': totals['pv_power_w']['in'] - totals['pv_power_w']['out'],
+            'load_energy_kwh': totals['load_power_w']['in'] - totals['load_power_w']['out'],
+            'battery_charge_energy_kwh': totals['batt_power_w']['in'],
+            'battery_discharge_energy_kwh': totals['batt_power_w']['out'],
+            'grid_import_energy_kwh': totals['grid_power_w']['in'],
+            'grid_export_energy_kwh': totals['grid_power_w']['out'],
+            'avg_solar_power_w': avg('pv_power_w'),
+            'avg_load_power_w': avg('load_power_w'),
+            'avg_battery_power_w': avg('batt_power_w'),
+            'avg_grid_power_w': avg('grid_power_w'),
+            'sample_count': max(t['count'] for t in totals.values()),
+        }
+    
+    def finalize_rollup_hour(self, hour_start: datetime) -> int:
+        """Mark the rollup buckets of a closed hour as final (they are complete once the hour is over)."""
+        hour_start_configured = to_configured(hour_start)
+        
+        def _finalize(conn):
+            return rollups.finalize_hour(conn.cursor(), hour_start_configured)
+        
+        try:
+            return self._execute_with_retry(f"finalize rollups for {hour_start}", _finalize)
+        except sqlite3.OperationalError as e:
+            # Rollup tables don't exist when rollups are disabled
+            log.debug(f"Rollup finalization skipped: {e}")
+            return 0
     
     def _get_inverter_system_id_and_array_id(self, cursor, inverter_id: str) -> tuple:
         """Get system_id and array_id for an inverter from database."""
@@ -324,110 +402,107 @@ class EnergyCalculator:
     
     def get_hourly_energy_data(self, inverter_id: str, start_time: datetime, end_time: datetime) -> List[Dict]:
         """Get hourly energy data from the database."""
-        conn = self._get_db_connection()
-        cursor = conn.cursor()
-        
-        try:
-            # Convert times to configured timezone
-            start_time_configured = to_configured(start_time)
-            end_time_configured = to_configured(end_time)
-            start_date_str = start_time_configured.strftime('%Y-%m-%d')
-            end_date_str = end_time_configured.strftime('%Y-%m-%d')
+        with read_connection(self.db_path) as conn:
+            cursor = conn.cursor()
+            try:
+                # Convert times to configured timezone
+                start_time_configured = to_configured(start_time)
+                end_time_configured = to_configured(end_time)
+                start_date_str = start_time_configured.strftime('%Y-%m-%d')
+                end_date_str = end_time_configured.strftime('%Y-%m-%d')
             
-            # Handle "all" inverter_id by aggregating across all inverters
-            if inverter_id == "all":
-                # Query to aggregate across all inverters, grouped by date and hour
-                # Note: For power values, we sum them (representing total array power)
-                # For energy values, we also sum them (representing total array energy)
-                query = """
-                    SELECT 
-                        date,
-                        hour_start,
-                        SUM(solar_energy_kwh) as solar_energy_kwh,
-                        SUM(load_energy_kwh) as load_energy_kwh,
-                        SUM(battery_charge_energy_kwh) as battery_charge_energy_kwh,
-                        SUM(battery_discharge_energy_kwh) as battery_discharge_energy_kwh,
-                        SUM(grid_import_energy_kwh) as grid_import_energy_kwh,
-                        SUM(grid_export_energy_kwh) as grid_export_energy_kwh,
-                        SUM(avg_solar_power_w) as avg_solar_power_w,
-                        SUM(avg_load_power_w) as avg_load_power_w,
-                        SUM(avg_battery_power_w) as avg_battery_power_w,
-                        SUM(avg_grid_power_w) as avg_grid_power_w,
-                        SUM(sample_count) as sample_count
-                    FROM hourly_energy 
-                    WHERE date >= ? 
-                    AND date <= ?
-                    GROUP BY date, hour_start
-                    ORDER BY date, hour_start
-                """
+                # Handle "all" inverter_id by aggregating across all inverters
+                if inverter_id == "all":
+                    # Query to aggregate across all inverters, grouped by date and hour
+                    # Note: For power values, we sum them (representing total array power)
+                    # For energy values, we also sum them (representing total array energy)
+                    query = """
+                        SELECT 
+                            date,
+                            hour_start,
+                            SUM(solar_energy_kwh) as solar_energy_kwh,
+                            SUM(load_energy_kwh) as load_energy_kwh,
+                            SUM(battery_charge_energy_kwh) as battery_charge_energy_kwh,
+                            SUM(battery_discharge_energy_kwh) as battery_discharge_energy_kwh,
+                            SUM(grid_import_energy_kwh) as grid_import_energy_kwh,
+                            SUM(grid_export_energy_kwh) as grid_export_energy_kwh,
+                            SUM(avg_solar_power_w) as avg_solar_power_w,
+                            SUM(avg_load_power_w) as avg_load_power_w,
+                            SUM(avg_battery_power_w) as avg_battery_power_w,
+                            SUM(avg_grid_power_w) as avg_grid_power_w,
+                            SUM(sample_count) as sample_count
+                        FROM hourly_energy 
+                        WHERE date >= ? 
+                        AND date <= ?
+                        GROUP BY date, hour_start
+                        ORDER BY date, hour_start
+                    """
                 
-                cursor.execute(query, (start_date_str, end_date_str))
-            else:
-                # Single inverter query
-                query = """
-                    SELECT 
-                        date,
-                        hour_start,
-                        solar_energy_kwh,
-                        load_energy_kwh,
-                        battery_charge_energy_kwh,
-                        battery_discharge_energy_kwh,
-                        grid_import_energy_kwh,
-                        grid_export_energy_kwh,
-                        avg_solar_power_w,
-                        avg_load_power_w,
-                        avg_battery_power_w,
-                        avg_grid_power_w,
-                        sample_count
-                    FROM hourly_energy 
-                    WHERE inverter_id = ? 
-                    AND date >= ? 
-                    AND date <= ?
-                    ORDER BY date, hour_start
-                """
+                    cursor.execute(query, (start_date_str, end_date_str))
+                else:
+                    # Single inverter query
+                    query = """
+                        SELECT 
+                            date,
+                            hour_start,
+                            solar_energy_kwh,
+                            load_energy_kwh,
+                            battery_charge_energy_kwh,
+                            battery_discharge_energy_kwh,
+                            grid_import_energy_kwh,
+                            grid_export_energy_kwh,
+                            avg_solar_power_w,
+                            avg_load_power_w,
+                            avg_battery_power_w,
+                            avg_grid_power_w,
+                            sample_count
+                        FROM hourly_energy 
+                        WHERE inverter_id = ? 
+                        AND date >= ? 
+                        AND date <= ?
+                        ORDER BY date, hour_start
+                    """
                 
-                cursor.execute(query, (inverter_id, start_date_str, end_date_str))
+                    cursor.execute(query, (inverter_id, start_date_str, end_date_str))
             
-            rows = cursor.fetchall()
+                rows = cursor.fetchall()
             
-            log.debug(f"get_hourly_energy_data: inverter_id={inverter_id}, "
-                     f"start={start_time_configured}, end={end_time_configured}, "
-                     f"rows_returned={len(rows)}")
+                log.debug(f"get_hourly_energy_data: inverter_id={inverter_id}, "
+                         f"start={start_time_configured}, end={end_time_configured}, "
+                         f"rows_returned={len(rows)}")
             
-            data = []
-            for row in rows:
-                date, hour_start, solar_kwh, load_kwh, batt_charge_kwh, batt_discharge_kwh, grid_import_kwh, grid_export_kwh, avg_solar_w, avg_load_w, avg_batt_w, avg_grid_w, sample_count = row
+                data = []
+                for row in rows:
+                    date, hour_start, solar_kwh, load_kwh, batt_charge_kwh, batt_discharge_kwh, grid_import_kwh, grid_export_kwh, avg_solar_w, avg_load_w, avg_batt_w, avg_grid_w, sample_count = row
                 
-                # Format hour as HH:00
-                hour = f"{hour_start:02d}:00"
-                # Include date+hour for precise matching in fallback logic
-                date_hour = f"{date} {hour}"
+                    # Format hour as HH:00
+                    hour = f"{hour_start:02d}:00"
+                    # Include date+hour for precise matching in fallback logic
+                    date_hour = f"{date} {hour}"
                 
-                data.append({
-                    'time': hour,  # Keep for backward compatibility
-                    'date_hour': date_hour,  # New: date+hour for precise matching
-                    'date': date,  # Include date separately
-                    'hour': hour_start,  # Include hour as integer
-                    'solar': round(solar_kwh or 0, 3),
-                    'load': round(load_kwh or 0, 3),
-                    'battery_charge': round(batt_charge_kwh or 0, 3),
-                    'battery_discharge': round(batt_discharge_kwh or 0, 3),
-                    'grid_import': round(grid_import_kwh or 0, 3),
-                    'grid_export': round(grid_export_kwh or 0, 3),
-                    'avg_solar_power_w': round(avg_solar_w or 0),
-                    'avg_load_power_w': round(avg_load_w or 0),
-                    'avg_battery_power_w': round(avg_batt_w or 0),
-                    'avg_grid_power_w': round(avg_grid_w or 0),
-                    'sample_count': sample_count or 0
-                })
+                    data.append({
+                        'time': hour,  # Keep for backward compatibility
+                        'date_hour': date_hour,  # New: date+hour for precise matching
+                        'date': date,  # Include date separately
+                        'hour': hour_start,  # Include hour as integer
+                        'solar': round(solar_kwh or 0, 3),
+                        'load': round(load_kwh or 0, 3),
+                        'battery_charge': round(batt_charge_kwh or 0, 3),
+                        'battery_discharge': round(batt_discharge_kwh or 0, 3),
+                        'grid_import': round(grid_import_kwh or 0, 3),
+                        'grid_export': round(grid_export_kwh or 0, 3),
+                        'avg_solar_power_w': round(avg_solar_w or 0),
+                        'avg_load_power_w': round(avg_load_w or 0),
+                        'avg_battery_power_w': round(avg_batt_w or 0),
+                        'avg_grid_power_w': round(avg_grid_w or 0),
+                        'sample_count': sample_count or 0
+                    })
             
-            return data
+                return data
             
-        except Exception as e:
-            log.error(f"Failed to get hourly energy data: {e}", exc_info=True)
-            return []
-        finally:
-            conn.close()
+            except Exception as e:
+                log.error(f"Failed to get hourly energy data: {e}", exc_info=True)
+                return []
     
     def calculate_and_store_hourly_energy(self, inverter_id: str, hour_start: datetime):
         """Calculate and store energy data for a specific hour."""
@@ -468,54 +543,51 @@ class EnergyCalculator:
             # date object - assume it's already in configured timezone
             date_str = date.strftime('%Y-%m-%d')
         
-        conn = self._get_db_connection()
-        cursor = conn.cursor()
-        
-        try:
-            query = """
-                SELECT 
-                    SUM(solar_energy_kwh) as total_solar,
-                    SUM(load_energy_kwh) as total_load,
-                    SUM(battery_charge_energy_kwh) as total_battery_charge,
-                    SUM(battery_discharge_energy_kwh) as total_battery_discharge,
-                    SUM(grid_import_energy_kwh) as total_grid_import,
-                    SUM(grid_export_energy_kwh) as total_grid_export,
-                    AVG(avg_solar_power_w) as avg_solar_power,
-                    AVG(avg_load_power_w) as avg_load_power,
-                    AVG(avg_battery_power_w) as avg_battery_power,
-                    AVG(avg_grid_power_w) as avg_grid_power,
-                    SUM(sample_count) as total_samples
-                FROM hourly_energy 
-                WHERE inverter_id = ? 
-                AND date = ?
-            """
+        with read_connection(self.db_path) as conn:
+            cursor = conn.cursor()
+            try:
+                query = """
+                    SELECT 
+                        SUM(solar_energy_kwh) as total_solar,
+                        SUM(load_energy_kwh) as total_load,
+                        SUM(battery_charge_energy_kwh) as total_battery_charge,
+                        SUM(battery_discharge_energy_kwh) as total_battery_discharge,
+                        SUM(grid_import_energy_kwh) as total_grid_import,
+                        SUM(grid_export_energy_kwh) as total_grid_export,
+                        AVG(avg_solar_power_w) as avg_solar_power,
+                        AVG(avg_load_power_w) as avg_load_power,
+                        AVG(avg_battery_power_w) as avg_battery_power,
+                        AVG(avg_grid_power_w) as avg_grid_power,
+                        SUM(sample_count) as total_samples
+                    FROM hourly_energy 
+                    WHERE inverter_id = ? 
+                    AND date = ?
+                """
             
-            cursor.execute(query, (inverter_id, date_str))
+                cursor.execute(query, (inverter_id, date_str))
             
-            row = cursor.fetchone()
+                row = cursor.fetchone()
             
-            if row:
-                return {
-                    'total_solar_kwh': row[0] or 0.0,
-                    'total_load_kwh': row[1] or 0.0,
-                    'total_battery_charge_kwh': row[2] or 0.0,
-                    'total_battery_discharge_kwh': row[3] or 0.0,
-                    'total_grid_import_kwh': row[4] or 0.0,
-                    'total_grid_export_kwh': row[5] or 0.0,
-                    'avg_solar_power_w': row[6] or 0.0,
-                    'avg_load_power_w': row[7] or 0.0,
-                    'avg_battery_power_w': row[8] or 0.0,
-                    'avg_grid_power_w': row[9] or 0.0,
-                    'total_samples': row[10] or 0
-                }
-            else:
-                return self._empty_energy_dict()
+                if row:
+                    return {
+                        'total_solar_kwh': row[0] or 0.0,
+                        'total_load_kwh': row[1] or 0.0,
+                        'total_battery_charge_kwh': row[2] or 0.0,
+                        'total_battery_discharge_kwh': row[3] or 0.0,
+                        'total_grid_import_kwh': row[4] or 0.0,
+                        'total_grid_export_kwh': row[5] or 0.0,
+                        'avg_solar_power_w': row[6] or 0.0,
+                        'avg_load_power_w': row[7] or 0.0,
+                        'avg_battery_power_w': row[8] or 0.0,
+                        'avg_grid_power_w': row[9] or 0.0,
+                        'total_samples': row[10] or 0
+                    }
+                else:
+                    return self._empty_energy_dict()
                 
-        except Exception as e:
-            log.error(f"Failed to get daily energy summary: {e}", exc_info=True)
-            return self._empty_energy_dict()
-        finally:
-            conn.close()
+            except Exception as e:
+                log.error(f"Failed to get daily energy summary: {e}", exc_info=True)
+                return self._empty_energy_dict()
     
     def ensure_24_hour_data(self, inverter_id: str, date: datetime) -> List[Dict]:
         """Ensure we have data for all 24 hours of a day, filling missing hours with zeros."""
@@ -723,76 +795,73 @@ class EnergyCalculator:
         Returns:
             List of hourly energy data dictionaries
         """
-        conn = self._get_db_connection()
-        cursor = conn.cursor()
-        
-        try:
-            # Convert times to configured timezone
-            start_time_configured = to_configured(start_time)
-            end_time_configured = to_configured(end_time)
-            start_date_str = start_time_configured.strftime('%Y-%m-%d')
-            end_date_str = end_time_configured.strftime('%Y-%m-%d')
+        with read_connection(self.db_path) as conn:
+            cursor = conn.cursor()
+            try:
+                # Convert times to configured timezone
+                start_time_configured = to_configured(start_time)
+                end_time_configured = to_configured(end_time)
+                start_date_str = start_time_configured.strftime('%Y-%m-%d')
+                end_date_str = end_time_configured.strftime('%Y-%m-%d')
             
-            query = """
-                SELECT 
-                    date,
-                    hour_start,
-                    solar_energy_kwh,
-                    load_energy_kwh,
-                    battery_charge_energy_kwh,
-                    battery_discharge_energy_kwh,
-                    grid_import_energy_kwh,
-                    grid_export_energy_kwh,
-                    avg_solar_power_w,
-                    avg_load_power_w,
-                    avg_battery_power_w,
-                    avg_grid_power_w,
-                    avg_soc_pct,
-                    sample_count
-                FROM array_hourly_energy 
-                WHERE array_id = ? 
-                AND system_id = ?
-                AND date >= ? 
-                AND date <= ?
-                ORDER BY date, hour_start
-            """
+                query = """
+                    SELECT 
+                        date,
+                        hour_start,
+                        solar_energy_kwh,
+                        load_energy_kwh,
+                        battery_charge_energy_kwh,
+                        battery_discharge_energy_kwh,
+                        grid_import_energy_kwh,
+                        grid_export_energy_kwh,
+                        avg_solar_power_w,
+                        avg_load_power_w,
+                        avg_battery_power_w,
+                        avg_grid_power_w,
+                        avg_soc_pct,
+                        sample_count
+                    FROM array_hourly_energy 
+                    WHERE array_id = ? 
+                    AND system_id = ?
+                    AND date >= ? 
+                    AND date <= ?
+                    ORDER BY date, hour_start
+                """
             
-            cursor.execute(query, (array_id, system_id, start_date_str, end_date_str))
-            rows = cursor.fetchall()
+                cursor.execute(query, (array_id, system_id, start_date_str, end_date_str))
+                rows = cursor.fetchall()
             
-            data = []
-            for row in rows:
-                date, hour_start, solar_kwh, load_kwh, batt_charge_kwh, batt_discharge_kwh, grid_import_kwh, grid_export_kwh, avg_solar_w, avg_load_w, avg_batt_w, avg_grid_w, avg_soc, sample_count = row
+                data = []
+                for row in rows:
+                    date, hour_start, solar_kwh, load_kwh, batt_charge_kwh, batt_discharge_kwh, grid_import_kwh, grid_export_kwh, avg_solar_w, avg_load_w, avg_batt_w, avg_grid_w, avg_soc, sample_count = row
                 
-                hour = f"{hour_start:02d}:00"
-                date_hour = f"{date} {hour}"
+                    hour = f"{hour_start:02d}:00"
+                    date_hour = f"{date} {hour}"
                 
-                data.append({
-                    'time': hour,
-                    'date_hour': date_hour,
-                    'date': date,
-                    'hour': hour_start,
-                    'solar': round(solar_kwh or 0, 3),
-                    'load': round(load_kwh or 0, 3),
-                    'battery_charge': round(batt_charge_kwh or 0, 3),
-                    'battery_discharge': round(batt_discharge_kwh or 0, 3),
-                    'grid_import': round(grid_import_kwh or 0, 3),
-                    'grid_export': round(grid_export_kwh or 0, 3),
-                    'avg_solar_power_w': round(avg_solar_w or 0),
-                    'avg_load_power_w': round(avg_load_w or 0),
-                    'avg_battery_power_w': round(avg_batt_w or 0),
-                    'avg_grid_power_w': round(avg_grid_w or 0),
-                    'avg_soc_pct': round(avg_soc or 0, 2) if avg_soc else None,
-                    'sample_count': sample_count or 0
-                })
+                    data.append({
+                        'time': hour,
+                        'date_hour': date_hour,
+                        'date': date,
+                        'hour': hour_start,
+                        'solar': round(solar_kwh or 0, 3),
+                        'load': round(load_kwh or 0, 3),
+                        'battery_charge': round(batt_charge_kwh or 0, 3),
+                        'battery_discharge': round(batt_discharge_kwh or 0, 3),
+                        'grid_import': round(grid_import_kwh or 0, 3),
+                        'grid_export': round(grid_export_kwh or 0, 3),
+                        'avg_solar_power_w': round(avg_solar_w or 0),
+                        'avg_load_power_w': round(avg_load_w or 0),
+                        'avg_battery_power_w': round(avg_batt_w or 0),
+                        'avg_grid_power_w': round(avg_grid_w or 0),
+                        'avg_soc_pct': round(avg_soc or 0, 2) if avg_soc else None,
+                        'sample_count': sample_count or 0
+                    })
             
-            return data
+                return data
             
-        except Exception as e:
-            log.error(f"Failed to get array hourly energy from table: {e}", exc_info=True)
-            return []
-        finally:
-            conn.close()
+            except Exception as e:
+                log.error(f"Failed to get array hourly energy from table: {e}", exc_info=True)
+                return []
     
     def get_system_hourly_energy_from_table(self, system_id: str, start_time: datetime, end_time: datetime) -> List[Dict]:
         """
@@ -806,75 +875,72 @@ class EnergyCalculator:
         Returns:
             List of hourly energy data dictionaries
         """
-        conn = self._get_db_connection()
-        cursor = conn.cursor()
-        
-        try:
-            # Convert times to configured timezone
-            start_time_configured = to_configured(start_time)
-            end_time_configured = to_configured(end_time)
-            start_date_str = start_time_configured.strftime('%Y-%m-%d')
-            end_date_str = end_time_configured.strftime('%Y-%m-%d')
+        with read_connection(self.db_path) as conn:
+            cursor = conn.cursor()
+            try:
+                # Convert times to configured timezone
+                start_time_configured = to_configured(start_time)
+                end_time_configured = to_configured(end_time)
+                start_date_str = start_time_configured.strftime('%Y-%m-%d')
+                end_date_str = end_time_configured.strftime('%Y-%m-%d')
             
-            query = """
-                SELECT 
-                    date,
-                    hour_start,
-                    solar_energy_kwh,
-                    load_energy_kwh,
-                    battery_charge_energy_kwh,
-                    battery_discharge_energy_kwh,
-                    grid_import_energy_kwh,
-                    grid_export_energy_kwh,
-                    avg_solar_power_w,
-                    avg_load_power_w,
-                    avg_battery_power_w,
-                    avg_grid_power_w,
-                    avg_soc_pct,
-                    sample_count
-                FROM system_hourly_energy 
-                WHERE system_id = ? 
-                AND date >= ? 
-                AND date <= ?
-                ORDER BY date, hour_start
-            """
+                query = """
+                    SELECT 
+                        date,
+                        hour_start,
+                        solar_energy_kwh,
+                        load_energy_kwh,
+                        battery_charge_energy_kwh,
+                        battery_discharge_energy_kwh,
+                        grid_import_energy_kwh,
+                        grid_export_energy_kwh,
+                        avg_solar_power_w,
+                        avg_load_power_w,
+                        avg_battery_power_w,
+                        avg_grid_power_w,
+                        avg_soc_pct,
+                        sample_count
+                    FROM system_hourly_energy 
+                    WHERE system_id = ? 
+                    AND date >= ? 
+                    AND date <= ?
+                    ORDER BY date, hour_start
+                """
             
-            cursor.execute(query, (system_id, start_date_str, end_date_str))
-            rows = cursor.fetchall()
+                cursor.execute(query, (system_id, start_date_str, end_date_str))
+                rows = cursor.fetchall()
             
-            data = []
-            for row in rows:
-                date, hour_start, solar_kwh, load_kwh, batt_charge_kwh, batt_discharge_kwh, grid_import_kwh, grid_export_kwh, avg_solar_w, avg_load_w, avg_batt_w, avg_grid_w, avg_soc, sample_count = row
+                data = []
+                for row in rows:
+                    date, hour_start, solar_kwh, load_kwh, batt_charge_kwh, batt_discharge_kwh, grid_import_kwh, grid_export_kwh, avg_solar_w, avg_load_w, avg_batt_w, avg_grid_w, avg_soc, sample_count = row
                 
-                hour = f"{hour_start:02d}:00"
-                date_hour = f"{date} {hour}"
+                    hour = f"{hour_start:02d}:00"
+                    date_hour = f"{date} {hour}"
                 
-                data.append({
-                    'time': hour,
-                    'date_hour': date_hour,
-                    'date': date,
-                    'hour': hour_start,
-                    'solar': round(solar_kwh or 0, 3),
-                    'load': round(load_kwh or 0, 3),
-                    'battery_charge': round(batt_charge_kwh or 0, 3),
-                    'battery_discharge': round(batt_discharge_kwh or 0, 3),
-                    'grid_import': round(grid_import_kwh or 0, 3),
-                    'grid_export': round(grid_export_kwh or 0, 3),
-                    'avg_solar_power_w': round(avg_solar_w or 0),
-                    'avg_load_power_w': round(avg_load_w or 0),
-                    'avg_battery_power_w': round(avg_batt_w or 0),
-                    'avg_grid_power_w': round(avg_grid_w or 0),
-                    'avg_soc_pct': round(avg_soc or 0, 2) if avg_soc else None,
-                    'sample_count': sample_count or 0
-                })
+                    data.append({
+                        'time': hour,
+                        'date_hour': date_hour,
+                        'date': date,
+                        'hour': hour_start,
+                        'solar': round(solar_kwh or 0, 3),
+                        'load': round(load_kwh or 0, 3),
+                        'battery_charge': round(batt_charge_kwh or 0, 3),
+                        'battery_discharge': round(batt_discharge_kwh or 0, 3),
+                        'grid_import': round(grid_import_kwh or 0, 3),
+                        'grid_export': round(grid_export_kwh or 0, 3),
+                        'avg_solar_power_w': round(avg_solar_w or 0),
+                        'avg_load_power_w': round(avg_load_w or 0),
+                        'avg_battery_power_w': round(avg_batt_w or 0),
+                        'avg_grid_power_w': round(avg_grid_w or 0),
+                        'avg_soc_pct': round(avg_soc or 0, 2) if avg_soc else None,
+                        'sample_count': sample_count or 0
+                    })
             
-            return data
+                return data
             
-        except Exception as e:
-            log.error(f"Failed to get system hourly energy from table: {e}", exc_info=True)
-            return []
-        finally:
-            conn.close()
+            except Exception as e:
+                log.error(f"Failed to get system hourly energy from table: {e}", exc_info=True)
+                return []
     
     def calculate_and_store_array_hourly_energy(self, array_id: str, system_id: str, inverter_ids: List[str], hour_start: datetime):
         """
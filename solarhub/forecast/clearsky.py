@@ -0,0 +1,254 @@
+"""
+Memoized clear-sky plane-of-array irradiance for the PV estimators.
+
+``PvlibSolarEstimator`` used to build a ``pvlib`` Location, run
+``get_clearsky`` / ``get_solarposition`` over the day and transpose to the
+array plane on every call, for every string of every inverter, today and
+tomorrow, on each scheduler tick. None of that depends on the weather: it is
+fixed by (lat, lon, tilt, azimuth, albedo, date, timezone). ``ClearSkyCache``
+computes each day's 15-minute clear-sky POA profile once and keeps it, with
+per-hour and whole-day sums, so an estimate is a weather-factor multiply:
+
+* clear sky and solar position are shared by every array at one location
+* profiles for days before today are evicted when the local date rolls over
+* with ``path`` set (``forecast.clearsky_cache_dir``) profiles are also kept
+  in one ``clearsky-YYYY-MM-DD.npz`` per day, so a restart does not recompute
+  them
+"""
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import date
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+log = logging.getLogger(__name__)
+
+FREQ_MINUTES = 15
+
+# (lat, lon, tz, day) and (lat, lon, tilt, azimuth, albedo, tz, day)
+SkyKey = Tuple[float, float, str, str]
+ProfileKey = Tuple[float, float, float, float, float, str, str]
+
+SkyFn = Callable[[float, float, str, pd.DatetimeIndex], Dict[str, np.ndarray]]
+PoaFn = Callable[[Dict[str, np.ndarray], float, float, float], np.ndarray]
+
+
+def pvlib_sky(lat: float, lon: float, tz: str, times: pd.DatetimeIndex) -> Dict[str, np.ndarray]:
+    """Ineichen clear-sky irradiance and solar position over ``times``."""
+    import pvlib
+
+    location = pvlib.location.Location(lat, lon, tz=tz)
+    cs = location.get_clearsky(times, model='ineichen')
+    solpos = location.get_solarposition(times)
+    return {
+        "dni": cs['dni'].to_numpy(), "ghi": cs['ghi'].to_numpy(), "dhi": cs['dhi'].to_numpy(),
+        "zenith": solpos['apparent_zenith'].to_numpy(), "azimuth": solpos['azimuth'].to_numpy(),
+    }
+
+
+def pvlib_poa(sky: Dict[str, np.ndarray], tilt: float, azimuth: float, albedo: float) -> np.ndarray:
+    """Global plane-of-array irradiance (W/m2) for one array geometry."""
+    import pvlib
+
+    poa = pvlib.irradiance.get_total_irradiance(
+        surface_tilt=tilt, surface_azimuth=azimuth,
+        solar_zenith=sky["zenith"], solar_azimuth=sky["azimuth"],
+        dni=sky["dni"], ghi=sky["ghi"], dhi=sky["dhi"], albedo=albedo)
+    return np.asarray(poa['poa_global'], dtype=float)
+
+
+def day_index(day: date, tz: str, freq_minutes: int = FREQ_MINUTES) -> pd.DatetimeIndex:
+    """Local-time sample instants of ``day`` (DST days have more or fewer of them)."""
+    start = pd.Timestamp(day.isoformat()).tz_localize(tz)
+    return pd.date_range(start, start + pd.Timedelta(days=1), freq=f'{freq_minutes}min', tz=tz, inclusive='left')
+
+
+class PoaProfile:
+    """Clear-sky POA irradiance over one local day, clipped at zero."""
+
+    __slots__ = ("poa", "hours", "hourly", "total", "step_h")
+
+    def __init__(self, poa: np.ndarray, hours: np.ndarray, step_h: float):
+        self.poa = np.clip(np.nan_to_num(np.asarray(poa, dtype=float)), 0.0, None)
+        self.hours = hours
+        self.step_h = step_h
+        # Irradiance summed per local hour and over the day (W/m2 x samples)
+        self.hourly = np.bincount(hours, weights=self.poa, minlength=24)[:24]
+        self.total = float(self.poa.sum())
+
+
+class ClearSkyCache:
+    """Clear-sky POA profiles keyed by array geometry, location and local date."""
+
+    def __init__(self, path: Optional[str] = None, freq_minutes: int = FREQ_MINUTES,
+                 sky_fn: SkyFn = pvlib_sky, poa_fn: PoaFn = pvlib_poa,
+                 today_fn: Callable[[str], date] = lambda tz: pd.Timestamp.now(tz).date()):
+        self.path = path
+        self.freq_minutes = int(freq_minutes)
+        self.sky_fn = sky_fn
+        self.poa_fn = poa_fn
+        self.today_fn = today_fn
+        self._profiles: Dict[ProfileKey, PoaProfile] = {}
+        self._sky: Dict[SkyKey, Dict[str, np.ndarray]] = {}
+        self._hours: Dict[Tuple[str, str], np.ndarray] = {}
+        self._loaded_days: set = set()
+        self._today: Optional[str] = None
+        self._lock = threading.Lock()
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+        self.disk_loads = 0
+        self.evicted = 0
+        self.compute_s = 0.0
+
+    def profile(self, lat: float, lon: float, tilt: float, azimuth: float, albedo: float,
+                day: date, tz: str) -> PoaProfile:
+        day_str = day.isoformat()
+        key: ProfileKey = (round(float(lat), 6), round(float(lon), 6), round(float(tilt), 3),
+                           round(float(azimuth), 3), round(float(albedo), 4), str(tz), day_str)
+        self._roll_over(str(tz))
+        with self._lock:
+            cached = self._profiles.get(key)
+            if cached is not None:
+                self.hits += 1
+                return cached
+            self.misses += 1
+        if self.path and day_str not in self._loaded_days:
+            self._load_day(day_str)
+            with self._lock:
+                cached = self._profiles.get(key)
+            if cached is not None:
+                return cached
+
+        start = time.perf_counter()
+        hours = self._day_hours(day, key[5])
+        sky_key: SkyKey = (key[0], key[1], key[5], day_str)
+        with self._lock:
+            sky = self._sky.get(sky_key)
+        if sky is None:
+            sky = self.sky_fn(key[0], key[1], key[5], day_index(day, key[5], self.freq_minutes))
+            with self._lock:
+                self._sky[sky_key] = sky
+        result = PoaProfile(self.poa_fn(sky, key[2], key[3], key[4]), hours, self.freq_minutes / 60.0)
+        self.compute_s += time.perf_counter() - start
+        with self._lock:
+            self._profiles[key] = result
+        if self.path:
+            self._save_day(day_str)
+        return result
+
+    def _day_hours(self, day: date, tz: str) -> np.ndarray:
+        hours_key = (day.isoformat(), tz)
+        hours = self._hours.get(hours_key)
+        if hours is None:
+            hours = np.asarray(day_index(day, tz, self.freq_minutes).hour, dtype=np.int64)
+            self._hours[hours_key] = hours
+        return hours
+
+    def _roll_over(self, tz: str):
+        """Drop every day before today once the local date changes."""
+        today = self.today_fn(tz).isoformat()
+        if today == self._today:
+            return
+        with self._lock:
+            self._today = today
+            stale = [k for k in self._profiles if k[6] < today]
+            for k in stale:
+                del self._profiles[k]
+            self.evicted += len(stale)
+            for k in [k for k in self._sky if k[3] < today]:
+                del self._sky[k]
+            for k in [k for k in self._hours if k[0] < today]:
+                del self._hours[k]
+            self._loaded_days = {d for d in self._loaded_days if d >= today}
+        if self.path and os.path.isdir(self.path):
+            for name in os.listdir(self.path):
+                if name.startswith("clearsky-") and name.endswith(".npz") and name[9:-4] < today:
+                    try:
+                        os.remove(os.path.join(self.path, name))
+                    except OSError as e:
+                        log.debug(f"Could not remove stale clear-sky cache {name}: {e}")
+
+    def _day_file(self, day_str: str) -> str:
+        return os.path.join(self.path, f"clearsky-{day_str}.npz")
+
+    @staticmethod
+    def _encode(key: ProfileKey) -> str:
+        return "|".join(str(part) for part in key[:6])
+
+    def _load_day(self, day_str: str):
+        self._loaded_days.add(day_str)
+        file_path = self._day_file(day_str)
+        if not os.path.exists(file_path):
+            return
+        try:
+            with np.load(file_path) as data:
+                arrays = {name: data[name] for name in data.files}
+        except Exception as e:
+            log.warning(f"Ignoring unreadable clear-sky cache {file_path}: {e}")
+            return
+        day = date.fromisoformat(day_str)
+        loaded = 0
+        for name, poa in arrays.items():
+            lat, lon, tilt, azimuth, albedo, tz = name.split("|")
+            hours = self._day_hours(day, tz)
+            if len(poa) != len(hours):  # written with another freq_minutes
+                continue
+            key: ProfileKey = (float(lat), float(lon), float(tilt), float(azimuth), float(albedo), tz, day_str)
+            with self._lock:
+                self._profiles.setdefault(key, PoaProfile(poa, hours, self.freq_minutes / 60.0))
+            loaded += 1
+        self.disk_loads += loaded
+
+    def _save_day(self, day_str: str):
+        with self._lock:
+            arrays = {self._encode(k): p.poa for k, p in self._profiles.items() if k[6] == day_str}
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, self._day_file(day_str))
+        except Exception as e:
+            log.warning(f"Could not persist clear-sky cache for {day_str}: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+            self._sky.clear()
+            self._hours.clear()
+            self._loaded_days.clear()
+            self._today = None
+
+    def get_statistics(self) -> Dict[str, Any]:
+        with self._lock:
+            days = sorted({k[6] for k in self._profiles})
+            entries = len(self._profiles)
+        return {
+            "entries": entries,
+            "days": days,
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_loads": self.disk_loads,
+            "evicted": self.evicted,
+            "compute_s": round(self.compute_s, 3),
+            "persisted": bool(self.path),
+        }
+
+
+_cache = ClearSkyCache()
+
+
+def get_clearsky_cache() -> ClearSkyCache:
+    return _cache
+
+
+def configure_clearsky_cache(path: Optional[str]) -> ClearSkyCache:
+    """Set (or clear) the on-disk directory of the shared cache."""
+    _cache.path = path or None
+    return _cache
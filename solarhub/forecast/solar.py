@@ -1,58 +1,61 @@
+from datetime import date
 from typing import Dict, Optional
-import pandas as pd, pvlib
 import logging
 
+from solarhub.forecast.clearsky import ClearSkyCache, PoaProfile, get_clearsky_cache
+
 log = logging.getLogger(__name__)
 
 class PvlibSolarEstimator:
-    def __init__(self, cfg):
+    def __init__(self, cfg, cache: Optional[ClearSkyCache] = None):
         self.cfg = cfg
+        self.cache = cache
+
+    def _profile(self, day: Optional[date] = None) -> PoaProfile:
+        """Clear-sky POA profile of this array for ``day`` (default: today), from the shared cache."""
+        from solarhub.timezone_utils import get_configured_timezone, now_configured
+        if day is None:
+            day = now_configured().date()
+        cache = self.cache or get_clearsky_cache()
+        return cache.profile(self.cfg.lat, self.cfg.lon, self.cfg.tilt_deg, self.cfg.azimuth_deg,
+                             self.cfg.albedo, day, str(get_configured_timezone()))
+
+    @staticmethod
+    def _weather_multiplier(weather_data: Dict) -> float:
+        """Product of the irradiance, temperature, soiling and wind factors in ``weather_data``."""
+        return max(0.0, weather_data.get('irradiance_factor', 1.0) * weather_data.get('temperature_factor', 1.0)
+                   * weather_data.get('soiling_factor', 1.0) * weather_data.get('wind_factor', 1.0))
+
+    def _kwh(self, irradiance_sum: float, step_h: float) -> float:
+        return irradiance_sum / 1000.0 * step_h * self.cfg.pv_perf_ratio * self.cfg.pv_dc_kw
     
     async def estimate_daily_pv_kwh(self, weather_factor: float, 
-                                   enhanced_weather: Optional[Dict] = None) -> float:
+                                   enhanced_weather: Optional[Dict] = None,
+                                   day: Optional[date] = None) -> float:
         """
         Estimate daily PV generation with enhanced weather data.
         Args:
             weather_factor: Simple weather factor (for compatibility)
             enhanced_weather: Enhanced weather data with multiple factors
+            day: Local date to estimate (default: today)
             
         Returns:
             Estimated daily PV generation in kWh
         """
 
         try:
-            from solarhub.timezone_utils import get_configured_timezone
-            tz = str(get_configured_timezone())
-            location = pvlib.location.Location(self.cfg.lat, self.cfg.lon, tz=tz)
-            from solarhub.timezone_utils import now_configured
-            start = pd.Timestamp(now_configured()).normalize()
-            end = start + pd.Timedelta(days=1)
-            times = pd.date_range(start, end, freq='15min', tz=tz, inclusive='left')
+            profile = self._profile(day)
             
-            # Get clear sky irradiance
-            cs = location.get_clearsky(times, model='ineichen')
-            solpos = location.get_solarposition(times)
-            
-            # Calculate POA irradiance
-            poa = pvlib.irradiance.get_total_irradiance(
-                surface_tilt=self.cfg.tilt_deg,
-                surface_azimuth=self.cfg.azimuth_deg,
-                solar_zenith=solpos['apparent_zenith'],
-                solar_azimuth=solpos['azimuth'],
-                dni=cs['dni'], ghi=cs['ghi'], dhi=cs['dhi'], albedo=self.cfg.albedo)
-            
-            # Apply weather factors
+            # Apply weather factors to the cached clear-sky POA
             if enhanced_weather:
                 # Use enhanced weather data for more accurate estimation
-                poa_irr = self._apply_enhanced_weather_factors(
-                    poa['poa_global'], times, enhanced_weather)
+                factor = self._weather_multiplier(enhanced_weather)
             else:
                 # Fallback to simple weather factor
-                poa_irr = poa['poa_global'].clip(lower=0) * weather_factor
+                factor = weather_factor
             
             # Calculate energy generation
-            dt_h = (times[1]-times[0]).total_seconds()/3600.0
-            kwh = float(poa_irr.sum()/1000.0 * dt_h * self.cfg.pv_perf_ratio * self.cfg.pv_dc_kw)
+            kwh = float(self._kwh(profile.total * factor, profile.step_h))
             
             return round(kwh, 2)
             
@@ -62,32 +65,13 @@ class PvlibSolarEstimator:
             base_h = 5.0
             factor = enhanced_weather.get('overall_factor', weather_factor) if enhanced_weather else weather_factor
             return round(self.cfg.pv_dc_kw * self.cfg.pv_perf_ratio * base_h * factor, 2)
-    
-    def _apply_enhanced_weather_factors(self, poa_irradiance: pd.Series, 
-                                      times: pd.DatetimeIndex, 
-                                      weather_data: Dict) -> pd.Series:
-        """Apply enhanced weather factors to POA irradiance."""
-        # Start with clear sky irradiance
-        adjusted_irr = poa_irradiance.clip(lower=0).copy()
-        
-        # Apply irradiance factor (cloud cover, actual radiation)
-        irradiance_factor = weather_data.get('irradiance_factor', 1.0)
-        adjusted_irr *= irradiance_factor
-        
-        # Apply temperature factor (hourly variation)
-        temp_factor = weather_data.get('temperature_factor', 1.0)
-        adjusted_irr *= temp_factor
-        
-        # Apply soiling factor (daily constant)
-        soiling_factor = weather_data.get('soiling_factor', 1.0)
-        adjusted_irr *= soiling_factor
-        
-        # Apply wind factor (cooling effect)
-        wind_factor = weather_data.get('wind_factor', 1.0)
-        adjusted_irr *= wind_factor
-        
-        # Ensure non-negative values
-        return adjusted_irr.clip(lower=0)
+
+    def estimate_hourly_pv_kw(self, hour: int, weather_factor: float,
+                              enhanced_weather: Optional[Dict] = None, day: Optional[date] = None) -> float:
+        """Average PV power (kW) expected during local ``hour`` of ``day`` (default: today)."""
+        profile = self._profile(day)
+        factor = self._weather_multiplier(enhanced_weather) if enhanced_weather else weather_factor
+        return float(self._kwh(profile.hourly[hour] * factor, profile.step_h))
     
     async def estimate_hourly_pv_kwh(self, weather_data: Dict) -> Dict[int, float]:
         """
@@ -100,39 +84,12 @@ class PvlibSolarEstimator:
             Dictionary mapping hour (0-23) to estimated kWh
         """
         try:
-            from solarhub.timezone_utils import get_configured_timezone
-            tz = str(get_configured_timezone())
-            location = pvlib.location.Location(self.cfg.lat, self.cfg.lon, tz=tz)
+            profile = self._profile()
+            factor = self._weather_multiplier(weather_data)
             
             hourly_kwh = {}
-            
             for hour in range(24):
-                # Create hourly time range
-                from solarhub.timezone_utils import now_configured
-                start = pd.Timestamp(now_configured()).normalize() + pd.Timedelta(hours=hour)
-                end = start + pd.Timedelta(hours=1)
-                times = pd.date_range(start, end, freq='15min', tz=tz, inclusive='left')
-                
-                # Get clear sky irradiance for this hour
-                cs = location.get_clearsky(times, model='ineichen')
-                solpos = location.get_solarposition(times)
-                
-                # Calculate POA irradiance
-                poa = pvlib.irradiance.get_total_irradiance(
-                    surface_tilt=self.cfg.tilt_deg,
-                    surface_azimuth=self.cfg.azimuth_deg,
-                    solar_zenith=solpos['apparent_zenith'],
-                    solar_azimuth=solpos['azimuth'],
-                    dni=cs['dni'], ghi=cs['ghi'], dhi=cs['dhi'], albedo=self.cfg.albedo)
-                
-                # Apply weather factors
-                poa_irr = self._apply_enhanced_weather_factors(
-                    poa['poa_global'], times, weather_data)
-                
-                # Calculate hourly energy
-                dt_h = (times[1]-times[0]).total_seconds()/3600.0
-                kwh = float(poa_irr.sum()/1000.0 * dt_h * self.cfg.pv_perf_ratio * self.cfg.pv_dc_kw)
-                
+                kwh = float(self._kwh(profile.hourly[hour] * factor, profile.step_h))
                 hourly_kwh[hour] = round(kwh, 3)
             
             return hourly_kwh
@@ -5,6 +5,7 @@ import sqlite3
 from typing import Any, Dict, List, Optional
 from datetime import datetime, date
 from solarhub.timezone_utils import now_configured, to_configured
+from solarhub.ha.discovery_outbox import DiscoveryOutbox, DiscoveryStore
 
 log = logging.getLogger("solarhub.ha.discovery")
 
@@ -68,20 +69,35 @@ class HADiscoveryPublisher:
       - RW entities write to:    <base>/<id>/write
     """
 
-    def __init__(self, mqtt_client, base_topic: str, discovery_prefix: str = DISCOVERY_PREFIX, db_path: Optional[str] = None) -> None:
+    def __init__(self, mqtt_client, base_topic: str, discovery_prefix: str = DISCOVERY_PREFIX, db_path: Optional[str] = None,
+                 policy=None) -> None:
         self.mqtt = mqtt_client
         self.base_topic = base_topic.rstrip("/")
         self.discovery_prefix = discovery_prefix.rstrip("/")
         self.db_path = db_path  # Database path for energy calculations
+        # Retained configs go out only when their content hash changed, in rate-limited batches
+        self.outbox = DiscoveryOutbox(mqtt_client, DiscoveryStore(db_path), policy,
+                                      topic_filter=f"{self.discovery_prefix}/+/+/config")
+        # After a reconnect, re-send what the client dropped or the broker lost
+        if hasattr(mqtt_client, "add_connect_listener"):
+            mqtt_client.add_connect_listener(self.outbox.resync)
 
     def _disc_topic(self, component: str, object_id: str) -> str:
         return f"{self.discovery_prefix}/{component}/{object_id}/config"
+
+    def _publish_config(self, topic: str, cfg: Dict[str, Any]) -> None:
+        """Queue a retained discovery config (dropped if the broker already has this exact config)."""
+        self.outbox.submit(topic, cfg)
+
+    def sync_with_broker(self, timeout_s: float = 3.0) -> Dict[str, int]:
+        """Diff the published-config store against the discovery configs retained on the broker."""
+        return self.outbox.sync_with_broker(self.outbox.topic_filter, timeout_s)
     
     def _clear_discovery_entity(self, component: str, object_id: str) -> None:
         """Clear a discovery entity by publishing empty payload."""
         topic = self._disc_topic(component, object_id)
         try:
-            self.mqtt.pub(topic, "", retain=True)
+            self.outbox.clear(topic)
             log.debug(f"Cleared discovery entity: {topic}")
         except Exception as e:
             log.warning(f"Failed to clear discovery entity {topic}: {e}")
@@ -219,7 +235,7 @@ class HADiscoveryPublisher:
             
             disc_topic = self._disc_topic("sensor", object_id)
             try:
-                self.mqtt.pub(disc_topic, cfg, retain=True)
+                self._publish_config(disc_topic, cfg)
                 log.debug(f"Published calculated power field discovery: {disc_topic}")
             except Exception as e:
                 log.error(f"Failed to publish calculated power field discovery to {disc_topic}: {e}", exc_info=True)
@@ -270,7 +286,7 @@ class HADiscoveryPublisher:
             
             disc_topic = self._disc_topic("sensor", object_id)
             try:
-                self.mqtt.pub(disc_topic, cfg, retain=True)
+                self._publish_config(disc_topic, cfg)
                 log.debug(f"Published calculated energy field discovery: {disc_topic}")
             except Exception as e:
                 log.error(f"Failed to publish calculated energy field discovery to {disc_topic}: {e}", exc_info=True)
@@ -374,7 +390,7 @@ class HADiscoveryPublisher:
 
         disc_topic = self._disc_topic(component, object_id)
         try:
-            self.mqtt.pub(disc_topic, cfg, retain=True)
+            self._publish_config(disc_topic, cfg)
             log.debug(f"Published HA discovery: {disc_topic}")
         except Exception as e:
             log.error(f"Failed to publish HA discovery to {disc_topic}: {e}", exc_info=True)
@@ -517,7 +533,7 @@ class HADiscoveryPublisher:
             }
             disc_topic = self._disc_topic("sensor", object_id)
             try:
-                self.mqtt.pub(disc_topic, cfg, retain=True)
+                self._publish_config(disc_topic, cfg)
                 log.debug(f"Published array power sensor discovery: {disc_topic}")
             except Exception as e:
                 log.error(f"Failed to publish array power sensor discovery to {disc_topic}: {e}", exc_info=True)
@@ -546,7 +562,7 @@ class HADiscoveryPublisher:
             }
             disc_topic = self._disc_topic("sensor", object_id)
             try:
-                self.mqtt.pub(disc_topic, cfg, retain=True)
+                self._publish_config(disc_topic, cfg)
                 log.debug(f"Published array cumulative energy sensor discovery: {disc_topic}")
             except Exception as e:
                 log.error(f"Failed to publish array cumulative energy sensor discovery to {disc_topic}: {e}", exc_info=True)
@@ -575,7 +591,7 @@ class HADiscoveryPublisher:
             }
             disc_topic = self._disc_topic("sensor", object_id)
             try:
-                self.mqtt.pub(disc_topic, cfg, retain=True)
+                self._publish_config(disc_topic, cfg)
                 log.debug(f"Published array daily energy sensor discovery: {disc_topic}")
             except Exception as e:
                 log.error(f"Failed to publish array daily energy sensor discovery to {disc_topic}: {e}", exc_info=True)
@@ -636,7 +652,7 @@ class HADiscoveryPublisher:
             }
             disc_topic = self._disc_topic("sensor", object_id)
             try:
-                self.mqtt.pub(disc_topic, cfg, retain=True)
+                self._publish_config(disc_topic, cfg)
                 log.debug(f"Published pack sensor discovery: {disc_topic}")
             except Exception as e:
                 log.error(f"Failed to publish pack sensor discovery to {disc_topic}: {e}", exc_info=True)
@@ -715,7 +731,7 @@ class HADiscoveryPublisher:
             
             disc_topic = self._disc_topic("sensor", object_id)
             try:
-                self.mqtt.pub(disc_topic, cfg, retain=True)
+                self._publish_config(disc_topic, cfg)
                 log.info(f"Published battery bank sensor discovery: {disc_topic}, object_id={object_id}, state_topic={state_topic}, field={field_key}")
             except Exception as e:
                 log.error(f"Failed to publish battery bank sensor discovery to {disc_topic}: {e}", exc_info=True)
@@ -805,7 +821,7 @@ class HADiscoveryPublisher:
             }
             disc_topic = self._disc_topic("sensor", object_id)
             try:
-                self.mqtt.pub(disc_topic, cfg, retain=True)
+                self._publish_config(disc_topic, cfg)
                 log.debug(f"Published battery unit power sensor discovery: {disc_topic}")
             except Exception as e:
                 log.error(f"Failed to publish battery unit power sensor discovery to {disc_topic}: {e}", exc_info=True)
@@ -832,7 +848,7 @@ class HADiscoveryPublisher:
             }
             disc_topic = self._disc_topic("sensor", object_id)
             try:
-                self.mqtt.pub(disc_topic, cfg, retain=True)
+                self._publish_config(disc_topic, cfg)
                 log.debug(f"Published battery unit cumulative energy sensor discovery: {disc_topic}")
             except Exception as e:
                 log.error(f"Failed to publish battery unit cumulative energy sensor discovery to {disc_topic}: {e}", exc_info=True)
@@ -857,7 +873,7 @@ class HADiscoveryPublisher:
             }
             disc_topic = self._disc_topic("sensor", object_id)
             try:
-                self.mqtt.pub(disc_topic, cfg, retain=True)
+                self._publish_config(disc_topic, cfg)
                 log.debug(f"Published battery unit daily energy sensor discovery: {disc_topic}")
             except Exception as e:
                 log.error(f"Failed to publish battery unit daily energy sensor discovery to {disc_topic}: {e}", exc_info=True)
@@ -885,14 +901,15 @@ class HADiscoveryPublisher:
                 cfg["device_class"] = device_class
             disc_topic = self._disc_topic("sensor", object_id)
             try:
-                self.mqtt.pub(disc_topic, cfg, retain=True)
+                self._publish_config(disc_topic, cfg)
                 log.debug(f"Published battery unit status sensor discovery: {disc_topic}")
             except Exception as e:
                 log.error(f"Failed to publish battery unit status sensor discovery to {disc_topic}: {e}", exc_info=True)
         
         log.info(f"Published HA discovery for battery unit {unit_power} in bank {bank_id} with {len(power_sensors) + len(cumulative_energy_sensors) + len(daily_energy_sensors) + len(status_sensors)} sensors")
     
-    def publish_battery_cell_entities(self, bank_id: str, unit_power: int, cell_index: int, bank_name: Optional[str] = None) -> None:
+    def publish_battery_cell_entities(self, bank_id: str, unit_power: int, cell_index: int, bank_name: Optional[str] = None,
+                                      packed: bool = False) -> None:
         """
         Publish Home Assistant discovery entities for battery cell sensors directly under the battery unit device.
         This creates cell sensors as entities under the battery unit device rather than separate devices.
@@ -902,6 +919,7 @@ class HADiscoveryPublisher:
             unit_power: Battery unit power/ID (from BatteryUnit.power)
             cell_index: Cell index (1-based)
             bank_name: Optional bank name
+            packed: Read from the unit's packed cells payload (mqtt.publish.packed_cells)
         """
         # Use EXACTLY the same device info as the battery unit to ensure cells appear under the same device
         # Use helper method to guarantee identical device_info structure
@@ -909,7 +927,11 @@ class HADiscoveryPublisher:
         unit_device_name = f"{bank_name or bank_id.replace('_', ' ').title()} Battery {unit_power}"
         
         # State topic matches what's published: {base_topic}/battery/{bank_id}/{unit_power}/cells/{cell_index}/regs
-        state_topic = f"{self.base_topic}/battery/{bank_id}/{unit_power}/cells/{cell_index}/regs"
+        # (packed: {base_topic}/battery/{bank_id}/{unit_power}/cells/regs with cell_<n>_<field> keys)
+        if packed:
+            state_topic = f"{self.base_topic}/battery/{bank_id}/{unit_power}/cells/regs"
+        else:
+            state_topic = f"{self.base_topic}/battery/{bank_id}/{unit_power}/cells/{cell_index}/regs"
         
         # Use helper method to ensure device_info is EXACTLY the same as battery unit device
         # This guarantees all cell sensors appear under the same battery unit device in Home Assistant
@@ -929,11 +951,12 @@ class HADiscoveryPublisher:
         for field_key, name, unit, device_class in sensors:
             # Use unit device ID with cell index to make unique
             object_id = f"{unit_device_id}_cell_{cell_index}_{field_key}"
+            value_key = f"cell_{cell_index}_{field_key}" if packed else field_key
             cfg = {
                 "name": f"{unit_device_name} {name}",
                 "unique_id": object_id,
                 "state_topic": state_topic,
-                "value_template": f"{{{{ value_json.{field_key} }}}}",
+                "value_template": f"{{{{ value_json.{value_key} }}}}",
                 "device": device_info,
             }
             
@@ -946,7 +969,7 @@ class HADiscoveryPublisher:
             
             disc_topic = self._disc_topic("sensor", object_id)
             try:
-                self.mqtt.pub(disc_topic, cfg, retain=True)
+                self._publish_config(disc_topic, cfg)
                 log.debug(f"Published battery cell sensor discovery: {disc_topic} (under battery unit {unit_power})")
             except Exception as e:
                 log.error(f"Failed to publish battery cell sensor discovery to {disc_topic}: {e}", exc_info=True)
@@ -1032,7 +1055,7 @@ class HADiscoveryPublisher:
             
             disc_topic = self._disc_topic("sensor", object_id)
             try:
-                self.mqtt.pub(disc_topic, cfg, retain=True)
+                self._publish_config(disc_topic, cfg)
                 log.debug(f"Published meter sensor discovery: {disc_topic}")
             except Exception as e:
                 log.error(f"Failed to publish meter sensor discovery to {disc_topic}: {e}", exc_info=True)
@@ -1069,7 +1092,7 @@ class HADiscoveryPublisher:
             
             disc_topic = self._disc_topic("sensor", object_id)
             try:
-                self.mqtt.pub(disc_topic, cfg, retain=True)
+                self._publish_config(disc_topic, cfg)
                 log.debug(f"Published meter phase sensor discovery: {disc_topic}")
             except Exception as e:
                 log.error(f"Failed to publish meter phase sensor discovery to {disc_topic}: {e}", exc_info=True)
@@ -1205,7 +1228,7 @@ class HADiscoveryPublisher:
             }
             disc_topic = self._disc_topic("sensor", object_id)
             try:
-                self.mqtt.pub(disc_topic, cfg, retain=True)
+                self._publish_config(disc_topic, cfg)
                 log.debug(f"Published system power sensor discovery: {disc_topic}")
             except Exception as e:
                 log.error(f"Failed to publish system power sensor discovery to {disc_topic}: {e}", exc_info=True)
@@ -1234,7 +1257,7 @@ class HADiscoveryPublisher:
             }
             disc_topic = self._disc_topic("sensor", object_id)
             try:
-                self.mqtt.pub(disc_topic, cfg, retain=True)
+                self._publish_config(disc_topic, cfg)
                 log.debug(f"Published system cumulative energy sensor discovery: {disc_topic}")
             except Exception as e:
                 log.error(f"Failed to publish system cumulative energy sensor discovery to {disc_topic}: {e}", exc_info=True)
@@ -1263,7 +1286,7 @@ class HADiscoveryPublisher:
             }
             disc_topic = self._disc_topic("sensor", object_id)
             try:
-                self.mqtt.pub(disc_topic, cfg, retain=True)
+                self._publish_config(disc_topic, cfg)
                 log.debug(f"Published system daily energy sensor discovery: {disc_topic}")
             except Exception as e:
                 log.error(f"Failed to publish system daily energy sensor discovery to {disc_topic}: {e}", exc_info=True)
@@ -1384,7 +1407,7 @@ class HADiscoveryPublisher:
             }
             disc_topic = self._disc_topic("sensor", object_id)
             try:
-                self.mqtt.pub(disc_topic, cfg, retain=True)
+                self._publish_config(disc_topic, cfg)
                 log.debug(f"Published battery array power sensor discovery: {disc_topic}")
             except Exception as e:
                 log.error(f"Failed to publish battery array power sensor discovery to {disc_topic}: {e}", exc_info=True)
@@ -1409,7 +1432,7 @@ class HADiscoveryPublisher:
             }
             disc_topic = self._disc_topic("sensor", object_id)
             try:
-                self.mqtt.pub(disc_topic, cfg, retain=True)
+                self._publish_config(disc_topic, cfg)
                 log.debug(f"Published battery array cumulative energy sensor discovery: {disc_topic}")
             except Exception as e:
                 log.error(f"Failed to publish battery array cumulative energy sensor discovery to {disc_topic}: {e}", exc_info=True)
@@ -1434,7 +1457,7 @@ class HADiscoveryPublisher:
             }
             disc_topic = self._disc_topic("sensor", object_id)
             try:
-                self.mqtt.pub(disc_topic, cfg, retain=True)
+                self._publish_config(disc_topic, cfg)
                 log.debug(f"Published battery array daily energy sensor discovery: {disc_topic}")
             except Exception as e:
                 log.error(f"Failed to publish battery array daily energy sensor discovery to {disc_topic}: {e}", exc_info=True)
@@ -1461,7 +1484,7 @@ class HADiscoveryPublisher:
             }
             disc_topic = self._disc_topic("sensor", object_id)
             try:
-                self.mqtt.pub(disc_topic, cfg, retain=True)
+                self._publish_config(disc_topic, cfg)
                 log.debug(f"Published battery array sensor discovery: {disc_topic}")
             except Exception as e:
                 log.error(f"Failed to publish battery array sensor discovery to {disc_topic}: {e}", exc_info=True)
@@ -1516,7 +1539,7 @@ class HADiscoveryPublisher:
             }
             disc_topic = self._disc_topic("sensor", object_id)
             try:
-                self.mqtt.pub(disc_topic, cfg, retain=True)
+                self._publish_config(disc_topic, cfg)
                 log.debug(f"Published home sensor discovery: {disc_topic}")
             except Exception as e:
                 log.error(f"Failed to publish home sensor discovery to {disc_topic}: {e}", exc_info=True)
@@ -1535,7 +1558,7 @@ class HADiscoveryPublisher:
         }
         disc_topic = self._disc_topic("sensor", object_id)
         try:
-            self.mqtt.pub(disc_topic, cfg, retain=True)
+            self._publish_config(disc_topic, cfg)
             log.debug(f"Published home battery SOC discovery: {disc_topic}")
         except Exception as e:
             log.error(f"Failed to publish home battery SOC discovery to {disc_topic}: {e}", exc_info=True)
@@ -0,0 +1,319 @@
+"""
+Idempotent Home Assistant discovery publishing.
+
+Discovery configs are retained on the broker, so a config only needs to be
+sent when it differs from what the broker already holds. ``DiscoveryStore``
+keeps the content hash of every config published (``ha_discovery_state``
+table), so a restart no longer re-sends thousands of unchanged retained
+messages that HA would re-process one by one.
+
+``DiscoveryOutbox`` sits between the discovery publishers and MQTT:
+
+* ``submit`` drops a config whose hash matches the store and queues the rest
+  (the latest config per topic wins)
+* a sender thread publishes the queue in batches: the first
+  ``startup_budget`` messages right away, then ``batch_size`` every
+  ``batch_interval_s``
+* ``sync_with_broker`` subscribes to the retained discovery topics, collects
+  what the broker actually holds for ``timeout_s`` and replaces the store
+  with it, so configs the broker lost (restart without persistence) or that
+  someone changed are sent again
+* a hash is recorded only for configs the client actually handed to a
+  connected broker; ``resync`` (called on every MQTT reconnect) re-queues
+  configs that were dropped and, after a broker diff, the ones the broker lost
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from solarhub.json_codec import to_jsonable
+
+log = logging.getLogger(__name__)
+
+STATE_TABLE = "ha_discovery_state"
+
+
+def config_hash(payload: Any) -> str:
+    """Content hash of a discovery payload, independent of key order."""
+    text = json.dumps(to_jsonable(payload), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class DiscoveryStore:
+    """Topic -> config hash of the discovery messages on the broker, persisted in SQLite."""
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path
+        self._hashes: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        if db_path:
+            con = sqlite3.connect(db_path)
+            try:
+                con.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+                        topic TEXT PRIMARY KEY,
+                        config_hash TEXT NOT NULL,
+                        published_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                con.commit()
+                self._hashes = dict(con.execute(f"SELECT topic, config_hash FROM {STATE_TABLE}").fetchall())
+            finally:
+                con.close()
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def get(self, topic: str) -> Optional[str]:
+        return self._hashes.get(topic)
+
+    def update(self, published: Iterable[Tuple[str, str]]):
+        """Record the hashes of published configs in one transaction."""
+        published = list(published)
+        if not published:
+            return
+        with self._lock:
+            self._hashes.update(published)
+            if not self.db_path:
+                return
+            con = sqlite3.connect(self.db_path)
+            try:
+                con.executemany(f"""
+                    INSERT INTO {STATE_TABLE}(topic, config_hash, published_at) VALUES(?, ?, datetime('now'))
+                    ON CONFLICT(topic) DO UPDATE SET config_hash = excluded.config_hash,
+                                                     published_at = excluded.published_at
+                """, published)
+                con.commit()
+            finally:
+                con.close()
+
+    def replace(self, hashes: Dict[str, str]):
+        """Make ``hashes`` the complete state (broker diff)."""
+        with self._lock:
+            self._hashes = dict(hashes)
+            if not self.db_path:
+                return
+            con = sqlite3.connect(self.db_path)
+            try:
+                con.execute(f"DELETE FROM {STATE_TABLE}")
+                con.executemany(f"INSERT INTO {STATE_TABLE}(topic, config_hash) VALUES(?, ?)", list(hashes.items()))
+                con.commit()
+            finally:
+                con.close()
+
+
+class DiscoveryOutbox:
+    """Change-only, rate-limited delivery of retained discovery configs."""
+
+    def __init__(self, mqtt_client, store: DiscoveryStore, policy=None, topic_filter: Optional[str] = None):
+        self.mqtt = mqtt_client
+        self.store = store
+        self.topic_filter = topic_filter
+        self.enabled = getattr(policy, "enabled", True)
+        self.batch_size = max(int(getattr(policy, "batch_size", 50)), 1)
+        self.batch_interval_s = float(getattr(policy, "batch_interval_s", 0.5))
+        self.startup_budget = max(int(getattr(policy, "startup_budget", 200)), 0)
+        self.broker_diff_timeout_s = float(getattr(policy, "broker_diff_timeout_s", 2.0))
+        self._queue: "OrderedDict[str, Tuple[Any, str]]" = OrderedDict()
+        # Configs sent this run and configs the client dropped; resync re-queues from both
+        self._sent: Dict[str, Tuple[Any, str]] = {}
+        self._unsent: Dict[str, Tuple[Any, str]] = {}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = False
+        self._budget = self.startup_budget
+        self._sending = False
+        self._in_flight: Dict[str, str] = {}  # topic -> hash of the batch being sent
+        # Statistics
+        self.published = 0
+        self.unchanged = 0
+        self.cleared = 0
+        self.failed = 0
+        self.batches = 0
+        self.broker_diffs = 0
+
+    def submit(self, topic: str, payload: Any) -> bool:
+        """Queue a retained discovery config unless the broker already has it. Returns True if queued."""
+        digest = config_hash(payload)
+        with self._cond:
+            if self.enabled and digest in (self.store.get(topic), self._in_flight.get(topic)):
+                self._queue.pop(topic, None)  # a queued older config is superseded by what's on the broker
+                self.unchanged += 1
+                return False
+            self._queue[topic] = (payload, digest)
+            self._queue.move_to_end(topic)
+            self._unsent.pop(topic, None)
+            self._ensure_sender()
+            self._cond.notify()
+        return True
+
+    def clear(self, topic: str) -> bool:
+        """Queue removal of a retained discovery config (empty payload), once."""
+        return self.submit(topic, "")
+
+    def _ensure_sender(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop = False
+            self._thread = threading.Thread(target=self._run, name="ha-discovery", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        next_batch_at = 0.0
+        while True:
+            with self._cond:
+                while not self._stop:
+                    # Submissions wake the sender, but batches stay batch_interval_s apart
+                    wait = next_batch_at - time.monotonic() if self._queue else None
+                    if wait is not None and wait <= 0:
+                        break
+                    self._cond.wait(wait)
+                if self._stop:
+                    return
+                size = max(self.batch_size, self._budget)
+                batch = [self._queue.popitem(last=False) for _ in range(min(size, len(self._queue)))]
+                self._budget = max(self._budget - len(batch), 0)
+                self._sending = True
+                self._in_flight = {topic: digest for topic, (_, digest) in batch}
+            try:
+                self._send(batch)
+            finally:
+                # The startup budget goes out unpaced, however the configs trickle in
+                next_batch_at = time.monotonic() + (0.0 if self._budget else self.batch_interval_s)
+                with self._cond:
+                    self._sending = False
+                    self._in_flight = {}
+                    self._cond.notify_all()
+
+    def _send(self, batch):
+        published = []
+        configs = []
+        dropped = []
+        for topic, (payload, digest) in batch:
+            try:
+                # A QoS 0 publish while disconnected is dropped by the client, not raised
+                sent = self.mqtt.pub(topic, payload, retain=True) and getattr(self.mqtt, "connected", True)
+            except Exception as e:
+                log.warning(f"Failed to publish HA discovery to {topic}: {e}")
+                sent = False
+            if not sent:
+                self.failed += 1
+                dropped.append((topic, (payload, digest)))
+                continue
+            published.append((topic, digest))
+            if payload == "":
+                self.cleared += 1
+            else:
+                self.published += 1
+                configs.append((topic, (payload, digest)))
+        self.batches += 1
+        with self._cond:
+            for topic, _ in batch:
+                self._sent.pop(topic, None)  # removals are not re-sent on reconnect
+            self._sent.update(configs)
+            for topic, entry in dropped:
+                if topic not in self._queue:
+                    self._unsent[topic] = entry
+        try:
+            self.store.update(published)
+        except Exception as e:
+            log.warning(f"Failed to record published HA discovery hashes: {e}")
+        log.debug(f"HA discovery batch: {len(published)}/{len(batch)} sent, {len(self._queue)} queued")
+
+    def resync(self):
+        """
+        Re-send after an MQTT (re)connect: configs the client dropped, and those
+        a broker diff shows missing or different (QoS 0 messages still in the
+        client's out-queue when the connection broke are lost). Returns at once;
+        the diff waits for retained messages, so it runs on its own thread.
+        """
+        with self._cond:
+            if not self._sent and not self._unsent:
+                return
+        threading.Thread(target=self._resync, name="ha-discovery-resync", daemon=True).start()
+
+    def _resync(self):
+        if self.topic_filter:
+            try:
+                self.sync_with_broker(self.topic_filter, self.broker_diff_timeout_s)
+            except Exception as e:
+                log.warning(f"HA discovery broker diff after reconnect failed, re-sending every config: {e}")
+                self.store.replace({})
+        else:
+            self.store.replace({})
+        with self._cond:
+            entries = dict(self._sent)
+            entries.update(self._unsent)
+            self._unsent.clear()
+        requeued = sum(1 for topic, (payload, _) in entries.items() if self.submit(topic, payload))
+        if requeued:
+            log.info(f"HA discovery: re-sending {requeued} configs after MQTT reconnect")
+
+    def flush(self, timeout: float = 30.0) -> bool:
+        """Wait until every queued config is sent. Returns False on timeout."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._queue or self._sending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the sender; queued configs are dropped (not recorded, so they are sent next time)."""
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def sync_with_broker(self, topic_filter: str, timeout_s: float = 3.0) -> Dict[str, int]:
+        """
+        Replace the store with the retained configs the broker holds under
+        ``topic_filter`` (e.g. ``homeassistant/+/+/config``).
+
+        Retained messages arrive right after subscribing; the collection ends
+        ``timeout_s`` after the last one. Call before discovery is submitted.
+        """
+        seen: Dict[str, str] = {}
+        last = [time.monotonic()]
+
+        def on_retained(topic: str, data: Any):
+            if data in ("", None):
+                return  # retained removals are not delivered; ignore stray empty messages
+            seen[topic] = config_hash(data)
+            last[0] = time.monotonic()
+
+        self.mqtt.sub(topic_filter, on_retained)
+        try:
+            while time.monotonic() - last[0] < timeout_s:
+                time.sleep(min(0.05, timeout_s))
+        finally:
+            self.mqtt.unsub(topic_filter)
+        before = dict((topic, self.store.get(topic)) for topic in seen)
+        stale = sum(1 for topic, digest in before.items() if digest != seen[topic])
+        missing = len(self.store) - sum(1 for topic in seen if self.store.get(topic) is not None)
+        self.store.replace(seen)
+        self.broker_diffs += 1
+        log.info(f"HA discovery broker diff: {len(seen)} retained configs, {missing} missing on broker, "
+                 f"{stale} differ from the last published")
+        return {"retained": len(seen), "missing": missing, "stale": stale}
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "known_topics": len(self.store),
+            "queued": len(self._queue),
+            "unsent": len(self._unsent),
+            "published": self.published,
+            "unchanged": self.unchanged,
+            "cleared": self.cleared,
+            "failed": self.failed,
+            "batches": self.batches,
+            "broker_diffs": self.broker_diffs,
+        }
@@ -116,8 +116,14 @@ class InverterConfigCommandHandler:
             Current value of the sensor
         """
         try:
-            # Read current value from adapter
-            value = await self.adapter.read_by_ident(sensor_id)
+            # Configuration registers come from the adapter's register shadow (no bus traffic)
+            value = None
+            uncovered = [sensor_id]
+            if getattr(self.adapter, 'register_shadow', None) is not None:
+                values, _, uncovered = self.adapter.shadow_values([sensor_id])
+                value = values.get(sensor_id)
+            if uncovered:
+                value = await self.adapter.read_by_ident(sensor_id)
             
             if value is not None:
                 log.debug(f"Current value for {sensor_id}: {value}")
@@ -13,6 +13,7 @@ from solarhub.hierarchy.arrays import InverterArray, BatteryArray
 from solarhub.hierarchy.devices import Inverter, BatteryPack, Meter
 from solarhub.hierarchy.batteries import Battery, BatteryCell
 from solarhub.hierarchy.adapters import AdapterBase, AdapterInstance
+from solarhub.logging.read_pool import read_connection
 
 log = logging.getLogger(__name__)
 
@@ -30,132 +31,129 @@ class HierarchyLoader:
         Returns:
             Dictionary mapping system_id to System objects
         """
-        con = sqlite3.connect(self.db_path)
-        con.row_factory = sqlite3.Row  # Enable column access by name
-        cur = con.cursor()
-        
-        try:
-            systems = {}
+        with read_connection(self.db_path) as con:
+            con.row_factory = sqlite3.Row  # Enable column access by name
+            cur = con.cursor()
+            try:
+                systems = {}
             
-            # 1. Load all systems
-            systems_data = self._load_systems(cur)
+                # 1. Load all systems
+                systems_data = self._load_systems(cur)
             
-            # 2. Load adapter bases (for reference)
-            adapter_bases = self._load_adapter_bases(cur)
+                # 2. Load adapter bases (for reference)
+                adapter_bases = self._load_adapter_bases(cur)
             
-            # 3. Load adapter instances
-            adapters = self._load_adapters(cur)
+                # 3. Load adapter instances
+                adapters = self._load_adapters(cur)
             
-            # 4. Load inverter arrays
-            inverter_arrays_data = self._load_inverter_arrays(cur)
+                # 4. Load inverter arrays
+                inverter_arrays_data = self._load_inverter_arrays(cur)
             
-            # 5. Load battery arrays
-            battery_arrays_data = self._load_battery_arrays(cur)
+                # 5. Load battery arrays
+                battery_arrays_data = self._load_battery_arrays(cur)
             
-            # 6. Load battery array attachments
-            battery_array_attachments = self._load_battery_array_attachments(cur)
+                # 6. Load battery array attachments
+                battery_array_attachments = self._load_battery_array_attachments(cur)
             
-            # 7. Load inverters
-            inverters_data = self._load_inverters(cur)
+                # 7. Load inverters
+                inverters_data = self._load_inverters(cur)
             
-            # 8. Load battery packs
-            battery_packs_data = self._load_battery_packs(cur)
+                # 8. Load battery packs
+                battery_packs_data = self._load_battery_packs(cur)
             
-            # 9. Load battery pack adapters
-            battery_pack_adapters = self._load_battery_pack_adapters(cur)
+                # 9. Load battery pack adapters
+                battery_pack_adapters = self._load_battery_pack_adapters(cur)
             
-            # 10. Load batteries (if table exists)
-            batteries_data = self._load_batteries(cur)
+                # 10. Load batteries (if table exists)
+                batteries_data = self._load_batteries(cur)
             
-            # 11. Load battery cells (if table exists)
-            battery_cells_data = self._load_battery_cells(cur)
+                # 11. Load battery cells (if table exists)
+                battery_cells_data = self._load_battery_cells(cur)
             
-            # 12. Load meters
-            meters_data = self._load_meters(cur)
+                # 12. Load meters
+                meters_data = self._load_meters(cur)
             
-            # Build hierarchy objects
-            for system_row in systems_data:
-                system = self._build_system(system_row)
-                systems[system.system_id] = system
+                # Build hierarchy objects
+                for system_row in systems_data:
+                    system = self._build_system(system_row)
+                    systems[system.system_id] = system
                 
-                # Add inverter arrays
-                for array_row in inverter_arrays_data:
-                    if array_row['system_id'] == system.system_id:
-                        inverter_array = self._build_inverter_array(array_row)
-                        system.add_inverter_array(inverter_array)
+                    # Add inverter arrays
+                    for array_row in inverter_arrays_data:
+                        if array_row['system_id'] == system.system_id:
+                            inverter_array = self._build_inverter_array(array_row)
+                            system.add_inverter_array(inverter_array)
                         
-                        # Add inverters to array
-                        for inv_row in inverters_data:
-                            if inv_row['array_id'] == inverter_array.array_id:
-                                inverter = self._build_inverter(inv_row)
+                            # Add inverters to array
+                            for inv_row in inverters_data:
+                                if inv_row['array_id'] == inverter_array.array_id:
+                                    inverter = self._build_inverter(inv_row)
                                 
-                                # Link adapter if available
-                                if inv_row['adapter_id'] and inv_row['adapter_id'] in adapters:
-                                    adapter = adapters[inv_row['adapter_id']]
-                                    inverter.set_adapter(adapter)
+                                    # Link adapter if available
+                                    if inv_row['adapter_id'] and inv_row['adapter_id'] in adapters:
+                                        adapter = adapters[inv_row['adapter_id']]
+                                        inverter.set_adapter(adapter)
                                 
-                                inverter_array.add_inverter(inverter)
+                                    inverter_array.add_inverter(inverter)
                 
-                # Add battery arrays
-                for battery_array_row in battery_arrays_data:
-                    if battery_array_row['system_id'] == system.system_id:
-                        battery_array = self._build_battery_array(battery_array_row)
-                        system.add_battery_array(battery_array)
+                    # Add battery arrays
+                    for battery_array_row in battery_arrays_data:
+                        if battery_array_row['system_id'] == system.system_id:
+                            battery_array = self._build_battery_array(battery_array_row)
+                            system.add_battery_array(battery_array)
                         
-                        # Link to inverter array if attached
-                        attachment = battery_array_attachments.get(battery_array.battery_array_id)
-                        if attachment:
-                            inverter_array_id = attachment['inverter_array_id']
-                            inverter_array = system.get_inverter_array(inverter_array_id)
-                            if inverter_array:
-                                battery_array.attach_inverter_array(inverter_array)
+                            # Link to inverter array if attached
+                            attachment = battery_array_attachments.get(battery_array.battery_array_id)
+                            if attachment:
+                                inverter_array_id = attachment['inverter_array_id']
+                                inverter_array = system.get_inverter_array(inverter_array_id)
+                                if inverter_array:
+                                    battery_array.attach_inverter_array(inverter_array)
                         
-                        # Add battery packs to array
-                        for pack_row in battery_packs_data:
-                            if pack_row['battery_array_id'] == battery_array.battery_array_id:
-                                battery_pack = self._build_battery_pack(pack_row)
+                            # Add battery packs to array
+                            for pack_row in battery_packs_data:
+                                if pack_row['battery_array_id'] == battery_array.battery_array_id:
+                                    battery_pack = self._build_battery_pack(pack_row)
                                 
-                                # Link adapters if available
-                                pack_adapters = battery_pack_adapters.get(battery_pack.pack_id, [])
-                                for adapter_id in pack_adapters:
-                                    if adapter_id in adapters:
-                                        adapter = adapters[adapter_id]
-                                        battery_pack.add_adapter(adapter)
+                                    # Link adapters if available
+                                    pack_adapters = battery_pack_adapters.get(battery_pack.pack_id, [])
+                                    for adapter_id in pack_adapters:
+                                        if adapter_id in adapters:
+                                            adapter = adapters[adapter_id]
+                                            battery_pack.add_adapter(adapter)
                                 
-                                battery_array.add_battery_pack(battery_pack)
+                                    battery_array.add_battery_pack(battery_pack)
                                 
-                                # Add batteries to pack
-                                for battery_row in batteries_data:
-                                    if battery_row['pack_id'] == battery_pack.pack_id:
-                                        battery = self._build_battery(battery_row)
-                                        battery_pack.add_battery(battery)
+                                    # Add batteries to pack
+                                    for battery_row in batteries_data:
+                                        if battery_row['pack_id'] == battery_pack.pack_id:
+                                            battery = self._build_battery(battery_row)
+                                            battery_pack.add_battery(battery)
                                         
-                                        # Add cells to battery
-                                        for cell_row in battery_cells_data:
-                                            if cell_row['battery_id'] == battery.battery_id:
-                                                cell = self._build_battery_cell(cell_row)
-                                                battery.add_cell(cell)
+                                            # Add cells to battery
+                                            for cell_row in battery_cells_data:
+                                                if cell_row['battery_id'] == battery.battery_id:
+                                                    cell = self._build_battery_cell(cell_row)
+                                                    battery.add_cell(cell)
                 
-                # Add system-level meters (array_id is NULL)
-                for meter_row in meters_data:
-                    if meter_row['system_id'] == system.system_id and meter_row['array_id'] is None:
-                        meter = self._build_meter(meter_row)
+                    # Add system-level meters (array_id is NULL)
+                    for meter_row in meters_data:
+                        if meter_row['system_id'] == system.system_id and meter_row['array_id'] is None:
+                            meter = self._build_meter(meter_row)
                         
-                        # Link adapter if available
-                        if meter_row['adapter_id'] and meter_row['adapter_id'] in adapters:
-                            adapter = adapters[meter_row['adapter_id']]
-                            meter.set_adapter(adapter)
+                            # Link adapter if available
+                            if meter_row['adapter_id'] and meter_row['adapter_id'] in adapters:
+                                adapter = adapters[meter_row['adapter_id']]
+                                meter.set_adapter(adapter)
                         
-                        system.add_meter(meter)
+                            system.add_meter(meter)
             
-            log.info(f"Loaded {len(systems)} system(s) from database")
-            return systems
+                log.info(f"Loaded {len(systems)} system(s) from database")
+                return systems
             
-        except Exception as e:
-            log.error(f"Failed to load hierarchy from database: {e}", exc_info=True)
-            raise
-        finally:
-            con.close()
+            except Exception as e:
+                log.error(f"Failed to load hierarchy from database: {e}", exc_info=True)
+                raise
     
     def _load_systems(self, cur) -> List[sqlite3.Row]:
         """Load all systems from database."""
@@ -0,0 +1,569 @@
+"""
+Time-bucketed history queries over the coarsest table that can answer them.
+
+A query names a scope (inverter, array, system, meter), the entities, a list of
+metrics, a time range and a bucket (fixed width in seconds or a calendar unit:
+day/week/month/year). Sources are tried from coarsest to finest:
+
+    daily summaries -> hourly energy tables -> hour rollups -> minute rollups -> raw samples
+
+A source is used when its granularity divides the buckets and it has every
+requested metric/aggregation; if a summary table stops short of the end of the
+range (the current hour/day is not written yet) or has no row for some
+hours/days inside it, those intervals are answered by the next finer source. Raw samples include the retention tiers of their table
+(``{table}_1m``/``{table}_15m``, solarhub.logging.retention): retention moves
+every sample to exactly one of them, so the three are read over the same range
+and added up. Sources pre-aggregate in SQL and the final bucketing and
+entity combination run in pandas/NumPy. The result is columnar:
+``{"ts": [...], "count": [...], "series": {metric: [...]}}``.
+
+Metrics are either gauges (power, SoC, voltage: aggregated with ``agg``) or
+energy counters in kWh (always summed).
+"""
+import logging
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from solarhub.logging import rollups
+from solarhub.logging.read_pool import read_connection
+
+log = logging.getLogger(__name__)
+
+AGGREGATIONS = ("avg", "min", "max", "sum")
+CALENDAR_BUCKETS = ("day", "week", "month", "year")
+
+# Energy counters (kWh) and the rollup power metric/part they are integrated from
+COUNTER_METRICS: Dict[str, Tuple[str, str]] = {
+    "pv_energy_kwh": ("pv_power_w", "net"),
+    "load_energy_kwh": ("load_power_w", "net"),
+    "batt_charge_kwh": ("batt_power_w", "in"),
+    "batt_discharge_kwh": ("batt_power_w", "out"),
+    "grid_import_kwh": ("grid_power_w", "in"),
+    "grid_export_kwh": ("grid_power_w", "out"),
+}
+
+# Gauges recorded in the ingest rollups (DataLogger rollup hooks)
+ROLLUP_GAUGES = frozenset({"pv_power_w", "load_power_w", "grid_power_w", "batt_power_w", "batt_soc_pct",
+                           "grid_voltage_v", "grid_frequency_hz"})
+
+_HOURLY_COUNTERS = {
+    "pv_energy_kwh": "solar_energy_kwh",
+    "load_energy_kwh": "load_energy_kwh",
+    "batt_charge_kwh": "battery_charge_energy_kwh",
+    "batt_discharge_kwh": "battery_discharge_energy_kwh",
+    "grid_import_kwh": "grid_import_energy_kwh",
+    "grid_export_kwh": "grid_export_energy_kwh",
+}
+_HOURLY_GAUGES = {
+    "pv_power_w": {"avg": "avg_solar_power_w"},
+    "load_power_w": {"avg": "avg_load_power_w"},
+    "batt_power_w": {"avg": "avg_battery_power_w"},
+    "grid_power_w": {"avg": "avg_grid_power_w"},
+}
+
+
+@dataclass(frozen=True)
+class TableSource:
+    """A pre-aggregated table keyed by local date (and hour)."""
+    name: str
+    table: str
+    entity_col: str
+    granularity: int  # 3600 (date + hour_start) or 86400 (date)
+    date_col: str = "date"
+    counters: Dict[str, str] = field(default_factory=dict)
+    gauges: Dict[str, Dict[str, str]] = field(default_factory=dict)
+    count_col: Optional[str] = "sample_count"
+    live: bool = False  # current period is kept up to date on ingest
+
+
+@dataclass(frozen=True)
+class RollupSource:
+    """Ingest rollups (solarhub.logging.rollups)."""
+    name: str
+    table: str
+    granularity: int
+
+
+@dataclass(frozen=True)
+class RawSource:
+    """Raw sample table; gauges are pre-aggregated per bucket in SQL."""
+    name: str
+    table: str
+    entity_col: str
+    gauges: Dict[str, str]
+    granularity: int = 1
+    # Retention tiers (table, bucket seconds) holding the samples aged out of ``table``
+    tiers: Tuple[Tuple[str, int], ...] = ()
+
+
+def _retention_tiers(table: str) -> Tuple[Tuple[str, int], ...]:
+    return ((f"{table}_1m", 60), (f"{table}_15m", 900))
+
+
+Source = Union[TableSource, RollupSource, RawSource]
+
+_ROLLUP_HOUR = RollupSource("rollup_hour", rollups.HOUR_TABLE, 3600)
+_ROLLUP_MINUTE = RollupSource("rollup_minute", rollups.MINUTE_TABLE, 60)
+
+SOURCES: Dict[str, List[Source]] = {
+    rollups.SCOPE_INVERTER: [
+        TableSource("daily_summary", "daily_summary", "inverter_id", 86400,
+                    counters={
+                        "pv_energy_kwh": "pv_energy_kwh",
+                        "load_energy_kwh": "load_energy_kwh",
+                        "grid_import_kwh": "grid_energy_imported_kwh",
+                        "grid_export_kwh": "grid_energy_exported_kwh",
+                    },
+                    gauges={
+                        "pv_power_w": {"avg": "pv_avg_power_w", "max": "pv_max_power_w"},
+                        "load_power_w": {"avg": "load_avg_power_w", "max": "load_max_power_w"},
+                        "batt_soc_pct": {"avg": "battery_avg_soc_pct", "min": "battery_min_soc_pct",
+                                         "max": "battery_max_soc_pct"},
+                    }),
+        TableSource("hourly_energy", "hourly_energy", "inverter_id", 3600,
+                    counters=_HOURLY_COUNTERS, gauges=_HOURLY_GAUGES),
+        _ROLLUP_HOUR,
+        _ROLLUP_MINUTE,
+        RawSource("energy_samples", "energy_samples", "inverter_id", {
+            "pv_power_w": "pv_power_w",
+            "load_power_w": "load_power_w",
+            "grid_power_w": "grid_power_w",
+            "batt_power_w": "batt_voltage_v * batt_current_a",
+            "batt_soc_pct": "COALESCE(soc, battery_soc)",
+        }),
+    ],
+    rollups.SCOPE_ARRAY: [
+        TableSource("array_hourly_energy", "array_hourly_energy", "array_id", 3600,
+                    counters=_HOURLY_COUNTERS, gauges=_HOURLY_GAUGES),
+        _ROLLUP_HOUR,
+        _ROLLUP_MINUTE,
+        RawSource("array_samples", "array_samples", "array_id", {
+            "pv_power_w": "pv_power_w",
+            "load_power_w": "load_power_w",
+            "grid_power_w": "grid_power_w",
+            "batt_power_w": "batt_power_w",
+            "batt_soc_pct": "batt_soc_pct",
+        }, tiers=_retention_tiers("array_samples")),
+    ],
+    rollups.SCOPE_SYSTEM: [
+        TableSource("system_hourly_energy", "system_hourly_energy", "system_id", 3600,
+                    counters=_HOURLY_COUNTERS, gauges=_HOURLY_GAUGES),
+        _ROLLUP_HOUR,
+        _ROLLUP_MINUTE,
+    ],
+    rollups.SCOPE_METER: [
+        TableSource("meter_daily", "meter_daily", "meter_id", 86400, date_col="day", live=True,
+                    counters={
+                        "grid_import_kwh": "import_energy_kwh",
+                        "grid_export_kwh": "export_energy_kwh",
+                    },
+                    gauges={
+                        "grid_import_power_w": {"max": "max_import_power_w"},
+                        "grid_export_power_w": {"max": "max_export_power_w"},
+                        "grid_voltage_v": {"avg": "avg_voltage_v"},
+                        "grid_frequency_hz": {"avg": "avg_frequency_hz"},
+                    }),
+        _ROLLUP_HOUR,
+        _ROLLUP_MINUTE,
+        RawSource("meter_samples", "meter_samples", "meter_id", {
+            "grid_power_w": "grid_power_w",
+            "grid_voltage_v": "grid_voltage_v",
+            "grid_frequency_hz": "grid_frequency_hz",
+        }, tiers=_retention_tiers("meter_samples")),
+    ],
+}
+
+_FRAME_COLUMNS = ["entity", "ts", "metric", "count", "sum", "min", "max"]
+
+
+def _supports(source: Source, metrics: Sequence[str], agg: str) -> bool:
+    for m in metrics:
+        if isinstance(source, TableSource):
+            if m in COUNTER_METRICS:
+                ok = m in source.counters
+            else:
+                ok = agg in source.gauges.get(m, {})
+        elif isinstance(source, RawSource):
+            ok = m in source.gauges
+        else:
+            ok = m in COUNTER_METRICS or m in ROLLUP_GAUGES
+        if not ok:
+            return False
+    return True
+
+
+def _bucket_edges(start: datetime, end: datetime, bucket: Union[int, str]) -> np.ndarray:
+    """Epoch edges of the buckets intersecting [start, end), aligned in local time."""
+    t0 = pd.Timestamp(start)
+    t1 = pd.Timestamp(end)
+    if isinstance(bucket, str):
+        floor = t0.normalize()
+        if bucket == "week":
+            floor -= pd.Timedelta(days=floor.dayofweek)
+        elif bucket == "month":
+            floor = floor.replace(day=1)
+        elif bucket == "year":
+            floor = floor.replace(month=1, day=1)
+        freq = {"day": "D", "week": "W-MON", "month": "MS", "year": "YS"}[bucket]
+        step = {"day": pd.DateOffset(days=1), "week": pd.DateOffset(weeks=1),
+                "month": pd.DateOffset(months=1), "year": pd.DateOffset(years=1)}[bucket]
+        edges = pd.date_range(floor, t1 + step, freq=freq).asi8 // 1_000_000_000
+    else:
+        offset = int(start.utcoffset().total_seconds()) if start.utcoffset() is not None else 0
+        s = int(start.timestamp())
+        if 86400 % bucket == 0 or bucket % 86400 == 0:
+            local = s + offset
+            s = local - local % bucket - offset
+        n = max(1, -(-(int(end.timestamp()) - s) // bucket))
+        edges = s + bucket * np.arange(n + 1, dtype=np.int64)
+    last = int(np.searchsorted(edges, int(end.timestamp()), side="left"))
+    return edges[:max(last, 1) + 1]
+
+
+def _local_offsets(epochs: np.ndarray, tz) -> np.ndarray:
+    idx = pd.to_datetime(epochs, unit="s", utc=True).tz_convert(tz)
+    naive = idx.tz_localize(None)
+    return (naive.asi8 // 1_000_000_000) - epochs
+
+
+def _slot_starts(start: int, end: int, granularity: int, tz) -> np.ndarray:
+    """Epoch starts of the local hours/days of a summary table in [start, end)."""
+    if granularity == 86400:
+        idx = pd.date_range(pd.Timestamp(start, unit="s", tz="UTC").tz_convert(tz),
+                            pd.Timestamp(end, unit="s", tz="UTC").tz_convert(tz), freq="D", inclusive="left")
+        return idx.asi8 // 1_000_000_000
+    return np.arange(start, end, granularity, dtype=np.int64)
+
+
+def _holes(slots: np.ndarray, present: np.ndarray, until: int) -> List[Tuple[int, int]]:
+    """Intervals of consecutive ``slots`` (ending at ``until``) that have no row in ``present``."""
+    bounds = np.append(slots, until)
+    holes: List[Tuple[int, int]] = []
+    for i in np.flatnonzero(~np.isin(slots, present)):
+        a, b = int(bounds[i]), int(bounds[i + 1])
+        if holes and holes[-1][1] == a:
+            holes[-1] = (holes[-1][0], b)
+        else:
+            holes.append((a, b))
+    return holes
+
+
+def _aligned(edges: np.ndarray, seg_start: int, granularity: int, tz) -> bool:
+    if granularity <= 1:
+        return True
+    points = np.append(edges[edges > seg_start], seg_start)
+    local = points + _local_offsets(points, tz)
+    return bool(np.all(local % granularity == 0))
+
+
+class HistoryQuery:
+    """Answers bucketed history queries from the coarsest suitable source."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        # Statistics
+        self.queries = 0
+        self.source_hits: Dict[str, int] = {}
+        self.last_query_ms = 0.0
+
+    def query(self, scope: str, entity_ids: Optional[Sequence[str]], metrics: Sequence[str],
+              start: datetime, end: datetime, bucket: Union[int, str] = 3600,
+              agg: str = "avg", combine: str = "sum") -> Dict[str, Any]:
+        """
+        Bucketed values for ``metrics`` over ``[start, end)``.
+
+        Args:
+            scope: inverter | array | system | meter
+            entity_ids: Entities to include (None = every entity of the scope)
+            metrics: Gauge metrics (aggregated with ``agg``) and/or *_kwh counters (summed)
+            start, end: Timezone-aware range; buckets are aligned in start's local time
+            bucket: Width in seconds or one of day/week/month/year
+            agg: avg | min | max | sum for gauges
+            combine: How averages of several entities combine per bucket: "sum" (total,
+                e.g. site power) or "mean" (sample-weighted mean across entities);
+                min/max always take the extreme across entities
+
+        Returns:
+            {"ts": [bucket start epoch], "count": [samples], "series": {metric: [value|None]},
+             "sources": [{"source", "start", "end"}], ...}
+        """
+        if scope not in SOURCES:
+            raise ValueError(f"Unknown scope: {scope}")
+        if agg not in AGGREGATIONS:
+            raise ValueError(f"Unknown aggregation: {agg}")
+        if isinstance(bucket, str) and bucket not in CALENDAR_BUCKETS:
+            raise ValueError(f"Unknown bucket: {bucket}")
+        if not isinstance(bucket, str) and int(bucket) < 1:
+            raise ValueError("bucket must be positive")
+        if start.tzinfo is None:
+            raise ValueError("start must be timezone-aware")
+        metrics = list(dict.fromkeys(metrics))
+        began = time.perf_counter()
+
+        edges = _bucket_edges(start, end, bucket if isinstance(bucket, str) else int(bucket))
+        tz = start.tzinfo
+        end_epoch = int(edges[-1])
+        seg_start = int(edges[0])
+        raw_width = 3600 if isinstance(bucket, str) else int(bucket)
+
+        frames: List[pd.DataFrame] = []
+        used: List[Dict[str, Any]] = []
+        # Intervals no source has answered yet; a coarse source passes its holes and tail on
+        pending: List[Tuple[int, int]] = [(seg_start, end_epoch)]
+        with read_connection(self.db_path) as con:
+            cur = con.cursor()
+            for source in SOURCES[scope]:
+                if not pending:
+                    break
+                if not _supports(source, metrics, agg):
+                    continue
+                remaining: List[Tuple[int, int]] = []
+                for seg_start, seg_end in pending:
+                    if not _aligned(edges, seg_start, source.granularity, tz):
+                        remaining.append((seg_start, seg_end))
+                        continue
+                    holes: List[Tuple[int, int]] = []
+                    try:
+                        if isinstance(source, RollupSource):
+                            if not rollups.covers(cur, datetime.fromtimestamp(seg_start, tz=tz)):
+                                remaining.append((seg_start, seg_end))
+                                continue
+                            frame, until = self._fetch_rollups(cur, source, scope, entity_ids, metrics,
+                                                               seg_start, seg_end)
+                        elif isinstance(source, TableSource):
+                            frame, until, holes = self._fetch_table(cur, source, entity_ids, metrics, agg,
+                                                                    seg_start, seg_end, tz)
+                        else:
+                            frame, until = self._fetch_raw(cur, source, entity_ids, metrics,
+                                                           seg_start, seg_end, int(edges[0]), raw_width, tz)
+                    except sqlite3.OperationalError as e:
+                        log.debug(f"History source {source.name} unavailable: {e}")
+                        remaining.append((seg_start, seg_end))
+                        continue
+                    if until <= seg_start:
+                        remaining.append((seg_start, seg_end))
+                        continue
+                    frames.append(frame)
+                    used.append({"source": source.name,
+                                 "start": datetime.fromtimestamp(seg_start, tz=tz).isoformat(),
+                                 "end": datetime.fromtimestamp(min(until, seg_end), tz=tz).isoformat()})
+                    self.source_hits[source.name] = self.source_hits.get(source.name, 0) + 1
+                    remaining.extend(holes)
+                    if until < seg_end:
+                        remaining.append((until, seg_end))
+                pending = remaining
+
+        for seg_start, seg_end in pending:
+            log.debug(f"History query {scope}/{metrics}: no source for "
+                      f"{datetime.fromtimestamp(seg_start, tz=tz)} - {datetime.fromtimestamp(seg_end, tz=tz)}")
+
+        result = self._bucketize(frames, edges, metrics, agg, combine)
+        result.update({
+            "scope": scope,
+            "entity_ids": list(entity_ids) if entity_ids else None,
+            "start": datetime.fromtimestamp(int(edges[0]), tz=tz).isoformat(),
+            "end": datetime.fromtimestamp(end_epoch, tz=tz).isoformat(),
+            "bucket": bucket,
+            "agg": agg,
+            "combine": combine,
+            "sources": used,
+        })
+        self.queries += 1
+        self.last_query_ms = (time.perf_counter() - began) * 1000.0
+        return result
+
+    # ---------- Sources ----------
+    @staticmethod
+    def _entity_clause(col: str, entity_ids: Optional[Sequence[str]]) -> Tuple[str, List[Any]]:
+        if not entity_ids:
+            return "", []
+        return f" AND {col} IN ({','.join('?' * len(entity_ids))})", list(entity_ids)
+
+    def _fetch_table(self, cur: sqlite3.Cursor, source: TableSource, entity_ids, metrics, agg: str,
+                     start: int, end: int, tz) -> Tuple[pd.DataFrame, int, List[Tuple[int, int]]]:
+        """Rows in [start, end), the end of the last row, and the hours/days before it without rows."""
+        if not source.live:
+            # Only closed hours/days: a summary of the current period may have been written early
+            now = pd.Timestamp.now(tz=tz)
+            closed = now.normalize() if source.granularity == 86400 else now.floor("h")
+            end = min(end, int(closed.timestamp()))
+        if end <= start:
+            return pd.DataFrame(columns=_FRAME_COLUMNS), start, []
+        exprs = [source.counters[m] if m in COUNTER_METRICS else source.gauges[m][agg] for m in metrics]
+        hour_col = ", hour_start" if source.granularity == 3600 else ", 0"
+        count_col = source.count_col or "1"
+        entity_sql, params = self._entity_clause(source.entity_col, entity_ids)
+        first_day = datetime.fromtimestamp(start, tz=tz).strftime("%Y-%m-%d")
+        last_day = datetime.fromtimestamp(end - 1, tz=tz).strftime("%Y-%m-%d")
+        cur.execute(f"""
+            SELECT {source.entity_col}, {source.date_col}{hour_col}, {count_col}, {', '.join(exprs)}
+            FROM {source.table}
+            WHERE {source.date_col} >= ? AND {source.date_col} <= ?{entity_sql}
+        """, [first_day, last_day, *params])
+        rows = cur.fetchall()
+        if not rows:
+            return pd.DataFrame(columns=_FRAME_COLUMNS), start, []
+        df = pd.DataFrame(rows, columns=["entity", "date", "hour", "count", *metrics])
+        local = pd.to_datetime(df["date"], format="%Y-%m-%d", errors="coerce") + pd.to_timedelta(df["hour"], unit="h")
+        df["ts"] = local.dt.tz_localize(tz, ambiguous="NaT", nonexistent="NaT").astype("int64") // 1_000_000_000
+        df = df[(df["ts"] >= start) & (df["ts"] < end)]
+        if df.empty:
+            return pd.DataFrame(columns=_FRAME_COLUMNS), start, []
+        df["count"] = df["count"].fillna(0).clip(lower=0)
+        present = np.unique(df["ts"].to_numpy(dtype=np.int64))
+        until = int(present[-1]) + source.granularity
+        holes = _holes(_slot_starts(start, int(present[-1]) + 1, source.granularity, tz), present, until)
+
+        parts = []
+        for m in metrics:
+            v = df[m].astype(float)
+            part = pd.DataFrame({"entity": df["entity"], "ts": df["ts"], "metric": m, "count": df["count"]})
+            if m in COUNTER_METRICS or agg == "sum":
+                part["sum"], part["min"], part["max"] = v, v, v
+            elif agg == "avg":
+                # Weight stored averages by their sample count
+                weight = df["count"].where(df["count"] > 0, 1)
+                part["count"] = weight.where(v.notna(), 0)
+                part["sum"], part["min"], part["max"] = v * weight, v, v
+            else:
+                part["sum"], part["min"], part["max"] = v, v, v
+            parts.append(part)
+        return pd.concat(parts, ignore_index=True), until, holes
+
+    def _fetch_rollups(self, cur: sqlite3.Cursor, source: RollupSource, scope: str, entity_ids, metrics,
+                       start: int, end: int) -> Tuple[pd.DataFrame, int]:
+        base = sorted({COUNTER_METRICS[m][0] if m in COUNTER_METRICS else m for m in metrics})
+        entity_sql, params = self._entity_clause("entity_id", entity_ids)
+        cur.execute(f"""
+            SELECT entity_id, bucket_ts, metric, sample_count, value_sum, value_min, value_max,
+                   energy_in_kwh, energy_out_kwh
+            FROM {source.table}
+            WHERE scope = ? AND metric IN ({','.join('?' * len(base))})
+              AND bucket_ts >= ? AND bucket_ts < ?{entity_sql}
+        """, [scope, *base, start, end, *params])
+        df = pd.DataFrame(cur.fetchall(), columns=["entity", "ts", "metric", "count", "sum", "min", "max",
+                                                   "e_in", "e_out"])
+        parts = []
+        for m in metrics:
+            if m in COUNTER_METRICS:
+                base_metric, part_name = COUNTER_METRICS[m]
+                rows = df[df["metric"] == base_metric]
+                energy = {"in": rows["e_in"], "out": rows["e_out"], "net": rows["e_in"] - rows["e_out"]}[part_name]
+                part = pd.DataFrame({"entity": rows["entity"], "ts": rows["ts"], "metric": m,
+                                     "count": rows["count"], "sum": energy, "min": energy, "max": energy})
+            else:
+                part = df[df["metric"] == m][_FRAME_COLUMNS]
+            parts.append(part)
+        # Rollups are live: they answer up to the end of the range
+        return pd.concat(parts, ignore_index=True), end
+
+    def _fetch_raw(self, cur: sqlite3.Cursor, source: RawSource, entity_ids, metrics,
+                   start: int, end: int, base: int, width: int, tz) -> Tuple[pd.DataFrame, int]:
+        cols = []
+        for m in metrics:
+            e = source.gauges[m]
+            cols.append(f"COUNT({e}), SUM({e}), MIN({e}), MAX({e})")
+        entity_sql, params = self._entity_clause(source.entity_col, entity_ids)
+        start_s = datetime.fromtimestamp(start, tz=tz).isoformat(sep=" ")
+        end_s = datetime.fromtimestamp(end, tz=tz).isoformat(sep=" ")
+        cur.execute(f"""
+            SELECT {source.entity_col}, (CAST(strftime('%s', ts) AS INTEGER) - ?) / ? AS k, {', '.join(cols)}
+            FROM {source.table}
+            WHERE ts >= ? AND ts < ?{entity_sql}
+            GROUP BY {source.entity_col}, k
+        """, [base, width, start_s, end_s, *params])
+        rows = cur.fetchall()
+        for table, granularity in source.tiers:
+            if width % granularity:
+                continue  # a tier bucket would straddle query buckets
+            rows.extend(self._fetch_tier(cur, source, table, entity_ids, metrics, start, end, base, width))
+        if not rows:
+            return pd.DataFrame(columns=_FRAME_COLUMNS), end
+        arr = pd.DataFrame(rows)
+        ts = base + arr[1].astype("int64") * width
+        parts = []
+        for i, m in enumerate(metrics):
+            c = 2 + 4 * i
+            parts.append(pd.DataFrame({"entity": arr[0], "ts": ts, "metric": m, "count": arr[c],
+                                       "sum": arr[c + 1], "min": arr[c + 2], "max": arr[c + 3]}))
+        return pd.concat(parts, ignore_index=True), end
+
+    def _fetch_tier(self, cur: sqlite3.Cursor, source: RawSource, table: str, entity_ids, metrics,
+                    start: int, end: int, base: int, width: int) -> List[tuple]:
+        """Rows of a retention tier in the raw query's layout (averages weighted by sample_count)."""
+        cols = []
+        for m in metrics:
+            e = source.gauges[m]
+            cols.append(f"SUM(CASE WHEN {e} IS NOT NULL THEN sample_count END), SUM({e} * sample_count), "
+                        f"MIN({e}), MAX({e})")
+        entity_sql, params = self._entity_clause(source.entity_col, entity_ids)
+        try:
+            cur.execute(f"""
+                SELECT {source.entity_col}, (bucket_ts - ?) / ? AS k, {', '.join(cols)}
+                FROM {table}
+                WHERE bucket_ts >= ? AND bucket_ts < ?{entity_sql}
+                GROUP BY {source.entity_col}, k
+            """, [base, width, start, end, *params])
+        except sqlite3.OperationalError:
+            return []  # retention has not created this tier
+        return cur.fetchall()
+
+    # ---------- Bucketing ----------
+    @staticmethod
+    def _bucketize(frames: List[pd.DataFrame], edges: np.ndarray, metrics: Sequence[str],
+                   agg: str, combine: str) -> Dict[str, Any]:
+        n = len(edges) - 1
+        series: Dict[str, List[Optional[float]]] = {m: [None] * n for m in metrics}
+        counts = np.zeros(n, dtype=np.int64)
+        frames = [f for f in frames if not f.empty]
+        if frames:
+            df = pd.concat(frames, ignore_index=True)
+            ts = df["ts"].to_numpy(dtype=np.int64)
+            df["b"] = np.searchsorted(edges, ts, side="right") - 1
+            df = df[(df["b"] >= 0) & (df["b"] < n)]
+            for col in ("count", "sum", "min", "max"):
+                df[col] = pd.to_numeric(df[col], errors="coerce")
+            # Per entity and bucket first, then across entities
+            per_entity = df.groupby(["metric", "entity", "b"], sort=False).agg(
+                count=("count", "sum"), sum=("sum", "sum"), min=("min", "min"), max=("max", "max"))
+            per_entity = per_entity.reset_index()
+            for m, g in per_entity.groupby("metric", sort=False):
+                b = g["b"].to_numpy()
+                bucket_counts = np.bincount(b, weights=g["count"].fillna(0).to_numpy(), minlength=n)
+                counts = np.maximum(counts, bucket_counts.astype(np.int64))
+                if m in COUNTER_METRICS or agg == "sum":
+                    values = g.groupby("b")["sum"].sum(min_count=1)
+                elif agg == "avg":
+                    c = g["count"].where(g["count"] > 0)
+                    if combine == "mean":
+                        totals = g.groupby("b")[["sum", "count"]].sum()
+                        values = totals["sum"] / totals["count"].where(totals["count"] > 0)
+                    else:
+                        values = (g["sum"] / c).groupby(g["b"]).sum(min_count=1)
+                elif agg == "min":
+                    values = g.groupby("b")["min"].min()
+                else:
+                    values = g.groupby("b")["max"].max()
+                column = series[m]
+                for bi, v in values.items():
+                    if v is not None and not pd.isna(v):
+                        column[int(bi)] = float(v)
+        return {
+            "ts": [int(x) for x in edges[:-1]],
+            "count": counts.tolist(),
+            "series": series,
+        }
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get history query statistics."""
+        return {
+            "queries": self.queries,
+            "source_hits": dict(self.source_hits),
+            "last_query_ms": round(self.last_query_ms, 2),
+        }
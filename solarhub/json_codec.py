@@ -0,0 +1,139 @@
+"""
+One JSON engine for MQTT payloads, API bodies and database JSON columns.
+
+``to_jsonable`` converts a value to plain JSON types in a single pass:
+
+* Pydantic models (``model_dump``), dataclasses, enums
+* datetime / date / time as ISO strings, Decimal as float
+* NumPy scalars and arrays (``item()`` / ``tolist()``) without importing NumPy
+* sets and tuples as lists, non-string keys as ``str(key)``
+* NaN and infinities as None; anything else as ``str(value)``
+
+The converter for each type is found once and cached. Circular references
+become ``"<circular reference>"``: only the containers on the current path are
+tracked, so nothing is copied per level.
+
+``dumps`` / ``dumps_bytes`` encode with orjson when it is installed (optional
+dependency) and fall back to the stdlib ``json`` module over ``to_jsonable``.
+Both produce compact UTF-8 JSON that never contains NaN.
+"""
+import dataclasses
+import enum
+import json
+import math
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Callable, Dict, Optional, Set
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+CIRCULAR = "<circular reference>"
+
+_Converter = Callable[[Any, Set[int]], Any]
+_converters: Dict[type, _Converter] = {}
+
+
+def _identity(value: Any, _path: Set[int]) -> Any:
+    return value
+
+
+def _float(value: float, _path: Set[int]) -> Optional[float]:
+    return value if math.isfinite(value) else None
+
+
+def _dict(value: dict, path: Set[int]) -> Any:
+    oid = id(value)
+    if oid in path:
+        return CIRCULAR
+    path.add(oid)
+    try:
+        return {(k if type(k) is str else str(k)): _convert(v, path) for k, v in value.items()}
+    finally:
+        path.discard(oid)
+
+
+def _sequence(value: Any, path: Set[int]) -> Any:
+    oid = id(value)
+    if oid in path:
+        return CIRCULAR
+    path.add(oid)
+    try:
+        return [_convert(v, path) for v in value]
+    finally:
+        path.discard(oid)
+
+
+def _model(value: Any, path: Set[int]) -> Any:
+    return _convert(value.model_dump(mode="python"), path)
+
+
+def _numpy(value: Any, path: Set[int]) -> Any:
+    return _convert(value.tolist() if getattr(value, "ndim", 0) else value.item(), path)
+
+
+def _converter_for(cls: type) -> _Converter:
+    """Pick the converter for a type (subclasses of the basic types included)."""
+    if issubclass(cls, bool) or cls is type(None):
+        return _identity
+    if issubclass(cls, enum.Enum):
+        return lambda v, path: _convert(v.value, path)
+    if issubclass(cls, str):
+        return _identity if cls is str else (lambda v, _path: str(v))
+    if issubclass(cls, int):
+        return _identity if cls is int else (lambda v, _path: int(v))
+    if issubclass(cls, float):
+        return _float
+    if issubclass(cls, dict):
+        return _dict
+    if issubclass(cls, (list, tuple, set, frozenset)):
+        return _sequence
+    if issubclass(cls, (datetime, date, time)):
+        return lambda v, _path: v.isoformat()
+    if issubclass(cls, Decimal):
+        return lambda v, path: _float(float(v), path)
+    if hasattr(cls, "model_dump"):
+        return _model
+    if cls.__module__ == "numpy" and hasattr(cls, "item"):
+        return _numpy
+    if dataclasses.is_dataclass(cls):
+        return lambda v, path: _convert(dataclasses.asdict(v), path)
+    if issubclass(cls, (bytes, bytearray)):
+        return lambda v, _path: bytes(v).decode("utf-8", errors="replace")
+    return lambda v, _path: str(v)
+
+
+def _convert(value: Any, path: Set[int]) -> Any:
+    converter = _converters.get(type(value))
+    if converter is None:
+        converter = _converters[type(value)] = _converter_for(type(value))
+    return converter(value, path)
+
+
+def to_jsonable(value: Any) -> Any:
+    """``value`` as plain dict/list/str/int/float/bool/None, in one pass."""
+    return _convert(value, set())
+
+
+_ORJSON_OPTIONS = 0
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def dumps_bytes(value: Any) -> bytes:
+    """Compact UTF-8 JSON of ``value``."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, default=to_jsonable, option=_ORJSON_OPTIONS)
+        except (TypeError, orjson.JSONEncodeError):
+            # Circular references, integers beyond 64 bits, ...: take the converting path
+            pass
+    return json.dumps(to_jsonable(value), ensure_ascii=False, allow_nan=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def dumps(value: Any) -> str:
+    """Compact JSON text of ``value``."""
+    return dumps_bytes(value).decode("utf-8")
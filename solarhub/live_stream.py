@@ -0,0 +1,253 @@
+"""
+Live telemetry fan-out for push clients (SSE / WebSocket).
+
+``SolarApp`` publishes the latest inverter, array, battery bank, meter and
+home telemetry once per poll cycle. The hub keeps the last state and sends
+each subscriber one compact frame per cycle containing only the fields that
+changed, filtered to the topics the client asked for. A new or resynced
+client first receives a full snapshot:
+
+    {"seq": 42, "type": "snapshot" | "delta", "ts": 1718000000.0,
+     "data": {"inverter": {"inv1": {"pv_power_w": 1200, ...}}, "home": {...}}}
+
+In a delta a field set to ``null`` was removed, and an entity set to ``null``
+disappeared. Deltas only ever carry absolute values, so applying one twice is
+harmless.
+
+Subscribers live on the API server's event loop while publishing happens on the
+polling loop, so frames are handed over with ``call_soon_threadsafe``. A client
+whose queue overflows loses its pending frames and gets a fresh snapshot
+instead. After ``max_resyncs`` such overflows it is disconnected.
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from solarhub.json_codec import dumps
+
+log = logging.getLogger(__name__)
+
+TOPICS = ("inverter", "array", "battery", "meter", "home")
+
+# (seq, frame type, serialized frame); None closes the subscriber
+Message = Optional[Tuple[int, str, str]]
+
+
+def parse_topics(spec: Optional[Iterable[str]]) -> FrozenSet[str]:
+    """
+    Normalise a topic filter: ``topic`` or ``topic:entity_id`` entries, or
+    a comma-separated string. An empty filter means every topic.
+    """
+    if spec is None:
+        return frozenset()
+    if isinstance(spec, str):
+        spec = spec.split(",")
+    topics = set()
+    for item in spec:
+        item = str(item).strip()
+        if not item:
+            continue
+        topic = item.split(":", 1)[0]
+        if topic not in TOPICS:
+            raise ValueError(f"Unknown topic '{topic}' (expected one of {', '.join(TOPICS)})")
+        topics.add(item)
+    return frozenset(topics)
+
+
+def _filter(data: Dict[str, Dict[str, Any]], topics: FrozenSet[str]) -> Dict[str, Dict[str, Any]]:
+    if not topics:
+        return data
+    out: Dict[str, Dict[str, Any]] = {}
+    for topic, entities in data.items():
+        if topic in topics:
+            out[topic] = entities
+            continue
+        picked = {eid: v for eid, v in entities.items() if f"{topic}:{eid}" in topics}
+        if picked:
+            out[topic] = picked
+    return out
+
+
+def _encode(seq: int, kind: str, ts: float, data: Dict[str, Any]) -> str:
+    return dumps({"seq": seq, "type": kind, "ts": ts, "data": data})
+
+
+def _delta(prev: Dict[str, Dict[str, Any]], cur: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Changed fields per topic/entity between two states."""
+    out: Dict[str, Dict[str, Any]] = {}
+    for topic in TOPICS:
+        before, after = prev.get(topic, {}), cur.get(topic, {})
+        changes: Dict[str, Any] = {}
+        for eid, fields in after.items():
+            old = before.get(eid)
+            if old is None:
+                changes[eid] = fields
+                continue
+            diff = {k: v for k, v in fields.items() if k not in old or old[k] != v}
+            diff.update({k: None for k in old if k not in fields})
+            if diff:
+                changes[eid] = diff
+        changes.update({eid: None for eid in before if eid not in after})
+        if changes:
+            out[topic] = changes
+    return out
+
+
+class Subscriber:
+    """One connected push client (consumed on its own event loop)."""
+
+    def __init__(self, hub: "LiveStreamHub", topics: FrozenSet[str],
+                 loop: asyncio.AbstractEventLoop, max_queue: int):
+        self.hub = hub
+        self.topics = topics
+        self.loop = loop
+        self.queue: "asyncio.Queue[Message]" = asyncio.Queue(maxsize=max_queue)
+        self.closed = False
+        self.sent = 0
+        self.dropped = 0
+        self.resyncs = 0
+
+    def _offer(self, message: Message):
+        """Runs on the subscriber's loop."""
+        if self.closed:
+            return
+        if message is None:
+            self.closed = True
+            self._clear()
+            self.queue.put_nowait(None)
+            return
+        if not self.queue.full():
+            self.queue.put_nowait(message)
+            return
+        # Slow consumer: drop its backlog and resync from the current state
+        dropped = self._clear() + 1
+        self.dropped += dropped
+        self.resyncs += 1
+        self.hub.frames_dropped += dropped
+        if self.resyncs > self.hub.max_resyncs:
+            log.info(f"Disconnecting slow live-stream client after {self.resyncs - 1} resyncs")
+            self.hub.slow_disconnects += 1
+            self.closed = True
+            self.queue.put_nowait(None)
+            return
+        self.queue.put_nowait(self.hub.snapshot(self.topics))
+
+    def _clear(self) -> int:
+        n = 0
+        while not self.queue.empty():
+            self.queue.get_nowait()
+            n += 1
+        return n
+
+    def set_topics(self, topics: FrozenSet[str]):
+        """Change the filter; the client gets a snapshot for the new topics (call on its loop)."""
+        self.topics = topics
+        self._clear()
+        self.queue.put_nowait(self.hub.snapshot(topics))
+
+    async def get(self) -> Message:
+        """Next message, or None once the subscriber is closed."""
+        message = await self.queue.get()
+        if message is not None:
+            self.sent += 1
+        return message
+
+
+class LiveStreamHub:
+    """Keeps the latest live state and fans delta frames out to subscribers."""
+
+    def __init__(self, max_queue: int = 16, max_resyncs: int = 3):
+        self.max_queue = max_queue
+        self.max_resyncs = max_resyncs
+        self._state: Dict[str, Dict[str, Any]] = {}
+        self._seq = 0
+        self._ts = 0.0
+        self._subscribers: List[Subscriber] = []
+        self._lock = threading.Lock()
+        # Statistics
+        self.frames_published = 0
+        self.frames_dropped = 0
+        self.slow_disconnects = 0
+        self.encode_time_s = 0.0
+
+    def snapshot(self, topics: FrozenSet[str] = frozenset()) -> Tuple[int, str, str]:
+        """Full current state as a snapshot message."""
+        with self._lock:
+            return self._seq, "snapshot", _encode(self._seq, "snapshot", self._ts, _filter(self._state, topics))
+
+    def subscribe(self, topics: FrozenSet[str] = frozenset(),
+                  loop: Optional[asyncio.AbstractEventLoop] = None) -> Subscriber:
+        """Register a client on the calling event loop; its first message is a snapshot."""
+        sub = Subscriber(self, topics, loop or asyncio.get_running_loop(), self.max_queue)
+        with self._lock:
+            self._subscribers.append(sub)
+        sub.queue.put_nowait(self.snapshot(topics))
+        return sub
+
+    def unsubscribe(self, sub: Subscriber):
+        sub.closed = True
+        with self._lock:
+            if sub in self._subscribers:
+                self._subscribers.remove(sub)
+
+    def publish(self, state: Dict[str, Dict[str, Any]]):
+        """
+        Publish the complete live state of one poll cycle
+        (``{topic: {entity_id: {field: value}}}``, JSON-compatible values).
+        """
+        start = time.perf_counter()
+        state = {topic: dict(state.get(topic) or {}) for topic in TOPICS}
+        with self._lock:
+            delta = _delta(self._state, state) if self._subscribers else {}
+            self._state = state
+            self._seq += 1
+            self._ts = time.time()
+            seq, ts = self._seq, self._ts
+            subscribers = list(self._subscribers)
+        self.frames_published += 1
+        if delta:
+            self._fan_out(subscribers, seq, ts, delta)
+        self.encode_time_s += time.perf_counter() - start
+
+    def _fan_out(self, subscribers: List[Subscriber], seq: int, ts: float, delta: Dict[str, Dict[str, Any]]):
+        # Serialize once per distinct filter
+        encoded: Dict[FrozenSet[str], Optional[str]] = {}
+        for sub in subscribers:
+            if sub.topics not in encoded:
+                data = _filter(delta, sub.topics)
+                encoded[sub.topics] = _encode(seq, "delta", ts, data) if data else None
+            body = encoded[sub.topics]
+            if body is None:
+                continue
+            try:
+                sub.loop.call_soon_threadsafe(sub._offer, (seq, "delta", body))
+            except RuntimeError:
+                # Subscriber's loop is gone (server shut down)
+                self.unsubscribe(sub)
+
+    def close(self):
+        """Disconnect every subscriber."""
+        with self._lock:
+            subscribers, self._subscribers = self._subscribers, []
+        for sub in subscribers:
+            try:
+                sub.loop.call_soon_threadsafe(sub._offer, None)
+            except RuntimeError:
+                pass
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get live stream statistics."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        published = self.frames_published
+        return {
+            "subscribers": len(subscribers),
+            "seq": self._seq,
+            "frames_published": published,
+            "frames_dropped": self.frames_dropped,
+            "slow_disconnects": self.slow_disconnects,
+            "avg_publish_ms": round(self.encode_time_s / published * 1000.0, 3) if published else 0.0,
+            "max_queue_depth": max((s.queue.qsize() for s in subscribers), default=0),
+        }
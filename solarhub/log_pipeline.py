@@ -0,0 +1,275 @@
+"""
+Low-overhead application logging for the polling hot path.
+
+``install`` replaces the root handlers with one pipeline:
+
+* a ``RateLimitFilter`` caps INFO/DEBUG records per call site (file and line)
+  for the logger prefixes listed in ``logging.rate_limits``; WARNING and
+  above always pass, and the next record let through from a throttled site
+  carries the number suppressed (``record.suppressed``, shown as
+  ``[+N suppressed]``)
+* a bounded ``QueueHandler``: the polling thread only renders the message
+  (arguments and traceback) and enqueues it, while a ``QueueListener`` thread
+  formats and writes the console and file handlers. A full queue drops the
+  record and counts it instead of blocking a poll
+* an optional rotating JSON-lines file (``logging.json_file``), one object
+  per record, for tooling that would otherwise parse the text log
+
+Hot paths should also avoid building messages nobody will see: use
+``%``-style arguments and guard expensive blocks with ``log.isEnabledFor``.
+Call ``caller_info`` eagerly inside such a guard (it walks frames directly
+instead of ``traceback.extract_stack()``): a deferred call runs inside the
+logging machinery and reports its frames, not the call site. ``Lazy`` is for
+costly values that do not depend on the call stack.
+"""
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+_pipeline: Optional["LogPipeline"] = None
+
+
+def caller_info(depth: int = 5, skip: int = 1) -> str:
+    """``file:line(function)`` of the ``depth`` callers above the caller, innermost first."""
+    frame = sys._getframe(skip + 1)
+    callers = []
+    while frame is not None and len(callers) < depth:
+        code = frame.f_code
+        callers.append(f"{os.path.basename(code.co_filename)}:{frame.f_lineno}({code.co_name})")
+        frame = frame.f_back
+    return " <- ".join(callers) if callers else "unknown"
+
+
+class Lazy:
+    """Log argument computed only if the record is actually formatted."""
+
+    __slots__ = ("fn", "args")
+
+    def __init__(self, fn: Callable[..., Any], *args: Any):
+        self.fn = fn
+        self.args = args
+
+    def __str__(self) -> str:
+        return str(self.fn(*self.args))
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    At most ``limit`` INFO/DEBUG records per call site every ``window_s``
+    seconds, for loggers under the configured prefixes (the longest prefix
+    wins; a limit of 0 drops those records, a negative one disables the cap).
+    """
+
+    def __init__(self, limits: Dict[str, int], window_s: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic):
+        super().__init__()
+        self.limits = dict(limits)
+        self.window_s = float(window_s)
+        self.clock = clock
+        self._by_logger: Dict[str, Optional[int]] = {}
+        # (logger, pathname, lineno) -> [window start, records in window, suppressed]
+        self._sites: Dict[Tuple[str, str, int], List] = {}
+        self._lock = threading.Lock()
+        self.passed = 0
+        self.suppressed = 0
+
+    def limit_for(self, name: str) -> Optional[int]:
+        try:
+            return self._by_logger[name]
+        except KeyError:
+            pass
+        best, limit = -1, None
+        for prefix, value in self.limits.items():
+            if (name == prefix or name.startswith(prefix + ".") or prefix == "") and len(prefix) > best:
+                best, limit = len(prefix), value
+        if limit is not None and limit < 0:
+            limit = None
+        self._by_logger[name] = limit
+        return limit
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        # Without the queue the filter sits on every handler: decide once per record
+        decided = record.__dict__.get("rate_limit_passed")
+        if decided is not None:
+            return decided
+        record.rate_limit_passed = self._allow(record)
+        return record.rate_limit_passed
+
+    def _allow(self, record: logging.LogRecord) -> bool:
+        limit = self.limit_for(record.name)
+        if limit is None:
+            return True
+        now = self.clock()
+        key = (record.name, record.pathname, record.lineno)
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None:
+                site = self._sites[key] = [now, 0, 0]
+            elif now - site[0] >= self.window_s:
+                site[0], site[1] = now, 0
+            if site[1] >= limit:
+                site[2] += 1
+                self.suppressed += 1
+                return False
+            site[1] += 1
+            if site[2]:
+                record.suppressed = site[2]
+                site[2] = 0
+            self.passed += 1
+        return True
+
+
+class SuppressedCountFormatter(logging.Formatter):
+    """Text formatter that appends ``[+N suppressed]`` to a record let through after throttling."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        return f"{text} [+{suppressed} suppressed]" if suppressed else text
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One compact JSON object per record."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "thread": record.threadName,
+        }
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            entry["suppressed"] = suppressed
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops (and counts) records when the queue is full instead of erroring."""
+
+    def __init__(self, q: "queue.Queue"):
+        super().__init__(q)
+        self.enqueued = 0
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+            self.enqueued += 1
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    """Root handlers installed by ``install``; ``stop`` restores the previous ones."""
+
+    def __init__(self, handlers: List[logging.Handler], rate_filter: Optional[RateLimitFilter],
+                 queue_size: int = 0):
+        self.handlers = handlers
+        self.rate_filter = rate_filter
+        self.queue_handler: Optional[DroppingQueueHandler] = None
+        self.listener: Optional[logging.handlers.QueueListener] = None
+        self._previous: List[logging.Handler] = []
+        self._root: Optional[logging.Logger] = None
+        if queue_size > 0:
+            self.queue_handler = DroppingQueueHandler(queue.Queue(queue_size))
+            self.listener = logging.handlers.QueueListener(self.queue_handler.queue, *handlers,
+                                                           respect_handler_level=True)
+
+    @property
+    def root_handlers(self) -> List[logging.Handler]:
+        return [self.queue_handler] if self.queue_handler is not None else list(self.handlers)
+
+    def start(self, root: logging.Logger):
+        self._root = root
+        self._previous = list(root.handlers)
+        for handler in self._previous:
+            root.removeHandler(handler)
+        for handler in self.root_handlers:
+            if self.rate_filter is not None:
+                handler.addFilter(self.rate_filter)
+            root.addHandler(handler)
+        if self.listener is not None:
+            self.listener.start()
+
+    def stop(self):
+        """Flush queued records and restore the previous root handlers."""
+        root = self._root
+        if root is None:
+            return
+        self._root = None
+        for handler in self.root_handlers:
+            root.removeHandler(handler)
+        if self.listener is not None:
+            self.listener.stop()
+        for handler in self.handlers:
+            handler.close()
+        for handler in self._previous:
+            root.addHandler(handler)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {"queued": self.queue_handler is not None}
+        if self.queue_handler is not None:
+            stats.update(enqueued=self.queue_handler.enqueued, dropped=self.queue_handler.dropped,
+                         queue_depth=self.queue_handler.queue.qsize())
+        if self.rate_filter is not None:
+            stats.update(rate_limited_passed=self.rate_filter.passed,
+                         rate_limited_suppressed=self.rate_filter.suppressed)
+        return stats
+
+
+def install(config, root: Optional[logging.Logger] = None) -> LogPipeline:
+    """Build the pipeline from a ``LoggingConfig`` and make it the root logger's only handlers."""
+    global _pipeline
+    root = root or logging.getLogger()
+    level = getattr(logging, str(config.level).upper(), logging.INFO)
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setLevel(level)
+    console.setFormatter(SuppressedCountFormatter(config.format))
+    handlers: List[logging.Handler] = [console]
+    json_file = getattr(config, "json_file", None)
+    if json_file:
+        directory = os.path.dirname(os.path.abspath(json_file))
+        os.makedirs(directory, exist_ok=True)
+        sink = logging.handlers.RotatingFileHandler(
+            json_file, maxBytes=int(float(config.json_file_max_mb) * 1024 * 1024),
+            backupCount=int(config.json_file_backups), encoding="utf-8")
+        sink.setFormatter(JsonLinesFormatter())
+        handlers.append(sink)
+
+    limits = getattr(config, "rate_limits", None) or {}
+    rate_filter = RateLimitFilter(limits, getattr(config, "rate_window_s", 60.0)) if limits else None
+    queue_size = int(getattr(config, "queue_size", 10000)) if getattr(config, "queue", True) else 0
+
+    if _pipeline is not None:
+        _pipeline.stop()
+    pipeline = LogPipeline(handlers, rate_filter, queue_size)
+    pipeline.start(root)
+    _pipeline = pipeline
+    return pipeline
+
+
+def shutdown():
+    """Stop the installed pipeline, writing out queued records."""
+    global _pipeline
+    if _pipeline is not None:
+        _pipeline.stop()
+        _pipeline = None
+
+
+def get_logging_statistics() -> Optional[Dict[str, Any]]:
+    return _pipeline.get_statistics() if _pipeline is not None else None
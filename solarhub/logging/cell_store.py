@@ -0,0 +1,455 @@
+"""
+Packed storage for battery cell samples.
+
+``battery_cell_samples`` used to hold one row per cell per poll (ts, bank_id,
+unit, cell, voltage, temperature, SoC, statuses): three 16-cell units at 10 s
+is ~415k rows a day. ``battery_cell_frames`` holds one row per (bank, unit,
+timestamp) instead, with the per-cell values packed as fixed-width int16
+little-endian arrays:
+
+* voltage in millivolts, temperature in 0.01 degC, SoC in 0.1 %
+* ``-32768`` marks a missing value; a column whose cells are all missing is NULL
+* ``cells`` lists the cell numbers (uint16) only when they are not 1..n
+* statuses are NULL when absent, the bare string when every cell shares it,
+  otherwise a JSON list
+
+Readers decode frames that share a cell layout with one ``np.frombuffer`` over
+the concatenated blobs, so a day of samples becomes ``(frames, cells)`` float
+arrays without touching individual values in Python.
+
+Rows already in ``battery_cell_samples`` are repacked by a resumable
+background job (``CellSampleRepack``) that moves them in rowid-range chunks.
+"""
+import json
+import logging
+import sqlite3
+import sys
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from solarhub.json_codec import dumps
+from solarhub.logging.migrations import ensure_migration_tables, get_state, set_state, default_system_id
+
+log = logging.getLogger(__name__)
+
+FRAME_TABLE = "battery_cell_frames"
+LEGACY_TABLE = "battery_cell_samples"
+
+MISSING = -32768
+_INT16_MAX = 32767
+# Per-cell value -> (blob column, scale to int16)
+PACKED_FIELDS: Dict[str, Tuple[str, float]] = {
+    "voltage": ("voltage_mv", 1000.0),
+    "temperature": ("temperature_cc", 100.0),
+    "soc": ("soc_dpct", 10.0),
+}
+STATUS_FIELDS = ("volt_st", "temp_st")
+
+_SWAP = sys.byteorder != "little"
+
+_INSERT_SQL = f"""
+    INSERT OR REPLACE INTO {FRAME_TABLE}
+    (system_id, battery_array_id, ts, ts_ms, bank_id, power, cell_count, cells,
+     voltage_mv, temperature_cc, soc_dpct, volt_st, temp_st)
+    VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)
+"""
+
+
+def ensure_cell_tables(cur: sqlite3.Cursor):
+    """Create the packed cell frame table (ts_ms = unix milliseconds)."""
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {FRAME_TABLE} (
+            ts TEXT NOT NULL,
+            ts_ms INTEGER NOT NULL,
+            bank_id TEXT NOT NULL,
+            power INTEGER NOT NULL,
+            system_id TEXT,
+            battery_array_id TEXT,
+            cell_count INTEGER NOT NULL,
+            cells BLOB,
+            voltage_mv BLOB,
+            temperature_cc BLOB,
+            soc_dpct BLOB,
+            volt_st TEXT,
+            temp_st TEXT
+        )
+    """)
+    cur.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{FRAME_TABLE}_bank_ts "
+                f"ON {FRAME_TABLE}(bank_id, ts_ms, power)")
+
+
+def _to_int16(value: Any, scale: float) -> int:
+    if value is None:
+        return MISSING
+    try:
+        scaled = round(float(value) * scale)
+    except (TypeError, ValueError):
+        return MISSING
+    if scaled != scaled or not -_INT16_MAX <= scaled <= _INT16_MAX:  # NaN / out of range
+        return MISSING
+    return scaled
+
+
+def _blob(values: List[int], typecode: str = "h") -> bytes:
+    packed = array(typecode, values)
+    if _SWAP:
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _pack_status(values: List[Optional[str]]) -> Optional[str]:
+    present = [v for v in values if v is not None]
+    if not present:
+        return None
+    first = values[0]
+    if len(present) == len(values) and all(v == first for v in values) and not first.startswith("["):
+        return first
+    return dumps(values)
+
+
+def _unpack_status(value: Optional[str], count: int) -> List[Optional[str]]:
+    if value is None:
+        return [None] * count
+    if value.startswith("["):
+        return json.loads(value)
+    return [value] * count
+
+
+def pack_cells(cells: Sequence[Dict[str, Any]]) -> Tuple:
+    """
+    Pack one unit's cell dicts (``cell``, ``voltage``, ``temperature``, ``soc``,
+    ``volt_st``, ``temp_st``) into the frame columns
+    ``(cell_count, cells, voltage_mv, temperature_cc, soc_dpct, volt_st, temp_st)``.
+
+    Cells are stored in ascending cell-number order.
+    """
+    cells = sorted(cells, key=lambda c: c["cell"])
+    numbers = [int(c["cell"]) for c in cells]
+    count = len(numbers)
+    row: List[Any] = [count, None if numbers == list(range(1, count + 1)) else _blob(numbers, "H")]
+    for key, (_, scale) in PACKED_FIELDS.items():
+        values = [_to_int16(c.get(key), scale) for c in cells]
+        row.append(_blob(values) if any(v != MISSING for v in values) else None)
+    for key in STATUS_FIELDS:
+        row.append(_pack_status([None if c.get(key) is None else str(c.get(key)) for c in cells]))
+    return tuple(row)
+
+
+def unpack_cells(cell_count: int, cells: Optional[bytes], voltage_mv: Optional[bytes],
+                 temperature_cc: Optional[bytes], soc_dpct: Optional[bytes],
+                 volt_st: Optional[str], temp_st: Optional[str]) -> List[Dict[str, Any]]:
+    """Inverse of ``pack_cells``: the cell dicts of one frame (missing values are None)."""
+    numbers = _cell_numbers(cell_count, cells).tolist()
+    out = [{"cell": n} for n in numbers]
+    for key, blob in zip(PACKED_FIELDS, (voltage_mv, temperature_cc, soc_dpct)):
+        scale = PACKED_FIELDS[key][1]
+        raw = np.frombuffer(blob, dtype="<i2") if blob is not None else None
+        for i, c in enumerate(out):
+            c[key] = None if raw is None or raw[i] == MISSING else round(int(raw[i]) / scale, 3)
+    for key, value in zip(STATUS_FIELDS, (volt_st, temp_st)):
+        for c, status in zip(out, _unpack_status(value, cell_count)):
+            c[key] = status
+    return out
+
+
+def _cell_numbers(cell_count: int, cells: Optional[bytes]) -> np.ndarray:
+    if cells is None:
+        return np.arange(1, cell_count + 1, dtype=np.int64)
+    return np.frombuffer(cells, dtype="<u2").astype(np.int64)
+
+
+def _ts_ms(ts: str) -> int:
+    return int(round(datetime.fromisoformat(ts).timestamp() * 1000))
+
+
+def frame_rows(bank_id: str, ts: str, cells_data: Sequence[Any]) -> List[Tuple]:
+    """
+    Frame rows ``(ts, ts_ms, bank_id, power, *pack_cells(...))`` for one poll of a
+    bank: one per unit entry (``{"power": n, "cells": [...]}``) with a valid cell.
+    """
+    ts_ms = _ts_ms(ts)
+    rows = []
+    for entry in cells_data:
+        power = entry.get('power') if isinstance(entry, dict) else getattr(entry, 'power', None)
+        cells = entry.get('cells') if isinstance(entry, dict) else getattr(entry, 'cells', [])
+        try:
+            power = int(power)
+        except (ValueError, TypeError):
+            log.error(f"Invalid power value {power} (type: {type(power)}) for bank {bank_id}, skipping entry")
+            continue
+        if power > 1000:
+            log.warning(f"Suspicious power value {power} for bank {bank_id} - expected 1-10 range for battery unit index")
+        valid = {}
+        for c in cells or []:
+            try:
+                number = int(c.get('cell'))
+            except (ValueError, TypeError):
+                log.warning(f"Invalid cell index {c.get('cell')} (type: {type(c.get('cell'))}), skipping")
+                continue
+            if not 0 < number <= 0xFFFF:
+                log.warning(f"Cell index {number} out of range for bank {bank_id}, skipping")
+                continue
+            valid[number] = dict(c, cell=number)
+        if not valid:
+            continue
+        rows.append((ts, ts_ms, bank_id, power) + pack_cells(list(valid.values())))
+    return rows
+
+
+def insert_frames(cur: sqlite3.Cursor, rows: Sequence[Tuple], system_id: Optional[str] = None,
+                  battery_array_id: Optional[str] = None):
+    """Insert rows built by ``frame_rows`` (a repeated (bank, ts, unit) replaces the earlier frame)."""
+    ids = (system_id, battery_array_id)
+    cur.executemany(_INSERT_SQL, [ids + row for row in rows])
+
+
+@dataclass
+class CellFrames:
+    """
+    Decoded cell frames of one bank, in time order.
+
+    ``voltage``, ``temperature`` and ``soc`` are ``(frames, cells)`` float32
+    arrays in V, degC and %, NaN where a cell was not reported; column ``j``
+    is cell number ``cells[j]``.
+    """
+    ts_ms: np.ndarray
+    power: np.ndarray
+    cells: np.ndarray
+    voltage: np.ndarray
+    temperature: np.ndarray
+    soc: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.ts_ms)
+
+    def unit(self, power: int) -> "CellFrames":
+        """Frames of one battery unit."""
+        mask = self.power == power
+        return CellFrames(self.ts_ms[mask], self.power[mask], self.cells,
+                          self.voltage[mask], self.temperature[mask], self.soc[mask])
+
+    def voltage_spread(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Per-frame lowest and highest cell voltage (NaN for frames without voltages)."""
+        valid = ~np.isnan(self.voltage)
+        has = valid.any(axis=1)
+        vmin = np.where(valid, self.voltage, np.inf).min(axis=1, initial=np.inf)
+        vmax = np.where(valid, self.voltage, -np.inf).max(axis=1, initial=-np.inf)
+        return np.where(has, vmin, np.nan), np.where(has, vmax, np.nan)
+
+    def to_columns(self, ndigits: int = 3) -> Dict[str, Any]:
+        """
+        JSON-ready columns: ``ts`` (unix seconds), ``cells``, per-cell series
+        (``voltage[j]`` is cell ``cells[j]`` over time, None where missing) and
+        the per-frame voltage min/max/delta.
+        """
+        vmin, vmax = self.voltage_spread()
+        return {
+            "ts": (self.ts_ms // 1000).tolist(),
+            "cells": self.cells.tolist(),
+            "voltage": _json_values(self.voltage.T, ndigits),
+            "temperature": _json_values(self.temperature.T, ndigits),
+            "soc": _json_values(self.soc.T, ndigits),
+            "voltage_min": _json_values(vmin, ndigits),
+            "voltage_max": _json_values(vmax, ndigits),
+            "voltage_delta": _json_values(vmax - vmin, ndigits),
+        }
+
+
+def _json_values(values: np.ndarray, ndigits: int) -> list:
+    """Rounded nested lists with NaN as None."""
+    rounded = np.round(values.astype(np.float64), ndigits)
+    return np.where(np.isnan(rounded), None, rounded).tolist()
+
+
+def read_cell_frames(cur: sqlite3.Cursor, bank_id: str, start: datetime, end: datetime,
+                     power: Optional[int] = None) -> CellFrames:
+    """Decode the frames of ``bank_id`` (optionally one unit) with start <= ts < end."""
+    sql = (f"SELECT ts_ms, power, cell_count, cells, voltage_mv, temperature_cc, soc_dpct "
+           f"FROM {FRAME_TABLE} WHERE bank_id = ? AND ts_ms >= ? AND ts_ms < ?")
+    params: List[Any] = [bank_id, int(start.timestamp() * 1000), int(end.timestamp() * 1000)]
+    if power is not None:
+        sql += " AND power = ?"
+        params.append(int(power))
+    rows = cur.execute(sql + " ORDER BY ts_ms, power", params).fetchall()
+    return decode_frames(rows)
+
+
+def decode_frames(rows: Sequence[Tuple]) -> CellFrames:
+    """
+    Decode ``(ts_ms, power, cell_count, cells, voltage_mv, temperature_cc, soc_dpct)``
+    rows; frames sharing a cell layout are decoded with one ``np.frombuffer`` per field.
+    """
+    n = len(rows)
+    ts_ms = np.fromiter((r[0] for r in rows), dtype=np.int64, count=n)
+    power = np.fromiter((r[1] for r in rows), dtype=np.int64, count=n)
+    layouts: Dict[Tuple[int, Optional[bytes]], List[int]] = {}
+    for i, r in enumerate(rows):
+        layouts.setdefault((r[2], r[3]), []).append(i)
+    numbers = {layout: _cell_numbers(*layout) for layout in layouts}
+    cells = np.unique(np.concatenate(list(numbers.values()))) if numbers else np.zeros(0, dtype=np.int64)
+
+    out = {}
+    for f, key in enumerate(PACKED_FIELDS):
+        scale = PACKED_FIELDS[key][1]
+        values = np.full((n, len(cells)), np.nan, dtype=np.float32)
+        for layout, index in layouts.items():
+            count = layout[0]
+            filler = _blob([MISSING] * count)
+            raw = np.frombuffer(b"".join(rows[i][4 + f] or filler for i in index), dtype="<i2")
+            raw = raw.reshape(len(index), count)
+            decoded = raw.astype(np.float32) / np.float32(scale)
+            decoded[raw == MISSING] = np.nan
+            columns = np.searchsorted(cells, numbers[layout])
+            values[np.ix_(np.asarray(index), columns)] = decoded
+        out[key] = values
+    return CellFrames(ts_ms, power, cells, out["voltage"], out["temperature"], out["soc"])
+
+
+class CellSampleRepack:
+    """
+    Moves legacy ``battery_cell_samples`` rows into packed frames.
+
+    Walks the legacy table by rowid range; each chunk inserts its frames,
+    deletes the moved rows and advances the cursor in ``migration_state`` in one
+    transaction. A chunk is widened so that one poll's rows of a unit (written
+    together, so adjacent in rowid) never straddle two chunks. Rows whose
+    timestamp cannot be parsed are left in the legacy table.
+    """
+
+    name = "repack_battery_cells"
+
+    def __init__(self, db_path: str, chunk_rows: int = 20000, pause_s: float = 0.05,
+                 busy_timeout_ms: int = 5000):
+        self.db_path = db_path
+        self.chunk_rows = max(int(chunk_rows), 1)
+        self.pause_s = pause_s
+        self.busy_timeout_ms = busy_timeout_ms
+        # Statistics
+        self.rows_moved = 0
+        self.frames_written = 0
+        self.rows_skipped = 0
+        self.chunks = 0
+        self.completed = False
+        self.last_error: Optional[str] = None
+        self.elapsed_s = 0.0
+
+    def run(self, stop: Optional[threading.Event] = None) -> bool:
+        """Run to completion (or until ``stop`` is set). Returns True when the legacy table is drained."""
+        start = time.perf_counter()
+        con = sqlite3.connect(self.db_path)
+        con.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        try:
+            cur = con.cursor()
+            ensure_migration_tables(cur)
+            ensure_cell_tables(cur)
+            con.commit()
+            try:
+                columns = {row[1] for row in cur.execute(f"PRAGMA table_info({LEGACY_TABLE})")}
+            except sqlite3.OperationalError:
+                columns = set()
+            if not columns:
+                self.completed = True
+                return True
+            extra = [c if c in columns else "NULL" for c in ("system_id", "battery_array_id")]
+            select = (f"SELECT rowid, ts, bank_id, power, cell, voltage, temperature, soc, volt_st, temp_st, "
+                      f"{extra[0]}, {extra[1]} FROM {LEGACY_TABLE} WHERE rowid > ? AND rowid <= ? ORDER BY rowid")
+            fallback_system = default_system_id(self.db_path) if "system_id" in columns else None
+
+            position = int(get_state(cur, self.name) or 0)
+            high = cur.execute(f"SELECT MAX(rowid) FROM {LEGACY_TABLE}").fetchone()[0] or 0
+            while position < high:
+                if stop is not None and stop.is_set():
+                    return False
+                upper = self._chunk_end(cur, position, high)
+                rows = cur.execute(select, (position, upper)).fetchall()
+                frames, skipped = self._frames(rows, fallback_system)
+                for ids, group in frames.items():
+                    insert_frames(cur, group, *ids)
+                if skipped:
+                    keep = ",".join(str(rowid) for rowid in skipped)
+                    cur.execute(f"DELETE FROM {LEGACY_TABLE} WHERE rowid > ? AND rowid <= ? AND rowid NOT IN ({keep})",
+                                (position, upper))
+                else:
+                    cur.execute(f"DELETE FROM {LEGACY_TABLE} WHERE rowid > ? AND rowid <= ?", (position, upper))
+                set_state(cur, self.name, str(upper))
+                con.commit()
+                self.rows_moved += len(rows) - len(skipped)
+                self.rows_skipped += len(skipped)
+                self.frames_written += sum(len(group) for group in frames.values())
+                self.chunks += 1
+                position = upper
+                if self.pause_s:
+                    time.sleep(self.pause_s)
+            self.completed = True
+            if self.rows_moved:
+                log.info(f"Battery cell repack completed: {self.rows_moved} rows -> {self.frames_written} frames "
+                         f"({self.rows_skipped} unparseable rows left in {LEGACY_TABLE})")
+            return True
+        except Exception as e:
+            self.last_error = str(e)
+            log.warning(f"Battery cell repack stopped (resumes next start): {e}")
+            return False
+        finally:
+            self.elapsed_s += time.perf_counter() - start
+            con.close()
+
+    def _chunk_end(self, cur: sqlite3.Cursor, position: int, high: int) -> int:
+        """End rowid of the next chunk, extended to the end of the last (ts, bank, unit) group."""
+        upper = min(position + self.chunk_rows, high)
+        last = cur.execute(f"SELECT ts, bank_id, power FROM {LEGACY_TABLE} WHERE rowid <= ? ORDER BY rowid DESC LIMIT 1",
+                           (upper,)).fetchone()
+        if last is None:
+            return upper
+        nxt = cur.execute(f"SELECT rowid FROM {LEGACY_TABLE} WHERE rowid > ? AND "
+                          f"(ts IS NOT ? OR bank_id IS NOT ? OR power IS NOT ?) ORDER BY rowid LIMIT 1",
+                          (upper,) + tuple(last)).fetchone()
+        return high if nxt is None else max(upper, nxt[0] - 1)
+
+    @staticmethod
+    def _frames(rows: Sequence[Tuple], fallback_system: Optional[str]) -> Tuple[Dict[Tuple, List[Tuple]], List[int]]:
+        """Frame rows keyed by (system_id, battery_array_id), and rowids that could not be parsed."""
+        groups: Dict[Tuple, List[Tuple]] = {}
+        for row in rows:
+            groups.setdefault((row[1], row[2], row[3]), []).append(row)
+        frames: Dict[Tuple, List[Tuple]] = {}
+        skipped: List[int] = []
+        for (ts, bank_id, power), members in groups.items():
+            try:
+                ts_ms = _ts_ms(ts)
+                power = int(power)
+            except (TypeError, ValueError):
+                skipped.extend(r[0] for r in members)
+                continue
+            cells = {}
+            for r in members:
+                try:
+                    number = int(r[4])
+                except (TypeError, ValueError):
+                    continue
+                if 0 < number <= 0xFFFF:
+                    cells[number] = {"cell": number, "voltage": r[5], "temperature": r[6], "soc": r[7],
+                                     "volt_st": r[8], "temp_st": r[9]}
+            if not cells:
+                continue
+            system_id = next((r[10] for r in members if r[10] is not None), fallback_system)
+            battery_array_id = next((r[11] for r in members if r[11] is not None), None)
+            frames.setdefault((system_id, battery_array_id), []).append(
+                (ts, ts_ms, bank_id, power) + pack_cells(list(cells.values())))
+        return frames, skipped
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            "completed": self.completed,
+            "rows_moved": self.rows_moved,
+            "frames_written": self.frames_written,
+            "rows_skipped": self.rows_skipped,
+            "chunks": self.chunks,
+            "elapsed_s": round(self.elapsed_s, 2),
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,182 @@
+"""
+Integer epoch timestamps on the sample tables.
+
+Sample rows keep ``ts`` as text in the configured timezone
+("2025-06-01 10:00:00.123+05:00"). Filtering on that text is a string
+comparison (wrong as soon as two rows differ in offset or in the "T"/space
+separator), ``DATE(ts) = ?`` cannot use an index, and every reader re-parses
+the strings. Schema migration 8 adds ``ts_ms`` (unix milliseconds) to the
+sample tables with ``(entity, ts_ms, ...)`` indexes
+(``database_migrations.EPOCH_TS_INDEXES``):
+
+* the logger writes ``ts_to_ms(ts)`` with every new row
+* ``EpochBackfill`` fills ``ts_ms`` on older rows in rowid-range chunks on
+  the background migration thread, using SQLite's own date parser
+* readers check ``epoch_ready`` (set when the backfill finished), then filter
+  on integer ranges (``day_bounds_ms`` / ``to_ms``) and build timestamps with
+  ``ms_to_datetime64`` or ``pd.to_datetime(..., unit="ms")`` instead of
+  parsing text; until then they keep the text queries
+"""
+import logging
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from solarhub.database_migrations import EPOCH_TS_INDEXES
+from solarhub.logging.migrations import ensure_migration_tables, get_state, set_state
+
+log = logging.getLogger(__name__)
+
+BACKFILL_NAME = "backfill_ts_ms"
+
+# Unix milliseconds of a ts TEXT column, rounded like ts_to_ms; NULL when unparseable
+TEXT_TS_MS = "CAST(ROUND((julianday(ts) - 2440587.5) * 86400000.0) AS INTEGER)"
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def to_ms(value: datetime) -> int:
+    """Unix milliseconds of an aware datetime (naive values are taken as local time)."""
+    if value.tzinfo is None:
+        value = value.astimezone()
+    return ((value - _EPOCH) // _MICROSECOND + 500) // 1000
+
+
+def ts_to_ms(ts: Union[datetime, str]) -> int:
+    """ts_ms for a sample timestamp (datetime or ISO text)."""
+    return to_ms(datetime.fromisoformat(ts) if isinstance(ts, str) else ts)
+
+
+def day_bounds_ms(day: Union[str, date], tz) -> Tuple[int, int]:
+    """[start, end) in unix milliseconds of a calendar day in ``tz``."""
+    if isinstance(day, str):
+        day = date.fromisoformat(day)
+    start = datetime(day.year, day.month, day.day)
+    end = start + timedelta(days=1)
+    if hasattr(tz, "localize"):  # pytz
+        return to_ms(tz.localize(start)), to_ms(tz.localize(end))
+    return to_ms(start.replace(tzinfo=tz)), to_ms(end.replace(tzinfo=tz))
+
+
+def ms_to_datetime64(values: Sequence[int]) -> np.ndarray:
+    """UTC ``datetime64[ms]`` array from ts_ms values."""
+    return np.asarray(values, dtype=np.int64).astype("datetime64[ms]")
+
+
+def epoch_ready(con: Union[sqlite3.Connection, sqlite3.Cursor]) -> bool:
+    """True once every sample row carries ts_ms (the backfill has finished)."""
+    try:
+        return get_state(con.cursor() if isinstance(con, sqlite3.Connection) else con, BACKFILL_NAME) == "done"
+    except sqlite3.OperationalError:
+        return False
+
+
+class EpochBackfill:
+    """
+    Fills ``ts_ms`` from ``ts`` on rows written before migration 8.
+
+    Walks each table by rowid range like ``SystemIdBackfill``; each chunk's
+    UPDATE and cursor are committed together. Rows written since the
+    migration already have ts_ms. Rows whose ts SQLite cannot parse keep
+    NULL and are counted in ``rows_unparsed``.
+    """
+
+    name = BACKFILL_NAME
+
+    def __init__(self, db_path: str, tables: Sequence[str] = tuple(EPOCH_TS_INDEXES),
+                 chunk_rows: int = 5000, pause_s: float = 0.05, busy_timeout_ms: int = 5000):
+        self.db_path = db_path
+        self.tables = tuple(tables)
+        self.chunk_rows = max(int(chunk_rows), 1)
+        self.pause_s = pause_s
+        self.busy_timeout_ms = busy_timeout_ms
+        # Statistics
+        self.rows_updated = 0
+        self.rows_unparsed = 0
+        self.chunks = 0
+        self.current_table: Optional[str] = None
+        self.completed = False
+        self.last_error: Optional[str] = None
+        self.elapsed_s = 0.0
+
+    def _cursor_key(self, table: str) -> str:
+        return f"{self.name}:{table}"
+
+    def run(self, stop: Optional[threading.Event] = None) -> bool:
+        """Run to completion (or until ``stop`` is set). Returns True when every table is done."""
+        start = time.perf_counter()
+        con = sqlite3.connect(self.db_path)
+        con.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        try:
+            cur = con.cursor()
+            ensure_migration_tables(cur)
+            con.commit()
+            if get_state(cur, self.name) == "done":
+                self.completed = True
+                return True
+            for table in self.tables:
+                if stop is not None and stop.is_set():
+                    return False
+                self.current_table = table
+                if not self._backfill_table(con, table, stop):
+                    return False
+            self.current_table = None
+            set_state(cur, self.name, "done")
+            for table in self.tables:
+                set_state(cur, self._cursor_key(table), None)
+            con.commit()
+            self.completed = True
+            log.info(f"Background ts_ms backfill completed: {self.rows_updated} rows in {self.chunks} chunks"
+                     + (f", {self.rows_unparsed} unparseable timestamps" if self.rows_unparsed else ""))
+            return True
+        except Exception as e:
+            self.last_error = str(e)
+            log.warning(f"Background ts_ms backfill stopped (resumes next start): {e}")
+            return False
+        finally:
+            self.elapsed_s += time.perf_counter() - start
+            con.close()
+
+    def _backfill_table(self, con: sqlite3.Connection, table: str, stop: Optional[threading.Event]) -> bool:
+        cur = con.cursor()
+        columns = [row[1] for row in cur.execute(f"PRAGMA table_info({table})")]
+        if "ts_ms" not in columns:
+            log.debug(f"ts_ms backfill: {table} has no ts_ms column, skipping")
+            return True
+        key = self._cursor_key(table)
+        position = int(get_state(cur, key) or 0)
+        high = cur.execute(f"SELECT MAX(rowid) FROM {table}").fetchone()[0] or 0
+        while position < high:
+            if stop is not None and stop.is_set():
+                return False
+            upper = min(position + self.chunk_rows, high)
+            cur.execute(f"UPDATE {table} SET ts_ms = {TEXT_TS_MS} WHERE rowid > ? AND rowid <= ? AND ts_ms IS NULL",
+                        (position, upper))
+            updated = max(cur.rowcount, 0)
+            unparsed = cur.execute(f"SELECT COUNT(*) FROM {table} WHERE rowid > ? AND rowid <= ? AND ts_ms IS NULL",
+                                   (position, upper)).fetchone()[0]
+            self.rows_updated += updated - unparsed
+            self.rows_unparsed += unparsed
+            set_state(cur, key, str(upper))
+            con.commit()
+            self.chunks += 1
+            position = upper
+            if self.pause_s:
+                time.sleep(self.pause_s)
+        return True
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            "completed": self.completed,
+            "current_table": self.current_table,
+            "rows_updated": self.rows_updated,
+            "rows_unparsed": self.rows_unparsed,
+            "chunks": self.chunks,
+            "elapsed_s": round(self.elapsed_s, 2),
+            "last_error": self.last_error,
+        }
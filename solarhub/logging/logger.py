@@ -3,10 +3,21 @@ from solarhub.models import Telemetry
 from solarhub.array_models import ArrayTelemetry
 import os
 import logging
+import threading
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Callable
 from solarhub.timezone_utils import from_os_to_configured
-from solarhub.database_migrations import migrate_to_arrays
+from solarhub.logging.write_pipeline import WritePipeline
+from solarhub.logging.migrations import (
+    AggregationBackfill, BackgroundMigrations, SystemIdBackfill, migration_status, run_migrations,
+    sync_config_yaml
+)
+from solarhub.logging.cell_store import CellSampleRepack, ensure_cell_tables, frame_rows, insert_frames
+from solarhub.logging.epoch import EpochBackfill, to_ms
+from solarhub.logging.retention import RetentionJob, RetentionScheduler, default_policies
+from solarhub.logging.rollups import (
+    RollupEngine, ensure_rollup_tables, SCOPE_INVERTER, SCOPE_ARRAY, SCOPE_SYSTEM, SCOPE_METER
+)
 
 log = logging.getLogger(__name__)
 class DataLogger:
@@ -16,130 +27,39 @@ class DataLogger:
             os.makedirs(base, exist_ok=True)
             path = os.path.join(base, "solarhub.db")
         self.path = path
+        # Batched writer (started by the app); when None, writes go straight to the database
+        self._writer: Optional[WritePipeline] = None
+        # Minute/hour rollups maintained on ingest (started by the app)
+        self.rollups: Optional[RollupEngine] = None
+        # inverter_id -> system_id for system rollups; loaded in start_rollups and kept
+        # current by the sample inserts, which resolve it on the writer thread anyway
+        self._rollup_systems: Dict[str, Optional[str]] = {}
+        # Background data backfills (started by the app)
+        self._backfills: Optional[BackgroundMigrations] = None
+        # Tiered retention of raw samples (started by the app)
+        self._retention: Optional[RetentionScheduler] = None
         self._init()
-        # Run migration to arrays schema
+        # Versioned schema migrations: each step runs once per database (PRAGMA user_version / ledger)
         try:
-            migrate_to_arrays(self.path)
-        except Exception as e:
-            log.warning(f"Array migration may have already run or failed: {e}")
-        
-        # Run billing tables migration
-        try:
-            from solarhub.database_migrations import migrate_to_billing_tables
-            migrate_to_billing_tables(self.path)
-        except Exception as e:
-            log.warning(f"Billing tables migration may have already run or failed: {e}")
-        
-        # Run device discovery migration
-        try:
-            from solarhub.database_migrations import migrate_to_device_discovery
-            migrate_to_device_discovery(self.path)
-        except Exception as e:
-            log.warning(f"Device discovery migration may have already run or failed: {e}")
-        
-        # Run home billing migration
-        try:
-            from solarhub.database_migrations import migrate_to_home_billing
-            migrate_to_home_billing(self.path)
-        except Exception as e:
-            log.warning(f"Home billing migration may have already run or failed: {e}")
-        
-        # Run Phase 1: Hierarchy schema migration
-        try:
-            from solarhub.database_migrations import (
-                migrate_to_hierarchy_schema,
-                create_default_system,
-                backfill_system_ids,
-                migrate_config_yaml_to_database,
-                migrate_production_data
-            )
-            
-            # Step 1: Create all new tables and add foreign keys
-            try:
-                migrate_to_hierarchy_schema(self.path)
-            except sqlite3.DatabaseError as e:
-                if "malformed" in str(e).lower() or "corrupt" in str(e).lower():
-                    log.error(f"Database is corrupted: {e}")
-                    log.error("Please restore from backup or recreate the database.")
-                    log.error("Application will continue but may not function correctly.")
-                    # Don't continue with other migration steps if database is corrupted
-                    return
-                raise
-            
-            # Step 2: Create default system if none exists
-            create_default_system(self.path)
-            
-            # Step 3: Migrate config.yaml to database (always try, it's idempotent)
-            # Check if adapter_base is empty (indicates config migration hasn't run)
-            con = sqlite3.connect(self.path)
-            cur = con.cursor()
-            cur.execute("SELECT COUNT(*) FROM adapter_base")
-            adapter_base_count = cur.fetchone()[0]
-            con.close()
-            
-            # Always try to migrate config.yaml (it's idempotent and will update existing data)
-            try:
-                migrate_config_yaml_to_database(self.path)
-            except Exception as e:
-                log.warning(f"Config.yaml migration failed (may not exist or may have errors): {e}")
-            
-            # Step 4: Migrate production data
-            # Get system_id from database (from config migration or default)
-            con = sqlite3.connect(self.path)
-            cur = con.cursor()
-            cur.execute("SELECT system_id FROM systems ORDER BY created_at LIMIT 1")
-            result = cur.fetchone()
-            system_id = result[0] if result else 'system'
-            con.close()
-            
-            migrate_production_data(self.path, system_id=system_id)
-            
-            # Step 5: Backfill system_ids in all tables
-            backfill_system_ids(self.path)
-            
-            log.info("Phase 1: Hierarchy migration completed successfully")
-        except Exception as e:
-            log.error(f"Phase 1: Hierarchy migration failed: {e}", exc_info=True)
-            # Don't raise - allow system to continue with existing structure
+            run_migrations(self.path)
+        except sqlite3.DatabaseError as e:
+            log.error(f"Database is corrupted: {e}")
+            log.error("Please restore from backup or recreate the database.")
+            log.error("Application will continue but may not function correctly.")
+            return
         
-        # Step 6: Optional aggregation backfill (runs in background, doesn't block startup)
-        # Only runs if enabled via database flag
+        # Sync config.yaml into the catalog only when the file changed
         try:
-            # Check if statistics backfill is enabled
-            con = sqlite3.connect(self.path)
-            cur = con.cursor()
-            cur.execute("SELECT value FROM configuration WHERE key = ?", ("enable_statistics_backfill",))
-            result = cur.fetchone()
-            con.close()
-            
-            backfill_enabled = result and result[0].lower() == 'true' if result else False
-            
-            if backfill_enabled:
-                from solarhub.aggregation_backfill import backfill_all_aggregated_tables
-                import threading
-                
-                def run_backfill():
-                    """Run aggregation backfill in background thread."""
-                    try:
-                        log.info("Starting aggregation backfill for historical data (last 30 days)")
-                        backfill_all_aggregated_tables(self.path, days_back=30)
-                        log.info("Aggregation backfill completed successfully")
-                    except Exception as e:
-                        log.warning(f"Aggregation backfill failed (non-critical): {e}")
-                
-                # Start backfill in background thread to avoid blocking startup
-                backfill_thread = threading.Thread(target=run_backfill, daemon=True)
-                backfill_thread.start()
-                log.info("Started aggregation backfill in background thread (enabled via database flag)")
-            else:
-                log.info("Statistics backfill is disabled by default. Set 'enable_statistics_backfill' = 'true' in configuration table to enable.")
+            sync_config_yaml(self.path)
         except Exception as e:
-            log.warning(f"Failed to check statistics backfill flag (non-critical): {e}")
+            log.warning(f"Config.yaml migration failed (may not exist or may have errors): {e}")
     
     def _init(self):
         log.info(f"Initializing database at: {self.path}")
         con = sqlite3.connect(self.path)
         cur = con.cursor()
+        # Lets retention return freed pages with incremental_vacuum; only takes effect on a new database
+        cur.execute("PRAGMA auto_vacuum = INCREMENTAL")
         
         # Create energy_samples table with all columns
         cur.execute("""
@@ -237,6 +157,8 @@ class DataLogger:
                 temp_st TEXT
             )
         """)
+        # Packed per-unit cell frames; battery_cell_samples is only read by the repack job
+        ensure_cell_tables(cur)
         log.info("Created/verified battery tables")
         
         # Create users table for authentication
@@ -336,6 +258,183 @@ class DataLogger:
         con.commit()
         con.close()
         log.info("Database initialization completed successfully")
+
+    # ---------- Write pipeline ----------
+    def start_write_pipeline(self, **kwargs) -> WritePipeline:
+        """
+        Route telemetry inserts through a batched writer thread.
+        Keyword arguments are passed to WritePipeline (flush_interval_ms, max_queue_size, ...).
+        """
+        if self._writer and self._writer.is_running:
+            return self._writer
+        self._writer = WritePipeline(self.path, **kwargs)
+        self._writer.start()
+        return self._writer
+
+    def flush_cycle(self) -> Optional[threading.Event]:
+        """
+        Mark the end of a poll cycle so queued writes are committed together.
+        Returns an event set once they are committed (None when writes are synchronous).
+        """
+        self._flush_rollups()
+        if self._writer:
+            return self._writer.mark_cycle()
+        return None
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until all queued writes are committed."""
+        if self._writer:
+            return self._writer.flush(timeout)
+        return True
+
+    def close(self, timeout: float = 10.0):
+        """Flush and stop the write pipeline (if running)."""
+        if self._backfills:
+            self._backfills.stop()
+        if self._retention:
+            self._retention.stop()
+        self._flush_rollups()
+        if self._writer:
+            self._writer.stop(timeout)
+            self._writer = None
+
+    def get_write_statistics(self) -> Dict[str, Any]:
+        """Get write pipeline metrics, or an idle marker when writes are synchronous."""
+        if self._writer:
+            return self._writer.get_statistics()
+        return {"is_running": False}
+
+    # ---------- Background migrations ----------
+    def start_background_migrations(self) -> BackgroundMigrations:
+        """
+        Run data backfills in chunks on a background thread so they never
+        delay startup; progress survives restarts.
+        """
+        if self._backfills and self._backfills.is_running:
+            return self._backfills
+        jobs = [SystemIdBackfill(self.path), EpochBackfill(self.path), CellSampleRepack(self.path)]
+        # Optional aggregation backfill, only if enabled via database flag
+        try:
+            con = sqlite3.connect(self.path)
+            cur = con.cursor()
+            cur.execute("SELECT value FROM configuration WHERE key = ?", ("enable_statistics_backfill",))
+            result = cur.fetchone()
+            con.close()
+            if result and result[0].lower() == 'true':
+                jobs.append(AggregationBackfill(self.path, days_back=30))
+            else:
+                log.info("Statistics backfill is disabled by default. Set 'enable_statistics_backfill' = 'true' in configuration table to enable.")
+        except Exception as e:
+            log.warning(f"Failed to check statistics backfill flag (non-critical): {e}")
+        self._backfills = BackgroundMigrations(jobs)
+        self._backfills.start()
+        return self._backfills
+
+    def get_migration_statistics(self) -> Dict[str, Any]:
+        """Schema version, applied migrations and background backfill progress."""
+        stats = migration_status(self.path)
+        if self._backfills:
+            stats["background"] = self._backfills.get_statistics()
+        return stats
+
+    # ---------- Retention ----------
+    def start_retention(self, raw_days: float = 14, minute_days: Optional[float] = 183,
+                        overrides: Optional[Dict[str, Dict[str, Any]]] = None,
+                        interval_s: float = 6 * 3600, **kwargs) -> RetentionScheduler:
+        """
+        Downsample and expire old raw samples on a background thread.
+
+        ``overrides`` maps a table to its own ``enabled`` / ``raw_days`` /
+        ``minute_days``; other keyword arguments are passed to RetentionJob
+        (chunk_rows, pause_s, vacuum_pages_per_step, convert_auto_vacuum, ...).
+        """
+        if self._retention and self._retention.is_running:
+            return self._retention
+        policies = []
+        for policy in default_policies(raw_days, minute_days):
+            table = (overrides or {}).get(policy.table, {})
+            if not table.get("enabled", True):
+                continue
+            if table.get("raw_days") is not None:
+                policy.raw_days = table["raw_days"]
+            if table.get("minute_days") is not None:
+                policy.minute_days = table["minute_days"]
+            policies.append(policy)
+        self._retention = RetentionScheduler(RetentionJob(self.path, policies, **kwargs), interval_s=interval_s)
+        self._retention.start()
+        log.info(f"Retention enabled: {', '.join(repr(p) for p in policies)}")
+        return self._retention
+
+    def get_retention_statistics(self) -> Dict[str, Any]:
+        """Get retention pass metrics, or a disabled marker."""
+        if self._retention:
+            return self._retention.get_statistics()
+        return {"enabled": False}
+
+    # ---------- Rollups ----------
+    def start_rollups(self, max_gap_s: float = 300.0) -> RollupEngine:
+        """Maintain minute/hour rollups (min/max/avg/energy) from logged samples."""
+        if self.rollups is not None:
+            return self.rollups
+        con = sqlite3.connect(self.path)
+        try:
+            cur = con.cursor()
+            ensure_rollup_tables(cur)
+            con.commit()
+            try:
+                cur.execute("SELECT inverter_id, system_id FROM inverters")
+                self._rollup_systems.update(cur.fetchall())
+            except sqlite3.OperationalError:
+                pass  # catalog not created yet; inserts fill the mapping in
+        finally:
+            con.close()
+        self.rollups = RollupEngine(max_gap_s=max_gap_s)
+        log.info(f"Rollups enabled (max integration gap {max_gap_s}s)")
+        return self.rollups
+
+    def get_rollup_statistics(self) -> Dict[str, Any]:
+        """Get rollup engine metrics, or a disabled marker."""
+        if self.rollups:
+            return self.rollups.get_statistics()
+        return {"enabled": False}
+
+    def _flush_rollups(self):
+        """Close the rollup cycle and queue the accumulated bucket deltas."""
+        if not self.rollups:
+            return
+        try:
+            self.rollups.end_cycle()
+            job = self.rollups.drain_job()
+            if job is not None:
+                self._submit_write("rollups", job)
+        except Exception as e:
+            log.error(f"Failed to flush rollups: {e}")
+
+    def _rollup_system_id(self, inverter_id: str) -> Optional[str]:
+        """System of an inverter for system rollups, from the cached mapping (no database access)."""
+        # Inverters missing from the catalog roll up into the default system, as in _get_inverter_system_id
+        return self._rollup_systems.get(inverter_id, 'system')
+
+    def _rollup_sample(self, scope: str, entity_id: str, ts: datetime,
+                       values: Dict[str, Any], parents=()):
+        """Feed a logged sample to the rollups; never fails the insert itself."""
+        try:
+            self.rollups.add_sample(scope, entity_id, ts, values, parents)
+        except Exception as e:
+            log.warning(f"Failed to update rollups for {scope} {entity_id}: {e}")
+
+    def _submit_write(self, label: str, job: Callable[[sqlite3.Cursor], None]):
+        """Queue a write on the pipeline, or execute it synchronously if no pipeline is running."""
+        if self._writer and self._writer.is_running:
+            self._writer.submit(job, label)
+            return
+        con = sqlite3.connect(self.path)
+        try:
+            job(con.cursor())
+            con.commit()
+        finally:
+            con.close()
+
     def _get_inverter_system_id(self, cur, inverter_id: str) -> Optional[str]:
         """Get system_id for an inverter from database."""
         try:
@@ -399,8 +498,6 @@ class DataLogger:
     
     def insert_sample(self, inverter_id: str, tel: Telemetry):
         try:
-            con = sqlite3.connect(self.path)
-            cur = con.cursor()
             # Use explicit column names to handle both old and new schema
             # Extract inverter_mode and inverter_temp_c from extra data if available
             inverter_mode = None
@@ -425,102 +522,119 @@ class DataLogger:
             # Parse the ISO string to datetime first
             tel_dt = datetime.fromisoformat(tel.ts)
             ts_configured = from_os_to_configured(tel_dt)
+            ts_ms = to_ms(ts_configured)
             
             # Get array_id from telemetry if available
             array_id = getattr(tel, 'array_id', None)
+            values = (tel.pv_power_w, tel.load_power_w, tel.grid_power_w,
+                      tel.batt_voltage_v, tel.batt_current_a, tel.batt_soc_pct,
+                      tel.batt_soc_pct, tel.batt_voltage_v, tel.batt_current_a, inverter_mode, inverter_temp_c)
             
-            # Get system_id from database
-            system_id = self._get_inverter_system_id(cur, inverter_id)
+            def write(cur):
+                # Get system_id from database
+                system_id = self._get_inverter_system_id(cur, inverter_id)
+                self._rollup_systems[inverter_id] = system_id  # picks up catalog changes for the rollups
+                cur.execute("""
+                    INSERT INTO energy_samples 
+                    (ts, ts_ms, inverter_id, array_id, system_id, pv_power_w, load_power_w, grid_power_w, 
+                     batt_voltage_v, batt_current_a, soc, battery_soc, battery_voltage_v, battery_current_a, inverter_mode, inverter_temp_c)
+                    VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+                """, (ts_configured, ts_ms, inverter_id, array_id, system_id) + values)
             
-            cur.execute("""
-                INSERT INTO energy_samples 
-                (ts, inverter_id, array_id, system_id, pv_power_w, load_power_w, grid_power_w, 
-                 batt_voltage_v, batt_current_a, soc, battery_soc, battery_voltage_v, battery_current_a, inverter_mode, inverter_temp_c)
-                VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-            """, (ts_configured, inverter_id, array_id, system_id, tel.pv_power_w, tel.load_power_w, tel.grid_power_w,
-                  tel.batt_voltage_v, tel.batt_current_a, tel.batt_soc_pct,
-                  tel.batt_soc_pct, tel.batt_voltage_v, tel.batt_current_a, inverter_mode, inverter_temp_c))
-            con.commit()
+            self._submit_write(f"energy_samples:{inverter_id}", write)
+            if self.rollups:
+                batt_power = None
+                if tel.batt_voltage_v is not None and tel.batt_current_a is not None:
+                    batt_power = tel.batt_voltage_v * tel.batt_current_a
+                system_id = self._rollup_system_id(inverter_id)
+                self._rollup_sample(
+                    SCOPE_INVERTER, inverter_id, ts_configured,
+                    {"pv_power_w": tel.pv_power_w, "load_power_w": tel.load_power_w,
+                     "grid_power_w": tel.grid_power_w, "batt_power_w": batt_power,
+                     "batt_soc_pct": tel.batt_soc_pct},
+                    parents=[(SCOPE_SYSTEM, system_id)] if system_id else ()
+                )
             log.debug(f"Successfully inserted telemetry sample for {inverter_id}")
         except Exception as e:
             log.error(f"Failed to insert telemetry sample for {inverter_id}: {e}")
             raise
-        finally:
-            con.close()
+
     def upsert_daily_pv(self, day: str, inverter_id: str, pv_kwh: float):
-        con = sqlite3.connect(self.path)
-        cur = con.cursor()
-        cur.execute(
-            "INSERT INTO pv_daily(day,inverter_id,pv_kwh) VALUES(?,?,?)\n"
-            "ON CONFLICT(day,inverter_id) DO UPDATE SET pv_kwh=excluded.pv_kwh",
-            (day, inverter_id, pv_kwh)
-        )
-        con.commit(); con.close()
+        def write(cur):
+            cur.execute(
+                "INSERT INTO pv_daily(day,inverter_id,pv_kwh) VALUES(?,?,?)\n"
+                "ON CONFLICT(day,inverter_id) DO UPDATE SET pv_kwh=excluded.pv_kwh",
+                (day, inverter_id, pv_kwh)
+            )
+        self._submit_write(f"pv_daily:{inverter_id}", write)
     
     def insert_array_sample(self, array_tel: ArrayTelemetry):
         """Insert array-level aggregated telemetry sample."""
         try:
-            con = sqlite3.connect(self.path)
-            cur = con.cursor()
             ts_configured = from_os_to_configured(datetime.fromisoformat(array_tel.ts))
-            
-            # Get system_id from database
-            system_id = self._get_array_system_id(cur, array_tel.array_id)
-            
-            cur.execute("""
-                INSERT OR REPLACE INTO array_samples 
-                (ts, array_id, system_id, pv_power_w, load_power_w, grid_power_w, 
-                 batt_power_w, batt_soc_pct, batt_voltage_v, batt_current_a)
-                VALUES (?,?,?,?,?,?,?,?,?,?)
-            """, (
-                ts_configured, array_tel.array_id, system_id,
+            ts_ms = to_ms(ts_configured)
+            values = (
                 array_tel.pv_power_w, array_tel.load_power_w, array_tel.grid_power_w,
                 array_tel.batt_power_w, array_tel.batt_soc_pct,
                 array_tel.batt_voltage_v, array_tel.batt_current_a
-            ))
-            con.commit()
+            )
+            
+            def write(cur):
+                # Get system_id from database
+                system_id = self._get_array_system_id(cur, array_tel.array_id)
+                cur.execute("""
+                    INSERT OR REPLACE INTO array_samples 
+                    (ts, ts_ms, array_id, system_id, pv_power_w, load_power_w, grid_power_w, 
+                     batt_power_w, batt_soc_pct, batt_voltage_v, batt_current_a)
+                    VALUES (?,?,?,?,?,?,?,?,?,?,?)
+                """, (ts_configured, ts_ms, array_tel.array_id, system_id) + values)
+            
+            self._submit_write(f"array_samples:{array_tel.array_id}", write)
+            if self.rollups:
+                self._rollup_sample(
+                    SCOPE_ARRAY, array_tel.array_id, ts_configured,
+                    {"pv_power_w": array_tel.pv_power_w, "load_power_w": array_tel.load_power_w,
+                     "grid_power_w": array_tel.grid_power_w, "batt_power_w": array_tel.batt_power_w,
+                     "batt_soc_pct": array_tel.batt_soc_pct}
+                )
             log.debug(f"Successfully inserted array sample for {array_tel.array_id}")
         except Exception as e:
             log.error(f"Failed to insert array sample for {array_tel.array_id}: {e}")
             raise
-        finally:
-            con.close()
 
     def insert_battery_bank_sample(self, bank_id: str, ts_iso: str, voltage, current, temperature, soc, batteries_count: int, cells_per_battery: int):
         try:
-            con = sqlite3.connect(self.path)
-            cur = con.cursor()
             ts_configured = from_os_to_configured(datetime.fromisoformat(ts_iso))
+            ts_ms = to_ms(ts_configured)
             
-            # Get system_id and battery_array_id from database
-            system_id, battery_array_id = self._get_battery_pack_info(cur, bank_id)
+            def write(cur):
+                # Get system_id and battery_array_id from database
+                system_id, battery_array_id = self._get_battery_pack_info(cur, bank_id)
+                cur.execute(
+                    """
+                    INSERT INTO battery_bank_samples(ts, ts_ms, bank_id, system_id, battery_array_id, voltage, current, temperature, soc, batteries_count, cells_per_battery)
+                    VALUES(?,?,?,?,?,?,?,?,?,?,?)
+                    """,
+                    (ts_configured, ts_ms, bank_id, system_id, battery_array_id, voltage, current, temperature, soc, batteries_count, cells_per_battery),
+                )
             
-            cur.execute(
-                """
-                INSERT INTO battery_bank_samples(ts, bank_id, system_id, battery_array_id, voltage, current, temperature, soc, batteries_count, cells_per_battery)
-                VALUES(?,?,?,?,?,?,?,?,?,?)
-                """,
-                (ts_configured, bank_id, system_id, battery_array_id, voltage, current, temperature, soc, batteries_count, cells_per_battery),
-            )
-            con.commit()
+            self._submit_write(f"battery_bank_samples:{bank_id}", write)
         except Exception as e:
             log.error(f"Failed to insert battery bank sample: {e}")
             raise
-        finally:
-            con.close()
 
     def insert_battery_unit_samples(self, bank_id: str, ts_iso: str, devices: list):
         if not devices:
             return
         try:
-            con = sqlite3.connect(self.path)
-            cur = con.cursor()
             ts_configured = from_os_to_configured(datetime.fromisoformat(ts_iso))
+            ts_ms = to_ms(ts_configured)
             rows = []
             for d in devices:
                 rows.append(
                     (
                         ts_configured,
+                        ts_ms,
                         bank_id,
                         getattr(d, 'power', None) if not isinstance(d, dict) else d.get('power'),
                         getattr(d, 'voltage', None) if not isinstance(d, dict) else d.get('voltage'),
@@ -539,22 +653,23 @@ class DataLogger:
                         (getattr(d, 'sys_events', None) if not isinstance(d, dict) else d.get('sys_events')),
                     )
                 )
-            cur.executemany(
-                """
-                INSERT INTO battery_unit_samples(
-                    ts, bank_id, power, voltage, current, temperature, soc,
-                    basic_st, volt_st, current_st, temp_st, soh_st, coul_st, heater_st,
-                    bat_events, power_events, sys_events
-                ) VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-                """,
-                rows,
-            )
-            con.commit()
+            
+            def write(cur):
+                cur.executemany(
+                    """
+                    INSERT INTO battery_unit_samples(
+                        ts, ts_ms, bank_id, power, voltage, current, temperature, soc,
+                        basic_st, volt_st, current_st, temp_st, soh_st, coul_st, heater_st,
+                        bat_events, power_events, sys_events
+                    ) VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+                    """,
+                    rows,
+                )
+            
+            self._submit_write(f"battery_unit_samples:{bank_id}", write)
         except Exception as e:
             log.error(f"Failed to insert battery unit samples: {e}")
             raise
-        finally:
-            con.close()
 
     def insert_inverter_setpoint(self, array_id: str, inverter_id: str, ts_iso: str, 
                                   action: str, target_w: int, headroom_w: Optional[int] = None, 
@@ -579,66 +694,22 @@ class DataLogger:
             con.close()
 
     def insert_battery_cell_samples(self, bank_id: str, ts_iso: str, cells_data: list):
+        """Log one poll of cell data as one packed frame per battery unit (see cell_store)."""
         if not cells_data:
             return
         try:
-            con = sqlite3.connect(self.path)
-            cur = con.cursor()
             ts_configured = from_os_to_configured(datetime.fromisoformat(ts_iso))
-            rows = []
-            for entry in cells_data:
-                power = entry.get('power') if isinstance(entry, dict) else getattr(entry, 'power', None)
-                cells = entry.get('cells') if isinstance(entry, dict) else getattr(entry, 'cells', [])
-                
-                # Validate power is an integer (should be 1-based battery unit index)
-                if power is not None:
-                    try:
-                        power = int(power)
-                        # Warn if power is suspiciously large (might be corrupted data)
-                        if power > 1000:
-                            log.warning(f"Suspicious power value {power} for bank {bank_id} - expected 1-10 range for battery unit index")
-                    except (ValueError, TypeError):
-                        log.error(f"Invalid power value {power} (type: {type(power)}) for bank {bank_id}, skipping entry")
-                        continue
-                
-                for c in cells or []:
-                    cell_idx = c.get('cell')
-                    # Validate cell index is an integer
-                    if cell_idx is not None:
-                        try:
-                            cell_idx = int(cell_idx)
-                        except (ValueError, TypeError):
-                            log.warning(f"Invalid cell index {cell_idx} (type: {type(cell_idx)}), skipping")
-                            continue
-                    
-                    rows.append(
-                        (
-                            ts_configured,
-                            bank_id,
-                            power,  # Use power from entry level, not from cell
-                            cell_idx,
-                            c.get('voltage'),
-                            c.get('temperature'),
-                            c.get('soc'),
-                            c.get('volt_st'),
-                            c.get('temp_st'),
-                        )
-                    )
+            # Same ts text the sqlite3 datetime adapter writes for the other sample tables
+            rows = frame_rows(bank_id, ts_configured.isoformat(" "), cells_data)
             if rows:
-                cur.executemany(
-                    """
-                    INSERT INTO battery_cell_samples(
-                        ts, bank_id, power, cell, voltage, temperature, soc, volt_st, temp_st
-                    ) VALUES(?,?,?,?,?,?,?,?,?)
-                    """,
-                    rows,
-                )
-                con.commit()
+                def write(cur):
+                    system_id, battery_array_id = self._get_battery_pack_info(cur, bank_id)
+                    insert_frames(cur, rows, system_id, battery_array_id)
+                
+                self._submit_write(f"battery_cell_frames:{bank_id}", write)
         except Exception as e:
             log.error(f"Failed to insert battery cell samples: {e}")
             raise
-        finally:
-            con.close()
     
     def get_config(self, key: str) -> str:
         """Get configuration value from database."""
@@ -684,36 +755,40 @@ class DataLogger:
         """Insert meter telemetry sample into database."""
         from solarhub.schedulers.models import MeterTelemetry
         try:
-            con = sqlite3.connect(self.path)
-            cur = con.cursor()
             ts_configured = from_os_to_configured(datetime.fromisoformat(tel.ts))
-            
-            # Get system_id from database
-            system_id = self._get_meter_system_id(cur, meter_id)
-            
-            cur.execute("""
-                INSERT INTO meter_samples 
-                (ts, meter_id, array_id, system_id, grid_power_w, grid_voltage_v, grid_current_a, grid_frequency_hz,
-                 grid_import_wh, grid_export_wh, energy_kwh, power_factor,
-                 voltage_phase_a, voltage_phase_b, voltage_phase_c,
-                 current_phase_a, current_phase_b, current_phase_c,
-                 power_phase_a, power_phase_b, power_phase_c)
-                VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-            """, (
-                ts_configured, meter_id, tel.array_id, system_id,
+            ts_ms = to_ms(ts_configured)
+            values = (
                 tel.grid_power_w, tel.grid_voltage_v, tel.grid_current_a, tel.grid_frequency_hz,
                 tel.grid_import_wh, tel.grid_export_wh, tel.energy_kwh, tel.power_factor,
                 tel.voltage_phase_a, tel.voltage_phase_b, tel.voltage_phase_c,
                 tel.current_phase_a, tel.current_phase_b, tel.current_phase_c,
                 tel.power_phase_a, tel.power_phase_b, tel.power_phase_c
-            ))
-            con.commit()
+            )
+            
+            def write(cur):
+                # Get system_id from database
+                system_id = self._get_meter_system_id(cur, meter_id)
+                cur.execute("""
+                    INSERT INTO meter_samples 
+                    (ts, ts_ms, meter_id, array_id, system_id, grid_power_w, grid_voltage_v, grid_current_a, grid_frequency_hz,
+                     grid_import_wh, grid_export_wh, energy_kwh, power_factor,
+                     voltage_phase_a, voltage_phase_b, voltage_phase_c,
+                     current_phase_a, current_phase_b, current_phase_c,
+                     power_phase_a, power_phase_b, power_phase_c)
+                    VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+                """, (ts_configured, ts_ms, meter_id, tel.array_id, system_id) + values)
+            
+            self._submit_write(f"meter_samples:{meter_id}", write)
+            if self.rollups:
+                self._rollup_sample(
+                    SCOPE_METER, meter_id, ts_configured,
+                    {"grid_power_w": tel.grid_power_w, "grid_voltage_v": tel.grid_voltage_v,
+                     "grid_frequency_hz": tel.grid_frequency_hz}
+                )
             log.debug(f"Successfully inserted meter sample for {meter_id}")
         except Exception as e:
             log.error(f"Failed to insert meter sample for {meter_id}: {e}")
             raise
-        finally:
-            con.close()
     
     def upsert_array_hourly_energy(self, array_id: str, system_id: str, date: str, hour_start: int,
                                     solar_energy_kwh: Optional[float] = None,
@@ -864,39 +939,37 @@ class DataLogger:
         """Insert or update daily meter summary."""
         from solarhub.timezone_utils import now_configured
         try:
-            con = sqlite3.connect(self.path)
-            cur = con.cursor()
             updated_at = now_configured().isoformat()
             
-            cur.execute("""
-                INSERT INTO meter_daily 
-                (day, meter_id, array_id, import_energy_kwh, export_energy_kwh, net_energy_kwh,
-                 max_import_power_w, max_export_power_w, avg_voltage_v, avg_current_a, 
-                 avg_frequency_hz, sample_count, updated_at)
-                VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)
-                ON CONFLICT(day, meter_id) DO UPDATE SET
-                    import_energy_kwh = excluded.import_energy_kwh,
-                    export_energy_kwh = excluded.export_energy_kwh,
-                    net_energy_kwh = excluded.net_energy_kwh,
-                    max_import_power_w = excluded.max_import_power_w,
-                    max_export_power_w = excluded.max_export_power_w,
-                    avg_voltage_v = excluded.avg_voltage_v,
-                    avg_current_a = excluded.avg_current_a,
-                    avg_frequency_hz = excluded.avg_frequency_hz,
-                    sample_count = excluded.sample_count,
-                    updated_at = excluded.updated_at
-            """, (
-                day, meter_id, array_id, import_kwh, export_kwh, net_kwh,
-                max_import_w, max_export_w, avg_voltage, avg_current, avg_frequency,
-                sample_count, updated_at
-            ))
-            con.commit()
+            def write(cur):
+                cur.execute("""
+                    INSERT INTO meter_daily 
+                    (day, meter_id, array_id, import_energy_kwh, export_energy_kwh, net_energy_kwh,
+                     max_import_power_w, max_export_power_w, avg_voltage_v, avg_current_a, 
+                     avg_frequency_hz, sample_count, updated_at)
+                    VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)
+                    ON CONFLICT(day, meter_id) DO UPDATE SET
+                        import_energy_kwh = excluded.import_energy_kwh,
+                        export_energy_kwh = excluded.export_energy_kwh,
+                        net_energy_kwh = excluded.net_energy_kwh,
+                        max_import_power_w = excluded.max_import_power_w,
+                        max_export_power_w = excluded.max_export_power_w,
+                        avg_voltage_v = excluded.avg_voltage_v,
+                        avg_current_a = excluded.avg_current_a,
+                        avg_frequency_hz = excluded.avg_frequency_hz,
+                        sample_count = excluded.sample_count,
+                        updated_at = excluded.updated_at
+                """, (
+                    day, meter_id, array_id, import_kwh, export_kwh, net_kwh,
+                    max_import_w, max_export_w, avg_voltage, avg_current, avg_frequency,
+                    sample_count, updated_at
+                ))
+
+            self._submit_write(f"meter_daily:{meter_id}", write)
             log.debug(f"Successfully upserted daily summary for {meter_id} on {day}")
         except Exception as e:
             log.error(f"Failed to upsert daily summary for {meter_id}: {e}")
             raise
-        finally:
-            con.close()
     
     def get_meter_daily_summary(self, meter_id: str, start_date: str, end_date: str) -> list:
         """Get daily summaries for a meter within a date range."""
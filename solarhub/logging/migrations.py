@@ -0,0 +1,417 @@
+"""
+Versioned, run-once schema migrations.
+
+Every schema step in ``database_migrations`` is registered here with a version
+number. Applied steps are recorded in the ``schema_migrations`` ledger, and
+``PRAGMA user_version`` holds the highest version applied without gaps. Once a
+database is current, startup costs one PRAGMA read instead of re-running every
+migration (integrity check, ALTER probes, full-table UPDATEs) on each
+``DataLogger`` construction.
+
+The config.yaml -> database sync is not a schema step. It runs again only when
+the file's contents change.
+
+Data backfills over the sample tables do not run at startup. They run as
+resumable background jobs in small rowid-range chunks. Each chunk commits its
+progress cursor together with its updates, so a restart continues where the
+last run stopped and the polling writer only ever waits for one short
+transaction.
+"""
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from solarhub.database_migrations import (
+    migrate_to_arrays,
+    migrate_to_billing_tables,
+    migrate_to_device_discovery,
+    migrate_to_home_billing,
+    migrate_to_hierarchy_schema,
+    create_default_system,
+    migrate_config_yaml_to_database,
+    migrate_production_data,
+    migrate_to_epoch_timestamps,
+)
+
+log = logging.getLogger(__name__)
+
+LEDGER_TABLE = "schema_migrations"
+STATE_TABLE = "migration_state"
+
+
+def default_system_id(db_path: str) -> str:
+    """First configured system (the one created by config sync or by default)."""
+    con = sqlite3.connect(db_path)
+    try:
+        row = con.execute("SELECT system_id FROM systems ORDER BY created_at LIMIT 1").fetchone()
+        return row[0] if row else "system"
+    except sqlite3.OperationalError:
+        return "system"
+    finally:
+        con.close()
+
+
+class Migration:
+    """One schema step, applied exactly once per database."""
+
+    def __init__(self, version: int, name: str, apply: Callable[[str], None]):
+        self.version = version
+        self.name = name
+        self.apply = apply
+
+    def __repr__(self) -> str:
+        return f"Migration({self.version}, {self.name!r})"
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "arrays", migrate_to_arrays),
+    Migration(2, "billing_tables", migrate_to_billing_tables),
+    Migration(3, "device_discovery", migrate_to_device_discovery),
+    Migration(4, "home_billing", migrate_to_home_billing),
+    Migration(5, "hierarchy_schema", migrate_to_hierarchy_schema),
+    Migration(6, "default_system", create_default_system),
+    Migration(7, "production_data", lambda path: migrate_production_data(path, system_id=default_system_id(path))),
+    Migration(8, "epoch_timestamps", migrate_to_epoch_timestamps),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1].version
+
+
+def ensure_migration_tables(cur: sqlite3.Cursor):
+    """Create the migration ledger and the key/value state used by config sync and backfills."""
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {LEDGER_TABLE} (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            duration_ms REAL
+        )
+    """)
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+            key TEXT PRIMARY KEY,
+            value TEXT,
+            updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def get_state(cur: sqlite3.Cursor, key: str) -> Optional[str]:
+    """Value stored under ``key`` in the migration state table."""
+    row = cur.execute(f"SELECT value FROM {STATE_TABLE} WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def set_state(cur: sqlite3.Cursor, key: str, value: Optional[str]):
+    """Store (or with ``None`` delete) a migration state value; the caller commits."""
+    if value is None:
+        cur.execute(f"DELETE FROM {STATE_TABLE} WHERE key = ?", (key,))
+        return
+    cur.execute(f"""
+        INSERT INTO {STATE_TABLE}(key, value, updated_at) VALUES(?, ?, datetime('now'))
+        ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at
+    """, (key, value))
+
+
+def run_migrations(db_path: str, migrations: Sequence[Migration] = MIGRATIONS) -> List[str]:
+    """
+    Apply every migration not yet recorded in the ledger, in version order.
+
+    A failing step is logged and stops the run (later steps may depend on it);
+    it is retried on the next startup. Corruption found by the hierarchy
+    step's integrity check is re-raised so the caller can stop there.
+
+    Returns:
+        Names of the migrations applied by this call
+    """
+    latest = max((m.version for m in migrations), default=0)
+    con = sqlite3.connect(db_path)
+    try:
+        if con.execute("PRAGMA user_version").fetchone()[0] >= latest:
+            return []
+        ensure_migration_tables(con.cursor())
+        con.commit()
+        done = {row[0] for row in con.execute(f"SELECT version FROM {LEDGER_TABLE}")}
+    finally:
+        con.close()
+
+    applied: List[str] = []
+    for migration in sorted(migrations, key=lambda m: m.version):
+        if migration.version in done:
+            continue
+        log.info(f"Applying database migration {migration.version}: {migration.name}")
+        start = time.perf_counter()
+        try:
+            migration.apply(db_path)
+        except sqlite3.DatabaseError as e:
+            if "malformed" in str(e).lower() or "corrupt" in str(e).lower():
+                raise
+            log.error(f"Database migration {migration.version} ({migration.name}) failed: {e}", exc_info=True)
+            break
+        except Exception as e:
+            log.error(f"Database migration {migration.version} ({migration.name}) failed: {e}", exc_info=True)
+            break
+        duration_ms = (time.perf_counter() - start) * 1000.0
+        con = sqlite3.connect(db_path)
+        try:
+            con.execute(f"INSERT OR REPLACE INTO {LEDGER_TABLE}(version, name, duration_ms) VALUES(?, ?, ?)",
+                        (migration.version, migration.name, round(duration_ms, 1)))
+            done.add(migration.version)
+            con.execute(f"PRAGMA user_version = {_contiguous_version(done)}")
+            con.commit()
+        finally:
+            con.close()
+        applied.append(migration.name)
+        log.info(f"Database migration {migration.version} ({migration.name}) applied in {duration_ms:.0f} ms")
+    return applied
+
+
+def _contiguous_version(done: set) -> int:
+    version = 0
+    while version + 1 in done:
+        version += 1
+    return version
+
+
+def sync_config_yaml(db_path: str, config_path: str = "config.yaml") -> bool:
+    """
+    Sync config.yaml into the catalog tables when its contents changed since
+    the last sync (or the catalog is empty). Returns True if a sync ran.
+    """
+    config_file = Path(config_path)
+    if not config_file.exists():
+        log.debug(f"Config file {config_path} not found, skipping config sync")
+        return False
+    checksum = hashlib.sha256(config_file.read_bytes()).hexdigest()
+
+    con = sqlite3.connect(db_path)
+    try:
+        cur = con.cursor()
+        ensure_migration_tables(cur)
+        con.commit()
+        catalog_empty = cur.execute("SELECT COUNT(*) FROM adapter_base").fetchone()[0] == 0
+        if not catalog_empty and get_state(cur, "config_yaml_sha256") == checksum:
+            return False
+    finally:
+        con.close()
+
+    log.info("config.yaml changed since last sync, updating database catalog")
+    migrate_config_yaml_to_database(db_path, str(config_path))
+    # Link new/renamed devices to the (possibly new) system and their adapters
+    migrate_production_data(db_path, system_id=default_system_id(db_path))
+
+    con = sqlite3.connect(db_path)
+    try:
+        cur = con.cursor()
+        set_state(cur, "config_yaml_sha256", checksum)
+        con.commit()
+    finally:
+        con.close()
+    return True
+
+
+def migration_status(db_path: str) -> Dict[str, Any]:
+    """Schema version, applied steps and background job progress."""
+    con = sqlite3.connect(db_path)
+    try:
+        version = con.execute("PRAGMA user_version").fetchone()[0]
+        try:
+            applied = [{"version": v, "name": n, "applied_at": at, "duration_ms": ms}
+                       for v, n, at, ms in con.execute(
+                           f"SELECT version, name, applied_at, duration_ms FROM {LEDGER_TABLE} ORDER BY version")]
+            state = dict(con.execute(f"SELECT key, value FROM {STATE_TABLE}").fetchall())
+        except sqlite3.OperationalError:
+            applied, state = [], {}
+    finally:
+        con.close()
+    return {
+        "user_version": version,
+        "schema_version": SCHEMA_VERSION,
+        "pending": [m.name for m in MIGRATIONS if m.version not in {a["version"] for a in applied}],
+        "applied": applied,
+        "state": state,
+    }
+
+
+# ---------- Background data backfills ----------
+
+SYSTEM_ID_TABLES = (
+    "arrays", "battery_packs", "energy_samples", "array_samples", "battery_bank_samples",
+    "battery_unit_samples", "battery_cell_samples", "meter_samples", "hourly_energy",
+    "daily_summary", "meter_hourly_energy", "meter_daily",
+)
+
+
+class SystemIdBackfill:
+    """
+    Sets ``system_id`` on legacy rows written before the hierarchy schema.
+
+    Walks each table by rowid range (``chunk_rows`` rowids per transaction) and
+    stores the cursor in ``migration_state`` in the same transaction. Rows
+    written after the job starts already carry a system_id from the logger.
+    """
+
+    name = "backfill_system_ids"
+
+    def __init__(self, db_path: str, system_id: Optional[str] = None,
+                 tables: Sequence[str] = SYSTEM_ID_TABLES, chunk_rows: int = 5000,
+                 pause_s: float = 0.05, busy_timeout_ms: int = 5000):
+        self.db_path = db_path
+        self.system_id = system_id
+        self.tables = tuple(tables)
+        self.chunk_rows = max(int(chunk_rows), 1)
+        self.pause_s = pause_s
+        self.busy_timeout_ms = busy_timeout_ms
+        # Statistics
+        self.rows_updated = 0
+        self.chunks = 0
+        self.current_table: Optional[str] = None
+        self.completed = False
+        self.last_error: Optional[str] = None
+        self.elapsed_s = 0.0
+
+    def _cursor_key(self, table: str) -> str:
+        return f"{self.name}:{table}"
+
+    def run(self, stop: Optional[threading.Event] = None) -> bool:
+        """Run to completion (or until ``stop`` is set). Returns True when every table is done."""
+        start = time.perf_counter()
+        con = sqlite3.connect(self.db_path)
+        con.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        try:
+            cur = con.cursor()
+            ensure_migration_tables(cur)
+            con.commit()
+            if get_state(cur, self.name) == "done":
+                self.completed = True
+                return True
+            system_id = self.system_id or default_system_id(self.db_path)
+            for table in self.tables:
+                if stop is not None and stop.is_set():
+                    return False
+                self.current_table = table
+                if not self._backfill_table(con, table, system_id, stop):
+                    return False
+            self.current_table = None
+            set_state(cur, self.name, "done")
+            for table in self.tables:
+                set_state(cur, self._cursor_key(table), None)
+            con.commit()
+            self.completed = True
+            log.info(f"Background system_id backfill completed: {self.rows_updated} rows in {self.chunks} chunks")
+            return True
+        except Exception as e:
+            self.last_error = str(e)
+            log.warning(f"Background system_id backfill stopped (resumes next start): {e}")
+            return False
+        finally:
+            self.elapsed_s += time.perf_counter() - start
+            con.close()
+
+    def _backfill_table(self, con: sqlite3.Connection, table: str, system_id: str,
+                        stop: Optional[threading.Event]) -> bool:
+        cur = con.cursor()
+        try:
+            columns = [row[1] for row in cur.execute(f"PRAGMA table_info({table})")]
+        except sqlite3.OperationalError:
+            columns = []
+        if "system_id" not in columns:
+            log.debug(f"system_id backfill: {table} has no system_id column, skipping")
+            return True
+        key = self._cursor_key(table)
+        position = int(get_state(cur, key) or 0)
+        high = cur.execute(f"SELECT MAX(rowid) FROM {table}").fetchone()[0] or 0
+        while position < high:
+            if stop is not None and stop.is_set():
+                return False
+            upper = min(position + self.chunk_rows, high)
+            cur.execute(f"UPDATE {table} SET system_id = ? WHERE rowid > ? AND rowid <= ? AND system_id IS NULL",
+                        (system_id, position, upper))
+            self.rows_updated += max(cur.rowcount, 0)
+            set_state(cur, key, str(upper))
+            con.commit()
+            self.chunks += 1
+            position = upper
+            if self.pause_s:
+                time.sleep(self.pause_s)
+        return True
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            "completed": self.completed,
+            "current_table": self.current_table,
+            "rows_updated": self.rows_updated,
+            "chunks": self.chunks,
+            "elapsed_s": round(self.elapsed_s, 2),
+            "last_error": self.last_error,
+        }
+
+
+class AggregationBackfill:
+    """Opt-in rebuild of the aggregated energy tables (``enable_statistics_backfill``)."""
+
+    name = "aggregation_backfill"
+
+    def __init__(self, db_path: str, days_back: int = 30):
+        self.db_path = db_path
+        self.days_back = days_back
+        self.completed = False
+        self.last_error: Optional[str] = None
+
+    def run(self, stop: Optional[threading.Event] = None) -> bool:
+        from solarhub.aggregation_backfill import backfill_all_aggregated_tables
+        try:
+            log.info(f"Starting aggregation backfill for historical data (last {self.days_back} days)")
+            backfill_all_aggregated_tables(self.db_path, days_back=self.days_back)
+            log.info("Aggregation backfill completed successfully")
+            self.completed = True
+        except Exception as e:
+            self.last_error = str(e)
+            log.warning(f"Aggregation backfill failed (non-critical): {e}")
+        return self.completed
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {"completed": self.completed, "last_error": self.last_error}
+
+
+class BackgroundMigrations:
+    """Runs the data backfill jobs one after another on a daemon thread."""
+
+    def __init__(self, jobs: Sequence[Any]):
+        self.jobs = list(jobs)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="db-backfill", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        for job in self.jobs:
+            if self._stop.is_set():
+                return
+            try:
+                job.run(self._stop)
+            except Exception as e:
+                log.warning(f"Background migration {getattr(job, 'name', job)} failed: {e}")
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            "running": self.is_running,
+            "jobs": {getattr(job, "name", str(job)): job.get_statistics() for job in self.jobs},
+        }
@@ -0,0 +1,230 @@
+"""
+Shared pool of read-only SQLite connections.
+
+API handlers, schedulers and calculators used to open a fresh connection for
+every query, paying connection setup and schema parsing each time. Pooled
+connections are opened once with ``query_only``, a memory-mapped file and a
+larger page cache, and keep their compiled statements (``cached_statements``)
+across uses. Writes keep going through the DataLogger / write pipeline.
+
+    with read_connection(db_path) as con:
+        rows = con.execute("SELECT ...").fetchall()
+"""
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+
+log = logging.getLogger(__name__)
+
+
+class PoolTimeout(sqlite3.OperationalError):
+    """No pooled connection became free within the acquire timeout."""
+
+
+class ReadConnectionPool:
+    """
+    Thread-safe pool of read-only connections to one database.
+
+    Connections are created lazily up to ``size``; ``acquire`` waits up to
+    ``acquire_timeout_s`` for one to be returned. A connection that hit a
+    non-transient error is discarded rather than returned.
+    """
+
+    def __init__(self, db_path: str, size: int = 4, acquire_timeout_s: float = 10.0,
+                 mmap_size_mb: int = 64, cache_size_kb: int = 8192,
+                 busy_timeout_ms: int = 5000, cached_statements: int = 256):
+        self.db_path = db_path
+        self.size = max(size, 1)
+        self.acquire_timeout_s = acquire_timeout_s
+        self.mmap_size_mb = mmap_size_mb
+        self.cache_size_kb = cache_size_kb
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cached_statements = cached_statements
+
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._all: List[sqlite3.Connection] = []
+        self._closed = False
+        # Statistics
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.acquisitions = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.discarded = 0
+        self.total_wait_s = 0.0
+        self.max_wait_s = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        con = sqlite3.connect(self.db_path, timeout=self.busy_timeout_ms / 1000.0,
+                              check_same_thread=False, cached_statements=self.cached_statements)
+        con.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        con.execute(f"PRAGMA mmap_size={int(self.mmap_size_mb) * 1024 * 1024}")
+        # Negative cache_size is in KiB
+        con.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+        con.execute("PRAGMA temp_store=MEMORY")
+        con.execute("PRAGMA query_only=ON")
+        return con
+
+    def acquire(self) -> sqlite3.Connection:
+        """Take a connection (caller must ``release`` it)."""
+        if self._closed:
+            raise sqlite3.ProgrammingError("Read pool is closed")
+        start = time.monotonic()
+        con = None
+        try:
+            con = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if len(self._all) < self.size:
+                    con = self._connect()
+                    self._all.append(con)
+        if con is None:
+            self.waits += 1
+            try:
+                con = self._idle.get(timeout=self.acquire_timeout_s)
+            except queue.Empty:
+                self.timeouts += 1
+                raise PoolTimeout(f"No read connection free after {self.acquire_timeout_s}s "
+                                  f"({self.size} in use)")
+        waited = time.monotonic() - start
+        with self._lock:
+            self.acquisitions += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            self.total_wait_s += waited
+            self.max_wait_s = max(self.max_wait_s, waited)
+        return con
+
+    def release(self, con: sqlite3.Connection, discard: bool = False):
+        """Return a connection to the pool (or close it if it is broken)."""
+        with self._lock:
+            self.in_use -= 1
+        if not discard and not self._closed:
+            try:
+                if con.in_transaction:
+                    con.rollback()
+                con.row_factory = None
+                self._idle.put(con)
+                return
+            except sqlite3.Error:
+                pass
+        with self._lock:
+            if con in self._all:
+                self._all.remove(con)
+            self.discarded += 1
+        log.debug(f"Discarding read connection to {self.db_path}")
+        try:
+            con.close()
+        except sqlite3.Error:
+            pass
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection for the duration of a ``with`` block."""
+        con = self.acquire()
+        discard = False
+        try:
+            yield con
+        except (sqlite3.DatabaseError, sqlite3.InterfaceError) as e:
+            # Transient lock/busy errors keep the connection; anything else drops it
+            discard = not isinstance(e, sqlite3.OperationalError)
+            raise
+        finally:
+            self.release(con, discard=discard)
+
+    def close(self):
+        """Close every connection; borrowed ones are closed when returned."""
+        self._closed = True
+        while True:
+            try:
+                con = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                if con in self._all:
+                    self._all.remove(con)
+            try:
+                con.close()
+            except sqlite3.Error:
+                pass
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get pool statistics."""
+        with self._lock:
+            acquisitions = self.acquisitions
+            return {
+                "size": self.size,
+                "open": len(self._all),
+                "in_use": self.in_use,
+                "peak_in_use": self.peak_in_use,
+                "utilization": round(self.in_use / self.size, 3),
+                "acquisitions": acquisitions,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "discarded": self.discarded,
+                "avg_wait_ms": round(self.total_wait_s / acquisitions * 1000.0, 3) if acquisitions else 0.0,
+                "max_wait_ms": round(self.max_wait_s * 1000.0, 3),
+            }
+
+
+_pools: Dict[str, ReadConnectionPool] = {}
+_pools_lock = threading.Lock()
+_pool_settings: Dict[str, Any] = {}
+_pooling_enabled = True
+
+
+def configure_read_pools(enabled: bool = True, **settings):
+    """
+    Set the options used for pools created from now on (ReadConnectionPool kwargs).
+    With ``enabled=False`` every ``read_connection`` opens and closes its own connection.
+    """
+    global _pooling_enabled
+    with _pools_lock:
+        _pooling_enabled = enabled
+        _pool_settings.clear()
+        _pool_settings.update(settings)
+    log.info(f"SQLite read pools {'enabled' if enabled else 'disabled'}: {settings}")
+
+
+def get_read_pool(db_path: str) -> ReadConnectionPool:
+    """The shared read pool for a database, created on first use."""
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = _pools[db_path] = ReadConnectionPool(db_path, **_pool_settings)
+        return pool
+
+
+@contextmanager
+def read_connection(db_path: str) -> Iterator[sqlite3.Connection]:
+    """Borrow a pooled read-only connection to ``db_path``."""
+    if not _pooling_enabled:
+        con = sqlite3.connect(db_path)
+        try:
+            yield con
+        finally:
+            con.close()
+        return
+    with get_read_pool(db_path).connection() as con:
+        yield con
+
+
+def close_read_pools():
+    """Close and forget every pool (shutdown, tests)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def get_read_pool_statistics() -> Dict[str, Dict[str, Any]]:
+    """Statistics of every pool, keyed by database path."""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {path: pool.get_statistics() for path, pool in pools.items()}
@@ -0,0 +1,464 @@
+"""
+Tiered retention and downsampling of raw telemetry.
+
+Raw sample tables grow at full poll resolution forever. A ``RetentionPolicy``
+ages one table through up to three tiers, for example:
+
+* raw rows for ``raw_days``
+* 1-minute aggregates for ``minute_days`` (``{table}_1m``)
+* 15-minute aggregates after that, kept forever (``{table}_15m``)
+
+Aggregate rows carry the table's key columns, ``bucket_ts`` (bucket start,
+unix seconds, like the rollup tables) and ``sample_count``. Numeric columns
+are averaged, counters, bitmasks and text statuses keep their maximum.
+Averages of a bucket that straddles two chunks are merged weighted by
+``sample_count``.
+
+Tables whose rows are not averaged keep one row per bucket instead
+(``thin``: packed cell frames keep the first frame per minute, later per
+15 minutes) or are only deleted (``expire``: ``rollup_minute``, whose hours
+live on in ``rollup_hour``).
+
+``RetentionJob`` walks each table by rowid range like the background
+backfills: every chunk aggregates, deletes and stores its cursor in
+``migration_state`` in one short transaction, so polling keeps writing in
+between. Rows are written in time order, so a walk stops at the first row
+still inside the retention window. Freed pages are returned to the file
+system with ``PRAGMA incremental_vacuum`` in small steps when the database
+uses ``auto_vacuum = INCREMENTAL`` (new databases do; existing ones are
+converted by one full ``VACUUM`` only when ``convert_auto_vacuum`` is set).
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from solarhub.logging.migrations import ensure_migration_tables, get_state, set_state
+
+log = logging.getLogger(__name__)
+
+KIND_AVERAGE = "average"
+KIND_THIN = "thin"
+KIND_EXPIRE = "expire"
+
+MINUTE_S = 60
+QUARTER_HOUR_S = 900
+DAY_S = 86400
+
+# Unix seconds of a ts TEXT column ("2025-06-01 10:00:00.123+05:00"); NULL when unparseable
+TEXT_TS_EPOCH = "CAST(strftime('%s', ts) AS INTEGER)"
+
+AUTO_VACUUM_MODES = {0: "none", 1: "full", 2: "incremental"}
+LAST_RUN_KEY = "retention:last_run"
+
+
+class RetentionPolicy:
+    """How one table ages: raw rows, then 1-minute and 15-minute tiers."""
+
+    def __init__(self, table: str, key_columns: Sequence[str], kind: str = KIND_AVERAGE,
+                 raw_days: float = 14, minute_days: Optional[float] = 183,
+                 epoch_sql: str = TEXT_TS_EPOCH, time_column: str = "ts", time_scale: int = 1,
+                 max_columns: Sequence[str] = ()):
+        if kind not in (KIND_AVERAGE, KIND_THIN, KIND_EXPIRE):
+            raise ValueError(f"Unknown retention kind {kind!r}")
+        self.table = table
+        self.key_columns = tuple(key_columns)
+        self.kind = kind
+        self.raw_days = raw_days
+        self.minute_days = minute_days
+        self.epoch_sql = epoch_sql
+        self.time_column = time_column  # thin: indexed column the bucket is computed on
+        self.time_scale = time_scale  # thin: time_column units per second
+        self.max_columns = frozenset(max_columns)
+
+    def __repr__(self) -> str:
+        return f"RetentionPolicy({self.table!r}, {self.kind}, raw_days={self.raw_days}, minute_days={self.minute_days})"
+
+    @property
+    def minute_table(self) -> str:
+        return f"{self.table}_1m"
+
+    @property
+    def quarter_table(self) -> str:
+        return f"{self.table}_15m"
+
+
+def default_policies(raw_days: float = 14, minute_days: Optional[float] = 183) -> List[RetentionPolicy]:
+    """
+    Policies for the high-rate sample tables.
+
+    ``energy_samples`` is not included: the bias and load learners read
+    months of its raw rows, and ``DatabaseOptimizer.cleanup_old_data``
+    already bounds it.
+    """
+    policies = [
+        RetentionPolicy("array_samples", ("array_id",), raw_days=raw_days, minute_days=minute_days),
+        RetentionPolicy("meter_samples", ("meter_id",), raw_days=raw_days, minute_days=minute_days,
+                        max_columns=("grid_import_wh", "grid_export_wh", "energy_kwh")),
+        RetentionPolicy("battery_bank_samples", ("bank_id",), raw_days=raw_days, minute_days=minute_days,
+                        max_columns=("batteries_count", "cells_per_battery")),
+        RetentionPolicy("battery_unit_samples", ("bank_id", "power"), raw_days=raw_days, minute_days=minute_days,
+                        max_columns=("bat_events", "power_events", "sys_events")),
+        RetentionPolicy("battery_cell_frames", ("bank_id", "power"), kind=KIND_THIN, raw_days=raw_days,
+                        minute_days=minute_days, epoch_sql="ts_ms / 1000", time_column="ts_ms", time_scale=1000),
+    ]
+    if minute_days is not None:
+        # Minute rollups age like the 1-minute tier; rollup_hour keeps their hours
+        policies.append(RetentionPolicy("rollup_minute", ("scope", "entity_id", "metric"), kind=KIND_EXPIRE,
+                                        raw_days=minute_days, minute_days=None, epoch_sql="bucket_ts"))
+    return policies
+
+
+def _table_columns(cur: sqlite3.Cursor, table: str) -> List[Tuple[str, str]]:
+    """(name, declared type) of a table's columns; [] when it does not exist."""
+    try:
+        return [(row[1], (row[2] or "").upper()) for row in cur.execute(f"PRAGMA table_info({table})")]
+    except sqlite3.OperationalError:
+        return []
+
+
+class _Aggregate:
+    """Column layout of one average policy's aggregate tables."""
+
+    def __init__(self, policy: RetentionPolicy, columns: Sequence[Tuple[str, str]]):
+        self.policy = policy
+        types = dict(columns)
+        self.keys = [(k, types.get(k, "TEXT")) for k in policy.key_columns]
+        skip = set(policy.key_columns) | {"ts", "ts_ms", "rowid"}
+        self.values: List[Tuple[str, str, bool]] = []  # (name, type, take max)
+        for name, decl in columns:
+            if name in skip:
+                continue
+            numeric = "INT" in decl or "REAL" in decl or "FLOA" in decl or "DOUB" in decl or "NUM" in decl
+            take_max = name in policy.max_columns or not numeric
+            self.values.append((name, decl if take_max else "REAL", take_max))
+
+    def ensure_table(self, cur: sqlite3.Cursor, table: str):
+        key_defs = "".join(f"{name} {decl or 'TEXT'}, " for name, decl in self.keys)
+        value_defs = "".join(f", {name} {decl}" for name, decl, _ in self.values)
+        pk = ", ".join([name for name, _ in self.keys] + ["bucket_ts"])
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                {key_defs}bucket_ts INTEGER NOT NULL,
+                sample_count INTEGER NOT NULL{value_defs},
+                PRIMARY KEY ({pk})
+            )
+        """)
+
+    def upsert_sql(self, source: str, dest: str, epoch_sql: str, bucket_s: int, weighted: bool) -> str:
+        """
+        Aggregate the source rows with ``rowid`` in (?, ?] and epoch < ? into ``dest``.
+
+        ``weighted``: the source is itself an aggregate table (averages weighted by sample_count).
+        """
+        keys = [name for name, _ in self.keys]
+        names = keys + ["bucket_ts", "sample_count"] + [name for name, _, _ in self.values]
+        select = list(keys) + [f"({epoch_sql}) - ({epoch_sql}) % {bucket_s}",
+                               "SUM(sample_count)" if weighted else "COUNT(*)"]
+        updates = ["sample_count = sample_count + excluded.sample_count"]
+        for name, _, take_max in self.values:
+            if take_max:
+                select.append(f"MAX({name})")
+                updates.append(f"{name} = CASE WHEN {name} IS NULL OR excluded.{name} > {name} "
+                               f"THEN excluded.{name} ELSE {name} END")
+                continue
+            if weighted:
+                select.append(f"SUM({name} * sample_count) / SUM(CASE WHEN {name} IS NOT NULL THEN sample_count END)")
+            else:
+                select.append(f"AVG({name})")
+            updates.append(f"{name} = CASE WHEN {name} IS NULL THEN excluded.{name} "
+                           f"WHEN excluded.{name} IS NULL THEN {name} "
+                           f"ELSE ({name} * sample_count + excluded.{name} * excluded.sample_count) "
+                           f"/ (sample_count + excluded.sample_count) END")
+        conflict = ", ".join(keys + ["bucket_ts"])
+        group = ", ".join(str(i + 1) for i in range(len(keys) + 1))  # keys and bucket, by position
+        return (f"INSERT INTO {dest} ({', '.join(names)}) "
+                f"SELECT {', '.join(select)} FROM {source} "
+                f"WHERE rowid > ? AND rowid <= ? AND ({epoch_sql}) < ? GROUP BY {group} "
+                f"ON CONFLICT({conflict}) DO UPDATE SET {', '.join(updates)}")
+
+
+def auto_vacuum_mode(con: sqlite3.Connection) -> str:
+    """'none', 'full' or 'incremental'."""
+    return AUTO_VACUUM_MODES.get(con.execute("PRAGMA auto_vacuum").fetchone()[0], "unknown")
+
+
+def reclaim_free_pages(con: sqlite3.Connection, pages_per_step: int = 2048, pause_s: float = 0.05,
+                       stop: Optional[threading.Event] = None) -> int:
+    """
+    Return free pages to the file system with ``PRAGMA incremental_vacuum``,
+    ``pages_per_step`` at a time so writers wait for one short step at most.
+
+    Returns:
+        Bytes reclaimed (0 unless auto_vacuum is INCREMENTAL)
+    """
+    if auto_vacuum_mode(con) != "incremental":
+        return 0
+    page_size = con.execute("PRAGMA page_size").fetchone()[0]
+    before = con.execute("PRAGMA page_count").fetchone()[0]
+    while con.execute("PRAGMA freelist_count").fetchone()[0] > 0:
+        if stop is not None and stop.is_set():
+            break
+        # executescript steps the pragma to completion; execute() would free a single page
+        con.executescript(f"PRAGMA incremental_vacuum({int(pages_per_step)})")
+        if pause_s:
+            time.sleep(pause_s)
+    return (before - con.execute("PRAGMA page_count").fetchone()[0]) * page_size
+
+
+class RetentionJob:
+    """
+    One retention pass over every policy, then an incremental vacuum.
+
+    Each tier keeps its own rowid cursor in ``migration_state``
+    (``retention:<table>:<tier>``), so an interrupted pass resumes where it
+    stopped. Totals of the last completed pass are stored under
+    ``retention:last_run`` for ``DatabaseOptimizer.get_database_stats``.
+    """
+
+    name = "retention"
+
+    def __init__(self, db_path: str, policies: Optional[Sequence[RetentionPolicy]] = None,
+                 chunk_rows: int = 5000, pause_s: float = 0.05, busy_timeout_ms: int = 5000,
+                 vacuum_pages_per_step: int = 2048, convert_auto_vacuum: bool = False):
+        self.db_path = db_path
+        self.policies = list(policies) if policies is not None else default_policies()
+        self.chunk_rows = max(int(chunk_rows), 1)
+        self.pause_s = pause_s
+        self.busy_timeout_ms = busy_timeout_ms
+        self.vacuum_pages_per_step = max(int(vacuum_pages_per_step), 1)
+        self.convert_auto_vacuum = convert_auto_vacuum
+        # Statistics (cumulative over passes)
+        self.passes = 0
+        self.rows_aggregated = 0
+        self.rows_deleted = 0
+        self.chunks = 0
+        self.bytes_reclaimed = 0
+        self.tables: Dict[str, Dict[str, int]] = {}
+        self.current_table: Optional[str] = None
+        self.completed = False
+        self.last_error: Optional[str] = None
+        self.last_run_at: Optional[float] = None
+        self.elapsed_s = 0.0
+
+    def run(self, stop: Optional[threading.Event] = None, now: Optional[float] = None) -> bool:
+        """Run one pass (or until ``stop`` is set). Returns True when every table is within its policy."""
+        start = time.perf_counter()
+        now = time.time() if now is None else now
+        self.completed = False
+        deleted_before, aggregated_before = self.rows_deleted, self.rows_aggregated
+        con = sqlite3.connect(self.db_path)
+        con.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        try:
+            cur = con.cursor()
+            ensure_migration_tables(cur)
+            con.commit()
+            for policy in self.policies:
+                if stop is not None and stop.is_set():
+                    return False
+                self.current_table = policy.table
+                if not self._apply(con, policy, now, stop):
+                    return False
+            self.current_table = None
+            if self.convert_auto_vacuum and auto_vacuum_mode(con) != "incremental":
+                log.info("Converting database to auto_vacuum=INCREMENTAL (one full VACUUM)")
+                con.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                con.execute("VACUUM")
+            reclaimed = reclaim_free_pages(con, self.vacuum_pages_per_step, self.pause_s, stop)
+            self.bytes_reclaimed += reclaimed
+            self.passes += 1
+            self.completed = True
+            self.last_run_at = now
+            summary = {
+                "at": int(now),
+                "rows_aggregated": self.rows_aggregated - aggregated_before,
+                "rows_deleted": self.rows_deleted - deleted_before,
+                "bytes_reclaimed": reclaimed,
+                "total_bytes_reclaimed": reclaimed + int(json.loads(get_state(cur, LAST_RUN_KEY) or "{}")
+                                                         .get("total_bytes_reclaimed", 0)),
+            }
+            set_state(cur, LAST_RUN_KEY, json.dumps(summary))
+            con.commit()
+            if summary["rows_deleted"] or reclaimed:
+                log.info(f"Retention pass: {summary['rows_deleted']} rows compacted "
+                         f"({summary['rows_aggregated']} aggregated), {reclaimed / 1048576:.1f} MB reclaimed")
+            return True
+        except Exception as e:
+            self.last_error = str(e)
+            log.warning(f"Retention pass stopped (resumes next pass): {e}")
+            return False
+        finally:
+            self.elapsed_s += time.perf_counter() - start
+            con.close()
+
+    def _apply(self, con: sqlite3.Connection, policy: RetentionPolicy, now: float,
+               stop: Optional[threading.Event]) -> bool:
+        cur = con.cursor()
+        columns = _table_columns(cur, policy.table)
+        if not columns:
+            log.debug(f"Retention: {policy.table} does not exist, skipping")
+            return True
+        raw_cutoff = int(now - policy.raw_days * DAY_S)
+        minute_cutoff = int(now - policy.minute_days * DAY_S) if policy.minute_days is not None else None
+
+        if policy.kind == KIND_EXPIRE:
+            return self._walk(con, policy.table, "expire", policy.epoch_sql, raw_cutoff, stop,
+                              lambda lo, hi: (0, self._delete(cur, policy.table, policy.epoch_sql, lo, hi, raw_cutoff)))
+
+        if policy.kind == KIND_THIN:
+            for tier, bucket_s, cutoff in (("1m", MINUTE_S, raw_cutoff), ("15m", QUARTER_HOUR_S, minute_cutoff)):
+                if cutoff is None:
+                    continue
+                sql = self._thin_sql(policy, bucket_s)
+                done = self._walk(con, policy.table, tier, policy.epoch_sql, cutoff, stop,
+                                  lambda lo, hi, sql=sql, cutoff=cutoff: (0, self._execute(cur, sql, lo, hi, cutoff)))
+                if not done:
+                    return False
+            return True
+
+        agg = _Aggregate(policy, columns)
+        agg.ensure_table(cur, policy.minute_table)
+        agg.ensure_table(cur, policy.quarter_table)
+        con.commit()
+        tiers = [(policy.table, policy.minute_table, "1m", policy.epoch_sql, MINUTE_S, raw_cutoff, False)]
+        if minute_cutoff is not None:
+            tiers.append((policy.minute_table, policy.quarter_table, "15m", "bucket_ts", QUARTER_HOUR_S,
+                          minute_cutoff, True))
+        for source, dest, tier, epoch_sql, bucket_s, cutoff, weighted in tiers:
+            sql = agg.upsert_sql(source, dest, epoch_sql, bucket_s, weighted)
+
+            def compact(lo, hi, sql=sql, source=source, epoch_sql=epoch_sql, cutoff=cutoff):
+                aggregated = self._execute(cur, sql, lo, hi, cutoff)
+                return aggregated, self._delete(cur, source, epoch_sql, lo, hi, cutoff)
+
+            if not self._walk(con, source, tier, epoch_sql, cutoff, stop, compact):
+                return False
+        return True
+
+    @staticmethod
+    def _thin_sql(policy: RetentionPolicy, bucket_s: int) -> str:
+        """Delete rows in (?, ?] older than ? that have an earlier row in the same key and bucket."""
+        t, tc = policy.table, policy.time_column
+        width = bucket_s * policy.time_scale
+        same_key = "".join(f" AND k.{name} = s.{name}" for name in policy.key_columns)
+        return (f"DELETE FROM {t} WHERE rowid IN ("
+                f"SELECT s.rowid FROM {t} s WHERE s.rowid > ? AND s.rowid <= ? AND ({policy.epoch_sql}) < ? "
+                f"AND EXISTS (SELECT 1 FROM {t} k WHERE k.{tc} >= s.{tc} - s.{tc} % {width} "
+                f"AND k.{tc} < s.{tc}{same_key}))")
+
+    @staticmethod
+    def _execute(cur: sqlite3.Cursor, sql: str, lo: int, hi: int, cutoff: int) -> int:
+        cur.execute(sql, (lo, hi, cutoff))
+        return max(cur.rowcount, 0)
+
+    @staticmethod
+    def _delete(cur: sqlite3.Cursor, table: str, epoch_sql: str, lo: int, hi: int, cutoff: int) -> int:
+        cur.execute(f"DELETE FROM {table} WHERE rowid > ? AND rowid <= ? AND ({epoch_sql}) < ?", (lo, hi, cutoff))
+        return max(cur.rowcount, 0)
+
+    def _walk(self, con: sqlite3.Connection, table: str, tier: str, epoch_sql: str, cutoff: int,
+              stop: Optional[threading.Event], process) -> bool:
+        """
+        Apply ``process(lo, hi) -> (aggregated, deleted)`` to rowid ranges (lo, hi]
+        from the stored cursor on; ``process`` only touches rows before ``cutoff``.
+
+        The cursor stops before the first row still inside the window. Rows of
+        different keys interleave (one poll writes every unit, one chunk
+        upserts every key's bucket), so the walk goes on past that row while
+        chunks still yield old rows; everything it touches there is gone or
+        thinned, so re-walking it next pass is idempotent.
+        """
+        cur = con.cursor()
+        key = f"{self.name}:{table}:{tier}"
+        position = int(get_state(cur, key) or 0)
+        cursor: Optional[int] = None  # set once a row inside the window was seen
+        high = cur.execute(f"SELECT MAX(rowid) FROM {table}").fetchone()[0] or 0
+        counts = self.tables.setdefault(table, {"rows_aggregated": 0, "rows_deleted": 0})
+        while position < high:
+            if stop is not None and stop.is_set():
+                return False
+            upper = min(position + self.chunk_rows, high)
+            if cursor is None:
+                frontier = cur.execute(f"SELECT MIN(rowid) FROM {table} WHERE rowid > ? AND rowid <= ? "
+                                       f"AND ({epoch_sql}) >= ?", (position, upper, cutoff)).fetchone()[0]
+                if frontier is not None:
+                    cursor = frontier - 1
+            aggregated, deleted = process(position, upper)
+            self.rows_aggregated += aggregated
+            self.rows_deleted += deleted
+            counts["rows_aggregated"] += aggregated
+            counts["rows_deleted"] += deleted
+            set_state(cur, key, str(upper if cursor is None else cursor))
+            con.commit()
+            self.chunks += 1
+            position = upper
+            if cursor is not None and not deleted:
+                break
+            if self.pause_s:
+                time.sleep(self.pause_s)
+        return True
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            "completed": self.completed,
+            "passes": self.passes,
+            "current_table": self.current_table,
+            "rows_aggregated": self.rows_aggregated,
+            "rows_deleted": self.rows_deleted,
+            "chunks": self.chunks,
+            "bytes_reclaimed": self.bytes_reclaimed,
+            "tables": {table: dict(counts) for table, counts in self.tables.items()},
+            "last_run_at": self.last_run_at,
+            "elapsed_s": round(self.elapsed_s, 2),
+            "last_error": self.last_error,
+        }
+
+
+class RetentionScheduler:
+    """Runs a ``RetentionJob`` pass every ``interval_s`` on a daemon thread."""
+
+    def __init__(self, job: RetentionJob, interval_s: float = 6 * 3600, initial_delay_s: float = 300):
+        self.job = job
+        self.interval_s = interval_s
+        self.initial_delay_s = initial_delay_s
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="db-retention", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        delay = self.initial_delay_s
+        while not self._stop.wait(delay):
+            try:
+                self.job.run(self._stop)
+            except Exception as e:
+                log.warning(f"Retention pass failed: {e}")
+            delay = self.interval_s
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {"running": self.is_running, "interval_s": self.interval_s, **self.job.get_statistics()}
+
+
+def last_run_summary(cur: sqlite3.Cursor) -> Optional[Dict[str, Any]]:
+    """Totals of the last completed retention pass, if any."""
+    try:
+        value = get_state(cur, LAST_RUN_KEY)
+    except sqlite3.OperationalError:
+        return None
+    return json.loads(value) if value else None
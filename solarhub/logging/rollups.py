@@ -0,0 +1,365 @@
+"""
+Incremental minute/hour rollups maintained on ingest.
+
+Every logged sample updates in-memory accumulators for its minute and hour
+buckets: sample count, sum, min and max per metric, plus trapezoidal energy
+for power metrics (positive and negative parts kept apart, e.g. grid import vs
+export, battery charge vs discharge). Accumulated deltas are written once per
+poll cycle as upserts that add onto existing rows, so a restart or a second
+writer never overwrites a partially filled bucket.
+
+Readers (energy calculator, history endpoints) read O(buckets) rows instead of
+scanning raw samples; the hourly job only marks closed hours as finalized.
+"""
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+log = logging.getLogger(__name__)
+
+SCOPE_INVERTER = "inverter"
+SCOPE_ARRAY = "array"
+SCOPE_SYSTEM = "system"
+SCOPE_METER = "meter"
+
+MINUTE_TABLE = "rollup_minute"
+HOUR_TABLE = "rollup_hour"
+_TABLES = (MINUTE_TABLE, HOUR_TABLE)
+
+# Metrics that are integrated into energy (W -> kWh); others only get min/max/avg
+POWER_METRICS = frozenset({"pv_power_w", "load_power_w", "grid_power_w", "batt_power_w"})
+
+_UPSERT_SQL = """
+    INSERT INTO {table}
+    (scope, entity_id, metric, bucket_ts, sample_count, value_sum, value_min, value_max,
+     energy_in_kwh, energy_out_kwh)
+    VALUES (?,?,?,?,?,?,?,?,?,?)
+    ON CONFLICT(scope, entity_id, metric, bucket_ts) DO UPDATE SET
+        sample_count = sample_count + excluded.sample_count,
+        value_sum = value_sum + excluded.value_sum,
+        value_min = MIN(COALESCE(value_min, excluded.value_min), COALESCE(excluded.value_min, value_min)),
+        value_max = MAX(COALESCE(value_max, excluded.value_max), COALESCE(excluded.value_max, value_max)),
+        energy_in_kwh = energy_in_kwh + excluded.energy_in_kwh,
+        energy_out_kwh = energy_out_kwh + excluded.energy_out_kwh
+"""
+
+
+def ensure_rollup_tables(cur: sqlite3.Cursor):
+    """Create the rollup tables (bucket_ts = bucket start, unix seconds)."""
+    for table in _TABLES:
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                scope TEXT NOT NULL,
+                entity_id TEXT NOT NULL,
+                metric TEXT NOT NULL,
+                bucket_ts INTEGER NOT NULL,
+                sample_count INTEGER NOT NULL DEFAULT 0,
+                value_sum REAL NOT NULL DEFAULT 0,
+                value_min REAL,
+                value_max REAL,
+                energy_in_kwh REAL NOT NULL DEFAULT 0,
+                energy_out_kwh REAL NOT NULL DEFAULT 0,
+                finalized INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (scope, entity_id, metric, bucket_ts)
+            )
+        """)
+        cur.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_scope_metric_ts ON {table}(scope, metric, bucket_ts)")
+    cur.execute("CREATE TABLE IF NOT EXISTS rollup_meta (key TEXT PRIMARY KEY, value TEXT)")
+    # First time rollups ran: hours before this are only available from raw samples
+    cur.execute("INSERT OR IGNORE INTO rollup_meta(key, value) VALUES('started_at', ?)", (str(int(time.time())),))
+
+
+def _bucket_starts(epoch: float, utc_offset: int) -> Tuple[int, int]:
+    """Minute and hour bucket starts (unix seconds) for a local-time sample."""
+    local = int(epoch // 1) + utc_offset
+    return local - local % 60 - utc_offset, local - local % 3600 - utc_offset
+
+
+def _split_energy(t0: float, v0: float, t1: float, v1: float) -> Tuple[float, float]:
+    """Trapezoidal energy in kWh of a linear segment, split into (positive, negative) parts."""
+    if v0 >= 0 and v1 >= 0:
+        return (v0 + v1) * (t1 - t0) / 7_200_000.0, 0.0
+    if v0 <= 0 and v1 <= 0:
+        return 0.0, -(v0 + v1) * (t1 - t0) / 7_200_000.0
+    # Sign change: integrate the two triangles on either side of the zero crossing
+    tz = t0 + (t1 - t0) * v0 / (v0 - v1)
+    first = v0 * (tz - t0) / 7_200_000.0
+    second = v1 * (t1 - tz) / 7_200_000.0
+    if v0 > 0:
+        return first, -second
+    return second, -first
+
+
+class _Acc:
+    """Pending delta for one bucket."""
+    __slots__ = ("count", "total", "vmin", "vmax", "e_in", "e_out")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.vmin: Optional[float] = None
+        self.vmax: Optional[float] = None
+        self.e_in = 0.0
+        self.e_out = 0.0
+
+    def add_value(self, v: float):
+        self.count += 1
+        self.total += v
+        if self.vmin is None or v < self.vmin:
+            self.vmin = v
+        if self.vmax is None or v > self.vmax:
+            self.vmax = v
+
+
+_Key = Tuple[str, str, str, str, int]  # (table, scope, entity_id, metric, bucket_ts)
+
+
+class RollupEngine:
+    """
+    Maintains minute and hour rollups from samples as they are logged.
+
+    ``add_sample`` is called from the ingest path; ``end_cycle`` closes a poll
+    cycle (parents such as the system get one sample per cycle: the sum of
+    each child's latest sample, whatever the child's own poll rate) and
+    ``drain_job`` returns a write job for the write pipeline that upserts the
+    accumulated deltas.
+    """
+
+    def __init__(self, max_gap_s: float = 300.0):
+        self.max_gap_s = max_gap_s
+        self._lock = threading.Lock()
+        self._pending: Dict[_Key, _Acc] = {}
+        # Last (epoch, value) per series for trapezoidal integration
+        self._last: Dict[Tuple[str, str, str], Tuple[float, float]] = {}
+        # Latest sample of each child per parent series: parent -> {child: (ts, values)};
+        # children polled more than once in a cycle count once, ones not polled keep
+        # their last sample (until it is older than max_gap_s)
+        self._children: Dict[Tuple[str, str], Dict[Tuple[str, str], Tuple[datetime, Dict[str, float]]]] = {}
+        self._changed_parents: set = set()
+        # Statistics
+        self.samples = 0
+        self.gaps = 0
+        self.rows_flushed = 0
+        self.flushes = 0
+
+    def add_sample(self, scope: str, entity_id: str, ts: datetime,
+                   values: Dict[str, Optional[float]],
+                   parents: Iterable[Tuple[str, str]] = ()):
+        """
+        Add one sample.
+
+        Args:
+            scope: inverter | array | system | meter
+            entity_id: Device/array/system id
+            ts: Timezone-aware sample time (buckets follow its UTC offset)
+            values: metric -> value (None values are ignored)
+            parents: (scope, entity_id) series whose per-cycle sum includes this sample
+        """
+        epoch = ts.timestamp()
+        offset = int(ts.utcoffset().total_seconds()) if ts.utcoffset() is not None else 0
+        with self._lock:
+            self.samples += 1
+            for metric, v in values.items():
+                if v is None:
+                    continue
+                self._add_value(scope, entity_id, metric, epoch, offset, float(v))
+            child = (scope, entity_id)
+            latest = {metric: float(v) for metric, v in values.items() if v is not None}
+            for parent in parents:
+                self._children.setdefault(parent, {})[child] = (ts, latest)
+                self._changed_parents.add(parent)
+
+    def end_cycle(self):
+        """Emit one sample per parent series that got new child samples: the sum of each child's latest."""
+        with self._lock:
+            for parent in self._changed_parents:
+                children = self._children.get(parent)
+                if not children:
+                    continue
+                ts = max(child_ts for child_ts, _ in children.values())
+                sums: Dict[str, float] = {}
+                for child, (child_ts, values) in list(children.items()):
+                    if (ts - child_ts).total_seconds() > self.max_gap_s:
+                        del children[child]  # offline child: its last sample no longer counts
+                        continue
+                    for metric, v in values.items():
+                        sums[metric] = sums.get(metric, 0.0) + v
+                offset = int(ts.utcoffset().total_seconds()) if ts.utcoffset() is not None else 0
+                for metric, v in sums.items():
+                    self._add_value(parent[0], parent[1], metric, ts.timestamp(), offset, v)
+            self._changed_parents = set()
+
+    def _add_value(self, scope: str, entity_id: str, metric: str, epoch: float, offset: int, v: float):
+        minute_ts, hour_ts = _bucket_starts(epoch, offset)
+        self._acc(MINUTE_TABLE, scope, entity_id, metric, minute_ts).add_value(v)
+        self._acc(HOUR_TABLE, scope, entity_id, metric, hour_ts).add_value(v)
+
+        if metric not in POWER_METRICS:
+            return
+        series = (scope, entity_id, metric)
+        last = self._last.get(series)
+        self._last[series] = (epoch, v)
+        if last is None:
+            return
+        t0, v0 = last
+        if epoch <= t0:
+            return
+        if epoch - t0 > self.max_gap_s:
+            # Outage or restart: don't invent energy across the gap
+            self.gaps += 1
+            return
+        # Split the segment at minute boundaries so each bucket gets its own share
+        t = t0
+        while t < epoch:
+            m_start, h_start = _bucket_starts(t, offset)
+            t_next = min(float(m_start + 60), epoch)
+            va = v0 + (v - v0) * (t - t0) / (epoch - t0)
+            vb = v0 + (v - v0) * (t_next - t0) / (epoch - t0)
+            e_in, e_out = _split_energy(t, va, t_next, vb)
+            for table, bucket in ((MINUTE_TABLE, m_start), (HOUR_TABLE, h_start)):
+                acc = self._acc(table, scope, entity_id, metric, bucket)
+                acc.e_in += e_in
+                acc.e_out += e_out
+            t = t_next
+
+    def _acc(self, table: str, scope: str, entity_id: str, metric: str, bucket: int) -> _Acc:
+        key = (table, scope, entity_id, metric, bucket)
+        acc = self._pending.get(key)
+        if acc is None:
+            acc = self._pending[key] = _Acc()
+        return acc
+
+    def drain_job(self) -> Optional[Callable[[sqlite3.Cursor], None]]:
+        """Take the pending deltas as a write job (None when there is nothing to write)."""
+        with self._lock:
+            if not self._pending:
+                return None
+            pending, self._pending = self._pending, {}
+            self.flushes += 1
+            self.rows_flushed += len(pending)
+
+        rows: Dict[str, List[tuple]] = {MINUTE_TABLE: [], HOUR_TABLE: []}
+        for (table, scope, entity_id, metric, bucket), acc in pending.items():
+            rows[table].append((scope, entity_id, metric, bucket, acc.count, acc.total,
+                                acc.vmin, acc.vmax, acc.e_in, acc.e_out))
+
+        def write(cur):
+            for table, table_rows in rows.items():
+                if table_rows:
+                    cur.executemany(_UPSERT_SQL.format(table=table), table_rows)
+        return write
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get rollup engine statistics."""
+        with self._lock:
+            return {
+                "samples": self.samples,
+                "series": len(self._last),
+                "pending_buckets": len(self._pending),
+                "rows_flushed": self.rows_flushed,
+                "flushes": self.flushes,
+                "integration_gaps": self.gaps,
+                "max_gap_s": self.max_gap_s,
+            }
+
+
+# ---------- Readers ----------
+
+def rollups_started_at(cur: sqlite3.Cursor) -> Optional[int]:
+    """When rollups were first maintained (unix seconds), or None if never."""
+    try:
+        row = cur.execute("SELECT value FROM rollup_meta WHERE key = 'started_at'").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return int(row[0]) if row else None
+
+
+def covers(cur: sqlite3.Cursor, start: datetime) -> bool:
+    """True if rollups were maintained for the whole hour containing/after ``start``."""
+    started = rollups_started_at(cur)
+    if started is None:
+        return False
+    started_dt = datetime.fromtimestamp(started, tz=start.tzinfo)
+    first_full_hour = started_dt.replace(minute=0, second=0, microsecond=0)
+    if first_full_hour < started_dt:
+        first_full_hour += timedelta(hours=1)
+    return start >= first_full_hour
+
+
+def read_hourly(cur: sqlite3.Cursor, scope: str, metrics: Sequence[str], start: datetime, end: datetime,
+                entity_ids: Optional[Sequence[str]] = None) -> Dict[Tuple[int, str], Dict[str, Any]]:
+    """
+    Read per-hour rollups for ``[start, end)`` summed over the selected entities.
+
+    Whole hours come from the hour table; partial hours at the edges are
+    assembled from minute buckets.
+
+    Returns:
+        {(hour_start_ts, metric): {sample_count, value_sum, value_min, value_max,
+        energy_in_kwh, energy_out_kwh}}
+    """
+    first_hour = start.replace(minute=0, second=0, microsecond=0)
+    if first_hour < start:
+        first_hour += timedelta(hours=1)
+    last_hour = end.replace(minute=0, second=0, microsecond=0)
+    s, e = int(start.timestamp()), int(end.timestamp())
+    fh, lh = int(first_hour.timestamp()), int(last_hour.timestamp())
+
+    ranges: List[Tuple[str, int, int]] = []
+    if fh < lh:
+        ranges.append((HOUR_TABLE, fh, lh))
+        if s < fh:
+            ranges.append((MINUTE_TABLE, s, fh))
+        if lh < e:
+            ranges.append((MINUTE_TABLE, lh, e))
+    elif s < e:
+        ranges.append((MINUTE_TABLE, s, e))
+
+    metric_ph = ",".join("?" * len(metrics))
+    entity_clause = ""
+    entity_params: List[Any] = []
+    if entity_ids:
+        entity_clause = f" AND entity_id IN ({','.join('?' * len(entity_ids))})"
+        entity_params = list(entity_ids)
+
+    out: Dict[Tuple[int, str], Dict[str, Any]] = {}
+    for table, lo, hi in ranges:
+        cur.execute(f"""
+            SELECT bucket_ts, metric, sample_count, value_sum, value_min, value_max,
+                   energy_in_kwh, energy_out_kwh
+            FROM {table}
+            WHERE scope = ? AND metric IN ({metric_ph}) AND bucket_ts >= ? AND bucket_ts < ?{entity_clause}
+        """, [scope, *metrics, lo, hi, *entity_params])
+        for bucket_ts, metric, count, total, vmin, vmax, e_in, e_out in cur.fetchall():
+            if table == MINUTE_TABLE:
+                local = datetime.fromtimestamp(bucket_ts, tz=start.tzinfo)
+                bucket_ts = int(local.replace(minute=0, second=0, microsecond=0).timestamp())
+            row = out.get((bucket_ts, metric))
+            if row is None:
+                out[(bucket_ts, metric)] = {
+                    "sample_count": count, "value_sum": total, "value_min": vmin, "value_max": vmax,
+                    "energy_in_kwh": e_in, "energy_out_kwh": e_out,
+                }
+                continue
+            row["sample_count"] += count
+            row["value_sum"] += total
+            if vmin is not None and (row["value_min"] is None or vmin < row["value_min"]):
+                row["value_min"] = vmin
+            if vmax is not None and (row["value_max"] is None or vmax > row["value_max"]):
+                row["value_max"] = vmax
+            row["energy_in_kwh"] += e_in
+            row["energy_out_kwh"] += e_out
+    return out
+
+
+def finalize_hour(cur: sqlite3.Cursor, hour_start: datetime) -> int:
+    """Mark every bucket of a closed hour as finalized. Returns rows marked."""
+    h = int(hour_start.timestamp())
+    cur.execute(f"UPDATE {HOUR_TABLE} SET finalized = 1 WHERE bucket_ts = ? AND finalized = 0", (h,))
+    marked = cur.rowcount
+    cur.execute(f"UPDATE {MINUTE_TABLE} SET finalized = 1 WHERE bucket_ts >= ? AND bucket_ts < ? AND finalized = 0",
+                (h, h + 3600))
+    return marked
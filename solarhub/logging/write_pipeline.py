@@ -0,0 +1,410 @@
+"""
+Batched SQLite write pipeline for telemetry logging.
+
+All telemetry inserts are handed to a single writer thread that owns one
+long-lived WAL connection. Queued writes are coalesced into one transaction
+per poll cycle (or every ``flush_interval_ms``), so a cycle that logs several
+inverters, battery banks, cells and meters costs one commit instead of dozens.
+"""
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+# Overflow policies applied when the queue is full (disk stalled / writer behind)
+OVERFLOW_BLOCK = "block"              # Wait up to put_timeout_s, then drop the new write
+OVERFLOW_DROP_OLDEST = "drop_oldest"  # Discard the oldest queued write to make room
+OVERFLOW_DROP_NEWEST = "drop_newest"  # Discard the new write immediately
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST)
+
+WriteJob = Callable[[sqlite3.Cursor], None]
+
+
+class _WriteItem:
+    """A queued write: a callable executed with the writer's cursor."""
+    __slots__ = ("label", "job", "enqueued_at")
+
+    def __init__(self, label: str, job: WriteJob):
+        self.label = label
+        self.job = job
+        self.enqueued_at = time.monotonic()
+
+
+class _Marker:
+    """Control marker placed in the queue (cycle boundary, flush barrier, stop)."""
+    __slots__ = ("kind", "event")
+
+    def __init__(self, kind: str, event: Optional[threading.Event] = None):
+        self.kind = kind
+        self.event = event
+
+
+_CYCLE = "cycle"
+_FLUSH = "flush"
+_STOP = "stop"
+
+
+class WritePipeline:
+    """
+    Single-writer SQLite pipeline with batching, backpressure and metrics.
+
+    Producers call ``submit()`` from any thread (normally the asyncio polling
+    loop); the call never touches the database. The writer thread commits all
+    writes queued up to a cycle boundary (``mark_cycle()``), a flush barrier
+    (``flush()``), ``max_batch_size`` writes, or ``flush_interval_ms``,
+    whichever comes first.
+    """
+
+    def __init__(self, db_path: str, flush_interval_ms: int = 1000,
+                 max_queue_size: int = 10000, max_batch_size: int = 5000,
+                 overflow_policy: str = OVERFLOW_DROP_OLDEST,
+                 put_timeout_s: float = 0.5, busy_timeout_ms: int = 5000,
+                 commit_retries: int = 3):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflow_policy}', expected one of {OVERFLOW_POLICIES}")
+        self.db_path = db_path
+        self.flush_interval = max(flush_interval_ms, 1) / 1000.0
+        self.max_batch_size = max(max_batch_size, 1)
+        self.overflow_policy = overflow_policy
+        self.put_timeout_s = put_timeout_s
+        self.busy_timeout_ms = busy_timeout_ms
+        self.commit_retries = max(commit_retries, 1)
+
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max(max_queue_size, 1))
+        self._put_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.is_running = False
+
+        # Statistics
+        self._stats_lock = threading.Lock()
+        self.writes_submitted = 0
+        self.writes_committed = 0
+        self.writes_failed = 0
+        self.writes_dropped = 0
+        self.commits = 0
+        self.commit_failures = 0
+        self.queue_depth_max = 0
+        self.last_batch_size = 0
+        self.last_commit_time = 0.0
+        self.last_commit_latency_ms = 0.0
+        self.max_commit_latency_ms = 0.0
+        self._total_commit_latency_ms = 0.0
+        self.max_queue_wait_ms = 0.0
+
+    # ---------- Lifecycle ----------
+    def start(self):
+        """Start the writer thread."""
+        if self.is_running:
+            log.warning("Write pipeline is already running")
+            return
+        self.is_running = True
+        self._thread = threading.Thread(target=self._writer_loop, name="db-writer", daemon=True)
+        self._thread.start()
+        log.info(f"Write pipeline started for {self.db_path} "
+                 f"(flush_interval={self.flush_interval * 1000:.0f}ms, policy={self.overflow_policy})")
+
+    def stop(self, timeout: float = 10.0) -> bool:
+        """Drain all queued writes, commit them and close the connection."""
+        if not self.is_running:
+            return True
+        # The stop marker must get through even when the queue is full
+        marker = _Marker(_STOP, threading.Event())
+        self._put_control(marker, timeout)
+        drained = marker.event.wait(timeout)
+        self.is_running = False
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=1.0)
+        if drained:
+            log.info("Write pipeline stopped (all queued writes flushed)")
+        else:
+            log.warning(f"Write pipeline did not drain within {timeout}s; "
+                        f"{self._queue.qsize()} writes may be lost")
+        return drained
+
+    # ---------- Producer API ----------
+    def submit(self, job: WriteJob, label: str = "write") -> bool:
+        """
+        Queue a write job. ``job(cursor)`` runs on the writer thread inside the
+        current batch transaction.
+
+        Returns:
+            True if the write was queued, False if it was dropped
+        """
+        if not self.is_running:
+            return False
+        item = _WriteItem(label, job)
+        with self._stats_lock:
+            self.writes_submitted += 1
+
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            if not self._handle_overflow(item):
+                return False
+        depth = self._queue.qsize()
+        if depth > self.queue_depth_max:
+            self.queue_depth_max = depth
+        return True
+
+    def mark_cycle(self) -> threading.Event:
+        """
+        Signal the end of a poll cycle; the writer commits what is queued so far.
+        The returned event is set once that commit is done (at once when not running).
+        """
+        marker = _Marker(_CYCLE, threading.Event())
+        if self.is_running:
+            self._put_control(marker)
+        else:
+            marker.event.set()
+        return marker.event
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Block until every write queued before this call has been committed."""
+        if not self.is_running:
+            return True
+        marker = _Marker(_FLUSH, threading.Event())
+        self._put_control(marker, timeout)
+        return marker.event.wait(timeout)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get write pipeline statistics (queue depth, commit latency, drops)."""
+        with self._stats_lock:
+            avg_latency = (self._total_commit_latency_ms / self.commits) if self.commits else 0.0
+            return {
+                "is_running": self.is_running,
+                "queue_depth": self._queue.qsize(),
+                "queue_depth_max": self.queue_depth_max,
+                "queue_capacity": self._queue.maxsize,
+                "overflow_policy": self.overflow_policy,
+                "writes_submitted": self.writes_submitted,
+                "writes_committed": self.writes_committed,
+                "writes_failed": self.writes_failed,
+                "writes_dropped": self.writes_dropped,
+                "commits": self.commits,
+                "commit_failures": self.commit_failures,
+                "last_batch_size": self.last_batch_size,
+                "last_commit_time": self.last_commit_time,
+                "last_commit_latency_ms": round(self.last_commit_latency_ms, 2),
+                "avg_commit_latency_ms": round(avg_latency, 2),
+                "max_commit_latency_ms": round(self.max_commit_latency_ms, 2),
+                "max_queue_wait_ms": round(self.max_queue_wait_ms, 2),
+            }
+
+    # ---------- Queue handling ----------
+    def _put_control(self, marker: _Marker, timeout: float = 5.0):
+        """Enqueue a control marker; barriers wait for room, evicting the oldest write only as a last resort."""
+        try:
+            self._queue.put_nowait(marker)
+            return
+        except queue.Full:
+            if marker.kind == _CYCLE:
+                # Writer is already behind; it will commit on its own
+                marker.event.set()
+                return
+        try:
+            self._queue.put(marker, timeout=timeout)
+            return
+        except queue.Full:
+            pass
+        with self._put_lock:
+            self._evict_oldest()
+            try:
+                self._queue.put_nowait(marker)
+            except queue.Full:
+                if marker.event is not None:
+                    marker.event.set()
+
+    def _handle_overflow(self, item: _WriteItem) -> bool:
+        """Apply the overflow policy for a write that did not fit in the queue."""
+        if self.overflow_policy == OVERFLOW_BLOCK:
+            try:
+                self._queue.put(item, timeout=self.put_timeout_s)
+                return True
+            except queue.Full:
+                self._count_dropped(item, "queue full after blocking")
+                return False
+
+        if self.overflow_policy == OVERFLOW_DROP_NEWEST:
+            self._count_dropped(item, "queue full")
+            return False
+
+        # drop_oldest: make room by discarding the oldest write
+        with self._put_lock:
+            self._evict_oldest()
+            try:
+                self._queue.put_nowait(item)
+                return True
+            except queue.Full:
+                self._count_dropped(item, "queue full")
+                return False
+
+    def _evict_oldest(self):
+        try:
+            oldest = self._queue.get_nowait()
+        except queue.Empty:
+            return
+        if isinstance(oldest, _Marker):
+            # Never strand a waiter: release flush/stop barriers we evict
+            if oldest.event is not None:
+                oldest.event.set()
+            return
+        self._count_dropped(oldest, "evicted by newer write")
+
+    def _count_dropped(self, item: _WriteItem, reason: str):
+        with self._stats_lock:
+            self.writes_dropped += 1
+            dropped = self.writes_dropped
+        # Rate-limit the warning: first drop, then every 100th
+        if dropped == 1 or dropped % 100 == 0:
+            log.warning(f"Write pipeline dropped '{item.label}' ({reason}); total dropped: {dropped}")
+
+    # ---------- Writer thread ----------
+    def _connect(self) -> sqlite3.Connection:
+        con = sqlite3.connect(self.db_path, isolation_level=None)
+        con.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        try:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+        except sqlite3.DatabaseError as e:
+            log.warning(f"Write pipeline could not enable WAL mode: {e}")
+        return con
+
+    def _writer_loop(self):
+        log.info("Write pipeline writer thread started")
+        con = None
+        try:
+            con = self._connect()
+            stopping = False
+            while not stopping:
+                try:
+                    first = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    continue
+
+                batch: List[_WriteItem] = []
+                waiters: List[threading.Event] = []
+                stop_event: Optional[threading.Event] = None
+                deadline = time.monotonic() + self.flush_interval
+                item = first
+                while True:
+                    if isinstance(item, _Marker):
+                        if item.kind == _STOP:
+                            stopping = True
+                            stop_event = item.event
+                            # Drain whatever is still queued behind the stop marker
+                            batch.extend(self._drain_remaining(waiters))
+                            break
+                        if item.event is not None:
+                            waiters.append(item.event)
+                        break
+                    batch.append(item)
+                    if len(batch) >= self.max_batch_size:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+
+                if batch:
+                    self._commit_batch(con, batch)
+                for ev in waiters:
+                    ev.set()
+                if stop_event is not None:
+                    stop_event.set()
+        except Exception as e:
+            log.error(f"Write pipeline writer thread crashed: {e}", exc_info=True)
+        finally:
+            self.is_running = False
+            if con is not None:
+                try:
+                    con.close()
+                except Exception:
+                    pass
+            log.info("Write pipeline writer thread exited")
+
+    def _drain_remaining(self, waiters: List[threading.Event]) -> List[_WriteItem]:
+        items: List[_WriteItem] = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return items
+            if isinstance(item, _Marker):
+                if item.event is not None:
+                    waiters.append(item.event)
+                continue
+            items.append(item)
+
+    def _commit_batch(self, con: sqlite3.Connection, batch: List[_WriteItem]):
+        """Run every job of the batch in one transaction, retrying the commit on lock/IO errors."""
+        now = time.monotonic()
+        oldest_wait_ms = (now - batch[0].enqueued_at) * 1000.0
+        if oldest_wait_ms > self.max_queue_wait_ms:
+            self.max_queue_wait_ms = oldest_wait_ms
+
+        for attempt in range(1, self.commit_retries + 1):
+            start = time.perf_counter()
+            ok = 0
+            failed = 0
+            try:
+                cur = con.cursor()
+                cur.execute("BEGIN")
+                for item in batch:
+                    # Each job in its own savepoint: a failed job leaves none of its rows behind
+                    cur.execute("SAVEPOINT job")
+                    try:
+                        item.job(cur)
+                    except Exception as e:
+                        # Lock/IO problems affect the whole transaction: retry the batch
+                        if isinstance(e, sqlite3.OperationalError) and _is_transient(e):
+                            raise
+                        # A bad row must not poison the rest of the batch
+                        cur.execute("ROLLBACK TO job")
+                        cur.execute("RELEASE job")
+                        failed += 1
+                        log.error(f"Write pipeline job '{item.label}' failed: {e}")
+                        continue
+                    cur.execute("RELEASE job")
+                    ok += 1
+                cur.execute("COMMIT")
+            except sqlite3.OperationalError as e:
+                try:
+                    con.execute("ROLLBACK")
+                except sqlite3.Error:
+                    pass
+                with self._stats_lock:
+                    self.commit_failures += 1
+                if attempt < self.commit_retries and _is_transient(e):
+                    log.warning(f"Write pipeline commit attempt {attempt} failed ({e}), retrying")
+                    time.sleep(min(0.25 * attempt, 1.0))
+                    continue
+                log.error(f"Write pipeline dropped batch of {len(batch)} writes after {attempt} attempts: {e}")
+                with self._stats_lock:
+                    self.writes_dropped += len(batch)
+                return
+
+            latency_ms = (time.perf_counter() - start) * 1000.0
+            with self._stats_lock:
+                self.commits += 1
+                self.writes_committed += ok
+                self.writes_failed += failed
+                self.last_batch_size = len(batch)
+                self.last_commit_time = time.time()
+                self.last_commit_latency_ms = latency_ms
+                self._total_commit_latency_ms += latency_ms
+                if latency_ms > self.max_commit_latency_ms:
+                    self.max_commit_latency_ms = latency_ms
+            log.debug(f"Write pipeline committed {ok} writes in {latency_ms:.1f}ms")
+            return
+
+
+def _is_transient(err: sqlite3.OperationalError) -> bool:
+    msg = str(err).lower()
+    return "locked" in msg or "busy" in msg or "disk i/o" in msg
@@ -73,6 +73,7 @@ def load_config(path: str | Path) -> HubConfig:
 
 async def amain(cfg_path: str | Path | None) -> None:
     log = logging.getLogger(__name__)
+    app = None
     try:
         cfg = load_config(_resolve_config_path(str(cfg_path) if cfg_path else None))
         app = SolarApp(cfg)
@@ -86,6 +87,9 @@ async def amain(cfg_path: str | Path | None) -> None:
     except Exception as e:
         log.error(f"Fatal error in application: {e}", exc_info=True)
         raise
+    finally:
+        if app is not None:
+            app.shutdown()
 
 
 def main() -> None:
@@ -1,74 +1,182 @@
 import json
-from typing import Any, Dict, Callable, Optional
+import threading
+import time
+from fnmatch import fnmatchcase
+from typing import Any, Dict, Callable, List, Optional, Tuple
 from paho.mqtt import client as mqtt
+
+from solarhub.json_codec import dumps_bytes
 import logging
 log = logging.getLogger(__name__)
 
+
+class PublishGate:
+    """
+    Change-only delivery for telemetry state topics.
+
+    Each topic remembers the payload it last published. A non-retained payload
+    goes out when a field moved past its deadband (absolute or relative to the
+    last published value), a field appeared/disappeared or a non-numeric field
+    changed, or when ``max_interval_s`` passed without a publish (heartbeat).
+    Comparing against the last *published* payload means slow drift is still
+    sent once it adds up. Retained topics (availability, cfg_state) go out only
+    when their payload changes. ``min_interval_s`` caps the rate per topic; a
+    held-back change is sent by the first call after the interval.
+
+    Fields matching ``ignore_fields`` (timestamps) never count as a change.
+    Published payloads are always complete, so HA value templates keep working.
+    ``reset()`` forgets everything (broker reconnect: retained state may be gone).
+    """
+
+    def __init__(self, policy=None):
+        self.enabled = getattr(policy, "enabled", True)
+        self.min_interval_s = float(getattr(policy, "min_interval_s", 0.0))
+        self.max_interval_s = float(getattr(policy, "max_interval_s", 0.0))
+        default = getattr(policy, "default_deadband", None)
+        self._default_band = (float(getattr(default, "abs", 0.0)), float(getattr(default, "rel", 0.0)))
+        self._patterns = [(pattern, (float(band.abs), float(band.rel)))
+                          for pattern, band in (getattr(policy, "deadbands", None) or {}).items()]
+        self._bands: Dict[str, Tuple[float, float]] = {}
+        # Fields that change every poll without carrying state (timestamps) never count as a change
+        self._ignore_patterns = list(getattr(policy, "ignore_fields", ("ts",)))
+        self._ignored_fields: Dict[str, bool] = {}
+        self._last: Dict[str, Tuple[float, Any]] = {}  # topic -> (published_at, payload)
+        self._lock = threading.Lock()
+        # Statistics
+        self.published = 0
+        self.suppressed = 0
+        self.heartbeats = 0
+
+    def _band(self, field: str) -> Tuple[float, float]:
+        band = self._bands.get(field)
+        if band is None:
+            band = next((b for pattern, b in self._patterns if fnmatchcase(field, pattern)), self._default_band)
+            self._bands[field] = band
+        return band
+
+    def _ignored(self, field: str) -> bool:
+        ignored = self._ignored_fields.get(field)
+        if ignored is None:
+            ignored = self._ignored_fields[field] = any(fnmatchcase(field, p) for p in self._ignore_patterns)
+        return ignored
+
+    def _changed(self, old: Any, new: Any, field: str = "") -> bool:
+        """True if ``new`` differs from ``old`` beyond the deadbands (nested dicts/lists compared per item)."""
+        if old == new:
+            return False
+        if isinstance(old, dict) and isinstance(new, dict):
+            if old.keys() != new.keys():
+                return True
+            return any(self._changed(old[key], value, key) for key, value in new.items()
+                       if not self._ignored(key))
+        if isinstance(old, list) and isinstance(new, list):
+            return len(old) != len(new) or any(self._changed(a, b, field) for a, b in zip(old, new))
+        if (isinstance(old, (int, float)) and isinstance(new, (int, float))
+                and not isinstance(old, bool) and not isinstance(new, bool)):
+            abs_band, rel_band = self._band(field)
+            return abs(new - old) > max(abs_band, rel_band * abs(old))
+        return True
+
+    def should_publish(self, topic: str, payload: Any, retain: bool = False, now: Optional[float] = None) -> bool:
+        """Decide whether to send ``payload``; when True it becomes the topic's baseline."""
+        if not self.enabled:
+            self.published += 1
+            return True
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            last = self._last.get(topic)
+            if last is not None:
+                elapsed = now - last[0]
+                if retain or not self.max_interval_s or elapsed < self.max_interval_s:
+                    if elapsed < self.min_interval_s or not self._changed(last[1], payload):
+                        self.suppressed += 1
+                        return False
+                elif not self._changed(last[1], payload):
+                    self.heartbeats += 1
+            self._last[topic] = (now, dict(payload) if isinstance(payload, dict) else payload)
+            self.published += 1
+            return True
+
+    def forget(self, topic: str):
+        """Drop a topic's baseline (its publish failed), so the next payload is sent."""
+        with self._lock:
+            self._last.pop(topic, None)
+
+    def reset(self):
+        with self._lock:
+            self._last.clear()
+
+    def get_statistics(self) -> Dict[str, Any]:
+        total = self.published + self.suppressed
+        return {
+            "enabled": self.enabled,
+            "topics": len(self._last),
+            "published": self.published,
+            "suppressed": self.suppressed,
+            "heartbeats": self.heartbeats,
+            "suppressed_pct": round(100.0 * self.suppressed / total, 1) if total else 0.0,
+        }
+
+
 class Mqtt:
     def __init__(self, cfg):
         self.cfg = cfg
+        self.gate = PublishGate(getattr(cfg, "publish", None))
+        self.connected = False
+        self._connect_listeners: List[Callable[[], None]] = []
         self.cli = mqtt.Client(client_id=cfg.client_id, clean_session=True)
         if cfg.username:
             self.cli.username_pw_set(cfg.username, cfg.password or "")
+        self.cli.on_connect = self._on_connect
+        self.cli.on_disconnect = self._on_disconnect
         self.cli.connect_async(cfg.host, cfg.port, keepalive=30)
         self.cli.loop_start()
 
-    def pub(self, topic: str, payload: Dict[str, Any], retain: bool = False):
+    def add_connect_listener(self, callback: Callable[[], None]):
+        """Call ``callback`` (on the MQTT network thread) after every successful (re)connect."""
+        self._connect_listeners.append(callback)
+
+    def _on_connect(self, _cli, _ud, _flags, rc):
+        if rc == 0:
+            self.connected = True
+            # The broker may have lost retained state: send every state topic again
+            self.gate.reset()
+            for callback in list(self._connect_listeners):
+                try:
+                    callback()
+                except Exception as e:
+                    log.warning(f"MQTT connect listener failed: {e}")
+
+    def _on_disconnect(self, _cli, _ud, rc):
+        self.connected = False
+
+    def pub_state(self, topic: str, payload: Any, retain: bool = False) -> bool:
+        """Publish a telemetry state topic through the change-only gate. Returns True if sent."""
+        if not self.gate.should_publish(topic, payload, retain):
+            return False
         try:
-            # Ensure payload is JSON-serializable
-            # Convert any non-serializable values to strings
-            serializable_payload = self._make_json_serializable(payload)
-            p = json.dumps(serializable_payload, separators=(",", ":"))
+            sent = self.pub(topic, payload, retain=retain)
+        except Exception:
+            self.gate.forget(topic)
+            raise
+        if not sent:
+            self.gate.forget(topic)
+        return sent
+
+    def pub(self, topic: str, payload: Dict[str, Any], retain: bool = False) -> bool:
+        """Publish with QoS 0. Returns False if the client dropped the message (e.g. not connected)."""
+        try:
+            # One pass: non-serializable values become strings, NaN becomes null
+            p = dumps_bytes(payload)
             log.debug("MQTT PUB %s %s", topic, p)
-            self.cli.publish(topic, p, qos=0, retain=retain)
+            info = self.cli.publish(topic, p, qos=0, retain=retain)
         except Exception as e:
             log.error(f"Failed to publish MQTT message to {topic}: {e}", exc_info=True)
             raise
-    
-    def _make_json_serializable(self, obj: Any, visited: Optional[set] = None) -> Any:
-        """
-        Recursively convert object to JSON-serializable format.
-        Handles circular references and non-serializable types.
-        
-        Args:
-            obj: Object to make JSON-serializable
-            visited: Set of object IDs already visited (to detect circular references)
-        """
-        if visited is None:
-            visited = set()
-        
-        # Handle circular references by tracking visited objects
-        # Use object ID for mutable types (dict, list), value for immutable types
-        if isinstance(obj, (dict, list)):
-            obj_id = id(obj)
-            if obj_id in visited:
-                return "<circular reference>"
-            visited.add(obj_id)
-        
-        try:
-            if isinstance(obj, dict):
-                result = {}
-                for k, v in obj.items():
-                    # Ensure key is string
-                    key = str(k) if not isinstance(k, str) else k
-                    result[key] = self._make_json_serializable(v, visited.copy())
-                return result
-            elif isinstance(obj, (list, tuple)):
-                return [self._make_json_serializable(item, visited.copy()) for item in obj]
-            elif isinstance(obj, (str, int, float, bool, type(None))):
-                return obj
-            else:
-                # Try to serialize, fallback to string representation
-                try:
-                    json.dumps(obj)
-                    return obj
-                except (TypeError, ValueError):
-                    # Non-serializable type - convert to string
-                    return str(obj)
-        finally:
-            # Clean up visited set for mutable types
-            if isinstance(obj, (dict, list)):
-                visited.discard(id(obj))
+        if info.rc != mqtt.MQTT_ERR_SUCCESS:
+            log.debug("MQTT PUB %s dropped: %s", topic, mqtt.error_string(info.rc))
+            return False
+        return True
 
     def sub(self, topic: str, handler: Callable[[str, Dict[str, Any]], None]):
         def on_message(_cli, _ud, msg):
@@ -80,3 +188,7 @@ class Mqtt:
             handler(msg.topic, data)
         self.cli.subscribe(topic, qos=0)
         self.cli.message_callback_add(topic, on_message)
+
+    def unsub(self, topic: str):
+        self.cli.unsubscribe(topic)
+        self.cli.message_callback_remove(topic)
@@ -0,0 +1,203 @@
+"""
+Per-bus device polling scheduler.
+
+Polling every device in one ``asyncio.gather`` per interval lets the slowest
+device (a Pytes console read, a BLE reconnect) set the cycle time for all.
+Here devices are grouped by the physical bus they sit on (serial port, TCP
+host, Bluetooth adapter). Polls on one bus run one at a time, and different
+buses run in parallel, each on its own worker task.
+
+Every device has its own cadence. A bus worker always runs the device with
+the earliest deadline, and deadlines advance at a fixed rate
+(``deadline += interval``). Slots missed by a slow poll are skipped, not made
+up in a burst, and each one is counted as an overrun. For every device the
+scheduler records start jitter (how late a poll started against its
+deadline), poll duration, overruns, timeouts and failures.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+PollFn = Callable[[], Awaitable[Any]]
+
+
+def bus_key(adapter_cfg: Any, device_id: str) -> str:
+    """
+    Physical bus of a device adapter: devices sharing a serial port, a TCP
+    endpoint or a Bluetooth adapter must not be polled at the same time.
+    """
+    if adapter_cfg is None:
+        return f"device:{device_id}"
+    serial_port = getattr(adapter_cfg, "serial_port", None)
+    transport = (getattr(adapter_cfg, "transport", None) or "").lower()
+    host = getattr(adapter_cfg, "host", None)
+    if host and (transport in ("tcp", "tcpip", "") or not serial_port):
+        return f"tcp:{host}:{getattr(adapter_cfg, 'port', None) or ''}"
+    if serial_port:
+        return f"serial:{serial_port}"
+    if getattr(adapter_cfg, "bt_address", None) or getattr(adapter_cfg, "bt_addresses", None):
+        return f"ble:{getattr(adapter_cfg, 'bt_adapter', None) or 'default'}"
+    return f"device:{device_id}"
+
+
+class PollTask:
+    """One device polled on a bus at its own cadence."""
+
+    def __init__(self, name: str, bus: str, interval_s: float, poll: PollFn,
+                 timeout_s: Optional[float] = None):
+        self.name = name
+        self.bus = bus
+        self.interval_s = max(float(interval_s), 0.05)
+        self.poll = poll
+        self.timeout_s = timeout_s
+        self.deadline = 0.0
+        # Statistics
+        self.polls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.overruns = 0
+        self.jitter_sum_s = 0.0
+        self.jitter_max_s = 0.0
+        self.duration_sum_s = 0.0
+        self.duration_max_s = 0.0
+        self.last_duration_s = 0.0
+        self.last_error: Optional[str] = None
+
+    def record(self, jitter_s: float, duration_s: float):
+        self.polls += 1
+        self.jitter_sum_s += jitter_s
+        self.jitter_max_s = max(self.jitter_max_s, jitter_s)
+        self.duration_sum_s += duration_s
+        self.duration_max_s = max(self.duration_max_s, duration_s)
+        self.last_duration_s = duration_s
+
+    def get_statistics(self) -> Dict[str, Any]:
+        n = self.polls
+        return {
+            "bus": self.bus,
+            "interval_s": self.interval_s,
+            "polls": n,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "overruns": self.overruns,
+            "avg_jitter_ms": round(self.jitter_sum_s / n * 1000.0, 2) if n else 0.0,
+            "max_jitter_ms": round(self.jitter_max_s * 1000.0, 2),
+            "avg_duration_ms": round(self.duration_sum_s / n * 1000.0, 2) if n else 0.0,
+            "max_duration_ms": round(self.duration_max_s * 1000.0, 2),
+            "last_duration_ms": round(self.last_duration_s * 1000.0, 2),
+            "last_error": self.last_error,
+        }
+
+
+class PollingScheduler:
+    """Runs one worker per bus; polls on a bus are serialized, buses run concurrently."""
+
+    def __init__(self, stagger_s: float = 0.1):
+        self.stagger_s = stagger_s
+        self.tasks: Dict[str, PollTask] = {}
+        self._workers: Dict[str, asyncio.Task] = {}
+        self._started_at = 0.0
+
+    def add(self, task: PollTask):
+        if task.name in self.tasks:
+            raise ValueError(f"Duplicate poll task '{task.name}'")
+        self.tasks[task.name] = task
+
+    @property
+    def buses(self) -> Dict[str, List[PollTask]]:
+        out: Dict[str, List[PollTask]] = {}
+        for task in self.tasks.values():
+            out.setdefault(task.bus, []).append(task)
+        return out
+
+    @property
+    def running(self) -> bool:
+        return any(not w.done() for w in self._workers.values())
+
+    def start(self):
+        """Start one worker per bus on the running event loop."""
+        if self.running:
+            return
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        self._started_at = now
+        for bus, tasks in self.buses.items():
+            # Stagger first polls on a bus so they don't all fall due at once
+            for i, task in enumerate(tasks):
+                task.deadline = now + i * self.stagger_s
+            self._workers[bus] = asyncio.create_task(self._run_bus(bus, tasks), name=f"poll-bus:{bus}")
+        log.info(f"Polling scheduler started: {len(self.tasks)} devices on {len(self._workers)} buses "
+                 f"({', '.join(f'{b}={len(t)}' for b, t in self.buses.items())})")
+
+    def cancel(self) -> List[asyncio.Task]:
+        """Cancel the bus workers without waiting (for synchronous shutdown paths)."""
+        workers = list(self._workers.values())
+        self._workers.clear()
+        for w in workers:
+            w.cancel()
+        return workers
+
+    async def stop(self):
+        """Cancel the bus workers and wait for them to finish."""
+        for w in self.cancel():
+            try:
+                await w
+            except asyncio.CancelledError:
+                pass
+            except Exception as e:
+                log.debug(f"Poll worker ended with error: {e}")
+
+    async def _run_bus(self, bus: str, tasks: List[PollTask]):
+        loop = asyncio.get_running_loop()
+        while True:
+            task = min(tasks, key=lambda t: t.deadline)
+            delay = task.deadline - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            started = loop.time()
+            try:
+                if task.timeout_s:
+                    await asyncio.wait_for(task.poll(), timeout=task.timeout_s)
+                else:
+                    await task.poll()
+                task.last_error = None
+            except asyncio.CancelledError:
+                raise
+            except asyncio.TimeoutError:
+                task.timeouts += 1
+                task.failures += 1
+                task.last_error = f"timeout after {task.timeout_s}s"
+                log.warning(f"Poll of {task.name} on {bus} timed out after {task.timeout_s}s")
+            except Exception as e:
+                task.failures += 1
+                task.last_error = str(e)
+                log.warning(f"Poll of {task.name} on {bus} failed: {e}")
+            finished = loop.time()
+            task.record(max(started - task.deadline, 0.0), finished - started)
+
+            # Fixed-rate deadlines; skip (and count) slots the poll ran past
+            task.deadline += task.interval_s
+            if task.deadline < finished:
+                missed = int((finished - task.deadline) // task.interval_s) + 1
+                task.overruns += missed
+                task.deadline += missed * task.interval_s
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get per-bus and per-device polling statistics."""
+        buses = {}
+        for bus, tasks in self.buses.items():
+            worker = self._workers.get(bus)
+            busy = sum(t.duration_sum_s for t in tasks)
+            uptime = time.monotonic() - self._started_at if self._started_at else 0.0
+            buses[bus] = {
+                "devices": [t.name for t in tasks],
+                "running": bool(worker and not worker.done()),
+                "utilization": round(min(busy / uptime, 1.0), 3) if uptime > 0 else 0.0,
+            }
+        return {
+            "buses": buses,
+            "devices": {name: t.get_statistics() for name, t in self.tasks.items()},
+        }
@@ -1,9 +1,13 @@
+import logging
 from typing import Dict, Tuple, List
 import pandas as pd
 from solarhub.logging.logger import DataLogger
-import sqlite3
+from solarhub.logging.read_pool import read_connection
 import numpy as np
 from solarhub.daily_aggregator import DailyAggregator
+from solarhub.schedulers.profile_cache import get_profile_cache
+
+log = logging.getLogger(__name__)
 
 class BiasLearner:
     """Learns hourly PV profile per day-of-year from logged samples with seasonal learning."""
@@ -11,27 +15,37 @@ class BiasLearner:
         self.dblogger = logger
         self.tz = tz
         self.daily_aggregator = DailyAggregator(logger.path, tz)
+        self.profiles = get_profile_cache(logger.path, tz)
+        self._seasonal_cache: Dict[tuple, Dict[Tuple[int,int], float]] = {}
 
     def hourly_pv_profile(self, inverter_id: str, days_back: int = 60) -> Dict[Tuple[int,int], float]:
         """
         Learn hourly PV profile from recent data only.
+        Served from the incrementally updated profile sketches; falls back to a raw scan.
         Args:
             inverter_id: Inverter identifier
             days_back: Number of days of historical data to use (default: 60 days)
         """
-        con = sqlite3.connect(self.dblogger.path)
-        # Only load data from the last N days to avoid exponential slowdown
-        from solarhub.timezone_utils import now_configured
-        cutoff_date = (pd.Timestamp(now_configured()) - pd.Timedelta(days=days_back)).strftime('%Y-%m-%d %H:%M:%S')
-        query = """
-            SELECT ts, inverter_id, pv_power_w 
-            FROM energy_samples 
-            WHERE inverter_id = ? AND ts >= ?
-            ORDER BY ts DESC
-            LIMIT 50000
-        """
-        df = pd.read_sql_query(query, con, params=[inverter_id, cutoff_date])
-        con.close()
+        try:
+            return self.profiles.pv_profile(inverter_id, days_back)
+        except Exception as e:
+            log.warning(f"Cached PV profile unavailable for {inverter_id}, scanning samples: {e}")
+            return self._hourly_pv_profile_raw(inverter_id, days_back)
+
+    def _hourly_pv_profile_raw(self, inverter_id: str, days_back: int = 60) -> Dict[Tuple[int,int], float]:
+        """Median PV per (doy, hour) straight from the most recent energy_samples rows."""
+        with read_connection(self.dblogger.path) as con:
+            # Only load data from the last N days to avoid exponential slowdown
+            from solarhub.timezone_utils import now_configured
+            cutoff_date = (pd.Timestamp(now_configured()) - pd.Timedelta(days=days_back)).strftime('%Y-%m-%d %H:%M:%S')
+            query = """
+                SELECT ts, inverter_id, pv_power_w 
+                FROM energy_samples 
+                WHERE inverter_id = ? AND ts >= ?
+                ORDER BY ts DESC
+                LIMIT 50000
+            """
+            df = pd.read_sql_query(query, con, params=[inverter_id, cutoff_date])
         if df.empty:
             return {}
         df['ts'] = pd.to_datetime(df['ts'], format='ISO8601', errors='coerce')
@@ -50,7 +64,8 @@ class BiasLearner:
                                 recent_days: int = 60, seasonal_years: int = 3) -> Dict[Tuple[int,int], float]:
         """
         Learn hourly PV profile using hybrid approach:
-        - Recent data (last N days) for current patterns
+        - Recent data (last N days) for current patterns, from the profile sketches
+          (daily summaries only while the sketches hold no data)
         - Seasonal data (same day-of-year from previous years) for seasonal patterns
         
         Args:
@@ -60,44 +75,36 @@ class BiasLearner:
             seasonal_years: Number of years to look back for seasonal data
             
         Returns:
-            Dictionary mapping (day_of_year, hour) to normalized power weights
+            Dictionary mapping (day_of_year, hour) to normalized power weights for day_of_year
         """
-        # Get recent data (last N days)
-        recent_data = self.daily_aggregator.get_recent_data(inverter_id, recent_days)
+        recent = _hour_shares(self.hourly_pv_profile(inverter_id, recent_days))
+        if not recent:
+            recent_data = self.daily_aggregator.get_recent_data(inverter_id, recent_days)
+            recent = _hour_shares(self._extract_hourly_profile_from_daily(recent_data, 'pv'))
+        seasonal = _hour_shares(self._seasonal_pv_profile(inverter_id, day_of_year, seasonal_years))
         
-        # Get seasonal data (same day-of-year from previous years)
-        seasonal_data = self.daily_aggregator.get_seasonal_data(day_of_year, inverter_id, seasonal_years)
-        
-        # Combine both approaches
+        # Weight factors: 70% recent, 30% seasonal (whichever is available otherwise)
+        recent_weight = 0.7 if seasonal else 1.0
+        seasonal_weight = 0.3 if recent else 1.0
         combined_profile = {}
-        
-        # Weight factors
-        recent_weight = 0.7  # 70% weight to recent data
-        seasonal_weight = 0.3  # 30% weight to seasonal data
-        
-        # Process recent data
-        if recent_data:
-            recent_profile = self._extract_hourly_profile_from_daily(recent_data, 'pv')
-            for (doy, hour), weight in recent_profile.items():
-                combined_profile[(doy, hour)] = weight * recent_weight
-        
-        # Process seasonal data
-        if seasonal_data:
-            seasonal_profile = self._extract_hourly_profile_from_daily(seasonal_data, 'pv')
-            for (doy, hour), weight in seasonal_profile.items():
-                key = (doy, hour)
-                if key in combined_profile:
-                    combined_profile[key] += weight * seasonal_weight
-                else:
-                    combined_profile[key] = weight * seasonal_weight
-        
-        # If no data available, fall back to original method
-        if not combined_profile:
-            return self.hourly_pv_profile(inverter_id, recent_days)
+        for hour in set(recent) | set(seasonal):
+            combined_profile[(day_of_year, hour)] = (recent.get(hour, 0.0) * recent_weight
+                                                     + seasonal.get(hour, 0.0) * seasonal_weight)
         
         # Normalize the combined profile
         return self._normalize_profile(combined_profile)
 
+    def _seasonal_pv_profile(self, inverter_id: str, day_of_year: int,
+                             seasonal_years: int) -> Dict[Tuple[int,int], float]:
+        """Seasonal profile from previous years' daily summaries; they do not change during the day."""
+        key = (inverter_id, day_of_year, seasonal_years)
+        if key not in self._seasonal_cache:
+            if any(k[1] != day_of_year for k in self._seasonal_cache):
+                self._seasonal_cache.clear()
+            seasonal_data = self.daily_aggregator.get_seasonal_data(day_of_year, inverter_id, seasonal_years)
+            self._seasonal_cache[key] = self._extract_hourly_profile_from_daily(seasonal_data, 'pv')
+        return self._seasonal_cache[key]
+
     def _extract_hourly_profile_from_daily(self, daily_data: List[Dict], data_type: str) -> Dict[Tuple[int,int], float]:
         """
         Extract hourly profile from daily summary data.
@@ -165,3 +172,23 @@ class BiasLearner:
         weights = weights / (weights.sum() + 1e-9)
         kwh_by_hour = {h: float(pv_kwh_forecast * w) for h,w in zip(hours, weights)}
         return kwh_by_hour
+
+
+def _hour_shares(profile: Dict[Tuple[int,int], float]) -> Dict[int, float]:
+    """
+    Average shape over the days of a (day, hour) profile, as hour -> share summing to 1.
+    Days missing hours (the first and the current day of the data) only count when no
+    day is complete, since their shares crowd into the hours they have.
+    """
+    by_day: Dict[int, Dict[int, float]] = {}
+    for (day, hour), weight in profile.items():
+        by_day.setdefault(day, {})[hour] = max(0.0, weight)
+    days = [hours for hours in by_day.values() if len(hours) == 24] or list(by_day.values())
+    by_hour: Dict[int, float] = {}
+    for hours in days:
+        for hour, weight in hours.items():
+            by_hour[hour] = by_hour.get(hour, 0.0) + weight
+    total = sum(by_hour.values())
+    if total <= 0:
+        return {}
+    return {hour: weight / total for hour, weight in by_hour.items()}
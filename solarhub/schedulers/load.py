@@ -1,8 +1,12 @@
 # solarhub/schedulers/load.py
+import logging
 from typing import Dict, Tuple, List
 import pandas as pd
-import sqlite3
 from solarhub.daily_aggregator import DailyAggregator
+from solarhub.logging.read_pool import read_connection
+from solarhub.schedulers.profile_cache import get_profile_cache
+
+log = logging.getLogger(__name__)
 
 class LoadLearner:
     """
@@ -13,27 +17,37 @@ class LoadLearner:
         self.dblogger = logger
         self.tz = tz
         self.daily_aggregator = DailyAggregator(logger.path, tz)
+        self.profiles = get_profile_cache(logger.path, tz)
+        self._seasonal_cache: Dict[tuple, Dict[Tuple[int,int], float]] = {}
 
     def hourly_load_profile(self, inverter_id: str | None = None, days_back: int = 60) -> Dict[Tuple[int,int], float]:
         """
         Learn hourly load profile from recent data only.
+        Served from the incrementally updated profile sketches; falls back to a raw scan.
         Args:
             inverter_id: Inverter identifier (unused, kept for compatibility)
             days_back: Number of days of historical data to use (default: 60 days)
         """
-        con = sqlite3.connect(self.dblogger.path)
-        # Only load data from the last N days to avoid exponential slowdown
-        from solarhub.timezone_utils import now_configured
-        cutoff_date = (pd.Timestamp(now_configured()) - pd.Timedelta(days=days_back)).strftime('%Y-%m-%d %H:%M:%S')
-        query = """
-            SELECT ts, load_power_w 
-            FROM energy_samples 
-            WHERE ts >= ?
-            ORDER BY ts DESC
-            LIMIT 50000
-        """
-        df = pd.read_sql_query(query, con, params=[cutoff_date])
-        con.close()
+        try:
+            return self.profiles.load_profile(days_back)
+        except Exception as e:
+            log.warning(f"Cached load profile unavailable, scanning samples: {e}")
+            return self._hourly_load_profile_raw(days_back)
+
+    def _hourly_load_profile_raw(self, days_back: int = 60) -> Dict[Tuple[int,int], float]:
+        """Median load (kW) per (dow, hour) straight from the most recent energy_samples rows."""
+        with read_connection(self.dblogger.path) as con:
+            # Only load data from the last N days to avoid exponential slowdown
+            from solarhub.timezone_utils import now_configured
+            cutoff_date = (pd.Timestamp(now_configured()) - pd.Timedelta(days=days_back)).strftime('%Y-%m-%d %H:%M:%S')
+            query = """
+                SELECT ts, load_power_w 
+                FROM energy_samples 
+                WHERE ts >= ?
+                ORDER BY ts DESC
+                LIMIT 50000
+            """
+            df = pd.read_sql_query(query, con, params=[cutoff_date])
         if df.empty:
             return {}
         df['ts'] = pd.to_datetime(df['ts'], format='ISO8601', errors='coerce')
@@ -53,7 +67,8 @@ class LoadLearner:
                                   recent_days: int = 60, seasonal_years: int = 3) -> Dict[Tuple[int,int], float]:
         """
         Learn hourly load profile using hybrid approach:
-        - Recent data (last N days) for current patterns
+        - Recent data (last N days) for current patterns, from the profile sketches
+          (daily summaries only while the sketches hold no data)
         - Seasonal data (same day-of-year from previous years) for seasonal patterns
         
         Args:
@@ -63,43 +78,44 @@ class LoadLearner:
             seasonal_years: Number of years to look back for seasonal data
             
         Returns:
-            Dictionary mapping (day_of_week, hour) to load weights
+            Dictionary mapping (day_of_week, hour) to load in kW when recent sketches
+            exist, otherwise to load weights
         """
-        # Get recent data (last N days)
-        recent_data = self.daily_aggregator.get_recent_data(None, recent_days)
-        
-        # Get seasonal data (same day-of-year from previous years)
-        seasonal_data = self.daily_aggregator.get_seasonal_data(day_of_year, None, seasonal_years)
+        recent_kw = self.hourly_load_profile(None, recent_days)
+        recent = recent_kw
+        if not recent:
+            recent_data = self.daily_aggregator.get_recent_data(None, recent_days)
+            recent = self._extract_hourly_load_profile_from_daily(recent_data)
+        seasonal = self._seasonal_load_profile(day_of_year, seasonal_years)
         
-        # Combine both approaches
+        # Weight factors: 70% recent, 30% seasonal, each as a per-day-of-week shape
+        recent_shape = self._normalize_load_profile(recent)
+        seasonal_shape = self._normalize_load_profile(seasonal)
+        recent_weight = 0.7 if seasonal_shape else 1.0
+        seasonal_weight = 0.3 if recent_shape else 1.0
         combined_profile = {}
+        for key in set(recent_shape) | set(seasonal_shape):
+            combined_profile[key] = (recent_shape.get(key, 0.0) * recent_weight
+                                     + seasonal_shape.get(key, 0.0) * seasonal_weight)
+        combined_profile = self._normalize_load_profile(combined_profile)
+        if not recent_kw:
+            return combined_profile
         
-        # Weight factors
-        recent_weight = 0.7  # 70% weight to recent data
-        seasonal_weight = 0.3  # 30% weight to seasonal data
-        
-        # Process recent data
-        if recent_data:
-            recent_profile = self._extract_hourly_load_profile_from_daily(recent_data)
-            for (dow, hour), weight in recent_profile.items():
-                combined_profile[(dow, hour)] = weight * recent_weight
-        
-        # Process seasonal data
-        if seasonal_data:
-            seasonal_profile = self._extract_hourly_load_profile_from_daily(seasonal_data)
-            for (dow, hour), weight in seasonal_profile.items():
-                key = (dow, hour)
-                if key in combined_profile:
-                    combined_profile[key] += weight * seasonal_weight
-                else:
-                    combined_profile[key] = weight * seasonal_weight
-        
-        # If no data available, fall back to original method
-        if not combined_profile:
-            return self.hourly_load_profile(None, recent_days)
-        
-        # Normalize the combined profile
-        return self._normalize_load_profile(combined_profile)
+        # Scale each day of week back to the recent medians' daily load (kW per hour)
+        daily_kw: Dict[int, float] = {}
+        for (dow, _), kw in recent_kw.items():
+            daily_kw[dow] = daily_kw.get(dow, 0.0) + kw
+        return {(dow, hour): weight * daily_kw[dow]
+                for (dow, hour), weight in combined_profile.items() if dow in daily_kw}
+
+    def _seasonal_load_profile(self, day_of_year: int, seasonal_years: int) -> Dict[Tuple[int,int], float]:
+        """Seasonal profile from previous years' daily summaries; they do not change during the day."""
+        key = (day_of_year, seasonal_years)
+        if key not in self._seasonal_cache:
+            self._seasonal_cache.clear()
+            seasonal_data = self.daily_aggregator.get_seasonal_data(day_of_year, None, seasonal_years)
+            self._seasonal_cache[key] = self._extract_hourly_load_profile_from_daily(seasonal_data)
+        return self._seasonal_cache[key]
 
     def _extract_hourly_load_profile_from_daily(self, daily_data: List[Dict]) -> Dict[Tuple[int,int], float]:
         """
@@ -0,0 +1,453 @@
+"""
+Incrementally maintained hourly PV/load profiles for the learners.
+
+BiasLearner and LoadLearner used to read tens of thousands of raw
+``energy_samples`` rows and run a pandas groupby median on every call. This
+cache keeps one mergeable quantile sketch per (series, entity, day, hour),
+persisted in SQLite. New data is folded in incrementally, from the minute
+rollups when they are available (raw samples otherwise), and profiles are
+rebuilt only when a sketch changed, so a lookup from the scheduler tick is a
+dictionary hit. The shared cache refreshes on a background thread: the tick
+runs on the event loop, and the first refresh may scan weeks of raw samples,
+so lookups serve the profiles built so far until it finishes.
+"""
+import json
+import logging
+import math
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from solarhub.logging.epoch import epoch_ready
+
+log = logging.getLogger(__name__)
+
+SERIES_PV = "pv"
+SERIES_LOAD = "load"
+LOAD_ENTITY = "*"  # load profile mixes all inverters, as the raw query did
+
+_SERIES_COLUMNS = {SERIES_PV: "pv_power_w", SERIES_LOAD: "load_power_w"}
+
+# Relative accuracy of the quantile sketches (1%)
+SKETCH_ALPHA = 0.01
+_GAMMA = (1 + SKETCH_ALPHA) / (1 - SKETCH_ALPHA)
+_LN_GAMMA = math.log(_GAMMA)
+# Values below this (W) land in the zero bucket (night PV, idle load)
+_ZERO_THRESHOLD = 1.0
+
+# Minutes closer to "now" than this may still receive rollup deltas
+_SETTLE_S = 120
+
+# Days of sketches kept; the scheduler's learners ask for 60
+DEFAULT_MAX_DAYS = 60
+
+
+class QuantileSketch:
+    """
+    Log-bucketed quantile sketch (DDSketch style): values within 1% share a
+    bucket, sketches merge by adding bucket counts, so windows of days can be
+    combined without keeping raw samples.
+    """
+    __slots__ = ("bins", "zero", "count")
+
+    def __init__(self):
+        self.bins: Dict[int, int] = {}
+        self.zero = 0
+        self.count = 0
+
+    @staticmethod
+    def key_for(value: float) -> Optional[int]:
+        if value < _ZERO_THRESHOLD:
+            return None
+        return int(math.ceil(math.log(value) / _LN_GAMMA))
+
+    def add(self, value: float, weight: int = 1):
+        self.add_key(self.key_for(value), weight)
+
+    def add_key(self, key: Optional[int], weight: int = 1):
+        if weight <= 0:
+            return
+        if key is None:
+            self.zero += weight
+        else:
+            self.bins[key] = self.bins.get(key, 0) + weight
+        self.count += weight
+
+    def merge(self, other: "QuantileSketch"):
+        for k, c in other.bins.items():
+            self.bins[k] = self.bins.get(k, 0) + c
+        self.zero += other.zero
+        self.count += other.count
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero
+        if seen > rank:
+            return 0.0
+        for k in sorted(self.bins):
+            seen += self.bins[k]
+            if seen > rank:
+                return 2.0 * _GAMMA ** k / (_GAMMA + 1.0)
+        return 2.0 * _GAMMA ** max(self.bins) / (_GAMMA + 1.0)
+
+    def to_json(self) -> str:
+        return json.dumps({"z": self.zero, "b": self.bins}, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, raw: str) -> "QuantileSketch":
+        data = json.loads(raw)
+        sk = cls()
+        sk.zero = int(data.get("z", 0))
+        sk.bins = {int(k): int(v) for k, v in data.get("b", {}).items()}
+        sk.count = sk.zero + sum(sk.bins.values())
+        return sk
+
+
+_SketchKey = Tuple[str, str, str, int]  # (series, entity_id, day 'YYYY-MM-DD', hour)
+
+
+class LearnerProfileCache:
+    """
+    Per-(day, hour) median sketches for PV (per inverter) and load (site),
+    refreshed incrementally and persisted to the ``learner_sketches`` table.
+    Only the last ``max_days`` days are kept; longer ``days_back`` requests are
+    served from those days and logged. With ``background`` a lookup never waits
+    for a refresh: it starts one on a thread and returns the last built profile.
+    """
+
+    def __init__(self, db_path: str, tz: str = "Asia/Karachi", max_days: int = DEFAULT_MAX_DAYS,
+                 refresh_interval_s: float = 300.0, clock: Optional[Callable[[], datetime]] = None,
+                 background: bool = False):
+        self.db_path = db_path
+        self.tz = tz
+        self.max_days = max_days
+        self.refresh_interval_s = refresh_interval_s
+        self.background = background
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+        # Returns the current time in ``tz`` (injectable for tests)
+        self.clock = clock
+        self._truncated_windows: set = set()
+        self._lock = threading.RLock()
+        self._sketches: Dict[_SketchKey, QuantileSketch] = {}
+        self._loaded = False
+        self._version = 0
+        self._profiles: Dict[tuple, Tuple[int, str, Dict[Tuple[int, int], float]]] = {}
+        self._last_refresh = 0.0
+        # Statistics
+        self.refreshes = 0
+        self.last_refresh_ms = 0.0
+        self.last_refresh_rows = 0
+        self.last_source = None
+
+    # ---------- Profiles ----------
+    def pv_profile(self, inverter_id: str, days_back: int = DEFAULT_MAX_DAYS) -> Dict[Tuple[int, int], float]:
+        """{(day_of_year, hour): share of that day's PV} from per-hour medians."""
+        days_back = self._window(days_back)
+
+        def build(today):
+            medians = self._medians(SERIES_PV, inverter_id, days_back, today)
+            by_day: Dict[str, Dict[int, float]] = {}
+            for (day, hour), v in medians.items():
+                by_day.setdefault(day, {})[hour] = v
+            out: Dict[Tuple[int, int], float] = {}
+            for day, hours in by_day.items():
+                total = sum(hours.values()) + 1e-6
+                doy = pd.Timestamp(day).dayofyear
+                for hour, v in hours.items():
+                    out[(doy, hour)] = v / total
+            return out
+        return self._profile((SERIES_PV, inverter_id, days_back), build)
+
+    def load_profile(self, days_back: int = DEFAULT_MAX_DAYS) -> Dict[Tuple[int, int], float]:
+        """{(day_of_week, hour): median load kW} over the last ``days_back`` days."""
+        days_back = self._window(days_back)
+
+        def build(today):
+            merged: Dict[Tuple[int, int], QuantileSketch] = {}
+            cutoff = (today - timedelta(days=days_back)).strftime("%Y-%m-%d")
+            for (series, entity, day, hour), sk in self._sketches.items():
+                if series != SERIES_LOAD or entity != LOAD_ENTITY or day < cutoff:
+                    continue
+                key = (pd.Timestamp(day).dayofweek, hour)
+                merged.setdefault(key, QuantileSketch()).merge(sk)
+            out = {}
+            for key, sk in merged.items():
+                median = sk.quantile(0.5)
+                if median is not None:
+                    out[key] = median / 1000.0
+            return out
+        return self._profile((SERIES_LOAD, LOAD_ENTITY, days_back), build)
+
+    def _window(self, days_back: int) -> int:
+        """Clamp a lookup window to the days the cache keeps (logged once per window)."""
+        if days_back <= self.max_days:
+            return days_back
+        if days_back not in self._truncated_windows:
+            self._truncated_windows.add(days_back)
+            log.warning(f"Learner profile window of {days_back} days exceeds the {self.max_days} days "
+                        f"kept by the profile cache; using the last {self.max_days} days")
+        return self.max_days
+
+    def _profile(self, cache_key: tuple, build) -> Dict[Tuple[int, int], float]:
+        if self.background:
+            self.refresh_in_background()
+        else:
+            self.refresh()
+        today = self._now()
+        day = today.strftime("%Y-%m-%d")
+        # A refresh holds the lock while it reads the database: serve the last profile meanwhile
+        if not self._lock.acquire(blocking=not self.background):
+            cached = self._profiles.get(cache_key)
+            return cached[2] if cached else {}
+        try:
+            cached = self._profiles.get(cache_key)
+            if cached and cached[0] == self._version and cached[1] == day:
+                return cached[2]
+            prof = build(today)
+            self._profiles[cache_key] = (self._version, day, prof)
+            return prof
+        finally:
+            self._lock.release()
+
+    def _medians(self, series: str, entity_id: str, days_back: int,
+                 today: datetime) -> Dict[Tuple[str, int], float]:
+        cutoff = (today - timedelta(days=days_back)).strftime("%Y-%m-%d")
+        out = {}
+        for (s, entity, day, hour), sk in self._sketches.items():
+            if s == series and entity == entity_id and day >= cutoff:
+                median = sk.quantile(0.5)
+                if median is not None:
+                    out[(day, hour)] = median
+        return out
+
+    def _now(self) -> datetime:
+        if self.clock is not None:
+            return self.clock()
+        return pd.Timestamp.now(tz=self.tz).to_pydatetime()
+
+    # ---------- Refresh ----------
+    def _refresh_due(self) -> bool:
+        return not self._loaded or time.monotonic() - self._last_refresh >= self.refresh_interval_s
+
+    def refresh_in_background(self) -> bool:
+        """Start a refresh on a thread if one is due and none is running. Returns True if started."""
+        with self._thread_lock:
+            if not self._refresh_due() or (self._refresh_thread is not None and self._refresh_thread.is_alive()):
+                return False
+            self._refresh_thread = threading.Thread(target=self.refresh, name="learner-profiles", daemon=True)
+            self._refresh_thread.start()
+        return True
+
+    def refresh(self, force: bool = False) -> int:
+        """Fold new data into the sketches (throttled). Returns the number of rows consumed."""
+        now = time.monotonic()
+        if not force and not self._refresh_due():
+            return 0
+        with self._lock:
+            self._last_refresh = now
+            start = time.perf_counter()
+            con = sqlite3.connect(self.db_path)
+            try:
+                self._ensure_tables(con)
+                if not self._loaded:
+                    self._load(con)
+                rows, touched = self._ingest(con)
+                if touched:
+                    self._persist(con, touched)
+                    self._version += 1
+                self._prune(con)
+                con.commit()
+            except sqlite3.Error as e:
+                log.warning(f"Learner profile refresh failed: {e}")
+                return 0
+            finally:
+                con.close()
+            self.refreshes += 1
+            self.last_refresh_rows = rows
+            self.last_refresh_ms = (time.perf_counter() - start) * 1000.0
+            if rows:
+                log.debug(f"Learner profiles: folded {rows} rows from {self.last_source} "
+                          f"in {self.last_refresh_ms:.1f}ms")
+            return rows
+
+    @staticmethod
+    def _ensure_tables(con: sqlite3.Connection):
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS learner_sketches (
+                series TEXT NOT NULL,
+                entity_id TEXT NOT NULL,
+                day TEXT NOT NULL,
+                hour INTEGER NOT NULL,
+                sketch TEXT NOT NULL,
+                PRIMARY KEY (series, entity_id, day, hour)
+            )
+        """)
+        con.execute("CREATE TABLE IF NOT EXISTS learner_state (key TEXT PRIMARY KEY, value TEXT)")
+
+    def _load(self, con: sqlite3.Connection):
+        cutoff = (self._now() - timedelta(days=self.max_days + 1)).strftime("%Y-%m-%d")
+        for series, entity, day, hour, raw in con.execute(
+                "SELECT series, entity_id, day, hour, sketch FROM learner_sketches WHERE day >= ?", (cutoff,)):
+            self._sketches[(series, entity, day, int(hour))] = QuantileSketch.from_json(raw)
+        self._loaded = True
+        self._version += 1
+        log.info(f"Loaded {len(self._sketches)} learner profile sketches")
+
+    def _watermark(self, con: sqlite3.Connection) -> Optional[int]:
+        row = con.execute("SELECT value FROM learner_state WHERE key = 'watermark'").fetchone()
+        return int(row[0]) if row else None
+
+    def _set_watermark(self, con: sqlite3.Connection, epoch: int):
+        con.execute("INSERT INTO learner_state(key, value) VALUES('watermark', ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (str(epoch),))
+
+    def _ingest(self, con: sqlite3.Connection) -> Tuple[int, set]:
+        """Consume closed minutes after the watermark, from rollups if they cover them."""
+        now_epoch = int(self._now().timestamp())
+        until = now_epoch - _SETTLE_S
+        until -= until % 60
+        wm = self._watermark(con)
+        if wm is None:
+            wm = int((self._now() - timedelta(days=self.max_days)).timestamp())
+        if wm >= until:
+            return 0, set()
+
+        rollups_since = _rollups_started_at(con)
+        if rollups_since is not None and rollups_since <= wm:
+            self.last_source = "rollups"
+            rows, touched = self._ingest_rollups(con, wm, until)
+        else:
+            self.last_source = "energy_samples"
+            rows, touched = self._ingest_samples(con, wm, until)
+        self._set_watermark(con, until)
+        return rows, touched
+
+    def _ingest_rollups(self, con: sqlite3.Connection, start: int, end: int) -> Tuple[int, set]:
+        df = pd.read_sql_query("""
+            SELECT entity_id, metric, bucket_ts, sample_count, value_sum
+            FROM rollup_minute
+            WHERE scope = 'inverter' AND metric IN ('pv_power_w', 'load_power_w')
+              AND bucket_ts >= ? AND bucket_ts < ? AND sample_count > 0
+        """, con, params=[start, end])
+        if df.empty:
+            return 0, set()
+        df["ts"] = pd.to_datetime(df["bucket_ts"], unit="s", utc=True).dt.tz_convert(self.tz)
+        df["value"] = df["value_sum"] / df["sample_count"]
+        touched = set()
+        for series, column in _SERIES_COLUMNS.items():
+            part = df[df["metric"] == column]
+            touched |= self._add_frame(series, part, weight_col="sample_count")
+        return len(df), touched
+
+    def _ingest_samples(self, con: sqlite3.Connection, start: int, end: int) -> Tuple[int, set]:
+        epoch = epoch_ready(con)
+        if epoch:
+            column, params = "ts_ms", [start * 1000, end * 1000]
+        else:
+            column, params = "ts", [pd.Timestamp(t, unit="s", tz="UTC").tz_convert(self.tz).isoformat(sep=" ")
+                                    for t in (start, end)]
+        rows = 0
+        touched = set()
+        for chunk in pd.read_sql_query(f"""
+                SELECT {column} AS ts, inverter_id, pv_power_w, load_power_w
+                FROM energy_samples
+                WHERE {column} >= ? AND {column} < ?
+            """, con, params=params, chunksize=100000):
+            rows += len(chunk)
+            if epoch:
+                chunk["ts"] = pd.to_datetime(chunk["ts"], unit="ms", utc=True)
+            else:
+                chunk["ts"] = pd.to_datetime(chunk["ts"], format="ISO8601", errors="coerce", utc=True)
+            chunk = chunk.dropna(subset=["ts"])
+            chunk["ts"] = chunk["ts"].dt.tz_convert(self.tz)
+            chunk = chunk.rename(columns={"inverter_id": "entity_id"})
+            for series, column in _SERIES_COLUMNS.items():
+                part = chunk.rename(columns={column: "value"})
+                touched |= self._add_frame(series, part)
+        return rows, touched
+
+    def _add_frame(self, series: str, df: pd.DataFrame, weight_col: Optional[str] = None) -> set:
+        """Vectorized insert: bucket keys computed with numpy, counted per (entity, day, hour, key)."""
+        df = df[df["value"].notna()]
+        if df.empty:
+            return set()
+        values = df["value"].to_numpy(dtype=float)
+        keys = np.full(len(values), np.nan)
+        pos = values >= _ZERO_THRESHOLD
+        keys[pos] = np.ceil(np.log(values[pos]) / _LN_GAMMA)
+        frame = pd.DataFrame({
+            "entity": LOAD_ENTITY if series == SERIES_LOAD else df["entity_id"].to_numpy(),
+            "day": df["ts"].dt.strftime("%Y-%m-%d").to_numpy(),
+            "hour": df["ts"].dt.hour.to_numpy(),
+            "key": np.where(np.isnan(keys), -(1 << 30), keys).astype(np.int64),
+            "w": df[weight_col].to_numpy(dtype=np.int64) if weight_col else 1,
+        })
+        counts = frame.groupby(["entity", "day", "hour", "key"], sort=False)["w"].sum()
+        touched = set()
+        for (entity, day, hour, key), w in counts.items():
+            sk_key = (series, str(entity), str(day), int(hour))
+            sk = self._sketches.get(sk_key)
+            if sk is None:
+                sk = self._sketches[sk_key] = QuantileSketch()
+            sk.add_key(None if key == -(1 << 30) else int(key), int(w))
+            touched.add(sk_key)
+        return touched
+
+    def _persist(self, con: sqlite3.Connection, touched: Iterable[_SketchKey]):
+        con.executemany("""
+            INSERT INTO learner_sketches(series, entity_id, day, hour, sketch) VALUES(?,?,?,?,?)
+            ON CONFLICT(series, entity_id, day, hour) DO UPDATE SET sketch = excluded.sketch
+        """, [(s, e, d, h, self._sketches[(s, e, d, h)].to_json()) for (s, e, d, h) in touched])
+
+    def _prune(self, con: sqlite3.Connection):
+        cutoff = (self._now() - timedelta(days=self.max_days + 1)).strftime("%Y-%m-%d")
+        stale = [k for k in self._sketches if k[2] < cutoff]
+        if not stale:
+            return
+        for k in stale:
+            del self._sketches[k]
+        con.execute("DELETE FROM learner_sketches WHERE day < ?", (cutoff,))
+        self._version += 1
+
+    def get_statistics(self) -> Dict[str, object]:
+        """Get profile cache statistics."""
+        return {
+            "sketches": len(self._sketches),
+            "refreshes": self.refreshes,
+            "last_refresh_ms": round(self.last_refresh_ms, 2),
+            "last_refresh_rows": self.last_refresh_rows,
+            "last_source": self.last_source,
+        }
+
+
+def _rollups_started_at(con: sqlite3.Connection) -> Optional[int]:
+    try:
+        row = con.execute("SELECT value FROM rollup_meta WHERE key = 'started_at'").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return int(row[0]) if row else None
+
+
+_caches: Dict[Tuple[str, str], LearnerProfileCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_profile_cache(db_path: str, tz: str, max_days: int = DEFAULT_MAX_DAYS) -> LearnerProfileCache:
+    """Profile cache shared by the learners of one database, keeping at least ``max_days`` days."""
+    with _caches_lock:
+        cache = _caches.get((db_path, tz))
+        if cache is None:
+            cache = _caches[(db_path, tz)] = LearnerProfileCache(db_path, tz, max_days=max_days, background=True)
+        elif max_days > cache.max_days:
+            # Days before the watermark are not read again: the longer window fills in going forward
+            log.info(f"Learner profile cache window raised from {cache.max_days} to {max_days} days")
+            cache.max_days = max_days
+        return cache
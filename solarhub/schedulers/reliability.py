@@ -9,13 +9,14 @@ continuous power availability through intelligent risk management and conservati
 import logging
 import json
 import math
-import sqlite3
 from typing import Dict, Any, List, Tuple, Optional
 from dataclasses import dataclass
 from datetime import datetime, timezone, timedelta
 from pathlib import Path
 import pytz
 from solarhub.timezone_utils import now_configured
+from solarhub.logging.read_pool import read_connection
+from solarhub.logging.epoch import epoch_ready, to_ms
 
 log = logging.getLogger(__name__)
 
@@ -156,16 +157,16 @@ class ReliabilityManager:
             # Look for periods where grid_power_w was consistently low (< 10W) for > 5 minutes
             query = """
             SELECT 
-                ts,
+                {ts},
                 grid_power_w,
                 inverter_mode,
                 battery_voltage_v,
                 battery_current_a,
                 inverter_temp_c
             FROM energy_samples 
-            WHERE ts BETWEEN ? AND ?
+            WHERE {ts} BETWEEN ? AND ?
             AND grid_power_w < 10
-            ORDER BY ts
+            ORDER BY {ts}
             """
             
             # Convert to Pakistan timezone for query
@@ -173,12 +174,16 @@ class ReliabilityManager:
             start_local = start_time.astimezone(pakistan_tz)
             end_local = end_time.astimezone(pakistan_tz)
             
-            # Execute query
-            conn = sqlite3.connect(self.db_logger.path)
-            cursor = conn.cursor()
-            cursor.execute(query, (start_local.isoformat(), end_local.isoformat()))
-            rows = cursor.fetchall()
-            conn.close()
+            # Execute query: integer ts_ms range once every row has it, else the text ts
+            with read_connection(self.db_logger.path) as conn:
+                cursor = conn.cursor()
+                if epoch_ready(cursor):
+                    cursor.execute(query.format(ts="ts_ms"), (to_ms(start_local), to_ms(end_local)))
+                    rows = [(datetime.fromtimestamp(ts_ms / 1000, pakistan_tz),) + tuple(rest)
+                            for ts_ms, *rest in cursor.fetchall()]
+                else:
+                    cursor.execute(query.format(ts="ts"), (start_local.isoformat(sep=' '), end_local.isoformat(sep=' ')))
+                    rows = [(datetime.fromisoformat(ts),) + tuple(rest) for ts, *rest in cursor.fetchall()]
             
             if not rows:
                 log.info("No grid outage events found in telemetry data")
@@ -190,8 +195,7 @@ class ReliabilityManager:
             outage_readings = []
             
             for row in rows:
-                timestamp_str, grid_power, inverter_mode, batt_voltage, batt_current, temp = row
-                timestamp = datetime.fromisoformat(timestamp_str)
+                timestamp, grid_power, inverter_mode, batt_voltage, batt_current, temp = row
                 
                 if current_outage is None:
                     # Start new outage
@@ -333,11 +337,10 @@ class ReliabilityManager:
             end_local = end_time.astimezone(pakistan_tz)
             
             # Execute query
-            conn = sqlite3.connect(self.db_logger.path)
-            cursor = conn.cursor()
-            cursor.execute(query, (start_local.isoformat(), end_local.isoformat()))
-            rows = cursor.fetchall()
-            conn.close()
+            with read_connection(self.db_logger.path) as conn:
+                cursor = conn.cursor()
+                cursor.execute(query, (start_local.isoformat(), end_local.isoformat()))
+                rows = cursor.fetchall()
             
             if not rows:
                 return mode_events
@@ -656,11 +659,10 @@ class ReliabilityManager:
             ORDER BY ts
             """
             
-            conn = sqlite3.connect(self.db_logger.path)
-            cursor = conn.cursor()
-            cursor.execute(query)
-            rows = cursor.fetchall()
-            conn.close()
+            with read_connection(self.db_logger.path) as conn:
+                cursor = conn.cursor()
+                cursor.execute(query)
+                rows = cursor.fetchall()
             
             if not rows:
                 return 1.0  # Default if no data
@@ -744,11 +746,10 @@ class ReliabilityManager:
             ORDER BY ts
             """
             
-            conn = sqlite3.connect(self.db_logger.path)
-            cursor = conn.cursor()
-            cursor.execute(query)
-            rows = cursor.fetchall()
-            conn.close()
+            with read_connection(self.db_logger.path) as conn:
+                cursor = conn.cursor()
+                cursor.execute(query)
+                rows = cursor.fetchall()
             
             if not rows:
                 return 1.5  # Default if no data
@@ -798,11 +799,10 @@ class ReliabilityManager:
             ORDER BY ts
             """
             
-            conn = sqlite3.connect(self.db_logger.path)
-            cursor = conn.cursor()
-            cursor.execute(query)
-            rows = cursor.fetchall()
-            conn.close()
+            with read_connection(self.db_logger.path) as conn:
+                cursor = conn.cursor()
+                cursor.execute(query)
+                rows = cursor.fetchall()
             
             if not rows:
                 return 1.0  # Default if no data
@@ -17,6 +17,8 @@ from solarhub.forecast.openweather_simple import OpenWeatherSimple
 from solarhub.forecast.simple_weather import SimpleWeather
 from solarhub.api_key_manager import get_weather_api_key
 from solarhub.forecast.solar import PvlibSolarEstimator
+from solarhub.forecast.clearsky import configure_clearsky_cache
+from solarhub.adapters.device_actor import Priority
 from solarhub.schedulers.bias import BiasLearner
 from solarhub.schedulers.load import LoadLearner
 from solarhub.logging.logger import DataLogger
@@ -760,7 +762,8 @@ class SmartScheduler:
         self._last_presunset_assurance_warning = 0.0
         self._warning_cooldown_seconds = 300  # 5 minutes
 
-        # PV estimators per inverter/array
+        # PV estimators per inverter/array (clear-sky profiles come from the shared cache)
+        configure_clearsky_cache(getattr(fc, 'clearsky_cache_dir', None))
         # Filter inverters by array_id if scheduler is scoped to an array
         self.inv_estimators: Dict[str, list[PvlibSolarEstimator]] = {}
         array_inverters = [rt for rt in hub.inverters if not array_id or getattr(rt.cfg, 'array_id', None) == array_id]
@@ -1371,6 +1374,37 @@ class SmartScheduler:
         }
 
 
+    async def _execute_inverter_commands(self, rt, cmds: List[Dict[str, Any]]) -> List[Any]:
+        """
+        Run one inverter's commands for this tick on its device actor. Adapters with
+        handle_commands push them as one coalesced write plan (in register address order,
+        without the writes of commands that failed); others get them one by one.
+        Returns a result (or the exception raised) per command.
+        """
+        if not cmds:
+            return []
+        actor = getattr(rt, 'actor', None)
+
+        async def run(fn, *args):
+            if actor is not None:
+                return await actor.call(Priority.CONTROL, fn, *args)
+            return await fn(*args)
+
+        if hasattr(rt.adapter, 'handle_commands'):
+            log.info(f"Executing {len(cmds)} commands for {rt.cfg.id} as one write plan")
+            try:
+                return await run(rt.adapter.handle_commands, cmds)
+            except Exception as e:
+                return [e] * len(cmds)
+        results: List[Any] = []
+        for i, c in enumerate(cmds, 1):
+            log.info(f"Executing command {i}/{len(cmds)} for {rt.cfg.id}: {c.get('action', 'unknown')}")
+            try:
+                results.append(await run(rt.adapter.handle_command, c))
+            except Exception as e:
+                results.append(e)
+        return results
+
     async def tick(self):
         from solarhub.timezone_utils import now_configured
         if not self.hub.cfg.smart.policy.enabled:
@@ -1499,7 +1533,8 @@ class SmartScheduler:
                 today_kwh = await est.estimate_daily_pv_kwh(
                     factors["today"], enhanced_weather=today_weather)
                 tomorrow_kwh = await est.estimate_daily_pv_kwh(
-                    factors["tomorrow"], enhanced_weather=tomorrow_weather)
+                    factors["tomorrow"], enhanced_weather=tomorrow_weather,
+                    day=(tznow + pd.Timedelta(days=1)).date())
                 
                 log.info(f"Estimator {i+1} for {rt.cfg.id}: Today={today_kwh:.2f}kWh, Tomorrow={tomorrow_kwh:.2f}kWh (factor: {factors['today']:.3f}/{factors['tomorrow']:.3f})")
                 
@@ -1587,7 +1622,7 @@ class SmartScheduler:
                     prof = self._bias_cache[cache_key]
                     log.info(f"Using cached bias profile for {rt.cfg.id}")
                 # normalize profile to weights
-                s = sum(max(0.0, prof.get((tznow.dayofweek, h), 0.0)) for h in hours)
+                s = sum(max(0.0, prof.get((tznow.dayofyear, h), 0.0)) for h in hours)
                 if s <= 0:
                     log.warning(f"No valid bias data for {rt.cfg.id}, using cosine fallback")
                     # last-resort: gentle cosine-like bump across mid-day
@@ -1595,7 +1630,7 @@ class SmartScheduler:
                     ss = sum(shape.values())
                     shape = {h: (v / ss if ss > 0 else 0.0) for h, v in shape.items()}
                 else:
-                    shape = {h: max(0.0, prof.get((tznow.dayofweek, h), 0.0)) / s for h in hours}
+                    shape = {h: max(0.0, prof.get((tznow.dayofyear, h), 0.0)) / s for h in hours}
             else:
                 log.info(f"Using physics-based shape for {rt.cfg.id}")
 
@@ -3090,22 +3125,16 @@ class SmartScheduler:
             canonical_cmds = list(canonical.values())
             log.info(f"Executing {len(canonical_cmds)} commands for inverter {rt.cfg.id}")
 
-            for i, c in enumerate(canonical_cmds, 1):
-                log.info(f"Executing command {i}/{len(canonical_cmds)} for {rt.cfg.id}: {c.get('action', 'unknown')}")
-                try:
-                    result = await rt.adapter.handle_command(c)
-                    # Check if command actually succeeded
-                    if result and result.get("ok", False):
-                        log.info(f"Command {i} executed successfully for {rt.cfg.id}")
-                    else:
-                        reason = result.get("reason", "Unknown error") if result else "No response"
-                        log.warning(f"Command {i} failed for {rt.cfg.id}: {reason}")
-                        log.warning(f"Failed command was: {c}")
-                    # Add small delay between commands to avoid Modbus communication issues
-                    import asyncio
-                    await asyncio.sleep(0.2)  # 200ms delay between commands
-                except Exception as e:
-                    log.error(f"Command {i} exception for {rt.cfg.id}: {e}", exc_info=True)
+            results = await self._execute_inverter_commands(rt, canonical_cmds)
+            for i, (c, result) in enumerate(zip(canonical_cmds, results), 1):
+                if isinstance(result, Exception):
+                    log.error(f"Command {i} exception for {rt.cfg.id}: {result}", exc_info=result)
+                elif result and result.get("ok", False):
+                    log.info(f"Command {i} executed successfully for {rt.cfg.id}: {c.get('action', 'unknown')}")
+                else:
+                    reason = result.get("reason", "Unknown error") if result else "No response"
+                    log.warning(f"Command {i} failed for {rt.cfg.id}: {reason}")
+                    log.warning(f"Failed command was: {c}")
                 # Publish what we tried
                 self.hub.mqtt.pub(f"{self.hub.cfg.mqtt.base_topic}/{rt.cfg.id}/smart_cmd",
                                   {"ts": now_iso(), **c})
@@ -0,0 +1,140 @@
+"""
+Per-poll-cycle cache of serialized "now" API responses.
+
+The "now" endpoints rebuild telemetry objects, re-run the array aggregation
+and walk the hierarchy on every request, although their inputs only change
+once per polling cycle. ``SolarApp.run`` bumps the cache generation after each
+cycle; until then every request for the same endpoint and query is answered
+with the JSON body (and ETag) built by the first request of the cycle.
+"""
+import hashlib
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from solarhub.json_codec import dumps_bytes
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """A serialized response body for one cache generation."""
+    body: bytes
+    etag: str
+    generation: int
+    built_at: float
+
+
+def serialize_json(content: Any) -> bytes:
+    """Serialize a handler's return value in one pass (compact UTF-8, like Starlette's JSONResponse)."""
+    return dumps_bytes(content)
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag derived from the body, so unchanged data stays 304 across generations."""
+    return '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """True if an If-None-Match header value matches ``etag`` (weak comparison)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return any((t[2:] if t.startswith("W/") else t) == etag for t in tags)
+
+
+class SnapshotCache:
+    """
+    Thread-safe response cache keyed by (endpoint, query) and invalidated by
+    a poll-cycle generation counter.
+
+    ``max_age_s`` bounds how long an entry survives if the polling loop stalls
+    (suspended polling, reconnects), so responses never go stale indefinitely.
+    """
+
+    def __init__(self, max_age_s: float = 30.0, max_entries: int = 256):
+        self.max_age_s = max_age_s
+        self.max_entries = max_entries
+        self._generation = 0
+        self._entries: Dict[Hashable, Snapshot] = {}
+        self._lock = threading.Lock()
+        self._build_locks: Dict[Hashable, threading.Lock] = {}
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.uncacheable = 0
+        self.build_time_s = 0.0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def bump(self) -> int:
+        """Start a new generation (call once per completed poll cycle)."""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            return self._generation
+
+    def _fresh(self, snap: Optional[Snapshot]) -> bool:
+        return (snap is not None and snap.generation == self._generation
+                and time.monotonic() - snap.built_at < self.max_age_s)
+
+    def get(self, key: Hashable, build: Callable[[], Any],
+            cacheable: Callable[[Any], bool] = lambda content: True) -> Snapshot:
+        """
+        Return the snapshot for ``key``, building it with ``build()`` at most once
+        per generation. Results rejected by ``cacheable`` are served but not stored.
+        """
+        snap = self._entries.get(key)
+        if self._fresh(snap):
+            self.hits += 1
+            return snap
+        with self._lock:
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+        # Concurrent requests for the same key wait for a single build
+        with build_lock:
+            snap = self._entries.get(key)
+            if self._fresh(snap):
+                self.hits += 1
+                return snap
+            generation = self._generation
+            start = time.perf_counter()
+            content = build()
+            body = serialize_json(content)
+            self.build_time_s += time.perf_counter() - start
+            snap = Snapshot(body=body, etag=make_etag(body), generation=generation,
+                            built_at=time.monotonic())
+            if not cacheable(content):
+                self.uncacheable += 1
+                return snap
+            self.misses += 1
+            with self._lock:
+                if generation == self._generation:
+                    if key not in self._entries and len(self._entries) >= self.max_entries:
+                        self._entries.pop(next(iter(self._entries)))
+                    self._entries[key] = snap
+                if len(self._build_locks) > self.max_entries * 2:
+                    self._build_locks = {k: v for k, v in self._build_locks.items() if k in self._entries}
+            return snap
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        builds = self.misses + self.uncacheable
+        requests = self.hits + builds
+        return {
+            "generation": self._generation,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "uncacheable": self.uncacheable,
+            "not_modified": self.not_modified,
+            "hit_rate": round(self.hits / requests, 3) if requests else 0.0,
+            "avg_build_ms": round(self.build_time_s / builds * 1000.0, 3) if builds else 0.0,
+        }
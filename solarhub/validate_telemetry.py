@@ -72,7 +72,8 @@ class TelemetryValidator:
             "energy_samples",  # Inverter telemetry
             "battery_bank_samples",  # Battery pack telemetry
             "battery_unit_samples",  # Battery unit (individual battery) telemetry
-            "battery_cell_samples",  # Battery cell telemetry
+            "battery_cell_samples",  # Battery cell telemetry (legacy, one row per cell)
+            "battery_cell_frames",  # Battery cell telemetry (packed, one row per unit)
             "meter_samples",  # Meter telemetry
             "battery_cells",  # Battery cell hierarchy definitions
             "hourly_energy",  # Aggregated hourly energy
@@ -403,7 +404,7 @@ class TelemetryValidator:
             self.cur.execute("SELECT DISTINCT pack_id FROM battery_packs")
             expected_packs = [row[0] for row in self.cur.fetchall()]
             
-            # Check battery_cell_samples table - handle encoding errors gracefully
+            # Check battery_cell_frames table - handle encoding errors gracefully
             packs_with_cell_data = []
             corrupted_count = 0
             
@@ -411,14 +412,14 @@ class TelemetryValidator:
                 # Try to get distinct bank_ids, handling encoding errors
                 # Use rowid-based approach to handle encoding errors gracefully
                 try:
-                    self.cur.execute("SELECT DISTINCT bank_id FROM battery_cell_samples")
+                    self.cur.execute("SELECT DISTINCT bank_id FROM battery_cell_frames")
                     rows = self.cur.fetchall()
                 except sqlite3.OperationalError as e:
                     if "Could not decode to UTF-8" in str(e):
                         # If DISTINCT query fails due to encoding, use rowid-based approach
                         log.debug("DISTINCT query failed due to encoding, using rowid-based approach")
                         # Get max rowid to know how many rows to check
-                        self.cur.execute("SELECT MAX(rowid) FROM battery_cell_samples")
+                        self.cur.execute("SELECT MAX(rowid) FROM battery_cell_frames")
                         max_rowid_result = self.cur.fetchone()
                         max_rowid = max_rowid_result[0] if max_rowid_result and max_rowid_result[0] else 0
                         
@@ -427,7 +428,7 @@ class TelemetryValidator:
                         rows = []
                         for rowid in range(1, min(max_rowid + 1, 100000)):  # Limit to prevent infinite loops
                             try:
-                                self.cur.execute("SELECT bank_id FROM battery_cell_samples WHERE rowid = ?", (rowid,))
+                                self.cur.execute("SELECT bank_id FROM battery_cell_frames WHERE rowid = ?", (rowid,))
                                 row = self.cur.fetchone()
                                 if row:
                                     bank_id = row[0]
@@ -464,7 +465,7 @@ class TelemetryValidator:
                 log.warning(f"Could not query distinct bank_ids: {e}")
                 # Try to count total rows and estimate
                 try:
-                    self.cur.execute("SELECT COUNT(*) FROM battery_cell_samples")
+                    self.cur.execute("SELECT COUNT(*) FROM battery_cell_frames")
                     total_count = self.cur.fetchone()[0]
                     return {
                         "status": "error",
@@ -474,7 +475,7 @@ class TelemetryValidator:
                 except:
                     return {
                         "status": "error",
-                        "error": f"Could not read battery_cell_samples table: {e}",
+                        "error": f"Could not read battery_cell_frames table: {e}",
                     }
             
             missing_packs = [p for p in expected_packs if p not in packs_with_cell_data]
@@ -485,7 +486,7 @@ class TelemetryValidator:
             for pack_id in expected_packs:
                 try:
                     self.cur.execute(
-                        "SELECT COUNT(*), MAX(ts) FROM battery_cell_samples WHERE bank_id = ?",
+                        "SELECT COALESCE(SUM(cell_count), 0), MAX(ts) FROM battery_cell_frames WHERE bank_id = ?",
                         (pack_id,)
                     )
                     result = self.cur.fetchone()
@@ -556,7 +557,7 @@ class TelemetryValidator:
             hierarchy_status["battery_packs"]["with_bank_data"] = self.cur.fetchone()[0]
             self.cur.execute("SELECT COUNT(DISTINCT bank_id) FROM battery_unit_samples")
             hierarchy_status["battery_packs"]["with_unit_data"] = self.cur.fetchone()[0]
-            self.cur.execute("SELECT COUNT(DISTINCT bank_id) FROM battery_cell_samples")
+            self.cur.execute("SELECT COUNT(DISTINCT bank_id) FROM battery_cell_frames")
             hierarchy_status["battery_packs"]["with_cell_data"] = self.cur.fetchone()[0]
             
             # Check batteries (individual battery units)
@@ -634,7 +635,7 @@ class TelemetryValidator:
         # Check recent battery cell samples
         try:
             self.cur.execute(
-                "SELECT COUNT(*) FROM battery_cell_samples WHERE ts >= ?",
+                "SELECT COALESCE(SUM(cell_count), 0) FROM battery_cell_frames WHERE ts >= ?",
                 (cutoff_str,)
             )
             recent_data["battery_cell_samples"] = self.cur.fetchone()[0]
@@ -0,0 +1,110 @@
+"""
+Unit tests for the vectorized billing year simulation
+"""
+
+import random
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+
+from solarhub import billing_engine
+from solarhub.billing_engine import (
+    _aggregate_hourly_for_billing_month, _bill_months, _billing_month_boundaries, _peak_hour_mask,
+    clear_billing_cache, simulate_billing_year
+)
+from solarhub.config import BillingConfig, BillingPeakWindow
+from solarhub.energy_calculator import EnergyCalculator
+from solarhub.timezone_utils import get_configured_timezone
+
+YEAR = 2025
+
+
+def tariff(**kwargs) -> BillingConfig:
+    values = dict(anchor_day=15, price_offpeak_import=40.0, price_peak_import=47.0, price_offpeak_settlement=20.0,
+                  price_peak_settlement=22.0, fixed_charge_per_billing_month=500.0,
+                  peak_windows=[BillingPeakWindow(start="17:30", end="22:00")])
+    return BillingConfig(**{**values, **kwargs})
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "billing.db")
+    EnergyCalculator(path)  # creates hourly_energy
+    rng = random.Random(7)
+    rows = []
+    day = date(YEAR, 1, 10)
+    while day < date(YEAR + 1, 1, 20):
+        for hour in range(24):
+            for inv in ("inv1", "inv2"):
+                pv = max(0.0, 4.0 - abs(hour - 12) * 0.6) * rng.uniform(0.5, 1.2)
+                load = rng.uniform(0.3, 2.5)
+                rows.append((inv, day.isoformat(), hour, round(pv, 4), round(load, 4),
+                             round(max(0.0, load - pv), 4), round(max(0.0, pv - load), 4)))
+        day += timedelta(days=1)
+    con = sqlite3.connect(path)
+    con.executemany("""INSERT INTO hourly_energy (inverter_id, date, hour_start, solar_energy_kwh,
+                       load_energy_kwh, grid_import_energy_kwh, grid_export_energy_kwh)
+                       VALUES (?, ?, ?, ?, ?, ?, ?)""", rows)
+    con.commit()
+    clear_billing_cache()
+    yield path, con
+    con.close()
+    clear_billing_cache()
+
+
+def legacy_year(path: str, cfg: BillingConfig, inverter_id: str):
+    """Month-by-month aggregation over EnergyCalculator rows (the pre-array path)."""
+    months_def = _billing_month_boundaries(YEAR, cfg.anchor_day, get_configured_timezone())
+    calc = EnergyCalculator(path)
+    energies = [_aggregate_hourly_for_billing_month(calc, inverter_id, start, end, cfg)
+                for start, end, _ in months_def]
+    return _bill_months(months_def, energies, cfg, YEAR)
+
+
+def test_peak_hour_mask_matches_windows():
+    mask = _peak_hour_mask(tariff(peak_windows=[BillingPeakWindow(start="17:30", end="22:00"),
+                                                BillingPeakWindow(start="06:00", end="08:00")]))
+    assert [h for h in range(24) if mask[h]] == [6, 7, 18, 19, 20, 21]
+
+
+@pytest.mark.parametrize("inverter_id", ["all", "inv2"])
+def test_matches_month_by_month_aggregation(db, inverter_id):
+    path, _ = db
+    cfg = tariff()
+    result = simulate_billing_year(path, cfg, YEAR, inverter_id)
+    expected = legacy_year(path, cfg, inverter_id)
+    assert [m["billingMonth"] for m in result["months"]] == [m["billingMonth"] for m in expected["months"]]
+    for got, want in zip(result["months"], expected["months"]):
+        assert got == pytest.approx(want, rel=1e-9, abs=1e-6)
+    assert result["summary"] == pytest.approx(expected["summary"], rel=1e-9, abs=1e-6)
+    assert result["summary"]["total_import_peak_kwh"] > 0 and result["summary"]["total_export_off_kwh"] > 0
+
+
+def test_cache_keyed_by_config_and_data(db, monkeypatch):
+    path, con = db
+    loads = []
+    load = billing_engine._load_hourly_arrays
+    monkeypatch.setattr(billing_engine, "_load_hourly_arrays", lambda *a: loads.append(a) or load(*a))
+
+    first = simulate_billing_year(path, tariff(), YEAR)
+    first["months"][0]["final_bill"] = -1  # callers get their own copy
+    assert simulate_billing_year(path, tariff(), YEAR)["months"][0]["final_bill"] != -1
+    # A tariff sweep reuses the loaded arrays
+    bills = {simulate_billing_year(path, tariff(price_peak_import=p), YEAR)["summary"]["annual_final_bill"]
+             for p in (30.0, 50.0, 70.0)}
+    assert len(bills) == 3 and len(loads) == 1
+
+    # New or replaced hourly rows invalidate the cached data
+    con.execute("""INSERT OR REPLACE INTO hourly_energy (inverter_id, date, hour_start, grid_import_energy_kwh,
+                   grid_export_energy_kwh) VALUES ('inv1', '2025-03-01', 19, 100.0, 0.0)""")
+    con.commit()
+    updated = simulate_billing_year(path, tariff(), YEAR)
+    assert len(loads) == 2
+    assert updated["summary"]["total_import_peak_kwh"] > first["summary"]["total_import_peak_kwh"]
+
+
+def test_missing_table_gives_empty_year(tmp_path):
+    result = simulate_billing_year(str(tmp_path / "empty.db"), tariff(), YEAR)
+    assert len(result["months"]) == 12
+    assert result["summary"]["annual_final_bill"] == pytest.approx(12 * 500.0)
@@ -0,0 +1,166 @@
+"""
+Unit tests for packed battery cell frames and the legacy repack job
+"""
+
+import math
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from solarhub.logging.cell_store import (
+    CellSampleRepack, decode_frames, ensure_cell_tables, frame_rows, insert_frames, pack_cells,
+    read_cell_frames, unpack_cells
+)
+
+TZ = timezone(timedelta(hours=5))
+T0 = datetime(2025, 6, 1, 10, 0, 0, tzinfo=TZ)
+
+
+def _cells(n=16, base=3.300, temp=25.5):
+    return [{"cell": i + 1, "voltage": round(base + i * 0.001, 3), "temperature": temp, "soc": 80,
+             "volt_st": "Normal", "temp_st": "Normal"} for i in range(n)]
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "t.db")
+    con = sqlite3.connect(path)
+    ensure_cell_tables(con.cursor())
+    con.commit()
+    yield path, con
+    con.close()
+
+
+class TestPacking:
+    """Test the int16 frame encoding"""
+
+    def test_round_trip(self):
+        cells = _cells(4)
+        cells[2]["temperature"] = None
+        cells[3]["volt_st"] = "High"
+        packed = pack_cells(cells)
+        count, numbers = packed[0], packed[1]
+        assert count == 4 and numbers is None  # 1..n is implicit
+        assert len(packed[2]) == 8  # 2 bytes per cell
+        assert packed[5] == '["Normal","Normal","Normal","High"]'
+        assert packed[6] == "Normal"
+        out = unpack_cells(*packed)
+        assert [c["voltage"] for c in out] == [3.300, 3.301, 3.302, 3.303]
+        assert out[2]["temperature"] is None and out[0]["temperature"] == 25.5
+        assert out[3]["volt_st"] == "High" and out[0]["temp_st"] == "Normal"
+
+    def test_missing_and_out_of_range_values(self):
+        packed = pack_cells([{"cell": 3, "voltage": 3.2}, {"cell": 5, "voltage": 99.0}])
+        assert packed[1] is not None  # cells 3, 5 stored explicitly
+        assert packed[3] is None and packed[4] is None  # no temperatures / SoC at all
+        assert packed[5] is None
+        out = unpack_cells(*packed)
+        assert [c["cell"] for c in out] == [3, 5]
+        assert out[0]["voltage"] == 3.2 and out[1]["voltage"] is None
+
+    def test_frame_rows_skip_invalid_entries(self):
+        rows = frame_rows("bank", T0.isoformat(" "), [
+            {"power": "x", "cells": _cells(2)},
+            {"power": 1, "cells": [{"cell": "?", "voltage": 3.3}] + _cells(2)},
+            {"power": 2, "cells": []},
+        ])
+        assert len(rows) == 1
+        assert rows[0][:4] == (T0.isoformat(" "), int(T0.timestamp() * 1000), "bank", 1)
+        assert rows[0][4] == 2
+
+
+class TestReadFrames:
+    """Test decoding frames into NumPy arrays"""
+
+    def test_decode_mixed_layouts(self, db):
+        path, con = db
+        rows = []
+        for i in range(3):
+            ts = (T0 + timedelta(seconds=10 * i)).isoformat(" ")
+            rows += frame_rows("bank", ts, [{"power": 1, "cells": _cells(16)},
+                                            {"power": 2, "cells": _cells(15, base=3.2)}])
+        rows += frame_rows("other", T0.isoformat(" "), [{"power": 1, "cells": _cells(16)}])
+        insert_frames(con.cursor(), rows, "system", None)
+        con.commit()
+
+        frames = read_cell_frames(con.cursor(), "bank", T0, T0 + timedelta(minutes=1))
+        assert len(frames) == 6
+        assert frames.voltage.shape == (6, 16) and frames.voltage.dtype == np.float32
+        assert frames.cells.tolist() == list(range(1, 17))
+        unit2 = frames.unit(2)
+        assert len(unit2) == 3
+        assert np.isnan(unit2.voltage[:, 15]).all()  # unit 2 has 15 cells
+        assert unit2.voltage[0, 0] == pytest.approx(3.2)
+        assert frames.temperature[0, 0] == pytest.approx(25.5)
+        assert frames.soc[0, 0] == pytest.approx(80.0)
+
+        cols = frames.unit(1).to_columns()
+        assert cols["ts"] == [int(T0.timestamp()) + 10 * i for i in range(3)]
+        assert cols["voltage"][0] == [3.3, 3.3, 3.3]
+        assert cols["voltage_delta"] == [0.015] * 3
+        assert len(read_cell_frames(con.cursor(), "bank", T0, T0 + timedelta(minutes=1), power=2)) == 3
+
+    def test_empty_and_missing_fields(self):
+        frames = decode_frames([])
+        assert len(frames) == 0 and frames.voltage.shape == (0, 0)
+        packed = pack_cells([{"cell": 1, "voltage": None}, {"cell": 2, "voltage": None}])
+        frames = decode_frames([(0, 1) + packed[:5]])
+        assert np.isnan(frames.voltage).all()
+        vmin, vmax = frames.voltage_spread()
+        assert math.isnan(vmin[0]) and math.isnan(vmax[0])
+        assert frames.to_columns()["voltage_min"] == [None]
+
+
+class TestCellSampleRepack:
+    """Test moving legacy per-cell rows into frames"""
+
+    def _legacy(self, con, polls=5, units=2, cells=4):
+        con.execute("""
+            CREATE TABLE battery_cell_samples (
+                ts TEXT NOT NULL, bank_id TEXT NOT NULL, power INTEGER NOT NULL, cell INTEGER NOT NULL,
+                voltage REAL, temperature REAL, soc REAL, volt_st TEXT, temp_st TEXT, system_id TEXT
+            )
+        """)
+        for p in range(polls):
+            ts = (T0 + timedelta(seconds=10 * p)).isoformat(" ")
+            for u in range(1, units + 1):
+                con.executemany("INSERT INTO battery_cell_samples VALUES (?,?,?,?,?,?,?,?,?,?)",
+                                [(ts, "bank", u, c, 3.3 + c / 1000, 25.0, None, "Normal", None, "sys")
+                                 for c in range(1, cells + 1)])
+        con.commit()
+
+    def test_moves_rows_in_chunks_without_splitting_groups(self, db):
+        path, con = db
+        self._legacy(con)
+        job = CellSampleRepack(path, chunk_rows=3, pause_s=0)
+        assert job.run()
+        assert job.rows_moved == 40 and job.frames_written == 10
+        assert con.execute("SELECT COUNT(*) FROM battery_cell_samples").fetchone()[0] == 0
+        rows = con.execute("SELECT system_id, cell_count FROM battery_cell_frames").fetchall()
+        assert rows == [("sys", 4)] * 10
+        frames = read_cell_frames(con.cursor(), "bank", T0, T0 + timedelta(minutes=1))
+        assert frames.voltage[:, 3].tolist() == pytest.approx([3.304] * 10)
+        assert np.isnan(frames.soc).all()
+
+    def test_resumes_and_keeps_unparseable_rows(self, db):
+        path, con = db
+        self._legacy(con, polls=2)
+        con.execute("INSERT INTO battery_cell_samples VALUES ('garbage', 'bank', 1, 1, 3.3, 25, NULL, NULL, NULL, NULL)")
+        con.commit()
+
+        class StopAfterFirstChunk:
+            calls = 0
+
+            def is_set(self):
+                self.calls += 1
+                return self.calls > 1
+
+        job = CellSampleRepack(path, chunk_rows=8, pause_s=0)
+        assert not job.run(StopAfterFirstChunk())
+        assert job.frames_written == 2
+        assert CellSampleRepack(path, chunk_rows=8, pause_s=0).run()
+        remaining = con.execute("SELECT ts FROM battery_cell_samples").fetchall()
+        assert remaining == [("garbage",)]
+        assert con.execute("SELECT COUNT(*) FROM battery_cell_frames").fetchone()[0] == 4
@@ -0,0 +1,126 @@
+"""
+Unit tests for the memoized clear-sky POA profiles behind PvlibSolarEstimator
+"""
+
+import asyncio
+import os
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from solarhub.config import ForecastConfig
+from solarhub.forecast.clearsky import ClearSkyCache, day_index
+from solarhub.forecast.solar import PvlibSolarEstimator
+from solarhub.timezone_utils import initialize_timezones, now_configured
+
+TZ = "Asia/Karachi"
+DAY = date(2025, 6, 1)
+
+
+class FakeSky:
+    """Deterministic stand-in for the pvlib clear-sky model, counting calls."""
+
+    def __init__(self):
+        self.sky_calls = 0
+        self.poa_calls = 0
+
+    def sky(self, lat, lon, tz, times):
+        self.sky_calls += 1
+        hours = times.hour + times.minute / 60.0
+        ghi = np.clip(np.sin((hours - 6) / 12 * np.pi), 0, None) * 1000 * (1 + times.dayofyear / 1000)
+        return {"ghi": ghi.to_numpy()}
+
+    def poa(self, sky, tilt, azimuth, albedo):
+        self.poa_calls += 1
+        return sky["ghi"] * (1 + tilt / 100) * (1 - abs(azimuth - 180) / 360) - 5  # slightly negative at night
+
+
+def make_cache(fake, path=None, today=DAY):
+    days = [today]
+    cache = ClearSkyCache(path, sky_fn=fake.sky, poa_fn=fake.poa, today_fn=lambda tz: days[0])
+    return cache, days
+
+
+def test_profiles_are_memoized_and_share_the_sky_model():
+    fake = FakeSky()
+    cache, _ = make_cache(fake)
+    south = cache.profile(31.5, 74.3, 20, 180, 0.2, DAY, TZ)
+    east = cache.profile(31.5, 74.3, 20, 90, 0.2, DAY, TZ)
+    assert cache.profile(31.5, 74.3, 20, 180, 0.2, DAY, TZ) is south
+    assert (fake.sky_calls, fake.poa_calls) == (1, 2)
+    assert south.total > east.total > 0 and south.poa.min() == 0.0
+    assert len(south.poa) == 96 and south.hourly.sum() == pytest.approx(south.total)
+    assert south.hourly[0] == 0.0 and south.hourly[12] > 0
+    stats = cache.get_statistics()
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (2, 1, 2)
+
+
+def test_days_before_today_are_evicted_in_memory_and_on_disk(tmp_path):
+    fake = FakeSky()
+    cache, days = make_cache(fake, str(tmp_path))
+    tomorrow = DAY + timedelta(days=1)
+    cache.profile(31.5, 74.3, 20, 180, 0.2, DAY, TZ)
+    cache.profile(31.5, 74.3, 20, 180, 0.2, tomorrow, TZ)
+    assert sorted(os.listdir(tmp_path)) == ["clearsky-2025-06-01.npz", "clearsky-2025-06-02.npz"]
+
+    days[0] = tomorrow
+    cache.profile(31.5, 74.3, 20, 180, 0.2, tomorrow, TZ)
+    assert cache.get_statistics()["days"] == ["2025-06-02"] and cache.evicted == 1
+    assert os.listdir(tmp_path) == ["clearsky-2025-06-02.npz"]
+    assert fake.poa_calls == 2
+
+
+def test_persisted_profiles_survive_a_restart(tmp_path):
+    fake = FakeSky()
+    cache, _ = make_cache(fake, str(tmp_path))
+    first = cache.profile(31.5, 74.3, 20, 180, 0.2, DAY, TZ)
+    cache.profile(31.5, 74.3, 30, 200, 0.2, DAY, TZ)
+
+    restarted_fake = FakeSky()
+    restarted, _ = make_cache(restarted_fake, str(tmp_path))
+    again = restarted.profile(31.5, 74.3, 20, 180, 0.2, DAY, TZ)
+    restarted.profile(31.5, 74.3, 30, 200, 0.2, DAY, TZ)
+    assert (restarted_fake.sky_calls, restarted_fake.poa_calls) == (0, 0)
+    assert restarted.disk_loads == 2 and np.array_equal(again.poa, first.poa)
+
+
+def test_estimator_is_a_weather_multiply_over_the_cached_profile():
+    initialize_timezones(TZ)
+    today = now_configured().date()
+    fake = FakeSky()
+    cache, _ = make_cache(fake, today=today)
+    cfg = ForecastConfig(lat=31.5, lon=74.3, pv_dc_kw=6.0, pv_perf_ratio=0.8, tilt_deg=20, azimuth_deg=180)
+    est = PvlibSolarEstimator(cfg, cache=cache)
+
+    profile = cache.profile(31.5, 74.3, 20, 180, 0.2, today, TZ)
+    expected = profile.total / 1000.0 * 0.25 * 0.8 * 6.0
+    assert asyncio.run(est.estimate_daily_pv_kwh(0.5)) == round(expected * 0.5, 2)
+    weather = {"irradiance_factor": 0.8, "temperature_factor": 0.95, "soiling_factor": 0.98, "wind_factor": 1.0}
+    multiplier = 0.8 * 0.95 * 0.98
+    assert asyncio.run(est.estimate_daily_pv_kwh(1.0, enhanced_weather=weather)) == round(expected * multiplier, 2)
+
+    hourly = asyncio.run(est.estimate_hourly_pv_kwh(weather))
+    assert sum(hourly.values()) == pytest.approx(expected * multiplier, abs=0.02)
+    assert est.estimate_hourly_pv_kw(12, 1.0, enhanced_weather=weather) == pytest.approx(hourly[12], abs=1e-3)
+
+    tomorrow = today + timedelta(days=1)
+    asyncio.run(est.estimate_daily_pv_kwh(1.0, day=tomorrow))
+    assert cache.get_statistics()["days"] == [today.isoformat(), tomorrow.isoformat()]
+    assert fake.sky_calls == 2 and fake.poa_calls == 2
+
+
+def test_cached_profile_matches_direct_pvlib():
+    pvlib = pytest.importorskip("pvlib")
+    cache = ClearSkyCache(today_fn=lambda tz: DAY)
+    profile = cache.profile(31.5497, 74.3436, 20, 180, 0.2, DAY, TZ)
+
+    times = day_index(DAY, TZ)
+    location = pvlib.location.Location(31.5497, 74.3436, tz=TZ)
+    cs = location.get_clearsky(times, model='ineichen')
+    solpos = location.get_solarposition(times)
+    poa = pvlib.irradiance.get_total_irradiance(
+        surface_tilt=20, surface_azimuth=180, solar_zenith=solpos['apparent_zenith'],
+        solar_azimuth=solpos['azimuth'], dni=cs['dni'], ghi=cs['ghi'], dhi=cs['dhi'], albedo=0.2)
+    assert profile.total == pytest.approx(float(pd.Series(poa['poa_global']).clip(lower=0).sum()))
@@ -0,0 +1,183 @@
+"""
+Unit tests for the single-owner device actor
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from solarhub.adapters.command_queue import CommandQueueManager
+from solarhub.adapters.device_actor import DeviceActor, Priority
+
+
+class FakeAdapter:
+    """Records the event loop and order of every bus operation."""
+
+    def __init__(self):
+        self.ops = []
+        self.loops = set()
+        self.regs = ["r1"]
+        self.gate = None
+
+    async def _op(self, name, value=None):
+        self.loops.add(asyncio.get_running_loop())
+        if self.gate is not None and name == "gate":
+            await self.gate.wait()
+        self.ops.append(name)
+        return value if value is not None else name
+
+    async def read_by_ident(self, ident):
+        return await self._op(f"read:{ident}", 42)
+
+    async def handle_command(self, cmd):
+        await self._op(f"cmd:{cmd['action']}")
+        return {"ok": True}
+
+
+def test_priorities_order_the_inbox_and_duplicate_reads_coalesce():
+    adapter = FakeAdapter()
+
+    async def scenario():
+        actor = DeviceActor("inv1")
+        actor.start()
+        adapter.gate = asyncio.Event()
+        busy = actor.submit(Priority.TELEMETRY, adapter._op, "gate")
+        while not adapter.loops:  # wait until the gate op is running
+            await asyncio.sleep(0)
+
+        settings = actor.submit(Priority.SETTINGS, adapter._op, "settings", key="s")
+        telemetry = actor.submit(Priority.TELEMETRY, adapter._op, "poll", key="poll")
+        first = actor.submit(Priority.SETTINGS, adapter.read_by_ident, "r1", key=("read", "r1"))
+        control = actor.submit(Priority.CONTROL, adapter._op, "write")
+        # Same read at control priority: shares the queued read and moves it up
+        again = actor.submit(Priority.CONTROL, adapter.read_by_ident, "r1", key=("read", "r1"))
+        assert again is first
+
+        adapter.gate.set()
+        await asyncio.wrap_future(settings)
+        assert [f.result() for f in (busy, telemetry, first, control)] == ["gate", "poll", 42, "write"]
+        stats = actor.get_statistics()
+        await actor.stop()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert adapter.ops == ["gate", "write", "read:r1", "poll", "settings"]
+    assert stats["priorities"]["control"]["coalesced"] == 1
+    assert stats["priorities"]["control"]["completed"] == 2 and stats["queued"] == 0
+
+
+def test_foreign_loops_and_threads_run_on_the_actor_loop():
+    adapter = FakeAdapter()
+    actor = DeviceActor("inv1")
+    ready = threading.Event()
+    done = threading.Event()
+    owner = {}
+
+    async def polling_loop():
+        owner["loop"] = asyncio.get_running_loop()
+        actor.start()
+        ready.set()
+        while not done.is_set():
+            await asyncio.sleep(0.01)
+        await actor.stop()
+
+    thread = threading.Thread(target=asyncio.run, args=(polling_loop(),))
+    thread.start()
+    assert ready.wait(5)
+
+    # An API-server style loop awaiting through a proxy, and a plain worker thread
+    proxy = actor.proxy(adapter, Priority.SETTINGS)
+    assert asyncio.run(proxy.read_by_ident("r1")) == 42 and proxy.regs == ["r1"]
+    future = actor.submit(Priority.CONTROL, adapter.handle_command, {"action": "write"})
+    assert future.result(timeout=5) == {"ok": True}
+    done.set()
+    thread.join(5)
+    assert adapter.loops == {owner["loop"]}
+
+
+def test_inline_before_start_reentrant_calls_and_stop():
+    adapter = FakeAdapter()
+    actor = DeviceActor("inv1")
+    # Not started: runs inline, as the adapters did without an actor
+    assert asyncio.run(actor.call(Priority.TELEMETRY, adapter._op, "poll")) == "poll"
+
+    async def scenario():
+        actor.start()
+
+        async def nested():
+            # An operation calling back into its own actor must not wait behind itself
+            return await actor.call(Priority.CONTROL, adapter._op, "inner")
+
+        assert await actor.call(Priority.CONTROL, nested) == "inner"
+        adapter.gate = asyncio.Event()
+        adapter.loops.clear()
+        actor.submit(Priority.TELEMETRY, adapter._op, "gate")
+        while not adapter.loops:
+            await asyncio.sleep(0)
+        queued = actor.submit(Priority.SETTINGS, adapter._op, "never")
+        await actor.stop()
+        return queued
+
+    queued = asyncio.run(scenario())
+    with pytest.raises(RuntimeError, match="stopped"):
+        queued.result(timeout=1)
+    assert "never" not in adapter.ops
+
+
+
+def test_stop_fails_the_running_operation():
+    adapter = FakeAdapter()
+    actor = DeviceActor("inv1")
+
+    async def scenario():
+        actor.start()
+        adapter.gate = asyncio.Event()
+        running = asyncio.ensure_future(actor.call(Priority.CONTROL, adapter._op, "gate"))
+        while not adapter.loops:
+            await asyncio.sleep(0)
+        await actor.stop()
+        with pytest.raises(RuntimeError, match="stopped"):
+            await asyncio.wait_for(running, timeout=1)
+
+    asyncio.run(scenario())
+    assert "gate" not in adapter.ops
+
+def test_command_queue_executes_on_the_device_actor():
+    adapter = FakeAdapter()
+    actor = DeviceActor("inv1")
+    ready = threading.Event()
+    done = threading.Event()
+    owner = {}
+
+    async def polling_loop():
+        owner["loop"] = asyncio.get_running_loop()
+        actor.start()
+        ready.set()
+        while not done.is_set():
+            await asyncio.sleep(0.01)
+
+    thread = threading.Thread(target=asyncio.run, args=(polling_loop(),))
+    thread.start()
+    assert ready.wait(5)
+
+    queue = CommandQueueManager(telemetry_polling_interval=10.0)
+    queue.register_adapter("inv1", adapter, actor)
+    results = []
+    queue.start()
+    try:
+        # A poll just started: without the actor the worker would sleep ~8 s for a telemetry slot
+        queue.notify_telemetry_polling()
+        started = time.monotonic()
+        queue.enqueue_command("inv1", {"action": "write"}, callback=lambda *args: results.append(args))
+        while not results and time.monotonic() - started < 5:
+            time.sleep(0.01)
+    finally:
+        queue.stop()
+        done.set()
+        thread.join(5)
+    assert results == [("inv1", {"action": "write"}, {"ok": True}, None)]
+    assert time.monotonic() - started < 2 and adapter.loops == {owner["loop"]}
+    stats = queue.get_statistics()
+    assert stats["commands_via_actor"] == 1 and stats["max_command_latency_ms"] < 2000
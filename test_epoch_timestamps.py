@@ -0,0 +1,102 @@
+"""
+Unit tests for integer epoch timestamps (ts_ms) on the sample tables
+"""
+
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+import solarhub.logging.epoch as epoch_module
+from solarhub.daily_aggregator import DailyAggregator
+from solarhub.database_migrations import migrate_to_epoch_timestamps
+from solarhub.logging.epoch import EpochBackfill, day_bounds_ms, epoch_ready, ms_to_datetime64, ts_to_ms
+from solarhub.timezone_utils import initialize_timezones
+
+TZ = timezone(timedelta(hours=5))
+DAY = datetime(2025, 6, 1, tzinfo=TZ)
+
+
+def sample_ts(i: int) -> str:
+    t = DAY - timedelta(hours=2) + timedelta(seconds=37 * i, microseconds=1234 * i)
+    text = str(t)
+    return text.replace(" ", "T") if i % 5 == 0 else text  # a few rows in the "T" form
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "hub.db")
+    con = sqlite3.connect(path)
+    con.execute("""CREATE TABLE energy_samples (ts TEXT NOT NULL, inverter_id TEXT NOT NULL, pv_power_w INTEGER,
+                   load_power_w INTEGER, grid_power_w INTEGER, batt_voltage_v REAL, batt_current_a REAL, soc REAL,
+                   battery_soc REAL, battery_voltage_v REAL, battery_current_a REAL, inverter_mode INTEGER,
+                   inverter_temp_c REAL)""")
+    rows = []
+    for i in range(3000):
+        for inverter in ("inv1", "inv2"):
+            v, a, soc = 52.0 + i % 7, -3.0 + i % 5, 40.0 + i % 50
+            rows.append((sample_ts(i), inverter, i % 4000, 500 + i % 300, i % 200 - 100, v, a, soc, soc, v, a))
+    con.executemany("INSERT INTO energy_samples (ts, inverter_id, pv_power_w, load_power_w, grid_power_w, "
+                    "batt_voltage_v, batt_current_a, soc, battery_soc, battery_voltage_v, battery_current_a) "
+                    "VALUES (?,?,?,?,?,?,?,?,?,?,?)", rows)
+    con.execute("INSERT INTO energy_samples (ts, inverter_id) VALUES ('not a time', 'inv1')")
+    con.commit()
+    migrate_to_epoch_timestamps(path)
+    yield path, con
+    con.close()
+
+
+def test_backfill_matches_python_conversion(db):
+    path, con = db
+    columns = [row[1] for row in con.execute("PRAGMA table_info(energy_samples)")]
+    assert "ts_ms" in columns and not epoch_ready(con)
+
+    job = EpochBackfill(path, chunk_rows=1000, pause_s=0)
+    assert job.run() and epoch_ready(con)
+    assert (job.rows_updated, job.rows_unparsed) == (6000, 1)
+    for ts, ts_ms in con.execute("SELECT ts, ts_ms FROM energy_samples WHERE ts_ms IS NOT NULL"):
+        assert ts_ms == ts_to_ms(ts)
+    assert con.execute("SELECT COUNT(*) FROM energy_samples WHERE ts_ms IS NULL").fetchone()[0] == 1
+
+
+def test_interrupted_backfill_resumes_from_its_cursor(db, monkeypatch):
+    path, con = db
+    stop = threading.Event()
+    job = EpochBackfill(path, chunk_rows=1000, pause_s=0.001)
+    monkeypatch.setattr(epoch_module.time, "sleep", lambda _: stop.set())  # stop after the first chunk
+    assert not job.run(stop)
+    monkeypatch.undo()
+    assert job.chunks == 1 and not epoch_ready(con)
+    assert con.execute("SELECT COUNT(*) FROM energy_samples WHERE ts_ms IS NOT NULL").fetchone()[0] == 1000
+
+    resumed = EpochBackfill(path, chunk_rows=1000, pause_s=0)
+    assert resumed.run() and resumed.rows_updated == 5000 and epoch_ready(con)
+
+
+def test_daily_aggregate_uses_local_day_and_covering_index(db):
+    path, con = db
+    initialize_timezones("Asia/Karachi")
+    assert EpochBackfill(path, pause_s=0).run()
+    summary = DailyAggregator(path).aggregate_daily_data("2025-05-31", "inv1")
+
+    # The calendar day in the configured timezone (DATE(ts) on the text column used the UTC date)
+    pv = [i % 4000 for i in range(3000) if datetime.fromisoformat(sample_ts(i)).date().isoformat() == "2025-05-31"]
+    assert summary["sample_count"] == len(pv) > 0
+    assert summary["pv_energy_kwh"] == pytest.approx(sum(pv) / 1000.0)
+    assert summary["pv_max_power_w"] == max(pv)
+
+    start_ms, end_ms = day_bounds_ms("2025-05-31", TZ)
+    assert end_ms - start_ms == 86400000 and start_ms == ts_to_ms("2025-05-31 00:00:00+05:00")
+    plan = " ".join(row[3] for row in con.execute(
+        "EXPLAIN QUERY PLAN SELECT ts_ms, pv_power_w, load_power_w, battery_soc, grid_power_w, batt_voltage_v, "
+        "batt_current_a FROM energy_samples WHERE inverter_id = ? AND ts_ms >= ? AND ts_ms < ? ORDER BY ts_ms",
+        ("inv1", start_ms, end_ms)))
+    assert "COVERING INDEX idx_energy_samples_inverter_ts_ms" in plan and "TEMP B-TREE" not in plan
+
+
+def test_ms_to_datetime64():
+    ms = [ts_to_ms("2025-06-01 12:00:00.250+05:00"), ts_to_ms(DAY)]
+    assert ms_to_datetime64(ms).tolist() == [datetime(2025, 6, 1, 7, 0, 0, 250000), datetime(2025, 5, 31, 19, 0)]
+    assert ms_to_datetime64(ms).dtype == np.dtype("datetime64[ms]")
@@ -0,0 +1,169 @@
+"""
+Unit tests for idempotent Home Assistant discovery publishing
+"""
+
+import threading
+import time
+
+from solarhub.config import MqttDiscoveryConfig
+from solarhub.ha.discovery import HADiscoveryPublisher
+from solarhub.ha.discovery_outbox import DiscoveryOutbox, DiscoveryStore, config_hash
+
+
+class FakeMqtt:
+    """Records publishes; subscribing replays the 'broker' retained messages."""
+
+    def __init__(self, retained=None):
+        self.published = []
+        self.retained = dict(retained or {})
+        self.lock = threading.Lock()
+        self.connected = True
+        self.listeners = []
+
+    def add_connect_listener(self, callback):
+        self.listeners.append(callback)
+
+    def reconnect(self):
+        self.connected = True
+        for callback in self.listeners:
+            callback()
+
+    def pub(self, topic, payload, retain=False):
+        if not self.connected:
+            return False  # QoS 0 while disconnected: dropped by the client
+        with self.lock:
+            self.published.append((time.monotonic(), topic, payload))
+            if retain:
+                if payload == "":
+                    self.retained.pop(topic, None)
+                else:
+                    self.retained[topic] = payload
+        return True
+
+    def sub(self, topic, handler):
+        for t, payload in list(self.retained.items()):
+            handler(t, payload)
+
+    def unsub(self, topic):
+        pass
+
+
+def fast(**kwargs) -> MqttDiscoveryConfig:
+    return MqttDiscoveryConfig(**{**dict(batch_interval_s=0.0), **kwargs})
+
+
+def publish_bank(ha: HADiscoveryPublisher, bank_name="Bank", cells=16):
+    for unit in (1, 2, 3):
+        ha.publish_battery_unit_entities("bank1", unit, bank_name=bank_name)
+        for cell in range(1, cells + 1):
+            ha.publish_battery_cell_entities("bank1", unit, cell, bank_name=bank_name)
+    assert ha.outbox.flush(5)
+
+
+def test_restart_sends_only_changed_configs(tmp_path):
+    db = str(tmp_path / "hub.db")
+    mqtt = FakeMqtt()
+    ha = HADiscoveryPublisher(mqtt, "solar/fleet", db_path=db, policy=fast())
+    publish_bank(ha)
+    first = len(mqtt.published)
+    assert first == 3 * 13 + 3 * 16 * 6  # 13 sensors per unit, 6 per cell
+    ha.outbox.stop()
+
+    # A restart with the same bank: nothing goes out
+    mqtt.published.clear()
+    ha = HADiscoveryPublisher(mqtt, "solar/fleet", db_path=db, policy=fast())
+    publish_bank(ha)
+    assert mqtt.published == [] and ha.outbox.get_statistics()["unchanged"] == first
+
+    # Renaming the bank changes every config once
+    publish_bank(ha, bank_name="Garage")
+    publish_bank(ha, bank_name="Garage")
+    assert len(mqtt.published) == first
+    ha.outbox.stop()
+
+
+def test_batches_respect_budget_and_interval():
+    mqtt = FakeMqtt()
+    outbox = DiscoveryOutbox(mqtt, DiscoveryStore(), MqttDiscoveryConfig(startup_budget=10, batch_size=5,
+                                                                         batch_interval_s=0.1))
+    for i in range(22):
+        outbox.submit(f"homeassistant/sensor/x{i}/config", {"name": f"x{i}"})
+    assert outbox.flush(5)
+    times = [t for t, _, _ in mqtt.published]
+    gaps = [i for i in range(1, len(times)) if times[i] - times[i - 1] > 0.05]
+    assert gaps == [10, 15, 20]
+    assert [topic for _, topic, _ in mqtt.published] == [f"homeassistant/sensor/x{i}/config" for i in range(22)]
+    outbox.stop()
+
+
+def test_latest_config_per_topic_wins():
+    mqtt = FakeMqtt()
+    outbox = DiscoveryOutbox(mqtt, DiscoveryStore(), MqttDiscoveryConfig(startup_budget=0, batch_interval_s=0.2))
+    outbox.submit("t/0", {"v": 0})
+    time.sleep(0.05)  # first batch (t/0) is out, the next one waits for the interval
+    outbox.submit("t/1", {"v": 1})
+    outbox.submit("t/1", {"v": 2})
+    outbox.submit("t/0", {"v": 0})  # unchanged
+    assert outbox.flush(5)
+    assert [(topic, payload) for _, topic, payload in mqtt.published] == [("t/0", {"v": 0}), ("t/1", {"v": 2})]
+    outbox.stop()
+
+
+def test_broker_diff_resends_lost_and_stale_configs(tmp_path):
+    db = str(tmp_path / "hub.db")
+    mqtt = FakeMqtt()
+    ha = HADiscoveryPublisher(mqtt, "solar/fleet", db_path=db, policy=fast())
+    publish_bank(ha, cells=2)
+    ha.outbox.stop()
+    topics = sorted(mqtt.retained)
+
+    # The broker lost one config and holds an edited version of another
+    lost, edited = topics[0], topics[1]
+    del mqtt.retained[lost]
+    mqtt.retained[edited] = dict(mqtt.retained[edited], name="edited")
+    mqtt.published.clear()
+
+    ha = HADiscoveryPublisher(mqtt, "solar/fleet", db_path=db, policy=fast())
+    assert ha.sync_with_broker(timeout_s=0.05) == {"retained": len(topics) - 1, "missing": 1, "stale": 1}
+    publish_bank(ha, cells=2)
+    assert sorted(topic for _, topic, _ in mqtt.published) == sorted([lost, edited])
+    assert config_hash(mqtt.retained[edited]) == ha.outbox.store.get(edited)
+    ha.outbox.stop()
+
+
+def test_dropped_and_lost_configs_are_resent_after_reconnect():
+    mqtt = FakeMqtt()
+    ha = HADiscoveryPublisher(mqtt, "solar/fleet", policy=fast(broker_diff_timeout_s=0.1))
+    ha.publish_battery_unit_entities("bank1", 1, bank_name="Bank")
+    assert ha.outbox.flush(5)
+    sent = sorted(mqtt.retained)
+
+    # The connection drops: the next configs are not recorded as published
+    mqtt.connected = False
+    ha.publish_battery_cell_entities("bank1", 1, 1, bank_name="Bank")
+    assert ha.outbox.flush(5)
+    unsent = ha.outbox.get_statistics()["unsent"]
+    assert unsent == 6 and all(ha.outbox.store.get(t) is None for t in ha.outbox._unsent)
+
+    # The broker lost one config that was in flight; the reconnect re-sends it and the dropped ones
+    del mqtt.retained[sent[0]]
+    mqtt.published.clear()
+    mqtt.reconnect()
+    deadline = time.monotonic() + 5
+    while len(mqtt.published) < unsent + 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert ha.outbox.flush(5)
+    assert len(mqtt.published) == unsent + 1 and sent[0] in mqtt.retained
+    assert ha.outbox.get_statistics()["unsent"] == 0
+    ha.outbox.stop()
+
+
+def test_clear_is_sent_once(tmp_path):
+    mqtt = FakeMqtt()
+    ha = HADiscoveryPublisher(mqtt, "solar/fleet", db_path=str(tmp_path / "hub.db"), policy=fast())
+    ha.clear_home_entities()
+    ha.clear_home_entities()
+    assert ha.outbox.flush(5)
+    assert len(mqtt.published) == 5 and all(payload == "" for _, _, payload in mqtt.published)
+    assert ha.outbox.get_statistics()["cleared"] == 5
+    ha.outbox.stop()
@@ -0,0 +1,145 @@
+"""
+Unit tests for the time-bucketed history query layer
+"""
+
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+
+from solarhub.history_query import HistoryQuery
+from solarhub.logging.rollups import RollupEngine, ensure_rollup_tables
+
+TZ = pytz.timezone("Asia/Karachi")
+DAY = TZ.localize(datetime(2025, 6, 1))
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "history.db")
+    con = sqlite3.connect(path)
+    con.execute("""CREATE TABLE energy_samples (ts TEXT, inverter_id TEXT, pv_power_w INTEGER,
+                   load_power_w INTEGER, grid_power_w INTEGER, batt_voltage_v REAL, batt_current_a REAL,
+                   soc REAL, battery_soc REAL)""")
+    con.execute("""CREATE TABLE hourly_energy (inverter_id TEXT, date TEXT, hour_start INTEGER,
+                   solar_energy_kwh REAL, load_energy_kwh REAL, battery_charge_energy_kwh REAL,
+                   battery_discharge_energy_kwh REAL, grid_import_energy_kwh REAL, grid_export_energy_kwh REAL,
+                   avg_solar_power_w REAL, avg_load_power_w REAL, avg_battery_power_w REAL,
+                   avg_grid_power_w REAL, sample_count INTEGER)""")
+    con.execute("""CREATE TABLE meter_daily (day TEXT, meter_id TEXT, import_energy_kwh REAL,
+                   export_energy_kwh REAL, net_energy_kwh REAL, max_import_power_w INTEGER,
+                   max_export_power_w INTEGER, avg_voltage_v REAL, avg_current_a REAL,
+                   avg_frequency_hz REAL, sample_count INTEGER)""")
+    # Raw samples every minute for two inverters on DAY, 06:00-08:00
+    rows = []
+    for inv, pv in (("a", 1000), ("b", 3000)):
+        for i in range(120):
+            ts = DAY + timedelta(hours=6, minutes=i)
+            rows.append((str(ts), inv, pv, 500, 0, 50.0, 2.0, 80.0, None))
+    con.executemany("INSERT INTO energy_samples VALUES (?,?,?,?,?,?,?,?,?)", rows)
+    con.commit()
+    yield con, HistoryQuery(path)
+    con.close()
+
+
+def test_raw_gauges_bucketed_in_sql(db):
+    con, hq = db
+    res = hq.query("inverter", None, ["pv_power_w", "batt_power_w"], DAY + timedelta(hours=6),
+                   DAY + timedelta(hours=8), bucket=3600)
+    assert [s["source"] for s in res["sources"]] == ["energy_samples"]
+    assert res["ts"] == [int((DAY + timedelta(hours=h)).timestamp()) for h in (6, 7)]
+    # Entities combine as a total by default
+    assert res["series"]["pv_power_w"] == [4000.0, 4000.0]
+    assert res["series"]["batt_power_w"] == [200.0, 200.0]
+    assert res["count"] == [120, 120]
+
+    mean = hq.query("inverter", None, ["pv_power_w"], DAY + timedelta(hours=6),
+                    DAY + timedelta(hours=8), bucket=3600, combine="mean")
+    assert mean["series"]["pv_power_w"] == [2000.0, 2000.0]
+    peak = hq.query("inverter", ["a"], ["pv_power_w"], DAY + timedelta(hours=6),
+                    DAY + timedelta(hours=7), bucket=600, agg="max")
+    assert peak["series"]["pv_power_w"] == [1000.0] * 6
+
+
+def test_hourly_table_preferred_with_tail_from_finer_source(db):
+    con, hq = db
+    con.execute("INSERT INTO hourly_energy VALUES ('a', '2025-06-01', 6, 1.0, 0.5, 0, 0, 0.2, 0, 1000, 500, 0, 0, 60)")
+    con.commit()
+    res = hq.query("inverter", ["a"], ["pv_power_w"], DAY + timedelta(hours=6),
+                   DAY + timedelta(hours=8), bucket=3600)
+    assert [s["source"] for s in res["sources"]] == ["hourly_energy", "energy_samples"]
+    assert res["series"]["pv_power_w"] == [1000.0, 1000.0]
+
+    energy = hq.query("inverter", ["a"], ["pv_energy_kwh", "grid_import_kwh"], DAY,
+                      DAY + timedelta(days=1), bucket="day")
+    assert energy["series"]["pv_energy_kwh"] == [1.0]
+    assert energy["series"]["grid_import_kwh"] == [pytest.approx(0.2)]
+
+
+def test_hours_missing_from_the_hourly_table_come_from_finer_sources(db):
+    con, hq = db
+    start = DAY + timedelta(hours=5)
+
+    def hour(h):
+        return int((DAY + timedelta(hours=h)).timestamp())
+
+    # Gap at the start: the table has hour 7 only, hour 6 is answered by raw samples
+    con.execute("INSERT INTO hourly_energy VALUES ('a', '2025-06-01', 7, 1.0, 0, 0, 0, 0, 0, 1111, 0, 0, 0, 60)")
+    con.commit()
+    res = hq.query("inverter", ["a"], ["pv_power_w"], DAY + timedelta(hours=6), DAY + timedelta(hours=8))
+    assert res["series"]["pv_power_w"] == [1000.0, 1111.0]
+    assert [s["source"] for s in res["sources"]] == ["hourly_energy", "energy_samples"]
+
+    # Gap in the middle: hours 5 and 8 from the table, 6-7 from raw samples
+    con.executemany("INSERT INTO hourly_energy VALUES ('a', '2025-06-01', ?, 1.0, 0, 0, 0, 0, 0, 2222, 0, 0, 0, 60)",
+                    [(5,), (8,)])
+    con.execute("DELETE FROM hourly_energy WHERE hour_start = 7")
+    con.commit()
+    res = hq.query("inverter", ["a"], ["pv_power_w"], start, DAY + timedelta(hours=9))
+    assert res["ts"] == [hour(h) for h in range(5, 9)]
+    assert res["series"]["pv_power_w"] == [2222.0, 1000.0, 1000.0, 2222.0]
+    raw = [s for s in res["sources"] if s["source"] == "energy_samples"]
+    assert [(s["start"], s["end"]) for s in raw] == [((DAY + timedelta(hours=6)).isoformat(),
+                                                      (DAY + timedelta(hours=8)).isoformat())]
+
+
+def test_rollups_answer_energy_and_min_max(db):
+    con, hq = db
+    ensure_rollup_tables(con.cursor())
+    con.execute("UPDATE rollup_meta SET value = ? WHERE key = 'started_at'",
+                (str(int((DAY - timedelta(days=1)).timestamp())),))
+    engine = RollupEngine()
+    for i in range(361):
+        engine.add_sample("inverter", "a", DAY + timedelta(hours=12, seconds=10 * i),
+                          {"pv_power_w": 2000, "grid_power_w": -1000 if i < 180 else 1000})
+    engine.drain_job()(con.cursor())
+    con.commit()
+    res = hq.query("inverter", ["a"], ["pv_energy_kwh", "grid_export_kwh", "grid_power_w"],
+                   DAY + timedelta(hours=12), DAY + timedelta(hours=13), bucket=3600, agg="min")
+    assert res["sources"][0]["source"] == "rollup_hour"
+    assert res["series"]["pv_energy_kwh"] == [pytest.approx(2.0)]
+    assert res["series"]["grid_export_kwh"][0] == pytest.approx(0.5, abs=0.01)
+    assert res["series"]["grid_power_w"] == [-1000.0]
+
+
+def test_calendar_buckets_from_daily_table(db):
+    con, hq = db
+    for day, imp in (("2025-06-01", 2.0), ("2025-06-15", 3.0), ("2025-07-02", 4.0)):
+        con.execute("INSERT INTO meter_daily VALUES (?, 'm1', ?, 1.0, 0, ?, 100, 230, 1, 50, 10)",
+                    (day, imp, int(imp * 1000)))
+    con.commit()
+    res = hq.query("meter", ["m1"], ["grid_import_kwh", "grid_import_power_w"], DAY,
+                   TZ.localize(datetime(2025, 7, 31)), bucket="month", agg="max")
+    assert [s["source"] for s in res["sources"]] == ["meter_daily"]
+    assert len(res["ts"]) == 2
+    assert res["series"]["grid_import_kwh"] == [5.0, 4.0]
+    assert res["series"]["grid_import_power_w"] == [3000.0, 4000.0]
+
+
+def test_invalid_arguments(db):
+    _, hq = db
+    with pytest.raises(ValueError):
+        hq.query("inverter", None, ["pv_power_w"], DAY, DAY + timedelta(hours=1), agg="median")
+    with pytest.raises(ValueError):
+        hq.query("battery", None, ["pv_power_w"], DAY, DAY + timedelta(hours=1))
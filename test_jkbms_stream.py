@@ -0,0 +1,174 @@
+"""
+Unit tests for the JK BMS RS485-2 stream parser and asyncio connection
+"""
+
+import asyncio
+import random
+
+from solarhub.adapters.jkbms_rs485 import (
+    DATA_FRAME_START, ConnectionWrapper, FrameStreamParser, modbus_crc16, parse_modbus_frame
+)
+
+
+def _with_crc(body: bytes) -> bytes:
+    crc = modbus_crc16(body)
+    return body + bytes([crc & 0xFF, crc >> 8])
+
+
+def modbus_request(battery_id: int) -> bytes:
+    return _with_crc(bytes([battery_id, 0x10, 0x16, 0x20, 0x00, 0x01, 0x02, 0x00, 0x00]))
+
+
+def modbus_response(battery_id: int) -> bytes:
+    return _with_crc(bytes([battery_id, 0x10, 0x16, 0x20, 0x00, 0x01]))
+
+
+def data_frame(frame_type: int, cell_mv: int = 3300, soc: int = 80) -> bytes:
+    frame = bytearray(300)
+    frame[:4] = DATA_FRAME_START
+    frame[4] = frame_type
+    if frame_type == 0x02:
+        for cell in range(16):
+            frame[6 + cell * 2:8 + cell * 2] = (cell_mv + cell).to_bytes(2, "little")
+        frame[173] = soc
+        frame[234:236] = (5290).to_bytes(2, "little")
+    frame[299] = sum(frame[:299]) & 0xFF
+    return bytes(frame)
+
+
+def bus_cycle(battery_id: int, cell_mv: int = 3300) -> bytes:
+    return modbus_request(battery_id) + data_frame(0x02, cell_mv) + modbus_response(battery_id)
+
+
+def _summary(frames):
+    return [f if f[0] == "modbus" else ("data", f[1]["type"], tuple(f[1].get("cell_voltages", ())))
+            for f in frames]
+
+
+def _adapter(port: int = 1, batteries: int = 2):
+    from solarhub.adapters.battery_jkbms_tcpip import JKBMSTcpipAdapter
+    from solarhub.config import BatteryAdapterConfig, BatteryBankConfig
+    return JKBMSTcpipAdapter(BatteryBankConfig(id="jk", adapter=BatteryAdapterConfig(
+        type="jkbms_tcpip", host="127.0.0.1", port=port, batteries=batteries)))
+
+
+class TestFrameStreamParser:
+    """Test incremental framing"""
+
+    STREAM = b"\x00\x01garbage" + bus_cycle(0) + data_frame(0x01) + bus_cycle(1, 3400) + modbus_request(0)
+
+    def test_frames_in_bus_order(self):
+        parser = FrameStreamParser()
+        frames = _summary(parser.feed(self.STREAM))
+        assert [f[:2] for f in frames] == [
+            ("modbus", 0), ("data", "status"), ("modbus", 0), ("data", "configuration"),
+            ("modbus", 1), ("data", "status"), ("modbus", 1), ("modbus", 0)]
+        assert frames[1][2][:2] == (3.3, 3.301) and frames[5][2][0] == 3.4
+        assert frames[0] == ("modbus", 0, 0x20)
+        assert parser.get_statistics()["buffered_bytes"] == 0
+
+    def test_frames_split_across_chunks(self):
+        expected = _summary(FrameStreamParser().feed(self.STREAM))
+        rng = random.Random(3)
+        for sizes in ([1], [7, 13], [rng.randrange(1, 64) for _ in range(200)]):
+            parser, frames, pos, k = FrameStreamParser(), [], 0, 0
+            while pos < len(self.STREAM):
+                size = sizes[k % len(sizes)]
+                frames += parser.feed(self.STREAM[pos:pos + size])
+                pos, k = pos + size, k + 1
+            assert _summary(frames) == expected
+
+    def test_data_frame_waits_for_its_end(self):
+        parser = FrameStreamParser()
+        assert parser.feed(modbus_request(0) + data_frame(0x02)) == [("modbus", 0, 0x20)]
+        # Not parsed partially: the frame ends where the next one starts
+        assert [f[1]["type"] for f in parser.feed(modbus_response(0)[:3])] == ["status"]
+
+    def test_incremental_crc_matches_full_check(self):
+        frame = modbus_request(2)
+        assert parse_modbus_frame(frame + b"\x00")[4] == len(frame)
+        parser = FrameStreamParser()
+        assert parser.feed(frame[:5]) == [] and len(parser) == 5
+        assert parser.feed(frame[5:]) == [("modbus", 2, 0x20)]
+
+    def test_buffer_stays_bounded(self):
+        parser = FrameStreamParser()
+        rng = random.Random(1)
+        noise = bytes(b for b in rng.randbytes(200_000) if b not in (0x10, 0x55))
+        for i in range(0, len(noise), 4096):
+            assert parser.feed(noise[i:i + 4096]) == []
+            assert len(parser) <= 3
+        # A false Modbus candidate is rejected after MAX_MODBUS_FRAME_LENGTH bytes at most
+        parser.feed(b"\x01\x10\x16" + noise[:600])
+        assert parser.rejected == 1 and len(parser) <= 3
+        assert len(parser.feed(bus_cycle(0))) == 3 and len(parser) <= 3
+
+
+class TestConnectionWrapper:
+    """Test the asyncio stream reader"""
+
+    def test_recv_idle_and_eof(self):
+        async def scenario():
+            closing = asyncio.Event()
+
+            async def gateway(reader, writer):
+                writer.write(bus_cycle(0))
+                await writer.drain()
+                await closing.wait()
+                writer.close()
+
+            server = await asyncio.start_server(gateway, "127.0.0.1", 0)
+            conn = await ConnectionWrapper.open_tcp("127.0.0.1", server.sockets[0].getsockname()[1])
+            assert conn.raw.getpeername()
+            parser, frames = FrameStreamParser(), []
+            while len(frames) < 3:
+                frames += parser.feed(await conn.recv(4096))
+            assert await conn.recv(4096, timeout=0.05) == b"" and not conn.at_eof
+            closing.set()
+            assert await conn.recv(4096) == b"" and conn.at_eof
+            conn.close()
+            server.close()
+            await server.wait_closed()
+
+        asyncio.run(scenario())
+
+
+class TestAdapterFrames:
+    """Test the adapter's listening loop over a local TCP gateway"""
+
+    def test_battery_routing_and_bounded_history(self):
+        from solarhub.adapters.battery_jkbms_tcpip import OTHER_FRAMES_HISTORY
+        adapter = _adapter()
+        for frame in adapter.parser.feed(bus_cycle(1) + data_frame(0x07) * 40 + modbus_request(0)):
+            if frame[0] == "modbus":
+                adapter._handle_modbus_frame(frame[1], frame[2])
+            else:
+                adapter._handle_data_frame(frame[1])
+        entry = adapter.batteries[1]
+        assert entry["status"]["soc"] == 80
+        assert len(entry["other_frames"]) == OTHER_FRAMES_HISTORY
+        assert adapter.current_battery_id == 0
+
+    def test_listen_until_peer_closes(self):
+        async def scenario():
+            async def gateway(reader, writer):
+                stream = bus_cycle(0) + bus_cycle(1, 3350) + modbus_request(0)
+                for i in range(0, len(stream), 50):
+                    writer.write(stream[i:i + 50])
+                    await writer.drain()
+                await asyncio.sleep(0.05)
+                writer.close()
+
+            server = await asyncio.start_server(gateway, "127.0.0.1", 0)
+            adapter = _adapter(port=server.sockets[0].getsockname()[1])
+            await adapter.connect()
+            await asyncio.wait_for(adapter._listening_task, 5)
+            tel = await adapter.poll()
+            assert [d.power for d in tel.devices] == [1, 2]
+            assert tel.cells_data[1]["cells"][0]["voltage"] == 3.35
+            assert adapter.conn.at_eof and not await adapter.check_connectivity()
+            await adapter.close()
+            server.close()
+            await server.wait_closed()
+
+        asyncio.run(scenario())
@@ -0,0 +1,93 @@
+"""
+Unit tests for the shared JSON codec
+"""
+
+import enum
+import json
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+import numpy as np
+import pytest
+from pydantic import BaseModel
+
+from solarhub import json_codec
+from solarhub.json_codec import CIRCULAR, dumps, dumps_bytes, to_jsonable
+
+
+class Mode(enum.Enum):
+    ON_GRID = "OnGrid"
+
+
+class Reading(BaseModel):
+    ts: datetime
+    power_w: int
+
+
+@dataclass
+class Cell:
+    cell: int
+    voltage: float
+
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def engine(request, monkeypatch):
+    if request.param == "orjson":
+        if json_codec.orjson is None:
+            pytest.skip("orjson not installed")
+    else:
+        monkeypatch.setattr(json_codec, "orjson", None)
+    return request.param
+
+
+class TestToJsonable:
+    """Test the single-pass conversion"""
+
+    def test_converts_rich_types(self):
+        ts = datetime(2025, 6, 1, 10, 0, tzinfo=timezone(timedelta(hours=5)))
+        out = to_jsonable({
+            "model": Reading(ts=ts, power_w=1200), "mode": Mode.ON_GRID, "cell": Cell(1, 3.3),
+            "np": [np.float32(1.5), np.int16(7), np.arange(3)], "day": date(2025, 6, 1),
+            "tuple": (1, 2), "set": {3}, "dec": Decimal("2.5"), "nan": float("nan"), "inf": np.float64("inf"),
+            1: "int key", "other": object,
+        })
+        assert out["model"] == {"ts": "2025-06-01T10:00:00+05:00", "power_w": 1200}
+        assert out["mode"] == "OnGrid" and out["cell"] == {"cell": 1, "voltage": 3.3}
+        assert out["np"] == [1.5, 7, [0, 1, 2]] and type(out["np"][1]) is int
+        assert out["day"] == "2025-06-01" and out["tuple"] == [1, 2] and out["set"] == [3]
+        assert out["dec"] == 2.5 and out["nan"] is None and out["inf"] is None
+        assert out["1"] == "int key" and out["other"] == str(object)
+
+    def test_circular_references_and_shared_objects(self):
+        shared = {"v": 1}
+        data = {"a": shared, "b": [shared, shared]}
+        data["self"] = data
+        data["b"].append(data["b"])
+        out = to_jsonable(data)
+        # Repeated (non-circular) objects are converted every time
+        assert out["a"] == {"v": 1} and out["b"][:2] == [{"v": 1}, {"v": 1}]
+        assert out["self"] == CIRCULAR and out["b"][2] == CIRCULAR
+
+    def test_input_is_not_modified(self):
+        data = {"v": np.float32(1.0), 2: [1]}
+        to_jsonable(data)
+        assert type(data["v"]) is np.float32 and 2 in data
+
+
+class TestDumps:
+    """Test the encoders with and without orjson"""
+
+    def test_same_output_for_both_engines(self, engine):
+        payload = {"id": "inv1", "pv_power_w": np.int32(3000), "mode": Mode.ON_GRID, "nan": float("nan"),
+                   "ts": datetime(2025, 6, 1, 10, 0), "name": "Türkçe", 5: [1.25, None, True]}
+        assert json.loads(dumps(payload)) == {
+            "id": "inv1", "pv_power_w": 3000, "mode": "OnGrid", "nan": None,
+            "ts": "2025-06-01T10:00:00", "name": "Türkçe", "5": [1.25, None, True]}
+        assert dumps(["a", "b"]) == '["a","b"]'
+        assert dumps_bytes("online") == b'"online"'
+
+    def test_falls_back_for_values_orjson_rejects(self, engine):
+        data = {"big": 2 ** 70}
+        data["self"] = data
+        assert json.loads(dumps(data)) == {"big": 2 ** 70, "self": CIRCULAR}
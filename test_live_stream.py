@@ -0,0 +1,103 @@
+"""
+Unit tests for the live telemetry fan-out (SSE / WebSocket)
+"""
+
+import asyncio
+import json
+import types
+
+import pytest
+
+from solarhub.api_server import create_api
+from solarhub.live_stream import LiveStreamHub, parse_topics
+
+
+def _frame(message):
+    return json.loads(message[2])
+
+
+def test_snapshot_then_deltas_with_only_changed_fields():
+    async def run():
+        hub = LiveStreamHub()
+        hub.publish({"inverter": {"inv1": {"pv_power_w": 1000, "soc": 80}}})
+        sub = hub.subscribe()
+        snap = _frame(await sub.get())
+        assert snap["type"] == "snapshot"
+        assert snap["data"]["inverter"]["inv1"] == {"pv_power_w": 1000, "soc": 80}
+
+        hub.publish({"inverter": {"inv1": {"pv_power_w": 1200, "soc": 80}},
+                     "meter": {"m1": {"grid_power_w": 5}}})
+        delta = _frame(await sub.get())
+        assert delta["type"] == "delta"
+        assert delta["data"] == {"inverter": {"inv1": {"pv_power_w": 1200}},
+                                 "meter": {"m1": {"grid_power_w": 5}}}
+
+        hub.publish({"inverter": {"inv1": {"pv_power_w": 1200}}})
+        delta = _frame(await sub.get())
+        assert delta["data"] == {"inverter": {"inv1": {"soc": None}}, "meter": {"m1": None}}
+        assert delta["seq"] == 3
+
+    asyncio.run(run())
+
+
+def test_topic_filtering_and_unchanged_cycles_send_nothing():
+    async def run():
+        hub = LiveStreamHub()
+        sub = hub.subscribe(parse_topics("home,inverter:inv2"))
+        await sub.get()
+        hub.publish({"inverter": {"inv1": {"p": 1}, "inv2": {"p": 2}}, "home": {"system": {"p": 3}}})
+        hub.publish({"inverter": {"inv1": {"p": 9}, "inv2": {"p": 2}}, "home": {"system": {"p": 3}}})
+        await asyncio.sleep(0)
+        assert _frame(await sub.get())["data"] == {"inverter": {"inv2": {"p": 2}}, "home": {"system": {"p": 3}}}
+        assert sub.queue.empty()
+
+    asyncio.run(run())
+    with pytest.raises(ValueError):
+        parse_topics("inverter,weather")
+
+
+def test_slow_consumer_resyncs_then_disconnects():
+    async def run():
+        hub = LiveStreamHub(max_queue=2, max_resyncs=1)
+        sub = hub.subscribe()
+        for i in range(3):
+            hub.publish({"inverter": {"inv1": {"p": i}}})
+        await asyncio.sleep(0)
+        # Backlog dropped and replaced by a snapshot of the latest state
+        snap = _frame(sub.queue.get_nowait())
+        assert snap["type"] == "snapshot" and snap["data"]["inverter"]["inv1"] == {"p": 2}
+        assert sub.resyncs == 1
+        for i in range(3, 6):
+            hub.publish({"inverter": {"inv1": {"p": i}}})
+        await asyncio.sleep(0)
+        assert await sub.get() is None
+        stats = hub.get_statistics()
+        assert stats["slow_disconnects"] == 1
+        assert stats["frames_dropped"] > 0
+
+    asyncio.run(run())
+
+
+def test_sse_endpoint_streams_frames():
+    hub = LiveStreamHub()
+    hub.publish({"home": {"system": {"total_pv_power_w": 4000}}})
+    solar_app = types.SimpleNamespace(live_stream=hub)
+    routes = {r.path: r.endpoint for r in create_api(solar_app).routes}
+
+    async def run():
+        resp = await routes["/api/stream"](topics="home")
+        assert resp.media_type == "text/event-stream"
+        events = resp.body_iterator
+        assert (await events.__anext__()).startswith("retry:")
+        first = await events.__anext__()
+        assert first.startswith("id: 1\nevent: snapshot\n")
+        hub.publish({"home": {"system": {"total_pv_power_w": 4100}}})
+        second = await events.__anext__()
+        assert "event: delta" in second and '"total_pv_power_w":4100' in second
+        await events.aclose()
+        assert hub.get_statistics()["subscribers"] == 0
+
+        bad = await routes["/api/stream"](topics="bogus")
+        assert bad.status_code == 400
+
+    asyncio.run(run())
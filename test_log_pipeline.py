@@ -0,0 +1,94 @@
+"""
+Unit tests for the queued, rate-limited logging pipeline
+"""
+
+import json
+import logging
+
+from solarhub import log_pipeline
+from solarhub.config import LoggingConfig
+from solarhub.log_pipeline import Lazy, RateLimitFilter, caller_info
+
+
+def make_record(name: str, level: int, lineno: int, msg: str = "poll") -> logging.LogRecord:
+    return logging.LogRecord(name, level, "/app/adapters/powdrive.py", lineno, msg, None, None)
+
+
+def test_rate_limit_per_call_site():
+    now = [0.0]
+    limiter = RateLimitFilter({"solarhub.adapters": 2, "solarhub.adapters.iammeter": -1, "solarhub.app": 0},
+                              window_s=60, clock=lambda: now[0])
+    passed = [limiter.filter(make_record("solarhub.adapters.powdrive", logging.INFO, 10)) for _ in range(5)]
+    assert passed == [True, True, False, False, False]
+    # Another call site, WARNING records and unlisted / uncapped loggers are not limited
+    assert limiter.filter(make_record("solarhub.adapters.powdrive", logging.INFO, 11))
+    assert limiter.filter(make_record("solarhub.adapters.powdrive", logging.WARNING, 10))
+    assert all(limiter.filter(make_record("solarhub.adapters.iammeter", logging.INFO, 10)) for _ in range(5))
+    assert all(limiter.filter(make_record("solarhub.mqtt", logging.DEBUG, 10)) for _ in range(5))
+    assert not limiter.filter(make_record("solarhub.app", logging.INFO, 10))
+
+    # A new window lets the site through again, carrying the suppressed count once
+    now[0] = 61
+    first = make_record("solarhub.adapters.powdrive", logging.INFO, 10)
+    second = make_record("solarhub.adapters.powdrive", logging.INFO, 10)
+    assert limiter.filter(first) and limiter.filter(second)
+    assert first.suppressed == 3 and not hasattr(second, "suppressed")
+    assert limiter.suppressed == 4
+
+
+def test_lazy_arguments_are_only_formatted_when_emitted():
+    calls = []
+
+    def expensive():
+        calls.append(1)
+        return "value"
+
+    logger = logging.getLogger("solarhub.test_lazy")
+    logger.setLevel(logging.INFO)
+    logger.debug("dropped %s", Lazy(expensive))
+    assert calls == []
+    assert logging.LogRecord("x", logging.INFO, "", 0, "kept %s", (Lazy(expensive),), None).getMessage() == "kept value"
+
+    def outer():
+        return inner()
+
+    def inner():
+        return caller_info(depth=2)
+
+    callers = outer().split(" <- ")
+    assert len(callers) == 2 and callers[0].startswith("test_log_pipeline.py:") and callers[0].endswith("(outer)")
+    assert callers[1].endswith("(test_lazy_arguments_are_only_formatted_when_emitted)")
+
+
+def test_queued_json_lines_sink(tmp_path):
+    root = logging.Logger("root-under-test")
+    path = tmp_path / "logs" / "hub.jsonl"
+    config = LoggingConfig(json_file=str(path), rate_limits={"solarhub.adapters": 1}, queue_size=100)
+    pipeline = log_pipeline.install(config, root)
+    try:
+        adapter_log = logging.Logger("solarhub.adapters.powdrive")
+        adapter_log.parent = root
+        for i in range(3):
+            adapter_log.info("poll %d", i)
+        adapter_log.warning("port %s missing", "/dev/ttyUSB0")
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            adapter_log.exception("read failed")
+        assert log_pipeline.get_logging_statistics()["rate_limited_suppressed"] == 2
+    finally:
+        log_pipeline.shutdown()
+    assert root.handlers == []
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["msg"].splitlines()[0] for line in lines] == ["poll 0", "port /dev/ttyUSB0 missing", "read failed"]
+    assert lines[1]["level"] == "WARNING" and lines[0]["logger"] == "solarhub.adapters.powdrive"
+    assert "ValueError: boom" in lines[2]["msg"]
+    assert pipeline.get_statistics()["enqueued"] == 3
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = log_pipeline.DroppingQueueHandler(log_pipeline.queue.Queue(2))
+    for i in range(5):
+        handler.handle(make_record("solarhub.app", logging.INFO, i))
+    assert (handler.enqueued, handler.dropped) == (2, 3)
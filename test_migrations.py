@@ -0,0 +1,123 @@
+"""
+Unit tests for versioned migrations and resumable background backfills
+"""
+
+import sqlite3
+import threading
+
+from solarhub.logging import migrations
+from solarhub.logging.migrations import Migration, SystemIdBackfill, run_migrations, sync_config_yaml
+
+
+def _recorder(calls, name, fail=None):
+    def apply(path):
+        calls.append(name)
+        if fail and fail[0]:
+            fail[0] -= 1
+            raise RuntimeError("boom")
+    return apply
+
+
+class TestRunMigrations:
+    """Test ledger, user_version and failure handling"""
+
+    def test_each_migration_runs_once(self, tmp_path):
+        path = str(tmp_path / "t.db")
+        calls = []
+        steps = [Migration(2, "b", _recorder(calls, "b")), Migration(1, "a", _recorder(calls, "a"))]
+        assert run_migrations(path, steps) == ["a", "b"]
+        assert run_migrations(path, steps) == []
+        assert calls == ["a", "b"]
+        con = sqlite3.connect(path)
+        assert con.execute("PRAGMA user_version").fetchone()[0] == 2
+        assert [r[0] for r in con.execute("SELECT name FROM schema_migrations ORDER BY version")] == ["a", "b"]
+        con.close()
+
+        # A new step on an up-to-date database runs alone
+        steps.append(Migration(3, "c", _recorder(calls, "c")))
+        assert run_migrations(path, steps) == ["c"]
+        assert calls == ["a", "b", "c"]
+
+    def test_failure_stops_and_is_retried(self, tmp_path):
+        path = str(tmp_path / "t.db")
+        calls = []
+        fail = [1]
+        steps = [Migration(1, "a", _recorder(calls, "a")), Migration(2, "b", _recorder(calls, "b", fail)),
+                 Migration(3, "c", _recorder(calls, "c"))]
+        assert run_migrations(path, steps) == ["a"]
+        con = sqlite3.connect(path)
+        assert con.execute("PRAGMA user_version").fetchone()[0] == 1
+        con.close()
+        assert run_migrations(path, steps) == ["b", "c"]
+        assert calls == ["a", "b", "b", "c"]
+
+    def test_config_sync_only_when_file_changes(self, tmp_path, monkeypatch):
+        path = str(tmp_path / "t.db")
+        con = sqlite3.connect(path)
+        con.execute("CREATE TABLE adapter_base (adapter_type TEXT PRIMARY KEY)")
+        con.execute("INSERT INTO adapter_base VALUES ('senergy')")
+        con.commit()
+        con.close()
+        synced = []
+        monkeypatch.setattr(migrations, "migrate_config_yaml_to_database", lambda db, cfg: synced.append(cfg))
+        monkeypatch.setattr(migrations, "migrate_production_data", lambda db, system_id: None)
+        cfg = tmp_path / "config.yaml"
+        cfg.write_text("inverters: []\n")
+        assert sync_config_yaml(path, str(cfg))
+        assert not sync_config_yaml(path, str(cfg))
+        cfg.write_text("inverters: [{id: inv1}]\n")
+        assert sync_config_yaml(path, str(cfg))
+        assert len(synced) == 2
+        assert not sync_config_yaml(path, str(tmp_path / "missing.yaml"))
+
+
+def _make_samples(path, rows):
+    con = sqlite3.connect(path)
+    con.execute("CREATE TABLE energy_samples (ts TEXT, inverter_id TEXT, system_id TEXT)")
+    con.execute("CREATE TABLE meter_samples (ts TEXT, meter_id TEXT)")  # no system_id column
+    con.executemany("INSERT INTO energy_samples VALUES (?, 'inv1', ?)",
+                    [(str(i), "other" if i % 10 == 0 else None) for i in range(rows)])
+    con.commit()
+    con.close()
+
+
+class TestSystemIdBackfill:
+    """Test chunked, resumable backfill"""
+
+    def test_chunked_backfill_leaves_existing_values(self, tmp_path):
+        path = str(tmp_path / "t.db")
+        _make_samples(path, 250)
+        job = SystemIdBackfill(path, system_id="sys", tables=("energy_samples", "meter_samples", "absent"),
+                               chunk_rows=100, pause_s=0)
+        assert job.run()
+        assert job.chunks == 3
+        assert job.rows_updated == 225
+        con = sqlite3.connect(path)
+        counts = dict(con.execute("SELECT system_id, COUNT(*) FROM energy_samples GROUP BY system_id").fetchall())
+        assert counts == {"sys": 225, "other": 25}
+        state = dict(con.execute("SELECT key, value FROM migration_state").fetchall())
+        con.close()
+        assert state == {"backfill_system_ids": "done"}
+
+        # Completed jobs are skipped on later starts
+        again = SystemIdBackfill(path, system_id="sys", tables=("energy_samples",), chunk_rows=100, pause_s=0)
+        assert again.run() and again.chunks == 0
+
+    def test_resumes_from_cursor_after_stop(self, tmp_path):
+        path = str(tmp_path / "t.db")
+        _make_samples(path, 500)
+        job = SystemIdBackfill(path, system_id="sys", tables=("energy_samples",), chunk_rows=100, pause_s=0)
+
+        class StopAfterTwoChunks(threading.Event):
+            def is_set(self):
+                return job.chunks >= 2
+
+        assert not job.run(StopAfterTwoChunks())
+        assert job.chunks == 2
+
+        resumed = SystemIdBackfill(path, system_id="sys", tables=("energy_samples",), chunk_rows=100, pause_s=0)
+        assert resumed.run()
+        assert resumed.chunks == 3
+        con = sqlite3.connect(path)
+        assert con.execute("SELECT COUNT(*) FROM energy_samples WHERE system_id IS NULL").fetchone()[0] == 0
+        con.close()
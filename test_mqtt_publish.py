@@ -0,0 +1,74 @@
+"""
+Unit tests for the change-only MQTT publish gate
+"""
+
+from solarhub.config import MqttConfig, MqttDeadband, MqttPublishConfig
+from solarhub.mqtt import PublishGate
+
+
+def _gate(**kwargs):
+    return PublishGate(MqttPublishConfig(**kwargs))
+
+
+class TestPublishGate:
+    """Test deadbands, intervals and retained change-only delivery"""
+
+    def test_unchanged_payload_is_suppressed_until_heartbeat(self):
+        gate = _gate(max_interval_s=60)
+        payload = {"ts": "t0", "pv_power_w": 1000, "mode": "OnGrid"}
+        assert gate.should_publish("a/regs", payload, now=0)
+        # Timestamps alone are not a change
+        assert not gate.should_publish("a/regs", dict(payload, ts="t1"), now=10)
+        assert gate.should_publish("a/regs", dict(payload, ts="t2"), now=61)
+        assert gate.heartbeats == 1
+        assert gate.should_publish("a/regs", dict(payload, mode="OffGrid"), now=62)
+        assert gate.get_statistics()["suppressed"] == 1
+
+    def test_deadbands_compare_against_last_published(self):
+        gate = _gate(deadbands={"*_power_w": MqttDeadband(abs=20), "soc": MqttDeadband(rel=0.02)})
+        assert gate.should_publish("t", {"pv_power_w": 1000, "soc": 50.0}, now=0)
+        assert not gate.should_publish("t", {"pv_power_w": 1015, "soc": 50.5}, now=1)
+        # Drift adds up against the published baseline (1000), not the previous sample
+        assert gate.should_publish("t", {"pv_power_w": 1025, "soc": 50.5}, now=2)
+        assert gate.should_publish("t", {"pv_power_w": 1025, "soc": 51.6}, now=3)
+        # Appearing / disappearing fields always count
+        assert gate.should_publish("t", {"pv_power_w": 1025}, now=4)
+
+    def test_nested_values_use_field_deadbands(self):
+        gate = _gate(deadbands={"voltage": MqttDeadband(abs=0.005)})
+        bank = {"devices": [{"power": 1, "voltage": 52.10}, {"power": 2, "voltage": 52.20}]}
+        assert gate.should_publish("bank", bank, now=0)
+        assert not gate.should_publish("bank", {"devices": [{"power": 1, "voltage": 52.103},
+                                                            {"power": 2, "voltage": 52.20}]}, now=1)
+        assert gate.should_publish("bank", {"devices": [{"power": 1, "voltage": 52.11},
+                                                        {"power": 2, "voltage": 52.20}]}, now=2)
+
+    def test_min_interval_holds_change_until_elapsed(self):
+        gate = _gate(min_interval_s=30)
+        assert gate.should_publish("t", {"v": 1}, now=0)
+        assert not gate.should_publish("t", {"v": 2}, now=10)
+        assert gate.should_publish("t", {"v": 2}, now=31)
+
+    def test_retained_topics_only_on_change(self):
+        gate = _gate(max_interval_s=10)
+        assert gate.should_publish("a/availability", "online", retain=True, now=0)
+        assert not gate.should_publish("a/availability", "online", retain=True, now=1000)
+        assert gate.should_publish("a/availability", "offline", retain=True, now=1001)
+        gate.reset()  # reconnect
+        assert gate.should_publish("a/availability", "offline", retain=True, now=1002)
+
+    def test_disabled_and_forget(self):
+        gate = _gate(enabled=False)
+        assert gate.should_publish("t", {"v": 1}) and gate.should_publish("t", {"v": 1})
+        gate = _gate()
+        payload = {"v": 1}
+        assert gate.should_publish("t", payload, now=0)
+        payload["v"] = 5  # caller mutating its dict does not move the baseline
+        assert gate.should_publish("t", {"v": 5}, now=1)
+        gate.forget("t")
+        assert gate.should_publish("t", {"v": 5}, now=2)
+
+    def test_config_defaults(self):
+        cfg = MqttConfig(host="localhost")
+        assert cfg.publish.enabled and not cfg.publish.packed_cells
+        assert PublishGate(cfg.publish).should_publish("t", {"ts": "x"}, now=0)
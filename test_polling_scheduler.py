@@ -0,0 +1,93 @@
+"""
+Unit tests for the per-bus polling scheduler
+"""
+
+import asyncio
+import types
+
+from solarhub.polling_scheduler import PollingScheduler, PollTask, bus_key
+
+
+def test_bus_key_groups_by_physical_bus():
+    ns = types.SimpleNamespace
+    assert bus_key(ns(serial_port="/dev/ttyUSB0", transport="rtu", host=None), "a") == "serial:/dev/ttyUSB0"
+    assert bus_key(ns(serial_port=None, transport="tcp", host="10.0.0.5", port=502), "a") == "tcp:10.0.0.5:502"
+    assert bus_key(ns(bt_address="CC:44", bt_adapter="hci1"), "a") == "ble:hci1"
+    assert bus_key(None, "meter1") == "device:meter1"
+
+
+class TestPollingScheduler:
+    """Test bus serialization, cadences and overrun accounting"""
+
+    def test_serialized_per_bus_parallel_across_buses(self):
+        asyncio.run(self._test_serialized_per_bus_parallel_across_buses())
+
+    async def _test_serialized_per_bus_parallel_across_buses(self):
+        active = {"a": 0, "b": 0}
+        peak = {"a": 0, "b": 0, "all": 0}
+
+        def poll_on(bus):
+            async def poll():
+                active[bus] += 1
+                peak[bus] = max(peak[bus], active[bus])
+                peak["all"] = max(peak["all"], sum(active.values()))
+                await asyncio.sleep(0.02)
+                active[bus] -= 1
+            return poll
+
+        scheduler = PollingScheduler(stagger_s=0.0)
+        for i in range(3):
+            scheduler.add(PollTask(f"a{i}", "a", 0.05, poll_on("a")))
+            scheduler.add(PollTask(f"b{i}", "b", 0.05, poll_on("b")))
+        scheduler.start()
+        await asyncio.sleep(0.2)
+        await scheduler.stop()
+        assert peak["a"] == 1 and peak["b"] == 1
+        assert peak["all"] == 2
+        assert not scheduler.running
+
+    def test_independent_cadences(self):
+        asyncio.run(self._test_independent_cadences())
+
+    async def _test_independent_cadences(self):
+        counts = {"fast": 0, "slow": 0}
+
+        def poll_of(name):
+            async def poll():
+                counts[name] += 1
+            return poll
+
+        scheduler = PollingScheduler(stagger_s=0.0)
+        scheduler.add(PollTask("fast", "bus", 0.05, poll_of("fast")))
+        scheduler.add(PollTask("slow", "bus", 0.25, poll_of("slow")))
+        scheduler.start()
+        await asyncio.sleep(0.52)
+        await scheduler.stop()
+        assert 9 <= counts["fast"] <= 12
+        assert counts["slow"] == 3
+
+    def test_overruns_skip_slots_and_failures_are_counted(self):
+        asyncio.run(self._test_overruns_skip_slots_and_failures_are_counted())
+
+    async def _test_overruns_skip_slots_and_failures_are_counted(self):
+        async def slow_poll():
+            await asyncio.sleep(0.12)
+
+        async def failing_poll():
+            raise RuntimeError("no response")
+
+        scheduler = PollingScheduler(stagger_s=0.0)
+        scheduler.add(PollTask("slow", "a", 0.05, slow_poll))
+        scheduler.add(PollTask("bad", "b", 0.05, failing_poll))
+        scheduler.add(PollTask("hung", "c", 0.05, lambda: asyncio.sleep(1), timeout_s=0.03))
+        scheduler.start()
+        await asyncio.sleep(0.3)
+        await scheduler.stop()
+        stats = scheduler.get_statistics()["devices"]
+        # Each 120 ms poll misses two 50 ms slots instead of queueing a burst
+        assert stats["slow"]["polls"] in (2, 3)
+        assert stats["slow"]["overruns"] >= 2 * (stats["slow"]["polls"] - 1)
+        assert stats["slow"]["max_duration_ms"] >= 100
+        assert stats["bad"]["failures"] == stats["bad"]["polls"] > 0
+        assert stats["bad"]["last_error"] == "no response"
+        assert stats["hung"]["timeouts"] > 0
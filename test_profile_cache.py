@@ -0,0 +1,218 @@
+"""
+Unit tests for the incrementally updated learner profile cache
+"""
+
+import random
+import sqlite3
+import threading
+from datetime import timedelta
+
+import pandas as pd
+import pytest
+
+from solarhub.logging.rollups import RollupEngine, ensure_rollup_tables
+from solarhub.schedulers.profile_cache import LearnerProfileCache, QuantileSketch
+
+TZ = "Asia/Karachi"
+NOW = pd.Timestamp("2026-03-11 15:20", tz=TZ)
+
+
+def _clock():
+    return NOW.to_pydatetime()
+
+
+def _make_db(path, days=3, step_s=300):
+    """energy_samples with a PV bell over the day and a flat 800 W load, up to an hour before NOW."""
+    con = sqlite3.connect(path)
+    con.execute("CREATE TABLE energy_samples (ts TEXT, inverter_id TEXT, pv_power_w REAL, load_power_w REAL)")
+    end = NOW.floor("h") - pd.Timedelta(hours=1)
+    ts = end - pd.Timedelta(days=days)
+    rows = []
+    while ts < end:
+        pv = max(0.0, 3000.0 * (1 - abs(ts.hour + ts.minute / 60 - 12) / 6))
+        rows.append((ts.isoformat(sep=" "), "inv1", pv, 800.0))
+        ts += pd.Timedelta(seconds=step_s)
+    con.executemany("INSERT INTO energy_samples VALUES (?,?,?,?)", rows)
+    con.commit()
+    con.close()
+    return rows
+
+
+class TestQuantileSketch:
+    """Test sketch accuracy and persistence"""
+
+    def test_median_within_relative_accuracy(self):
+        rnd = random.Random(1)
+        values = [rnd.uniform(10, 5000) for _ in range(5001)]
+        sk = QuantileSketch()
+        for v in values:
+            sk.add(v)
+        exact = sorted(values)[2500]
+        assert sk.quantile(0.5) == pytest.approx(exact, rel=0.02)
+
+    def test_zero_bucket_and_weights(self):
+        sk = QuantileSketch()
+        sk.add(0.0, 3)
+        sk.add(1000.0, 2)
+        assert sk.count == 5
+        assert sk.quantile(0.5) == 0.0
+        assert sk.quantile(1.0) == pytest.approx(1000.0, rel=0.01)
+
+    def test_merge_and_json_roundtrip(self):
+        a, b = QuantileSketch(), QuantileSketch()
+        a.add(100.0, 4)
+        b.add(200.0, 5)
+        a.merge(b)
+        restored = QuantileSketch.from_json(a.to_json())
+        assert restored.count == 9
+        assert restored.bins == a.bins
+        assert restored.quantile(0.5) == pytest.approx(200.0, rel=0.01)
+
+
+class TestLearnerProfileCache:
+    """Test profile building and incremental refresh"""
+
+    def test_bootstrap_from_samples(self, tmp_path):
+        path = str(tmp_path / "t.db")
+        _make_db(path)
+        cache = LearnerProfileCache(path, TZ, clock=_clock)
+        pv = cache.pv_profile("inv1", days_back=60)
+        assert pv
+        # Every learned day is normalised and full days peak at noon
+        for doy in {d for d, _ in pv}:
+            day = {h: v for (d, h), v in pv.items() if d == doy}
+            assert sum(day.values()) == pytest.approx(1.0, abs=1e-3)
+            if len(day) == 24:
+                assert max(day, key=day.get) in (11, 12)
+        load = cache.load_profile(days_back=60)
+        assert len(load) == 3 * 24  # three days of distinct (dow, hour) slots
+        assert all(v == pytest.approx(0.8, rel=0.01) for v in load.values())
+        assert cache.get_statistics()["last_source"] == "energy_samples"
+
+    def test_lookup_is_cached_until_data_changes(self, tmp_path):
+        path = str(tmp_path / "t.db")
+        _make_db(path, days=1)
+        cache = LearnerProfileCache(path, TZ, clock=_clock)
+        first = cache.pv_profile("inv1")
+        assert cache.pv_profile("inv1") is first
+        assert cache.refreshes == 1
+
+    def test_sketches_persist_across_instances(self, tmp_path):
+        path = str(tmp_path / "t.db")
+        _make_db(path, days=1)
+        before = LearnerProfileCache(path, TZ, clock=_clock).load_profile()
+        con = sqlite3.connect(path)
+        con.execute("DELETE FROM energy_samples")
+        con.commit()
+        con.close()
+        after = LearnerProfileCache(path, TZ, clock=_clock).load_profile()
+        assert after == before
+
+    def test_background_lookups_never_wait_for_a_refresh(self, tmp_path):
+        path = str(tmp_path / "t.db")
+        _make_db(path, days=1)
+        cache = LearnerProfileCache(path, TZ, clock=_clock, background=True)
+        cache.load_profile()  # starts the first refresh on a thread
+        cache._refresh_thread.join(10)
+        built = cache.load_profile()
+        assert len(built) == 24
+
+        # A refresh (another thread) holds the sketches: the lookup returns the last profile at once
+        holding, release = threading.Event(), threading.Event()
+
+        def refresh():
+            with cache._lock:
+                holding.set()
+                release.wait(10)
+
+        worker = threading.Thread(target=refresh)
+        worker.start()
+        holding.wait(5)
+        try:
+            assert cache.load_profile() is built
+            assert cache.load_profile(days_back=7) == {}  # nothing built for this window yet
+        finally:
+            release.set()
+            worker.join()
+
+    def test_incremental_from_rollups(self, tmp_path):
+        path = str(tmp_path / "t.db")
+        _make_db(path, days=1)
+        cache = LearnerProfileCache(path, TZ, clock=_clock)
+        cache.refresh(force=True)
+        sketches = cache.get_statistics()["sketches"]
+
+        # Rollups take over from the watermark: feed one closed hour of 5 kW load
+        con = sqlite3.connect(path)
+        wm = int(con.execute("SELECT value FROM learner_state WHERE key = 'watermark'").fetchone()[0])
+        ensure_rollup_tables(con.cursor())
+        con.execute("UPDATE rollup_meta SET value = ? WHERE key = 'started_at'", (str(wm - 6 * 3600),))
+        engine = RollupEngine()
+        hour = (pd.Timestamp(wm, unit="s", tz="UTC").tz_convert(TZ) - pd.Timedelta(hours=3)).floor("h")
+        hour = hour.to_pydatetime()
+        for i in range(0, 3600, 10):
+            engine.add_sample("inverter", "inv1", hour + timedelta(seconds=i),
+                              {"pv_power_w": 0.0, "load_power_w": 5000.0})
+        engine.drain_job()(con.cursor())
+        # Move the watermark back to the start of the fed hour
+        con.execute("UPDATE learner_state SET value = ? WHERE key = 'watermark'",
+                    (str(int(hour.timestamp())),))
+        con.commit()
+        con.close()
+
+        cache.refresh(force=True)
+        stats = cache.get_statistics()
+        assert stats["last_source"] == "rollups"
+        assert stats["last_refresh_rows"] == 120  # 60 minutes x 2 metrics
+        assert stats["sketches"] == sketches
+        sk = cache._sketches[("load", "*", hour.strftime("%Y-%m-%d"), hour.hour)]
+        assert sk.count == 12 + 360  # 5-minute raw samples plus 10-second rollup weights
+        assert sk.quantile(0.5) == pytest.approx(5000.0, rel=0.01)
+
+    def test_longer_windows_are_clamped_and_logged(self, tmp_path, caplog):
+        path = str(tmp_path / "t.db")
+        _make_db(path, days=1)
+        cache = LearnerProfileCache(path, TZ, max_days=2, clock=_clock)
+        with caplog.at_level("WARNING"):
+            assert cache.load_profile(days_back=90) == cache.load_profile(days_back=2)
+            cache.load_profile(days_back=90)
+        assert sum("exceeds the 2 days" in r.message for r in caplog.records) == 1
+
+    def test_hybrid_learners_read_the_cache_first(self, tmp_path):
+        from types import SimpleNamespace
+
+        from solarhub.schedulers.bias import BiasLearner
+        from solarhub.schedulers.load import LoadLearner
+
+        path = str(tmp_path / "t.db")
+        _make_db(path)
+        cache = LearnerProfileCache(path, TZ, clock=_clock)
+
+        class Summaries:
+            recent_calls = 0
+            seasonal_calls = 0
+
+            def get_recent_data(self, inverter_id, days_back):
+                self.recent_calls += 1
+                return []
+
+            def get_seasonal_data(self, day_of_year, inverter_id, years_back):
+                self.seasonal_calls += 1
+                return []
+
+        logger = SimpleNamespace(path=path)
+        bias, load = BiasLearner(logger, TZ), LoadLearner(logger, TZ)
+        summaries = Summaries()
+        for learner in (bias, load):
+            learner.profiles = cache
+            learner.daily_aggregator = summaries
+
+        doy = NOW.dayofyear
+        for _ in range(3):
+            pv = bias.hourly_pv_profile_hybrid("inv1", doy)
+            kw = load.hourly_load_profile_hybrid(doy, NOW.dayofweek)
+        assert set(k[0] for k in pv) == {doy} and sum(pv.values()) == pytest.approx(1.0)
+        assert max(pv, key=pv.get)[1] in (11, 12)
+        assert kw[(NOW.dayofweek, 9)] == pytest.approx(0.8, rel=0.01)  # kW, not a share
+        # Recent data came from the sketches; seasonal summaries were read once per learner
+        assert summaries.recent_calls == 0 and summaries.seasonal_calls == 2
@@ -0,0 +1,176 @@
+"""
+Unit tests for the Pytes console protocol over asyncio
+"""
+
+import asyncio
+import os
+import threading
+
+import pytest
+
+from solarhub.adapters.pytes_console import PytesConsole, ResponseSplitter, match_responses
+
+serial = pytest.importorskip("serial")
+
+
+def console_reply(cmd: str, lines: int = 3) -> bytes:
+    body = "".join(f"line {i} of {cmd}\r\n" for i in range(lines))
+    return f"{cmd}\r\r\n@\r\r\n{body}Command completed successfully\r\r\n$$\r\n\rpylon>".encode("latin-1")
+
+
+def unit_reply(cmd: str) -> bytes:
+    """'pwr N' / 'bat N' output of unit N (cells at 3.3xx V, SOC 80 + N)."""
+    name, unit = cmd.split()
+    n = int(unit)
+    if name == "pwr":
+        fields = [("Voltage", 52000 + n), ("Current", -1500), ("Temperature", 25000), ("Coulomb", 80 + n)]
+        body = "".join(f"{label:<16}:  {value:>8} m\r\n" for label, value in fields)
+    else:
+        body = "Battery  Volt     Curr     Tempr    Base State   SOC\r\n"
+        body += "".join(f"{cell}        {3300 + n * 10 + cell}     -1500    25000    Discharge    {80 + n}%\r\n"
+                        for cell in range(16))
+    return f"{cmd}\r\r\n@\r\r\n{body}Command completed successfully\r\r\n$$\r\n\rpylon>".encode("latin-1")
+
+
+class FakeConsole(threading.Thread):
+    """Answers console commands on the master side of a pty."""
+
+    def __init__(self, master_fd: int, ignore=(), chunk: int = 64, reply=console_reply):
+        super().__init__(daemon=True)
+        self.fd = master_fd
+        self.reply = reply
+        self.ignore = set(ignore)
+        self.chunk = chunk
+        self.commands = []
+
+    def run(self):
+        pending = b""
+        while True:
+            try:
+                data = os.read(self.fd, 1024)
+            except OSError:
+                return
+            if not data:
+                return
+            pending += data
+            while b"\n" in pending:
+                line, pending = pending.split(b"\n", 1)
+                cmd = line.decode().strip()
+                self.commands.append(cmd)
+                if cmd in self.ignore:
+                    continue
+                reply = self.reply(cmd) if cmd else b"\r\n$$\r\n\rpylon>"
+                for i in range(0, len(reply), self.chunk):
+                    os.write(self.fd, reply[i:i + self.chunk])
+
+
+@pytest.fixture
+def pty_port():
+    if not hasattr(os, "openpty"):
+        pytest.skip("pty not available")
+    master, slave = os.openpty()
+    ser = serial.Serial(os.ttyname(slave), baudrate=115200, timeout=2)
+    yield master, ser
+    ser.close()
+    os.close(slave)
+    os.close(master)
+
+
+class TestResponseSplitter:
+    """Test incremental framing of console output"""
+
+    def test_split_at_any_byte(self):
+        stream = b"\r\n$$\r\n\rpylon>" + console_reply("pwr 1") + console_reply("bat 1", 5)
+        for size in (1, 7, len(stream)):
+            splitter, responses = ResponseSplitter(), []
+            for i in range(0, len(stream), size):
+                responses += splitter.feed(stream[i:i + size])
+            assert [len(r) for r in responses] == [6, 8]
+            assert responses[0][0] == "\rpylon>pwr 1\r\r\n"
+            assert responses[0][-1] == "Command completed successfully\r\r\n"
+            assert splitter.pending == []
+
+    def test_dollar_line_and_prompt_end_a_response(self):
+        splitter = ResponseSplitter()
+        assert splitter.feed(b"foo\r\nUnknown command 'foo'\r\n$$\r\n") == [
+            ["foo\r\n", "Unknown command 'foo'\r\n", "$$\r\n"]]
+        assert splitter.feed(b"help\r\nno marker\r\n") == [] and len(splitter.pending) == 2
+        assert splitter.feed(b"\rpylon>") == [["help\r\n", "no marker\r\n"]]
+
+    def test_match_by_echo(self):
+        responses = [["pylon>bat 1\r\n", "x\r\n"], ["pylon>bat 3\r\n", "y\r\n"]]
+        assert match_responses(["bat 1", "bat 2", "bat 3"], responses) == [responses[0], [], responses[1]]
+        assert match_responses(["bat 1", "bat 2"], [["x\r\n"]]) == [["x\r\n"], []]
+
+
+class TestPytesConsole:
+    """Test exchanges with a console on a pty"""
+
+    def test_command_and_pipeline(self, pty_port):
+        master, ser = pty_port
+        device = FakeConsole(master)
+        device.start()
+
+        async def scenario():
+            console = PytesConsole.attach(ser)
+            lines = await console.command("pwr 1", timeout_s=2)
+            assert lines[0].endswith("pwr 1\r\r\n") and "Command completed" in lines[-1]
+            wakeups = console.wakeups
+            out = await console.pipeline([f"bat {n}" for n in range(1, 9)], timeout_s=2)
+            assert [r[2].strip() for r in out] == [f"line 0 of bat {n}" for n in range(1, 9)]
+            # Bulk reads: at most one wakeup per 64-byte device write, not one per byte
+            assert console.wakeups - wakeups <= sum(-(-len(console_reply(f"bat {n}")) // 64) for n in range(1, 9))
+            console.stream._stop()
+
+        asyncio.run(scenario())
+        assert device.commands[:2] == ["pwr 1", "bat 1"]
+
+    def test_timeout_returns_what_arrived(self, pty_port):
+        master, ser = pty_port
+        FakeConsole(master, ignore={"bat 2"}).start()
+
+        async def scenario():
+            console = PytesConsole.attach(ser)
+            out = await console.pipeline(["bat 1", "bat 2", "bat 3"], timeout_s=0.5)
+            console.stream._stop()
+            return out
+
+        out = asyncio.run(scenario())
+        assert len(out[0]) == 6 and out[1] == [] and out[2][0].endswith("bat 3\r\r\n")
+
+
+class TestAdapterPoll:
+    """Test the adapter's bank poll over the console"""
+
+    @pytest.mark.parametrize("pipeline", [False, True])
+    def test_poll_bank(self, pty_port, pipeline, monkeypatch):
+        import time
+        from solarhub.adapters.battery_pytes import PytesBatteryAdapter
+        from solarhub.config import BatteryAdapterConfig, BatteryBankConfig
+
+        master, ser = pty_port
+        device = FakeConsole(master, reply=unit_reply)
+        device.start()
+        adapter = PytesBatteryAdapter(BatteryBankConfig(id="pytes", adapter=BatteryAdapterConfig(
+            type="pytes", serial_port=ser.port, batteries=2, console_pipeline=pipeline)))
+        # Skip the startup 'info', periodic 'stat' and daily 'soh' commands
+        adapter._info_called = True
+        adapter._last_stat_time = time.time()
+        adapter._last_soh_time = {1: time.time(), 2: time.time()}
+
+        async def no_pacing(delay):
+            pass
+
+        async def scenario():
+            monkeypatch.setattr(asyncio, "sleep", no_pacing)
+            try:
+                return await adapter.poll()
+            finally:
+                await adapter.close()
+
+        tel = asyncio.run(scenario())
+        assert [(d.power, d.voltage, d.soc) for d in tel.devices] == [(1, 52.0, 81), (2, 52.0, 82)]
+        assert [len(c["cells"]) for c in tel.cells_data] == [16, 16]
+        assert tel.cells_data[1]["cells"][0]["voltage"] == 3.32
+        expected = ["pwr 1", "pwr 2", "bat 1", "bat 2"] if pipeline else ["pwr 1", "bat 1", "pwr 2", "bat 2"]
+        assert [c for c in device.commands if c] == expected
@@ -0,0 +1,193 @@
+"""
+Unit tests for the contiguous-block register read plan
+"""
+
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+
+from solarhub.adapters.read_plan import (
+    RegisterReadPlan, ConnectionLostError, compile_read_plan, readable_registers
+)
+
+MAPS_DIR = Path(__file__).resolve().parent / "register_maps"
+
+
+def _reg(rid, addr, size=1, kind="holding", rw="RO"):
+    return {"id": rid, "addr": addr, "size": size, "kind": kind, "rw": rw}
+
+
+def _decode(reg, words):
+    return list(words)
+
+
+class FakeDevice:
+    """Register image that rejects reads touching unsupported addresses."""
+
+    def __init__(self, bad_addrs=(), offset=0):
+        self.bad_addrs = set(bad_addrs)
+        self.offset = offset
+        self.frames = 0
+
+    async def read(self, kind, addr, count):
+        self.frames += 1
+        for a in range(addr, addr + count):
+            if a in self.bad_addrs:
+                raise RuntimeError(f"read error at 0x{addr:04X}: illegal address")
+        return [(a - self.offset) & 0xFFFF for a in range(addr, addr + count)]
+
+
+class TestCompileReadPlan:
+    """Test block compilation"""
+
+    def test_merges_contiguous_and_small_gaps(self):
+        regs = [_reg("a", 10), _reg("b", 11, 2), _reg("c", 16), _reg("d", 40)]
+        blocks = compile_read_plan(regs, max_block_regs=64, max_gap=4)
+        assert [(b.start, b.count) for b in blocks] == [(10, 7), (40, 1)]
+        assert [m.offset for m in blocks[0].members] == [0, 1, 6]
+
+    def test_respects_block_size_limit(self):
+        regs = [_reg(f"r{i}", i) for i in range(100)]
+        blocks = compile_read_plan(regs, max_block_regs=32, max_gap=0)
+        assert [b.count for b in blocks] == [32, 32, 32, 4]
+
+    def test_kinds_and_write_only_are_separated(self):
+        regs = [_reg("h", 1), _reg("i", 2, kind="input"), _reg("w", 3, rw="WO"), {"id": "x", "addr": 4, "kind": "coil"}]
+        blocks = compile_read_plan(regs)
+        assert sorted((b.kind, b.start) for b in blocks) == [("holding", 1), ("input", 2)]
+
+    @pytest.mark.parametrize("name", ["powdrive", "iammeter", "senergy"])
+    def test_shipped_maps_compile_to_few_blocks(self, name):
+        regs = json.loads((MAPS_DIR / f"{name}_registers.json").read_text(encoding="utf-8"))
+        blocks = compile_read_plan(regs)
+        covered = sum(len(b.members) for b in blocks)
+        assert covered == len(readable_registers(regs))
+        assert len(blocks) < covered / 3
+        assert all(b.count <= 64 for b in blocks)
+
+
+class TestRegisterReadPlan:
+    """Test plan execution and bisection"""
+
+    def test_reads_all_registers_in_one_frame(self):
+        asyncio.run(self._test_reads_all_registers_in_one_frame())
+
+    async def _test_reads_all_registers_in_one_frame(self):
+        regs = [_reg("a", 100), _reg("b", 101, 2), _reg("c", 105)]
+        plan = RegisterReadPlan(regs)
+        device = FakeDevice(offset=0)
+        values = await plan.execute(device.read, _decode)
+        assert values == {"a": [100], "b": [101, 102], "c": [105]}
+        assert device.frames == 1
+
+    def test_addr_offset_applied_on_the_wire(self):
+        asyncio.run(self._test_addr_offset_applied_on_the_wire())
+
+    async def _test_addr_offset_applied_on_the_wire(self):
+        plan = RegisterReadPlan([_reg("a", 5)])
+        device = FakeDevice(offset=1)
+        values = await plan.execute(device.read, _decode, addr_offset=1)
+        assert values == {"a": [5]}
+
+    def test_failed_block_is_bisected_and_split_remembered(self):
+        asyncio.run(self._test_failed_block_is_bisected_and_split_remembered())
+
+    async def _test_failed_block_is_bisected_and_split_remembered(self):
+        regs = [_reg(f"r{i}", i) for i in range(16)]
+        # Address 7 is a hole in the device's map; register r7 itself is unreadable
+        plan = RegisterReadPlan(regs, retry_after_polls=5)
+        device = FakeDevice(bad_addrs={7})
+        values = await plan.execute(device.read, _decode)
+        assert set(values) == {f"r{i}" for i in range(16)} - {"r7"}
+        assert plan.bisections > 0
+
+        device.frames = 0
+        values = await plan.execute(device.read, _decode)
+        assert "r7" not in values and len(values) == 15
+        # Learned split: r7 is backed off, remaining registers read without new bisections
+        assert device.frames == len(plan.blocks) - 1
+
+    def test_transient_error_does_not_split_and_splits_are_retried_whole(self):
+        asyncio.run(self._test_transient_error_does_not_split_and_splits_are_retried_whole())
+
+    async def _test_transient_error_does_not_split_and_splits_are_retried_whole(self):
+        regs = [_reg(f"r{i}", i) for i in range(8)]
+        plan = RegisterReadPlan(regs, remerge_after_cycles=3)
+        device = FakeDevice()
+        glitches = [1]
+        read = device.read
+
+        async def flaky(kind, addr, count):
+            if glitches[0]:
+                glitches[0] -= 1
+                raise RuntimeError("CRC error")
+            return await read(kind, addr, count)
+
+        # One CRC error: the block is read again, not bisected
+        await plan.execute(flaky, _decode)
+        assert plan.transient_failures == 1 and plan.bisections == 0 and len(plan.blocks) == 1
+
+        # A bad patch splits the block; once the bus is clean the original is read whole again
+        device.bad_addrs = {3}
+        await plan.execute(device.read, _decode)
+        assert plan.bisections > 0 and plan.get_statistics()["split_blocks"] == len(plan.blocks) > 1
+        device.bad_addrs = set()
+        for _ in range(3):
+            values = await plan.execute(device.read, _decode)
+        assert plan.remerges == 1 and len(values) == 8
+        assert [(b.start, b.count) for b in plan.blocks] == [(0, 8)]
+        device.frames = 0
+        await plan.execute(device.read, _decode)
+        assert device.frames == 1
+
+    def test_gap_hole_is_bridged_after_bisection(self):
+        asyncio.run(self._test_gap_hole_is_bridged_after_bisection())
+
+    async def _test_gap_hole_is_bridged_after_bisection(self):
+        regs = [_reg("a", 0), _reg("b", 4)]
+        plan = RegisterReadPlan(regs, max_gap=8)
+        device = FakeDevice(bad_addrs={2})
+        values = await plan.execute(device.read, _decode)
+        assert values == {"a": [0], "b": [4]}
+        assert [(b.start, b.count) for b in plan.blocks] == [(0, 1), (4, 1)]
+
+    def test_connection_loss_aborts_without_bisection(self):
+        asyncio.run(self._test_connection_loss_aborts_without_bisection())
+
+    async def _test_connection_loss_aborts_without_bisection(self):
+        regs = [_reg("a", 0), _reg("b", 200)]
+        plan = RegisterReadPlan(regs)
+
+        async def read(kind, addr, count):
+            if addr == 200:
+                raise RuntimeError("client not connected")
+            return [1] * count
+
+        with pytest.raises(ConnectionLostError) as exc:
+            await plan.execute(read, _decode)
+        assert exc.value.values == {"a": [1]}
+        assert plan.bisections == 0
+        assert len(plan.blocks) == 2
+
+    def test_slow_registers_read_every_nth_poll(self):
+        asyncio.run(self._test_slow_registers_read_every_nth_poll())
+
+    async def _test_slow_registers_read_every_nth_poll(self):
+        regs = [_reg("power", 0), {**_reg("energy", 1, 2), "unit": "kWh"}, _reg("limit", 40, rw="RW")]
+        plan = RegisterReadPlan(regs, slow_every=3)
+        assert sorted((b.start, b.slow) for b in plan.blocks) == [(0, False), (1, True), (40, True)]
+        device = FakeDevice()
+        frames = []
+        for _ in range(4):
+            device.frames = 0
+            values = await plan.execute(device.read, _decode)
+            assert set(values) == {"power", "energy", "limit"}
+            frames.append(device.frames)
+        assert frames == [3, 1, 1, 3]
+
+        plan.refresh_slow()
+        device.frames = 0
+        await plan.execute(device.read, _decode)
+        assert device.frames == 3
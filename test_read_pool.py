@@ -0,0 +1,113 @@
+"""
+Unit tests for the shared read-only SQLite connection pool
+"""
+
+import sqlite3
+import threading
+
+import pytest
+
+from solarhub.logging.read_pool import (
+    PoolTimeout,
+    ReadConnectionPool,
+    close_read_pools,
+    configure_read_pools,
+    get_read_pool,
+    get_read_pool_statistics,
+    read_connection,
+)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "pool.db")
+    con = sqlite3.connect(path)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("CREATE TABLE t (x INTEGER)")
+    con.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(10)])
+    con.commit()
+    con.close()
+    yield path
+    close_read_pools()
+    configure_read_pools()
+
+
+def test_connections_are_reused_and_read_only(db_path):
+    pool = ReadConnectionPool(db_path, size=2)
+    with pool.connection() as con:
+        first = con
+        assert con.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 10
+        with pytest.raises(sqlite3.OperationalError):
+            con.execute("INSERT INTO t VALUES (99)")
+    with pool.connection() as con:
+        assert con is first
+    stats = pool.get_statistics()
+    assert stats["open"] == 1
+    assert stats["acquisitions"] == 2
+    assert stats["in_use"] == 0
+    pool.close()
+
+
+def test_sees_writes_from_other_connections(db_path):
+    pool = ReadConnectionPool(db_path, size=1)
+    with pool.connection() as con:
+        con.execute("SELECT COUNT(*) FROM t").fetchone()
+    writer = sqlite3.connect(db_path)
+    writer.execute("INSERT INTO t VALUES (10)")
+    writer.commit()
+    writer.close()
+    with pool.connection() as con:
+        assert con.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 11
+    pool.close()
+
+
+def test_row_factory_is_reset_on_release(db_path):
+    pool = ReadConnectionPool(db_path, size=1)
+    with pool.connection() as con:
+        con.row_factory = sqlite3.Row
+    with pool.connection() as con:
+        assert con.row_factory is None
+    pool.close()
+
+
+def test_waits_then_times_out_when_exhausted(db_path):
+    pool = ReadConnectionPool(db_path, size=1, acquire_timeout_s=0.2)
+    held = pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+
+    released = threading.Timer(0.05, pool.release, args=(held,))
+    pool.acquire_timeout_s = 2.0
+    released.start()
+    con = pool.acquire()
+    assert con is held
+    pool.release(con)
+    stats = pool.get_statistics()
+    assert stats["waits"] == 2
+    assert stats["timeouts"] == 1
+    assert stats["max_wait_ms"] > 0
+    pool.close()
+
+
+def test_broken_connection_is_discarded(db_path):
+    pool = ReadConnectionPool(db_path, size=1)
+    with pytest.raises(sqlite3.DatabaseError):
+        with pool.connection() as con:
+            raise sqlite3.DatabaseError("corrupt")
+    assert pool.get_statistics()["discarded"] == 1
+    with pool.connection() as other:
+        assert other is not con
+    pool.close()
+
+
+def test_shared_registry_and_disabled_mode(db_path):
+    configure_read_pools(size=3)
+    with read_connection(db_path) as con:
+        con.execute("SELECT 1").fetchone()
+    assert get_read_pool(db_path).size == 3
+    assert get_read_pool_statistics()[db_path]["acquisitions"] == 1
+
+    configure_read_pools(enabled=False)
+    with read_connection(db_path) as con:
+        con.execute("INSERT INTO t VALUES (42)")  # plain connection, not query_only
+    assert get_read_pool_statistics()[db_path]["acquisitions"] == 1
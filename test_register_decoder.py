@@ -0,0 +1,114 @@
+"""
+Unit tests for precompiled register decoders
+"""
+
+import json
+import random
+from pathlib import Path
+
+import pytest
+
+from solarhub.adapters.read_plan import compile_read_plan
+from solarhub.adapters.register_decoder import (
+    DIALECT_MIXIN, DIALECT_SENERGY, RegisterDecoder, compile_decoders, decode_block, pack_words
+)
+
+MAPS_DIR = Path(__file__).resolve().parent / "register_maps"
+MAPS = ["powdrive", "iammeter", "senergy"]
+
+
+def _load(name):
+    return json.loads((MAPS_DIR / f"{name}_registers.json").read_text(encoding="utf-8"))
+
+
+def _reference_mixin(r, regs):
+    """Per-call decode as JsonRegisterMixin._decode_words did before compilation."""
+    t = (r.get("type") or "").lower()
+    size = max(1, int(r.get("size", 1)))
+    scale = r.get("scale")
+    if (r.get("encoder") or "").lower() == "ascii":
+        buf = bytearray()
+        for w in regs[:size]:
+            buf += bytes(((w >> 8) & 0xFF, w & 0xFF))
+        return bytes(buf).split(b"\x00", 1)[0].decode("ascii", errors="ignore").strip()
+    if r.get("bitmask") and regs:
+        regs = [int(regs[0]) & int(r["bitmask"])]
+        if r.get("higherBits"):
+            regs = [(regs[0] >> 8) & 0xFF]
+    if size == 1 and regs:
+        val = int(regs[0])
+        if "s16" in t and val >= 0x8000:
+            val -= 0x10000
+    elif size == 2 and len(regs) >= 2:
+        val = (regs[0] << 16) | regs[1]
+        if "s32" in t and val & 0x80000000:
+            val = -((~val & 0xFFFFFFFF) + 1)
+    else:
+        val = 0
+    if scale and isinstance(val, (int, float)):
+        val = val * scale
+    if isinstance(r.get("bit_enum"), dict) and isinstance(val, int):
+        msgs = [str(v) for k, v in r["bit_enum"].items() if val & (1 << int(k))]
+        return msgs or ["OK"]
+    return val
+
+
+class TestRegisterDecoder:
+    """Test decode semantics of both dialects"""
+
+    def test_signed_and_unsigned_words(self):
+        assert RegisterDecoder({"addr": 0, "type": "S16"}).decode([0xFFFE]) == -2
+        assert RegisterDecoder({"addr": 0, "type": "U16"}).decode([0xFFFE]) == 0xFFFE
+        assert RegisterDecoder({"addr": 0, "type": "S32", "size": 2}).decode([0xFFFF, 0xFFFF]) == -1
+        assert RegisterDecoder({"addr": 0, "type": "U32", "size": 2}).decode([1, 2]) == 0x10002
+
+    def test_scale_rounding_per_dialect(self):
+        reg = {"addr": 0, "type": "U16", "scale": 0.1}
+        assert RegisterDecoder(reg, DIALECT_MIXIN).decode([3]) == 3 * 0.1
+        assert RegisterDecoder(reg, DIALECT_SENERGY).decode([3]) == 0.3
+
+    def test_senergy_encoders_and_enums(self):
+        hhmm = RegisterDecoder({"addr": 0, "encoder": "hhmm"}, DIALECT_SENERGY)
+        assert hhmm.decode([(7 << 8) | 30]) == "07:30"
+        assert hhmm.decode([(25 << 8) | 1]) == {"hour": 25, "minute": 1}
+        md = RegisterDecoder({"addr": 0, "encoder": "month_day"}, DIALECT_SENERGY)
+        assert md.decode([(12 << 8) | 31]) == "12-31"
+        mode = RegisterDecoder({"addr": 0, "enum": {"0x01": "Grid", "2": "Off"}}, DIALECT_SENERGY)
+        assert mode.decode([1]) == "Grid"
+        assert mode.decode([9]) == "UNKNOWN(9)"
+        flags = RegisterDecoder({"addr": 0, "bit_enum": {"0": "A", "3": "B"}}, DIALECT_SENERGY)
+        assert flags.decode([0b1001]) == ["A", "B"]
+        assert flags.decode([0]) == ["OK"]
+        ascii_reg = RegisterDecoder({"addr": 0, "size": 2, "unit": "ASCII"}, DIALECT_SENERGY)
+        assert ascii_reg.decode([0x4142, 0x4300]) == "ABC"
+
+    def test_short_response(self):
+        reg = {"addr": 0, "type": "U32", "size": 2, "scale": 0.5}
+        assert RegisterDecoder(reg, DIALECT_MIXIN).decode([1]) == 0
+        assert RegisterDecoder(reg, DIALECT_SENERGY).decode([1]) is None
+
+    def test_bitmask_higher_bits(self):
+        reg = {"addr": 0, "bitmask": 0xFF00, "higherBits": True}
+        assert RegisterDecoder(reg).decode([0x1234]) == 0x12
+
+    def test_bad_entry_is_skipped(self):
+        decoders = compile_decoders([{"addr": 0, "enum": {"x": "bad"}}, {"addr": 1}], DIALECT_SENERGY)
+        assert [d.addr for d in decoders] == [1]
+
+    @pytest.mark.parametrize("name", MAPS)
+    def test_block_decode_matches_reference(self, name):
+        """Block decoding of a shipped map equals the old per-register decode"""
+        regs = _load(name)
+        rnd = random.Random(name)
+        blocks = compile_read_plan(regs, decoder_factory=RegisterDecoder)
+        for _ in range(20):
+            for block in blocks:
+                words = [rnd.randrange(0x10000) for _ in range(block.count)]
+                values, expected = {}, {}
+                decode_block(block.members, words, values)
+                for m in block.members:
+                    expected[m.reg_id] = _reference_mixin(m.reg, words[m.offset:m.offset + m.size])
+                assert values == expected
+
+    def test_pack_words_masks_out_of_range(self):
+        assert pack_words([0x1FFFF, 1]) == b"\xff\xff\x00\x01"
@@ -0,0 +1,161 @@
+"""
+Unit tests for the holding-register shadow image
+"""
+
+import asyncio
+
+from solarhub.adapters.read_plan import RegisterReadPlan
+from solarhub.adapters.register_shadow import RegisterShadow
+
+
+def _reg(rid, addr, size=1, kind="holding", rw="RW"):
+    return {"id": rid, "addr": addr, "size": size, "kind": kind, "rw": rw, "type": "U16"}
+
+
+class FakeDevice:
+    """Holding register image; counts frames and can drop the link."""
+
+    def __init__(self):
+        self.words = {a: a * 10 for a in range(0, 400)}
+        self.frames = 0
+        self.lost = False
+
+    async def read(self, kind, addr, count):
+        if self.lost:
+            raise RuntimeError("Client not connected")
+        self.frames += 1
+        return [self.words[a] for a in range(addr, addr + count)]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+REGS = ([_reg(f"h{i}", i) for i in range(0, 40)] + [_reg(f"k{i}", 100 + i) for i in range(20)]
+        + [_reg("ro", 200, rw="RO"), _reg("input_power", 300, kind="input", rw="RO")])
+
+
+def make_shadow(clock, blocks_per_poll=1):
+    return RegisterShadow(REGS, refresh_s=600, blocks_per_poll=blocks_per_poll, max_block_regs=32,
+                          max_gap=4, clock=clock)
+
+
+def test_execute_blocks_reads_a_slice_and_wraps():
+    device = FakeDevice()
+    plan = RegisterReadPlan([_reg(f"r{i}", i * 40) for i in range(5)], max_gap=0)
+    values, following = asyncio.run(plan.execute_blocks(device.read, 1, 2, decode_fn=lambda reg, words: words[0]))
+    assert values == {"r1": 400, "r2": 800} and following == 3
+    values, following = asyncio.run(plan.execute_blocks(device.read, 3, 5, decode_fn=lambda reg, words: words[0]))
+    assert set(values) == {"r3", "r4"} and following == 0 and device.frames == 4
+
+
+def test_refresh_reads_holding_blocks_a_few_per_poll_on_the_slow_cadence():
+    clock, device = Clock(), FakeDevice()
+    shadow = make_shadow(clock)
+    assert shadow.reg_ids == {f"h{i}" for i in range(40)} | {f"k{i}" for i in range(20)} | {"ro"}
+    blocks = len(shadow.plan.blocks)
+    assert blocks == 4
+
+    reads = [asyncio.run(shadow.refresh(device.read)) for _ in range(blocks)]
+    assert reads == [1] * blocks and shadow.passes == 1 and device.frames == blocks
+    values, meta = shadow.get(["h3", "k5", "ro"])
+    assert values == {"h3": 30, "k5": 1050, "ro": 2000}
+    assert meta["stale"] is False and meta["missing"] == [] and meta["age_s"] == 0.0
+
+    # Nothing to do until refresh_s has passed, then the next pass starts
+    clock.now += 300
+    assert asyncio.run(shadow.refresh(device.read)) == 0 and device.frames == blocks
+    clock.now += 301
+    assert asyncio.run(shadow.refresh(device.read)) == 1
+    assert shadow.get(["k5"])[1]["age_s"] == 601.0
+
+
+def test_versions_write_through_and_read_back():
+    clock, device = Clock(), FakeDevice()
+    shadow = make_shadow(clock, blocks_per_poll=8)
+    asyncio.run(shadow.refresh(device.read))
+    version = shadow.version
+    asyncio.run(shadow.refresh(device.read))
+    assert shadow.version == version  # unchanged values keep the version
+
+    # A write is visible at once and read back (device clamps it) on the next refresh
+    shadow.record("k5", 5000, source="write")
+    assert shadow.get(["k5"])[0]["k5"] == 5000 and shadow.version == version + 1
+    device.words[105] = 4000
+    before = device.frames
+    assert asyncio.run(shadow.refresh(device.read)) == 1 and device.frames == before + 1
+    assert shadow.get(["k5"])[0]["k5"] == 4000 and shadow.version == version + 2
+
+    # Registers outside the image are ignored
+    shadow.record("input_power", 1)
+    assert not shadow.covers("input_power") and shadow.version == version + 2
+
+
+def test_missing_values_are_requested_and_connection_loss_is_survived():
+    clock, device = Clock(), FakeDevice()
+    shadow = make_shadow(clock)
+    values, meta = shadow.get(["k1"])
+    assert values == {"k1": None} and meta["stale"] and meta["missing"] == ["k1"]
+    # The wanted register's block is read before the cursor's first block
+    assert asyncio.run(shadow.refresh(device.read)) == 1
+    assert shadow.get(["k1"])[0] == {"k1": 1010} and shadow.get(["h0"])[0] == {"h0": None}
+
+    device.lost = True
+    assert asyncio.run(shadow.refresh(device.read)) == 0
+    assert shadow.refresh_errors == 1 and "not connected" in shadow.last_error
+
+
+def test_adapter_serves_settings_from_the_shadow():
+    from types import SimpleNamespace
+
+    from solarhub.adapters.base import JsonRegisterMixin
+
+    class Adapter(JsonRegisterMixin):
+        def __init__(self, device):
+            self.inv = SimpleNamespace(adapter=SimpleNamespace(shadow_refresh_s=600, shadow_blocks_per_poll=8,
+                                                               read_block_max_regs=32, read_block_max_gap=4))
+            self.regs = REGS
+            self.device = device
+            self.written = []
+
+        async def _read_holding_regs(self, addr, count):
+            return await self.device.read("holding", addr, count)
+
+        async def _write_holding_u16(self, addr, value):
+            self.written.append((addr, value))
+            self.device.words[addr] = value
+
+    device = FakeDevice()
+    adapter = Adapter(device)
+    asyncio.run(adapter.refresh_shadow())
+    frames = device.frames
+    values, meta, uncovered = adapter.shadow_values(["h2", "K3", "input_power", "nope"])
+    assert values == {"h2": 20, "K3": 1030} and uncovered == ["input_power", "nope"]
+    assert device.frames == frames and meta["version"] == adapter.register_shadow.version
+
+    asyncio.run(adapter.write_by_ident("k3", 77))
+    assert adapter.written == [(103, 77)] and adapter.shadow_values(["k3"])[0] == {"k3": 77}
+    assert adapter.register_shadow.get_statistics()["known"] == 61
+
+    adapter.inv.adapter.shadow_refresh_s = 0
+    adapter.regs = list(REGS)  # a replaced map rebuilds the shadow, here disabled
+    assert adapter.register_shadow is None and asyncio.run(adapter.refresh_shadow()) == 0
+
+
+def test_adapter_shadow_honours_a_zero_read_gap():
+    from types import SimpleNamespace
+
+    from solarhub.adapters.base import JsonRegisterMixin
+
+    class Adapter(JsonRegisterMixin):
+        def __init__(self, max_gap):
+            self.inv = SimpleNamespace(adapter=SimpleNamespace(shadow_refresh_s=600, read_block_max_regs=32,
+                                                               read_block_max_gap=max_gap))
+            self.regs = [_reg("a", 10), _reg("b", 12)]
+
+    assert len(Adapter(0).register_shadow.plan.blocks) == 2
+    assert len(Adapter(None).register_shadow.plan.blocks) == 1
@@ -0,0 +1,184 @@
+"""
+Unit tests for tiered retention and downsampling of raw telemetry
+"""
+
+import sqlite3
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from solarhub.database_optimizer import DatabaseOptimizer
+from solarhub.history_query import HistoryQuery
+from solarhub.logging.cell_store import ensure_cell_tables
+from solarhub.logging.retention import KIND_THIN, RetentionJob, RetentionPolicy, default_policies
+from solarhub.logging.rollups import ensure_rollup_tables
+
+TZ = timezone(timedelta(hours=5))
+NOW = datetime(2025, 6, 1, 12, 0, 7, tzinfo=TZ)
+HOUR = 1 / 24  # days
+STEP_S = 10
+
+
+def samples(hours: float = 3.0):
+    """10 s samples of two arrays over the last ``hours``: (ts, array_id, epoch, pv, soc)."""
+    rows = []
+    t = NOW - timedelta(hours=hours)
+    i = 0
+    while t < NOW:
+        for array_id in ("a1", "a2"):
+            rows.append((str(t), array_id, int(t.timestamp()), 1000 + i % 37 * 10, 50.0 + i % 11))
+        t += timedelta(seconds=STEP_S)
+        i += 1
+    return rows
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "retention.db")
+    con = sqlite3.connect(path)
+    con.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    con.execute("CREATE TABLE energy_samples (ts TEXT NOT NULL, inverter_id TEXT, pv_power_w INTEGER)")
+    con.execute("""CREATE TABLE array_samples (ts TEXT NOT NULL, array_id TEXT NOT NULL, pv_power_w INTEGER,
+                   batt_soc_pct REAL, system_id TEXT, PRIMARY KEY (ts, array_id))""")
+    rows = samples()
+    con.executemany("INSERT INTO array_samples VALUES (?, ?, ?, ?, 'sys')",
+                    [(ts, a, pv, soc) for ts, a, _, pv, soc in rows])
+    con.commit()
+    yield path, con, rows
+    con.close()
+
+
+def array_policy(**kwargs) -> RetentionPolicy:
+    values = dict(raw_days=HOUR, minute_days=1.5 * HOUR)
+    return RetentionPolicy("array_samples", ("array_id",), **{**values, **kwargs})
+
+
+def expected_buckets(rows, bucket_s: int, lo: float, hi: float):
+    out = defaultdict(list)
+    for _, array_id, epoch, pv, soc in rows:
+        if lo <= epoch < hi:
+            out[(array_id, epoch - epoch % bucket_s)].append((pv, soc))
+    return {k: (len(v), sum(p for p, _ in v) / len(v), sum(s for _, s in v) / len(v)) for k, v in out.items()}
+
+
+def test_tiers_match_raw_averages(db):
+    path, con, rows = db
+    now = NOW.timestamp()
+    job = RetentionJob(path, [array_policy()], chunk_rows=97, pause_s=0)  # chunks straddle buckets
+    assert job.run(now=now)
+
+    raw_cutoff, minute_cutoff = int(now - 3600), int(now - 5400)
+    kept = con.execute("SELECT COUNT(*), MIN(ts) FROM array_samples").fetchone()
+    assert kept[0] == sum(1 for r in rows if r[2] >= raw_cutoff)
+
+    minute = {(a, b): (n, pv, soc) for a, b, n, pv, soc in con.execute(
+        "SELECT array_id, bucket_ts, sample_count, pv_power_w, batt_soc_pct FROM array_samples_1m")}
+    want = expected_buckets(rows, 60, minute_cutoff - minute_cutoff % 60 + 60, raw_cutoff)
+    assert {k: v for k, v in minute.items() if k in want} == pytest.approx(want)
+    assert all(b >= minute_cutoff - 60 for _, b in minute)
+
+    quarter = {(a, b): (n, pv, soc) for a, b, n, pv, soc in con.execute(
+        "SELECT array_id, bucket_ts, sample_count, pv_power_w, batt_soc_pct FROM array_samples_15m")}
+    full = {k: v for k, v in expected_buckets(rows, 900, 0, minute_cutoff - minute_cutoff % 60).items()
+            if k[1] + 900 <= minute_cutoff - minute_cutoff % 60}
+    assert full and {k: quarter[k] for k in full} == pytest.approx(full)
+    # Every raw sample is accounted for exactly once
+    counted = sum(v[0] for v in minute.values()) + sum(v[0] for v in quarter.values())
+    assert counted + kept[0] == len(rows)
+    assert con.execute("SELECT DISTINCT system_id FROM array_samples_15m").fetchall() == [("sys",)]
+
+    # A second pass finds nothing to do
+    stats = job.get_statistics()
+    assert job.run(now=now) and job.get_statistics()["rows_deleted"] == stats["rows_deleted"]
+
+
+def test_history_reads_through_the_tiers(db):
+    path, con, rows = db
+    start = NOW.replace(hour=9, minute=0, second=0)
+    end = NOW.replace(minute=0, second=0)
+    before = HistoryQuery(path).query("array", None, ["pv_power_w", "batt_soc_pct"], start, end, combine="mean")
+    assert RetentionJob(path, [array_policy()], chunk_rows=97, pause_s=0).run(now=NOW.timestamp())
+    assert con.execute("SELECT COUNT(*) FROM array_samples_15m").fetchone()[0] > 0
+
+    # Same hourly averages and counts once most of the range lives in the 1-minute and 15-minute tiers
+    after = HistoryQuery(path).query("array", None, ["pv_power_w", "batt_soc_pct"], start, end, combine="mean")
+    assert after["count"] == before["count"] and sum(after["count"]) > 0
+    for metric in ("pv_power_w", "batt_soc_pct"):
+        assert after["series"][metric] == pytest.approx(before["series"][metric])
+
+
+def test_interrupted_pass_resumes(db, tmp_path):
+    path, con, rows = db
+    now = NOW.timestamp()
+    stop = threading.Event()
+    job = RetentionJob(path, [array_policy()], chunk_rows=50, pause_s=0)
+    original = job._delete
+
+    def delete_then_stop(*args):
+        stop.set()
+        return original(*args)
+
+    job._delete = delete_then_stop
+    assert not job.run(stop, now=now)
+    assert job.chunks == 1
+    job._delete = original
+    assert RetentionJob(path, [array_policy()], chunk_rows=50, pause_s=0).run(now=now)
+
+    quarter = con.execute("SELECT SUM(sample_count) FROM array_samples_15m").fetchone()[0]
+    minute = con.execute("SELECT SUM(sample_count) FROM array_samples_1m").fetchone()[0]
+    raw = con.execute("SELECT COUNT(*) FROM array_samples").fetchone()[0]
+    assert quarter + minute + raw == len(rows)
+
+
+def test_thin_cell_frames_and_expire_rollups(tmp_path):
+    path = str(tmp_path / "cells.db")
+    con = sqlite3.connect(path)
+    ensure_cell_tables(con.cursor())
+    ensure_rollup_tables(con.cursor())
+    start_ms = int((NOW - timedelta(hours=3)).timestamp() * 1000)
+    frames = [(str(NOW), start_ms + i * 10_000, "bank", power, 16)
+              for i in range(3 * 360) for power in (1, 2)]
+    con.executemany("INSERT INTO battery_cell_frames (ts, ts_ms, bank_id, power, cell_count) VALUES (?,?,?,?,?)",
+                    frames)
+    con.executemany("INSERT INTO rollup_minute (scope, entity_id, metric, bucket_ts) VALUES ('array', 'a1', 'pv', ?)",
+                    [(start_ms // 1000 + i * 60,) for i in range(180)])
+    con.commit()
+    now = NOW.timestamp()
+    policies = [p for p in default_policies(raw_days=HOUR, minute_days=2 * HOUR)
+                if p.table in ("battery_cell_frames", "rollup_minute")]
+    assert [p.kind for p in policies] == [KIND_THIN, "expire"]
+    assert RetentionJob(path, policies, chunk_rows=333, pause_s=0).run(now=now)
+
+    raw_cutoff, minute_cutoff = (now - 3600) * 1000, (now - 7200) * 1000
+    for power in (1, 2):
+        ts = [r[0] for r in con.execute("SELECT ts_ms FROM battery_cell_frames WHERE power = ? ORDER BY ts_ms",
+                                        (power,))]
+        old = [t for t in ts if t < minute_cutoff]
+        middle = [t for t in ts if minute_cutoff <= t < raw_cutoff]
+        assert len({t // 900_000 for t in old}) == len(old)  # one frame per quarter hour
+        assert len({t // 60_000 for t in middle}) == len(middle)  # one frame per minute
+        assert middle and [t for t in ts if t >= raw_cutoff] == [start_ms + i * 10_000 for i in range(3 * 360)
+                                                                    if start_ms + i * 10_000 >= raw_cutoff]
+        assert all(t % 900_000 < 10_000 for t in old[1:])  # the first frame of each bucket is kept
+    assert con.execute("SELECT MIN(bucket_ts) FROM rollup_minute").fetchone()[0] >= now - 7200
+    con.close()
+
+
+def test_incremental_vacuum_and_stats(db):
+    path, con, rows = db
+    con.close()
+    before = DatabaseOptimizer(path).get_database_stats()
+    assert before["auto_vacuum"] == "incremental" and "retention" not in before
+    assert "array_samples" in before["tables"]
+
+    job = RetentionJob(path, [array_policy(raw_days=0.1 * HOUR)], chunk_rows=200, pause_s=0,
+                       vacuum_pages_per_step=2)
+    assert job.run(now=NOW.timestamp())
+    after = DatabaseOptimizer(path).get_database_stats()
+    assert job.bytes_reclaimed > 0 and after["free_mb"] == 0
+    assert after["database_size_mb"] < before["database_size_mb"]
+    assert after["retention"]["rows_deleted"] == job.rows_deleted > 0
+    assert after["retention"]["space_reclaimed_mb"] == round(job.bytes_reclaimed / (1024 * 1024), 2)
+    assert {"array_samples_1m", "array_samples_15m"} <= set(after["tables"])
@@ -0,0 +1,140 @@
+"""
+Unit tests for the ingest-time minute/hour rollups
+"""
+
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from solarhub.logging import rollups
+from solarhub.logging.rollups import RollupEngine, ensure_rollup_tables, read_hourly
+
+TZ = timezone(timedelta(hours=5))
+T0 = datetime(2025, 6, 1, 10, 0, 0, tzinfo=TZ)
+
+
+@pytest.fixture
+def db():
+    con = sqlite3.connect(":memory:")
+    ensure_rollup_tables(con.cursor())
+    # Pretend rollups have been running since before the test data
+    con.execute("UPDATE rollup_meta SET value = ? WHERE key = 'started_at'",
+                (str(int((T0 - timedelta(days=1)).timestamp())),))
+    yield con
+    con.close()
+
+
+def _flush(engine, con):
+    engine.end_cycle()
+    job = engine.drain_job()
+    if job is not None:
+        job(con.cursor())
+        con.commit()
+
+
+class TestRollupEngine:
+    """Test bucket accumulation and energy integration"""
+
+    def test_constant_power_energy_and_stats(self, db):
+        engine = RollupEngine()
+        # 1000 W for one hour, sampled every 10 s (10:00:00 .. 11:00:00)
+        for i in range(361):
+            engine.add_sample("inverter", "inv1", T0 + timedelta(seconds=10 * i), {"pv_power_w": 1000})
+            if i % 30 == 0:
+                _flush(engine, db)
+        _flush(engine, db)
+
+        buckets = read_hourly(db.cursor(), "inverter", ("pv_power_w",), T0, T0 + timedelta(hours=1))
+        b = buckets[(int(T0.timestamp()), "pv_power_w")]
+        assert b["energy_in_kwh"] == pytest.approx(1.0)
+        assert b["energy_out_kwh"] == 0
+        assert b["sample_count"] == 360
+        assert b["value_sum"] / b["sample_count"] == 1000
+        minute = db.execute("SELECT COUNT(*), SUM(energy_in_kwh) FROM rollup_minute").fetchone()
+        assert minute[0] == 61
+        assert minute[1] == pytest.approx(1.0)
+
+    def test_sign_change_splits_import_export(self, db):
+        engine = RollupEngine()
+        engine.add_sample("inverter", "inv1", T0, {"grid_power_w": 1000})
+        engine.add_sample("inverter", "inv1", T0 + timedelta(seconds=36), {"grid_power_w": -1000})
+        _flush(engine, db)
+        b = read_hourly(db.cursor(), "inverter", ("grid_power_w",), T0, T0 + timedelta(hours=1))
+        row = b[(int(T0.timestamp()), "grid_power_w")]
+        # Two triangles of 18 s at 1 kW peak: 0.0025 kWh each
+        assert row["energy_in_kwh"] == pytest.approx(0.0025)
+        assert row["energy_out_kwh"] == pytest.approx(0.0025)
+
+    def test_gap_is_not_integrated(self, db):
+        engine = RollupEngine(max_gap_s=60)
+        engine.add_sample("inverter", "inv1", T0, {"pv_power_w": 500})
+        engine.add_sample("inverter", "inv1", T0 + timedelta(minutes=10), {"pv_power_w": 500})
+        _flush(engine, db)
+        total = db.execute("SELECT SUM(energy_in_kwh) FROM rollup_hour").fetchone()[0]
+        assert total == 0
+        assert engine.get_statistics()["integration_gaps"] == 1
+
+    def test_deltas_accumulate_across_flushes(self, db):
+        """Upserts add onto existing rows (restart-safe) and keep min/max"""
+        for value in (100, 300):
+            engine = RollupEngine()
+            engine.add_sample("meter", "m1", T0 + timedelta(seconds=5), {"grid_voltage_v": value})
+            _flush(engine, db)
+        row = db.execute("SELECT sample_count, value_sum, value_min, value_max FROM rollup_hour").fetchone()
+        assert row == (2, 400.0, 100.0, 300.0)
+
+    def test_parent_gets_cycle_sum(self, db):
+        engine = RollupEngine()
+        for cycle in range(3):
+            ts = T0 + timedelta(seconds=10 * cycle)
+            engine.add_sample("inverter", "a", ts, {"pv_power_w": 1000}, parents=[("system", "s")])
+            engine.add_sample("inverter", "b", ts, {"pv_power_w": 2000}, parents=[("system", "s")])
+            _flush(engine, db)
+        b = read_hourly(db.cursor(), "system", ("pv_power_w",), T0, T0 + timedelta(hours=1), ["s"])
+        row = b[(int(T0.timestamp()), "pv_power_w")]
+        assert row["sample_count"] == 3
+        assert row["value_max"] == 3000
+        assert row["energy_in_kwh"] == pytest.approx(3000 * 20 / 3_600_000)
+
+    def test_parent_sums_latest_sample_per_child_across_poll_rates(self, db):
+        engine = RollupEngine(max_gap_s=60)
+        parents = [("system", "s")]
+        # "fast" is polled twice in the first cycle, "slow" only in the first one
+        engine.add_sample("inverter", "fast", T0, {"pv_power_w": 900}, parents=parents)
+        engine.add_sample("inverter", "fast", T0 + timedelta(seconds=2), {"pv_power_w": 1000}, parents=parents)
+        engine.add_sample("inverter", "slow", T0 + timedelta(seconds=1), {"pv_power_w": 2000}, parents=parents)
+        engine.end_cycle()
+        engine.add_sample("inverter", "fast", T0 + timedelta(seconds=12), {"pv_power_w": 1000}, parents=parents)
+        engine.end_cycle()
+        # "slow" stopped reporting: dropped once its last sample is older than max_gap_s
+        engine.add_sample("inverter", "fast", T0 + timedelta(seconds=90), {"pv_power_w": 1000}, parents=parents)
+        _flush(engine, db)
+        rows = db.execute("SELECT value_sum, sample_count, value_max FROM rollup_hour WHERE scope = 'system'").fetchone()
+        assert rows == (3000 + 3000 + 1000, 3, 3000)
+
+    def test_partial_hours_come_from_minute_buckets(self, db):
+        engine = RollupEngine()
+        for i in range(0, 7200, 60):
+            engine.add_sample("inverter", "inv1", T0 + timedelta(seconds=i), {"pv_power_w": 600})
+        _flush(engine, db)
+        start = T0 + timedelta(minutes=30)
+        end = T0 + timedelta(hours=1, minutes=30)
+        b = read_hourly(db.cursor(), "inverter", ("pv_power_w",), start, end)
+        first = b[(int(T0.timestamp()), "pv_power_w")]
+        second = b[(int((T0 + timedelta(hours=1)).timestamp()), "pv_power_w")]
+        assert first["sample_count"] == 30 and second["sample_count"] == 30
+        assert first["energy_in_kwh"] + second["energy_in_kwh"] == pytest.approx(0.6)
+
+    def test_coverage_and_finalize(self, db):
+        cur = db.cursor()
+        started = int(T0.timestamp()) + 600
+        cur.execute("UPDATE rollup_meta SET value = ? WHERE key = 'started_at'", (str(started),))
+        assert not rollups.covers(cur, T0)
+        assert rollups.covers(cur, T0 + timedelta(hours=1))
+
+        engine = RollupEngine()
+        engine.add_sample("inverter", "inv1", T0 + timedelta(minutes=5), {"pv_power_w": 1})
+        _flush(engine, db)
+        assert rollups.finalize_hour(cur, T0) == 1
+        assert db.execute("SELECT finalized FROM rollup_minute").fetchone()[0] == 1
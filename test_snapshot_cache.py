@@ -0,0 +1,130 @@
+"""
+Unit tests for the per-poll-cycle "now" response cache
+"""
+
+import asyncio
+import json
+import threading
+import time
+import types
+
+from solarhub.api_server import create_api
+from solarhub.snapshot_cache import SnapshotCache, etag_matches
+
+
+def _asgi_get(app, path, query="", headers=None):
+    """Minimal ASGI GET (no HTTP client needed): returns (status, headers, body)."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": query.encode(), "server": ("test", 80), "client": ("test", 1),
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+    }
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    start = next(m for m in sent if m["type"] == "http.response.start")
+    body = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+    return start["status"], {k.decode(): v.decode() for k, v in start["headers"]}, body
+
+
+class TestSnapshotCache:
+    """Test generation-based invalidation"""
+
+    def test_built_once_per_generation(self):
+        cache = SnapshotCache()
+        calls = []
+        build = lambda: calls.append(1) or {"pv": len(calls)}
+        first = cache.get("k", build)
+        assert cache.get("k", build) is first
+        assert len(calls) == 1
+        cache.bump()
+        second = cache.get("k", build)
+        assert json.loads(second.body) == {"pv": 2}
+        assert second.etag != first.etag
+        stats = cache.get_statistics()
+        assert stats["hits"] == 1 and stats["misses"] == 2 and stats["generation"] == 1
+
+    def test_unchanged_body_keeps_etag(self):
+        cache = SnapshotCache()
+        first = cache.get("k", lambda: {"pv": 1})
+        cache.bump()
+        assert cache.get("k", lambda: {"pv": 1}).etag == first.etag
+
+    def test_errors_are_not_cached(self):
+        cache = SnapshotCache()
+        calls = []
+        build = lambda: calls.append(1) or {"status": "error"}
+        cacheable = lambda content: content.get("status") != "error"
+        cache.get("k", build, cacheable)
+        cache.get("k", build, cacheable)
+        assert len(calls) == 2
+        assert cache.get_statistics()["uncacheable"] == 2
+
+    def test_max_age_expires_entries(self):
+        cache = SnapshotCache(max_age_s=0.01)
+        calls = []
+        cache.get("k", lambda: calls.append(1) or {})
+        time.sleep(0.02)
+        cache.get("k", lambda: calls.append(1) or {})
+        assert len(calls) == 2
+
+    def test_concurrent_requests_share_one_build(self):
+        cache = SnapshotCache()
+        calls = []
+
+        def build():
+            calls.append(1)
+            time.sleep(0.05)
+            return {"v": 1}
+
+        threads = [threading.Thread(target=cache.get, args=("k", build)) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(calls) == 1
+
+    def test_etag_matching(self):
+        assert etag_matches('"abc"', '"abc"')
+        assert etag_matches('W/"abc", "def"', '"abc"')
+        assert etag_matches("*", '"abc"')
+        assert not etag_matches(None, '"abc"')
+        assert not etag_matches('"abd"', '"abc"')
+
+
+def test_now_endpoint_served_from_cache_with_etag():
+    calls = []
+
+    def get_now(inverter_id):
+        calls.append(inverter_id)
+        return {"inverter_id": inverter_id, "pv_power_w": 1200}
+
+    solar_app = types.SimpleNamespace(get_now=get_now, snapshot_cache=SnapshotCache(), inverters=[],
+                                      cfg=types.SimpleNamespace(arrays=None, inverters=[]))
+    app = create_api(solar_app)
+
+    status, headers, body = _asgi_get(app, "/api/now", "inverter_id=inv1")
+    assert status == 200
+    assert headers["content-type"] == "application/json"
+    etag = headers["etag"]
+    built = len(calls)
+    assert built > 0
+
+    status, _, cached = _asgi_get(app, "/api/now", "inverter_id=inv1")
+    assert status == 200 and cached == body
+    assert len(calls) == built
+
+    status, _, empty = _asgi_get(app, "/api/now", "inverter_id=inv1", {"If-None-Match": etag})
+    assert status == 304 and empty == b""
+    assert solar_app.snapshot_cache.get_statistics()["not_modified"] == 1
+
+    solar_app.snapshot_cache.bump()
+    _asgi_get(app, "/api/now", "inverter_id=inv1")
+    assert len(calls) == 2 * built
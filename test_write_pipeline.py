@@ -0,0 +1,154 @@
+"""
+Unit tests for the batched SQLite write pipeline
+"""
+
+import sqlite3
+import threading
+
+import pytest
+
+from solarhub.logging.write_pipeline import WritePipeline
+
+
+def _make_db(tmp_path):
+    path = str(tmp_path / "pipeline.db")
+    con = sqlite3.connect(path)
+    con.execute("CREATE TABLE samples (ts TEXT NOT NULL, value INTEGER)")
+    con.commit()
+    con.close()
+    return path
+
+
+def _count(path):
+    con = sqlite3.connect(path)
+    try:
+        return con.execute("SELECT COUNT(*) FROM samples").fetchone()[0]
+    finally:
+        con.close()
+
+
+def _insert(ts, value):
+    def job(cur):
+        cur.execute("INSERT INTO samples(ts, value) VALUES(?, ?)", (ts, value))
+    return job
+
+
+class TestWritePipeline:
+    """Test batching, flushing and overflow handling"""
+
+    def test_cycle_is_committed_in_one_transaction(self, tmp_path):
+        """All writes queued before a cycle marker share one commit"""
+        path = _make_db(tmp_path)
+        pipeline = WritePipeline(path, flush_interval_ms=5000)
+        pipeline.start()
+        try:
+            for i in range(50):
+                assert pipeline.submit(_insert(f"t{i}", i), "sample")
+            committed = pipeline.mark_cycle()
+            # The cycle's event is set once its writes are committed, without a flush barrier
+            assert committed.wait(timeout=5.0)
+
+            stats = pipeline.get_statistics()
+            assert stats["writes_committed"] == 50
+            assert stats["commits"] == 1
+            assert stats["last_batch_size"] == 50
+            assert _count(path) == 50
+        finally:
+            pipeline.stop()
+
+    def test_wal_mode_enabled(self, tmp_path):
+        """Writer connection switches the database to WAL"""
+        path = _make_db(tmp_path)
+        pipeline = WritePipeline(path)
+        pipeline.start()
+        pipeline.submit(_insert("t", 1))
+        pipeline.flush()
+        pipeline.stop()
+
+        con = sqlite3.connect(path)
+        assert con.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal"
+        con.close()
+
+    def test_failed_job_does_not_poison_batch(self, tmp_path):
+        """A bad row is counted as failed while the rest of the batch commits"""
+        path = _make_db(tmp_path)
+        pipeline = WritePipeline(path, flush_interval_ms=5000)
+        pipeline.start()
+        try:
+            pipeline.submit(_insert("a", 1))
+            pipeline.submit(_insert(None, 2))  # violates NOT NULL
+            pipeline.submit(_insert("c", 3))
+            assert pipeline.flush()
+
+            stats = pipeline.get_statistics()
+            assert stats["writes_committed"] == 2
+            assert stats["writes_failed"] == 1
+            assert _count(path) == 2
+        finally:
+            pipeline.stop()
+
+    def test_failed_job_leaves_no_partial_rows(self, tmp_path):
+        """Statements a failing job already ran are rolled back with it"""
+        path = _make_db(tmp_path)
+        pipeline = WritePipeline(path, flush_interval_ms=5000)
+        pipeline.start()
+
+        def parent_then_bad_child(cur):
+            cur.execute("INSERT INTO samples(ts, value) VALUES('parent', 1)")
+            cur.execute("INSERT INTO samples(ts, value) VALUES(NULL, 2)")
+
+        try:
+            pipeline.submit(_insert("a", 1))
+            pipeline.submit(parent_then_bad_child)
+            pipeline.submit(_insert("c", 3))
+            assert pipeline.flush()
+            con = sqlite3.connect(path)
+            try:
+                assert [r[0] for r in con.execute("SELECT ts FROM samples ORDER BY ts")] == ["a", "c"]
+            finally:
+                con.close()
+        finally:
+            pipeline.stop()
+
+    def test_stop_drains_queue(self, tmp_path):
+        """Stopping commits every queued write before closing"""
+        path = _make_db(tmp_path)
+        pipeline = WritePipeline(path, flush_interval_ms=60000)
+        pipeline.start()
+        for i in range(200):
+            pipeline.submit(_insert(f"t{i}", i))
+        assert pipeline.stop(timeout=10.0)
+        assert not pipeline.is_running
+        assert _count(path) == 200
+        assert not pipeline.submit(_insert("late", 0))
+
+    @pytest.mark.parametrize("policy", ["drop_newest", "drop_oldest", "block"])
+    def test_overflow_policy_drops_when_writer_stalls(self, tmp_path, policy):
+        """A stalled writer triggers the overflow policy instead of blocking the caller forever"""
+        path = _make_db(tmp_path)
+        pipeline = WritePipeline(path, flush_interval_ms=10, max_queue_size=5,
+                                 overflow_policy=policy, put_timeout_s=0.05)
+        release = threading.Event()
+        started = threading.Event()
+
+        def stall(cur):
+            started.set()
+            release.wait(5.0)
+
+        pipeline.start()
+        try:
+            pipeline.submit(stall, "stall")
+            assert started.wait(5.0)
+            for i in range(20):
+                pipeline.submit(_insert(f"t{i}", i))
+            stats = pipeline.get_statistics()
+            assert stats["writes_dropped"] == 15
+            assert stats["queue_depth"] == 5
+        finally:
+            release.set()
+            pipeline.stop()
+        assert _count(path) == 5
+
+    def test_unknown_policy_rejected(self, tmp_path):
+        with pytest.raises(ValueError):
+            WritePipeline(str(tmp_path / "x.db"), overflow_policy="spill")
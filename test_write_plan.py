@@ -0,0 +1,192 @@
+"""
+Unit tests for coalesced multi-register write plans
+"""
+
+import asyncio
+
+from solarhub.adapters.write_plan import WritePlan
+
+
+def _reg(rid, addr, size=1):
+    return {"id": rid, "addr": addr, "size": size, "kind": "holding", "rw": "RW", "type": "U16"}
+
+
+class FakeDevice:
+    """Holding register image that records every write and read frame."""
+
+    def __init__(self, clamp=None):
+        self.words = {a: 0 for a in range(0, 400)}
+        self.writes = []
+        self.reads = []
+        self.clamp = clamp or {}
+
+    async def write(self, addr, words):
+        self.writes.append((addr, list(words)))
+        for i, w in enumerate(words):
+            self.words[addr + i] = min(w, self.clamp.get(addr + i, w))
+
+    async def read(self, addr, count):
+        self.reads.append((addr, count))
+        return [self.words[a] for a in range(addr, addr + count)]
+
+
+def test_runs_merge_adjacent_registers_only_and_honour_the_limit():
+    plan = WritePlan(max_run_regs=4)
+    for addr in (10, 11, 12, 13, 14, 20):
+        plan.stage(_reg(f"r{addr}", addr), [addr])
+    plan.stage(_reg("wide", 30, size=2), [1, 2])
+    plan.stage(_reg("r10", 10), [99])  # last write of a register wins
+    runs = plan.runs()
+    assert [(r.start, r.words) for r in runs] == [(10, [99, 11, 12, 13]), (14, [14]), (20, [20]), (30, [1, 2])]
+    # Read-backs share a block across small gaps, never across large ones
+    spans = plan.verify_spans(runs)
+    assert [(start, count) for start, count, _ in spans] == [(10, 11), (30, 2)]
+
+
+def test_execute_skips_current_registers_and_reports_what_did_not_take():
+    device = FakeDevice(clamp={101: 50})
+    plan = WritePlan()
+    plan.stage(_reg("a", 100), [7], tag=0)
+    plan.stage(_reg("b", 101), [80], tag=1)
+    plan.stage(_reg("same", 102), [3], tag=1)
+    result = asyncio.run(plan.execute(device.write, device.read, is_current=lambda p: p.reg_id == "same"))
+    assert device.writes == [(100, [7, 80])] and device.reads == [(100, 2)]
+    assert [p.reg_id for p in result.skipped] == ["same"]
+    assert result.mismatched == {"b": ([80], [50])} and not result.ok
+    assert result.failed_tags() == {1: "b: wrote [80], device holds [50]"}
+
+    async def broken(addr, words):
+        raise RuntimeError("timeout")
+
+    result = asyncio.run(plan.execute(broken, device.read))
+    assert set(result.failed) == {"a", "b", "same"} and result.verify_frames == 0
+    assert set(result.failed_tags()) == {0, 1}
+
+
+def test_adapter_batches_commands_into_one_verified_plan():
+    from types import SimpleNamespace
+
+    from solarhub.adapters.base import JsonRegisterMixin
+
+    regs = [_reg(f"prog{i}_time", 148 + i) for i in range(6)] + [_reg(f"prog{i}_power", 154 + i) for i in range(6)]
+
+    class Adapter(JsonRegisterMixin):
+        def __init__(self, device):
+            self.inv = SimpleNamespace(adapter=SimpleNamespace(shadow_refresh_s=600, shadow_blocks_per_poll=8,
+                                                               read_block_max_regs=64, read_block_max_gap=8))
+            self.regs = regs
+            self.device = device
+
+        async def _read_holding_regs(self, addr, count):
+            return await self.device.read(addr, count)
+
+        async def _write_holding_u16(self, addr, value):
+            await self.device.write(addr, [value])
+
+        async def _write_holding_u16_list(self, addr, values):
+            await self.device.write(addr, values)
+
+        async def handle_command(self, cmd):
+            i = cmd["window"]
+            await self.write_by_ident(f"prog{i}_time", cmd["time"])
+            await self.write_by_ident(f"prog{i}_power", cmd["power"])
+            # Read-your-writes inside the batch, without a bus read
+            return {"ok": await self.read_by_ident(f"prog{i}_power") == cmd["power"]}
+
+    device = FakeDevice()
+    device.words[154] = 3000  # window 0 power is already what we want
+    adapter = Adapter(device)
+    asyncio.run(adapter.refresh_shadow())
+    reads = len(device.reads)
+
+    cmds = [{"window": i, "time": 60 + 100 * i, "power": 3000} for i in range(3)]
+    results = asyncio.run(adapter.handle_commands(cmds))
+    assert results == [{"ok": True}] * 3
+    # prog0_time..prog2_time in one frame, prog1_power..prog2_power in another
+    assert device.writes == [(148, [60, 160, 260]), (155, [3000, 3000])]
+    assert len(device.reads) == reads + 1
+    assert adapter.shadow_values(["prog2_power"])[0] == {"prog2_power": 3000}
+    stats = adapter.write_plan_stats.get_statistics()
+    assert stats["registers_staged"] == 6 and stats["registers_skipped"] == 1 and stats["write_frames"] == 2
+
+
+def test_post_write_callbacks_run_only_for_registers_that_took():
+    from types import SimpleNamespace
+
+    from solarhub.adapters.base import JsonRegisterMixin
+
+    class Adapter(JsonRegisterMixin):
+        def __init__(self, device):
+            self.inv = SimpleNamespace(adapter=SimpleNamespace())
+            self.regs = [_reg("limit", 100), _reg("mode", 101)]
+            self.device = device
+
+        async def _read_holding_regs(self, addr, count):
+            return await self.device.read(addr, count)
+
+        async def _write_holding_u16(self, addr, value):
+            await self.device.write(addr, [value])
+
+        async def _write_holding_u16_list(self, addr, values):
+            await self.device.write(addr, values)
+
+        async def handle_command(self, cmd):
+            await self.write_by_ident(cmd["id"], cmd["value"])
+            self._when_applied(self._find_reg_by_id_or_name(cmd["id"]), lambda: applied.append(cmd["id"]))
+            return {"ok": True}
+
+    applied = []
+    adapter = Adapter(FakeDevice(clamp={100: 50}))
+    results = asyncio.run(adapter.handle_commands([{"id": "limit", "value": 80}, {"id": "mode", "value": 2}]))
+    # Nothing is reported before the plan ran; the clamped register never is
+    assert applied == ["mode"]
+    assert results[0]["ok"] is False and results[1] == {"ok": True}
+
+    # Outside a batch the write has already happened
+    asyncio.run(adapter.handle_command({"id": "limit", "value": 40}))
+    assert applied == ["mode", "limit"]
+
+
+def test_failed_commands_leave_nothing_staged():
+    from types import SimpleNamespace
+
+    from solarhub.adapters.base import JsonRegisterMixin
+
+    class Adapter(JsonRegisterMixin):
+        def __init__(self, device):
+            self.inv = SimpleNamespace(adapter=SimpleNamespace())
+            self.regs = [_reg("limit", 100), _reg("mode", 101), _reg("soc", 102)]
+            self.device = device
+
+        async def _read_holding_regs(self, addr, count):
+            return await self.device.read(addr, count)
+
+        async def _write_holding_u16(self, addr, value):
+            await self.device.write(addr, [value])
+
+        async def _write_holding_u16_list(self, addr, values):
+            await self.device.write(addr, values)
+
+        async def handle_command(self, cmd):
+            for reg_id, value in cmd["writes"]:
+                await self.write_by_ident(reg_id, value)
+            if cmd.get("raise"):
+                raise RuntimeError("bad window")
+            return {"ok": True} if cmd.get("ok", True) else {"ok": False, "reason": "refused"}
+
+    device = FakeDevice()
+    results = asyncio.run(Adapter(device).handle_commands([
+        {"writes": [("limit", 80)]},
+        {"writes": [("limit", 90), ("mode", 2)], "raise": True},
+        {"writes": [("soc", 40)], "ok": False},
+    ]))
+    # The first command's limit survives the failed command that overwrote it
+    assert device.writes == [(100, [80])]
+    assert results == [{"ok": True}, {"ok": False, "reason": "bad window"}, {"ok": False, "reason": "refused"}]
+
+    plan = WritePlan()
+    plan.stage(_reg("a", 10), [1], tag=0)
+    plan.stage(_reg("a", 10), [2], tag=1)
+    plan.stage(_reg("a", 10), [3], tag=1)
+    assert plan.discard(1) == 1 and [r.words for r in plan.runs()] == [[1]]
+    assert plan.discard(0) == 1 and len(plan) == 0